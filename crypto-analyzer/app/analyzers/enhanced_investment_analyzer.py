@@ -13,8 +13,32 @@ from typing import Dict, List, Optional
 from datetime import datetime, timedelta, timezone
 import logging
 
+import numpy as np
+import pandas as pd
+
 logger = logging.getLogger(__name__)
 
+# analyze_many 的列式输入: 每行一个币种 (index = symbol), has_* 为 False 的维度按缺失处理 (评分 50).
+# 数值列缺失 / NaN 按 analyze() 里 data.get(key, 默认值) 的默认值处理.
+FRAME_COLUMNS = {
+    'current_price': 0,
+    # 技术指标
+    'has_technical': False, 'rsi_value': 50, 'macd_histogram': 0,
+    'macd_bullish_cross': False, 'macd_bearish_cross': False,
+    'bb_position': 'middle', 'ema_trend': 'neutral', 'volume_above_average': False,
+    # 新闻情绪
+    'has_news': False, 'sentiment_index': 0, 'total_news': 0, 'major_events_count': 0,
+    # 资金费率
+    'has_funding': False, 'funding_rate': 0,
+    # Hyperliquid
+    'has_hyperliquid': False, 'net_flow': 0, 'long_trades': 0, 'short_trades': 0,
+    'avg_pnl': 0, 'active_wallets': 0,
+    # 以太坊链上
+    'has_ethereum': False, 'buy_volume': 0, 'sell_volume': 0, 'unique_wallets': 0, 'avg_transaction_size': 0,
+    # ETF: 整个 ETF 分析字典 (details 只用于生成理由), None = 缺失
+    'etf': None,
+}
+
 
 class EnhancedInvestmentAnalyzer:
     """增强版投资分析器"""
@@ -141,127 +165,238 @@ class EnhancedInvestmentAnalyzer:
             }
         }
 
+    def analyze_many(self, frame: pd.DataFrame) -> Dict[str, Dict]:
+        """
+        批量综合分析, 返回值与逐个调用 analyze() 相同 (timestamp 整批共用一个)
+
+        六个维度评分 / 加权 / 信号置信度按列向量化计算; 理由 / 价格目标 / 风险只是按评分拼文本, 逐行复用原方法.
+
+        Args:
+            frame: 列式输入, 列见 FRAME_COLUMNS, index 为 symbol
+
+        Returns:
+            {symbol: analyze() 格式的投资建议}
+        """
+        if frame is None or frame.empty:
+            return {}
+        frame = frame.reindex(columns=list(FRAME_COLUMNS))
+        for col, default in FRAME_COLUMNS.items():
+            if default is not None:
+                frame[col] = frame[col].where(frame[col].notna(), default)
+
+        def num(col):
+            return frame[col].to_numpy(dtype=float)
+
+        def flag(col):
+            return frame[col].to_numpy(dtype=bool)
+
+        def text(col):
+            return frame[col].to_numpy(dtype=object)
+
+        etf = [d if isinstance(d, dict) and d else None for d in frame['etf']]
+        scores = {
+            'technical': np.where(flag('has_technical'), self._technical_scores(
+                num('rsi_value'), num('macd_histogram'), flag('macd_bullish_cross'), flag('macd_bearish_cross'),
+                text('bb_position'), text('ema_trend'), flag('volume_above_average')), 50.0),
+            'news': np.where(flag('has_news'), self._news_scores(
+                num('sentiment_index'), num('total_news'), num('major_events_count')), 50.0),
+            'funding': np.where(flag('has_funding'), self._funding_scores(num('funding_rate')), 50.0),
+            'hyperliquid': np.where(flag('has_hyperliquid'), self._hyperliquid_scores(
+                num('net_flow'), num('long_trades'), num('short_trades'), num('avg_pnl'), num('active_wallets')), 50.0),
+            'ethereum': np.where(flag('has_ethereum'), self._ethereum_scores(
+                num('buy_volume'), num('sell_volume'), num('unique_wallets'), num('avg_transaction_size')), 50.0),
+            'etf': np.array([self._analyze_etf(d) if d else 50 for d in etf], dtype=float),
+        }
+        weighted = (
+            scores['technical'] * self.technical_weight +
+            scores['news'] * self.news_weight +
+            scores['funding'] * self.funding_weight +
+            scores['hyperliquid'] * self.hyperliquid_weight +
+            scores['ethereum'] * self.ethereum_weight +
+            scores['etf'] * self.etf_weight
+        )
+        signals, confidences = self._determine_signals(weighted, scores)
+
+        timestamp = datetime.now(timezone.utc).isoformat()
+        has = {k: flag(f'has_{k}') for k in ('technical', 'news', 'funding', 'hyperliquid', 'ethereum')}
+        prices = num('current_price')
+        results = {}
+        for i, symbol in enumerate(frame.index):
+            row_scores = {k: float(v[i]) for k, v in scores.items()}
+            row = frame.iloc[i]
+            signal = str(signals[i])
+            technical = {
+                'rsi': {'value': float(row['rsi_value'])},
+                'macd': {'bullish_cross': bool(row['macd_bullish_cross']), 'bearish_cross': bool(row['macd_bearish_cross'])},
+            } if has['technical'][i] else None
+            news = {'total_news': int(row['total_news'])} if has['news'][i] else None
+            funding = {'funding_rate': float(row['funding_rate'])} if has['funding'][i] else None
+            hyperliquid = {
+                'net_flow': float(row['net_flow']), 'active_wallets': int(row['active_wallets']),
+            } if has['hyperliquid'][i] else None
+            ethereum = {'unique_wallets': int(row['unique_wallets'])} if has['ethereum'][i] else None
+            reasons = self._generate_reasons(row_scores, technical, news, funding, hyperliquid, ethereum, etf[i])
+            current_price = float(prices[i])
+            entry, stop_loss, take_profit = self._calculate_targets(current_price, signal)
+            risk_level, risk_factors = self._assess_risk(row_scores, signal)
+
+            results[symbol] = {
+                'symbol': symbol,
+                'timestamp': timestamp,
+                'signal': signal,
+                'confidence': round(float(confidences[i]), 1),
+                'score': {
+                    'total': round(float(weighted[i]), 1),
+                    **{k: round(v, 1) for k, v in row_scores.items()},
+                },
+                'price': {
+                    'current': current_price,
+                    'entry': entry,
+                    'stop_loss': stop_loss,
+                    'take_profit': take_profit
+                },
+                'reasons': reasons,
+                'risk': {
+                    'level': risk_level,
+                    'factors': risk_factors
+                },
+                'data_sources': {
+                    **{k: bool(v[i]) for k, v in has.items()},
+                    'etf': etf[i] is not None
+                }
+            }
+        return results
+
+    # ---------- 评分规则 (按列计算; analyze() 的单币种评分也走这里, 阈值只在这一处) ----------
+
+    @staticmethod
+    def _technical_scores(rsi, histogram, bullish_cross, bearish_cross, bb_position, ema_trend, volume_high):
+        # RSI: 超卖 / 偏低 / 超买 / 偏高
+        score = 50 + np.select([rsi < 30, rsi < 40, rsi > 70, rsi > 60], [15, 8, -12, -6], 0)
+        # MACD: 金叉 / 死叉 / 柱线正负
+        score = score + np.select([bullish_cross, bearish_cross, histogram > 0], [18, -18, 8], -8)
+        # 布林带位置
+        score = score + np.select([bb_position == 'below_lower', bb_position == 'above_upper'], [12, -10], 0)
+        # EMA 趋势
+        score = score + np.select([ema_trend == 'up', ema_trend == 'down'], [12, -12], 0)
+        # 成交量放大, 增强已有方向
+        score = score + np.where(volume_high, np.sign(score - 50) * 8, 0)
+        return np.clip(score, 0, 100).astype(float)
+
+    @staticmethod
+    def _news_scores(sentiment_index, total_news, major_events):
+        # 情绪指数 -100~100 → 0~100
+        score = 50 + (sentiment_index / 2)
+        # 新闻太少, 向中性回归
+        score = np.where(total_news < 3, 50 + (score - 50) * 0.5, score)
+        # 重大事件加权
+        score = np.where(major_events > 0, np.where(score > 50, score + 10, score - 10), score)
+        return np.clip(score, 0, 100)
+
+    @staticmethod
+    def _funding_scores(rate):
+        # 正值且高: 多头过热 (看跌); 负值且低: 空头过度 (看涨); 接近 0: 中性
+        # >0.1% / >0.05% / >0.01% / <-0.1% / <-0.05% / <-0.01%
+        return np.select(
+            [rate > 0.001, rate > 0.0005, rate > 0.0001, rate < -0.001, rate < -0.0005, rate < -0.0001],
+            [25, 35, 45, 75, 65, 55], 50
+        ).astype(float)
+
+    @staticmethod
+    def _hyperliquid_scores(net_flow, long_trades, short_trades, avg_pnl, active_wallets):
+        # 净流入: >$1M / >$500K / >$100K
+        direction = np.where(net_flow > 0, 1, -1)
+        magnitude = np.abs(net_flow)
+        score = 50 + direction * np.select([magnitude > 1000000, magnitude > 500000, magnitude > 100000], [20, 12, 6], 0)
+        # 交易方向: 做多占比
+        total = long_trades + short_trades
+        long_ratio = np.divide(long_trades, total, out=np.full_like(total, 0.5), where=total > 0)
+        score = score + np.where(total > 0, np.select(
+            [long_ratio > 0.7, long_ratio > 0.6, long_ratio < 0.3, long_ratio < 0.4], [15, 8, -15, -8], 0), 0)
+        # 平均盈亏
+        score = score + np.select([avg_pnl > 10000, avg_pnl > 0, avg_pnl < -10000, avg_pnl < 0], [10, 5, -10, -5], 0)
+        # 多个聪明钱包同时活跃, 信号更强
+        score = score + np.where(active_wallets > 5, np.where(score > 50, 5, -5), 0)
+        return np.clip(score, 0, 100).astype(float)
+
+    @staticmethod
+    def _ethereum_scores(buy_volume, sell_volume, unique_wallets, avg_size):
+        # 买入占比
+        total = buy_volume + sell_volume
+        buy_ratio = np.divide(buy_volume, total, out=np.full_like(total, 0.5), where=total > 0)
+        score = 50 + np.where(total > 0, np.select(
+            [buy_ratio > 0.7, buy_ratio > 0.6, buy_ratio < 0.3, buy_ratio < 0.4], [20, 10, -20, -10], 0), 0)
+        # 钱包数量 / >$100K 大额交易, 增强已有方向
+        score = score + np.where(unique_wallets > 10, np.where(score > 50, 10, -10), 0)
+        score = score + np.where(avg_size > 100000, np.where(score > 50, 10, -10), 0)
+        return np.clip(score, 0, 100).astype(float)
+
+    def _determine_signals(self, weighted, scores: Dict[str, np.ndarray]) -> tuple:
+        """按综合评分列确定信号和置信度, 返回 (信号数组, 置信度数组)"""
+        # 基础信号
+        conditions = [
+            weighted >= self.strong_buy_threshold,
+            weighted >= self.buy_threshold,
+            weighted <= self.strong_sell_threshold,
+            weighted <= self.sell_threshold,
+        ]
+        signals = np.select(conditions, ['STRONG_BUY', 'BUY', 'STRONG_SELL', 'SELL'], 'HOLD')
+        confidence = np.select(conditions, [weighted, weighted, 100 - weighted, 100 - weighted], 50.0)
+
+        # 一致性检查: 4 个以上维度同向则提升置信度, 有方向的维度不足 3 个则降低
+        stacked = np.vstack(list(scores.values()))
+        bullish_count = (stacked > 55).sum(axis=0)
+        bearish_count = (stacked < 45).sum(axis=0)
+        confidence = np.select(
+            [bullish_count >= 4, bearish_count >= 4, bullish_count + bearish_count < 3],
+            [np.minimum(confidence + 10, 100), np.minimum(confidence + 10, 100), np.maximum(confidence - 10, 0)],
+            confidence
+        )
+        return signals, confidence
+
     def _analyze_technical(self, data: Dict) -> float:
         """
-        分析技术指标
+        分析技术指标 (规则见 _technical_scores)
 
         Returns:
             评分 0-100 (50=中性, >50=看涨, <50=看跌)
         """
-        score = 50  # 起始中性分
-
-        # RSI 分析 (权重: 20%)
-        rsi = data.get('rsi', {})
-        rsi_value = rsi.get('value', 50)
-        if rsi_value < 30:  # 超卖
-            score += 15
-        elif rsi_value < 40:  # 偏低
-            score += 8
-        elif rsi_value > 70:  # 超买
-            score -= 12
-        elif rsi_value > 60:  # 偏高
-            score -= 6
-
-        # MACD 分析 (权重: 25%)
         macd = data.get('macd', {})
-        if macd.get('bullish_cross'):
-            score += 18
-        elif macd.get('bearish_cross'):
-            score -= 18
-        elif macd.get('histogram', 0) > 0:
-            score += 8
-        else:
-            score -= 8
-
-        # 布林带分析 (权重: 20%)
-        bb = data.get('bollinger', {})
-        price_pos = bb.get('price_position', 'middle')
-        if price_pos == 'below_lower':
-            score += 12
-        elif price_pos == 'above_upper':
-            score -= 10
-
-        # EMA 趋势 (权重: 20%)
-        ema = data.get('ema', {})
-        trend = ema.get('trend', 'neutral')
-        if trend == 'up':
-            score += 12
-        elif trend == 'down':
-            score -= 12
-
-        # 成交量确认 (权重: 15%)
-        volume = data.get('volume', {})
-        if volume.get('above_average'):
-            # 成交量放大,增强信号
-            if score > 50:
-                score += 8
-            elif score < 50:
-                score -= 8
-
-        return max(0, min(100, score))
+        return float(self._technical_scores(
+            np.array([data.get('rsi', {}).get('value', 50)], dtype=float),
+            np.array([macd.get('histogram', 0)], dtype=float),
+            np.array([bool(macd.get('bullish_cross'))]),
+            np.array([bool(macd.get('bearish_cross'))]),
+            np.array([data.get('bollinger', {}).get('price_position', 'middle')], dtype=object),
+            np.array([data.get('ema', {}).get('trend', 'neutral')], dtype=object),
+            np.array([bool(data.get('volume', {}).get('above_average'))]),
+        )[0])
 
     def _analyze_news(self, data: Dict) -> float:
         """
-        分析新闻情绪
+        分析新闻情绪 (规则见 _news_scores)
 
         Returns:
             评分 0-100
         """
-        sentiment_index = data.get('sentiment_index', 0)  # -100 到 100
-
-        # 转换为 0-100
-        score = 50 + (sentiment_index / 2)
-
-        # 新闻数量影响置信度
-        news_count = data.get('total_news', 0)
-        if news_count < 3:
-            # 新闻太少,向中性回归
-            score = 50 + (score - 50) * 0.5
-
-        # 重大事件加权
-        if data.get('major_events_count', 0) > 0:
-            if score > 50:
-                score += 10
-            else:
-                score -= 10
-
-        return max(0, min(100, score))
+        return float(self._news_scores(
+            np.array([data.get('sentiment_index', 0)], dtype=float),  # -100 到 100
+            np.array([data.get('total_news', 0)], dtype=float),
+            np.array([data.get('major_events_count', 0)], dtype=float),
+        )[0])
 
     def _analyze_funding(self, data: Dict) -> float:
         """
-        分析资金费率 (期货市场情绪指标)
-
-        资金费率含义:
-        - 正值且高: 多头过热,可能回调 (看跌信号)
-        - 负值且低: 空头过度,可能反弹 (看涨信号)
-        - 接近0: 市场平衡 (中性)
+        分析资金费率 (期货市场情绪指标, 规则见 _funding_scores)
 
         Returns:
             评分 0-100
         """
-        funding_rate = data.get('funding_rate', 0)  # 例如 0.0001 = 0.01%
-
-        score = 50  # 中性起点
-
-        # 资金费率阈值
-        if funding_rate > 0.001:  # >0.1% (极度多头过热)
-            score = 25  # 强烈看跌
-        elif funding_rate > 0.0005:  # >0.05% (多头过热)
-            score = 35  # 看跌
-        elif funding_rate > 0.0001:  # >0.01% (轻微多头)
-            score = 45  # 略偏空
-        elif funding_rate < -0.001:  # <-0.1% (极度空头过度)
-            score = 75  # 强烈看涨
-        elif funding_rate < -0.0005:  # <-0.05% (空头过度)
-            score = 65  # 看涨
-        elif funding_rate < -0.0001:  # <-0.01% (轻微空头)
-            score = 55  # 略偏多
-
-        return score
+        return float(self._funding_scores(np.array([data.get('funding_rate', 0)], dtype=float))[0])
 
     def _analyze_hyperliquid(self, data: Dict) -> float:
         """
-        分析 Hyperliquid 聪明钱活动
+        分析 Hyperliquid 聪明钱活动 (规则见 _hyperliquid_scores)
 
         Args:
             data: {
@@ -276,67 +411,14 @@ class EnhancedInvestmentAnalyzer:
         Returns:
             评分 0-100
         """
-        score = 50
-
-        # 净流入分析 (权重: 40%)
-        net_flow = data.get('net_flow', 0)
-        if abs(net_flow) > 1000000:  # >$1M
-            if net_flow > 0:
-                score += 20  # 大额流入
-            else:
-                score -= 20  # 大额流出
-        elif abs(net_flow) > 500000:  # >$500K
-            if net_flow > 0:
-                score += 12
-            else:
-                score -= 12
-        elif abs(net_flow) > 100000:  # >$100K
-            if net_flow > 0:
-                score += 6
-            else:
-                score -= 6
-
-        # 交易方向分析 (权重: 30%)
-        long_trades = data.get('long_trades', 0)
-        short_trades = data.get('short_trades', 0)
-        total_trades = long_trades + short_trades
-
-        if total_trades > 0:
-            long_ratio = long_trades / total_trades
-            if long_ratio > 0.7:  # >70% 做多
-                score += 15
-            elif long_ratio > 0.6:
-                score += 8
-            elif long_ratio < 0.3:  # <30% 做多 (70% 做空)
-                score -= 15
-            elif long_ratio < 0.4:
-                score -= 8
-
-        # 盈亏分析 (权重: 20%)
-        avg_pnl = data.get('avg_pnl', 0)
-        if avg_pnl > 10000:  # 高盈利
-            score += 10
-        elif avg_pnl > 0:
-            score += 5
-        elif avg_pnl < -10000:  # 高亏损
-            score -= 10
-        elif avg_pnl < 0:
-            score -= 5
-
-        # 活跃度分析 (权重: 10%)
-        active_wallets = data.get('active_wallets', 0)
-        if active_wallets > 5:
-            # 多个聪明钱包同时活跃,信号更强
-            if score > 50:
-                score += 5
-            else:
-                score -= 5
-
-        return max(0, min(100, score))
+        return float(self._hyperliquid_scores(*(
+            np.array([data.get(key, 0)], dtype=float)
+            for key in ('net_flow', 'long_trades', 'short_trades', 'avg_pnl', 'active_wallets')
+        ))[0])
 
     def _analyze_ethereum(self, data: Dict) -> float:
         """
-        分析以太坊链上聪明钱活动
+        分析以太坊链上聪明钱活动 (规则见 _ethereum_scores)
 
         Args:
             data: {
@@ -350,41 +432,10 @@ class EnhancedInvestmentAnalyzer:
         Returns:
             评分 0-100
         """
-        score = 50
-
-        buy_volume = data.get('buy_volume', 0)
-        sell_volume = data.get('sell_volume', 0)
-        total_volume = buy_volume + sell_volume
-
-        if total_volume > 0:
-            buy_ratio = buy_volume / total_volume
-
-            if buy_ratio > 0.7:
-                score += 20
-            elif buy_ratio > 0.6:
-                score += 10
-            elif buy_ratio < 0.3:
-                score -= 20
-            elif buy_ratio < 0.4:
-                score -= 10
-
-        # 钱包数量
-        unique_wallets = data.get('unique_wallets', 0)
-        if unique_wallets > 10:
-            if score > 50:
-                score += 10
-            else:
-                score -= 10
-
-        # 交易规模
-        avg_size = data.get('avg_transaction_size', 0)
-        if avg_size > 100000:  # >$100K 大额交易
-            if score > 50:
-                score += 10
-            else:
-                score -= 10
-
-        return max(0, min(100, score))
+        return float(self._ethereum_scores(*(
+            np.array([data.get(key, 0)], dtype=float)
+            for key in ('buy_volume', 'sell_volume', 'unique_wallets', 'avg_transaction_size')
+        ))[0])
 
     def _analyze_etf(self, data: Dict) -> float:
         """
@@ -421,40 +472,16 @@ class EnhancedInvestmentAnalyzer:
 
     def _determine_signal(self, weighted_score: float, scores: Dict) -> tuple:
         """
-        根据综合评分确定信号和置信度
+        根据综合评分确定信号和置信度 (规则见 _determine_signals)
 
         Returns:
             (signal, confidence)
         """
-        # 基础信号
-        if weighted_score >= self.strong_buy_threshold:
-            signal = 'STRONG_BUY'
-            confidence = weighted_score
-        elif weighted_score >= self.buy_threshold:
-            signal = 'BUY'
-            confidence = weighted_score
-        elif weighted_score <= self.strong_sell_threshold:
-            signal = 'STRONG_SELL'
-            confidence = 100 - weighted_score
-        elif weighted_score <= self.sell_threshold:
-            signal = 'SELL'
-            confidence = 100 - weighted_score
-        else:
-            signal = 'HOLD'
-            confidence = 50
-
-        # 一致性检查 - 所有维度方向一致则提升置信度
-        bullish_count = sum(1 for v in scores.values() if v > 55)
-        bearish_count = sum(1 for v in scores.values() if v < 45)
-
-        if bullish_count >= 4:  # 4个以上维度看涨
-            confidence = min(confidence + 10, 100)
-        elif bearish_count >= 4:  # 4个以上维度看跌
-            confidence = min(confidence + 10, 100)
-        elif bullish_count + bearish_count < 3:  # 信号分歧
-            confidence = max(confidence - 10, 0)
-
-        return signal, confidence
+        signals, confidence = self._determine_signals(
+            np.array([weighted_score], dtype=float),
+            {k: np.array([v], dtype=float) for k, v in scores.items()},
+        )
+        return str(signals[0]), float(confidence[0])
 
     def _calculate_targets(self, current_price: float, signal: str) -> tuple:
         """
@@ -403,89 +403,122 @@ class TechnicalIndicators:
             for key, value in vol_indicators.items():
                 df[key] = value
 
-            # 返回最新值
-            latest = df.iloc[-1]
-
-            return {
-                'timestamp': latest.get('timestamp'),
-                'price': latest['close'],
-                'rsi': {
-                    'value': latest['rsi'],
-                    'overbought': latest['rsi'] > self.rsi_overbought,
-                    'oversold': latest['rsi'] < self.rsi_oversold
-                },
-                'macd': {
-                    'macd': latest['macd'],
-                    'signal': latest['macd_signal'],
-                    'histogram': latest['macd_histogram'],
-                    'bullish_cross': self._check_macd_cross(df, 'bullish'),
-                    'bearish_cross': self._check_macd_cross(df, 'bearish')
-                },
-                'bollinger': {
-                    'upper': latest['bb_upper'],
-                    'middle': latest['bb_middle'],
-                    'lower': latest['bb_lower'],
-                    'price_position': self._get_bb_position(latest)
-                },
-                'ema': {
-                    'short': latest['ema_short'],
-                    'long': latest['ema_long'],
-                    'bullish_cross': latest['ema_short'] > latest['ema_long'],
-                    'trend': 'up' if latest['ema_short'] > latest['ema_long'] else 'down',
-                    'volume_ratio': latest['volume'] / latest['vol_ma20'] if latest['vol_ma20'] > 0 else 1.0,
-                    'volume_multiple': round(latest['volume'] / latest['vol_ma20'], 2) if latest['vol_ma20'] > 0 else 1.0
-                },
-                'ma_ema10': {
-                    'ma10': latest['ma10'],
-                    'ema10': latest['ema10'],
-                    'bullish_cross': latest['ema10'] > latest['ma10'],  # EMA10在MA10之上表示上升趋势
-                    'trend': 'up' if latest['ema10'] > latest['ma10'] else 'down',
-                    'cross_type': 'golden' if latest['ema10'] > latest['ma10'] else 'death' if latest['ema10'] < latest['ma10'] else 'neutral'
-                },
-                'ma_ema5': {
-                    'ma5': latest['ma5'],
-                    'ema5': latest['ema5'],
-                    'bullish_cross': latest['ema5'] > latest['ma5'],  # EMA5在MA5之上表示上升趋势
-                    'trend': 'up' if latest['ema5'] > latest['ma5'] else 'down',
-                    'cross_type': 'golden' if latest['ema5'] > latest['ma5'] else 'death' if latest['ema5'] < latest['ma5'] else 'neutral'
-                },
-                'kdj': {
-                    'k': latest['kdj_k'],
-                    'd': latest['kdj_d'],
-                    'j': latest['kdj_j'],
-                    'overbought': latest['kdj_k'] > 80,
-                    'oversold': latest['kdj_k'] < 20
-                },
-                'volume': {
-                    'current': latest['volume'],
-                    'ma5': latest['vol_ma5'],
-                    'ma20': latest['vol_ma20'],
-                    'change_pct': latest['vol_change'],
-                    'above_average': latest['volume'] > latest['vol_ma20']
-                },
-                'atr': latest['atr']
-            }
+            # 返回最新值 (与批量 / 流式路径共用同一份组装)
+            return self.summarize_latest(df.iloc[-1], df.iloc[-2], df.iloc[-1].get('timestamp'))
 
         except Exception as e:
             logger.error(f"计算技术指标失败: {e}")
             return {}
 
-    def _check_macd_cross(self, df: pd.DataFrame, direction: str) -> bool:
-        """检查MACD是否发生交叉"""
-        if len(df) < 2:
-            return False
+    def analyze_many(self, series: Dict[str, Dict[str, list]]) -> Dict[str, Dict]:
+        """
+        批量计算多个币种的技术指标, 返回值与逐个调用 analyze() 相同
 
-        current = df.iloc[-1]
-        previous = df.iloc[-2]
+        未安装 pandas_ta 时 (analyze() 走手动分支) 用向量化引擎一次算完全部币种;
+        安装了 pandas_ta 时口径不同, 逐个回落 analyze() 保持结果一致.
 
-        if direction == 'bullish':
-            # 金叉：MACD从下方穿过信号线
-            return (previous['macd'] <= previous['macd_signal'] and
-                    current['macd'] > current['macd_signal'])
-        else:
-            # 死叉：MACD从上方穿过信号线
-            return (previous['macd'] >= previous['macd_signal'] and
-                    current['macd'] < current['macd_signal'])
+        Args:
+            series: {symbol: {'timestamp','open','high','low','close','volume'} → 升序列表}
+
+        Returns:
+            {symbol: analyze() 格式的指标字典}, 数据不足 50 根的币种不出现在结果中
+        """
+        eligible = {s: d for s, d in series.items() if d and len(d.get('close', [])) >= 50}
+        if not eligible:
+            return {}
+
+        if ta:
+            results = {}
+            for symbol, data in eligible.items():
+                indicators = self.analyze(pd.DataFrame(data))
+                if indicators:
+                    results[symbol] = indicators
+            return results
+
+        from app.utils import indicator_engine as engine
+
+        symbols = list(eligible)
+        ohlcv = {
+            key: engine.stack_series([eligible[s][key] for s in symbols])
+            for key in ('open', 'high', 'low', 'close', 'volume')
+        }
+        cols = engine.compute_technical_batch(ohlcv, self.config)
+
+        results = {}
+        for i, symbol in enumerate(symbols):
+            try:
+                latest = {k: float(v[i, -1]) for k, v in cols.items()}
+                previous = {'macd': float(cols['macd'][i, -2]), 'macd_signal': float(cols['macd_signal'][i, -2])}
+                timestamps = eligible[symbol].get('timestamp') or [None]
+                results[symbol] = self.summarize_latest(latest, previous, timestamps[-1])
+            except Exception as e:
+                logger.error(f"批量计算技术指标失败 {symbol}: {e}")
+        return results
+
+    def summarize_latest(self, latest: Dict[str, float], previous: Dict[str, float], timestamp) -> Dict:
+        """由最新/上一根的指标值组装 analyze() 格式的结果 (analyze / 批量 / 流式路径共用)"""
+        vol_ma20 = latest['vol_ma20']
+        macd_v, macd_s = latest['macd'], latest['macd_signal']
+        prev_macd, prev_signal = previous['macd'], previous['macd_signal']
+        return {
+            'timestamp': timestamp,
+            'price': latest['close'],
+            'rsi': {
+                'value': latest['rsi'],
+                'overbought': latest['rsi'] > self.rsi_overbought,
+                'oversold': latest['rsi'] < self.rsi_oversold
+            },
+            'macd': {
+                'macd': macd_v,
+                'signal': macd_s,
+                'histogram': latest['macd_histogram'],
+                'bullish_cross': prev_macd <= prev_signal and macd_v > macd_s,
+                'bearish_cross': prev_macd >= prev_signal and macd_v < macd_s
+            },
+            'bollinger': {
+                'upper': latest['bb_upper'],
+                'middle': latest['bb_middle'],
+                'lower': latest['bb_lower'],
+                'price_position': self._get_bb_position(latest)
+            },
+            'ema': {
+                'short': latest['ema_short'],
+                'long': latest['ema_long'],
+                'bullish_cross': latest['ema_short'] > latest['ema_long'],
+                'trend': 'up' if latest['ema_short'] > latest['ema_long'] else 'down',
+                'volume_ratio': latest['volume'] / vol_ma20 if vol_ma20 > 0 else 1.0,
+                'volume_multiple': round(latest['volume'] / vol_ma20, 2) if vol_ma20 > 0 else 1.0
+            },
+            'ma_ema10': {
+                'ma10': latest['ma10'],
+                'ema10': latest['ema10'],
+                'bullish_cross': latest['ema10'] > latest['ma10'],
+                'trend': 'up' if latest['ema10'] > latest['ma10'] else 'down',
+                'cross_type': 'golden' if latest['ema10'] > latest['ma10'] else 'death' if latest['ema10'] < latest['ma10'] else 'neutral'
+            },
+            'ma_ema5': {
+                'ma5': latest['ma5'],
+                'ema5': latest['ema5'],
+                'bullish_cross': latest['ema5'] > latest['ma5'],
+                'trend': 'up' if latest['ema5'] > latest['ma5'] else 'down',
+                'cross_type': 'golden' if latest['ema5'] > latest['ma5'] else 'death' if latest['ema5'] < latest['ma5'] else 'neutral'
+            },
+            'kdj': {
+                'k': latest['kdj_k'],
+                'd': latest['kdj_d'],
+                'j': latest['kdj_j'],
+                'overbought': latest['kdj_k'] > 80,
+                'oversold': latest['kdj_k'] < 20
+            },
+            'volume': {
+                'current': latest['volume'],
+                'ma5': latest['vol_ma5'],
+                'ma20': vol_ma20,
+                'change_pct': latest['vol_change'],
+                'above_average': latest['volume'] > vol_ma20
+            },
+            'atr': latest['atr']
+        }
 
     def _get_bb_position(self, row) -> str:
         """获取价格在布林带中的位置"""
@@ -35,11 +35,9 @@ def _connect():
 
 
 def _invalidate_settings_cache() -> None:
-    from app.services.data_cache_service import invalidate_setting_cache
-    from app.services.system_settings_loader import invalidate_loader_cache
+    from app.services.settings_store import notify_settings_changed
 
-    invalidate_setting_cache()
-    invalidate_loader_cache()
+    notify_settings_changed()
 
 
 def _upsert_setting(cur, key: str, value: str) -> None:
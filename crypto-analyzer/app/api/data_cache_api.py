@@ -18,8 +18,8 @@ from app.services.data_cache_service import (
     get_market_movers,
     get_candidate_pool,
     get_position_stats,
-    invalidate_setting_cache,
 )
+from app.services.settings_store import notify_settings_changed
 
 router = APIRouter(prefix="/api/data-cache", tags=["data_cache"])
 
@@ -54,9 +54,9 @@ async def api_refresh_position_stats():
 
 @router.post("/refresh/settings-cache")
 async def api_refresh_settings_cache():
-    """手动刷新系统设置缓存."""
+    """手动刷新系统设置缓存 (各进程配置快照同时重载)."""
     result = sync_settings_cache()
-    invalidate_setting_cache()
+    notify_settings_changed()
     return {"status": "ok", "result": result}
 
 
@@ -29,6 +29,7 @@ router = APIRouter(prefix='/api/futures/review', tags=['futures-review'])
 # 加载配置
 from app.utils.config_loader import load_config
 from app.utils.futures_symbol import futures_symbol_clean
+from app.services import pnl_rollup
 from app.services.signal_analysis_service import SignalAnalysisService
 from app.services.strategy_display_names import (
     get_strategy_display_name,
@@ -103,6 +104,11 @@ def get_db_connection():
     return pymysql.connect(**db_config, autocommit=True)
 
 
+def _ratio(num, den) -> Optional[float]:
+    """汇总行的均值: den 为 0 时返回 None"""
+    return float(num) / den if den else None
+
+
 def parse_close_reason(notes: str) -> tuple:
     """
     解析平仓原因，返回 (代码, 中文名称)
@@ -539,23 +545,8 @@ async def get_review_summary(
         """, (account_id, time_threshold))
         order_stats = cursor.fetchone()
 
-        # 持仓统计（已平仓的）
-        cursor.execute("""
-            SELECT
-                COUNT(*) as total_positions,
-                SUM(CASE WHEN realized_pnl > 0 THEN 1 ELSE 0 END) as winning_trades,
-                SUM(CASE WHEN realized_pnl < 0 THEN 1 ELSE 0 END) as losing_trades,
-                SUM(CASE WHEN realized_pnl = 0 THEN 1 ELSE 0 END) as break_even_trades,
-                SUM(realized_pnl) as total_realized_pnl,
-                AVG(CASE WHEN realized_pnl > 0 THEN realized_pnl ELSE NULL END) as avg_profit,
-                AVG(CASE WHEN realized_pnl < 0 THEN realized_pnl ELSE NULL END) as avg_loss,
-                MAX(realized_pnl) as max_profit,
-                MIN(realized_pnl) as max_loss,
-                AVG(TIMESTAMPDIFF(MINUTE, open_time, close_time)) as avg_holding_minutes
-            FROM futures_positions
-            WHERE account_id = %s AND status = 'CLOSED' AND close_time >= %s
-        """, (account_id, time_threshold))
-        position_stats = cursor.fetchone()
+        # 持仓统计（已平仓的, 读小时汇总表）
+        position_stats = pnl_rollup.query_window(cursor, account_id, time_threshold)[0]
 
         # 当前未平仓持仓的未实现盈亏
         cursor.execute("""
@@ -566,36 +557,23 @@ async def get_review_summary(
         unrealized = cursor.fetchone()
 
         # 按交易对统计胜负
-        cursor.execute("""
-            SELECT
-                symbol,
-                COUNT(*) as total_trades,
-                SUM(CASE WHEN realized_pnl > 0 THEN 1 ELSE 0 END) as wins,
-                SUM(CASE WHEN realized_pnl < 0 THEN 1 ELSE 0 END) as losses,
-                SUM(CASE WHEN realized_pnl = 0 THEN 1 ELSE 0 END) as break_even,
-                SUM(realized_pnl) as total_pnl,
-                AVG(CASE WHEN realized_pnl > 0 THEN realized_pnl ELSE NULL END) as avg_win,
-                AVG(CASE WHEN realized_pnl < 0 THEN realized_pnl ELSE NULL END) as avg_loss,
-                MAX(realized_pnl) as max_win,
-                MIN(realized_pnl) as max_loss
-            FROM futures_positions
-            WHERE account_id = %s AND status = 'CLOSED' AND close_time >= %s
-            GROUP BY symbol
-            ORDER BY total_pnl DESC
-        """, (account_id, time_threshold))
-        symbol_stats = cursor.fetchall()
+        symbol_stats = sorted(
+            pnl_rollup.query_window(cursor, account_id, time_threshold, dims=('symbol',)),
+            key=lambda r: r['pnl_sum'], reverse=True,
+        )
 
         cursor.close()
         conn.close()
 
         # 计算胜率和盈亏比
-        total_closed = position_stats['total_positions'] or 0
-        winning = position_stats['winning_trades'] or 0
-        losing = position_stats['losing_trades'] or 0
+        total_closed = position_stats['trades']
+        winning = position_stats['wins']
+        losing = position_stats['losses']
         win_rate = (winning / total_closed * 100) if total_closed > 0 else 0
 
-        avg_profit = float(position_stats['avg_profit'] or 0)
-        avg_loss = abs(float(position_stats['avg_loss'] or 1))
+        avg_profit = _ratio(position_stats['profit_sum'], winning) or 0
+        avg_loss_raw = _ratio(position_stats['loss_sum'], losing)
+        avg_loss = abs(avg_loss_raw or 1)
         profit_loss_ratio = avg_profit / avg_loss if avg_loss > 0 else 0
 
         total_orders = order_stats['total_orders'] or 0
@@ -605,9 +583,9 @@ async def get_review_summary(
         # 处理交易对统计数据
         symbol_performance = []
         for row in symbol_stats:
-            total = row['total_trades'] or 0
-            wins = row['wins'] or 0
-            losses = row['losses'] or 0
+            total = row['trades']
+            wins = row['wins']
+            losses = row['losses']
             win_rate_sym = (wins / total * 100) if total > 0 else 0
 
             symbol_performance.append({
@@ -615,13 +593,13 @@ async def get_review_summary(
                 "total_trades": total,
                 "wins": wins,
                 "losses": losses,
-                "break_even": row['break_even'] or 0,
+                "break_even": row['zero_pnl'],
                 "win_rate": round(win_rate_sym, 1),
-                "total_pnl": round(float(row['total_pnl'] or 0), 2),
-                "avg_win": round(float(row['avg_win'] or 0), 2),
-                "avg_loss": round(float(row['avg_loss'] or 0), 2),
-                "max_win": round(float(row['max_win'] or 0), 2),
-                "max_loss": round(float(row['max_loss'] or 0), 2)
+                "total_pnl": round(row['pnl_sum'], 2),
+                "avg_win": round(_ratio(row['profit_sum'], wins) or 0, 2),
+                "avg_loss": round(_ratio(row['loss_sum'], losses) or 0, 2),
+                "max_win": round(row['max_pnl'] or 0, 2),
+                "max_loss": round(row['min_pnl'] or 0, 2)
             })
 
         return {
@@ -636,7 +614,7 @@ async def get_review_summary(
                     "success_rate": round(success_rate, 1)
                 },
                 "pnl_summary": {
-                    "realized_pnl": float(position_stats['total_realized_pnl'] or 0),
+                    "realized_pnl": position_stats['pnl_sum'],
                     "unrealized_pnl": float(unrealized['total_unrealized_pnl'] or 0),
                     "total_fee": float(order_stats['total_fee'] or 0)
                 },
@@ -644,17 +622,17 @@ async def get_review_summary(
                     "total_closed_positions": total_closed,
                     "winning_trades": winning,
                     "losing_trades": losing,
-                    "break_even_trades": position_stats['break_even_trades'] or 0,
+                    "break_even_trades": position_stats['zero_pnl'],
                     "win_rate": round(win_rate, 1),
                     "avg_profit": round(avg_profit, 2),
-                    "avg_loss": round(-abs(float(position_stats['avg_loss'] or 0)), 2),
+                    "avg_loss": round(-abs(avg_loss_raw or 0), 2),
                     "profit_loss_ratio": round(profit_loss_ratio, 2)
                 },
                 "extremes": {
-                    "max_profit": float(position_stats['max_profit'] or 0),
-                    "max_loss": float(position_stats['max_loss'] or 0)
+                    "max_profit": position_stats['max_pnl'] or 0.0,
+                    "max_loss": position_stats['min_pnl'] or 0.0
                 },
-                "avg_holding_minutes": round(float(position_stats['avg_holding_minutes'] or 0), 1),
+                "avg_holding_minutes": round(_ratio(position_stats['hold_sum'], position_stats['hold_n']) or 0, 1),
                 "symbol_performance": symbol_performance
             }
         }
@@ -2037,28 +2015,11 @@ async def get_daily_pnl_stats(
         conn = pymysql.connect(**db_config, cursorclass=pymysql.cursors.DictCursor)
         cursor = conn.cursor()
 
-        # 查询每日盈亏数据
-        cursor.execute("""
-            SELECT
-                DATE(close_time) as trade_date,
-                COUNT(*) as total_trades,
-                SUM(CASE WHEN realized_pnl > 0 THEN 1 ELSE 0 END) as profit_trades,
-                SUM(CASE WHEN realized_pnl <= 0 THEN 1 ELSE 0 END) as loss_trades,
-                SUM(realized_pnl) as total_pnl,
-                SUM(CASE WHEN realized_pnl > 0 THEN realized_pnl ELSE 0 END) as profit_amount,
-                SUM(CASE WHEN realized_pnl <= 0 THEN realized_pnl ELSE 0 END) as loss_amount,
-                SUM(margin) as total_margin,
-                AVG(unrealized_pnl_pct) as avg_pnl_pct
-            FROM futures_positions
-            WHERE status = 'CLOSED'
-            AND account_id = %s
-            AND DATE(close_time) >= %s
-            AND DATE(close_time) <= %s
-            GROUP BY DATE(close_time)
-            ORDER BY trade_date DESC
-        """, (account_id, month_start, month_end))
-
-        daily_records = cursor.fetchall()
+        # 每日盈亏 (日汇总表, 每月最多 31 行)
+        daily_records = sorted(
+            pnl_rollup.query_days(cursor, account_id, month_start, month_end),
+            key=lambda r: r['bucket_date'], reverse=True,
+        )
 
         # 构建每日数据
         daily_data = []
@@ -2069,14 +2030,14 @@ async def get_daily_pnl_stats(
         max_daily_pnl_date = None
 
         for record in daily_records:
-            trade_date = record['trade_date']
-            total_trades_day = record['total_trades']
-            profit_trades_day = record['profit_trades']
-            loss_trades_day = record['loss_trades']
-            pnl = float(record['total_pnl']) if record['total_pnl'] else 0
-            profit_amt = float(record['profit_amount']) if record['profit_amount'] else 0
-            loss_amt = float(record['loss_amount']) if record['loss_amount'] else 0
-            total_margin_day = float(record['total_margin']) if record['total_margin'] else 0
+            trade_date = record['bucket_date']
+            total_trades_day = record['trades']
+            profit_trades_day = record['wins']
+            loss_trades_day = record['losses'] + record['zero_pnl']
+            pnl = record['pnl_sum']
+            profit_amt = record['profit_sum']
+            loss_amt = record['loss_sum']
+            total_margin_day = record['margin_sum']
 
             # 计算胜率
             win_rate = (profit_trades_day / total_trades_day * 100) if total_trades_day > 0 else 0
@@ -2170,28 +2131,18 @@ async def get_holding_analysis(
         time_threshold = datetime.now() - timedelta(hours=hours)
 
         # 先获取所有策略的汇总统计（用于前端下拉列表）
-        cursor.execute("""
-            SELECT
-                source,
-                COUNT(*) AS total_trades,
-                SUM(CASE WHEN realized_pnl > 0 THEN 1 ELSE 0 END) AS wins,
-                SUM(realized_pnl) AS total_pnl,
-                AVG(CASE WHEN realized_pnl > 0 THEN realized_pnl ELSE NULL END) AS avg_win_pnl,
-                AVG(CASE WHEN realized_pnl < 0 THEN realized_pnl ELSE NULL END) AS avg_loss_pnl
-            FROM futures_positions
-            WHERE account_id = %s AND status = 'CLOSED' AND close_time >= %s
-              AND source IS NOT NULL AND source != ''
-            GROUP BY source
-            ORDER BY COUNT(*) DESC
-        """, (account_id, time_threshold))
-        strategy_rows = cursor.fetchall()
+        strategy_rows = sorted(
+            (r for r in pnl_rollup.query_window(cursor, account_id, time_threshold, dims=('source',))
+             if r['source']),
+            key=lambda r: r['trades'], reverse=True,
+        )
 
         strategies = []
         for r in strategy_rows:
             src = r['source']
-            total = int(r['total_trades'] or 0)
-            wins = int(r['wins'] or 0)
-            tp = float(r['total_pnl'] or 0)
+            total = r['trades']
+            wins = r['wins']
+            tp = r['pnl_sum']
             win_rate = (wins / total * 100) if total > 0 else 0
             strategies.append({
                 "source": src,
@@ -2200,11 +2151,34 @@ async def get_holding_analysis(
                 "wins": wins,
                 "win_rate": round(win_rate, 1),
                 "total_pnl": round(tp, 2),
-                "avg_win_pnl": round(float(r['avg_win_pnl'] or 0), 2),
-                "avg_loss_pnl": round(float(r['avg_loss_pnl'] or 0), 2),
+                "avg_win_pnl": round(_ratio(r['profit_sum'], wins) or 0, 2),
+                "avg_loss_pnl": round(_ratio(r['loss_sum'], r['losses']) or 0, 2),
             })
 
-        # 构建过滤条件
+        # 持仓时长分档统计 (汇总表已按档位分组; 盈亏为 0 / 空计入盈利侧, 与散点口径一致)
+        bucket_rows = {
+            r['hold_bucket']: r
+            for r in pnl_rollup.query_window(
+                cursor, account_id, time_threshold, dims=('hold_bucket',), source=source or None)
+        }
+        total_trades = sum(r['trades'] for r in bucket_rows.values())
+
+        if not total_trades:
+            cursor.close()
+            conn.close()
+            return {
+                "success": True,
+                "data": {
+                    "strategies": strategies,
+                    "current_source": source,
+                    "total_trades": 0,
+                    "buckets": [],
+                    "scatter": [],
+                    "summary": {"best_bucket": None, "worst_bucket": None}
+                }
+            }
+
+        # 散点图仍需逐笔数据 (走 idx_fp_account_status_close_pnl)
         source_filter = ""
         params = [account_id, time_threshold]
         if source:
@@ -2212,9 +2186,7 @@ async def get_holding_analysis(
             params.append(source)
 
         cursor.execute(f"""
-            SELECT
-                open_time, close_time, realized_pnl, position_side, source,
-                entry_price, entry_signal_type, entry_reason
+            SELECT open_time, close_time, realized_pnl, position_side
             FROM futures_positions
             WHERE account_id = %s AND status = 'CLOSED' AND close_time >= %s
               {source_filter}
@@ -2225,40 +2197,8 @@ async def get_holding_analysis(
         cursor.close()
         conn.close()
 
-        if not positions:
-            return {
-                "success": True,
-                "data": {
-                    "strategies": strategies,
-                    "current_source": source,
-                    "total_trades": 0,
-                    "buckets": [],
-                    "scatter": [],
-                    "summary": {"best_bucket": None, "worst_bucket": None}
-                }
-            }
-
-        # 按持仓时长分桶
-        BUCKETS = [
-            (0, 15, '0-15分钟'),
-            (15, 30, '15-30分钟'),
-            (30, 60, '30-60分钟'),
-            (60, 120, '1-2小时'),
-            (120, 240, '2-4小时'),
-            (240, 480, '4-8小时'),
-            (480, 1440, '8-24小时'),
-            (1440, 99999, '24小时以上'),
-        ]
-
-        buckets_map = {}
         scatter = []
-        total_win = 0
-        total_loss = 0
-        win_count = 0
-        loss_count = 0
-
         for pos in positions:
-            pnl = float(pos['realized_pnl'] or 0)
             holding_minutes = 0
             if pos['open_time'] and pos['close_time']:
                 try:
@@ -2266,67 +2206,38 @@ async def get_holding_analysis(
                     holding_minutes = max(0, int(delta.total_seconds() / 60))
                 except (TypeError, ValueError):
                     holding_minutes = 0
-
-            if pnl >= 0:
-                total_win += pnl
-                win_count += 1
-            else:
-                total_loss += pnl
-                loss_count += 1
-
-            bucket_key = None
-            bucket_label = None
-            lo = hi = 0
-            for i, (blo, bhi, label) in enumerate(BUCKETS):
-                is_last = i == len(BUCKETS) - 1
-                if (is_last and holding_minutes >= blo) or (blo <= holding_minutes < bhi):
-                    bucket_key = f"{blo}-{bhi}"
-                    bucket_label = label
-                    lo, hi = blo, bhi
-                    break
-
-            if bucket_key is None:
-                continue
-
-            if bucket_key not in buckets_map:
-                buckets_map[bucket_key] = {
-                    "label": bucket_label, "range_min": lo, "range_max": hi,
-                    "count": 0, "wins": 0, "losses": 0, "total_pnl": 0.0, "pnl_list": []
-                }
-            b = buckets_map[bucket_key]
-            b['count'] += 1
-            b['total_pnl'] += pnl
-            b['pnl_list'].append(pnl)
-            if pnl >= 0:
-                b['wins'] += 1
-            else:
-                b['losses'] += 1
-
             scatter.append({
                 "holding_minutes": holding_minutes,
-                "pnl": round(pnl, 2),
+                "pnl": round(float(pos['realized_pnl'] or 0), 2),
                 "side": pos['position_side']
             })
 
         buckets = []
-        for key in sorted(
-            buckets_map.keys(),
-            key=lambda k: int(k.split('-')[0]) if k and '-' in str(k) else 0,
-        ):
-            b = buckets_map[key]
-            wr = (b['wins'] / b['count'] * 100) if b['count'] > 0 else 0
-            avg = b['total_pnl'] / b['count'] if b['count'] > 0 else 0
+        win_count = loss_count = 0
+        total_win = total_loss = 0.0
+        for i, (lo, hi, label) in enumerate(pnl_rollup.HOLDING_BUCKETS):
+            r = bucket_rows.get(i)
+            if r is None:
+                continue
+            count = r['trades']
+            losses = r['losses']
+            wins = count - losses
+            win_count += wins
+            loss_count += losses
+            total_win += r['profit_sum']
+            total_loss += r['loss_sum']
+            wr = (wins / count * 100) if count > 0 else 0
+            avg = r['pnl_sum'] / count if count > 0 else 0
             buckets.append({
-                "label": b['label'], "range_min": b['range_min'], "range_max": b['range_max'],
-                "count": b['count'], "wins": b['wins'], "losses": b['losses'],
-                "win_rate": round(wr, 1), "total_pnl": round(b['total_pnl'], 2), "avg_pnl": round(avg, 2)
+                "label": label, "range_min": lo, "range_max": hi,
+                "count": count, "wins": wins, "losses": losses,
+                "win_rate": round(wr, 1), "total_pnl": round(r['pnl_sum'], 2), "avg_pnl": round(avg, 2)
             })
 
         valid_buckets = [b for b in buckets if b['count'] >= 2]
         best_bucket = max(valid_buckets, key=lambda x: x['avg_pnl']) if valid_buckets else None
         worst_bucket = min(valid_buckets, key=lambda x: x['avg_pnl']) if valid_buckets else None
 
-        total_trades = len(positions)
         overall_win_rate = (win_count / total_trades * 100) if total_trades > 0 else 0
 
         return {
@@ -2374,25 +2285,13 @@ async def get_strategy_performance(
 
         time_threshold = datetime.now() - timedelta(hours=hours)
 
-        from app.utils.pnl_stats import PNL_COUNT_SELECT, parse_pnl_counts
-
-        cursor.execute(f"""
-            SELECT
-                source,
-                {PNL_COUNT_SELECT},
-                COALESCE(SUM(realized_pnl), 0) AS total_pnl,
-                COALESCE(AVG(realized_pnl), 0) AS avg_pnl,
-                COALESCE(SUM(CASE WHEN realized_pnl > 0 THEN realized_pnl ELSE 0 END), 0) AS total_profit,
-                COALESCE(SUM(CASE WHEN realized_pnl < 0 THEN realized_pnl ELSE 0 END), 0) AS total_loss,
-                COALESCE(SUM(margin), 0) AS total_margin
-            FROM futures_positions
-            WHERE account_id = %s AND status = 'CLOSED' AND close_time >= %s
-              AND source IS NOT NULL AND source != ''
-            GROUP BY source
-            ORDER BY COALESCE(SUM(realized_pnl), 0) DESC
-        """, (account_id, time_threshold))
+        from app.utils.pnl_stats import parse_pnl_counts
 
-        rows = cursor.fetchall()
+        rows = sorted(
+            (r for r in pnl_rollup.query_window(cursor, account_id, time_threshold, dims=('source',))
+             if r['source']),
+            key=lambda r: r['pnl_sum'], reverse=True,
+        )
 
         cursor.close()
         conn.close()
@@ -2401,16 +2300,21 @@ async def get_strategy_performance(
         total_all = {'trades': 0, 'wins': 0, 'pnl': 0}
         for row in rows:
             source = row['source']
-            counts = parse_pnl_counts(row)
+            counts = parse_pnl_counts({
+                'total_trades': row['trades'],
+                'wins': row['wins'],
+                'losses': row['losses'],
+                'breakeven': row['zero_pnl'] + row['null_pnl'],
+            })
             total = counts['total_trades']
             wins = counts['wins']
             losses = counts['losses']
             breakeven = counts['breakeven']
-            total_pnl = float(row['total_pnl'] or 0)
-            avg_pnl = float(row['avg_pnl'] or 0)
-            total_profit = float(row['total_profit'] or 0)
-            total_loss = float(row['total_loss'] or 0)
-            total_margin = float(row['total_margin'] or 0)
+            total_pnl = row['pnl_sum']
+            avg_pnl = _ratio(row['pnl_sum'], row['trades'] - row['null_pnl']) or 0
+            total_profit = row['profit_sum']
+            total_loss = row['loss_sum']
+            total_margin = row['margin_sum']
 
             win_rate = counts['win_rate']
             loss_rate = (losses / total * 100) if total > 0 else 0
@@ -2520,32 +2424,17 @@ async def get_whitelist_pnl(
             for key in wl_meta
         }
 
-        cursor.execute(
-            """
-            SELECT symbol, realized_pnl, source, position_side, close_time
-            FROM futures_positions
-            WHERE account_id = %s
-              AND status = 'CLOSED'
-              AND close_time >= %s
-              AND realized_pnl IS NOT NULL
-            """,
-            (account_id, time_threshold),
-        )
-        for fp in cursor.fetchall():
-            key = _normalize_symbol_key(fp.get("symbol") or "")
+        for row in pnl_rollup.query_window(cursor, account_id, time_threshold, dims=('symbol',)):
+            key = _normalize_symbol_key(row["symbol"] or "")
             if key not in per_symbol:
                 continue
             agg = per_symbol[key]
-            pnl = float(fp.get("realized_pnl") or 0)
-            agg["net_pnl"] += pnl
-            if pnl > 0:
-                agg["wins"] += 1
-                agg["gross_profit"] += pnl
-            elif pnl < 0:
-                agg["losses"] += 1
-                agg["gross_loss"] += abs(pnl)
-            else:
-                agg["breakeven"] += 1
+            agg["net_pnl"] += row["pnl_sum"]
+            agg["wins"] += row["wins"]
+            agg["gross_profit"] += row["profit_sum"]
+            agg["losses"] += row["losses"]
+            agg["gross_loss"] += -row["loss_sum"]
+            agg["breakeven"] += row["zero_pnl"]
 
         symbols = []
         active_count = 0
@@ -309,31 +309,20 @@ def _fetch_whitelist_bundle(cur, account_id: int = 2) -> dict:
     }
 
     if wl_meta:
-        cur.execute(
-            """
-            SELECT symbol, realized_pnl
-            FROM futures_positions
-            WHERE account_id = %s
-              AND status = 'closed'
-              AND realized_pnl IS NOT NULL
-            """,
-            (account_id,),
-        )
-        for fp in cur.fetchall():
-            key = _normalize_symbol_key(fp.get("symbol") or "")
+        # 全量累计读日汇总表, 不随历史增长扫描 futures_positions
+        from app.services import pnl_rollup
+
+        for row in pnl_rollup.query_days(cur, account_id, dims=("symbol",)):
+            key = _normalize_symbol_key(row["symbol"] or "")
             if key not in per_symbol:
                 continue
             agg = per_symbol[key]
-            pnl = float(fp.get("realized_pnl") or 0)
-            agg["net_pnl"] += pnl
-            if pnl > 0:
-                agg["wins"] += 1
-                agg["gross_profit"] += pnl
-            elif pnl < 0:
-                agg["losses"] += 1
-                agg["gross_loss"] += abs(pnl)
-            else:
-                agg["breakeven"] += 1
+            agg["net_pnl"] += row["pnl_sum"]
+            agg["wins"] += row["wins"]
+            agg["gross_profit"] += row["profit_sum"]
+            agg["losses"] += row["losses"]
+            agg["gross_loss"] += -row["loss_sum"]
+            agg["breakeven"] += row["zero_pnl"]
 
     symbols = []
     in_top50_count = 0
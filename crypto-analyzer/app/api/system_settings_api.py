@@ -30,18 +30,22 @@ def _upsert_bool_setting(cursor, key: str, enabled: bool, description: str) -> N
     )
 
 
+def _notify_settings_changed() -> None:
+    """版本号 +1: 各进程配置快照 1 秒内重载 (system_settings 触发器也会 +1, 重复无害)."""
+    try:
+        from app.services.settings_store import notify_settings_changed
+        notify_settings_changed()
+    except Exception as e:
+        logger.warning(f"[settings] 配置版本号更新失败: {e}")
+
+
 def _refresh_settings_cache() -> None:
     try:
-        from app.services.data_cache_service import invalidate_setting_cache, sync_settings_cache
-        invalidate_setting_cache()
+        from app.services.data_cache_service import sync_settings_cache
         sync_settings_cache()
     except Exception:
         pass
-    try:
-        from app.services.system_settings_loader import invalidate_loader_cache
-        invalidate_loader_cache()
-    except Exception:
-        pass
+    _notify_settings_changed()
 
 
 def _expire_limits_after_direction_change(cursor, *, allow_long=None, allow_short=None) -> int:
@@ -262,6 +266,7 @@ async def update_big4_filter(data: Big4FilterUpdate):
         conn.commit()
         cursor.close()
         conn.close()
+        _notify_settings_changed()
 
         status_text = '已启用' if data.enabled else '已禁用'
         logger.info(f"[OK] Big4过滤器{status_text}")
@@ -271,7 +276,7 @@ async def update_big4_filter(data: Big4FilterUpdate):
             'message': f'Big4过滤器{status_text}',
             'data': {
                 'enabled': data.enabled,
-                'note': '配置将在5分钟内自动生效，无需重启服务'
+                'note': '配置实时生效，无需重启服务'
             }
         }
 
@@ -452,6 +457,8 @@ async def update_setting(key: str, data: SystemSetting):
             'allow_short',
         ):
             _refresh_settings_cache()
+        else:
+            _notify_settings_changed()
 
         logger.info(f"[OK] 配置项 {key} 已更新为: {data.setting_value}")
         if expired_n:
@@ -939,12 +946,13 @@ async def update_trading_services(data: TradingServicesUpdate):
         cursor.close()
         conn.close()
 
-        # 立即同步 data_cache，避免策略侧最多60秒的延迟
+        # 同步 data_cache 镜像; 各进程配置快照按版本号 1 秒内重载
         try:
             from app.services.data_cache_service import sync_settings_cache
             sync_settings_cache()
         except Exception as e:
             logger.warning(f"[settings] data_cache 同步失败(不影响主库): {e}")
+        _notify_settings_changed()
 
         update_msg = ', '.join(updates)
         logger.info(f"[OK] 交易服务状态已更新: {update_msg}")
@@ -995,6 +1003,7 @@ async def update_max_hold_hours(data: MaxHoldHoursUpdate):
         """, (str(hours), str(hours)))
         cursor.close()
         conn.close()
+        _notify_settings_changed()
         logger.info(f"[OK] max_hold_hours 已更新为: {hours}小时")
         return {
             'success': True,
@@ -7,6 +7,7 @@ Hyperliquid 数据采集器
 import asyncio
 import aiohttp
 import sys
+import time
 from typing import List, Dict, Optional
 from datetime import datetime, timedelta
 from loguru import logger
@@ -17,6 +18,69 @@ if sys.platform == 'win32':
     asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
 
 
+# info 接口请求权重 (官方限额按 IP 每分钟 1200 权重计)
+INFO_WEIGHT = {
+    'clearinghouseState': 2,
+    'userFillsByTime': 20,
+}
+
+# userFillsByTime 单次最多返回 2000 笔 (按时间升序), 满页时以最后一笔的时间续拉
+FILLS_PAGE_SIZE = 2000
+FILLS_MAX_PAGES = 5
+
+
+class _AdaptiveWeightLimiter:
+    """
+    按请求权重限速的令牌桶 (协程安全)
+
+    收到 429 时速率减半并暂停 retry_after 秒, 之后每次成功线性恢复, 直到配置上限 (AIMD).
+    """
+
+    def __init__(self, weight_per_minute: float, min_fraction: float = 0.1, recover_steps: int = 50):
+        self.max_rate = weight_per_minute / 60.0
+        self.min_rate = self.max_rate * min_fraction
+        self.rate = self.max_rate
+        self.capacity = max(self.max_rate * 2, max(INFO_WEIGHT.values()))
+        self._recover = self.max_rate / recover_steps
+        self._tokens = self.capacity
+        self._last = time.monotonic()
+        self._paused_until = 0.0
+        self._lock: Optional[asyncio.Lock] = None
+        self._lock_loop = None
+        self.stats = {'throttled': 0, 'waited_s': 0.0}
+
+    async def acquire(self, weight: float) -> None:
+        # 限速状态跨轮次保留, 锁按事件循环重建 (asyncio.Lock 不能跨循环使用)
+        loop = asyncio.get_running_loop()
+        if self._lock_loop is not loop:
+            self._lock, self._lock_loop = asyncio.Lock(), loop
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    wait = self._paused_until - now
+                else:
+                    self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+                    self._last = now
+                    if self._tokens >= weight:
+                        self._tokens -= weight
+                        return
+                    wait = (weight - self._tokens) / self.rate
+                self.stats['waited_s'] += wait
+                await asyncio.sleep(wait)
+
+    def on_success(self) -> None:
+        if self.rate < self.max_rate:
+            self.rate = min(self.max_rate, self.rate + self._recover)
+
+    def on_throttled(self, retry_after: Optional[float] = None) -> None:
+        self.stats['throttled'] += 1
+        self.rate = max(self.min_rate, self.rate / 2)
+        self._tokens = 0.0
+        self._last = time.monotonic()
+        self._paused_until = max(self._paused_until, self._last + (retry_after or 1.0))
+
+
 class HyperliquidCollector:
     """Hyperliquid 数据采集器"""
 
@@ -44,6 +108,14 @@ class HyperliquidCollector:
         # 最小交易金额阈值(USD)
         self.min_trade_usd = self.hyperliquid_config.get('min_trade_usd', 50000)
 
+        # 批量监控: 并发数 + 按权重限速 (调度器传入的是 hyperliquid 段本身, 两种写法都认)
+        monitoring = self.hyperliquid_config.get('monitoring') or config.get('monitoring') or {}
+        self.monitor_concurrency = int(monitoring.get('concurrency', 8))
+        self.monitor_weight_per_minute = float(monitoring.get('weight_per_minute', 1200))
+        self.monitor_stats: Dict = {}
+        # 各轮监控共用一个限速器: 上轮 429 降下来的速率在下一轮继续生效并逐步恢复
+        self._monitor_limiter: Optional[_AdaptiveWeightLimiter] = None
+
         logger.info(f"Hyperliquid 采集器初始化完成 - 配置地址数: {len(self.monitored_addresses)}")
         logger.info(f"将从数据库动态加载更多监控地址")
         if self.proxy:
@@ -338,104 +410,126 @@ class HyperliquidCollector:
             # 2. 获取成交记录
             fills = await self.fetch_user_fills(address, limit=100)
 
-            # 3. 过滤时间范围
-            cutoff_time = datetime.now() - timedelta(hours=hours)
-            recent_trades = []
-
-            for fill in fills:
-                trade_data = self.analyze_fill(fill)
-                if trade_data and trade_data['timestamp'] >= cutoff_time:
-                    recent_trades.append(trade_data)
-
-            # 4. 统计分析
-            long_trades = [t for t in recent_trades if t['action'] == 'LONG']
-            short_trades = [t for t in recent_trades if t['action'] == 'SHORT']
-            large_trades = [t for t in recent_trades if t['is_large_trade']]
-
-            total_long_usd = sum(t['notional_usd'] for t in long_trades)
-            total_short_usd = sum(t['notional_usd'] for t in short_trades)
-            total_pnl = sum(t['closed_pnl'] for t in recent_trades)
-
-            # 5. 提取当前持仓
-            positions = []
-            if user_state and 'assetPositions' in user_state:
-                # 获取账户保证金信息（用于计算杠杆）
-                margin_summary = user_state.get('marginSummary', {})
-                account_value = float(margin_summary.get('accountValue', 0)) if margin_summary else 0
-                
-                for pos in user_state['assetPositions']:
-                    position = pos.get('position', {})
-                    coin = position.get('coin', '')
-                    szi = float(position.get('szi', 0))  # 持仓数量（带符号，正=多，负=空）
-                    entry_px = float(position.get('entryPx', 0))
-                    unrealized_pnl = float(position.get('unrealizedPnl', 0))
-                    
-                    # 计算名义价值
-                    notional_usd = abs(szi) * entry_px
-                    
-                    # 计算杠杆倍数：杠杆 = 名义价值 / 保证金
-                    # Hyperliquid API 可能不直接提供每个持仓的杠杆，需要从账户级别计算
-                    leverage = 1.0  # 默认值
-                    if notional_usd > 0:
-                        # 尝试从 position 中获取 margin 信息
-                        margin_used = float(position.get('marginUsed', 0))
-                        if margin_used > 0:
-                            leverage = notional_usd / margin_used
-                        else:
-                            # 如果没有 marginUsed，尝试从 accountValue 和总持仓价值估算
-                            # 这是一个近似值，可能不够准确
-                            total_notional = sum(abs(float(p.get('position', {}).get('szi', 0)) * float(p.get('position', {}).get('entryPx', 0))) 
-                                                for p in user_state.get('assetPositions', []))
-                            if total_notional > 0 and account_value > 0:
-                                # 估算：假设所有持仓使用相同的杠杆比例
-                                estimated_leverage = total_notional / account_value
-                                leverage = max(1.0, min(estimated_leverage, 50.0))  # 限制在1-50倍之间
-
-                    if szi != 0:  # 只记录非零持仓
-                        positions.append({
-                            'coin': coin,
-                            'size': abs(szi),
-                            'side': 'LONG' if szi > 0 else 'SHORT',
-                            'entry_price': entry_px,
-                            'unrealized_pnl': unrealized_pnl,
-                            'notional_usd': notional_usd,
-                            'leverage': round(leverage, 2)  # 保留2位小数
-                        })
-
-            # 6. 构建返回数据
-            result = {
-                'address': address,
-                'timestamp': datetime.now(),
-                'hours': hours,
-                'positions': positions,
-                'recent_trades': recent_trades,
-                'statistics': {
-                    'total_trades': len(recent_trades),
-                    'long_trades': len(long_trades),
-                    'short_trades': len(short_trades),
-                    'large_trades': len(large_trades),
-                    'total_long_usd': total_long_usd,
-                    'total_short_usd': total_short_usd,
-                    'net_flow_usd': total_long_usd - total_short_usd,
-                    'total_pnl': total_pnl,
-                    'active_positions': len(positions)
-                }
-            }
-
-            logger.info(f"地址 {address[:10]}... 最近{hours}小时: {len(recent_trades)} 笔交易, {len(positions)} 个持仓")
-
+            result = self._build_address_result(address, hours, user_state, fills)
+            logger.info(f"地址 {address[:10]}... 最近{hours}小时: {len(result['recent_trades'])} 笔交易, "
+                        f"{len(result['positions'])} 个持仓")
             return result
 
         except Exception as e:
             logger.error(f"监控地址失败: {e}")
-            return {
-                'address': address,
-                'timestamp': datetime.now(),
-                'error': str(e),
-                'positions': [],
-                'recent_trades': [],
-                'statistics': {}
+            return self._error_result(address, e)
+
+    @staticmethod
+    def _error_result(address: str, error) -> Dict:
+        return {
+            'address': address,
+            'timestamp': datetime.now(),
+            'error': str(error),
+            'positions': [],
+            'recent_trades': [],
+            'statistics': {}
+        }
+
+    def _build_address_result(
+        self,
+        address: str,
+        hours: int,
+        user_state: Optional[Dict],
+        fills: List[Dict],
+        since: Optional[datetime] = None,
+    ) -> Dict:
+        """
+        成交 + 账户状态 → 地址监控结果 (recent_trades 按时间倒序)
+
+        Args:
+            since: 只保留该时间之后的成交 (默认 now - hours)
+        """
+        # 3. 过滤时间范围
+        cutoff_time = since or (datetime.now() - timedelta(hours=hours))
+        recent_trades = []
+
+        for fill in fills:
+            trade_data = self.analyze_fill(fill)
+            if trade_data and trade_data['timestamp'] >= cutoff_time:
+                recent_trades.append(trade_data)
+        recent_trades.sort(key=lambda t: t['time_ms'], reverse=True)
+
+        # 4. 统计分析
+        long_trades = [t for t in recent_trades if t['action'] == 'LONG']
+        short_trades = [t for t in recent_trades if t['action'] == 'SHORT']
+        large_trades = [t for t in recent_trades if t['is_large_trade']]
+
+        total_long_usd = sum(t['notional_usd'] for t in long_trades)
+        total_short_usd = sum(t['notional_usd'] for t in short_trades)
+        total_pnl = sum(t['closed_pnl'] for t in recent_trades)
+
+        # 5. 提取当前持仓
+        positions = []
+        if user_state and 'assetPositions' in user_state:
+            # 获取账户保证金信息（用于计算杠杆）
+            margin_summary = user_state.get('marginSummary', {})
+            account_value = float(margin_summary.get('accountValue', 0)) if margin_summary else 0
+            
+            for pos in user_state['assetPositions']:
+                position = pos.get('position', {})
+                coin = position.get('coin', '')
+                szi = float(position.get('szi', 0))  # 持仓数量（带符号，正=多，负=空）
+                entry_px = float(position.get('entryPx', 0))
+                unrealized_pnl = float(position.get('unrealizedPnl', 0))
+                
+                # 计算名义价值
+                notional_usd = abs(szi) * entry_px
+                
+                # 计算杠杆倍数：杠杆 = 名义价值 / 保证金
+                # Hyperliquid API 可能不直接提供每个持仓的杠杆，需要从账户级别计算
+                leverage = 1.0  # 默认值
+                if notional_usd > 0:
+                    # 尝试从 position 中获取 margin 信息
+                    margin_used = float(position.get('marginUsed', 0))
+                    if margin_used > 0:
+                        leverage = notional_usd / margin_used
+                    else:
+                        # 如果没有 marginUsed，尝试从 accountValue 和总持仓价值估算
+                        # 这是一个近似值，可能不够准确
+                        total_notional = sum(abs(float(p.get('position', {}).get('szi', 0)) * float(p.get('position', {}).get('entryPx', 0))) 
+                                            for p in user_state.get('assetPositions', []))
+                        if total_notional > 0 and account_value > 0:
+                            # 估算：假设所有持仓使用相同的杠杆比例
+                            estimated_leverage = total_notional / account_value
+                            leverage = max(1.0, min(estimated_leverage, 50.0))  # 限制在1-50倍之间
+
+                if szi != 0:  # 只记录非零持仓
+                    positions.append({
+                        'coin': coin,
+                        'size': abs(szi),
+                        'side': 'LONG' if szi > 0 else 'SHORT',
+                        'entry_price': entry_px,
+                        'unrealized_pnl': unrealized_pnl,
+                        'notional_usd': notional_usd,
+                        'leverage': round(leverage, 2)  # 保留2位小数
+                    })
+
+        # 6. 构建返回数据
+        result = {
+            'address': address,
+            'timestamp': datetime.now(),
+            'hours': hours,
+            'positions': positions,
+            'recent_trades': recent_trades,
+            'statistics': {
+                'total_trades': len(recent_trades),
+                'long_trades': len(long_trades),
+                'short_trades': len(short_trades),
+                'large_trades': len(large_trades),
+                'total_long_usd': total_long_usd,
+                'total_short_usd': total_short_usd,
+                'net_flow_usd': total_long_usd - total_short_usd,
+                'total_pnl': total_pnl,
+                'active_positions': len(positions)
             }
+        }
+
+        return result
 
     async def monitor_all_addresses(
         self,
@@ -515,35 +609,183 @@ class HyperliquidCollector:
             logger.warning("没有找到需要监控的地址")
             return results
 
-        # 监控所有地址
-        logger.info(f"开始监控 {len(addresses_to_monitor)} 个地址, 回溯 {hours} 小时")
-
-        for i, address in enumerate(addresses_to_monitor, 1):
-            if not address:
-                continue
+        addresses_to_monitor = list(dict.fromkeys(a for a in addresses_to_monitor if a))
 
+        # 增量游标: 上次看到的最新成交时间 (ms), 只拉更新的成交
+        cursors: Dict[str, int] = {}
+        if hyperliquid_db is not None and hasattr(hyperliquid_db, 'get_fill_cursors'):
             try:
-                result = await self.monitor_address(address, hours)
-                results[address] = result
+                cursors = hyperliquid_db.get_fill_cursors(addresses_to_monitor)
+            except Exception as e:
+                logger.warning(f"读取成交游标失败, 本轮按回溯窗口全量拉取: {e}")
 
-                if i % 50 == 0:
-                    logger.info(f"  进度: {i}/{len(addresses_to_monitor)} 个地址已监控")
+        return await self.monitor_addresses_concurrent(addresses_to_monitor, hours, cursors)
 
-                # 延迟避免API限流
-                await asyncio.sleep(1)
+    async def monitor_addresses_concurrent(
+        self,
+        addresses: List[str],
+        hours: int = 24,
+        cursors: Optional[Dict[str, int]] = None,
+    ) -> Dict[str, Dict]:
+        """
+        并发监控一批地址: 信号量限并发, 按 info 接口权重自适应限速, 共享一个 HTTP 会话
 
-            except Exception as e:
-                logger.error(f"监控地址 {address[:10]}... 失败: {e}")
-                results[address] = {
-                    'address': address,
-                    'error': str(e),
-                    'positions': [],
-                    'recent_trades': []
-                }
-
-        logger.info(f"监控完成: {len(results)} 个地址")
+        Args:
+            cursors: {address: 上次最新成交时间 ms}; 有游标的地址只拉游标之后的成交
+
+        Returns:
+            {address: result}; result['fill_cursor_ms'] 为本次之后的游标
+        """
+        results: Dict[str, Dict] = {}
+        if not addresses:
+            return results
+        cursors = cursors or {}
+        limiter = self._monitor_limiter
+        if limiter is None or limiter.max_rate != self.monitor_weight_per_minute / 60.0:
+            limiter = self._monitor_limiter = _AdaptiveWeightLimiter(self.monitor_weight_per_minute)
+        throttled_before = limiter.stats['throttled']
+        sem = asyncio.Semaphore(max(1, self.monitor_concurrency))
+        started = time.monotonic()
+        done = 0
+
+        logger.info(f"开始监控 {len(addresses)} 个地址, 回溯 {hours} 小时 "
+                    f"(并发 {self.monitor_concurrency}, 限速 {self.monitor_weight_per_minute:.0f} 权重/分钟, "
+                    f"有游标 {sum(1 for a in addresses if a in cursors)} 个)")
+
+        timeout = aiohttp.ClientTimeout(total=20, connect=8)
+        connector = aiohttp.TCPConnector(limit=max(1, self.monitor_concurrency), ssl=False)
+        async with aiohttp.ClientSession(timeout=timeout, connector=connector) as session:
+
+            async def run_one(address: str) -> None:
+                nonlocal done
+                async with sem:
+                    try:
+                        results[address] = await self._monitor_address_incremental(
+                            session, limiter, address, hours, cursors.get(address))
+                    except Exception as e:
+                        logger.error(f"监控地址 {address[:10]}... 失败: {e}")
+                        results[address] = self._error_result(address, e)
+                done += 1
+                if done % 50 == 0:
+                    logger.info(f"  进度: {done}/{len(addresses)} 个地址已监控")
+
+            await asyncio.gather(*(run_one(a) for a in addresses))
+
+        elapsed = time.monotonic() - started
+        self.monitor_stats = {
+            'wallets': len(results),
+            'elapsed_s': round(elapsed, 1),
+            'wallets_per_min': round(len(results) / elapsed * 60, 1) if elapsed > 0 else None,
+            'throttled': limiter.stats['throttled'] - throttled_before,
+            'final_rate_per_min': round(limiter.rate * 60),
+        }
+        logger.info(f"监控完成: {len(results)} 个地址, 用时 {elapsed:.0f}s "
+                    f"({self.monitor_stats['wallets_per_min']} 个/分钟, 429 {self.monitor_stats['throttled']} 次)")
         return results
 
+    async def _post_info(
+        self,
+        session: aiohttp.ClientSession,
+        limiter: _AdaptiveWeightLimiter,
+        payload: Dict,
+        max_retries: int = 3,
+    ):
+        """info 接口请求 (先按权重取令牌; 429 反馈给限速器后重试), 失败返回 None"""
+        weight = INFO_WEIGHT.get(payload.get('type'), 20)
+        for attempt in range(max_retries):
+            await limiter.acquire(weight)
+            try:
+                async with session.post(self.api_url, json=payload, proxy=self.proxy) as response:
+                    if response.status == 200:
+                        limiter.on_success()
+                        return await response.json()
+                    if response.status == 429:
+                        retry_after = response.headers.get('Retry-After')
+                        limiter.on_throttled(float(retry_after) if retry_after else 2.0 * (attempt + 1))
+                        logger.debug(f"{payload.get('type')} HTTP 429, 限速降为 {limiter.rate * 60:.0f} 权重/分钟")
+                        continue
+                    logger.warning(f"{payload.get('type')} 失败: HTTP {response.status} "
+                                   f"(尝试 {attempt + 1}/{max_retries})")
+            except asyncio.TimeoutError:
+                logger.warning(f"{payload.get('type')} 超时 (尝试 {attempt + 1}/{max_retries})")
+            except aiohttp.ClientError as e:
+                logger.warning(f"{payload.get('type')} 异常: {e} (尝试 {attempt + 1}/{max_retries})")
+            if attempt < max_retries - 1:
+                await asyncio.sleep(2 ** attempt)
+        return None
+
+    async def _monitor_address_incremental(
+        self,
+        session: aiohttp.ClientSession,
+        limiter: _AdaptiveWeightLimiter,
+        address: str,
+        hours: int,
+        cursor_ms: Optional[int],
+    ) -> Dict:
+        """单地址: 账户状态 + 游标之后的全部成交 (userFillsByTime 分页), 结果同 monitor_address"""
+        window_start_ms = int((time.time() - hours * 3600) * 1000)
+        start_ms = max(window_start_ms, cursor_ms + 1) if cursor_ms else window_start_ms
+
+        user_state, fills = await asyncio.gather(
+            self._post_info(session, limiter, {"type": "clearinghouseState", "user": address}),
+            self._fetch_fills_since(session, limiter, address, start_ms),
+        )
+        if fills is None:
+            # 成交没拉到时游标不前移, 下轮重拉
+            result = self._build_address_result(address, hours, user_state, [])
+            result['fill_cursor_ms'] = cursor_ms
+            result['error'] = 'fills_unavailable'
+            return result
+
+        result = self._build_address_result(
+            address, hours, user_state, fills,
+            since=datetime.fromtimestamp(start_ms / 1000),
+        )
+        # 游标只前移到实际拿到的最新一笔: 分页中断或达到页数上限时, 剩下的下轮接着拉
+        newest = max((int(f.get('time', 0)) for f in fills), default=0)
+        result['fill_cursor_ms'] = max(newest, cursor_ms or 0) or None
+        return result
+
+    async def _fetch_fills_since(
+        self,
+        session: aiohttp.ClientSession,
+        limiter: _AdaptiveWeightLimiter,
+        address: str,
+        start_ms: int,
+    ) -> Optional[List[Dict]]:
+        """
+        start_ms 之后的成交, 满页时按最后一笔的时间续拉 (最多 FILLS_MAX_PAGES 页)
+
+        Returns:
+            按时间升序的成交 (已去重); 首页失败返回 None, 后续页失败返回已拿到的部分
+        """
+        fills: List[Dict] = []
+        seen = set()
+        for _ in range(FILLS_MAX_PAGES):
+            page = await self._post_info(session, limiter, {"type": "userFillsByTime", "user": address,
+                                                            "startTime": start_ms})
+            if page is None:
+                return fills if fills else None
+            page = sorted(page, key=lambda f: int(f.get('time', 0)))
+            for f in page:
+                key = f.get('tid') or (f.get('time'), f.get('oid'), f.get('coin'), f.get('px'), f.get('sz'))
+                if key not in seen:
+                    seen.add(key)
+                    fills.append(f)
+            if len(page) < FILLS_PAGE_SIZE:
+                break
+            # 同一毫秒的成交可能被截在页尾, 下一页从最后一笔的时间 (含) 起拉, 靠去重剔除重复
+            last_ms = int(page[-1].get('time', 0))
+            if last_ms <= start_ms:
+                break
+            start_ms = last_ms
+        else:
+            # 达到页数上限: 去掉最后一毫秒的成交 (可能没拉全), 游标停在它之前, 下轮从这里续拉
+            kept = [f for f in fills if int(f.get('time', 0)) < start_ms]
+            if kept:
+                fills = kept
+        return fills
+
     def generate_signal(self, address_data: Dict, coin: str) -> Optional[Dict]:
         """
         基于地址活动生成交易信号
@@ -17,6 +17,7 @@
 
 import asyncio
 import aiohttp
+from collections import namedtuple
 from typing import List, Dict, Optional
 from datetime import datetime, timedelta
 from loguru import logger
@@ -24,6 +25,66 @@ import pymysql
 from decimal import Decimal
 from app.database.connection_pool import get_global_pool
 from app.utils.binance_rate_guard import rate_guard, parse_ban_msg
+from app.services.kline_store import feed_klines
+
+
+_KLINE_COLUMNS = (
+    'symbol', 'exchange', 'timeframe', 'open_time', 'close_time', 'timestamp',
+    'open_price', 'high_price', 'low_price', 'close_price',
+    'volume', 'quote_volume', 'number_of_trades',
+    'taker_buy_base_volume', 'taker_buy_quote_volume',
+)
+
+# kline_data 写入 (参数顺序同 KlineRow), kline_storage 汇总写回共用
+KLINE_UPSERT_SQL = """
+    INSERT INTO kline_data (
+        symbol, exchange, timeframe, open_time, close_time, timestamp,
+        open_price, high_price, low_price, close_price,
+        volume, quote_volume, number_of_trades,
+        taker_buy_base_volume, taker_buy_quote_volume,
+        created_at
+    ) VALUES (
+        %s, %s, %s, %s, %s, %s,
+        %s, %s, %s, %s,
+        %s, %s, %s,
+        %s, %s,
+        NOW()
+    )
+    ON DUPLICATE KEY UPDATE
+        open_price = VALUES(open_price),
+        high_price = VALUES(high_price),
+        low_price = VALUES(low_price),
+        close_price = VALUES(close_price),
+        volume = VALUES(volume),
+        quote_volume = VALUES(quote_volume),
+        number_of_trades = VALUES(number_of_trades),
+        taker_buy_base_volume = VALUES(taker_buy_base_volume),
+        taker_buy_quote_volume = VALUES(taker_buy_quote_volume)
+"""
+
+
+# 交易所核对 (reconcile_klines) 比较的字段及相对误差 (另加 1e-8 绝对误差: 库里 DECIMAL(…, 8), 本地合成的量是浮点累加)
+RECONCILE_FIELDS = ('open_price', 'high_price', 'low_price', 'close_price', 'volume', 'quote_volume',
+                    'number_of_trades')
+RECONCILE_TOLERANCE = 1e-6
+
+
+class KlineRow(namedtuple('KlineRow', _KLINE_COLUMNS)):
+    """
+    kline_data 一行, 字段顺序即 save_klines 的 SQL 参数顺序, 可直接 executemany.
+    同时支持 k['symbol'] / k.get('quote_volume') 读取, 下游 feed_many / on_klines 照旧按 dict 用.
+    """
+    __slots__ = ()
+    _INDEX = {name: i for i, name in enumerate(_KLINE_COLUMNS)}
+
+    def __getitem__(self, key):
+        if key.__class__ is str:
+            return tuple.__getitem__(self, self._INDEX[key])
+        return tuple.__getitem__(self, key)
+
+    def get(self, key, default=None):
+        i = self._INDEX.get(key)
+        return default if i is None else tuple.__getitem__(self, i)
 
 
 class SmartFuturesCollector:
@@ -265,7 +326,7 @@ class SmartFuturesCollector:
         保存K线数据到数据库（批量插入）
 
         Args:
-            klines: K线数据列表
+            klines: K线数据列表 (dict 或 KlineRow)
 
         Returns:
             成功插入的记录数
@@ -273,34 +334,14 @@ class SmartFuturesCollector:
         if not klines:
             return 0
 
-        sql = """
-            INSERT INTO kline_data (
-                symbol, exchange, timeframe, open_time, close_time, timestamp,
-                open_price, high_price, low_price, close_price,
-                volume, quote_volume, number_of_trades,
-                taker_buy_base_volume, taker_buy_quote_volume,
-                created_at
-            ) VALUES (
-                %s, %s, %s, %s, %s, %s,
-                %s, %s, %s, %s,
-                %s, %s, %s,
-                %s, %s,
-                NOW()
-            )
-            ON DUPLICATE KEY UPDATE
-                open_price = VALUES(open_price),
-                high_price = VALUES(high_price),
-                low_price = VALUES(low_price),
-                close_price = VALUES(close_price),
-                volume = VALUES(volume),
-                quote_volume = VALUES(quote_volume),
-                number_of_trades = VALUES(number_of_trades),
-                taker_buy_base_volume = VALUES(taker_buy_base_volume),
-                taker_buy_quote_volume = VALUES(taker_buy_quote_volume)
-        """
+        sql = KLINE_UPSERT_SQL
 
         all_values = []
         for k in klines:
+            if isinstance(k, KlineRow):
+                # WS 路径已按参数顺序构造好, 不再逐字段转换
+                all_values.append(k)
+                continue
             exchange = 'binance_futures'
             all_values.append((
                 k['symbol'], exchange, k['timeframe'], k['open_time'], k['close_time'], k['timestamp'],
@@ -328,6 +369,9 @@ class SmartFuturesCollector:
                 # 单批失败不影响其它批
                 continue
 
+        # 同步喂入本进程 K 线缓存 (未初始化时无操作)
+        feed_klines(klines)
+
         return total_inserted
 
     # 币安在交易 symbol 列表的内存缓存
@@ -536,6 +580,58 @@ class SmartFuturesCollector:
 
         logger.info("=" * 60)
 
+    async def reconcile_klines(self, symbols: List[str], bars: Dict[str, int]) -> Dict[str, Dict[str, int]]:
+        """
+        本地由 5m 合成的高周期 K 线与交易所核对 (低频): 拉最近 N 根已收盘 K 线,
+        库里缺失或 OHLCV / 笔数不一致的以交易所为准写回
+
+        Args:
+            symbols: 交易对列表 (币安格式)
+            bars: {周期: 核对最近 N 根}
+
+        Returns:
+            {周期: {'checked': 拉到的根数, 'missing': 库里缺失, 'mismatched': 字段不一致}}
+        """
+        stats: Dict[str, Dict[str, int]] = {}
+        for interval, n in bars.items():
+            if rate_guard.is_banned():
+                logger.warning("IP 封禁中, 中止剩余周期核对")
+                break
+            # 最后一根未收盘的由 fetch_kline 丢掉, 多拉 1 根
+            klines = await self.collect_batch(symbols, interval, n + 1)
+            if not klines:
+                continue
+            stored = self._load_recent_klines(interval, min(k['open_time'] for k in klines))
+            fix, missing = [], 0
+            for k in klines:
+                have = stored.get((k['symbol'], k['open_time']))
+                if have is None:
+                    missing += 1
+                    fix.append(k)
+                elif any(abs(float(k[f]) - float(have[f])) > RECONCILE_TOLERANCE * abs(float(k[f])) + 1e-8
+                         for f in RECONCILE_FIELDS):
+                    fix.append(k)
+            if fix:
+                self.save_klines(fix)
+            stats[interval] = {'checked': len(klines), 'missing': missing, 'mismatched': len(fix) - missing}
+            log = logger.warning if fix else logger.info
+            log(f"[K线核对] {interval}: 核对 {len(klines)} 根, 缺失 {missing}, 不一致 {len(fix) - missing}, 已按交易所写回")
+        return stats
+
+    def _load_recent_klines(self, interval: str, since_ms: int) -> Dict[tuple, Dict]:
+        """{(symbol, open_time): row}, 核对用"""
+        with self.db_pool.get_connection() as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.execute(
+                    f"SELECT symbol, open_time, {', '.join(RECONCILE_FIELDS)} FROM kline_data "
+                    "WHERE timeframe = %s AND exchange = 'binance_futures' AND open_time >= %s",
+                    (interval, since_ms),
+                )
+                return {(r['symbol'], int(r['open_time'])): r for r in cursor.fetchall()}
+            finally:
+                cursor.close()
+
     def _get_elapsed_time(self, interval: str) -> str:
         """
         获取距离上次采集的时间（用于日志显示）
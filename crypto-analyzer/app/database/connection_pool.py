@@ -7,10 +7,13 @@ MySQL 连接池管理器
 from app.utils.config_loader import DB_SESSION_INIT_COMMAND, get_db_config
 import pymysql
 from pymysql.cursors import DictCursor
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Callable
 from loguru import logger
+import asyncio
+import functools
 import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import contextmanager
 
 
@@ -20,6 +23,26 @@ POOL_CONN_MAX_IDLE_SEC = 1800  # 30min
 MAX_DISCARD_PER_CHECKOUT = 5
 
 
+def _execute_on(conn, query: str, params: tuple = None, fetch_one: bool = False,
+                fetch_all: bool = True, commit: bool = False):
+    """在给定连接上执行一条语句（execute_query 的同步 / async 两个入口共用）"""
+    cursor = conn.cursor()
+    try:
+        cursor.execute(query, params or ())
+
+        if commit:
+            conn.commit()
+            return cursor.lastrowid
+        elif fetch_one:
+            return cursor.fetchone()
+        elif fetch_all:
+            return cursor.fetchall()
+        else:
+            return None
+    finally:
+        cursor.close()
+
+
 class MySQLConnectionPool:
     """MySQL 连接池管理器 - 支持自动重连和连接健康检查"""
 
@@ -203,21 +226,7 @@ class MySQLConnectionPool:
             查询结果
         """
         with self.get_connection() as conn:
-            cursor = conn.cursor()
-            try:
-                cursor.execute(query, params or ())
-
-                if commit:
-                    conn.commit()
-                    return cursor.lastrowid
-                elif fetch_one:
-                    return cursor.fetchone()
-                elif fetch_all:
-                    return cursor.fetchall()
-                else:
-                    return None
-            finally:
-                cursor.close()
+            return _execute_on(conn, query, params, fetch_one, fetch_all, commit)
 
     def close_all(self):
         """关闭池中所有连接"""
@@ -229,6 +238,49 @@ class MySQLConnectionPool:
         logger.info("✅ 连接池已关闭")
 
 
+class AsyncMySQLPool:
+    """
+    MySQLConnectionPool 的 async 入口（FastAPI async 端点用）
+
+    async def 端点里直接调 pymysql 会阻塞 event loop，一条慢查询拖住所有请求。
+    这里把查询放到专用线程池执行：线程数 = 池大小，与 get_api_connection 共用同一组信号量，
+    池满时请求在线程池队列里排队，而不是占着 event loop 等。
+    """
+
+    def __init__(self, pool: MySQLConnectionPool, acquire_timeout: float = 5.0):
+        self.pool = pool
+        self.acquire_timeout = acquire_timeout
+        self._executor = ThreadPoolExecutor(
+            max_workers=pool.pool_size, thread_name_prefix="api-db",
+        )
+
+    def _run_sync(self, fn: Callable, *args, **kwargs):
+        if not self.pool._slot_sem.acquire(timeout=self.acquire_timeout):
+            raise TimeoutError(
+                f"MySQL 连接池已满 ({self.pool.pool_size})，{self.acquire_timeout:.0f}s 内无可用连接"
+            )
+        try:
+            with self.pool.get_connection() as conn:
+                return fn(conn, *args, **kwargs)
+        finally:
+            self.pool._slot_sem.release()
+
+    async def run(self, fn: Callable, *args, **kwargs):
+        """在线程池里用一条池连接执行 fn(conn, *args, **kwargs)，适合一次读多张表的端点"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._executor, functools.partial(self._run_sync, fn, *args, **kwargs),
+        )
+
+    async def execute_query(self, query: str, params: tuple = None, fetch_one: bool = False,
+                            fetch_all: bool = True, commit: bool = False):
+        """同 MySQLConnectionPool.execute_query（DictCursor），在线程池里执行"""
+        return await self.run(_execute_on, query, params, fetch_one, fetch_all, commit)
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False)
+
+
 class RobustConnection:
     """
     增强的数据库连接包装器
@@ -334,6 +386,7 @@ class RobustConnection:
 # 全局连接池实例（懒加载）
 _global_pool: Optional[MySQLConnectionPool] = None
 _api_pool: Optional[MySQLConnectionPool] = None
+_async_api_pool: Optional[AsyncMySQLPool] = None
 _pool_lock = threading.Lock()
 
 
@@ -417,6 +470,17 @@ def get_api_connection(acquire_timeout: float = 5.0):
     return conn
 
 
+def get_async_api_pool() -> AsyncMySQLPool:
+    """FastAPI async 端点用的 API 连接池入口（与 get_api_connection 共用连接与信号量）"""
+    global _async_api_pool
+    if _async_api_pool is None:
+        pool = _get_api_pool()
+        with _pool_lock:
+            if _async_api_pool is None:
+                _async_api_pool = AsyncMySQLPool(pool)
+    return _async_api_pool
+
+
 # 便捷函数
 @contextmanager
 def get_db_connection(db_config: Dict[str, Any] = None):
@@ -21,6 +21,8 @@ import yaml
 class HyperliquidDB:
     """Hyperliquid 数据库管理类"""
 
+    _MONITOR_COLUMNS_READY = False
+
     def __init__(self, config_path='config.yaml'):
         """
         初始化数据库连接
@@ -514,6 +516,153 @@ class HyperliquidDB:
 
         self.conn.commit()
 
+    def ensure_monitor_columns(self):
+        """监控增量游标列 (幂等): last_fill_ms = 已入库的最新成交时间 (ms)"""
+        if HyperliquidDB._MONITOR_COLUMNS_READY:
+            return
+        try:
+            self.cursor.execute(
+                "ALTER TABLE hyperliquid_monitored_wallets ADD COLUMN last_fill_ms BIGINT NULL"
+            )
+            self.conn.commit()
+        except Exception as e:
+            if '1060' not in str(e):  # Duplicate column name
+                raise
+        HyperliquidDB._MONITOR_COLUMNS_READY = True
+
+    def get_fill_cursors(self, addresses: List[str]) -> Dict[str, int]:
+        """
+        批量读取监控钱包的成交游标
+
+        Returns:
+            {address: last_fill_ms}, 没有游标的地址不出现
+        """
+        self.ensure_monitor_columns()
+        cursors = {}
+        for i in range(0, len(addresses), 500):
+            chunk = addresses[i:i + 500]
+            self.cursor.execute(
+                f"""SELECT t.address, mw.last_fill_ms
+                    FROM hyperliquid_monitored_wallets mw
+                    JOIN hyperliquid_traders t ON mw.trader_id = t.id
+                    WHERE t.address IN ({','.join(['%s'] * len(chunk))})
+                      AND mw.last_fill_ms IS NOT NULL""",
+                chunk
+            )
+            for row in self.cursor.fetchall():
+                cursors[row['address']] = int(row['last_fill_ms'])
+        return cursors
+
+    def get_or_create_traders(self, addresses: List[str]) -> Dict[str, int]:
+        """批量获取或创建交易者记录, 返回 {address: trader_id}"""
+        ids: Dict[str, int] = {}
+        addresses = list(dict.fromkeys(addresses))
+
+        def load(chunk):
+            self.cursor.execute(
+                f"SELECT id, address FROM hyperliquid_traders WHERE address IN ({','.join(['%s'] * len(chunk))})",
+                chunk
+            )
+            for row in self.cursor.fetchall():
+                ids[row['address']] = row['id']
+
+        for i in range(0, len(addresses), 500):
+            load(addresses[i:i + 500])
+        missing = [a for a in addresses if a not in ids]
+        if missing:
+            now = datetime.now()
+            self.cursor.executemany(
+                """INSERT IGNORE INTO hyperliquid_traders
+                   (address, display_name, first_seen, last_updated)
+                   VALUES (%s, NULL, %s, %s)""",
+                [(a, now, now) for a in missing]
+            )
+            for i in range(0, len(missing), 500):
+                load(missing[i:i + 500])
+        return ids
+
+    def save_monitor_results(self, results: Dict[str, Dict], snapshot_time: datetime = None) -> Tuple[int, int]:
+        """
+        批量保存一轮钱包监控结果 (交易去重插入 / 持仓快照 upsert / 检查时间与成交游标), 一次提交
+
+        Args:
+            results: monitor_all_addresses 的返回 {address: result}
+            snapshot_time: 持仓快照时间 (默认当前时间)
+
+        Returns:
+            (新增交易笔数, 持仓快照条数)
+        """
+        import json
+
+        self.ensure_monitor_columns()
+        now = datetime.now()
+        snapshot_time = snapshot_time or now
+        trader_ids = self.get_or_create_traders(list(results.keys()))
+
+        trade_rows, position_rows, check_rows = [], [], []
+        for address, result in results.items():
+            trader_id = trader_ids.get(address)
+            if trader_id is None:
+                continue
+            recent_trades = result.get('recent_trades', [])
+            for trade in recent_trades:
+                trade_rows.append((
+                    trader_id, address, trade['coin'], trade['action'], 'TRADE',
+                    trade['price'], trade['size'], trade['notional_usd'], trade['closed_pnl'],
+                    trade['timestamp'], now, json.dumps(trade.get('raw_data', {})),
+                ))
+            for pos in result.get('positions', []):
+                position_rows.append((
+                    trader_id, address, snapshot_time, pos['coin'], pos['side'], pos['size'],
+                    pos['entry_price'], pos.get('mark_price', pos['entry_price']), pos['notional_usd'],
+                    pos['unrealized_pnl'], pos.get('leverage', 1), json.dumps({}),
+                ))
+            last_trade_time = recent_trades[0]['timestamp'] if recent_trades else None
+            check_rows.append((now, last_trade_time, result.get('fill_cursor_ms'), now, trader_id))
+
+        try:
+            new_trades = 0
+            if trade_rows:
+                # 唯一键 uk_trade_dedup(address, coin, side, trade_time, notional_usd) 去重
+                self.cursor.executemany(
+                    """INSERT INTO hyperliquid_wallet_trades
+                       (trader_id, address, coin, side, action, price, size,
+                        notional_usd, closed_pnl, trade_time, detected_at, raw_data)
+                       VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+                       ON DUPLICATE KEY UPDATE id = id""",
+                    trade_rows
+                )
+                new_trades = max(self.cursor.rowcount, 0)
+            if position_rows:
+                self.cursor.executemany(
+                    """INSERT INTO hyperliquid_wallet_positions
+                       (trader_id, address, snapshot_time, coin, side, size,
+                        entry_price, mark_price, notional_usd, unrealized_pnl,
+                        leverage, raw_data)
+                       VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+                       ON DUPLICATE KEY UPDATE
+                         side = VALUES(side), size = VALUES(size), entry_price = VALUES(entry_price),
+                         mark_price = VALUES(mark_price), notional_usd = VALUES(notional_usd),
+                         unrealized_pnl = VALUES(unrealized_pnl), leverage = VALUES(leverage),
+                         raw_data = VALUES(raw_data)""",
+                    position_rows
+                )
+            if check_rows:
+                self.cursor.executemany(
+                    """UPDATE hyperliquid_monitored_wallets
+                       SET last_check_at = %s,
+                           last_trade_at = COALESCE(%s, last_trade_at),
+                           last_fill_ms = COALESCE(%s, last_fill_ms),
+                           check_count = check_count + 1, updated_at = %s
+                       WHERE trader_id = %s""",
+                    check_rows
+                )
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+        return new_trades, len(position_rows)
+
     def save_wallet_trade(self, address: str, trade_data: Dict):
         """
         保存钱包交易记录（自动去重）
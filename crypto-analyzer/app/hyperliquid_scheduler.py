@@ -99,68 +99,27 @@ class HyperliquidScheduler:
                 monitored_wallets = list(results.keys())
                 logger.info(f"  本次监控: {len(monitored_wallets)} 个地址")
 
-                total_trades = 0
-                total_positions = 0
-                wallet_updates = []
+                # 批量入库: 交易去重插入 / 持仓 upsert / 检查时间与成交游标, 一次提交 (放线程池, 不阻塞事件循环)
+                try:
+                    total_trades, total_positions = await asyncio.to_thread(db.save_monitor_results, results)
+                except Exception as e:
+                    logger.error(f"  保存监控结果失败: {e}")
+                    total_trades = total_positions = 0
 
+                wallet_updates = []
                 for address, result in results.items():
-                    try:
-                        # 保存交易记录
-                        recent_trades = result.get('recent_trades', [])
-                        for trade in recent_trades:
-                            trade_data = {
-                                'coin': trade['coin'],
-                                'side': trade['action'],  # LONG/SHORT
-                                'action': 'TRADE',
-                                'price': trade['price'],
-                                'size': trade['size'],
-                                'notional_usd': trade['notional_usd'],
-                                'closed_pnl': trade['closed_pnl'],
-                                'trade_time': trade['timestamp'],
-                                'raw_data': trade.get('raw_data', {})
-                            }
-                            db.save_wallet_trade(address, trade_data)
-                            total_trades += 1
-
-                        # 保存持仓快照
-                        positions = result.get('positions', [])
-                        snapshot_time = datetime.now()
-                        for pos in positions:
-                            position_data = {
-                                'coin': pos['coin'],
-                                'side': pos['side'],
-                                'size': pos['size'],
-                                'entry_price': pos['entry_price'],
-                                'mark_price': pos.get('mark_price', pos['entry_price']),
-                                'notional_usd': pos['notional_usd'],
-                                'unrealized_pnl': pos['unrealized_pnl'],
-                                'leverage': pos.get('leverage', 1),
-                                'raw_data': {}
-                            }
-                            db.save_wallet_position(address, position_data, snapshot_time)
-                            total_positions += 1
-
-                        # 更新检查时间（需要先获取trader_id）
-                        trader_id = db.get_or_create_trader(address)
-                        last_trade_time = recent_trades[0]['timestamp'] if recent_trades else None
-                        db.update_wallet_check_time(trader_id, last_trade_time)
-
-                        # 记录有活动的钱包
-                        if recent_trades or positions:
-                            stats = result.get('statistics', {})
-                            wallet_updates.append({
-                                'address': address[:10] + '...',
-                                'trades': len(recent_trades),
-                                'positions': len(positions),
-                                'net_flow': stats.get('net_flow_usd', 0),
-                                'total_pnl': stats.get('total_pnl', 0)
-                            })
-
-                        # 延迟避免API限流
-                        await asyncio.sleep(2)
-
-                    except Exception as e:
-                        logger.error(f"  监控钱包 {address[:10]}... 失败: {e}")
+                    recent_trades = result.get('recent_trades', [])
+                    positions = result.get('positions', [])
+                    # 记录有活动的钱包
+                    if recent_trades or positions:
+                        stats = result.get('statistics', {})
+                        wallet_updates.append({
+                            'address': address[:10] + '...',
+                            'trades': len(recent_trades),
+                            'positions': len(positions),
+                            'net_flow': stats.get('net_flow_usd', 0),
+                            'total_pnl': stats.get('total_pnl', 0)
+                        })
 
                 # 汇总报告
                 logger.info(f"  ✓ 监控完成: 检查 {len(monitored_wallets)} 个钱包, "
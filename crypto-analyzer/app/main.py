@@ -607,6 +607,18 @@ async def lifespan(app: FastAPI):
             spawn(_dashboard_snapshot_loop())
             logger.info("Dashboard快照预计算任务已启动（每5分钟更新）")
 
+            # 合约信号快照预计算（/api/futures-signals 只读缓存）
+            async def _futures_signals_refresh_loop():
+                await asyncio.sleep(30)  # 等待服务启动稳定
+                while True:
+                    try:
+                        await _refresh_futures_signals()
+                    except Exception as e:
+                        logger.error(f"[futures_signals] refresh error: {e}")
+                    await asyncio.sleep(TECHNICAL_SIGNALS_CACHE_TTL)
+
+            spawn(_futures_signals_refresh_loop())
+
             # ── 现货交易策略 ─────────────────────────────────────────────────────
             try:
                 from app.services.spot_trader_service import spot_trader_loop
@@ -2018,17 +2030,7 @@ async def _generate_trading_signal(symbol: str, timeframe: str = '1h'):
 async def get_signal_scores(limit: int = 100, direction: str = None):
     """读取 coin_kline_scores 表，返回信号评分列表（供 dashboard 和 technical_signals 页面使用）"""
     try:
-        import pymysql, os
-        conn = pymysql.connect(
-            host=os.getenv("DB_HOST", "localhost"),
-            port=int(os.getenv("DB_PORT", 3306)),
-            user=os.getenv("DB_USER", "root"),
-            password=os.getenv("DB_PASSWORD", ""),
-            database=os.getenv("DB_NAME", "binance-data"),
-            cursorclass=pymysql.cursors.DictCursor,
-            charset="utf8mb4",
-        )
-        cursor = conn.cursor()
+        from app.database.connection_pool import get_async_api_pool
         where_clauses = ["exchange = 'binance_futures'"]
         params = []
         if direction:
@@ -2046,10 +2048,7 @@ async def get_signal_scores(limit: int = 100, direction: str = None):
             " ORDER BY ABS(total_score) DESC LIMIT %s"
         )
         params.append(limit)
-        cursor.execute(sql, params)
-        rows = cursor.fetchall()
-        cursor.close()
-        conn.close()
+        rows = await get_async_api_pool().execute_query(sql, tuple(params))
         result = []
         for r in rows:
             result.append({
@@ -2568,109 +2567,99 @@ async def get_technical_indicators(symbol: str = None, timeframe: str = '1h'):
         timeframe: 时间周期
     """
     try:
-        import pymysql
-        
-        db_config = config.get('database', {}).get('mysql', {})
-        connection = pymysql.connect(**db_config)
-        cursor = connection.cursor(pymysql.cursors.DictCursor)
-        
-        try:
-            if symbol:
-                # 格式化交易对符号
-                symbol = symbol.replace('-', '/').upper()
-                if '/' not in symbol:
-                    symbol = f"{symbol}/USDT"
-                
-                sql = """
-                    SELECT * FROM technical_indicators_cache 
-                    WHERE symbol = %s AND timeframe = %s
-                    ORDER BY updated_at DESC LIMIT 1
-                """
-                cursor.execute(sql, (symbol, timeframe))
-                result = cursor.fetchone()
-                
-                if not result:
-                    raise HTTPException(status_code=404, detail=f"未找到 {symbol} 的技术指标数据")
-                
-                return {
+        from app.database.connection_pool import get_async_api_pool
+        db = get_async_api_pool()
+
+        if symbol:
+            # 格式化交易对符号
+            symbol = symbol.replace('-', '/').upper()
+            if '/' not in symbol:
+                symbol = f"{symbol}/USDT"
+            
+            sql = """
+                SELECT * FROM technical_indicators_cache 
+                WHERE symbol = %s AND timeframe = %s
+                ORDER BY updated_at DESC LIMIT 1
+            """
+            result = await db.execute_query(sql, (symbol, timeframe), fetch_one=True)
+            
+            if not result:
+                raise HTTPException(status_code=404, detail=f"未找到 {symbol} 的技术指标数据")
+            
+            return {
+                "symbol": result['symbol'],
+                "timeframe": result['timeframe'],
+                "rsi": {
+                    "value": float(result['rsi_value']) if result.get('rsi_value') else None,
+                    "signal": result.get('rsi_signal')
+                },
+                "macd": {
+                    "value": float(result['macd_value']) if result.get('macd_value') else None,
+                    "signal_line": float(result['macd_signal_line']) if result.get('macd_signal_line') else None,
+                    "histogram": float(result['macd_histogram']) if result.get('macd_histogram') else None,
+                    "trend": result.get('macd_trend')
+                },
+                "bollinger_bands": {
+                    "upper": float(result['bb_upper']) if result.get('bb_upper') else None,
+                    "middle": float(result['bb_middle']) if result.get('bb_middle') else None,
+                    "lower": float(result['bb_lower']) if result.get('bb_lower') else None,
+                    "position": result.get('bb_position'),
+                    "width": float(result['bb_width']) if result.get('bb_width') else None
+                },
+                "ema": {
+                    "short": float(result['ema_short']) if result.get('ema_short') else None,
+                    "long": float(result['ema_long']) if result.get('ema_long') else None,
+                    "trend": result.get('ema_trend')
+                },
+                "kdj": {
+                    "k": float(result['kdj_k']) if result.get('kdj_k') else None,
+                    "d": float(result['kdj_d']) if result.get('kdj_d') else None,
+                    "j": float(result['kdj_j']) if result.get('kdj_j') else None,
+                    "signal": result.get('kdj_signal')
+                },
+                "volume": {
+                    "volume_24h": float(result['volume_24h']) if result.get('volume_24h') else None,
+                    "volume_avg": float(result['volume_avg']) if result.get('volume_avg') else None,
+                    "volume_ratio": float(result['volume_ratio']) if result.get('volume_ratio') else None,
+                    "signal": result.get('volume_signal')
+                },
+                "technical_score": float(result['technical_score']) if result.get('technical_score') else None,
+                "technical_signal": result.get('technical_signal'),
+                "updated_at": result['updated_at'].isoformat() if result.get('updated_at') else None
+            }
+        else:
+            # 返回所有交易对的技术指标
+            sql = """
+                SELECT t1.* FROM technical_indicators_cache t1
+                INNER JOIN (
+                    SELECT symbol, MAX(updated_at) as max_updated_at
+                    FROM technical_indicators_cache
+                    WHERE timeframe = %s
+                    GROUP BY symbol
+                ) t2 ON t1.symbol = t2.symbol AND t1.updated_at = t2.max_updated_at
+                WHERE t1.timeframe = %s
+                ORDER BY t1.technical_score DESC
+            """
+            results = await db.execute_query(sql, (timeframe, timeframe))
+            
+            indicators_list = []
+            for result in results:
+                indicators_list.append({
                     "symbol": result['symbol'],
-                    "timeframe": result['timeframe'],
-                    "rsi": {
-                        "value": float(result['rsi_value']) if result.get('rsi_value') else None,
-                        "signal": result.get('rsi_signal')
-                    },
-                    "macd": {
-                        "value": float(result['macd_value']) if result.get('macd_value') else None,
-                        "signal_line": float(result['macd_signal_line']) if result.get('macd_signal_line') else None,
-                        "histogram": float(result['macd_histogram']) if result.get('macd_histogram') else None,
-                        "trend": result.get('macd_trend')
-                    },
-                    "bollinger_bands": {
-                        "upper": float(result['bb_upper']) if result.get('bb_upper') else None,
-                        "middle": float(result['bb_middle']) if result.get('bb_middle') else None,
-                        "lower": float(result['bb_lower']) if result.get('bb_lower') else None,
-                        "position": result.get('bb_position'),
-                        "width": float(result['bb_width']) if result.get('bb_width') else None
-                    },
-                    "ema": {
-                        "short": float(result['ema_short']) if result.get('ema_short') else None,
-                        "long": float(result['ema_long']) if result.get('ema_long') else None,
-                        "trend": result.get('ema_trend')
-                    },
-                    "kdj": {
-                        "k": float(result['kdj_k']) if result.get('kdj_k') else None,
-                        "d": float(result['kdj_d']) if result.get('kdj_d') else None,
-                        "j": float(result['kdj_j']) if result.get('kdj_j') else None,
-                        "signal": result.get('kdj_signal')
-                    },
-                    "volume": {
-                        "volume_24h": float(result['volume_24h']) if result.get('volume_24h') else None,
-                        "volume_avg": float(result['volume_avg']) if result.get('volume_avg') else None,
-                        "volume_ratio": float(result['volume_ratio']) if result.get('volume_ratio') else None,
-                        "signal": result.get('volume_signal')
-                    },
+                    "timeframe": result.get('timeframe', timeframe),  # 确保包含timeframe字段
                     "technical_score": float(result['technical_score']) if result.get('technical_score') else None,
                     "technical_signal": result.get('technical_signal'),
+                    "rsi_value": float(result['rsi_value']) if result.get('rsi_value') else None,
+                    "macd_trend": result.get('macd_trend'),
+                    "ema_trend": result.get('ema_trend'),
                     "updated_at": result['updated_at'].isoformat() if result.get('updated_at') else None
-                }
-            else:
-                # 返回所有交易对的技术指标
-                sql = """
-                    SELECT t1.* FROM technical_indicators_cache t1
-                    INNER JOIN (
-                        SELECT symbol, MAX(updated_at) as max_updated_at
-                        FROM technical_indicators_cache
-                        WHERE timeframe = %s
-                        GROUP BY symbol
-                    ) t2 ON t1.symbol = t2.symbol AND t1.updated_at = t2.max_updated_at
-                    WHERE t1.timeframe = %s
-                    ORDER BY t1.technical_score DESC
-                """
-                cursor.execute(sql, (timeframe, timeframe))
-                results = cursor.fetchall()
-                
-                indicators_list = []
-                for result in results:
-                    indicators_list.append({
-                        "symbol": result['symbol'],
-                        "timeframe": result.get('timeframe', timeframe),  # 确保包含timeframe字段
-                        "technical_score": float(result['technical_score']) if result.get('technical_score') else None,
-                        "technical_signal": result.get('technical_signal'),
-                        "rsi_value": float(result['rsi_value']) if result.get('rsi_value') else None,
-                        "macd_trend": result.get('macd_trend'),
-                        "ema_trend": result.get('ema_trend'),
-                        "updated_at": result['updated_at'].isoformat() if result.get('updated_at') else None
-                    })
-                
-                return {
-                    "timeframe": timeframe,
-                    "total": len(indicators_list),
-                    "indicators": indicators_list
-                }
-        finally:
-            cursor.close()
-            connection.close()
+                })
             
+            return {
+                "timeframe": timeframe,
+                "total": len(indicators_list),
+                "indicators": indicators_list
+            }
     except HTTPException:
         raise
     except Exception as e:
@@ -3821,51 +3810,42 @@ async def get_realtime_prices(symbols: str = None):
         价格数据字典 {symbol: {price, change_24h, updated_at}}
     """
     try:
-        import pymysql
-        
-        db_config = config.get('database', {}).get('mysql', {})
-        connection = pymysql.connect(**db_config)
-        cursor = connection.cursor(pymysql.cursors.DictCursor)
-        
-        try:
-            if symbols:
-                # 解析交易对列表
-                symbol_list = [s.strip() for s in symbols.split(',')]
-                placeholders = ','.join(['%s'] * len(symbol_list))
-                cursor.execute(
-                    f"""SELECT symbol, current_price, change_24h, updated_at
-                    FROM price_stats_24h 
-                    WHERE symbol IN ({placeholders})""",
-                    symbol_list
-                )
-            else:
-                # 返回所有交易对的价格
-                cursor.execute(
-                    """SELECT symbol, current_price, change_24h, updated_at
-                    FROM price_stats_24h 
-                    ORDER BY symbol"""
-                )
-            
-            price_data = cursor.fetchall()
-            price_map = {}
-            
-            for row in price_data:
-                price_map[row['symbol']] = {
-                    'price': float(row['current_price']) if row.get('current_price') else None,
-                    'change_24h': float(row['change_24h']) if row.get('change_24h') else None,
-                    'updated_at': row['updated_at'].isoformat() if row.get('updated_at') else None
-                }
-            
-            return {
-                'success': True,
-                'data': price_map,
-                'total': len(price_map)
+        from app.database.connection_pool import get_async_api_pool
+        db = get_async_api_pool()
+
+        if symbols:
+            # 解析交易对列表
+            symbol_list = [s.strip() for s in symbols.split(',')]
+            placeholders = ','.join(['%s'] * len(symbol_list))
+            price_data = await db.execute_query(
+                f"""SELECT symbol, current_price, change_24h, updated_at
+                FROM price_stats_24h 
+                WHERE symbol IN ({placeholders})""",
+                tuple(symbol_list)
+            )
+        else:
+            # 返回所有交易对的价格
+            price_data = await db.execute_query(
+                """SELECT symbol, current_price, change_24h, updated_at
+                FROM price_stats_24h 
+                ORDER BY symbol"""
+            )
+
+        price_map = {}
+
+        for row in price_data:
+            price_map[row['symbol']] = {
+                'price': float(row['current_price']) if row.get('current_price') else None,
+                'change_24h': float(row['change_24h']) if row.get('change_24h') else None,
+                'updated_at': row['updated_at'].isoformat() if row.get('updated_at') else None
             }
-            
-        finally:
-            cursor.close()
-            connection.close()
-            
+
+        return {
+            'success': True,
+            'data': price_map,
+            'total': len(price_map)
+        }
+
     except Exception as e:
         logger.error(f"获取实时价格失败: {e}")
         import traceback
@@ -3873,6 +3853,118 @@ async def get_realtime_prices(symbols: str = None):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+# 多空比 / 持仓量只取最近 N 天内的记录（更早的数据本就不该参与信号）
+_FUTURES_SIGNALS_LOOKBACK_DAYS = 3
+
+
+def _latest_rows_sql(table: str, columns: str, per_symbol: int) -> str:
+    return (
+        f"SELECT {columns} FROM ("
+        f"  SELECT {columns}, ROW_NUMBER() OVER (PARTITION BY symbol ORDER BY timestamp DESC) AS rn"
+        f"  FROM {table}"
+        f"  WHERE timestamp >= NOW() - INTERVAL {_FUTURES_SIGNALS_LOOKBACK_DAYS} DAY"
+        f") t WHERE rn <= {per_symbol}"
+    )
+
+
+def _load_futures_signals(conn) -> list:
+    """
+    合约信号快照：每张来源表一条 SQL（技术指标 5m/15m/1h、资金费率、多空比、持仓量、24h 价格），
+    内存按币种拼装后逐个 _analyze_futures_signal（同步，在 API 线程池里执行）。
+
+    多空比 / 持仓量表里 symbol 有 BTC/USDT 与 BTCUSDT 两种写法，两种都认、取最新。
+    """
+    cursor = conn.cursor()
+    try:
+        cursor.execute(
+            "SELECT * FROM technical_indicators_cache WHERE timeframe IN ('5m', '15m', '1h')"
+        )
+        tech: dict = {}
+        for row in cursor.fetchall():
+            tech[(row['symbol'], row['timeframe'])] = row
+        symbols = sorted({symbol for symbol, timeframe in tech if timeframe == '1h'})
+
+        cursor.execute(
+            "SELECT symbol, current_rate, current_rate_pct, trend, market_sentiment FROM funding_rate_stats"
+        )
+        funding = {row['symbol']: row for row in cursor.fetchall()}
+
+        cursor.execute(_latest_rows_sql(
+            'futures_long_short_ratio',
+            'symbol, long_account, short_account, long_short_ratio, timestamp',
+            per_symbol=1,
+        ))
+        long_short: dict = {}
+        for row in cursor.fetchall():
+            long_short[row['symbol']] = row
+
+        cursor.execute(_latest_rows_sql(
+            'futures_open_interest', 'symbol, open_interest, timestamp', per_symbol=2,
+        ))
+        open_interest: dict = {}
+        for row in cursor.fetchall():
+            open_interest.setdefault(row['symbol'], []).append(row)
+
+        cursor.execute("SELECT symbol, current_price, change_24h, updated_at FROM price_stats_24h")
+        prices = {row['symbol']: row for row in cursor.fetchall()}
+    finally:
+        cursor.close()
+
+    futures_signals = []
+    for symbol in symbols:
+        try:
+            aliases = (symbol, symbol.replace('/', ''))
+            ls_rows = [long_short[k] for k in aliases if k in long_short]
+            ls_data = max(ls_rows, key=lambda r: r['timestamp']) if ls_rows else None
+            oi_records = sorted(
+                (r for k in aliases for r in open_interest.get(k, ())),
+                key=lambda r: r['timestamp'], reverse=True,
+            )[:2]
+
+            signal_analysis = _analyze_futures_signal(
+                symbol=symbol,
+                tech_data=tech.get((symbol, '1h')),  # 使用1h作为主要技术指标（向后兼容）
+                tech_data_5m=tech.get((symbol, '5m')),
+                tech_data_15m=tech.get((symbol, '15m')),
+                tech_data_1h=tech.get((symbol, '1h')),
+                funding_data=funding.get(symbol),
+                ls_data=ls_data,
+                oi_records=oi_records,
+                price_data=prices.get(symbol)
+            )
+
+            if signal_analysis:
+                futures_signals.append(signal_analysis)
+
+        except Exception as e:
+            logger.warning(f"分析{symbol}合约信号失败: {e}")
+            continue
+
+    return futures_signals
+
+
+async def _refresh_futures_signals() -> dict:
+    """重算合约信号快照并写入缓存（后台刷新任务与冷启动首个请求共用）"""
+    global _futures_signals_cache, _futures_signals_cache_time
+    from app.database.connection_pool import get_async_api_pool
+    futures_signals = await get_async_api_pool().run(_load_futures_signals)
+
+    # 按信号强度排序
+    futures_signals.sort(key=lambda x: abs(x.get('signal_score', 0)), reverse=True)
+
+    result = {
+        'success': True,
+        'data': futures_signals,
+        'total': len(futures_signals)
+    }
+
+    with _futures_signals_cache_lock:
+        _futures_signals_cache = result
+        _futures_signals_cache_time = datetime.now()
+    logger.debug(f"✅ 合约信号数据已缓存 ({len(futures_signals)} 条记录)")
+    return result
+
+
 @app.get("/api/futures-signals")
 async def get_futures_signals():
     """
@@ -3885,140 +3977,20 @@ async def get_futures_signals():
     - 技术指标（RSI、MACD、EMA等）
     - 价格趋势
 
+    快照由后台任务每 TECHNICAL_SIGNALS_CACHE_TTL 秒预计算，请求只读缓存；
+    仅在尚无快照（刚启动）或后台任务停摆时当场重算一次。
+
     Returns:
         各交易对的合约信号分析
     """
-    global _futures_signals_cache, _futures_signals_cache_time
-
-    # 检查缓存
     with _futures_signals_cache_lock:
         if _futures_signals_cache is not None and _futures_signals_cache_time is not None:
             cache_age = (datetime.now() - _futures_signals_cache_time).total_seconds()
-            if cache_age < TECHNICAL_SIGNALS_CACHE_TTL:
-                logger.debug(f"✅ 使用缓存的合约信号数据 (缓存年龄: {cache_age:.0f}秒)")
+            if cache_age < 3 * TECHNICAL_SIGNALS_CACHE_TTL:
                 return _futures_signals_cache
 
     try:
-        import pymysql
-        
-        db_config = config.get('database', {}).get('mysql', {})
-        connection = pymysql.connect(**db_config)
-        cursor = connection.cursor(pymysql.cursors.DictCursor)
-        
-        try:
-            # 获取所有交易对
-            cursor.execute("SELECT DISTINCT symbol FROM technical_indicators_cache WHERE timeframe = '1h'")
-            symbols = [row['symbol'] for row in cursor.fetchall()]
-            
-            futures_signals = []
-            
-            for symbol in symbols:
-                try:
-                    # 1. 获取技术指标（5m, 15m, 1h周期）
-                    tech_data_5m = None
-                    tech_data_15m = None
-                    tech_data_1h = None
-                    
-                    for timeframe in ['5m', '15m', '1h']:
-                        cursor.execute(
-                            """SELECT * FROM technical_indicators_cache 
-                            WHERE symbol = %s AND timeframe = %s
-                            ORDER BY updated_at DESC LIMIT 1""",
-                            (symbol, timeframe)
-                        )
-                        result = cursor.fetchone()
-                        if timeframe == '5m':
-                            tech_data_5m = result
-                        elif timeframe == '15m':
-                            tech_data_15m = result
-                        elif timeframe == '1h':
-                            tech_data_1h = result
-                    
-                    # 使用1h作为主要技术指标（向后兼容）
-                    tech_data = tech_data_1h
-                    
-                    # 2. 获取资金费率
-                    cursor.execute(
-                        """SELECT current_rate, current_rate_pct, trend, market_sentiment
-                        FROM funding_rate_stats 
-                        WHERE symbol = %s
-                        ORDER BY updated_at DESC LIMIT 1""",
-                        (symbol,)
-                    )
-                    funding_data = cursor.fetchone()
-                    
-                    # 3. 获取多空比数据
-                    symbol_no_slash = symbol.replace('/', '')
-                    cursor.execute(
-                        """SELECT long_account, short_account, long_short_ratio, timestamp
-                        FROM futures_long_short_ratio 
-                        WHERE symbol IN (%s, %s)
-                        ORDER BY timestamp DESC LIMIT 1""",
-                        (symbol, symbol_no_slash)
-                    )
-                    ls_data = cursor.fetchone()
-                    
-                    # 4. 获取持仓量数据（用于计算变化）
-                    cursor.execute(
-                        """SELECT open_interest, timestamp
-                        FROM futures_open_interest 
-                        WHERE symbol IN (%s, %s)
-                        ORDER BY timestamp DESC LIMIT 2""",
-                        (symbol, symbol_no_slash)
-                    )
-                    oi_records = cursor.fetchall()
-                    
-                    # 5. 获取价格数据（用于计算涨跌幅和显示实时价格）
-                    cursor.execute(
-                        """SELECT current_price, change_24h, updated_at
-                        FROM price_stats_24h 
-                        WHERE symbol = %s
-                        ORDER BY updated_at DESC LIMIT 1""",
-                        (symbol,)
-                    )
-                    price_data = cursor.fetchone()
-                    
-                    # 分析合约信号
-                    signal_analysis = _analyze_futures_signal(
-                        symbol=symbol,
-                        tech_data=tech_data,
-                        tech_data_5m=tech_data_5m,
-                        tech_data_15m=tech_data_15m,
-                        tech_data_1h=tech_data_1h,
-                        funding_data=funding_data,
-                        ls_data=ls_data,
-                        oi_records=oi_records,
-                        price_data=price_data
-                    )
-                    
-                    if signal_analysis:
-                        futures_signals.append(signal_analysis)
-                        
-                except Exception as e:
-                    logger.warning(f"分析{symbol}合约信号失败: {e}")
-                    continue
-            
-            # 按信号强度排序
-            futures_signals.sort(key=lambda x: abs(x.get('signal_score', 0)), reverse=True)
-
-            result = {
-                'success': True,
-                'data': futures_signals,
-                'total': len(futures_signals)
-            }
-
-            # 更新缓存
-            with _futures_signals_cache_lock:
-                _futures_signals_cache = result
-                _futures_signals_cache_time = datetime.now()
-                logger.debug(f"✅ 合约信号数据已缓存 ({len(futures_signals)} 条记录)")
-
-            return result
-            
-        finally:
-            cursor.close()
-            connection.close()
-            
+        return await _refresh_futures_signals()
     except Exception as e:
         logger.error(f"获取合约信号失败: {e}")
         import traceback
@@ -26,6 +26,7 @@ if str(project_root) not in sys.path:
 
 import asyncio
 import schedule
+from functools import partial
 import time
 import threading
 import yaml
@@ -43,7 +44,9 @@ from app.database.db_service import DatabaseService
 # 合约监控服务已移至 main.py，不再在此导入
 from app.trading.auto_futures_trader import AutoFuturesTrader
 from app.trading.futures_trading_engine import FuturesTradingEngine
-from app.services.cache_update_service import CacheUpdateService
+from app.services.cache_update_service import ANALYSIS_STAGES, CacheUpdateService
+from app.services.cache_pipeline import format_timings
+from app.services.job_runtime import SYNC_WORKERS, JobRuntime
 
 
 class UnifiedDataScheduler:
@@ -117,8 +120,10 @@ class UnifiedDataScheduler:
             'deepseek_position_advisor': {'count': 0, 'last_run': None, 'last_error': None},
             'paper_closed_live_sync': {'count': 0, 'last_run': None, 'last_error': None}
         }
-        self._deepseek_position_advisor_running = False
-        self._paper_closed_live_sync_running = False
+        # 任务运行时: 常驻事件循环 + 有界同步线程池, 重叠策略与指标按任务统计
+        self.runtime = JobRuntime(
+            sync_workers=int((self.config.get('scheduler') or {}).get('sync_workers', SYNC_WORKERS))
+        )
 
         logger.info(f"调度器初始化完成 - 监控币种: {len(self.symbols)} 个")
 
@@ -236,7 +241,7 @@ class UnifiedDataScheduler:
 
             if prices:
                 for price_data in prices:
-                    self.db_service.save_price_data(price_data)
+                    await asyncio.to_thread(self.db_service.save_price_data, price_data)
                     exchange = price_data.get('exchange', 'unknown')
                     logger.info(f"    ✓ [{exchange}] {symbol} 价格: ${price_data['price']:,.2f} "
                                f"(24h: {price_data['change_24h']:+.2f}%)")
@@ -296,7 +301,7 @@ class UnifiedDataScheduler:
                     'quote_volume': latest_kline.get('quote_volume')  # 添加成交额字段
                 }
 
-                self.db_service.save_kline_data(kline_data)
+                await asyncio.to_thread(self.db_service.save_kline_data, kline_data)
                 logger.debug(f"    ✓ [{used_exchange}] {symbol} K线({timeframe}): "
                            f"C:{latest_kline['close']:.2f}")
             else:
@@ -560,7 +565,7 @@ class UnifiedDataScheduler:
                                 funding_data = await collector.fetch_funding_rate(symbol)
 
                                 if funding_data:
-                                    self.db_service.save_funding_rate_data(funding_data)
+                                    await asyncio.to_thread(self.db_service.save_funding_rate_data, funding_data)
                                     funding_rate_pct = funding_data['funding_rate'] * 100
                                     logger.info(f"    ✓ [{exchange_id}] {symbol} 资金费率: {funding_rate_pct:+.4f}%")
                                     total_count += 1
@@ -630,7 +635,7 @@ class UnifiedDataScheduler:
                         unique_news.append(news)
 
                 # 批量保存新闻
-                count = self.db_service.save_news_batch(unique_news)
+                count = await asyncio.to_thread(self.db_service.save_news_batch, unique_news)
                 logger.info(f"  ✓ 新闻数据: 总采集 {len(all_news)} 条, 去重后 {len(unique_news)} 条, 保存 {count} 条新数据")
 
                 # 显示重要新闻
@@ -681,13 +686,16 @@ class UnifiedDataScheduler:
             total_transactions = sum(len(txs) for txs in results.values())
             logger.info(f"  ✓ Ethereum 数据: 监控 {len(results)} 个地址, 发现 {total_transactions} 笔交易")
 
-            # 保存交易到数据库
-            for address, transactions in results.items():
-                for tx in transactions:
-                    try:
-                        self.db_service.save_smart_money_transaction(tx)
-                    except Exception as e:
-                        logger.debug(f"    保存交易失败: {e}")
+            # 保存交易到数据库 (同步写库放到线程, 不阻塞 runtime 事件循环)
+            def _save_transactions():
+                for address, transactions in results.items():
+                    for tx in transactions:
+                        try:
+                            self.db_service.save_smart_money_transaction(tx)
+                        except Exception as e:
+                            logger.debug(f"    保存交易失败: {e}")
+
+            await asyncio.to_thread(_save_transactions)
 
             # 更新统计
             self.task_stats[task_name]['count'] += 1
@@ -747,38 +755,43 @@ class UnifiedDataScheduler:
             week_start = today - timedelta(days=today.weekday())
             week_end = week_start + timedelta(days=6)
 
-            saved_count = 0
-            added_to_monitor = 0
-            with HyperliquidDB() as db:
-                for trader in smart_traders:
-                    try:
-                        # 1. 保存周表现数据
-                        db.save_weekly_performance(
-                            address=trader['address'],
-                            display_name=trader.get('displayName', trader['address'][:10]),
-                            week_start=week_start,
-                            week_end=week_end,
-                            pnl=trader['pnl'],
-                            roi=trader['roi'],
-                            volume=trader.get('volume', 0),
-                            account_value=trader.get('accountValue', 0)
-                        )
-                        saved_count += 1
-
-                        # 2. 添加到监控钱包列表（自动发现）
-                        monitor_id = db.add_monitored_wallet(
-                            address=trader['address'],
-                            label=trader.get('displayName', trader['address'][:10]),
-                            monitor_type='auto',  # 标记为自动发现
-                            pnl=trader['pnl'],
-                            roi=trader['roi'],
-                            account_value=trader.get('accountValue', 0)
-                        )
-                        if monitor_id:
-                            added_to_monitor += 1
+            # 同步写库放到线程, 不阻塞 runtime 事件循环
+            def _save_traders():
+                saved_count = 0
+                added_to_monitor = 0
+                with HyperliquidDB() as db:
+                    for trader in smart_traders:
+                        try:
+                            # 1. 保存周表现数据
+                            db.save_weekly_performance(
+                                address=trader['address'],
+                                display_name=trader.get('displayName', trader['address'][:10]),
+                                week_start=week_start,
+                                week_end=week_end,
+                                pnl=trader['pnl'],
+                                roi=trader['roi'],
+                                volume=trader.get('volume', 0),
+                                account_value=trader.get('accountValue', 0)
+                            )
+                            saved_count += 1
+
+                            # 2. 添加到监控钱包列表（自动发现）
+                            monitor_id = db.add_monitored_wallet(
+                                address=trader['address'],
+                                label=trader.get('displayName', trader['address'][:10]),
+                                monitor_type='auto',  # 标记为自动发现
+                                pnl=trader['pnl'],
+                                roi=trader['roi'],
+                                account_value=trader.get('accountValue', 0)
+                            )
+                            if monitor_id:
+                                added_to_monitor += 1
+
+                        except Exception as e:
+                            logger.debug(f"    保存交易者数据失败: {e}")
+                return saved_count, added_to_monitor
 
-                    except Exception as e:
-                        logger.debug(f"    保存交易者数据失败: {e}")
+            saved_count, added_to_monitor = await asyncio.to_thread(_save_traders)
 
             logger.info(f"  ✓ 保存 {saved_count} 个交易者数据，添加 {added_to_monitor} 个到监控列表")
 
@@ -827,73 +840,27 @@ class UnifiedDataScheduler:
                 monitored_wallets = list(results.keys())
                 logger.info(f"  本次监控: {len(monitored_wallets)} 个地址")
 
-                total_trades = 0
-                total_positions = 0
-                wallet_updates = []
+                # 批量入库: 交易去重插入 / 持仓 upsert / 检查时间与成交游标, 一次提交
+                try:
+                    total_trades, total_positions = await asyncio.to_thread(db.save_monitor_results, results)
+                except Exception as e:
+                    logger.error(f"  保存监控结果失败: {e}")
+                    total_trades = total_positions = 0
 
+                wallet_updates = []
                 for address, result in results.items():
-                    try:
-                        # 保存交易记录
-                        recent_trades = result.get('recent_trades', [])
-                        for trade in recent_trades:
-                            trade_data = {
-                                'coin': trade['coin'],
-                                'side': trade['action'],  # LONG/SHORT
-                                'action': 'TRADE',
-                                'price': trade['price'],
-                                'size': trade['size'],
-                                'notional_usd': trade['notional_usd'],
-                                'closed_pnl': trade['closed_pnl'],
-                                'trade_time': trade['timestamp'],
-                                'raw_data': trade.get('raw_data', {})
-                            }
-                            db.save_wallet_trade(address, trade_data)
-                            total_trades += 1
-
-                        # 保存持仓快照
-                        positions = result.get('positions', [])
-                        snapshot_time = datetime.now()
-                        for pos in positions:
-                            position_data = {
-                                'coin': pos['coin'],
-                                'side': pos['side'],
-                                'size': pos['size'],
-                                'entry_price': pos['entry_price'],
-                                'mark_price': pos.get('mark_price', pos['entry_price']),
-                                'notional_usd': pos['notional_usd'],
-                                'unrealized_pnl': pos['unrealized_pnl'],
-                                'leverage': pos.get('leverage', 1),  # 从采集器获取杠杆倍数
-                                'raw_data': {}
-                            }
-                            db.save_wallet_position(address, position_data, snapshot_time)
-                            total_positions += 1
-
-                        # 更新检查时间（需要先获取trader_id）
-                        trader_id = db.get_or_create_trader(address)
-                        last_trade_time = recent_trades[0]['timestamp'] if recent_trades else None
-                        db.update_wallet_check_time(trader_id, last_trade_time)
-
-                        # 记录有活动的钱包
-                        if recent_trades or positions:
-                            stats = result.get('statistics', {})
-                            wallet_updates.append({
-                                'address': address[:10] + '...',
-                                'trades': len(recent_trades),
-                                'positions': len(positions),
-                                'net_flow': stats.get('net_flow_usd', 0),
-                                'total_pnl': stats.get('total_pnl', 0)
-                            })
-
-                        # 延迟避免API限流
-                        await asyncio.sleep(2)
-
-                    except Exception as e:
-                        logger.error(f"  监控钱包 {address[:10]}... 失败: {e}")
-                        try:
-                            trader_id = db.get_or_create_trader(address)
-                            db.update_wallet_check_time(trader_id)
-                        except:
-                            pass
+                    recent_trades = result.get('recent_trades', [])
+                    positions = result.get('positions', [])
+                    # 记录有活动的钱包
+                    if recent_trades or positions:
+                        stats = result.get('statistics', {})
+                        wallet_updates.append({
+                            'address': address[:10] + '...',
+                            'trades': len(recent_trades),
+                            'positions': len(positions),
+                            'net_flow': stats.get('net_flow_usd', 0),
+                            'total_pnl': stats.get('total_pnl', 0)
+                        })
 
                 # 汇总报告
                 logger.info(f"  ✓ 监控完成: 检查 {len(monitored_wallets)} 个钱包, "
@@ -922,32 +889,13 @@ class UnifiedDataScheduler:
         """异步运行任务（schedule 兼容）"""
         await coro
 
-    # ── 后台线程调度辅助方法 ────────────────────────────────────────────────
-    # 所有非即时任务走 daemon 线程, 确保 schedule.run_pending() 快速返回,
-    # 不阻塞1分钟/5分钟任务的按时触发.
+    # ── 任务注册 ────────────────────────────────────────────────────────────
+    # schedule 回调只做 runtime.trigger (立即返回), 确保 run_pending() 不阻塞;
+    # 异步任务跑在 runtime 的常驻事件循环, 同步任务进有界线程池.
 
-    def _run_async_in_thread(self, coro_factory):
-        """在后台 daemon 线程执行异步任务.
-
-        Args:
-            coro_factory: 可调用, 调用后返回一个协程对象.
-                          例: self.collect_funding_rates 是 bound method → coroutine.
-        """
-        def _wrapper():
-            try:
-                asyncio.run(coro_factory())
-            except Exception as e:
-                logger.error(f"[后台线程] 异步任务异常: {e.__class__.__name__}: {e}")
-        threading.Thread(target=_wrapper, daemon=True).start()
-
-    def _run_sync_in_thread(self, fn):
-        """在后台 daemon 线程执行同步任务."""
-        def _wrapper():
-            try:
-                fn()
-            except Exception as e:
-                logger.error(f"[后台线程] 同步任务异常: {e.__class__.__name__}: {e}")
-        threading.Thread(target=_wrapper, daemon=True).start()
+    def _job(self, name: str, fn, overlap: str = 'skip', jitter_s: float = 0.0, timeout_s: float = None):
+        """注册任务, 返回交给 schedule.do 的触发函数 (带参数的协程用 functools.partial 包装)"""
+        return self.runtime.register(name, fn, overlap=overlap, jitter_s=jitter_s, timeout_s=timeout_s)
 
     def schedule_tasks(self):
         """设置所有定时任务"""
@@ -1015,54 +963,31 @@ class UnifiedDataScheduler:
         logger.info("  ⚠️  合约K线和价格数据由 fast_collector_service.py 单独采集")
 
         # 2. 资金费率
-        schedule.every(5).minutes.do(
-            lambda: self._run_async_in_thread(self.collect_funding_rates)
-        )
-        logger.info("  ✓ 资金费率 - 每 5 分钟 (后台线程)")
+        schedule.every(5).minutes.do(self._job('funding_rate', self.collect_funding_rates, jitter_s=10))
+        logger.info("  ✓ 资金费率 - 每 5 分钟")
 
         # 3. 新闻数据
-        schedule.every(15).minutes.do(
-            lambda: self._run_async_in_thread(self.collect_news)
-        )
-        logger.info("  ✓ 新闻数据 - 每 15 分钟 (后台线程)")
+        schedule.every(15).minutes.do(self._job('news', self.collect_news, jitter_s=10))
+        logger.info("  ✓ 新闻数据 - 每 15 分钟")
 
         # 3.5 Binance 官方公告监控（新上线/下架/维护/Launchpool）
-        schedule.every(30).minutes.do(self.monitor_binance_news)
+        schedule.every(30).minutes.do(self._job('binance_news', self.monitor_binance_news, jitter_s=10))
         logger.info("  ✓ Binance 公告监控 - 每 30 分钟")
 
         # 4. 区块链Gas统计 (每天采集昨天的数据，使用线程避免阻塞主调度器)
         try:
             from app.collectors.blockchain_gas_collector import BlockchainGasCollector
             
-            def run_gas_collection_in_thread():
-                """在独立线程中运行Gas采集，避免阻塞主调度器"""
-                def collect_gas():
-                    try:
-                        logger.info("开始执行Gas采集任务（后台线程）...")
-                        gas_collector = BlockchainGasCollector()
-                        # 使用asyncio.run在独立线程中运行异步任务
-                        # 注意：每个线程需要自己的事件循环
-                        loop = asyncio.new_event_loop()
-                        asyncio.set_event_loop(loop)
-                        try:
-                            loop.run_until_complete(gas_collector.collect_all_chains())
-                            logger.info("Gas采集任务完成（后台线程）")
-                        finally:
-                            loop.close()
-                    except Exception as e:
-                        logger.error(f"Gas采集任务执行失败: {e}", exc_info=True)
-                
-                # 在独立线程中运行，daemon=True确保主程序退出时线程也会退出
-                # 这样即使Gas采集任务执行时间很长，也不会阻塞主调度器的其他任务
-                thread = threading.Thread(target=collect_gas, daemon=True, name="GasCollector")
-                thread.start()
-                logger.debug("Gas采集任务已在后台线程启动")
-            
-            schedule.every().day.at("01:00").do(run_gas_collection_in_thread)
+            async def collect_gas():
+                logger.info("开始执行Gas采集任务...")
+                await BlockchainGasCollector().collect_all_chains()
+                logger.info("Gas采集任务完成")
+
+            schedule.every().day.at("01:00").do(self._job('blockchain_gas', collect_gas))
             # schedule库默认使用本地时间（系统时区），不是UTC时间
             import time
             local_tz = time.tzname[0] if time.daylight == 0 else time.tzname[1]
-            logger.info(f"  ✓ 区块链Gas统计 - 每天 01:00 本地时间 ({local_tz}) (后台线程执行，不阻塞主调度器)")
+            logger.info(f"  ✓ 区块链Gas统计 - 每天 01:00 本地时间 ({local_tz})")
         except Exception as e:
             logger.warning(f"  ⚠️  区块链Gas统计任务注册失败: {e}")
 
@@ -1071,48 +996,45 @@ class UnifiedDataScheduler:
             fe = self.config.get("farside_etf", {})
             if fe.get("enabled", True):
 
-                def run_farside_etf_in_thread():
-                    def job():
-                        try:
-                            from app.services.farside_etf_sync import (
-                                sync_farside_btc_flows,
-                                sync_farside_eth_flows,
-                            )
-
-                            mysql_config = self.config.get("database", {}).get("mysql", {})
-                            btc_url = fe.get("btc_url", "https://farside.co.uk/btc/")
-                            eth_url = fe.get("eth_url", "https://farside.co.uk/eth/")
-
-                            logger.info("开始 Farside BTC ETF 同步（后台线程）...")
-                            r_btc = sync_farside_btc_flows(mysql_config, page_url=btc_url)
-                            logger.info(
-                                "Farside BTC ETF 同步完成: imported={}, tickers={}, errors={}",
-                                r_btc.get("imported_rows"),
-                                len(r_btc.get("tickers") or []),
-                                r_btc.get("error_count", 0),
-                            )
+                def run_farside_etf():
+                    try:
+                        from app.services.farside_etf_sync import (
+                            sync_farside_btc_flows,
+                            sync_farside_eth_flows,
+                        )
 
-                            logger.info("开始 Farside ETH ETF 同步（后台线程）...")
-                            r_eth = sync_farside_eth_flows(mysql_config, page_url=eth_url)
-                            logger.info(
-                                "Farside ETH ETF 同步完成: imported={}, tickers={}, errors={}",
-                                r_eth.get("imported_rows"),
-                                len(r_eth.get("tickers") or []),
-                                r_eth.get("error_count", 0),
-                            )
+                        mysql_config = self.config.get("database", {}).get("mysql", {})
+                        btc_url = fe.get("btc_url", "https://farside.co.uk/btc/")
+                        eth_url = fe.get("eth_url", "https://farside.co.uk/eth/")
+
+                        logger.info("开始 Farside BTC ETF 同步...")
+                        r_btc = sync_farside_btc_flows(mysql_config, page_url=btc_url)
+                        logger.info(
+                            "Farside BTC ETF 同步完成: imported={}, tickers={}, errors={}",
+                            r_btc.get("imported_rows"),
+                            len(r_btc.get("tickers") or []),
+                            r_btc.get("error_count", 0),
+                        )
 
-                            self.task_stats["etf_daily"]["count"] += 1
-                            self.task_stats["etf_daily"]["last_run"] = datetime.now()
-                            self.task_stats["etf_daily"]["last_error"] = None
-                        except Exception as ex:
-                            logger.error("Farside ETF 同步失败: {}", ex, exc_info=True)
-                            self.task_stats["etf_daily"]["last_error"] = str(ex)
+                        logger.info("开始 Farside ETH ETF 同步...")
+                        r_eth = sync_farside_eth_flows(mysql_config, page_url=eth_url)
+                        logger.info(
+                            "Farside ETH ETF 同步完成: imported={}, tickers={}, errors={}",
+                            r_eth.get("imported_rows"),
+                            len(r_eth.get("tickers") or []),
+                            r_eth.get("error_count", 0),
+                        )
 
-                    threading.Thread(target=job, daemon=True, name="FarsideEtfSync").start()
+                        self.task_stats["etf_daily"]["count"] += 1
+                        self.task_stats["etf_daily"]["last_run"] = datetime.now()
+                        self.task_stats["etf_daily"]["last_error"] = None
+                    except Exception as ex:
+                        logger.error("Farside ETF 同步失败: {}", ex, exc_info=True)
+                        self.task_stats["etf_daily"]["last_error"] = str(ex)
 
                 daily_at = fe.get("daily_at", "06:45")
-                schedule.every().day.at(daily_at).do(run_farside_etf_in_thread)
-                logger.info(f"  ✓ Farside BTC/ETH ETF 同步 - 每天 {daily_at} 本地时间 (后台线程)")
+                schedule.every().day.at(daily_at).do(self._job('etf_daily', run_farside_etf))
+                logger.info(f"  ✓ Farside BTC/ETH ETF 同步 - 每天 {daily_at} 本地时间")
         except Exception as e:
             logger.warning(f"  ⚠️  Farside ETF 任务注册失败: {e}")
 
@@ -1121,48 +1043,41 @@ class UnifiedDataScheduler:
             bt = self.config.get("bitcointreasuries", {})
             if bt.get("enabled", True):
 
-                def run_bt_in_thread():
-                    def job():
-                        try:
-                            logger.info("开始 bitcointreasuries.net 企业金库同步（后台线程）...")
-                            from app.services.bitcointreasuries_sync import (
-                                sync_bitcointreasuries_holdings,
-                            )
+                def run_bitcointreasuries():
+                    try:
+                        logger.info("开始 bitcointreasuries.net 企业金库同步...")
+                        from app.services.bitcointreasuries_sync import (
+                            sync_bitcointreasuries_holdings,
+                        )
 
-                            mysql_config = self.config.get("database", {}).get("mysql", {})
-                            url = bt.get("url", "https://bitcointreasuries.net/")
-                            r = sync_bitcointreasuries_holdings(
-                                mysql_config, page_url=url
-                            )
-                            logger.info(
-                                "企业金库同步完成: companies={}, imported={}, updated={}, skipped={}",
-                                r.get("company_count"),
-                                r.get("imported"),
-                                r.get("updated"),
-                                r.get("skipped"),
-                            )
-                            self.task_stats["bitcointreasuries_daily"]["count"] += 1
-                            self.task_stats["bitcointreasuries_daily"][
-                                "last_run"
-                            ] = datetime.now()
-                            self.task_stats["bitcointreasuries_daily"][
-                                "last_error"
-                            ] = None
-                        except Exception as ex:
-                            logger.error("bitcointreasuries.net 同步失败: {}", ex, exc_info=True)
-                            self.task_stats["bitcointreasuries_daily"][
-                                "last_error"
-                            ] = str(ex)
-
-                    threading.Thread(
-                        target=job, daemon=True, name="BitcoinTreasuriesSync"
-                    ).start()
+                        mysql_config = self.config.get("database", {}).get("mysql", {})
+                        url = bt.get("url", "https://bitcointreasuries.net/")
+                        r = sync_bitcointreasuries_holdings(
+                            mysql_config, page_url=url
+                        )
+                        logger.info(
+                            "企业金库同步完成: companies={}, imported={}, updated={}, skipped={}",
+                            r.get("company_count"),
+                            r.get("imported"),
+                            r.get("updated"),
+                            r.get("skipped"),
+                        )
+                        self.task_stats["bitcointreasuries_daily"]["count"] += 1
+                        self.task_stats["bitcointreasuries_daily"][
+                            "last_run"
+                        ] = datetime.now()
+                        self.task_stats["bitcointreasuries_daily"][
+                            "last_error"
+                        ] = None
+                    except Exception as ex:
+                        logger.error("bitcointreasuries.net 同步失败: {}", ex, exc_info=True)
+                        self.task_stats["bitcointreasuries_daily"][
+                            "last_error"
+                        ] = str(ex)
 
                 daily_bt = bt.get("daily_at", "07:30")
-                schedule.every().day.at(daily_bt).do(run_bt_in_thread)
-                logger.info(
-                    f"  ✓ BitcoinTreasuries 企业金库 - 每天 {daily_bt} 本地时间 (后台线程)"
-                )
+                schedule.every().day.at(daily_bt).do(self._job('bitcointreasuries_daily', run_bitcointreasuries))
+                logger.info(f"  ✓ BitcoinTreasuries 企业金库 - 每天 {daily_bt} 本地时间")
         except Exception as e:
             logger.warning(f"  ⚠️  BitcoinTreasuries 任务注册失败: {e}")
 
@@ -1179,33 +1094,19 @@ class UnifiedDataScheduler:
 
         # 4. Ethereum 链上数据
         if self.smart_money_collector:
-            schedule.every(5).minutes.do(
-                lambda: self._run_async_in_thread(
-                    lambda: self.collect_ethereum_data('5m')
-                )
-            )
-            logger.info("  ✓ Ethereum 5分钟数据 - 每 5 分钟 (后台线程)")
+            schedule.every(5).minutes.do(self._job('ethereum_5m', partial(self.collect_ethereum_data, '5m'), jitter_s=10))
+            logger.info("  ✓ Ethereum 5分钟数据 - 每 5 分钟")
 
-            schedule.every(1).hours.do(
-                lambda: self._run_async_in_thread(
-                    lambda: self.collect_ethereum_data('1h')
-                )
-            )
-            logger.info("  ✓ Ethereum 1小时数据 - 每 1 小时 (后台线程)")
+            schedule.every(1).hours.do(self._job('ethereum_1h', partial(self.collect_ethereum_data, '1h'), jitter_s=10))
+            logger.info("  ✓ Ethereum 1小时数据 - 每 1 小时")
 
-            schedule.every().day.at("00:10").do(
-                lambda: self._run_async_in_thread(
-                    lambda: self.collect_ethereum_data('1d')
-                )
-            )
-            logger.info("  ✓ Ethereum 1天数据 - 每天 00:10 (后台线程)")
+            schedule.every().day.at("00:10").do(self._job('ethereum_1d', partial(self.collect_ethereum_data, '1d')))
+            logger.info("  ✓ Ethereum 1天数据 - 每天 00:10")
 
         # 5. Hyperliquid 排行榜 (重复注册已修复: 仅此一处)
         if self.hyperliquid_collector:
-            schedule.every().day.at("02:00").do(
-                lambda: self._run_async_in_thread(self.collect_hyperliquid_leaderboard)
-            )
-            logger.info("  ✓ Hyperliquid 排行榜 - 每天 02:00 (后台线程)")
+            schedule.every().day.at("02:00").do(self._job('hyperliquid_daily', self.collect_hyperliquid_leaderboard))
+            logger.info("  ✓ Hyperliquid 排行榜 - 每天 02:00")
 
         # 6. Hyperliquid 钱包监控 - 已移至独立的 hyperliquid_scheduler.py
         # 注意: Hyperliquid 监控任务现在由独立的调度器运行，避免阻塞主调度器
@@ -1215,22 +1116,14 @@ class UnifiedDataScheduler:
 
         # 6.5 TOP50 榜单 + 白名单/黑名单评级（每 1 小时 + 15min 轮询 next_due）
         def _run_rating_refresh(triggered_by: str = "scheduler"):
-            try:
-                from app.services.rating_refresh_schedule import run_rating_refresh_if_due
-                run_rating_refresh_if_due(triggered_by=triggered_by)
-            except Exception as e:
-                logger.error(f"[TOP50评级刷新] 失败: {e}")
-                import traceback
-                logger.error(traceback.format_exc())
-
-        def _schedule_rating_refresh(triggered_by: str = "scheduler"):
-            self._run_sync_in_thread(lambda: _run_rating_refresh(triggered_by))
+            from app.services.rating_refresh_schedule import run_rating_refresh_if_due
+            run_rating_refresh_if_due(triggered_by=triggered_by)
 
         schedule.every(1).hours.do(
-            lambda: _schedule_rating_refresh("schedule_1h")
+            self._job('rating_refresh_1h', partial(_run_rating_refresh, "schedule_1h"))
         )
         schedule.every(15).minutes.do(
-            lambda: _schedule_rating_refresh("schedule_poll")
+            self._job('rating_refresh_poll', partial(_run_rating_refresh, "schedule_poll"))
         )
         logger.info(
             "  ✓ TOP50 + 白名单/黑名单评级 - 每 1 小时 + 15min 轮询 "
@@ -1241,23 +1134,27 @@ class UnifiedDataScheduler:
         logger.info("\n  🚀 性能优化: 缓存自动更新")
 
         # 价格缓存 - 每1分钟更新
-        schedule.every(1).minutes.do(
-            lambda: self._run_async_in_thread(self.update_price_cache)
-        )
-        logger.info("  ✓ 价格统计缓存 (price_stats_24h) - 每 1 分钟 (后台线程)")
+        schedule.every(1).minutes.do(self._job('cache_price', self.update_price_cache, timeout_s=50))
+        logger.info("  ✓ 价格统计缓存 (price_stats_24h) - 每 1 分钟")
 
         # 分析缓存 - 每5分钟
-        schedule.every(5).minutes.do(
-            lambda: self._run_async_in_thread(self.update_analysis_cache)
-        )
-        logger.info("  ✓ 分析缓存 (技术指标+新闻+资金费率+投资建议) - 每 5 分钟 (后台线程)")
+        schedule.every(5).minutes.do(self._job('cache_analysis', self.update_analysis_cache, jitter_s=5))
+        logger.info("  ✓ 分析缓存 (技术指标+新闻+资金费率+投资建议) - 每 5 分钟")
 
         # Hyperliquid缓存 - 每10分钟
         if self.hyperliquid_collector:
-            schedule.every(10).minutes.do(
-                lambda: self._run_async_in_thread(self.update_hyperliquid_cache)
-            )
-            logger.info("  ✓ Hyperliquid聚合缓存 - 每 10 分钟 (后台线程)")
+            schedule.every(10).minutes.do(self._job('cache_hyperliquid', self.update_hyperliquid_cache, jitter_s=5))
+            logger.info("  ✓ Hyperliquid聚合缓存 - 每 10 分钟")
+
+        # kline_data 分层存储: 5m → 1h/4h/1d 汇总 + 分区维护 / 冷数据归档
+        storage_cfg = self.config.get('kline_storage') or {}
+        if storage_cfg.get('enabled', True):
+            from app.services.kline_storage import KlineStorageManager
+            kline_storage = KlineStorageManager(self.config.get('database', {}).get('mysql', {}), storage_cfg)
+            schedule.every().hour.at(":03").do(self._job('kline_rollups', kline_storage.run_rollups))
+            logger.info(f"  ✓ K线汇总 {kline_storage.rollup_timeframes} - 每小时 :03")
+            schedule.every().day.at("03:30").do(self._job('kline_maintenance', kline_storage.run_maintenance))
+            logger.info(f"  ✓ K线分区维护 + 冷数据归档 {kline_storage.hot_days} 天 - 每天 03:30")
 
         # 模拟合约总权益更新 - 移除高频更新
         # if self.futures_engine:
@@ -1271,78 +1168,86 @@ class UnifiedDataScheduler:
         # ============================================================
         logger.info("\n  🚀 data_cache 层: 预计算缓存自动刷新")
 
-        _cache_task_running = set()
-        _cache_task_lock = threading.Lock()
-
-        def _run_cache_task(job_fn):
-            """在线程中执行缓存任务."""
-            job_name = getattr(job_fn, "__name__", "cache_task")
-            with _cache_task_lock:
-                if job_name in _cache_task_running:
-                    logger.info(f"[data_cache] {job_name} 上一轮仍在运行，跳过本轮")
-                    return
-                _cache_task_running.add(job_name)
-
-            def wrapper():
-                try:
-                    job_fn()
-                except Exception as e:
-                    logger.error(f"[data_cache] 任务失败: {e}", exc_info=True)
-                finally:
-                    with _cache_task_lock:
-                        _cache_task_running.discard(job_name)
-
-            threading.Thread(target=wrapper, daemon=True, name=f"Cache_{job_name}").start()
+        def _cache_job(job_fn, jitter_s: float = 5):
+            """data_cache 刷新任务: 上一轮未结束则跳过本轮"""
+            return self._job(f"data_cache.{job_fn.__name__}", job_fn, jitter_s=jitter_s)
 
         from app.services.data_cache_service import (
             refresh_market_snapshot,
             refresh_market_movers,
             refresh_candidate_pool,
             refresh_explore_prepared_only,
+            refresh_feature_store,
             refresh_position_stats,
             sync_settings_cache,
         )
 
         # 市场快照 - 每1分钟
-        schedule.every(1).minutes.do(lambda: _run_cache_task(refresh_market_snapshot))
-        logger.info("  ✓ market_snapshot - 每 1 分钟 (后台线程)")
+        schedule.every(1).minutes.do(_cache_job(refresh_market_snapshot, jitter_s=0))
+        logger.info("  ✓ market_snapshot - 每 1 分钟")
 
         # 市场异动 - 每5分钟
-        schedule.every(5).minutes.do(lambda: _run_cache_task(refresh_market_movers))
-        logger.info("  ✓ market_movers_snapshot - 每 5 分钟 (后台线程)")
+        schedule.every(5).minutes.do(_cache_job(refresh_market_movers))
+        logger.info("  ✓ market_movers_snapshot - 每 5 分钟")
+
+        # 按币种 K 线特征 — 每根 15m 收盘后 20s (1h / 1d 收盘同时落在这些点上)
+        trigger_features = _cache_job(refresh_feature_store, jitter_s=0)
+        for minute in ('00:20', '15:20', '30:20', '45:20'):
+            schedule.every().hour.at(minute).do(trigger_features)
+        logger.info("  ✓ symbol_features - 每根 15m 收盘后")
 
         # 候选交易对池 (含 K 线叙事) — 每 6 分钟
-        schedule.every(6).minutes.do(lambda: _run_cache_task(refresh_candidate_pool))
-        logger.info("  ✓ candidate_pool_snapshot - 每 6 分钟 (后台线程)")
+        schedule.every(6).minutes.do(_cache_job(refresh_candidate_pool))
+        logger.info("  ✓ candidate_pool_snapshot - 每 6 分钟")
 
         # 探索/战术共用 universe — 每 15 分钟，仅组装 (~35s)，不重复全量候选池
-        schedule.every(15).minutes.do(
-            lambda: _run_cache_task(refresh_explore_prepared_only)
-        )
+        schedule.every(15).minutes.do(_cache_job(refresh_explore_prepared_only))
         logger.info(
             "  ✓ explore_prepared_snapshot - 每 15 分钟 (全 Gemini/DeepSeek 策略只读)"
         )
 
         # 持仓统计 - 每30分钟
-        schedule.every(30).minutes.do(lambda: _run_cache_task(refresh_position_stats))
-        logger.info("  ✓ position_stats_snapshot - 每 30 分钟 (后台线程)")
+        schedule.every(30).minutes.do(_cache_job(refresh_position_stats))
+        logger.info("  ✓ position_stats_snapshot - 每 30 分钟")
 
         def _run_account_stats_reconcile():
-            def wrapper():
-                try:
-                    from update_account_stats import update_account_statistics
-                    update_account_statistics()
-                except Exception as e:
-                    logger.error(f"[账户统计] frozen_balance 校正失败: {e}", exc_info=True)
-
-            threading.Thread(target=wrapper, daemon=True, name="AccountStats").start()
+            from update_account_stats import update_account_statistics
+            update_account_statistics()
 
-        schedule.every(5).minutes.do(_run_account_stats_reconcile)
+        schedule.every(5).minutes.do(self._job('account_stats', _run_account_stats_reconcile, jitter_s=5))
         logger.info("  ✓ futures 账户统计校正 - 每 5 分钟 (frozen_balance 与持仓对齐)")
 
+        # 复盘盈亏汇总兜底 — 启动时回填未回填账户, 之后重算最近 3 小时桶 (覆盖未挂钩的平仓路径)
+        def _run_pnl_rollup_refresh():
+            import pymysql
+            from app.services.pnl_rollup import refresh_recent
+            from app.utils.config_loader import get_db_config
+
+            db_cfg = get_db_config()
+            conn = pymysql.connect(
+                host=db_cfg["host"],
+                port=int(db_cfg.get("port", 3306)),
+                user=db_cfg["user"],
+                password=db_cfg["password"],
+                database=db_cfg["database"],
+                charset="utf8mb4",
+                cursorclass=pymysql.cursors.DictCursor,
+            )
+            try:
+                stats = refresh_recent(conn, hours=3)
+                if stats['backfilled']:
+                    logger.info(f"[pnl_rollup] 回填 {stats['backfilled']} 个账户, 重算 {stats['accounts']} 个账户")
+            finally:
+                conn.close()
+
+        trigger_rollup = self._job('pnl_rollup', _run_pnl_rollup_refresh, jitter_s=5)
+        schedule.every(10).minutes.do(trigger_rollup)
+        trigger_rollup()
+        logger.info("  ✓ 复盘盈亏汇总 - 启动回填 + 每 10 分钟重算最近 3 小时")
+
         # 系统设置缓存 - 每1分钟同步 (保持与 system_settings 表同步)
-        schedule.every(1).minutes.do(lambda: _run_cache_task(sync_settings_cache))
-        logger.info("  ✓ settings_cache - 每 1 分钟 (后台线程)")
+        schedule.every(1).minutes.do(_cache_job(sync_settings_cache, jitter_s=0))
+        logger.info("  ✓ settings_cache - 每 1 分钟")
 
         # ============================================================
         # 9. AI 系列 — REQ-BRAIN + DeepSeek 探索/预测并行（对照期）
@@ -1351,102 +1256,66 @@ class UnifiedDataScheduler:
 
         # REQ-BRAIN 超级大脑 — 市值前 300 轮询：每 15s 一批 5 币，发现机会立即下单
         def _run_brain_swing_tick():
-            def wrapper():
-                try:
-                    from app.services.brain_strategy_orchestrator import run_brain_tick
-                    run_brain_tick(triggered_by='scheduler')
-                except Exception as e:
-                    logger.error(f"[BRAIN] tick 调度异常: {e}", exc_info=True)
-            threading.Thread(target=wrapper, daemon=True, name="BrainSwingTick").start()
+            from app.services.brain_strategy_orchestrator import run_brain_tick
+            run_brain_tick(triggered_by='scheduler')
 
-        schedule.every(15).seconds.do(_run_brain_swing_tick)
+        schedule.every(15).seconds.do(self._job('brain_swing_tick', _run_brain_swing_tick))
         logger.info("  ✓ brain_swing (REQ-BRAIN) - 每15s轮询一批5币，发现即开")
 
         # DeepSeek 探索 — 对照期保留自动开仓（INV-BRAIN-07 暂缓）
         def _run_deepseek_explore():
-            def wrapper():
-                try:
-                    from app.services.deepseek_explore_worker import run_explore_round
-                    run_explore_round(triggered_by='scheduler')
-                except Exception as e:
-                    logger.error(f"[DeepSeek探索] 调度异常: {e}", exc_info=True)
-            threading.Thread(target=wrapper, daemon=True, name="DeepSeekExplore").start()
+            from app.services.deepseek_explore_worker import run_explore_round
+            run_explore_round(triggered_by='scheduler')
 
-        schedule.every(2).hours.do(_run_deepseek_explore)
-        schedule.every(10).minutes.do(_run_deepseek_explore)
+        self._job('deepseek_explore', _run_deepseek_explore)
+        schedule.every(2).hours.do(lambda: self.runtime.trigger('deepseek_explore'))
+        schedule.every(10).minutes.do(lambda: self.runtime.trigger('deepseek_explore'))
         logger.info("  ✓ deepseek_explore - 距上次ok+max_hold_hours, 每2h + 10min轮询 (对照期)")
 
         # DeepSeek 预测
         def _run_deepseek_predict():
-            def wrapper():
-                try:
-                    from app.services.deepseek_predictor import run_predict_round
-                    run_predict_round(triggered_by='scheduler')
-                except Exception as e:
-                    logger.error(f"[DeepSeek预测] 调度异常: {e}", exc_info=True)
-            threading.Thread(target=wrapper, daemon=True, name="DeepSeekPredict").start()
+            from app.services.deepseek_predictor import run_predict_round
+            run_predict_round(triggered_by='scheduler')
 
-        schedule.every(2).hours.do(_run_deepseek_predict)
-        schedule.every(5).minutes.do(_run_deepseek_predict)
+        self._job('deepseek_predict', _run_deepseek_predict)
+        schedule.every(2).hours.do(lambda: self.runtime.trigger('deepseek_predict'))
+        schedule.every(5).minutes.do(lambda: self.runtime.trigger('deepseek_predict'))
         logger.info("  ✓ deepseek_predict - 距上次ok+max_hold_hours, 每2h + 5min轮询 (对照期)")
 
         # 中线做多/做空 v2（量化扫描，非 LLM）
         def _run_midline_swing():
-            def wrapper():
-                try:
-                    from app.services.midline_explore_worker import run_all_midline_scheduled
-                    run_all_midline_scheduled(triggered_by='scheduler')
-                except Exception as e:
-                    logger.error(f"[中线策略] 调度异常: {e}", exc_info=True)
-            threading.Thread(target=wrapper, daemon=True, name="MidlineSwing").start()
+            from app.services.midline_explore_worker import run_all_midline_scheduled
+            run_all_midline_scheduled(triggered_by='scheduler')
 
-        schedule.every(15).minutes.do(_run_midline_swing)
+        schedule.every(15).minutes.do(self._job('midline_swing', _run_midline_swing, jitter_s=10))
         logger.info("  ✓ midline_swing v2 - 每15min轮询市值前100破位机会")
 
         # DeepSeek 持仓顾问 - 监管模拟仓；scheduler 每 15min tick
         def _run_deepseek_position_advisor():
-            if self._deepseek_position_advisor_running:
-                logger.info("[DeepSeek持仓顾问] 上一轮仍在运行，跳过本轮")
-                return
-
-            def wrapper():
-                task_name = 'deepseek_position_advisor'
-                self._deepseek_position_advisor_running = True
-                try:
-                    from app.services.deepseek_position_advisor import get_deepseek_advisor
-                    stats = get_deepseek_advisor().tick()
-                    self.task_stats[task_name]['count'] += 1
-                    self.task_stats[task_name]['last_run'] = datetime.now()
-                    self.task_stats[task_name]['last_error'] = None
-                    logger.info(f"[DeepSeek持仓顾问] 调度完成: {stats}")
-                except Exception as e:
-                    logger.error(f"[DeepSeek持仓顾问] 调度异常: {e}", exc_info=True)
-                    self.task_stats[task_name]['last_error'] = str(e)
-                finally:
-                    self._deepseek_position_advisor_running = False
-
-            threading.Thread(
-                target=wrapper,
-                daemon=True,
-                name="DeepSeekPositionAdvisor",
-            ).start()
+            task_name = 'deepseek_position_advisor'
+            try:
+                from app.services.deepseek_position_advisor import get_deepseek_advisor
+                stats = get_deepseek_advisor().tick()
+                self.task_stats[task_name]['count'] += 1
+                self.task_stats[task_name]['last_run'] = datetime.now()
+                self.task_stats[task_name]['last_error'] = None
+                logger.info(f"[DeepSeek持仓顾问] 调度完成: {stats}")
+            except Exception as e:
+                self.task_stats[task_name]['last_error'] = str(e)
+                raise
 
-        schedule.every(15).minutes.do(_run_deepseek_position_advisor)
-        _run_deepseek_position_advisor()
-        logger.info("  ✓ deepseek_position_advisor - 每 15 分钟 (后台线程；每仓 15min 复审)")
+        schedule.every(15).minutes.do(self._job('deepseek_position_advisor', _run_deepseek_position_advisor))
+        self.runtime.trigger('deepseek_position_advisor')
+        logger.info("  ✓ deepseek_position_advisor - 每 15 分钟 (每仓 15min 复审)")
 
         # Big4 综合行情 LLM 分析 — 每 2h (DeepSeek only; Gemini Big4 disabled)
         def _run_deepseek_big4_analysis():
-            def wrapper():
-                try:
-                    from app.services.big4_comprehensive_analyzer import run_big4_analysis_round
-                    run_big4_analysis_round("deepseek", triggered_by="scheduler")
-                except Exception as e:
-                    logger.error(f"[DeepSeek Big4分析] 调度异常: {e}", exc_info=True)
-            threading.Thread(target=wrapper, daemon=True, name="DeepSeekBig4Analysis").start()
+            from app.services.big4_comprehensive_analyzer import run_big4_analysis_round
+            run_big4_analysis_round("deepseek", triggered_by="scheduler")
 
-        schedule.every(2).hours.do(_run_deepseek_big4_analysis)
-        schedule.every(10).minutes.do(_run_deepseek_big4_analysis)
+        self._job('deepseek_big4_analysis', _run_deepseek_big4_analysis)
+        schedule.every(2).hours.do(lambda: self.runtime.trigger('deepseek_big4_analysis'))
+        schedule.every(10).minutes.do(lambda: self.runtime.trigger('deepseek_big4_analysis'))
         logger.info("  ✓ big4_analysis - DeepSeek 每 2h + 10min 轮询 (worker 内 2h 防重；Gemini 已停用)")
 
         logger.info("  ○ gemini_explore/predict/sentiment/position_advisor - 已下线 (不调度)")
@@ -1458,50 +1327,31 @@ class UnifiedDataScheduler:
         #     先 sync_positions_from_binance 全量同步, 再 correct_live_trade_records 修正
         # ============================================================
         def _run_correct_live_trades():
-            def wrapper():
-                try:
-                    self.correct_live_trade_records_all_accounts()
-                except Exception as e:
-                    logger.error(f"[实盘记录同步] 调度异常: {e}", exc_info=True)
-            threading.Thread(target=wrapper, daemon=True, name="CorrectLiveTrades").start()
+            self.correct_live_trade_records_all_accounts()
 
-        schedule.every(15).minutes.do(_run_correct_live_trades)
-        logger.info("  ✓ correct_live_trades - 每 15 分钟 (后台线程)")
+        schedule.every(15).minutes.do(self._job('correct_live_trades', _run_correct_live_trades, jitter_s=10))
+        logger.info("  ✓ correct_live_trades - 每 15 分钟")
 
         # Paper 已平但关联 live 仍 OPEN 的兜底补平。
         # 只处理 paper_position_id 明确绑定的 live 单，避免误平手工同币种仓位。
         def _run_paper_closed_live_sync():
-            if self._paper_closed_live_sync_running:
-                logger.info("[PaperClosedLiveSync] 上一轮仍在运行，跳过本轮")
-                return
-
-            def wrapper():
-                task_name = 'paper_closed_live_sync'
-                self._paper_closed_live_sync_running = True
-                try:
-                    from app.services.paper_closed_live_sync import run_paper_closed_live_sync
-                    _mysql_cfg = self.config.get("database", {}).get("mysql", {})
-                    stats = run_paper_closed_live_sync(_mysql_cfg, limit=50)
-                    self.task_stats[task_name]['count'] += 1
-                    self.task_stats[task_name]['last_run'] = datetime.now()
-                    self.task_stats[task_name]['last_error'] = None
-                    if stats.get("checked") or stats.get("errors"):
-                        logger.info(f"[PaperClosedLiveSync] 调度完成: {stats}")
-                except Exception as e:
-                    logger.error(f"[PaperClosedLiveSync] 调度异常: {e}", exc_info=True)
-                    self.task_stats[task_name]['last_error'] = str(e)
-                finally:
-                    self._paper_closed_live_sync_running = False
-
-            threading.Thread(
-                target=wrapper,
-                daemon=True,
-                name="PaperClosedLiveSync",
-            ).start()
+            task_name = 'paper_closed_live_sync'
+            try:
+                from app.services.paper_closed_live_sync import run_paper_closed_live_sync
+                _mysql_cfg = self.config.get("database", {}).get("mysql", {})
+                stats = run_paper_closed_live_sync(_mysql_cfg, limit=50)
+                self.task_stats[task_name]['count'] += 1
+                self.task_stats[task_name]['last_run'] = datetime.now()
+                self.task_stats[task_name]['last_error'] = None
+                if stats.get("checked") or stats.get("errors"):
+                    logger.info(f"[PaperClosedLiveSync] 调度完成: {stats}")
+            except Exception as e:
+                self.task_stats[task_name]['last_error'] = str(e)
+                raise
 
-        schedule.every(1).minutes.do(_run_paper_closed_live_sync)
-        _run_paper_closed_live_sync()
-        logger.info("  ✓ paper_closed_live_sync - 每 1 分钟 (后台线程)")
+        schedule.every(1).minutes.do(self._job('paper_closed_live_sync', _run_paper_closed_live_sync))
+        self.runtime.trigger('paper_closed_live_sync')
+        logger.info("  ✓ paper_closed_live_sync - 每 1 分钟")
 
     async def run_initial_collection(self):
         """首次启动时执行一次缓存更新.
@@ -1554,8 +1404,6 @@ class UnifiedDataScheduler:
                 refresh_position_stats,
                 sync_settings_cache,
             )
-            import threading as _t
-
             def _init_cache():
                 logger.info("[data_cache] 首次刷新 market_movers_snapshot (后台)...")
                 refresh_market_movers()
@@ -1569,7 +1417,7 @@ class UnifiedDataScheduler:
                 refresh_position_stats()
                 logger.info("[data_cache] 首次刷新完成")
 
-            _t.Thread(target=_init_cache, daemon=True, name="InitDataCache").start()
+            self.runtime.run_once('data_cache.initial', _init_cache)
         except Exception as e:
             logger.warning(f"[data_cache] 首次刷新失败 (将在定时任务中重试): {e}")
 
@@ -1591,6 +1439,10 @@ class UnifiedDataScheduler:
             logger.info(f"{status} {task_name:20s} | 运行次数: {stats['count']:3d} | "
                        f"最后运行: {last_run}{error}")
 
+        logger.info("-" * 80)
+        logger.info(f"任务运行时 (同步线程池 {self.runtime.sync_workers})")
+        for line in self.runtime.format_metrics():
+            logger.info(line)
         logger.info("=" * 80 + "\n")
 
     def start(self):
@@ -1637,54 +1489,37 @@ class UnifiedDataScheduler:
 
         _realign_ai_next_due()
 
-        # 首次采集 — 后台线程执行, 不阻塞 schedule 主循环
-        self._run_async_in_thread(self.run_initial_collection)
+        # 进程内 K 线缓存 — 后台水合, 完成前 midline/探索扫描自动回落逐币种 SQL
+        def _init_kline_store():
+            try:
+                from app.utils.config_loader import get_db_config
+                from app.services.kline_store import init_kline_store
+                init_kline_store(get_db_config())
+            except Exception as e:
+                logger.error(f"[K线缓存] 初始化失败 (扫描回落 SQL): {e}")
+        self.runtime.run_once('kline_store_init', _init_kline_store)
 
-        # AI 首次启动 — 各任务独立线程触发 (探索错峰, 避免同时打爆 kline_data)
-        def _launch_ai_init_task(name, module_path, func_name, delay_s: int = 15):
-            """在独立后台线程执行一次 AI 初始化任务."""
-            def _run():
-                import time
-                time.sleep(delay_s)
-                try:
-                    import importlib
-                    mod = importlib.import_module(module_path)
-                    func = getattr(mod, func_name)
-                    func(triggered_by='scheduler_init')
-                except Exception as e:
-                    logger.error(f"[{name}] 初始化运行失败: {e}", exc_info=True)
-            threading.Thread(target=_run, daemon=True, name=f"AIInit_{name}").start()
+        # 首次采集 — 在 runtime 事件循环上执行, 不阻塞 schedule 主循环
+        self.runtime.run_once('initial_collection', self.run_initial_collection)
 
-        def _launch_predict_catchup(name: str, module_path: str, func_name: str, delay_s: int):
+        # AI 首次启动 — 各任务一次性 runtime 任务, 按 delay 错峰 (避免同时打爆 kline_data)
+        def _launch_ai_init_task(name, module_path, func_name, delay_s: int = 15,
+                                 triggered_by: str = 'scheduler_init'):
+            """延迟 delay_s 秒执行一次 AI 初始化 / 补跑任务 (等待不占线程)."""
             def _run():
-                import time
-                time.sleep(delay_s)
-                try:
-                    import importlib
-                    mod = importlib.import_module(module_path)
-                    getattr(mod, func_name)(triggered_by='scheduler')
-                except Exception as e:
-                    logger.error(f"[{name}] 启动补跑检查失败: {e}", exc_info=True)
-            threading.Thread(target=_run, daemon=True, name=f"PredictCatchup_{name}").start()
+                import importlib
+                mod = importlib.import_module(module_path)
+                getattr(mod, func_name)(triggered_by=triggered_by)
+            self.runtime.run_once(f"init.{name}", _run, delay_s=delay_s)
 
         _launch_ai_init_task("DeepSeekBig4", "app.services.big4_comprehensive_analyzer", "run_big4_analysis_round_deepseek", 95)
         _launch_ai_init_task("BrainSwing", "app.services.brain_strategy_orchestrator", "run_brain_tick", 75)
         _launch_ai_init_task("DeepSeek探索", "app.services.deepseek_explore_worker", "run_explore_round", 90)
-        _launch_predict_catchup("DeepSeek预测", "app.services.deepseek_predictor", "run_predict_round", 50)
+        _launch_ai_init_task("DeepSeek预测", "app.services.deepseek_predictor", "run_predict_round", 50,
+                             triggered_by='scheduler')
         logger.info("  ✓ scheduler_init: BrainSwing tick +75s / DeepSeek探索 +90s / 预测补跑 +50s (对照期并行)")
 
-        def _launch_rating_catchup(delay_s: int = 60):
-            def _run():
-                import time
-                time.sleep(delay_s)
-                try:
-                    from app.services.rating_refresh_schedule import run_rating_refresh_if_due
-                    run_rating_refresh_if_due(triggered_by="scheduler_init")
-                except Exception as e:
-                    logger.error(f"[评级刷新] 启动补跑检查失败: {e}", exc_info=True)
-            threading.Thread(target=_run, daemon=True, name="RatingCatchup").start()
-
-        _launch_rating_catchup(60)
+        _launch_ai_init_task("评级刷新", "app.services.rating_refresh_schedule", "run_rating_refresh_if_due", 60)
 
         # 模拟盘限价单执行器（做多-0.5%/做空+0.5%，30分钟超时取消）
         def _run_paper_limit_executor():
@@ -1853,19 +1688,13 @@ class UnifiedDataScheduler:
         try:
             logger.info(f"[{datetime.now().strftime('%H:%M:%S')}] 开始更新分析缓存...")
 
-            # 并发更新5个缓存（含价格统计）
-            await asyncio.gather(
-                self.cache_service.update_price_stats_cache(self.symbols),
-                self.cache_service.update_technical_indicators_cache(self.symbols),
-                self.cache_service.update_news_sentiment_aggregation(self.symbols),
-                self.cache_service.update_funding_rate_stats(self.symbols),
-                self.cache_service.update_recommendations_cache(self.symbols),
-                return_exceptions=True
-            )
+            # DAG: 价格统计/技术指标/新闻/资金费率/ETF 并行, 投资建议等它们跑完后直接用内存结果
+            results = await self.cache_service.run_pipeline(self.symbols, ANALYSIS_STAGES)
 
             self.task_stats[task_name]['count'] += 1
             self.task_stats[task_name]['last_run'] = datetime.now()
-            logger.info(f"  ✓ 分析缓存更新完成 (技术指标、新闻情绪、资金费率、投资建议)")
+            self.task_stats[task_name]['stages'] = self.cache_service.last_timings
+            logger.info(f"  ✓ 分析缓存更新完成 ({format_timings(results)})")
 
         except Exception as e:
             logger.error(f"更新分析缓存失败: {e}")
@@ -1898,6 +1727,7 @@ class UnifiedDataScheduler:
 
     def stop(self):
         """停止调度器"""
+        self.runtime.shutdown()
         logger.info("关闭数据库连接...")
         self.db_service.close()
         logger.info("调度器已停止")
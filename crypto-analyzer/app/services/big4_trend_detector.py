@@ -7,15 +7,24 @@
 1. 1H (30根K线): 主导方向判断 (阳阴线数量 + 力度)
 2. 15M (30根K线): 趋势确认 (阳阴线数量 + 力度)
 3. 5M (3根K线): 买卖时机判断 (突破检测)
+
+当前算法 (V3): 15M 16 根阴阳线计数 + 区间涨跌, 紧急干预看 1H.
+四个币种所需 K 线每个周期一条批量查询 (load_klines_bulk, 进程内 K 线缓存命中则不查库),
+15M 计数按 4×16 矩阵一次算完; 结果按 5m 收盘分段缓存 (模块级, 各实例共享), 同一段内重复调用直接返回.
 """
 from app.utils.config_loader import get_db_config
+import copy
 import logging
+import threading
+import time
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Tuple
+import numpy as np
 import pymysql
 from dotenv import load_dotenv
 import os
 from app.database.connection_pool import get_global_pool
+from app.services.kline_store import get_kline_store, load_klines_bulk, timeframe_to_ms
 # 加载环境变量
 load_dotenv()
 
@@ -24,6 +33,14 @@ logger = logging.getLogger(__name__)
 # 四大天王
 BIG4_SYMBOLS = ['BTC/USDT', 'ETH/USDT', 'BNB/USDT', 'SOL/USDT']
 
+BIG4_15M_BARS = 16
+BIG4_1H_BARS = 73                   # 深V检测: 最近 2 根 1H 各自向前看 72 根
+MEMO_EPOCH_MS = 5 * 60 * 1000       # 结果缓存分段: 5m 收盘 (紧急干预过期 / 45 分钟反弹窗口是分钟级时钟)
+MEMO_LATE_RETRY_S = 30              # 本段 15M K 线尚未落库时, 缓存只保留这么久
+
+_memo_lock = threading.Lock()
+_memo: Dict = {'epoch': None, 'result': None, 'complete': False, 'at': 0.0}
+
 
 class Big4TrendDetector:
     """四大天王趋势检测器 (简化版)"""
@@ -73,14 +90,50 @@ class Big4TrendDetector:
             },
             'timestamp': datetime
         }
+
+        同一 5m 段内的重复调用返回缓存结果的副本 (不读 K 线、不重复检测紧急干预);
+        big4_trend_history 仍每次调用写一行, 震荡市 / 市场状态监控按行数统计, 采样密度不变.
         """
-        with self.db_pool.get_connection() as conn:
-            results = self._detect_market_trend_internal(conn)
-        return results
+        now = time.time()
+        now_ms = int(now * 1000)
+        epoch = now_ms // MEMO_EPOCH_MS
+        with _memo_lock:
+            hit = (_memo['result'] is not None and _memo['epoch'] == epoch
+                   and (_memo['complete'] or now - _memo['at'] < MEMO_LATE_RETRY_S))
+            if not hit:
+                with self.db_pool.get_connection() as conn:
+                    bars = self._load_bars(conn)
+                    result = self._detect_market_trend_internal(conn, bars)
+                _memo.update(epoch=epoch, result=result, complete=self._bars_complete(bars, now_ms), at=now)
+            result = copy.deepcopy(_memo['result'])
+
+        # 记录到数据库
+        self._save_to_database(result)
+        return result
+
+    @staticmethod
+    def _load_bars(conn) -> Dict[str, Dict[str, Dict[str, np.ndarray]]]:
+        """四个币种所需 K 线: 每个周期一条批量查询 → {周期: {symbol: 升序列式数组}}"""
+        return {
+            '15m': load_klines_bulk(conn, BIG4_SYMBOLS, '15m', BIG4_15M_BARS),
+            '1h': load_klines_bulk(conn, BIG4_SYMBOLS, '1h', BIG4_1H_BARS),
+        }
 
-    def _detect_market_trend_internal(self, conn) -> Dict:
+    @staticmethod
+    def _bars_complete(bars: Dict, now_ms: int) -> bool:
+        """四个币种最近一根已收盘 15M 都已落库 (否则缓存很快过期, 等 K 线到了重算)"""
+        period = timeframe_to_ms('15m')
+        expected = now_ms // period * period - period
+        return all(
+            s in bars['15m'] and len(bars['15m'][s]['open_time'])
+            and int(bars['15m'][s]['open_time'][-1]) >= expected
+            for s in BIG4_SYMBOLS
+        )
+
+    def _detect_market_trend_internal(self, conn, bars: Dict) -> Dict:
         """Internal method with connection passed as parameter"""
         results = {}
+        analyses = self._analyze_big4(bars['15m'])
 
         # 🔥 权重系统 (2026-02-12调整)
         # BTC是绝对市场领导者，占据主导地位
@@ -101,7 +154,7 @@ class Big4TrendDetector:
         net_weighted_score = 0  # 用于 neutral_bias 计算
 
         for symbol in BIG4_SYMBOLS:
-            analysis = self._analyze_symbol_v2(conn, symbol)
+            analysis = analyses[symbol]
             results[symbol] = analysis
 
             weight = COIN_WEIGHTS.get(symbol, 0.25)  # 默认25%
@@ -128,7 +181,7 @@ class Big4TrendDetector:
             net_weighted_score += analysis.get('raw_score', 0) * weight
 
         # 🔥 紧急干预检测 (在分析完Big4后执行)
-        emergency_intervention = self._detect_emergency_reversal(conn)
+        emergency_intervention = self._detect_emergency_reversal(conn, bars['1h'])
 
         # 🔥 综合判断 - 简化逻辑（2026-02-21）
         # 只看权重，不再要求BTC配合其他币种
@@ -209,9 +262,6 @@ class Big4TrendDetector:
         result['neutral_bias'] = neutral_bias
         result['net_weighted_score'] = net_weighted_score
 
-        # 记录到数据库
-        self._save_to_database(result)
-
         return result
 
     def _detect_choppy_market(self, conn, hours: int = 4) -> Dict:
@@ -320,6 +370,25 @@ class Big4TrendDetector:
             '5m_analysis': kline_5m
         }
 
+    def _fetch_recent_klines(self, cursor, symbol: str, timeframe: str, count: int) -> List[Dict]:
+        """最近 count 根 K 线 (open_time DESC, 索引0最新): 优先进程内 K 线缓存, 未覆盖回落 SQL"""
+        store = get_kline_store()
+        if store is not None:
+            rows = store.get_rows(symbol, timeframe, count)
+            if rows is not None:
+                rows.reverse()
+                return rows
+        cursor.execute("""
+            SELECT open_price, close_price
+            FROM kline_data
+            WHERE symbol = %s
+            AND timeframe = %s
+            AND exchange = 'binance_futures'
+            ORDER BY open_time DESC
+            LIMIT %s
+        """, (symbol, timeframe, count))
+        return cursor.fetchall()
+
     def _analyze_kline_power(self, cursor, symbol: str, timeframe: str, count: int) -> Dict:
         """
         分析K线力度（纯价格版本）
@@ -336,18 +405,7 @@ class Big4TrendDetector:
             'dominant': 'BULL'|'BEAR'|'NEUTRAL'  # 主导方向
         }
         """
-        query = """
-            SELECT open_price, close_price
-            FROM kline_data
-            WHERE symbol = %s
-            AND timeframe = %s
-            AND exchange = 'binance_futures'
-            ORDER BY open_time DESC
-            LIMIT %s
-        """
-
-        cursor.execute(query, (symbol, timeframe, count))
-        klines = cursor.fetchall()
+        klines = self._fetch_recent_klines(cursor, symbol, timeframe, count)
 
         if not klines or len(klines) < count:
             return {
@@ -437,18 +495,7 @@ class Big4TrendDetector:
             'level': str           # 'STRONG' / 'MEDIUM' / 'NEUTRAL'
         }
         """
-        query = """
-            SELECT open_price, close_price
-            FROM kline_data
-            WHERE symbol = %s
-            AND timeframe = %s
-            AND exchange = 'binance_futures'
-            ORDER BY open_time DESC
-            LIMIT %s
-        """
-
-        cursor.execute(query, (symbol, timeframe, count))
-        klines = cursor.fetchall()
+        klines = self._fetch_recent_klines(cursor, symbol, timeframe, count)
 
         if not klines or len(klines) < count:
             return {
@@ -960,38 +1007,36 @@ class Big4TrendDetector:
         return {'score': score, 'level': level, 'change': change,
                 'reason': f'4H动量{change:+.2f}%({level})'}
 
-    def _analyze_symbol_v2(self, conn, symbol: str) -> Dict:
+    def _analyze_big4(self, bars_15m: Dict[str, Dict[str, np.ndarray]]) -> Dict[str, Dict]:
+        """V3 四个币种一次算完: 最近 16 根 15M 拼成 4×16 矩阵, 阴线数 / 区间涨跌按行向量化"""
+        ready = [s for s in BIG4_SYMBOLS
+                 if s in bars_15m and len(bars_15m[s]['open']) >= BIG4_15M_BARS]
+        out = {
+            s: {
+                'signal': 'NEUTRAL', 'strength': 0, 'raw_score': 0,
+                'reason': '15M数据不足',
+                '1h_analysis': {'dominant': 'NEUTRAL'},
+                '15m_analysis': {'dominant': 'NEUTRAL'},
+            }
+            for s in BIG4_SYMBOLS if s not in ready
+        }
+        if ready:
+            opens = np.vstack([bars_15m[s]['open'][-BIG4_15M_BARS:] for s in ready])
+            closes = np.vstack([bars_15m[s]['close'][-BIG4_15M_BARS:] for s in ready])
+            bearish = (closes < opens).sum(axis=1)
+            # 最旧K线开盘 → 最新K线收盘
+            change = (closes[:, -1] - opens[:, 0]) / opens[:, 0] * 100
+            for s, b, c in zip(ready, bearish.tolist(), change.tolist()):
+                out[s] = self._analyze_symbol_v2(s, b, c)
+        return out
+
+    def _analyze_symbol_v2(self, symbol: str, bearish_count: int, price_change_pct: float) -> Dict:
         """
         V3单币分析：16根15M K线阴阳线计数 + 区间价格涨跌幅
         BEARISH: 阴线数>=10 且 区间跌幅>0.5%
         BULLISH: 阳线数>=10 且 区间涨幅>0.5%
         NEUTRAL: 其余
         """
-        cursor = conn.cursor(pymysql.cursors.DictCursor)
-        cursor.execute("""
-            SELECT open_price, close_price
-            FROM kline_data
-            WHERE symbol = %s AND timeframe = '15m' AND exchange = 'binance_futures'
-            ORDER BY open_time DESC
-            LIMIT 16
-        """, (symbol,))
-        klines = cursor.fetchall()
-        cursor.close()
-
-        if not klines or len(klines) < 16:
-            return {
-                'signal': 'NEUTRAL', 'strength': 0, 'raw_score': 0,
-                'reason': '15M数据不足',
-                '1h_analysis': {'dominant': 'NEUTRAL'},
-                '15m_analysis': {'dominant': 'NEUTRAL'},
-            }
-
-        # klines 按 open_time DESC，索引0最新，索引15最旧
-        first_open  = float(klines[15]['open_price'])   # 最旧K线开盘
-        last_close  = float(klines[0]['close_price'])   # 最新K线收盘
-        price_change_pct = (last_close - first_open) / first_open * 100
-
-        bearish_count = sum(1 for k in klines if float(k['close_price']) < float(k['open_price']))
         bullish_count = 16 - bearish_count
 
         # BTC 是市场领头羊，阳线数量比价格涨幅更能反映趋势，放宽 BULLISH/BEARISH 阈值
@@ -1040,10 +1085,12 @@ class Big4TrendDetector:
 
     # ─────────────────────────────────────────────────────────────────
 
-    def _detect_emergency_reversal(self, conn) -> Dict:
+    def _detect_emergency_reversal(self, conn, bars_1h: Dict[str, Dict[str, np.ndarray]]) -> Dict:
         """
         🔥 检测紧急底部/顶部反转 - 避免死猫跳陷阱
 
+        bars_1h: 四个币种最近 BIG4_1H_BARS 根 1H (升序列式数组, _load_bars 批量读取)
+
         双重检测逻辑:
         【方法1】1H级别检测 (长周期):
         - 检测最近4小时的剧烈波动 (跌幅>5% 或 涨幅>5%)
@@ -1121,20 +1168,10 @@ class Big4TrendDetector:
                 # 检查Big4是否已经反弹完成（反弹超过2%）
                 market_recovered = True
                 for symbol in BIG4_SYMBOLS:
-                    cursor.execute("""
-                        SELECT open_price, close_price, low_price, high_price
-                        FROM kline_data
-                        WHERE symbol = %s
-                        AND timeframe = '1h'
-                        AND exchange = 'binance_futures'
-                        ORDER BY open_time DESC
-                        LIMIT 4
-                    """, (symbol,))
-
-                    recent_klines = cursor.fetchall()
-                    if recent_klines:
-                        period_low = min([float(k['low_price']) for k in recent_klines])
-                        latest_close = float(recent_klines[0]['close_price'])
+                    h1 = bars_1h.get(symbol)
+                    if h1 is not None and len(h1['close']):
+                        period_low = float(h1['low'][-4:].min())
+                        latest_close = float(h1['close'][-1])
                         recovery_pct = (latest_close - period_low) / period_low * 100
 
                         # 如果任一币种未完成2%反弹，认为市场尚未恢复
@@ -1151,20 +1188,10 @@ class Big4TrendDetector:
             if not active_bounce_window and top_detected:
                 market_cooled = True
                 for symbol in BIG4_SYMBOLS:
-                    cursor.execute("""
-                        SELECT open_price, close_price, low_price, high_price
-                        FROM kline_data
-                        WHERE symbol = %s
-                        AND timeframe = '1h'
-                        AND exchange = 'binance_futures'
-                        ORDER BY open_time DESC
-                        LIMIT 4
-                    """, (symbol,))
-
-                    recent_klines = cursor.fetchall()
-                    if recent_klines:
-                        period_high = max([float(k['high_price']) for k in recent_klines])
-                        latest_close = float(recent_klines[0]['close_price'])
+                    h1 = bars_1h.get(symbol)
+                    if h1 is not None and len(h1['close']):
+                        period_high = float(h1['high'][-4:].max())
+                        latest_close = float(h1['close'][-1])
                         cooldown_pct = (latest_close - period_high) / period_high * 100
 
                         # 如果任一币种未完成3%回调，认为市场尚未冷却
@@ -1235,27 +1262,20 @@ class Big4TrendDetector:
         bounce_window_end = None
 
         for symbol in BIG4_SYMBOLS:
+            h1 = bars_1h.get(symbol)
+            if h1 is None:
+                continue
             # ========== 方法1: 1H级别长周期检测 ==========
-            # 获取N小时前和当前的价格
-            cursor.execute("""
-                SELECT open_price, close_price, low_price, high_price, open_time
-                FROM kline_data
-                WHERE symbol = %s
-                AND timeframe = '1h'
-                AND exchange = 'binance_futures'
-                AND open_time >= %s
-                ORDER BY open_time ASC
-            """, (symbol, hours_ago_timestamp))
-
-            klines = cursor.fetchall()
-
-            if not klines or len(klines) < 2:
+            # N小时前至今的 1H K线
+            window = h1['open_time'] >= hours_ago_timestamp
+
+            if window.sum() < 2:
                 continue
 
             # 计算期间的最高价和最低价
-            period_high = max([float(k['high_price']) for k in klines])
-            period_low = min([float(k['low_price']) for k in klines])
-            latest_close = float(klines[-1]['close_price'])
+            period_high = float(h1['high'][window].max())
+            period_low = float(h1['low'][window].min())
+            latest_close = float(h1['close'][window][-1])
 
             # 从最高点到最低点的跌幅
             drop_pct = (period_low - period_high) / period_high * 100
@@ -1278,24 +1298,13 @@ class Big4TrendDetector:
                 max_rise = max(max_rise, rise_pct)
 
             # ========== 方法2: 15M深V反转检测 ==========
-            # 检测最近2根1H K线的长下影线 + 后续15M连续阳线
-            cursor.execute("""
-                SELECT open_price, close_price, low_price, high_price, open_time
-                FROM kline_data
-                WHERE symbol = %s
-                AND timeframe = '1h'
-                AND exchange = 'binance_futures'
-                ORDER BY open_time DESC
-                LIMIT 2
-            """, (symbol,))
-
-            recent_1h = cursor.fetchall()
-
-            for h1_candle in recent_1h:
-                open_p = float(h1_candle['open_price'])
-                close_p = float(h1_candle['close_price'])
-                high_p = float(h1_candle['high_price'])
-                low_p = float(h1_candle['low_price'])
+            # 检测最近2根1H K线的长下影线 + 后续15M连续阳线 (最新在前)
+            n = len(h1['open_time'])
+            for idx in range(n - 1, max(n - 3, -1), -1):
+                open_p = float(h1['open'][idx])
+                close_p = float(h1['close'][idx])
+                high_p = float(h1['high'][idx])
+                low_p = float(h1['low'][idx])
 
                 # 计算下影线长度
                 body_low = min(open_p, close_p)
@@ -1304,32 +1313,22 @@ class Big4TrendDetector:
                 # 🔥 检测长下影线 = 潜在反弹交易机会
                 if lower_shadow_pct >= self.LOWER_SHADOW_THRESHOLD:
                     # 计算1H K线的时间
-                    h1_ts = int(h1_candle['open_time']) / 1000 if int(h1_candle['open_time']) > 9999999999 else int(h1_candle['open_time'])
+                    h1_open_time = int(h1['open_time'][idx])
+                    h1_ts = h1_open_time / 1000 if h1_open_time > 9999999999 else h1_open_time
                     h1_time = datetime.fromtimestamp(h1_ts)
                     time_since_candle = (datetime.now() - h1_time).total_seconds() / 60  # 分钟
 
                     # 🎯 大周期过滤: 检查前72H是否持续下跌 (避免震荡市假信号)
-                    cursor_check = conn.cursor(pymysql.cursors.DictCursor)
-                    cursor_check.execute("""
-                        SELECT high_price, low_price, open_time
-                        FROM kline_data
-                        WHERE symbol = %s
-                        AND timeframe = '1h'
-                        AND exchange = 'binance_futures'
-                        AND open_time <= %s
-                        ORDER BY open_time DESC
-                        LIMIT 72
-                    """, (symbol, h1_candle['open_time']))
-
-                    history_72h = cursor_check.fetchall()
-                    cursor_check.close()
+                    # 该K线及之前的72根 (含自身), 倒序: 索引0为该K线
+                    lo = max(idx - 71, 0)
+                    highs_72h = h1['high'][lo:idx + 1][::-1]
 
                     is_true_deep_v = False
 
-                    if len(history_72h) >= 24:  # 至少需要24H数据
+                    if len(highs_72h) >= 24:  # 至少需要24H数据
                         # 计算72H和24H的最高点
-                        high_72h = max([float(k['high_price']) for k in history_72h])
-                        high_24h = max([float(k['high_price']) for k in history_72h[:24]])
+                        high_72h = float(highs_72h.max())
+                        high_24h = float(highs_72h[:24].max())
 
                         # 从高点到当前低点的跌幅
                         drop_from_high_72h = (low_p - high_72h) / high_72h * 100
@@ -1345,12 +1344,10 @@ class Big4TrendDetector:
                         # 检查24H内是否首次出现长下影线（如果启用检查）
                         is_first_bottom = True
                         if self.CHECK_FIRST_BOTTOM:
-                            for prev_k in history_72h[:24]:
-                                if prev_k['open_time'] == h1_candle['open_time']:
-                                    continue  # 跳过当前K线
-                                prev_open = float(prev_k.get('open_price', 0)) if 'open_price' in prev_k else 0
-                                prev_close = float(prev_k.get('close_price', 0)) if 'close_price' in prev_k else 0
-                                prev_low = float(prev_k['low_price'])
+                            for j in range(idx - 1, max(idx - 24, -1), -1):  # 跳过当前K线
+                                prev_open = float(h1['open'][j])
+                                prev_close = float(h1['close'][j])
+                                prev_low = float(h1['low'][j])
                                 if prev_open > 0 and prev_close > 0:
                                     prev_body_low = min(prev_open, prev_close)
                                     prev_shadow = (prev_body_low - prev_low) / prev_low * 100 if prev_low > 0 else 0
@@ -1412,25 +1409,15 @@ class Big4TrendDetector:
                     cursor_write = conn_write.cursor()
 
                     for symbol in bounce_symbols:
-                        # 获取该币种的1H K线信息
-                        cursor_write.execute("""
-                        SELECT open_price, close_price, low_price, high_price, open_time
-                        FROM kline_data
-                        WHERE symbol = %s
-                        AND timeframe = '1h'
-                        AND exchange = 'binance_futures'
-                        ORDER BY open_time DESC
-                        LIMIT 1
-                        """, (symbol,))
-
-                        h1_data = cursor_write.fetchone()
-                        if not h1_data:
+                        # 该币种最新1H K线
+                        h1 = bars_1h.get(symbol)
+                        if h1 is None or not len(h1['open_time']):
                             continue
 
-                        open_p = float(h1_data[0])
-                        close_p = float(h1_data[1])
-                        low_p = float(h1_data[2])
-                        h1_open_time = h1_data[4]
+                        open_p = float(h1['open'][-1])
+                        close_p = float(h1['close'][-1])
+                        low_p = float(h1['low'][-1])
+                        h1_open_time = int(h1['open_time'][-1])
 
                         body_low = min(open_p, close_p)
                         lower_shadow_pct = (body_low - low_p) / low_p * 100 if low_p > 0 else 0
@@ -23,6 +23,9 @@ K 线 (get_klines):
 
 资金费率 / premiumIndex 走 60 秒后台批量拉取。
 
+跨进程: hub 把 ticker / premiumIndex / WS 价格同步写入共享价格表 (shared_price_table),
+其他进程的 HubHttpProxy 先查这张 mmap 表 (~1µs), 未命中 / 过期才走 HTTP.
+
 注意: 本模块设计为 main.py 启动时 init_global_data_hub() 一次, 之后所有
 业务代码通过 get_global_data_hub() 拿单例。
 """
@@ -36,9 +39,11 @@ from decimal import Decimal
 from typing import Any, Dict, List, Optional, Tuple
 
 import aiohttp
+import numpy as np
 import requests
 from loguru import logger
 
+from app.services.shared_price_table import SharedPriceReader, SharedPriceTable
 from app.utils.binance_rate_guard import parse_ban_msg, rate_guard
 
 
@@ -91,6 +96,9 @@ class BinanceDataHub:
     # 全市场刷新周期 (秒) - 60s 是设计目标, 见模块 docstring
     PERIODIC_FETCH_INTERVAL = 60
 
+    # WS 价格 → 共享价格表的转发周期 (秒), 与 markPrice@1s 推送同频
+    SHARED_PUBLISH_INTERVAL = 1.0
+
     # 进程内 K 线缓存 TTL (秒)
     KLINE_CACHE_TTL = {
         "5m": 300,
@@ -123,8 +131,13 @@ class BinanceDataHub:
 
         # 异步后台任务
         self._fetch_task: Optional[asyncio.Task] = None
+        self._publish_task: Optional[asyncio.Task] = None
         self._stop = False
 
+        # 跨进程共享价格表 (start 时打开), 及已转发的 WS 更新时间 (monotonic)
+        self._shared_table: Optional[SharedPriceTable] = None
+        self._shared_ws_mark = float("-inf")
+
         # 异步 session 复用 (用于业务侧 async get_price 路径)
         self._aiohttp_session: Optional[aiohttp.ClientSession] = None
 
@@ -154,15 +167,26 @@ class BinanceDataHub:
         self._stop = False
         self._fetch_task = asyncio.create_task(self._periodic_fetch_loop())
         logger.info("[DataHub] 后台拉取任务已启动")
+        try:
+            self._shared_table = SharedPriceTable.open_writer()
+            self._publish_task = asyncio.create_task(self._shared_publish_loop())
+            logger.info(f"[DataHub] 共享价格表: {self._shared_table.path}")
+        except Exception as e:
+            self._shared_table = None
+            logger.warning(f"[DataHub] 共享价格表打开失败, 其他进程仍走 HTTP: {e}")
 
     async def stop(self) -> None:
         self._stop = True
-        if self._fetch_task:
-            self._fetch_task.cancel()
-            try:
-                await self._fetch_task
-            except (asyncio.CancelledError, Exception):
-                pass
+        for task in (self._fetch_task, self._publish_task):
+            if task:
+                task.cancel()
+                try:
+                    await task
+                except (asyncio.CancelledError, Exception):
+                    pass
+        if self._shared_table is not None:
+            self._shared_table.close()
+            self._shared_table = None
         if self._aiohttp_session and not self._aiohttp_session.closed:
             await self._aiohttp_session.close()
         if self._sync_session is not None:
@@ -620,6 +644,8 @@ class BinanceDataHub:
 
         now = time.time()
         added = 0
+        shared_syms: List[str] = []
+        shared_prices: List[float] = []
         with self._cache_lock:
             for item in data:
                 if not isinstance(item, dict):
@@ -635,7 +661,11 @@ class BinanceDataHub:
                 except Exception:
                     continue
                 self._ticker_cache[sym] = {"price": dec, "ts": now, "source": source}
+                shared_syms.append(sym)
+                shared_prices.append(float(dec))
                 added += 1
+        if source == "fapi":
+            self._publish_shared("ticker", shared_syms, shared_prices, now)
         logger.debug(f"[DataHub] {source} ticker 缓存刷新 {added} 个 symbol")
 
     async def _fetch_all_premium_index_fapi(self) -> None:
@@ -668,6 +698,9 @@ class BinanceDataHub:
             return
 
         now = time.time()
+        shared_syms: List[str] = []
+        shared_marks: List[float] = []
+        shared_funding: List[Optional[float]] = []
         with self._cache_lock:
             for item in data:
                 if not isinstance(item, dict):
@@ -688,6 +721,58 @@ class BinanceDataHub:
                     "ts": now,
                     "source": source,
                 }
+                shared_syms.append(sym)
+                shared_marks.append(float(mp_dec))
+                shared_funding.append(float(fr_dec) if fr_dec is not None else None)
+        if source == "fapi":
+            self._publish_shared("mark", shared_syms, shared_marks, now, funding=shared_funding)
+
+    # -------------------------------------------------------------------
+    # 共享价格表 (跨进程)
+    # -------------------------------------------------------------------
+
+    def _publish_shared(self, kind: str, symbols: List[str], prices: List[float], ts: float,
+                        funding: Optional[List[Optional[float]]] = None) -> None:
+        table = self._shared_table
+        if table is None or not symbols:
+            return
+        try:
+            table.write_many(kind, symbols, prices, ts, funding=funding)
+        except Exception as e:
+            logger.debug(f"[DataHub] 共享价格表写入失败 ({kind}): {e}")
+
+    def _publish_ws_prices(self) -> int:
+        """把 WS 价格池里上次转发之后更新过的价格写入共享表 (时间换算成 time.time())"""
+        ws = self._get_ws_futures()
+        if ws is None or not hasattr(ws, "snapshot_arrays"):
+            return 0
+        symbols, prices, mono_ts = ws.snapshot_arrays()
+        fresh = np.flatnonzero((mono_ts > self._shared_ws_mark) & (prices > 0))
+        if not len(fresh):
+            return 0
+        mono_now, wall_now = time.monotonic(), time.time()
+        self._shared_ws_mark = float(mono_ts[fresh].max())
+        self._publish_shared(
+            "ws",
+            [symbols[i].replace("/", "").upper() for i in fresh],
+            prices[fresh],
+            wall_now - (mono_now - mono_ts[fresh]),
+        )
+        return len(fresh)
+
+    async def _shared_publish_loop(self) -> None:
+        """每秒转发 WS 价格并写心跳 (ticker / premiumIndex 在拉取时直接写入)"""
+        while not self._stop:
+            try:
+                self._publish_ws_prices()
+                if self._shared_table is not None:
+                    self._shared_table.heartbeat()
+            except Exception as e:
+                logger.debug(f"[DataHub] 共享价格表转发异常: {e}")
+            try:
+                await asyncio.sleep(self.SHARED_PUBLISH_INTERVAL)
+            except asyncio.CancelledError:
+                break
 
     # -------------------------------------------------------------------
     # L3/L4 兜底实现
@@ -874,11 +959,13 @@ class BinanceDataHub:
         try:
             dec = Decimal(str(target["price"]))
             if dec > 0:
+                now = time.time()
                 with self._cache_lock:
                     self._ticker_cache[symbol_clean] = {
-                        "price": dec, "ts": time.time(),
+                        "price": dec, "ts": now,
                         "source": "fapi",
                     }
+                self._publish_shared("ticker", [symbol_clean], [float(dec)], now)
                 return dec
         except Exception:
             return None
@@ -924,6 +1011,7 @@ class BinanceDataHub:
                         "ts": now,
                         "source": "fapi",
                     }
+                self._publish_shared("mark", [symbol_clean], [float(dec)], now, funding=[None])
                 return dec
         except Exception:
             return None
@@ -961,11 +1049,13 @@ class BinanceDataHub:
         try:
             dec = Decimal(str(target["price"]))
             if dec > 0:
+                now = time.time()
                 with self._cache_lock:
                     self._ticker_cache[symbol_clean] = {
-                        "price": dec, "ts": time.time(),
+                        "price": dec, "ts": now,
                         "source": "fapi",
                     }
+                self._publish_shared("ticker", [symbol_clean], [float(dec)], now)
                 return dec
         except Exception:
             return None
@@ -1128,8 +1218,9 @@ class BinanceDataHub:
 #   HTTP 请求异常 / 5xx / hub 未初始化 -> 返回 None (业务侧已有 DB 兜底).
 #
 # 性能:
-#   一次 HTTP 跳转 (localhost:9020) 约 1-5ms, 比直接打币安 (50-200ms) 快.
-#   高频热点路径建议优先 WS, REST 路径走代理可接受.
+#   价格 / 资金费率先查 hub 写入的共享价格表 (mmap, ~1µs, API 进程忙也不受影响),
+#   未命中 / 过期才走一次 HTTP 跳转 (localhost:9020, 1-5ms, 忙时可到超时).
+#   K 线与通用 REST 仍走 HTTP.
 
 class HubHttpProxy:
     """跨进程访问 main.py 进程的 hub. 接口与 BinanceDataHub 鸭子类型一致."""
@@ -1137,11 +1228,31 @@ class HubHttpProxy:
     DEFAULT_API_BASE = "http://localhost:9020"
     SYNC_TIMEOUT = 3.0
     ASYNC_TIMEOUT = 5.0
+    # 共享表心跳超过该秒数视为 hub 不在, 全表快照类接口回落 HTTP
+    SHARED_MAP_MAX_AGE = 30.0
 
-    def __init__(self, api_base: Optional[str] = None) -> None:
+    def __init__(self, api_base: Optional[str] = None, shared_table_path: Optional[str] = None) -> None:
         self.api_base = (api_base or self.DEFAULT_API_BASE).rstrip("/")
         self._aio_session: Optional[aiohttp.ClientSession] = None
         self._sync_session: Optional[requests.Session] = None
+        self._shared = SharedPriceReader(shared_table_path)
+
+    def _shared_price(self, symbol: str, max_age_seconds: int, kinds) -> Optional[Decimal]:
+        """共享价格表取价 (与 hub 同优先级); 币本位 / 未挂载 / 过期返回 None"""
+        if symbol.endswith("/USD") and not symbol.endswith("/USDT"):
+            return None
+        table = self._shared.table()
+        if table is None:
+            return None
+        p = table.price(symbol.replace("/", "").upper(), max_age_seconds, kinds)
+        return Decimal(str(p)) if p is not None else None
+
+    def _shared_live_table(self) -> Optional[SharedPriceTable]:
+        table = self._shared.table()
+        if table is None:
+            return None
+        age = table.writer_age()
+        return table if age is not None and age <= self.SHARED_MAP_MAX_AGE else None
 
     async def _get_aio(self) -> aiohttp.ClientSession:
         if self._aio_session is None or self._aio_session.closed:
@@ -1210,6 +1321,9 @@ class HubHttpProxy:
     async def get_price(
         self, symbol: str, max_age_seconds: int = 90, allow_rest_fallback: bool = True
     ) -> Optional[Decimal]:
+        shared = self._shared_price(symbol, max_age_seconds, ("ws", "ticker"))
+        if shared is not None:
+            return shared
         sym = symbol.replace("/", "%2F")
         data = await self._aget(
             f"/api/datahub/price/{sym}",
@@ -1223,6 +1337,9 @@ class HubHttpProxy:
     def get_price_sync(
         self, symbol: str, max_age_seconds: int = 90, allow_rest_fallback: bool = True
     ) -> Optional[Decimal]:
+        shared = self._shared_price(symbol, max_age_seconds, ("ws", "ticker"))
+        if shared is not None:
+            return shared
         sym = symbol.replace("/", "%2F")
         data = self._sget(
             f"/api/datahub/price/{sym}",
@@ -1240,6 +1357,9 @@ class HubHttpProxy:
         allow_rest_fallback: bool = True,
         allow_db_fallback: bool = True,
     ) -> Optional[Decimal]:
+        shared = self._shared_price(symbol, max_age_seconds, ("ws", "mark", "ticker"))
+        if shared is not None:
+            return shared
         sym = symbol.replace("/", "%2F")
         data = self._sget(
             f"/api/datahub/trade-price/{sym}",
@@ -1292,13 +1412,20 @@ class HubHttpProxy:
     async def get_prices_batch(
         self, symbols: List[str], max_age_seconds: int = 90
     ) -> Dict[str, Decimal]:
+        out: Dict[str, Decimal] = {}
+        for sym in symbols:
+            p = self._shared_price(sym, max_age_seconds, ("ws", "ticker"))
+            if p is not None:
+                out[sym] = p
+        missing = [s for s in symbols if s not in out]
+        if not missing:
+            return out
         data = await self._apost(
             "/api/datahub/prices/batch",
-            {"symbols": symbols, "max_age_seconds": max_age_seconds},
+            {"symbols": missing, "max_age_seconds": max_age_seconds},
         )
         if not data:
-            return {}
-        out: Dict[str, Decimal] = {}
+            return out
         for k, v in (data.get("prices") or {}).items():
             try:
                 out[k] = Decimal(v)
@@ -1340,18 +1467,29 @@ class HubHttpProxy:
         return out
 
     def get_full_ticker_map(self, market: str = "futures") -> Dict[str, Decimal]:
+        table = self._shared_live_table() if market == "futures" else None
+        if table is not None:
+            return {k: Decimal(str(v)) for k, v in table.price_map("ticker").items()}
         data = self._sget("/api/datahub/ticker_map", {"market": market})
         if not data:
             return {}
         return {k: Decimal(v) for k, v in (data.get("prices") or {}).items()}
 
     def get_premium_index_map(self, market: str = "futures") -> Dict[str, Decimal]:
+        table = self._shared_live_table() if market == "futures" else None
+        if table is not None:
+            return {k: Decimal(str(v)) for k, v in table.price_map("mark").items()}
         data = self._sget("/api/datahub/premium_map", {"market": market})
         if not data:
             return {}
         return {k: Decimal(v) for k, v in (data.get("mark_prices") or {}).items()}
 
     def get_funding_rate_sync(self, symbol: str) -> Optional[Decimal]:
+        table = self._shared_live_table()
+        if table is not None:
+            fr = table.funding_rate(symbol.replace("/", "").upper())
+            if fr is not None:
+                return Decimal(str(fr))
         sym = symbol.replace("/", "%2F")
         data = self._sget(f"/api/datahub/funding_rate/{sym}")
         if not data:
@@ -8,7 +8,12 @@ Binance WebSocket K线采集器
 - 多个 WS 连接, 按"市场 + 周期"分片
   Phase 1: 仅 U本位 5m + 15m, ~500 streams, 2-3 个连接
   后续扩展: 加 1h/1d
-- 只处理 k.x == true (K 线 closed) 的消息, 进行中的 K 线丢弃
+- 高密度模式 (dense=True): 各周期混合, 每连接 DENSE_STREAMS_PER_CONN 个 streams,
+  SUBSCRIBE 分帧发送; 5m+15m 约 3 个连接 (默认模式约 34 个)
+- 只处理 k.x == true (K 线 closed) 的消息, 进行中的 K 线丢弃 (不做 JSON 解析)
+- closed K 线直接构造成 KlineRow (save_klines 的参数元组), 进 deque 环形 buffer
+- 高周期本地合成 (derived): 只订阅 5m, 15m/1h/4h/1d 由 CandleAggregator 随 5m 收盘合成,
+  与 5m 同批落盘; REST hydration / 回填也只拉 5m, 之后由 kline_storage 从库里重算高周期补缺
 - 启动顺序: 连 WS (进 buffer) -> REST hydration -> drain buffer 落盘
 - 落盘用 run_in_executor 隔离, 不阻塞 WS event loop
 - 重连指数退避, 上限 60s
@@ -21,22 +26,33 @@ from __future__ import annotations
 import asyncio
 import json
 import time
-from typing import Awaitable, Callable, Optional
+from collections import deque
+from datetime import datetime
+from typing import Callable, Optional, Sequence
 
 import websockets
 from loguru import logger
 
+from app.collectors.smart_futures_collector import KlineRow
+from app.services.candle_aggregator import CandleAggregator
+from app.services.kline_store import get_kline_store, timeframe_to_ms
+from app.services.streaming_indicators import STREAM_TIMEFRAMES, init_streaming_indicators
+from app.services.price_stats_aggregator import TIMEFRAME as PRICE_STATS_TIMEFRAME, init_price_stats_aggregator
+
 
 WS_BASE_USDT = "wss://fstream.binance.com/stream"
 
 MAX_STREAMS_PER_CONN = 15
                                     # 5m+15m × 249 symbols / 15 ≈ 34 连接, 在 300/IP 上限内安全
+DENSE_STREAMS_PER_CONN = 200        # 高密度模式: U本位单连接上限 200 streams
+SUBSCRIBE_PARAMS_PER_FRAME = 50     # 单个 SUBSCRIBE 帧的 streams 数
+SUBSCRIBE_FRAME_INTERVAL_S = 0.25   # 帧间隔, 低于 10 条/s 的入站消息限制
 SUBSCRIBE_RATE_PER_SEC = 5          # 币安建连速率限制
 PING_INTERVAL = 20                  # 主动 ping 间隔
 PING_TIMEOUT = 10                   # ping 超时
 RECONNECT_BACKOFF_BASE_S = 5        # 重连基础退避
 RECONNECT_BACKOFF_MAX_S = 60        # 重连退避上限
-BUFFER_MAX_SIZE = 5000              # WS buffer 上限, 防内存爆炸
+BUFFER_MAX_SIZE = 5000              # WS 环形 buffer 容量, 满了覆盖最旧的
 DB_FLUSH_INTERVAL_S = 1.0           # batch flush 间隔
 HEALTH_STALE_THRESHOLD_S = 120      # 健康检查阈值 (报告用)
 WS_RECV_TIMEOUT_S = 60              # 单次 recv 超时 — 60s 无消息视为僵尸 (2026-05-26: 从 30 回到 60)
@@ -60,10 +76,13 @@ BACKFILL_LOOKBACK_MINUTES = {        # REST 回填拉多少分钟历史
     '15m': 120,
     '1h': 360,
 }
+HYDRATION_LIMIT_5M = 200            # 启动 hydration 的 5m 根数 (高周期随后由库里重算)
+
 
+EXCHANGE = 'binance_futures'
 
-# WS 消息回调签名: (symbol: str, interval: str, kline_dict: dict, market: str) -> Awaitable[None]
-OnKlineClosed = Callable[[str, str, dict, str], Awaitable[None]]
+# WS 消息回调签名: (row: KlineRow) -> None, 在 event loop 内同步调用
+OnKlineClosed = Callable[[KlineRow], None]
 
 
 class WSKlineConnection:
@@ -124,13 +143,8 @@ class WSKlineConnection:
                     ping_interval=PING_INTERVAL,
                     ping_timeout=PING_TIMEOUT,
                 ) as ws:
-                    # 发送 SUBSCRIBE 帧
-                    sub_msg = json.dumps({
-                        "method": "SUBSCRIBE",
-                        "params": self.streams,
-                        "id": int(time.time()),
-                    })
-                    await ws.send(sub_msg)
+                    # 发送 SUBSCRIBE 帧 (streams 多时分帧, 避开入站消息速率限制)
+                    await self._subscribe(ws)
                     self.connected_at = time.time()
                     self.last_msg_at = time.time()
                     backoff = RECONNECT_BACKOFF_BASE_S
@@ -156,7 +170,7 @@ class WSKlineConnection:
                             break
                         self.last_msg_at = time.time()
                         consecutive_stale = 0
-                        await self._handle_msg(msg)
+                        self._handle_msg(msg)
             except (websockets.ConnectionClosed, OSError) as e:
                 logger.warning(f"[{self.name}] WS 断开: {e.__class__.__name__}: {e}, {backoff}s 后重连")
             except asyncio.CancelledError:
@@ -166,8 +180,23 @@ class WSKlineConnection:
             await asyncio.sleep(backoff)
             backoff = min(backoff * 2, RECONNECT_BACKOFF_MAX_S)
 
-    async def _handle_msg(self, msg: str | bytes) -> None:
+    async def _subscribe(self, ws) -> None:
+        """按 SUBSCRIBE_PARAMS_PER_FRAME 分帧订阅"""
+        base_id = int(time.time())
+        for n, i in enumerate(range(0, len(self.streams), SUBSCRIBE_PARAMS_PER_FRAME)):
+            if n:
+                await asyncio.sleep(SUBSCRIBE_FRAME_INTERVAL_S)
+            await ws.send(json.dumps({
+                "method": "SUBSCRIBE",
+                "params": self.streams[i:i + SUBSCRIBE_PARAMS_PER_FRAME],
+                "id": base_id + n,
+            }))
+
+    def _handle_msg(self, msg: str | bytes) -> None:
         """解析 WS 消息, 只对 k.x == true (closed) 的回调"""
+        # 进行中的 K 线 (99% 消息) 不做 JSON 解析直接丢弃
+        if (b'"x":false' if isinstance(msg, bytes) else '"x":false') in msg:
+            return
         try:
             data = json.loads(msg)
             # 忽略 SUBSCRIBE 帧的确认消息: {"result": null, "id": N}
@@ -180,27 +209,20 @@ class WSKlineConnection:
             # combined stream 格式: {"stream":..., "data":{...}}; 也兼容 raw 格式直接 {...}
             k = data.get('data', {}).get('k') if 'data' in data else data.get('k')
             if not k or not k.get('x'):
-                # 不是 closed K 线, 直接丢弃 (99% 消息走这里)
                 return
             self.last_closed_at = time.time()
-            symbol = k['s']
-            interval = k['i']
-            kline = {
-                'open_time': int(k['t']),
-                'close_time': int(k['T']),
-                'open': k['o'],
-                'high': k['h'],
-                'low': k['l'],
-                'close': k['c'],
-                'volume': k['v'],
-                'quote_volume': k['q'],
-                'trades': int(k['n']),
-                'taker_buy_base': k['V'],
-                'taker_buy_quote': k['Q'],
-            }
-            await self.on_kline_closed(symbol, interval, kline, self.market)
-        except (json.JSONDecodeError, KeyError, ValueError) as e:
+            open_time = int(k['t'])
+            row = KlineRow(
+                f"{k['s'][:-4]}/USDT", EXCHANGE, k['i'], open_time, int(k['T']),
+                datetime.utcfromtimestamp(open_time / 1000),
+                float(k['o']), float(k['h']), float(k['l']), float(k['c']),
+                float(k['v']), float(k['q']), int(k['n']),
+                float(k['V']), float(k['Q']),
+            )
+        except (json.JSONDecodeError, KeyError, ValueError, TypeError) as e:
             logger.error(f"[{self.name}] WS 消息解析失败: {e}")
+            return
+        self.on_kline_closed(row)
 
 
 class WSKlineCollector:
@@ -211,23 +233,37 @@ class WSKlineCollector:
         db_config: dict,
         usdt_symbols: list[str],
         intervals: list[str],
+        indicator_config: Optional[dict] = None,
+        dense: bool = False,
+        derived: Sequence[str] = (),
     ) -> None:
         """
         Args:
             db_config: MySQL 连接配置
             usdt_symbols: U本位 symbols (Binance 格式, 如 ['BTCUSDT', ...])
             intervals: K线周期列表 (如 ['5m', '15m'])
+            indicator_config: config.yaml 的 indicators 段 (流式指标参数)
+            dense: 高密度模式, 各周期混合, 每连接 DENSE_STREAMS_PER_CONN 个 streams
+            derived: 由 5m 本地合成的周期 (如 ['15m', '1h', '4h', '1d']), intervals 须含 5m
         """
         self.db_config = db_config
         self.usdt_symbols = usdt_symbols
         self.intervals = intervals
-        self.buffer: list[dict] = []
-        self.buffer_lock = asyncio.Lock()
+        self.indicator_config = indicator_config
+        self.indicators = None  # StreamingIndicatorService, start() 中初始化
+        self.price_stats = None  # PriceStatsAggregator, start() 中初始化 (仅采集 5m 时)
+        self.dense = dense
+        self.derived = [tf for tf in derived if tf not in intervals]
+        self.aggregator = CandleAggregator(self.derived) if self.derived else None
+        self.timeframes = list(intervals) + self.derived  # 本进程产出的全部周期
+        # 回调和 flusher 都在 event loop 线程内且中间无 await, 不需要锁
+        self.buffer: deque[KlineRow] = deque(maxlen=BUFFER_MAX_SIZE)
         self.connections: list[WSKlineConnection] = []
         self._stats = {
             'total_closed': 0,
             'total_flushed': 0,
             'flush_errors': 0,
+            'dropped': 0,
         }
 
     def _build_shards(self) -> list[tuple[str, str, list[str]]]:
@@ -236,6 +272,12 @@ class WSKlineCollector:
         返回: [(market, interval, streams), ...]
         """
         shards: list[tuple[str, str, list[str]]] = []
+        if self.dense:
+            # 各周期混合, 按 symbol 排, 同一 symbol 的各周期在同一连接
+            streams = [f"{s.lower()}@kline_{interval}" for s in self.usdt_symbols for interval in self.intervals]
+            for i in range(0, len(streams), DENSE_STREAMS_PER_CONN):
+                shards.append(('usdt', 'dense', streams[i:i + DENSE_STREAMS_PER_CONN]))
+            return shards
         # U本位: 按周期分, 每个周期占一个或多个连接
         for interval in self.intervals:
             streams = [f"{s.lower()}@kline_{interval}" for s in self.usdt_symbols]
@@ -244,25 +286,24 @@ class WSKlineCollector:
                 shards.append(('usdt', interval, streams[i:i + MAX_STREAMS_PER_CONN]))
         return shards
 
-    async def _on_kline_closed(
-        self,
-        symbol: str,
-        interval: str,
-        kline: dict,
-        market: str,
-    ) -> None:
-        """WS 回调: 进 buffer"""
-        async with self.buffer_lock:
-            if len(self.buffer) >= BUFFER_MAX_SIZE:
-                logger.warning(f"WS buffer 满 ({BUFFER_MAX_SIZE}), 丢弃最旧一条")
-                self.buffer.pop(0)
-            self.buffer.append({
-                'symbol': symbol,
-                'interval': interval,
-                'kline': kline,
-                'market': market,
-            })
-            self._stats['total_closed'] += 1
+    def _on_kline_closed(self, row: KlineRow) -> None:
+        """WS 回调: 进 buffer, 同时喂入本进程 K 线缓存 (收盘即可读, 不等落盘); 5m 收盘顺带合成高周期"""
+        self._push(row)
+        self._stats['total_closed'] += 1
+        if self.aggregator is not None:
+            for bar in self.aggregator.feed(row):
+                self._push(bar)
+
+    def _push(self, row: KlineRow) -> None:
+        store = get_kline_store()
+        if store is not None:
+            store.feed(
+                row.symbol, row.timeframe, row.open_time,
+                row.open_price, row.high_price, row.low_price, row.close_price, row.volume,
+            )
+        if len(self.buffer) == BUFFER_MAX_SIZE:
+            self._stats['dropped'] += 1  # deque 满时 append 自动挤掉最旧一条
+        self.buffer.append(row)
 
     async def _flusher_loop(self) -> None:
         """每 1s 把 buffer 批量写库 (executor 隔离)
@@ -274,29 +315,25 @@ class WSKlineCollector:
         writer = SmartFuturesCollector(self.db_config)
         loop = asyncio.get_event_loop()
 
-        retry_buffer: list[dict] = []
+        retry_buffer: list[KlineRow] = []
         retry_count = 0
+        dropped_reported = 0
 
         while True:
             await asyncio.sleep(DB_FLUSH_INTERVAL_S)
 
-            # 从 WS buffer 取新数据
-            async with self.buffer_lock:
-                batch = self.buffer[:]
-                self.buffer.clear()
+            # 从 WS buffer 取新数据 (两步之间无 await, 回调插不进来)
+            batch = list(self.buffer)
+            self.buffer.clear()
+            if self._stats['dropped'] > dropped_reported:
+                logger.warning(
+                    f"WS buffer 满 ({BUFFER_MAX_SIZE}), 丢弃最旧 {self._stats['dropped'] - dropped_reported} 条"
+                )
+                dropped_reported = self._stats['dropped']
 
             # 合并重试 buffer + 新数据
-            to_save = retry_buffer + batch
-            if not to_save:
-                continue
-
-            # 格式转换也在 executor 里做, 不阻塞 event loop
-            try:
-                klines_to_save = self._to_save_format_batch(to_save)
-            except Exception as e:
-                logger.error(f"WS 格式转换失败 (丢弃 {len(to_save)} 条): {e}")
-                retry_buffer = []
-                retry_count = 0
+            klines_to_save = retry_buffer + batch
+            if not klines_to_save:
                 continue
 
             try:
@@ -312,49 +349,29 @@ class WSKlineCollector:
                 retry_count += 1
                 if retry_count >= FLUSHER_MAX_RETRIES:
                     logger.error(
-                        f"WS 连续 {FLUSHER_MAX_RETRIES} 次写库失败, 丢弃 {len(to_save)} 条数据: {e}"
+                        f"WS 连续 {FLUSHER_MAX_RETRIES} 次写库失败, 丢弃 {len(klines_to_save)} 条数据: {e}"
                     )
                     retry_buffer = []
                     retry_count = 0
                 else:
                     logger.warning(
                         f"WS 写库失败 (重试 #{retry_count}/{FLUSHER_MAX_RETRIES}, "
-                        f"{len(to_save)} 条待重试): {e}"
+                        f"{len(klines_to_save)} 条待重试): {e}"
                     )
-                    retry_buffer = to_save
-
-    @staticmethod
-    def _to_save_format(item: dict) -> dict:
-        """把单个 WS dict 转成 SmartFuturesCollector.save_klines() 期望的格式"""
-        from datetime import datetime
-        from decimal import Decimal
-
-        kline = item['kline']
-        symbol_raw = item['symbol']
-
-        symbol_norm = f"{symbol_raw[:-4]}/USDT"
-
-        return {
-            'symbol': symbol_norm,
-            'contract_type': 'usdt_futures',
-            'timeframe': item['interval'],
-            'open_time': kline['open_time'],
-            'close_time': kline['close_time'],
-            'timestamp': datetime.utcfromtimestamp(kline['open_time'] / 1000),
-            'open_price': Decimal(kline['open']),
-            'high_price': Decimal(kline['high']),
-            'low_price': Decimal(kline['low']),
-            'close_price': Decimal(kline['close']),
-            'volume': Decimal(kline['volume']),
-            'quote_volume': Decimal(kline['quote_volume']),
-            'number_of_trades': kline['trades'],
-            'taker_buy_base_volume': Decimal(kline['taker_buy_base']),
-            'taker_buy_quote_volume': Decimal(kline['taker_buy_quote']),
-        }
+                    retry_buffer = klines_to_save
+                continue
 
-    def _to_save_format_batch(self, items: list[dict]) -> list[dict]:
-        """批量格式转换 — 在 executor 中执行, 不阻塞 event loop"""
-        return [self._to_save_format(item) for item in items]
+            # 落盘成功后推进增量指标 (缺口/预热从 kline_data 补, 所以必须在落盘之后)
+            if self.indicators is not None:
+                try:
+                    await loop.run_in_executor(None, self.indicators.on_klines, klines_to_save)
+                except Exception as e:
+                    logger.warning(f"WS 增量指标更新失败: {e}")
+            if self.price_stats is not None:
+                try:
+                    await loop.run_in_executor(None, self.price_stats.on_klines, klines_to_save)
+                except Exception as e:
+                    logger.warning(f"WS 24h 统计更新失败: {e}")
 
     async def _hydrate_history(self) -> None:
         """启动时拉一次历史 K 线 (REST), 让 DB 有历史数据"""
@@ -364,7 +381,7 @@ class WSKlineCollector:
         # U本位历史
         if self.usdt_symbols:
             for interval in self.intervals:
-                limit = 200 if interval in ('5m', '15m') else 50
+                limit = HYDRATION_LIMIT_5M if interval in ('5m', '15m') else 50
                 logger.info(
                     f"REST hydration: U本位 {interval} x {len(self.usdt_symbols)} symbols (limit={limit})"
                 )
@@ -375,13 +392,50 @@ class WSKlineCollector:
                     saved = hydrator.save_klines(klines)
                     logger.info(f"  U本位 {interval} hydration 落盘: {saved} 条")
 
+        if self.derived:
+            loop = asyncio.get_event_loop()
+            try:
+                await loop.run_in_executor(None, self._rollup_derived, HYDRATION_LIMIT_5M * timeframe_to_ms('5m'))
+            except Exception as e:
+                logger.error(f"合成周期重算失败 (继续, 由定时汇总兜底): {e}")
+            await self._prime_aggregator()
+
+    def _rollup_derived(self, lookback_ms: int = 0) -> dict:
+        """由库里的 5m 重算合成周期 (REST 拉过 5m 之后补上 WS 断线期间漏合成的)"""
+        from app.services.kline_storage import KlineStorageManager
+        return KlineStorageManager(self.db_config).run_rollups(self.derived, lookback_ms)
+
+    async def _prime_aggregator(self) -> None:
+        """用库里当前未收盘周期已有的 5m 补上合成状态的前半段 (读库在 executor, 合并回 event loop)"""
+        from app.services.kline_storage import KlineStorageManager, fetch_source
+        now_ms = int(time.time() * 1000)
+        since = self.aggregator.prime_since(now_ms)
+        until = now_ms // timeframe_to_ms('5m') * timeframe_to_ms('5m')
+
+        def _load():
+            conn = KlineStorageManager(self.db_config)._connect()
+            try:
+                with conn.cursor() as cur:
+                    return fetch_source(cur, '5m', since, until)
+            finally:
+                conn.close()
+
+        try:
+            rows = await asyncio.get_event_loop().run_in_executor(None, _load)
+        except Exception as e:
+            logger.warning(f"合成周期预载失败 (当前周期不合成, 由定时汇总补): {e}")
+            return
+        primed = self.aggregator.prime(rows)
+        logger.info(f"合成周期预载: {len(rows)} 根 5m, {primed} 个进行中周期")
+
     async def start(self) -> None:
         """
         启动顺序 (重要, 不要改):
         1. 启动所有 WS 连接 (开始 buffer 数据)
         2. 等 3s 让 WS 全部连上
         3. REST hydration 拉历史 (这段时间 buffer 仍在收新数据)
-        4. 启动 batch flusher (drain buffer 落盘)
+        3.5 增量指标从快照恢复, 24h 统计载入滚动窗口
+        4. 启动 batch flusher (drain buffer 落盘, 落盘后推进增量指标 / 24h 统计)
         5. 启动健康度报告任务
         """
         # 1. 启动 WS 连接
@@ -413,6 +467,23 @@ class WSKlineCollector:
         except Exception as e:
             logger.error(f"REST hydration 失败 (继续): {e}")
 
+        # 3.5 增量指标: 从快照恢复并回放到 hydration 之后 (flusher 启动前完成, 不漏 K 线)
+        try:
+            loop = asyncio.get_event_loop()
+            self.indicators = await loop.run_in_executor(
+                None, init_streaming_indicators, self.db_config,
+                [tf for tf in self.timeframes if tf in STREAM_TIMEFRAMES], self.indicator_config
+            )
+        except Exception as e:
+            logger.error(f"增量指标初始化失败 (继续, 由定时缓存任务兜底): {e}")
+        if PRICE_STATS_TIMEFRAME in self.intervals:
+            try:
+                self.price_stats = await loop.run_in_executor(
+                    None, init_price_stats_aggregator, self.db_config
+                )
+            except Exception as e:
+                logger.error(f"24h 统计初始化失败 (继续, 由定时缓存任务兜底): {e}")
+
         # 4. 启动 batch flusher
         asyncio.create_task(self._flusher_loop())
 
@@ -425,7 +496,7 @@ class WSKlineCollector:
         logger.info(
             f"WS K线采集已启动: {len(self.connections)} 连接, "
             f"U本位 {len(self.usdt_symbols)} symbols, "
-            f"intervals={self.intervals}"
+            f"intervals={self.intervals}, derived={self.derived}, dense={self.dense}"
         )
 
     async def _health_report_loop(self) -> None:
@@ -442,7 +513,9 @@ class WSKlineCollector:
                 f"[健康度] 连接 {healthy}/{total} 健康, buffer={buffer_size}, "
                 f"closed={self._stats['total_closed']}, "
                 f"flushed={self._stats['total_flushed']}, "
+                f"dropped={self._stats['dropped']}, "
                 f"flush_errors={self._stats['flush_errors']}"
+                + (f", 合成 {self.aggregator.stats}" if self.aggregator is not None else "")
             )
             # 列出不健康的连接
             for c in self.connections:
@@ -467,14 +540,14 @@ class WSKlineCollector:
             else:
                 consecutive_all_dead = 0
 
-    async def _check_and_backfill(self, interval: str) -> None:
-        """检查 U本位 DB 新鲜度, 落后则 REST 回填"""
+    async def _check_and_backfill(self, interval: str) -> int:
+        """检查 U本位 DB 新鲜度, 落后则 REST 回填; 返回落盘条数"""
         from app.utils.binance_rate_guard import rate_guard
         if rate_guard.is_banned():
             logger.warning(
                 f"[回填] IP 封禁中, 跳过 {interval} (剩余 {rate_guard.seconds_until_unban():.0f}s)"
             )
-            return
+            return 0
         try:
             import pymysql
             conn = pymysql.connect(**self.db_config, cursorclass=pymysql.cursors.DictCursor, autocommit=True)
@@ -492,14 +565,14 @@ class WSKlineCollector:
 
             if not row or not row['ot']:
                 logger.info(f"[回填] usdt {interval}: DB 无数据, 跳过回填检查")
-                return
+                return 0
 
             latest_ot = row['ot'] / 1000  # ms → s
             age_seconds = time.time() - latest_ot
             threshold = BACKFILL_LAG_THRESHOLD_S.get(interval, 600)
 
             if age_seconds < threshold:
-                return  # 数据够新, 不需要回填
+                return 0  # 数据够新, 不需要回填
 
             logger.warning(
                 f"[回填] usdt {interval} 数据滞后 {age_seconds/60:.0f} 分钟 "
@@ -510,7 +583,7 @@ class WSKlineCollector:
             limit = max(2, int(lookback_minutes / self._interval_to_minutes(interval)) + 1)
 
             if not self.usdt_symbols:
-                return
+                return 0
 
             from app.collectors.smart_futures_collector import SmartFuturesCollector
             hydrator = SmartFuturesCollector(self.db_config)
@@ -521,10 +594,11 @@ class WSKlineCollector:
             if klines:
                 saved = await loop.run_in_executor(None, hydrator.save_klines, klines)
                 logger.info(f"[回填] usdt {interval}: REST 采集 {len(klines)} 条, 落盘 {saved} 条")
-            else:
-                logger.warning(f"[回填] usdt {interval}: REST 采集返回空")
+                return len(klines)
+            logger.warning(f"[回填] usdt {interval}: REST 采集返回空")
         except Exception as e:
             logger.error(f"[回填] usdt {interval} 异常: {e}")
+        return 0
 
     @staticmethod
     def _interval_to_minutes(interval: str) -> int:
@@ -549,10 +623,17 @@ class WSKlineCollector:
                         f"[回填] IP 封禁中, 暂停检查 (剩余 {rate_guard.seconds_until_unban():.0f}s)"
                     )
                 else:
+                    # 合成周期不走 REST: 回填 5m 后由库里重算
+                    backfilled = 0
                     for interval in BACKFILL_ALLOWED_INTERVALS:
                         if rate_guard.is_banned():
                             break
-                        await self._check_and_backfill(interval)
+                        if interval not in self.derived:
+                            backfilled += await self._check_and_backfill(interval)
+                    if backfilled and self.derived:
+                        loop = asyncio.get_event_loop()
+                        counts = await loop.run_in_executor(None, self._rollup_derived)
+                        logger.info(f"[回填] 合成周期由 5m 重算: {counts}")
             except Exception as e:
                 logger.error(f"[回填] 循环异常: {e}")
             await asyncio.sleep(BACKFILL_CHECK_INTERVAL_S)
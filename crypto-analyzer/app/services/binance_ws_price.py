@@ -6,12 +6,18 @@
 - 现货市场: 使用 ticker 价格（实时成交价）
 
 用于高频监控移动止盈/止损，不再依赖轮询
+
+合约默认走全市场标记价格流 (!markPrice@arr@1s): 一条连接覆盖全部合约, 每秒一条数组消息,
+按 symbol -> 行号批量写入预分配的价格 / 时间戳 / 最高最低价数组; 订阅只是本地过滤, 不重连.
 """
 
 import asyncio
 import json
-from typing import Dict, Set, Callable, Optional, List
-from datetime import datetime
+import time
+from typing import Dict, Set, Callable, Optional, List, Tuple
+from datetime import datetime, timedelta
+
+import numpy as np
 from loguru import logger
 
 try:
@@ -21,38 +27,99 @@ except ImportError:
     logger.warning("websockets 未安装，请运行: pip install websockets")
 
 
+_INITIAL_CAPACITY = 512  # 预分配行数 (全市场合约约 300 个), 不够时翻倍
+
+
 class BinanceWSPriceService:
     """币安 WebSocket 实时价格服务 - 支持现货和合约"""
 
     # 币安 WebSocket 地址
     WS_FUTURES_URL = "wss://fstream.binance.com/ws"  # U本位合约
     WS_SPOT_URL = "wss://stream.binance.com:9443/ws"  # 现货
+    # 全市场标记价格: 一条连接每秒一条消息 (数组), 覆盖全部合约
+    ALL_MARKET_STREAM = "!markPrice@arr@1s"
 
-    def __init__(self, market_type: str = 'futures'):
+    def __init__(self, market_type: str = 'futures', all_market: Optional[bool] = None):
         """
         初始化 WebSocket 服务
 
         Args:
             market_type: 市场类型 'futures'(U本位) 或 'spot'(现货)
+            all_market: 订阅全市场标记价格流 (仅合约, 默认开启);
+                开启后 subscribe/unsubscribe 只改本地过滤 (回调 / 最高最低价追踪), 不再动连接
         """
         self.market_type = market_type
-        self.prices: Dict[str, float] = {}  # symbol -> price
-        self.price_update_times: Dict[str, datetime] = {}  # symbol -> last update time
-        self.max_prices: Dict[str, float] = {}  # symbol -> max_price (用于做多)
-        self.min_prices: Dict[str, float] = {}  # symbol -> min_price (用于做空)
+        self.all_market = (market_type == 'futures') if all_market is None else (all_market and market_type == 'futures')
+
+        # 价格表: symbol -> 行号, 各列为预分配数组, 一条消息一次批量写入
+        self._index: Dict[str, int] = {}       # BTC/USDT -> 行号
+        self._raw_index: Dict[str, int] = {}   # 消息里的 BTCUSDT -> 行号
+        self._symbols: List[str] = []
+        self._prices = np.full(_INITIAL_CAPACITY, np.nan)
+        self._update_ts = np.full(_INITIAL_CAPACITY, -np.inf)  # time.monotonic()
+        self._max_prices = np.zeros(_INITIAL_CAPACITY)        # 用于做多
+        self._min_prices = np.full(_INITIAL_CAPACITY, np.inf)  # 用于做空
+        self._subscribed = np.zeros(_INITIAL_CAPACITY, dtype=bool)  # 触发价格回调
+        self._tracked = np.zeros(_INITIAL_CAPACITY, dtype=bool)     # 有最高/最低价追踪
+
         self.subscribed_symbols: Set[str] = set()
         self.callbacks: List[Callable[[str, float], None]] = []  # 价格更新回调
         self.ws = None
         self.running = False
         self._reconnect_delay = 5  # 重连延迟（秒）
-        self._last_prices: Dict[str, float] = {}  # 上次价格，用于判断是否有变化
 
         # 健康检查相关
-        self._last_update_time: Optional[datetime] = None  # 最后收到数据的时间
+        self._last_update_mono: Optional[float] = None  # 最后收到数据的时间 (monotonic)
         self._health_check_interval = 5  # 健康检查间隔（秒）
         self._stale_threshold = 10  # 数据过期阈值（秒），超过此时间未收到数据视为不健康
         self._health_callbacks: List[Callable[[bool, str], None]] = []  # 健康状态回调 (is_healthy, reason)
 
+    # ------------------------------------------------------------------
+    # 价格表
+    # ------------------------------------------------------------------
+
+    def _slot(self, symbol: str) -> int:
+        """symbol 对应行号, 没有则分配"""
+        idx = self._index.get(symbol)
+        if idx is not None:
+            return idx
+        idx = len(self._symbols)
+        if idx >= len(self._prices):
+            grow = len(self._prices)
+            self._prices = np.concatenate((self._prices, np.full(grow, np.nan)))
+            self._update_ts = np.concatenate((self._update_ts, np.full(grow, -np.inf)))
+            self._max_prices = np.concatenate((self._max_prices, np.zeros(grow)))
+            self._min_prices = np.concatenate((self._min_prices, np.full(grow, np.inf)))
+            self._subscribed = np.concatenate((self._subscribed, np.zeros(grow, dtype=bool)))
+            self._tracked = np.concatenate((self._tracked, np.zeros(grow, dtype=bool)))
+        self._symbols.append(symbol)
+        self._index[symbol] = idx
+        return idx
+
+    def _raw_slot(self, raw_symbol: str) -> int:
+        """消息里的 BTCUSDT -> 行号 (转换结果缓存)"""
+        idx = self._raw_index.get(raw_symbol)
+        if idx is None:
+            idx = self._slot(self._stream_to_symbol(raw_symbol.lower()))
+            self._raw_index[raw_symbol] = idx
+        return idx
+
+    def _start_tracking(self, symbol: str, price: float = None):
+        i = self._slot(symbol)
+        self._tracked[i] = True
+        self._max_prices[i] = price if price is not None else 0
+        self._min_prices[i] = price if price is not None else np.inf
+
+    def snapshot_arrays(self) -> Tuple[List[str], np.ndarray, np.ndarray]:
+        """(symbols, prices, update_ts(monotonic)) 快照, 供批量转发 (如跨进程共享价格表)"""
+        n = len(self._symbols)
+        return list(self._symbols), self._prices[:n].copy(), self._update_ts[:n].copy()
+
+    @property
+    def prices(self) -> Dict[str, float]:
+        """当前有价格的 symbol -> price (快照)"""
+        return {s: float(p) for s, p in zip(self._symbols, self._prices) if p == p}
+
     def add_callback(self, callback: Callable[[str, float], None]):
         """添加价格更新回调"""
         self.callbacks.append(callback)
@@ -71,34 +138,40 @@ class BinanceWSPriceService:
         if callback in self._health_callbacks:
             self._health_callbacks.remove(callback)
 
+    def _seconds_since_update(self) -> Optional[float]:
+        if self._last_update_mono is None:
+            return None
+        return time.monotonic() - self._last_update_mono
+
     def get_last_update_time(self) -> Optional[datetime]:
         """获取最后更新时间"""
-        return self._last_update_time
+        elapsed = self._seconds_since_update()
+        if elapsed is None:
+            return None
+        return datetime.now() - timedelta(seconds=elapsed)
 
     def is_healthy(self) -> bool:
         """检查 WebSocket 服务是否健康"""
         if not self.running or self.ws is None:
             return False
-        if self._last_update_time is None:
-            return False
-        elapsed = (datetime.now() - self._last_update_time).total_seconds()
-        return elapsed < self._stale_threshold
+        elapsed = self._seconds_since_update()
+        return elapsed is not None and elapsed < self._stale_threshold
 
     def get_health_status(self) -> dict:
         """获取详细的健康状态"""
-        elapsed = None
-        if self._last_update_time:
-            elapsed = (datetime.now() - self._last_update_time).total_seconds()
+        elapsed = self._seconds_since_update()
+        last_update = self.get_last_update_time()
 
         return {
             'running': self.running,
             'connected': self.ws is not None,
             'healthy': self.is_healthy(),
-            'last_update_time': self._last_update_time.isoformat() if self._last_update_time else None,
+            'mode': 'all_market' if self.all_market else 'per_symbol',
+            'last_update_time': last_update.isoformat() if last_update else None,
             'seconds_since_update': round(elapsed, 2) if elapsed else None,
             'stale_threshold': self._stale_threshold,
             'subscribed_symbols': list(self.subscribed_symbols),
-            'prices_count': len(self.prices)
+            'prices_count': int(np.count_nonzero(~np.isnan(self._prices[:len(self._symbols)])))
         }
 
     def _notify_health_change(self, is_healthy: bool, reason: str):
@@ -111,32 +184,38 @@ class BinanceWSPriceService:
 
     def get_price(self, symbol: str, max_age_seconds: int = 120) -> Optional[float]:
         """获取当前价格，超过 max_age_seconds 秒未更新则返回 None"""
-        price = self.prices.get(symbol)
-        if price is None:
+        i = self._index.get(symbol)
+        if i is None:
             return None
-        last_update = self.price_update_times.get(symbol)
-        if last_update is None:
+        price = self._prices[i]
+        if price != price:
             return None
-        if (datetime.now() - last_update).total_seconds() > max_age_seconds:
+        if time.monotonic() - self._update_ts[i] > max_age_seconds:
             return None
-        return price
+        return float(price)
 
     def get_max_price(self, symbol: str) -> Optional[float]:
         """获取订阅以来的最高价（用于做多的移动止盈）"""
-        return self.max_prices.get(symbol)
+        i = self._index.get(symbol)
+        if i is None or not self._tracked[i]:
+            return None
+        return float(self._max_prices[i])
 
     def get_min_price(self, symbol: str) -> Optional[float]:
         """获取订阅以来的最低价（用于做空的移动止盈）"""
-        return self.min_prices.get(symbol)
+        i = self._index.get(symbol)
+        if i is None or not self._tracked[i]:
+            return None
+        return float(self._min_prices[i])
 
     def reset_price_tracking(self, symbol: str, current_price: float = None):
         """重置价格追踪（开仓时调用）"""
         if current_price:
-            self.max_prices[symbol] = current_price
-            self.min_prices[symbol] = current_price
-        elif symbol in self.prices:
-            self.max_prices[symbol] = self.prices[symbol]
-            self.min_prices[symbol] = self.prices[symbol]
+            self._start_tracking(symbol, current_price)
+        else:
+            i = self._index.get(symbol)
+            if i is not None and self._prices[i] == self._prices[i]:
+                self._start_tracking(symbol, float(self._prices[i]))
 
     def _symbol_to_stream(self, symbol: str) -> str:
         """转换交易对格式：BTC/USDT -> btcusdt@markPrice 或 btcusdt@ticker"""
@@ -162,7 +241,7 @@ class BinanceWSPriceService:
             return base
 
     async def subscribe(self, symbols: List[str]):
-        """订阅交易对的价格"""
+        """订阅交易对的价格 (全市场模式下只打开本地回调 / 最高最低价追踪)"""
         new_symbols = set(symbols) - self.subscribed_symbols
         if not new_symbols:
             return
@@ -171,18 +250,18 @@ class BinanceWSPriceService:
 
         # 初始化价格追踪
         for symbol in new_symbols:
-            if symbol not in self.max_prices:
-                self.max_prices[symbol] = 0
-            if symbol not in self.min_prices:
-                self.min_prices[symbol] = float('inf')
+            i = self._slot(symbol)
+            self._subscribed[i] = True
+            if not self._tracked[i]:
+                self._start_tracking(symbol)
 
-        # 如果 WebSocket 已连接，发送订阅请求
-        if self.ws:
+        # 逐币种模式且 WebSocket 已连接，发送订阅请求
+        if self.ws and not self.all_market:
             streams = [self._symbol_to_stream(s) for s in new_symbols]
             subscribe_msg = {
                 "method": "SUBSCRIBE",
                 "params": streams,
-                "id": int(datetime.now().timestamp())
+                "id": int(time.time())
             }
             await self.ws.send(json.dumps(subscribe_msg))
             logger.info(f"WebSocket 订阅新交易对: {new_symbols}")
@@ -195,57 +274,77 @@ class BinanceWSPriceService:
 
         self.subscribed_symbols -= symbols_to_remove
 
-        # 清理价格数据
+        # 清理追踪数据 (全市场模式下价格继续更新, 逐币种模式下不再有推送)
         for symbol in symbols_to_remove:
-            self.prices.pop(symbol, None)
-            self.max_prices.pop(symbol, None)
-            self.min_prices.pop(symbol, None)
-
-        # 如果 WebSocket 已连接，发送取消订阅请求
-        if self.ws:
+            i = self._index[symbol]
+            self._subscribed[i] = False
+            self._tracked[i] = False
+            if not self.all_market:
+                self._prices[i] = np.nan
+
+        # 逐币种模式且 WebSocket 已连接，发送取消订阅请求
+        if self.ws and not self.all_market:
             streams = [self._symbol_to_stream(s) for s in symbols_to_remove]
             unsubscribe_msg = {
                 "method": "UNSUBSCRIBE",
                 "params": streams,
-                "id": int(datetime.now().timestamp())
+                "id": int(time.time())
             }
             await self.ws.send(json.dumps(unsubscribe_msg))
             logger.info(f"WebSocket 取消订阅: {symbols_to_remove}")
 
-    def _on_price_update(self, symbol: str, price: float):
-        """价格更新时触发"""
-        old_price = self.prices.get(symbol, 0)
-        self.prices[symbol] = price
-        self.price_update_times[symbol] = datetime.now()
+    def _apply_prices(self, idx: np.ndarray, prices: np.ndarray):
+        """
+        一条消息的价格批量写入价格表 (idx 在同一条消息内不重复)
+
+        最高/最低价与时间戳向量化更新; 只对已订阅且价格有变化的 symbol 触发回调
+        """
+        now = time.monotonic()
+        old = self._prices[idx]
+        self._prices[idx] = prices
+        self._update_ts[idx] = now
+        self._max_prices[idx] = np.maximum(self._max_prices[idx], prices)
+        self._min_prices[idx] = np.minimum(self._min_prices[idx], prices)
 
         # 更新最后收到数据的时间
         was_healthy = self.is_healthy()
-        self._last_update_time = datetime.now()
+        self._last_update_mono = now
 
         # 如果之前不健康，现在恢复了，通知健康状态变化
         if not was_healthy and self.is_healthy():
             logger.info("✅ WebSocket 数据恢复正常")
             self._notify_health_change(True, "数据恢复正常")
 
-        # 更新最高/最低价
-        if price > self.max_prices.get(symbol, 0):
-            self.max_prices[symbol] = price
-        if price < self.min_prices.get(symbol, float('inf')):
-            self.min_prices[symbol] = price
-
-        # 只有价格有变化时才触发回调
-        if abs(price - old_price) > 0.000001:
+        # 只有价格有变化时才触发回调 (首个价格 old=NaN 也算变化)
+        if not self.callbacks:
+            return
+        changed = np.flatnonzero(self._subscribed[idx] & ~(np.abs(prices - old) <= 0.000001))
+        for k in changed:
+            symbol, price = self._symbols[idx[k]], float(prices[k])
             for callback in self.callbacks:
                 try:
                     callback(symbol, price)
                 except Exception as e:
                     logger.error(f"价格回调执行失败: {e}")
 
+    def _on_price_update(self, symbol: str, price: float):
+        """价格更新时触发"""
+        self._apply_prices(np.array([self._slot(symbol)]), np.array([price], dtype=np.float64))
+
     async def _handle_message(self, message: str):
         """处理 WebSocket 消息"""
         try:
             data = json.loads(message)
 
+            # 全市场标记价格: [{"e": "markPriceUpdate", "s": "BTCUSDT", "p": "...", ...}, ...]
+            if isinstance(data, list):
+                if data:
+                    raw_slot = self._raw_slot
+                    idx = np.fromiter((raw_slot(d['s']) for d in data), dtype=np.intp, count=len(data))
+                    prices = np.fromiter((float(d['p']) for d in data), dtype=np.float64, count=len(data))
+                    self._apply_prices(idx, prices)
+                return
+
             # 忽略订阅确认消息
             if 'result' in data or 'id' in data:
                 return
@@ -253,23 +352,29 @@ class BinanceWSPriceService:
             if self.market_type == 'futures':
                 # 处理 U本位合约 markPrice 消息
                 if 'e' in data and data['e'] == 'markPriceUpdate':
-                    stream_symbol = data['s'].lower()  # BTCUSDT or BTCUSD_PERP -> btcusdt or btcusd_perp
-                    symbol = self._stream_to_symbol(stream_symbol)
                     price = float(data['p'])  # 标记价格
-                    self._on_price_update(symbol, price)
+                    self._apply_prices(np.array([self._raw_slot(data['s'])]), np.array([price]))
             else:
                 # 处理现货 ticker 消息
                 if 'e' in data and data['e'] == '24hrTicker':
-                    stream_symbol = data['s'].lower()  # BTCUSDT -> btcusdt
-                    symbol = self._stream_to_symbol(stream_symbol)
                     price = float(data['c'])  # 最新成交价
-                    self._on_price_update(symbol, price)
+                    self._apply_prices(np.array([self._raw_slot(data['s'])]), np.array([price]))
 
         except json.JSONDecodeError:
             logger.warning(f"WebSocket 消息解析失败: {message[:100]}")
         except Exception as e:
             logger.error(f"处理 WebSocket 消息异常: {e}")
 
+    def _build_url(self) -> str:
+        """全市场模式固定一条流; 逐币种模式把已订阅币种拼进 URL"""
+        base_url = self.WS_FUTURES_URL if self.market_type == 'futures' else self.WS_SPOT_URL
+        if self.all_market:
+            return f"{base_url}/{self.ALL_MARKET_STREAM}"
+        if self.subscribed_symbols:
+            streams = [self._symbol_to_stream(s) for s in self.subscribed_symbols]
+            return f"{base_url}/{'/'.join(streams)}"
+        return base_url
+
     async def _connect(self):
         """建立 WebSocket 连接"""
         if not websockets:
@@ -278,29 +383,16 @@ class BinanceWSPriceService:
 
         while self.running:
             try:
-                # 选择正确的 WebSocket URL
-                if self.market_type == 'futures':
-                    base_url = self.WS_FUTURES_URL
-                else:
-                    base_url = self.WS_SPOT_URL
-
-                # 构建订阅 URL
-                if self.subscribed_symbols:
-                    streams = [self._symbol_to_stream(s) for s in self.subscribed_symbols]
-                    url = f"{base_url}/{'/'.join(streams)}"
-                else:
-                    url = base_url
-
+                url = self._build_url()
                 market_label = "U本位合约" if self.market_type == 'futures' else "现货"
                 logger.info(f"WebSocket [{market_label}] 连接中: {url[:80]}...")
 
                 async with websockets.connect(url, ping_interval=20, ping_timeout=10) as ws:
                     self.ws = ws
-                    logger.info(f"✅ WebSocket 已连接，订阅 {len(self.subscribed_symbols)} 个交易对")
-
-                    # 如果是空连接，需要发送订阅请求
-                    if not self.subscribed_symbols:
-                        pass  # 等待 subscribe() 调用
+                    if self.all_market:
+                        logger.info(f"✅ WebSocket 已连接 (全市场标记价格)，回调 {len(self.subscribed_symbols)} 个交易对")
+                    else:
+                        logger.info(f"✅ WebSocket 已连接，订阅 {len(self.subscribed_symbols)} 个交易对")
 
                     async for message in ws:
                         if not self.running:
@@ -333,9 +425,7 @@ class BinanceWSPriceService:
 
             # 健康状态变化时触发回调
             if last_healthy and not current_healthy:
-                elapsed = 0
-                if self._last_update_time:
-                    elapsed = (datetime.now() - self._last_update_time).total_seconds()
+                elapsed = self._seconds_since_update() or 0
                 reason = f"超过 {self._stale_threshold} 秒未收到数据（已过 {elapsed:.1f}s）"
                 logger.warning(f"⚠️ WebSocket 数据过期: {reason}")
                 self._notify_health_change(False, reason)
@@ -358,8 +448,8 @@ class BinanceWSPriceService:
         if symbols:
             self.subscribed_symbols = set(symbols)
             for symbol in symbols:
-                self.max_prices[symbol] = 0
-                self.min_prices[symbol] = float('inf')
+                self._subscribed[self._slot(symbol)] = True
+                self._start_tracking(symbol)
 
         logger.info(f"🚀 启动 WebSocket 实时价格服务，初始订阅: {self.subscribed_symbols}")
 
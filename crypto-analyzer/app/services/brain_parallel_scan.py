@@ -0,0 +1,132 @@
+"""
+SmartDecisionBrain.scan_all 并行分片扫描
+
+串行 scan_all 逐币种 analyze(): 每个币种 3 次 K 线读取 + 纯 Python 评分, 250 币种 30-60s,
+开仓时价格已经过时. 本模块把白名单按顺序切成若干分片, 交给常驻进程池并行评分:
+
+- K 线由主进程一次性预取 (kline_store / 批量 SQL) 随分片下发, 工作进程不读 kline_data
+- 每个工作进程常驻一个 SmartDecisionBrain (启动时初始化一次, V2 / 信号黑名单等服务自带缓存),
+  每轮扫描下发主进程的可变状态 (白名单 / 权重 / 阈值 / Big4 过滤开关)
+- 结果按白名单原顺序合并, 与串行扫描顺序一致 (后续羊群过滤等逻辑不受影响)
+- 每个分片的耗时 / 币种数 / 机会数记录在 last_stats, 由 scan_all 打日志
+
+进程池用 spawn 启动 (主进程有 WS / 定时线程, fork 后子进程可能死锁在继承的锁上).
+任何进程池异常都回落串行扫描, 行为与改造前一致.
+"""
+from __future__ import annotations
+
+import math
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from loguru import logger
+
+
+DEFAULT_WORKERS = 4
+DEFAULT_MIN_SYMBOLS_PER_SHARD = 20  # 分片太小时进程间传输开销大于收益
+SHARD_TIMEOUT_S = 120
+
+_worker_brain = None
+
+
+def _init_worker(db_config: dict) -> None:
+    """工作进程初始化: 创建常驻的 SmartDecisionBrain (只在子进程里导入主服务模块)"""
+    global _worker_brain
+    from smart_trader_service import SmartDecisionBrain
+    _worker_brain = SmartDecisionBrain(db_config)
+
+
+def _scan_shard(shard_id: int, symbols: List[Tuple[int, str]], state: dict,
+                big4_result: Optional[dict], klines: Dict[str, dict]) -> dict:
+    """工作进程: 扫描一个分片, 返回 [(白名单序号, 机会)] 与耗时"""
+    t0 = time.perf_counter()
+    brain = _worker_brain
+    brain.apply_scan_state(state)
+    found = []
+    for idx, symbol in symbols:
+        result = brain.analyze(symbol, big4_result=big4_result, klines=klines.get(symbol))
+        if result:
+            found.append((idx, result))
+    return {
+        'shard': shard_id,
+        'pid': os.getpid(),
+        'symbols': len(symbols),
+        'opportunities': found,
+        'elapsed_ms': round((time.perf_counter() - t0) * 1000, 1),
+    }
+
+
+def split_shards(symbols: List[str], workers: int, min_per_shard: int) -> List[List[Tuple[int, str]]]:
+    """按白名单顺序切成连续分片, 每片带原序号; 分片数不超过 workers"""
+    if not symbols:
+        return []
+    n_shards = max(1, min(workers, math.ceil(len(symbols) / max(1, min_per_shard))))
+    size = math.ceil(len(symbols) / n_shards)
+    indexed = list(enumerate(symbols))
+    return [indexed[i:i + size] for i in range(0, len(indexed), size)]
+
+
+class ParallelBrainScanner:
+    """常驻进程池 + 分片调度"""
+
+    def __init__(self, db_config: dict, workers: int = DEFAULT_WORKERS,
+                 min_per_shard: int = DEFAULT_MIN_SYMBOLS_PER_SHARD):
+        self.db_config = db_config
+        self.workers = max(1, int(workers))
+        self.min_per_shard = max(1, int(min_per_shard))
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self.last_stats: Dict = {}
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_worker,
+                initargs=(self.db_config,),
+            )
+            logger.info(f"[SCAN-PARALLEL] 进程池已启动: {self.workers} workers")
+        return self._pool
+
+    def scan(self, symbols: List[str], state: dict, big4_result: Optional[dict],
+             klines: Dict[str, dict]) -> List[dict]:
+        """
+        并行扫描, 返回按白名单顺序排列的机会列表.
+        进程池异常时抛出, 由调用方回落串行.
+        """
+        t0 = time.perf_counter()
+        shards = split_shards(symbols, self.workers, self.min_per_shard)
+        pool = self._get_pool()
+        futures = [
+            pool.submit(
+                _scan_shard, shard_id, shard, state, big4_result,
+                {s: klines[s] for _, s in shard if s in klines},
+            )
+            for shard_id, shard in enumerate(shards)
+        ]
+        try:
+            results = [f.result(timeout=SHARD_TIMEOUT_S) for f in futures]
+        except Exception:
+            self.shutdown()
+            raise
+
+        merged = sorted(
+            (item for r in results for item in r['opportunities']),
+            key=lambda item: item[0],
+        )
+        self.last_stats = {
+            'mode': 'parallel',
+            'workers': self.workers,
+            'total_ms': round((time.perf_counter() - t0) * 1000, 1),
+            'shards': [{k: v for k, v in r.items() if k != 'opportunities'}
+                       | {'opportunities': len(r['opportunities'])} for r in results],
+        }
+        return [opp for _, opp in merged]
+
+    def shutdown(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
@@ -83,8 +83,6 @@ _live: Dict[str, Any] = {
     "stats": {"opportunities": 0, "opened": 0, "skipped": 0, "closed": 0},
     "open_cooldown_until": {},  # symbol -> unix ts
 }
-_winrate_cache: Optional[Dict[str, Any]] = None
-_winrate_cache_ts: float = 0.0
 
 
 def _connect():
@@ -143,13 +141,8 @@ def _refresh_pool(conn) -> List[str]:
 
 
 def _get_winrate(conn, symbols: List[str]) -> Dict[str, Any]:
-    global _winrate_cache, _winrate_cache_ts
-    now = time.time()
-    if _winrate_cache and now - _winrate_cache_ts < 30 * 60:
-        return _winrate_cache
-    _winrate_cache = compute_pool_winrate(conn, symbols, use_cache=True)
-    _winrate_cache_ts = now
-    return _winrate_cache
+    # 评估器按 1h 收盘增量刷新, 同一小时内不再读库
+    return compute_pool_winrate(conn, symbols, use_cache=True)
 
 
 def _in_open_cooldown(symbol: str) -> bool:
@@ -1,9 +1,18 @@
-"""REQ-BRAIN 胜率：近 7 日、同规则信号后 4h「方向对就算赢」；分向 long/short。"""
+"""
+REQ-BRAIN 胜率：近 7 日、同规则信号后 4h「方向对就算赢」；分向 long/short。
+
+逐 K 线结果 (该根的 1H 方向 + 4h 后是否赢) 只取决于它前 168 根、后 4 根收盘价, 一旦算出就不变.
+WinrateEvaluator 按币种保存最近 need 根 1h 收盘价与逐根结果 (NumPy), 全池堆叠成二维数组
+一次向量化计算; 每根 1h 收盘后只拉新 K 线、只重算受影响的尾部几根, 再按原采样口径聚合.
+单币结果落 brain_symbol_winrate, 重启后在同一小时内直接读表, 不必重新回测.
+"""
 from __future__ import annotations
 
+import threading
 import time
-from typing import Any, Dict, List, Optional, Sequence
+from typing import Any, Dict, List, Optional, Sequence, Tuple
 
+import numpy as np
 from loguru import logger
 
 from app.services.brain_config import (
@@ -16,10 +25,17 @@ from app.services.brain_config import (
     WINRATE_SYMBOL_MIN_N,
 )
 from app.services.brain_market_analyzer import _fetch_klines, _trend_side
+from app.services.kline_store import load_klines_bulk
 from app.utils.futures_symbol import futures_symbol_rating_canonical
 
-_WINRATE_CACHE: Dict[str, Any] = {"ts": 0.0, "payload": None}
-_WINRATE_TTL_S = 30 * 60
+_HOUR_MS = 3600 * 1000
+_MA_BARS = min(24, BARS_1H_WEEK)           # 与 _trend_side 的均线根数一致
+_TREND_THRESHOLD_PCT = 1.2 if BARS_1H_WEEK >= 100 else 0.6
+_REFRESH_OVERLAP_BARS = 2                  # 增量拉取向前多取 N 根, 覆盖未收盘 / 被修正的 K 线
+
+# 逐根结果编码
+SIDE_FLAT, SIDE_LONG, SIDE_SHORT = 0, 1, -1
+WIN_UNKNOWN, WIN_NO, WIN_YES = -1, 0, 1
 
 
 def _direction_at(closes: List[float], idx: int, lookback: int) -> str:
@@ -44,51 +60,88 @@ def _forward_win(closes: List[float], idx: int, side: str, forward: int) -> Opti
     return p1 < p0
 
 
-def evaluate_symbol_winrate(
-    cur,
+def _need_bars(lookback_days: int = WINRATE_LOOKBACK_DAYS, forward_hours: int = WINRATE_FORWARD_HOURS) -> int:
+    return lookback_days * 24 + forward_hours + BARS_1H_WEEK
+
+
+def rolling_outcomes(
+    closes: np.ndarray,
+    lo: int,
+    hi: int,
+    *,
+    lookback: int = BARS_1H_WEEK,
+    forward: int = WINRATE_FORWARD_HOURS,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    堆叠收盘价 (S, W) (右对齐, 左侧 NaN 填充) 上第 [lo, hi) 列的逐根结果.
+
+    与 _direction_at / _forward_win 逐位一致: 均线按原顺序逐列累加 (同 Python sum),
+    涨跌幅运算顺序不变; NaN 参与的比较均为 False → FLAT / 未知.
+
+    Returns:
+        (side, win): int8 (S, hi-lo); side ∈ {1, -1, 0}, win ∈ {1, 0, -1=未知}
+    """
+    rows, width = closes.shape
+    side = np.zeros((rows, max(0, hi - lo)), dtype=np.int8)
+    win = np.full(side.shape, WIN_UNKNOWN, dtype=np.int8)
+    lo = max(lo, lookback - 1)
+    if hi <= lo:
+        return side, win
+    off = lo - (hi - side.shape[1])       # lo 被抬高时结果列的偏移
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        c1 = closes[:, lo:hi]
+        c0 = closes[:, lo - lookback + 1:hi - lookback + 1]
+        ma = np.zeros_like(c1)
+        for k in range(_MA_BARS - 1, -1, -1):
+            ma = ma + closes[:, lo - k:hi - k]
+        ma = ma / _MA_BARS
+        change = (c1 - c0) / c0 * 100.0
+        valid = c0 > 0
+        long_ = valid & (change >= _TREND_THRESHOLD_PCT) & (c1 >= ma)
+        short = valid & (change <= -_TREND_THRESHOLD_PCT) & (c1 <= ma) & ~long_
+        side[:, off:] = np.where(long_, SIDE_LONG, np.where(short, SIDE_SHORT, SIDE_FLAT))
+
+        fwd_hi = min(hi, width - forward)
+        if fwd_hi > lo:
+            p0 = closes[:, lo:fwd_hi]
+            p1 = closes[:, lo + forward:fwd_hi + forward]
+            s = side[:, off:off + (fwd_hi - lo)]
+            known = (s != SIDE_FLAT) & (p0 > 0) & ~np.isnan(p1)
+            ok = np.where(s == SIDE_LONG, p1 > p0, p1 < p0)
+            win[:, off:off + (fwd_hi - lo)] = np.where(known, ok.astype(np.int8), WIN_UNKNOWN)
+    return side, win
+
+
+def aggregate_winrate(
     symbol: str,
+    side: np.ndarray,
+    win: np.ndarray,
     *,
-    lookback_days: int = WINRATE_LOOKBACK_DAYS,
     forward_hours: int = WINRATE_FORWARD_HOURS,
+    lookback_days: int = WINRATE_LOOKBACK_DAYS,
 ) -> Dict[str, Any]:
-    """单币 1h 规则回测胜率（总分 + 分向）。"""
-    symbol = futures_symbol_rating_canonical(symbol)
-    need = lookback_days * 24 + forward_hours + BARS_1H_WEEK
-    rows = _fetch_klines(cur, symbol, "1h", need)
-    if len(rows) < BARS_1H_WEEK + forward_hours + 10:
+    """按 evaluate_symbol_winrate 原采样口径 (尾部 lookback_days 内每 forward_hours 根一个样本) 聚合"""
+    n_bars = len(side)
+    if n_bars < BARS_1H_WEEK + forward_hours + 10:
         return {
             "symbol": symbol, "n": 0, "wins": 0, "win_prob": None,
             "n_long": 0, "wins_long": 0, "win_prob_long": None,
             "n_short": 0, "wins_short": 0, "win_prob_short": None,
             "reason": "insufficient",
         }
+    start = max(BARS_1H_WEEK, n_bars - lookback_days * 24 - forward_hours)
+    idx = np.arange(start, n_bars - forward_hours, forward_hours)
+    s, w = side[idx], win[idx]
+    counted = (s != SIDE_FLAT) & (w != WIN_UNKNOWN)
+    won = counted & (w == WIN_YES)
+    is_long, is_short = s == SIDE_LONG, s == SIDE_SHORT
+    n, wins = int(counted.sum()), int(won.sum())
+    n_l, wins_l = int((counted & is_long).sum()), int((won & is_long).sum())
+    n_s, wins_s = int((counted & is_short).sum()), int((won & is_short).sum())
 
-    closes = [float(r["close_price"]) for r in rows]
-    start = max(BARS_1H_WEEK, len(closes) - lookback_days * 24 - forward_hours)
-    wins = n = 0
-    wins_l = n_l = 0
-    wins_s = n_s = 0
-    for idx in range(start, len(closes) - forward_hours, forward_hours):
-        side = _direction_at(closes, idx, BARS_1H_WEEK)
-        if side == "FLAT":
-            continue
-        ok = _forward_win(closes, idx, side, forward_hours)
-        if ok is None:
-            continue
-        n += 1
-        if ok:
-            wins += 1
-        if side == "LONG":
-            n_l += 1
-            if ok:
-                wins_l += 1
-        else:
-            n_s += 1
-            if ok:
-                wins_s += 1
-
-    def _p(w, cnt):
-        return round(w / cnt, 4) if cnt else None
+    def _p(w_, cnt):
+        return round(w_ / cnt, 4) if cnt else None
 
     return {
         "symbol": symbol,
@@ -105,49 +158,326 @@ def evaluate_symbol_winrate(
     }
 
 
-def compute_pool_winrate(
-    conn,
-    symbols: Sequence[str],
+def _stack_right(series: List[np.ndarray], width: int) -> np.ndarray:
+    out = np.full((len(series), width), np.nan, dtype=np.float64)
+    for i, arr in enumerate(series):
+        arr = arr[-width:]
+        if len(arr):
+            out[i, width - len(arr):] = arr
+    return out
+
+
+def evaluate_symbol_winrate(
+    cur,
+    symbol: str,
     *,
-    max_symbols: int = 80,
-    use_cache: bool = True,
+    lookback_days: int = WINRATE_LOOKBACK_DAYS,
+    forward_hours: int = WINRATE_FORWARD_HOURS,
 ) -> Dict[str, Any]:
-    now = time.time()
-    if use_cache and _WINRATE_CACHE.get("payload") and now - float(_WINRATE_CACHE.get("ts") or 0) < _WINRATE_TTL_S:
-        return dict(_WINRATE_CACHE["payload"])
+    """单币 1h 规则回测胜率（总分 + 分向）。"""
+    symbol = futures_symbol_rating_canonical(symbol)
+    need = _need_bars(lookback_days, forward_hours)
+    rows = _fetch_klines(cur, symbol, "1h", need)
+    closes = np.array([float(r["close_price"]) for r in rows], dtype=np.float64)
+    side, win = rolling_outcomes(closes[None, :], 0, len(closes), forward=forward_hours)
+    return aggregate_winrate(symbol, side[0], win[0], forward_hours=forward_hours,
+                             lookback_days=lookback_days)
 
-    syms = [futures_symbol_rating_canonical(s) for s in symbols][:max_symbols]
-    per: Dict[str, Dict[str, Any]] = {}
-    total_n = total_wins = 0
-    pool_l_n = pool_l_w = 0
-    pool_s_n = pool_s_w = 0
+
+# ── 持久化 ───────────────────────────────────────────────
+
+_SCHEMA_READY = False
+
+_UPSERT_SQL = """
+    INSERT INTO brain_symbol_winrate
+      (symbol, last_open_time, n, wins, n_long, wins_long, n_short, wins_short,
+       win_prob, win_prob_long, win_prob_short, reason)
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+    ON DUPLICATE KEY UPDATE
+      last_open_time = VALUES(last_open_time), n = VALUES(n), wins = VALUES(wins),
+      n_long = VALUES(n_long), wins_long = VALUES(wins_long),
+      n_short = VALUES(n_short), wins_short = VALUES(wins_short),
+      win_prob = VALUES(win_prob), win_prob_long = VALUES(win_prob_long),
+      win_prob_short = VALUES(win_prob_short), reason = VALUES(reason)
+"""
+
+_RESULT_KEYS = ("n", "wins", "n_long", "wins_long", "n_short", "wins_short",
+                "win_prob", "win_prob_long", "win_prob_short", "reason")
+
+
+def ensure_winrate_schema(conn) -> None:
+    """CREATE IF NOT EXISTS — 幂等。"""
+    global _SCHEMA_READY
+    if _SCHEMA_READY:
+        return
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS brain_symbol_winrate (
+              symbol VARCHAR(32) NOT NULL,
+              last_open_time BIGINT NOT NULL,
+              n INT NOT NULL DEFAULT 0,
+              wins INT NOT NULL DEFAULT 0,
+              n_long INT NOT NULL DEFAULT 0,
+              wins_long INT NOT NULL DEFAULT 0,
+              n_short INT NOT NULL DEFAULT 0,
+              wins_short INT NOT NULL DEFAULT 0,
+              win_prob DOUBLE DEFAULT NULL,
+              win_prob_long DOUBLE DEFAULT NULL,
+              win_prob_short DOUBLE DEFAULT NULL,
+              reason VARCHAR(32) DEFAULT NULL,
+              updated_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+              PRIMARY KEY (symbol)
+            ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+            """
+        )
+    try:
+        conn.commit()
+    except Exception:
+        pass
+    _SCHEMA_READY = True
+
+
+def save_symbol_winrates(conn, results: Dict[str, Dict[str, Any]], last_open: Dict[str, int]) -> None:
+    """单币结果 upsert (key 为 BTC/USDT 格式)"""
+    if not results:
+        return
+    ensure_winrate_schema(conn)
+    params = [
+        (sym, int(last_open.get(sym) or 0), *(r.get(k) for k in _RESULT_KEYS))
+        for sym, r in results.items()
+    ]
+    with conn.cursor() as cur:
+        cur.executemany(_UPSERT_SQL, params)
+    conn.commit()
+
+
+def load_symbol_winrates(conn, symbols: Sequence[str], min_open_time: int = 0) -> Dict[str, Dict[str, Any]]:
+    """读 brain_symbol_winrate; 只返回 last_open_time >= min_open_time 的币种"""
+    syms = list(dict.fromkeys(futures_symbol_rating_canonical(s) for s in symbols))
+    if not syms:
+        return {}
+    ensure_winrate_schema(conn)
+    placeholders = ",".join(["%s"] * len(syms))
     with conn.cursor() as cur:
-        for sym in syms:
+        cur.execute(
+            f"SELECT symbol, last_open_time, {', '.join(_RESULT_KEYS)} FROM brain_symbol_winrate "
+            f"WHERE symbol IN ({placeholders}) AND last_open_time >= %s",
+            (*syms, int(min_open_time)),
+        )
+        rows = cur.fetchall()
+    out: Dict[str, Dict[str, Any]] = {}
+    for row in rows:
+        r = dict(zip(("symbol", "last_open_time", *_RESULT_KEYS), row)) if not isinstance(row, dict) else dict(row)
+        r.pop("last_open_time", None)
+        out[r["symbol"]] = r
+    return out
+
+
+# ── 增量评估器 ───────────────────────────────────────────
+
+class WinrateEvaluator:
+    """
+    全池逐根胜率结果的进程内增量维护
+
+    每币保存最近 need 根 1h 的 open_time / close 与逐根 (side, win).
+    refresh(): 当前小时已评估过直接返回; 否则新币种批量冷加载, 已跟踪币种只拉
+    「最后一根 - REFRESH_OVERLAP_BARS」之后的 K 线: 收盘价有变化 (未收盘 / 被修正) 或有新根时,
+    只重算从变化位置往前 forward 根开始的尾部.
+    """
+
+    def __init__(self, lookback_days: int = WINRATE_LOOKBACK_DAYS,
+                 forward_hours: int = WINRATE_FORWARD_HOURS):
+        self.lookback_days = lookback_days
+        self.forward = forward_hours
+        self.need = _need_bars(lookback_days, forward_hours)
+        self._times: Dict[str, np.ndarray] = {}
+        self._closes: Dict[str, np.ndarray] = {}
+        self._side: Dict[str, np.ndarray] = {}
+        self._win: Dict[str, np.ndarray] = {}
+        self.results: Dict[str, Dict[str, Any]] = {}
+        self.checked_hour = 0
+        self.stats: Dict[str, Any] = {"cold_symbols": 0, "refreshed": 0, "bars_evaluated": 0}
+        self._lock = threading.Lock()
+
+    def _fetch_bulk(self, conn, symbols: List[str], limit: int,
+                    since_ms: Optional[int] = None) -> Dict[str, Tuple[np.ndarray, np.ndarray]]:
+        """批量读 1h (缓存 / 窗口查询); 批量结果缺失的币种回落 _fetch_klines (兼容 BTCUSDT 写法)"""
+        out: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        try:
+            bulk = load_klines_bulk(conn, symbols, "1h", limit, since_ms=since_ms)
+        except Exception as e:
+            logger.debug(f"[BRAIN胜率] 批量读取失败, 回落逐币种: {e}")
+            bulk = {}
+        for sym, arr in bulk.items():
+            out[sym] = (arr["open_time"].astype(np.int64), arr["close"].astype(np.float64))
+        missing = [s for s in symbols if s not in out]
+        if missing:
+            with conn.cursor() as cur:
+                for sym in missing:
+                    rows = _fetch_klines(cur, sym, "1h", limit)
+                    if since_ms is not None:
+                        rows = [r for r in rows if int(r["open_time"]) >= since_ms]
+                    if rows:
+                        out[sym] = (
+                            np.array([int(r["open_time"]) for r in rows], dtype=np.int64),
+                            np.array([float(r["close_price"]) for r in rows], dtype=np.float64),
+                        )
+        return out
+
+    def _evaluate(self, symbols: List[str], starts: List[int]) -> None:
+        """对各币种从 starts[i] 起的尾部重算逐根结果 (堆叠成二维一次计算)"""
+        if not symbols:
+            return
+        closes = [self._closes[s] for s in symbols]
+        width = max(len(c) for c in closes)
+        stacked = _stack_right(closes, width)
+        lo = min(width - len(c) + st for c, st in zip(closes, starts))
+        side, win = rolling_outcomes(stacked, lo, width, forward=self.forward)
+        for i, sym in enumerate(symbols):
+            pad = width - len(closes[i])
+            st = starts[i]
+            self._side[sym][st:] = side[i, pad + st - lo:]
+            self._win[sym][st:] = win[i, pad + st - lo:]
+            self.stats["bars_evaluated"] += len(closes[i]) - st
+            self.results[sym] = aggregate_winrate(
+                sym, self._side[sym], self._win[sym],
+                forward_hours=self.forward, lookback_days=self.lookback_days,
+            )
+
+    def _cold_load(self, conn, symbols: List[str]) -> List[str]:
+        fetched = self._fetch_bulk(conn, symbols, self.need)
+        loaded = []
+        for sym in symbols:
+            times, closes = fetched.get(sym, (np.empty(0, np.int64), np.empty(0)))
+            self._times[sym], self._closes[sym] = times[-self.need:], closes[-self.need:]
+            self._side[sym] = np.zeros(len(self._closes[sym]), dtype=np.int8)
+            self._win[sym] = np.full(len(self._closes[sym]), WIN_UNKNOWN, dtype=np.int8)
+            loaded.append(sym)
+        self._evaluate(loaded, [0] * len(loaded))
+        self.stats["cold_symbols"] += len(loaded)
+        return loaded
+
+    def _apply_new_bars(self, sym: str, times: np.ndarray, closes: np.ndarray) -> Optional[int]:
+        """
+        合并增量 K 线, 返回需要重算的起始位置 (无变化返回 None).
+        增量与已有序列接不上 (停采过久) 时返回 -1, 由调用方冷加载.
+        """
+        old_t, old_c = self._times[sym], self._closes[sym]
+        if not len(times):
+            return None
+        if len(old_t) and times[0] > old_t[-1] and (times[0] - old_t[-1]) > _HOUR_MS * (_REFRESH_OVERLAP_BARS + 1):
+            return -1
+        pos = int(np.searchsorted(old_t, times[0], side="left"))
+        overlap = min(len(old_t) - pos, len(times))
+        if overlap and not np.array_equal(old_t[pos:pos + overlap], times[:overlap]):
+            return -1
+        changed = np.flatnonzero(old_c[pos:pos + overlap] != closes[:overlap])
+        grew = len(times) > overlap
+        if not len(changed) and not grew:
+            return None
+        first = pos + (int(changed[0]) if len(changed) else overlap)
+        new_t = np.concatenate((old_t[:pos], times))
+        new_c = np.concatenate((old_c[:pos], closes))
+        drop = max(0, len(new_t) - self.need)
+        side = np.concatenate((self._side[sym], np.zeros(len(new_t) - len(old_t), dtype=np.int8)))
+        win = np.concatenate((self._win[sym], np.full(len(new_t) - len(old_t), WIN_UNKNOWN, dtype=np.int8)))
+        self._times[sym], self._closes[sym] = new_t[drop:], new_c[drop:]
+        self._side[sym], self._win[sym] = side[drop:], win[drop:]
+        # 变化位置之前 forward 根的前向结果也受影响
+        return max(0, first - drop - self.forward)
+
+    def refresh(self, conn, symbols: Sequence[str], *, force: bool = False) -> bool:
+        """对齐到 1h 收盘的增量刷新; 返回是否实际读库"""
+        syms = list(dict.fromkeys(futures_symbol_rating_canonical(s) for s in symbols))
+        hour = int(time.time() * 1000) // _HOUR_MS * _HOUR_MS
+        with self._lock:
+            new_hour = force or hour > self.checked_hour
+            # 无数据的币种 (新上架 / 断采) 每小时重试一次冷加载
+            new_syms = [s for s in syms if s not in self._closes or (new_hour and not len(self._closes[s]))]
+            if not new_hour and not new_syms:
+                return False
+            changed: List[str] = []
+            if new_syms:
+                changed += self._cold_load(conn, new_syms)
+            tracked = [s for s in syms if s not in new_syms and len(self._times[s])] if new_hour else []
+            if tracked:
+                lasts = [int(self._times[s][-1]) for s in tracked]
+                # 断采过久的币种不拖低下界, 接不上时整体冷加载
+                since = max(min(lasts), max(lasts) - self.need * _HOUR_MS) - _REFRESH_OVERLAP_BARS * _HOUR_MS
+                limit = max(1, (max(hour, max(lasts)) - since) // _HOUR_MS + 2)
+                fetched = self._fetch_bulk(conn, tracked, int(limit), since_ms=since)
+                redo, starts, reload = [], [], []
+                for sym in tracked:
+                    if sym not in fetched:
+                        continue
+                    start = self._apply_new_bars(sym, *fetched[sym])
+                    if start is None:
+                        continue
+                    if start < 0:
+                        reload.append(sym)
+                    else:
+                        redo.append(sym)
+                        starts.append(start)
+                self._evaluate(redo, starts)
+                changed += redo
+                if reload:
+                    for sym in reload:
+                        self._closes.pop(sym, None)
+                    changed += self._cold_load(conn, reload)
+            self.checked_hour = hour
+            self.stats["refreshed"] += 1
+        if changed:
             try:
-                r = evaluate_symbol_winrate(cur, sym)
+                save_symbol_winrates(
+                    conn, {s: self.results[s] for s in changed},
+                    {s: int(self._times[s][-1]) if len(self._times[s]) else 0 for s in changed},
+                )
             except Exception as e:
-                logger.debug(f"[BRAIN胜率] {sym} 失败: {e}")
-                continue
-            per[sym.replace("/", "")] = r
-            total_n += int(r.get("n") or 0)
-            total_wins += int(r.get("wins") or 0)
-            pool_l_n += int(r.get("n_long") or 0)
-            pool_l_w += int(r.get("wins_long") or 0)
-            pool_s_n += int(r.get("n_short") or 0)
-            pool_s_w += int(r.get("wins_short") or 0)
+                logger.warning(f"[BRAIN胜率] 写 brain_symbol_winrate 失败: {e}")
+        return True
+
+    def get(self, symbol: str) -> Optional[Dict[str, Any]]:
+        return self.results.get(futures_symbol_rating_canonical(symbol))
+
+
+_evaluator: Optional[WinrateEvaluator] = None
+# 启动后本小时内沿用表内结果, 下一根收盘起由评估器接管
+_STORED_POOL: Dict[str, Any] = {}
+_evaluator_lock = threading.Lock()
+
+
+def get_winrate_evaluator() -> WinrateEvaluator:
+    """本进程胜率评估器 (懒创建)"""
+    global _evaluator
+    with _evaluator_lock:
+        if _evaluator is None:
+            _evaluator = WinrateEvaluator()
+        return _evaluator
+
+
+def _pool_payload(per: Dict[str, Dict[str, Any]], now: float) -> Dict[str, Any]:
+    total_n = total_wins = 0
+    pool_l_n = pool_l_w = 0
+    pool_s_n = pool_s_w = 0
+    for r in per.values():
+        total_n += int(r.get("n") or 0)
+        total_wins += int(r.get("wins") or 0)
+        pool_l_n += int(r.get("n_long") or 0)
+        pool_l_w += int(r.get("wins_long") or 0)
+        pool_s_n += int(r.get("n_short") or 0)
+        pool_s_w += int(r.get("wins_short") or 0)
 
     def _p(w, cnt):
         return round(w / cnt, 4) if cnt else None
 
     pool_prob = _p(total_wins, total_n)
-    pool_long = _p(pool_l_w, pool_l_n)
-    pool_short = _p(pool_s_w, pool_s_n)
-    payload = {
+    return {
         "pool_n": total_n,
         "pool_wins": total_wins,
         "pool_win_prob": pool_prob,
-        "pool_win_prob_long": pool_long,
-        "pool_win_prob_short": pool_short,
+        "pool_win_prob_long": _p(pool_l_w, pool_l_n),
+        "pool_win_prob_short": _p(pool_s_w, pool_s_n),
         "pool_n_long": pool_l_n,
         "pool_n_short": pool_s_n,
         "min_required": WIN_PROB_MIN,
@@ -158,13 +488,49 @@ def compute_pool_winrate(
         "per_symbol": per,
         "asof_ts": now,
     }
-    _WINRATE_CACHE["ts"] = now
-    _WINRATE_CACHE["payload"] = payload
-    logger.info(
-        f"[BRAIN胜率] 池 n={total_n} win={pool_prob} "
-        f"long={pool_long}(n={pool_l_n}) short={pool_short}(n={pool_s_n}) "
-        f"pass={payload['pass_gate']}"
-    )
+
+
+def compute_pool_winrate(
+    conn,
+    symbols: Sequence[str],
+    *,
+    max_symbols: int = 80,
+    use_cache: bool = True,
+) -> Dict[str, Any]:
+    """
+    池胜率. 逐根结果由 WinrateEvaluator 增量维护, 每根 1h 收盘后第一次调用才读库 (只拉新 K 线);
+    进程刚启动且 brain_symbol_winrate 已覆盖上一根收盘时直接用表内结果.
+    use_cache=False 强制刷新.
+    """
+    now = time.time()
+    syms = [futures_symbol_rating_canonical(s) for s in symbols][:max_symbols]
+    ev = get_winrate_evaluator()
+    hour = int(now * 1000) // _HOUR_MS * _HOUR_MS
+
+    if use_cache and not ev.results:
+        if _STORED_POOL.get("hour") == hour and _STORED_POOL.get("symbols") == syms:
+            return dict(_STORED_POOL["payload"])
+        try:
+            stored = load_symbol_winrates(conn, syms, min_open_time=hour - _HOUR_MS)
+        except Exception as e:
+            logger.debug(f"[BRAIN胜率] 读 brain_symbol_winrate 失败: {e}")
+            stored = {}
+        if syms and len(stored) == len(set(syms)):
+            payload = _pool_payload({s.replace("/", ""): stored[s] for s in syms}, now)
+            _STORED_POOL.update(hour=hour, symbols=syms, payload=payload)
+            return dict(payload)
+
+    t0 = time.perf_counter()
+    refreshed = ev.refresh(conn, syms, force=not use_cache)
+    per = {s.replace("/", ""): ev.results[s] for s in syms if s in ev.results}
+    payload = _pool_payload(per, now)
+    if refreshed:
+        logger.info(
+            f"[BRAIN胜率] 池 n={payload['pool_n']} win={payload['pool_win_prob']} "
+            f"long={payload['pool_win_prob_long']}(n={payload['pool_n_long']}) "
+            f"short={payload['pool_win_prob_short']}(n={payload['pool_n_short']}) "
+            f"pass={payload['pass_gate']} | 增量 {(time.perf_counter() - t0) * 1000:.0f}ms"
+        )
     return payload
 
 
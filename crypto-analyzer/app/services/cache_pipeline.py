@@ -0,0 +1,130 @@
+"""
+缓存刷新 DAG
+
+每个阶段声明输入 (上游阶段名) 并返回自己的输出; 无依赖关系的阶段在线程池里并行跑,
+下游阶段直接拿上游的内存结果, 不再先写缓存表再逐币种查回来.
+
+- 阶段函数是同步的 (DB / pandas), 用线程池而不是 asyncio.gather —— 协程体内没有 await, gather 只会串行
+- 上游失败时下游照跑, 对应输入为 None (由下游自行回落到缓存表), 与旧版"投资建议总是最后跑一次"一致
+- 每轮记录各阶段耗时 / 状态, 见 CachePipeline.run 返回值与 format_timings
+"""
+from __future__ import annotations
+
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from loguru import logger
+
+DEFAULT_MAX_WORKERS = 4
+
+
+@dataclass(frozen=True)
+class Stage:
+    """run(**{上游阶段名: 上游输出}) → 本阶段输出"""
+    name: str
+    run: Callable[..., Any]
+    inputs: Tuple[str, ...] = ()
+
+
+@dataclass
+class StageResult:
+    name: str
+    status: str = 'pending'             # ok / failed
+    output: Any = None
+    error: Optional[str] = None
+    start_ms: float = 0.0               # 相对本轮开始
+    elapsed_ms: float = 0.0
+    waited_on: Tuple[str, ...] = field(default_factory=tuple)
+
+
+class CachePipeline:
+    """按依赖关系调度阶段; 实例可重复 run"""
+
+    def __init__(self, stages: Iterable[Stage], max_workers: int = DEFAULT_MAX_WORKERS):
+        self.stages: Dict[str, Stage] = {}
+        for stage in stages:
+            if stage.name in self.stages:
+                raise ValueError(f"重复的阶段: {stage.name}")
+            self.stages[stage.name] = stage
+        for stage in self.stages.values():
+            unknown = [i for i in stage.inputs if i not in self.stages]
+            if unknown:
+                raise ValueError(f"阶段 {stage.name} 的输入不存在: {unknown}")
+        self.order = self._topo_order()
+        self.max_workers = max_workers
+
+    def _topo_order(self) -> List[str]:
+        order: List[str] = []
+        state: Dict[str, int] = {}      # 1 = 访问中, 2 = 完成
+
+        def visit(name: str, path: Tuple[str, ...]) -> None:
+            if state.get(name) == 2:
+                return
+            if state.get(name) == 1:
+                raise ValueError(f"阶段依赖成环: {' → '.join(path + (name,))}")
+            state[name] = 1
+            for dep in self.stages[name].inputs:
+                visit(dep, path + (name,))
+            state[name] = 2
+            order.append(name)
+
+        for name in self.stages:
+            visit(name, ())
+        return order
+
+    def run(self) -> Dict[str, StageResult]:
+        """跑一轮, 返回 {阶段名: StageResult} (按拓扑序)"""
+        t0 = time.perf_counter()
+        results = {name: StageResult(name, waited_on=self.stages[name].inputs) for name in self.order}
+        pending = list(self.order)
+        running = {}
+
+        def call(stage: Stage) -> Any:
+            res = results[stage.name]
+            res.start_ms = (time.perf_counter() - t0) * 1000
+            try:
+                return stage.run(**{i: results[i].output for i in stage.inputs})
+            finally:
+                res.elapsed_ms = (time.perf_counter() - t0) * 1000 - res.start_ms
+
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='cache-stage') as pool:
+            while pending or running:
+                for name in [n for n in pending
+                             if all(results[i].status not in ('pending', 'running') for i in self.stages[n].inputs)]:
+                    pending.remove(name)
+                    results[name].status = 'running'
+                    running[pool.submit(call, self.stages[name])] = name
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    res = results[running.pop(fut)]
+                    try:
+                        res.output = fut.result()
+                        res.status = 'ok'
+                    except Exception as e:
+                        res.status = 'failed'
+                        res.error = str(e)
+                        logger.warning(f"[cache_pipeline] 阶段 {res.name} 失败: {e}")
+        return results
+
+
+def format_timings(results: Dict[str, StageResult]) -> str:
+    """一行日志: 阶段 耗时 (失败标 ✗), 末尾为整轮墙钟时间"""
+    parts = [f"{r.name} {r.elapsed_ms / 1000:.2f}s{'' if r.status == 'ok' else ' ✗'}" for r in results.values()]
+    wall = max((r.start_ms + r.elapsed_ms for r in results.values()), default=0.0)
+    return f"{' | '.join(parts)} | 总 {wall / 1000:.2f}s"
+
+
+def timings_dict(results: Dict[str, StageResult]) -> Dict[str, Dict[str, Any]]:
+    """可序列化的阶段耗时 (接口 / task_stats 用)"""
+    return {
+        r.name: {
+            'status': r.status,
+            'start_ms': round(r.start_ms, 1),
+            'elapsed_ms': round(r.elapsed_ms, 1),
+            'inputs': list(r.waited_on),
+            'error': r.error,
+        }
+        for r in results.values()
+    }
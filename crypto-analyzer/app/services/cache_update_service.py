@@ -1,20 +1,51 @@
 """
 缓存更新服务
 用于定期更新各个缓存表，提升API性能
+
+各缓存按 DAG 刷新 (app/services/cache_pipeline.py): 价格统计 / 技术指标 / Hyperliquid / 新闻 / 资金费率 / ETF
+并行跑, 投资建议直接用上游阶段的内存结果; 上游没产出的币种 (WS 流式维护 / 本轮跳过 / 阶段失败)
+按表批量读一次兜底, 不再逐币种回查六张缓存表.
 """
 
 import asyncio
+import math
 from datetime import datetime, timedelta
-from typing import List, Dict, Optional
+from typing import Any, List, Dict, Optional, Tuple
 from loguru import logger
 import pandas as pd
-from sqlalchemy import text
+from sqlalchemy import bindparam, text
 
 from app.database.db_service import DatabaseService
 from app.database.hyperliquid_db import HyperliquidDB
 from app.analyzers.technical_indicators import TechnicalIndicators
-from app.analyzers.enhanced_investment_analyzer import EnhancedInvestmentAnalyzer
+from app.analyzers.enhanced_investment_analyzer import FRAME_COLUMNS, EnhancedInvestmentAnalyzer
 from app.services.hyperliquid_token_mapper import get_token_mapper
+from app.services.technical_indicators_cache import build_technical_cache_row, calculate_technical_score
+from app.services.streaming_indicators import is_stream_fresh
+from app.services.price_stats_aggregator import is_stream_live
+from app.services.cache_pipeline import CachePipeline, Stage, StageResult, format_timings, timings_dict
+
+# 刷新阶段 (DAG 节点); recommendations 依赖本轮启用的其它全部阶段
+PIPELINE_STAGES: Tuple[str, ...] = (
+    'price_stats', 'technical', 'hyperliquid', 'news', 'funding', 'etf', 'recommendations',
+)
+# 调度器每 5 分钟的分析缓存 (Hyperliquid 单独 10 分钟一轮, 投资建议读其缓存表)
+ANALYSIS_STAGES: Tuple[str, ...] = ('price_stats', 'technical', 'news', 'funding', 'etf', 'recommendations')
+
+# 投资建议用的技术指标周期: 旧实现 `WHERE symbol = ...` fetchone 按 uk_symbol_timeframe 取首行, 即 15m
+RECOMMENDATION_TECH_TIMEFRAME = '15m'
+ETF_ASSETS = ('BTC', 'ETH')
+
+
+def _num(value, default):
+    """缓存行数值字段: 空 / 0 / NaN / inf → default (NaN 写表时存为 NULL, 内存结果同样处理)"""
+    if not value:
+        return default
+    try:
+        v = float(value)
+    except (TypeError, ValueError):
+        return default
+    return v if math.isfinite(v) else default
 
 
 class CacheUpdateService:
@@ -32,37 +63,22 @@ class CacheUpdateService:
         self.technical_analyzer = TechnicalIndicators(config.get('indicators', {}))
         self.investment_analyzer = EnhancedInvestmentAnalyzer(config)
         self.token_mapper = get_token_mapper()
+        self.last_timings: Dict[str, Dict[str, Any]] = {}   # 最近一轮 DAG 各阶段耗时
 
     async def update_all_caches(self, symbols: List[str] = None):
         """
-        更新所有缓存表
+        更新所有缓存表 (DAG: 无依赖的阶段并行, 投资建议最后跑)
 
         Args:
             symbols: 币种列表，如果为None则使用配置中的币种
         """
-        if symbols is None:
-            symbols = self.config.get('symbols', ['BTC/USDT', 'ETH/USDT'])
-
-        # logger.info(f"🔄 开始更新缓存 - {len(symbols)} 个币种")  # 减少日志输出
         start_time = datetime.now()
 
         try:
-            # 并行更新各个缓存表
-            tasks = [
-                self.update_price_stats_cache(symbols),
-                self.update_technical_indicators_cache(symbols),
-                self.update_hyperliquid_aggregation(symbols),
-                self.update_news_sentiment_aggregation(symbols),
-                self.update_funding_rate_stats(symbols),
-            ]
-
-            results = await asyncio.gather(*tasks, return_exceptions=True)
-
-            # 最后更新投资建议缓存（依赖前面的缓存）
-            await self.update_recommendations_cache(symbols)
+            results = await self.run_pipeline(symbols)
 
             # 统计结果
-            success_count = sum(1 for r in results if not isinstance(r, Exception))
+            success_count = sum(1 for r in results.values() if r.status == 'ok')
             failed_count = len(results) - success_count
 
             elapsed = (datetime.now() - start_time).total_seconds()
@@ -70,7 +86,7 @@ class CacheUpdateService:
             if failed_count > 0 or datetime.now().minute == 0:
                 logger.info(
                     f"✅ 缓存更新完成 - 成功: {success_count}, 失败: {failed_count}, "
-                    f"耗时: {elapsed:.2f}秒"
+                    f"耗时: {elapsed:.2f}秒 ({format_timings(results)})"
                 )
 
         except Exception as e:
@@ -78,8 +94,42 @@ class CacheUpdateService:
             import traceback
             traceback.print_exc()
 
+    def build_pipeline(self, symbols: List[str], stages: Tuple[str, ...] = PIPELINE_STAGES) -> CachePipeline:
+        """按 stages 组装刷新 DAG; 各阶段输出见对应 _refresh_* 的返回值"""
+        runners = {
+            'price_stats': lambda: self._refresh_price_stats(symbols),
+            'technical': lambda: self._refresh_technical_indicators(symbols),
+            'hyperliquid': lambda: self._refresh_hyperliquid_aggregation(symbols),
+            'news': lambda: self._refresh_news_sentiment(symbols),
+            'funding': lambda: self._refresh_funding_rate_stats(symbols),
+            'etf': lambda: self._refresh_etf(symbols),
+            'recommendations': lambda **upstream: self._refresh_recommendations(symbols, **upstream),
+        }
+        unknown = [s for s in stages if s not in runners]
+        if unknown:
+            raise ValueError(f"未知的缓存阶段: {unknown}")
+        upstream = tuple(s for s in stages if s != 'recommendations')
+        return CachePipeline(
+            Stage(name, runners[name], upstream if name == 'recommendations' else ())
+            for name in stages
+        )
+
+    async def run_pipeline(self, symbols: List[str] = None,
+                           stages: Tuple[str, ...] = PIPELINE_STAGES) -> Dict[str, StageResult]:
+        """跑一轮刷新 DAG (线程池, 不阻塞事件循环); 各阶段耗时存入 self.last_timings"""
+        if symbols is None:
+            symbols = self.config.get('symbols', ['BTC/USDT', 'ETH/USDT'])
+        pipeline = self.build_pipeline(symbols, stages)
+        results = await asyncio.to_thread(pipeline.run)
+        self.last_timings = timings_dict(results)
+        return results
+
     async def update_price_stats_cache(self, symbols: List[str]):
-        """更新24小时价格统计缓存.
+        """更新24小时价格统计缓存 (见 _refresh_price_stats)"""
+        await asyncio.to_thread(self._refresh_price_stats, symbols)
+
+    def _refresh_price_stats(self, symbols: List[str]) -> None:
+        """更新24小时价格统计缓存. 整表 SQL 更新, 无内存输出 (下游从 price_stats_24h 批量读).
 
         2026-05-20 重构: 改成一条聚合 SQL 批量更新所有 symbol, 不再 per-symbol 循环.
         原 SQLAlchemy 实现 4 个查询 x 295 symbol ≈ 1200s/轮, 跟不上 1 分钟调度;
@@ -91,6 +141,12 @@ class CacheUpdateService:
         - high_24h / low_24h: 近 24h 内 5m K线 high/low 极值
         - volume_24h / quote_volume_24h: 近 24h 内 5m K线累计
         - change_24h: (current - 24h前) / 24h前 * 100
+
+        WS 采集进程在 5m 收盘时已经滚动更新该表 (price_stats_aggregator) 时整轮跳过,
+        本 SQL 只在滚动聚合未运行 / 已停摆时兜底.
+
+        每处 kline_data 扫描都带 open_time 下界 (含按 max_t 回表的外层), kline_data 按月分区后
+        只落在最近 1-2 个分区 (见 kline_storage).
         """
         lock_acquired = False
         try:
@@ -114,6 +170,10 @@ class CacheUpdateService:
 
         try:
             with conn.cursor() as cur:
+                if self._price_stats_streamed(cur):
+                    logger.debug("[price_stats] 滚动聚合维护中, 跳过整表更新")
+                    return
+
                 # 上一轮未完成则跳过，避免与 WS INSERT kline_data / coin_scores 叠锁
                 cur.execute("SELECT GET_LOCK('price_stats_24h_refresh', 0) AS got_lock")
                 lock_row = cur.fetchone()
@@ -139,6 +199,7 @@ class CacheUpdateService:
                               AND open_time >= (UNIX_TIMESTAMP(NOW() - INTERVAL 30 MINUTE) * 1000)
                             GROUP BY symbol
                         ) cap ON k.symbol=cap.symbol AND k.open_time=cap.max_t AND k.timeframe='5m'
+                      AND k.open_time >= (UNIX_TIMESTAMP(NOW() - INTERVAL 30 MINUTE) * 1000)
                     ) latest5m ON p.symbol = latest5m.symbol
                     LEFT JOIN (
                         -- 24h_ago_1h: 每个 symbol 24h 前最近 1h K线 close
@@ -152,6 +213,7 @@ class CacheUpdateService:
                               AND open_time >= (UNIX_TIMESTAMP(NOW() - INTERVAL 30 HOUR) * 1000)
                             GROUP BY symbol
                         ) cap ON k.symbol=cap.symbol AND k.open_time=cap.max_t AND k.timeframe='1h'
+                          AND k.open_time >= (UNIX_TIMESTAMP(NOW() - INTERVAL 30 HOUR) * 1000)
                     ) ago24h ON p.symbol = ago24h.symbol
                     LEFT JOIN (
                         -- 24h 内 5m K线高低 + 成交量
@@ -218,6 +280,7 @@ class CacheUpdateService:
                           AND open_time >= (UNIX_TIMESTAMP(NOW() - INTERVAL 30 MINUTE) * 1000)
                         GROUP BY symbol
                     ) cap ON k.symbol=cap.symbol AND k.open_time=cap.max_t AND k.timeframe='5m'
+                      AND k.open_time >= (UNIX_TIMESTAMP(NOW() - INTERVAL 30 MINUTE) * 1000)
                     LEFT JOIN price_stats_24h p ON k.symbol = p.symbol
                     WHERE p.symbol IS NULL
                 """)
@@ -239,6 +302,19 @@ class CacheUpdateService:
                 pass
         return
 
+    @staticmethod
+    def _price_stats_streamed(cur) -> bool:
+        """price_stats_24h 是否仍由 WS 采集进程的滚动聚合维护"""
+        try:
+            cur.execute("SELECT MAX(stream_open_time) FROM price_stats_24h")
+            row = cur.fetchone()
+        except Exception as e:
+            # 旧库尚无 stream_open_time 列 (WS 采集进程启动时补) → 走整表 SQL
+            logger.debug(f"读取 24h 统计滚动状态失败: {e}")
+            return False
+        latest = row[0] if isinstance(row, (tuple, list)) else None
+        return is_stream_live(latest)
+
     async def update_price_stats_cache_legacy(self, symbols: List[str]):
         """旧版 per-symbol 实现, 保留作 fallback (太慢, 实际不再被调用)."""
         for symbol in symbols:
@@ -343,6 +419,16 @@ class CacheUpdateService:
 
     async def update_technical_indicators_cache(self, symbols: List[str]):
         """更新技术指标缓存 - 支持多个时间周期（5m, 15m, 1h等）"""
+        await asyncio.to_thread(self._refresh_technical_indicators, symbols)
+
+    def _refresh_technical_indicators(self, symbols: List[str]) -> Dict[Tuple[str, str], dict]:
+        """
+        更新技术指标缓存
+
+        Returns:
+            本轮写入的缓存行 {(symbol, timeframe): technical_indicators_cache 行}; WS 流式维护的不在其中
+        """
+        written: Dict[Tuple[str, str], dict] = {}
         # logger.info("📈 更新技术指标缓存...")  # 减少日志输出
         
         # 定义要更新的时间周期
@@ -357,114 +443,47 @@ class CacheUpdateService:
             '1d': 50
         }
 
-        for symbol in symbols:
-            for timeframe in timeframes:
+        # WS 采集进程已在收盘时增量更新的 (symbol, timeframe) 不再整段重算
+        streamed = self._get_streamed_keys()
+
+        for timeframe in timeframes:
+            # 每个币种仍按原方式取 K 线, 但指标计算整批一次完成 (不再逐币种构建 DataFrame)
+            min_required = min_klines.get(timeframe, 50)
+            series = {}
+            for symbol in symbols:
+                if (symbol, timeframe) in streamed:
+                    continue
                 try:
                     # 获取足够的K线数据用于计算技术指标
                     klines = self.db_service.get_latest_klines(symbol, timeframe, limit=200)
-                    min_required = min_klines.get(timeframe, 50)
                     if not klines or len(klines) < min_required:
                         # 对于5m和15m，如果数据不足，记录警告但继续处理其他时间周期
                         if timeframe in ['5m', '15m']:
                             logger.debug(f"{symbol} {timeframe} K线数据不足({len(klines) if klines else 0}/{min_required})，跳过")
                         continue
+                    ordered = list(reversed(klines))
+                    series[symbol] = {
+                        'timestamp': [k.timestamp for k in ordered],
+                        'open': [float(k.open_price) for k in ordered],
+                        'high': [float(k.high_price) for k in ordered],
+                        'low': [float(k.low_price) for k in ordered],
+                        'close': [float(k.close_price) for k in ordered],
+                        'volume': [float(k.volume) for k in ordered],
+                    }
+                except Exception as e:
+                    logger.warning(f"读取{symbol} {timeframe} K线失败: {e}")
 
-                    # 转换为DataFrame
-                    df = pd.DataFrame([{
-                        'timestamp': k.timestamp,
-                        'open': float(k.open_price),
-                        'high': float(k.high_price),
-                        'low': float(k.low_price),
-                        'close': float(k.close_price),
-                        'volume': float(k.volume)
-                    } for k in reversed(klines)])
-
-                    # 计算技术指标
-                    indicators = self.technical_analyzer.analyze(df)
-                    if not indicators:
-                        continue
+            try:
+                batch = self.technical_analyzer.analyze_many(series)
+            except Exception as e:
+                logger.warning(f"批量计算{timeframe}技术指标失败: {e}")
+                continue
 
-                    # 提取指标数据
-                    rsi = indicators.get('rsi', {})
-                    macd = indicators.get('macd', {})
-                    bollinger = indicators.get('bollinger', {})
-                    ema = indicators.get('ema', {})
-                    kdj = indicators.get('kdj', {})
-                    volume = indicators.get('volume', {})
-
-                    # 计算技术评分 (0-100)
-                    technical_score = self._calculate_technical_score(indicators)
-
-                    # 生成技术信号
-                    # 重要：如果RSI超买，不应该给出买入信号；如果RSI超卖，不应该给出卖出信号
-                    rsi_value = rsi.get('value', 50)
-                    is_overbought = rsi_value > 70
-                    is_oversold = rsi_value < 30
-                    
-                    if is_overbought:
-                        # RSI超买：强制信号为SELL或HOLD，不能是BUY
-                        if technical_score >= 50:
-                            technical_signal = 'HOLD'  # 即使其他指标好，超买时也不买入
-                        elif technical_score >= 25:
-                            technical_signal = 'SELL'
-                        else:
-                            technical_signal = 'STRONG_SELL'
-                    elif is_oversold:
-                        # RSI超卖：强制信号为BUY或HOLD，不能是SELL
-                        if technical_score >= 50:
-                            technical_signal = 'STRONG_BUY'  # 超卖时，其他指标好就是强烈买入
-                        elif technical_score >= 40:
-                            technical_signal = 'BUY'
-                        else:
-                            technical_signal = 'HOLD'  # 即使其他指标不好，超卖时也不卖出
-                    else:
-                        # RSI正常范围：按评分正常判断
-                        if technical_score >= 75:
-                            technical_signal = 'STRONG_BUY'
-                        elif technical_score >= 60:
-                            technical_signal = 'BUY'
-                        elif technical_score >= 40:
-                            technical_signal = 'HOLD'
-                        elif technical_score >= 25:
-                            technical_signal = 'SELL'
-                        else:
-                            technical_signal = 'STRONG_SELL'
-
-                    # 获取24小时成交量（对于短周期，使用最近24小时的数据）
-                    volume_24h = volume.get('volume_24h', 0)
-                    volume_avg = volume.get('average_volume', 0)
-
-                    # 写入数据库
-                    self._upsert_technical_indicators(
-                        symbol=symbol,
-                        timeframe=timeframe,
-                        rsi_value=rsi.get('value'),
-                        rsi_signal=rsi.get('signal'),
-                        macd_value=macd.get('value'),
-                        macd_signal_line=macd.get('signal'),
-                        macd_histogram=macd.get('histogram'),
-                        macd_trend='bullish_cross' if macd.get('bullish_cross') else ('bearish_cross' if macd.get('bearish_cross') else 'neutral'),
-                        bb_upper=bollinger.get('upper'),
-                        bb_middle=bollinger.get('middle'),
-                        bb_lower=bollinger.get('lower'),
-                        bb_position=bollinger.get('position', 'middle'),
-                        bb_width=bollinger.get('width'),
-                        ema_short=ema.get('short'),
-                        ema_long=ema.get('long'),
-                        ema_trend=ema.get('trend', 'neutral'),
-                        kdj_k=kdj.get('k'),
-                        kdj_d=kdj.get('d'),
-                        kdj_j=kdj.get('j'),
-                        kdj_signal=kdj.get('signal'),
-                        volume_24h=volume_24h,
-                        volume_avg=volume_avg,
-                        volume_ratio=(volume_24h / volume_avg) if volume_avg > 0 else 1,
-                        volume_signal='high' if volume.get('above_average') else 'normal',
-                        technical_score=technical_score,
-                        technical_signal=technical_signal,
-                        data_points=len(df)
+            for symbol, indicators in batch.items():
+                try:
+                    written[(symbol, timeframe)] = self._write_technical_indicators(
+                        symbol, timeframe, indicators, data_points=len(series[symbol]['close'])
                     )
-
                 except Exception as e:
                     logger.warning(f"更新{symbol} {timeframe}技术指标失败: {e}")
                     import traceback
@@ -472,10 +491,48 @@ class CacheUpdateService:
                     continue
 
         # logger.info(f"✅ 技术指标缓存更新完成 - {len(symbols)} 个币种，{len(timeframes)} 个时间周期")  # 减少日志输出
+        return written
+
+    def _get_streamed_keys(self) -> set:
+        """technical_indicators_cache 中仍由流式指标跟踪的 (symbol, timeframe)"""
+        session = None
+        try:
+            session = self.db_service.get_session()
+            rows = session.execute(text(
+                "SELECT symbol, timeframe, stream_open_time FROM technical_indicators_cache "
+                "WHERE stream_open_time IS NOT NULL"
+            )).fetchall()
+            now_ms = int(datetime.now().timestamp() * 1000)
+            return {
+                (r[0], r[1]) for r in rows if is_stream_fresh(r[1], r[2], now_ms)
+            }
+        except Exception as e:
+            # 旧库尚无 stream_open_time 列 (WS 采集进程启动时补) → 全量重算
+            logger.debug(f"读取流式指标跟踪状态失败: {e}")
+            return set()
+        finally:
+            if session:
+                session.close()
+
+    def _write_technical_indicators(self, symbol: str, timeframe: str, indicators: dict, data_points: int) -> dict:
+        """由 TechnicalIndicators 指标字典生成评分/信号并写入 technical_indicators_cache, 返回该行"""
+        row = build_technical_cache_row(symbol, timeframe, indicators, data_points)
+        self._upsert_technical_indicators(**row)
+        return row
 
     async def update_hyperliquid_aggregation(self, symbols: List[str]):
         """更新Hyperliquid聚合数据"""
+        await asyncio.to_thread(self._refresh_hyperliquid_aggregation, symbols)
+
+    def _refresh_hyperliquid_aggregation(self, symbols: List[str]) -> Dict[str, dict]:
+        """
+        更新Hyperliquid聚合数据
+
+        Returns:
+            本轮写入的 24h 聚合行 {coin: hyperliquid_symbol_aggregation 行}
+        """
         # logger.info("🧠 更新Hyperliquid聚合缓存...")  # 减少日志输出
+        written: Dict[str, dict] = {}
 
         try:
             with HyperliquidDB() as db:
@@ -483,7 +540,7 @@ class CacheUpdateService:
 
                 if not monitored:
                     logger.warning("没有活跃的监控钱包")
-                    return
+                    return written
 
                 # 对每个币种进行聚合
                 for symbol in symbols:
@@ -569,7 +626,7 @@ class CacheUpdateService:
                             sentiment = 'neutral'
 
                         # 写入数据库
-                        self._upsert_hyperliquid_aggregation(
+                        row = dict(
                             symbol=coin,
                             period='24h',
                             net_flow=net_flow,
@@ -590,6 +647,8 @@ class CacheUpdateService:
                             hyperliquid_signal=hyperliquid_signal,
                             sentiment=sentiment
                         )
+                        self._upsert_hyperliquid_aggregation(**row)
+                        written[coin] = row
 
                     except Exception as e:
                         logger.warning(f"聚合{symbol} Hyperliquid数据失败: {e}")
@@ -599,18 +658,29 @@ class CacheUpdateService:
             logger.error(f"更新Hyperliquid聚合失败: {e}")
 
         # logger.info(f"✅ Hyperliquid聚合缓存更新完成 - {len(symbols)} 个币种")  # 减少日志输出
+        return written
 
     async def update_news_sentiment_aggregation(self, symbols: List[str]):
         """更新新闻情绪聚合"""
+        await asyncio.to_thread(self._refresh_news_sentiment, symbols)
+
+    def _refresh_news_sentiment(self, symbols: List[str]) -> Dict[str, dict]:
+        """
+        更新新闻情绪聚合
+
+        Returns:
+            本轮写入的 24h 聚合行 {coin: news_sentiment_aggregation 行}
+        """
         # logger.info("📰 更新新闻情绪聚合缓存...")  # 减少日志输出
+        written: Dict[str, dict] = {}
+
+        # 获取24小时内的新闻 (各币种共用一份, 原先每个币种各查一次同样的结果)
+        news_list = self.db_service.get_recent_news(hours=24, limit=1000)
 
         for symbol in symbols:
             try:
                 coin = symbol.split('/')[0]
 
-                # 获取24小时内的新闻
-                news_list = self.db_service.get_recent_news(hours=24, limit=1000)
-
                 # 筛选相关新闻
                 relevant_news = [
                     n for n in news_list
@@ -643,7 +713,7 @@ class CacheUpdateService:
                 news_score = self._calculate_news_score(sentiment_index, total_news, len(major_events))
 
                 # 写入数据库
-                self._upsert_news_sentiment(
+                row = dict(
                     symbol=coin,
                     period='24h',
                     total_news=total_news,
@@ -655,16 +725,29 @@ class CacheUpdateService:
                     major_events_count=len(major_events),
                     news_score=news_score
                 )
+                self._upsert_news_sentiment(**row)
+                written[coin] = row
 
             except Exception as e:
                 logger.warning(f"更新{symbol}新闻情绪失败: {e}")
                 continue
 
         # logger.info(f"✅ 新闻情绪聚合缓存更新完成 - {len(symbols)} 个币种")  # 减少日志输出
+        return written
 
     async def update_funding_rate_stats(self, symbols: List[str]):
         """更新资金费率统计"""
+        await asyncio.to_thread(self._refresh_funding_rate_stats, symbols)
+
+    def _refresh_funding_rate_stats(self, symbols: List[str]) -> Dict[str, dict]:
+        """
+        更新资金费率统计
+
+        Returns:
+            本轮写入的行 {symbol: funding_rate_stats 行}
+        """
         # logger.info("💰 更新资金费率统计缓存...")  # 减少日志输出
+        written: Dict[str, dict] = {}
 
         for symbol in symbols:
             try:
@@ -697,7 +780,7 @@ class CacheUpdateService:
                     trend = 'neutral'
 
                 # 写入数据库
-                self._upsert_funding_rate_stats(
+                row = dict(
                     symbol=symbol,
                     current_rate=current_rate,
                     current_rate_pct=current_rate_pct,
@@ -706,104 +789,163 @@ class CacheUpdateService:
                     funding_score=funding_score,
                     exchange=current_funding.exchange
                 )
+                self._upsert_funding_rate_stats(**row)
+                written[symbol] = row
 
             except Exception as e:
                 logger.warning(f"更新{symbol}资金费率统计失败: {e}")
                 continue
 
         # logger.info(f"✅ 资金费率统计缓存更新完成 - {len(symbols)} 个币种")  # 减少日志输出
+        return written
 
     async def update_recommendations_cache(self, symbols: List[str]):
         """更新投资建议缓存（综合所有缓存表的数据）"""
-        logger.info("🎯 更新投资建议缓存...")
+        await asyncio.to_thread(self._refresh_recommendations, symbols)
+
+    def _refresh_recommendations(self, symbols: List[str],
+                                 price_stats: Any = None,
+                                 technical: Optional[Dict[Tuple[str, str], dict]] = None,
+                                 news: Optional[Dict[str, dict]] = None,
+                                 funding: Optional[Dict[str, dict]] = None,
+                                 hyperliquid: Optional[Dict[str, dict]] = None,
+                                 etf: Optional[Dict[str, dict]] = None) -> int:
+        """
+        更新投资建议缓存
 
-        for symbol in symbols:
-            try:
-                # 从缓存表读取各维度数据
-                technical_data = self._get_cached_technical_data(symbol)
-                news_data = self._get_cached_news_data(symbol)
-                funding_data = self._get_cached_funding_data(symbol)
-                hyperliquid_data = self._get_cached_hyperliquid_data(symbol)
-                price_stats = self._get_cached_price_stats(symbol)
-                etf_data = self._get_cached_etf_data(symbol)  # 新增：获取ETF数据
-
-                # 获取当前价格
-                current_price = price_stats.get('current_price', 0) if price_stats else 0
-
-                if current_price == 0:
-                    continue
+        上游阶段的内存结果优先; 缺的币种按表批量读一次缓存表 (每表一条 IN 查询, 最多六条).
+        price_stats 阶段只做整表 SQL 更新, 价格总是批量读 price_stats_24h.
+        拼成一张列式表交给 analyze_many 一次算完, 结果一次批量写回.
 
-                # 使用投资分析器生成综合分析
-                analysis = self.investment_analyzer.analyze(
-                    symbol=symbol,
-                    technical_data=technical_data,
-                    news_data=news_data,
-                    funding_data=funding_data,
-                    hyperliquid_data=hyperliquid_data,
-                    ethereum_data=None,
-                    etf_data=etf_data,  # 新增：传入ETF数据
-                    current_price=current_price
+        Returns:
+            写入的币种数
+        """
+        logger.info("🎯 更新投资建议缓存...")
+        coins = {symbol: symbol.split('/')[0] for symbol in symbols}
+        tf = RECOMMENDATION_TECH_TIMEFRAME
+
+        prices = self._load_cache_rows('price_stats_24h', list(symbols))
+        technical_rows = {s: row for (s, t), row in (technical or {}).items() if t == tf}
+        missing = [s for s in symbols if s not in technical_rows]
+        if missing:
+            technical_rows.update(self._load_cache_rows(
+                'technical_indicators_cache', missing, "timeframe = :timeframe", {'timeframe': tf}
+            ))
+        news_rows = dict(news or {})
+        missing = sorted({c for c in coins.values() if c not in news_rows})
+        if missing:
+            news_rows.update(self._load_cache_rows('news_sentiment_aggregation', missing, "period = '24h'"))
+        funding_rows = dict(funding or {})
+        missing = [s for s in symbols if s not in funding_rows]
+        if missing:
+            funding_rows.update(self._load_cache_rows('funding_rate_stats', missing))
+        hyperliquid_rows = dict(hyperliquid or {})
+        missing = sorted({c for c in coins.values() if c not in hyperliquid_rows})
+        if missing:
+            hyperliquid_rows.update(self._load_cache_rows('hyperliquid_symbol_aggregation', missing, "period = '24h'"))
+        if etf is None:
+            etf = self._refresh_etf(symbols)
+
+        frame = self._recommendation_frame(
+            symbols, prices, technical_rows, news_rows, funding_rows, hyperliquid_rows, etf
+        )
+        analyses = self.investment_analyzer.analyze_many(frame)
+        written = self._upsert_recommendations(list(analyses.values()))
+
+        logger.info(f"✅ 投资建议缓存更新完成 - {written}/{len(symbols)} 个币种")
+        return written
+
+    @classmethod
+    def _recommendation_frame(cls, symbols: List[str], prices: Dict[str, dict], technical: Dict[str, dict],
+                              news: Dict[str, dict], funding: Dict[str, dict], hyperliquid: Dict[str, dict],
+                              etf: Dict[str, dict]) -> pd.DataFrame:
+        """各缓存行 → analyze_many 的列式输入 (列见 FRAME_COLUMNS); 没有价格的币种跳过"""
+        records = []
+        for symbol in symbols:
+            coin = symbol.split('/')[0]
+            price_view = cls._price_view(prices.get(symbol))
+            current_price = price_view.get('current_price', 0) if price_view else 0
+            if current_price == 0:
+                continue
+            record = {'symbol': symbol, 'current_price': current_price, 'etf': etf.get(coin.upper())}
+            tech = cls._technical_view(technical.get(symbol), current_price)
+            if tech:
+                record.update(
+                    has_technical=True, rsi_value=tech['rsi']['value'], macd_histogram=tech['macd']['histogram'],
+                    macd_bullish_cross=tech['macd']['bullish_cross'], macd_bearish_cross=tech['macd']['bearish_cross'],
+                    ema_trend=tech['ema']['trend'], volume_above_average=tech['volume']['above_average'],
                 )
+            news_view = cls._news_view(news.get(coin))
+            if news_view:
+                record.update(has_news=True, sentiment_index=news_view['sentiment_index'],
+                              total_news=news_view['total_news'], major_events_count=news_view['major_events_count'])
+            funding_view = cls._funding_view(funding.get(symbol))
+            if funding_view:
+                record.update(has_funding=True, funding_rate=funding_view['funding_rate'])
+            hl_view = cls._hyperliquid_view(hyperliquid.get(coin))
+            if hl_view:
+                record.update(has_hyperliquid=True, **{
+                    k: hl_view[k] for k in ('net_flow', 'long_trades', 'short_trades', 'avg_pnl', 'active_wallets')
+                })
+            records.append(record)
+        if not records:
+            return pd.DataFrame(columns=list(FRAME_COLUMNS))
+        return pd.DataFrame.from_records(records, index='symbol')
+
+    def _refresh_etf(self, symbols: List[str]) -> Dict[str, dict]:
+        """ETF 资金流向 (只有 BTC / ETH), 返回 {asset_type: etf_data}; 各资产最近 7 天一条查询读完"""
+        assets = sorted({symbol.split('/')[0].upper() for symbol in symbols} & set(ETF_ASSETS))
+        if not assets:
+            return {}
+        session = None
+        try:
+            session = self.db_service.get_session()
+            sql = text("""
+                SELECT * FROM (
+                    SELECT
+                        asset_type,
+                        trade_date,
+                        total_net_inflow,
+                        total_gross_inflow,
+                        total_gross_outflow,
+                        total_aum,
+                        etf_count,
+                        inflow_count,
+                        outflow_count,
+                        top_inflow_ticker,
+                        top_inflow_amount,
+                        ROW_NUMBER() OVER (PARTITION BY asset_type ORDER BY trade_date DESC) AS rn
+                    FROM crypto_etf_daily_summary
+                    WHERE asset_type IN :assets
+                ) t
+                WHERE rn <= 7
+                ORDER BY asset_type, trade_date DESC
+            """).bindparams(bindparam('assets', expanding=True))
+            rows = session.execute(sql, {'assets': assets}).fetchall()
+        except Exception as e:
+            logger.warning(f"读取ETF缓存失败: {e}")
+            return {}
+        finally:
+            if session:
+                session.close()
 
-                # 写入投资建议缓存
-                self._upsert_recommendation(symbol, analysis)
-
+        records: Dict[str, List[dict]] = {}
+        for row in rows:
+            record = dict(row._mapping) if hasattr(row, '_mapping') else dict(row)
+            records.setdefault(record['asset_type'], []).append(record)
+        out = {}
+        for asset_type, etf_records in records.items():
+            try:
+                out[asset_type] = self._etf_view(asset_type, etf_records)
             except Exception as e:
-                logger.warning(f"更新{symbol}投资建议失败: {e}")
-                import traceback
-                traceback.print_exc()
-                continue
-
-        logger.info(f"✅ 投资建议缓存更新完成 - {len(symbols)} 个币种")
+                logger.warning(f"计算{asset_type} ETF评分失败: {e}")
+        return out
 
     # ========== 辅助方法：计算评分 ==========
 
     def _calculate_technical_score(self, indicators: dict) -> float:
         """计算技术指标综合评分 (0-100)"""
-        score = 50.0  # 基础分
-
-        # RSI评分
-        rsi = indicators.get('rsi', {})
-        rsi_value = rsi.get('value', 50)
-        if rsi_value < 30:
-            score += 15  # 超卖，看涨
-        elif rsi_value > 70:
-            score -= 15  # 超买，看跌
-        elif 40 <= rsi_value <= 60:
-            score += 5  # 中性区域
-
-        # MACD评分
-        macd = indicators.get('macd', {})
-        if macd.get('bullish_cross'):
-            score += 15
-        elif macd.get('bearish_cross'):
-            score -= 15
-
-        # EMA趋势评分（包含放量倍数）
-        ema = indicators.get('ema', {})
-        volume_multiple = ema.get('volume_multiple', 1.0)
-
-        if ema.get('trend') == 'up':
-            score += 10
-            # 如果上涨趋势且放量，额外加分
-            if volume_multiple >= 2.0:
-                score += 10  # 放量2倍以上
-            elif volume_multiple >= 1.5:
-                score += 5   # 放量1.5倍以上
-        elif ema.get('trend') == 'down':
-            score -= 10
-            # 如果下跌趋势且放量，额外减分
-            if volume_multiple >= 2.0:
-                score -= 10  # 放量2倍以上
-            elif volume_multiple >= 1.5:
-                score -= 5   # 放量1.5倍以上
-
-        # 成交量评分
-        volume = indicators.get('volume', {})
-        if volume.get('above_average'):
-            score += 10
-
-        return max(0, min(100, score))
+        return calculate_technical_score(indicators)
 
     def _calculate_hyperliquid_score(self, net_flow: float, long_short_ratio: float,
                                       active_wallets: int, avg_pnl: float) -> float:
@@ -876,272 +1018,168 @@ class CacheUpdateService:
 
     # ========== 辅助方法：从缓存表读取数据 ==========
 
-    def _get_cached_technical_data(self, symbol: str) -> Optional[dict]:
-        """从缓存表读取技术指标数据"""
+    def _load_cache_rows(self, table: str, keys: List[str], where: str = '',
+                         params: Optional[dict] = None) -> Dict[str, dict]:
+        """按 symbol 批量读缓存表: {symbol: 行}; 读取失败返回空 (对应维度按缺失处理)"""
+        if not keys:
+            return {}
         session = None
         try:
             session = self.db_service.get_session()
-            sql = text("SELECT * FROM technical_indicators_cache WHERE symbol = :symbol")
-            result = session.execute(sql, {"symbol": symbol}).fetchone()
-
-            if not result:
-                return None
-
-            # Convert result to dict
-            result_dict = dict(result._mapping) if hasattr(result, '_mapping') else dict(result)
-
-            return {
-                'price': self._get_cached_price_stats(symbol).get('current_price', 0) if self._get_cached_price_stats(symbol) else 0,
-                'rsi': {
-                    'value': float(result_dict['rsi_value']) if result_dict.get('rsi_value') else 50,
-                    'signal': result_dict.get('rsi_signal')
-                },
-                'macd': {
-                    'value': float(result_dict['macd_value']) if result_dict.get('macd_value') else 0,
-                    'signal': float(result_dict['macd_signal_line']) if result_dict.get('macd_signal_line') else 0,
-                    'histogram': float(result_dict['macd_histogram']) if result_dict.get('macd_histogram') else 0,
-                    'bullish_cross': result_dict.get('macd_trend') == 'bullish_cross',
-                    'bearish_cross': result_dict.get('macd_trend') == 'bearish_cross'
-                },
-                'ema': {
-                    'trend': result_dict.get('ema_trend')
-                },
-                'volume': {
-                    'above_average': result_dict.get('volume_signal') == 'high'
-                }
-            }
+            sql = text(
+                f"SELECT * FROM {table} WHERE symbol IN :symbols" + (f" AND {where}" if where else "")
+            ).bindparams(bindparam('symbols', expanding=True))
+            rows = session.execute(sql, {'symbols': list(keys), **(params or {})}).fetchall()
+            out = {}
+            for row in rows:
+                row_dict = dict(row._mapping) if hasattr(row, '_mapping') else dict(row)
+                out.setdefault(row_dict['symbol'], row_dict)
+            return out
         except Exception as e:
-            logger.warning(f"读取{symbol}技术指标缓存失败: {e}")
-            return None
+            logger.warning(f"批量读取{table}缓存失败: {e}")
+            return {}
         finally:
             if session:
                 session.close()
 
-    def _get_cached_news_data(self, symbol: str) -> Optional[dict]:
-        """从缓存表读取新闻情绪数据"""
-        session = None
-        try:
-            coin = symbol.split('/')[0]
-            session = self.db_service.get_session()
-
-            sql = text("SELECT * FROM news_sentiment_aggregation WHERE symbol = :symbol AND period = '24h'")
-            result = session.execute(sql, {"symbol": coin}).fetchone()
-
-            if not result:
-                return None
-
-            # Convert to dict
-            result_dict = dict(result._mapping) if hasattr(result, '_mapping') else dict(result)
-
-            return {
-                'sentiment_index': float(result_dict['sentiment_index']) if result_dict.get('sentiment_index') else 0.5,
-                'total_news': result_dict['total_news'] if result_dict.get('total_news') else 0,
-                'positive': result_dict['positive_news'] if result_dict.get('positive_news') else 0,
-                'negative': result_dict['negative_news'] if result_dict.get('negative_news') else 0,
-                'major_events_count': result_dict['major_events_count'] if result_dict.get('major_events_count') else 0,
-                'news_score': float(result_dict['news_score']) if result_dict.get('news_score') else 50
-            }
-        except Exception as e:
-            logger.warning(f"读取{symbol}新闻缓存失败: {e}")
+    @staticmethod
+    def _technical_view(row: Optional[dict], price: float) -> Optional[dict]:
+        """technical_indicators_cache 行 → 投资分析器的技术指标输入"""
+        if not row:
             return None
-        finally:
-            if session:
-                session.close()
-
-    def _get_cached_funding_data(self, symbol: str) -> Optional[dict]:
-        """从缓存表读取资金费率数据"""
-        session = None
-        try:
-            session = self.db_service.get_session()
-
-            sql = text("SELECT * FROM funding_rate_stats WHERE symbol = :symbol")
-            result = session.execute(sql, {"symbol": symbol}).fetchone()
-
-            if not result:
-                return None
-
-            # Convert to dict
-            result_dict = dict(result._mapping) if hasattr(result, '_mapping') else dict(result)
-
-            return {
-                'funding_rate': float(result_dict['current_rate']) if result_dict.get('current_rate') else 0,
-                'funding_rate_pct': float(result_dict['current_rate_pct']) if result_dict.get('current_rate_pct') else 0,
-                'trend': result_dict['trend'] if result_dict.get('trend') else 'neutral',
-                'market_sentiment': result_dict['market_sentiment'] if result_dict.get('market_sentiment') else 'normal',
-                'funding_score': float(result_dict['funding_score']) if result_dict.get('funding_score') else 50
+        return {
+            'price': price,
+            'rsi': {
+                'value': _num(row.get('rsi_value'), 50),
+                'signal': row.get('rsi_signal')
+            },
+            'macd': {
+                'value': _num(row.get('macd_value'), 0),
+                'signal': _num(row.get('macd_signal_line'), 0),
+                'histogram': _num(row.get('macd_histogram'), 0),
+                'bullish_cross': row.get('macd_trend') == 'bullish_cross',
+                'bearish_cross': row.get('macd_trend') == 'bearish_cross'
+            },
+            'ema': {
+                'trend': row.get('ema_trend')
+            },
+            'volume': {
+                'above_average': row.get('volume_signal') == 'high'
             }
-        except Exception as e:
-            logger.warning(f"读取{symbol}资金费率缓存失败: {e}")
-            return None
-        finally:
-            if session:
-                session.close()
-
-    def _get_cached_hyperliquid_data(self, symbol: str) -> Optional[dict]:
-        """从缓存表读取Hyperliquid数据"""
-        session = None
-        try:
-            coin = symbol.split('/')[0]
-            session = self.db_service.get_session()
-
-            sql = text("SELECT * FROM hyperliquid_symbol_aggregation WHERE symbol = :symbol AND period = '24h'")
-            result = session.execute(sql, {"symbol": coin}).fetchone()
-
-            if not result:
-                return None
-
-            # Convert to dict
-            result_dict = dict(result._mapping) if hasattr(result, '_mapping') else dict(result)
+        }
 
-            return {
-                'net_flow': float(result_dict['net_flow']) if result_dict.get('net_flow') else 0,
-                'long_trades': result_dict['long_trades'] if result_dict.get('long_trades') else 0,
-                'short_trades': result_dict['short_trades'] if result_dict.get('short_trades') else 0,
-                'active_wallets': result_dict['active_wallets'] if result_dict.get('active_wallets') else 0,
-                'avg_pnl': float(result_dict['avg_pnl']) if result_dict.get('avg_pnl') else 0,
-                'hyperliquid_score': float(result_dict['hyperliquid_score']) if result_dict.get('hyperliquid_score') else 50
-            }
-        except Exception as e:
-            logger.warning(f"读取{symbol} Hyperliquid缓存失败: {e}")
+    @staticmethod
+    def _news_view(row: Optional[dict]) -> Optional[dict]:
+        """news_sentiment_aggregation 行 → 新闻情绪输入"""
+        if not row:
             return None
-        finally:
-            if session:
-                session.close()
-
-    def _get_cached_price_stats(self, symbol: str) -> Optional[dict]:
-        """从缓存表读取价格统计数据"""
-        session = None
-        try:
-            session = self.db_service.get_session()
-
-            sql = text("SELECT * FROM price_stats_24h WHERE symbol = :symbol")
-            result = session.execute(sql, {"symbol": symbol}).fetchone()
+        return {
+            'sentiment_index': _num(row.get('sentiment_index'), 0.5),
+            'total_news': row.get('total_news') or 0,
+            'positive': row.get('positive_news') or 0,
+            'negative': row.get('negative_news') or 0,
+            'major_events_count': row.get('major_events_count') or 0,
+            'news_score': _num(row.get('news_score'), 50)
+        }
 
-            if not result:
-                return None
+    @staticmethod
+    def _funding_view(row: Optional[dict]) -> Optional[dict]:
+        """funding_rate_stats 行 → 资金费率输入"""
+        if not row:
+            return None
+        return {
+            'funding_rate': _num(row.get('current_rate'), 0),
+            'funding_rate_pct': _num(row.get('current_rate_pct'), 0),
+            'trend': row.get('trend') or 'neutral',
+            'market_sentiment': row.get('market_sentiment') or 'normal',
+            'funding_score': _num(row.get('funding_score'), 50)
+        }
 
-            # Convert to dict
-            result_dict = dict(result._mapping) if hasattr(result, '_mapping') else dict(result)
+    @staticmethod
+    def _hyperliquid_view(row: Optional[dict]) -> Optional[dict]:
+        """hyperliquid_symbol_aggregation 行 → Hyperliquid 输入"""
+        if not row:
+            return None
+        return {
+            'net_flow': _num(row.get('net_flow'), 0),
+            'long_trades': row.get('long_trades') or 0,
+            'short_trades': row.get('short_trades') or 0,
+            'active_wallets': row.get('active_wallets') or 0,
+            'avg_pnl': _num(row.get('avg_pnl'), 0),
+            'hyperliquid_score': _num(row.get('hyperliquid_score'), 50)
+        }
 
-            return {
-                'current_price': float(result_dict['current_price']) if result_dict.get('current_price') else 0,
-                'change_24h': float(result_dict['change_24h']) if result_dict.get('change_24h') else 0,
-                'volume_24h': float(result_dict['volume_24h']) if result_dict.get('volume_24h') else 0
-            }
-        except Exception as e:
-            logger.warning(f"读取{symbol}价格统计缓存失败: {e}")
+    @staticmethod
+    def _price_view(row: Optional[dict]) -> Optional[dict]:
+        """price_stats_24h 行 → 价格统计"""
+        if not row:
             return None
-        finally:
-            if session:
-                session.close()
+        return {
+            'current_price': _num(row.get('current_price'), 0),
+            'change_24h': _num(row.get('change_24h'), 0),
+            'volume_24h': _num(row.get('volume_24h'), 0)
+        }
 
-    def _get_cached_etf_data(self, symbol: str) -> Optional[dict]:
+    def _etf_view(self, asset_type: str, etf_records: List[dict]) -> dict:
         """
-        从缓存表读取ETF资金流向数据
+        由最近 7 天 ETF 汇总 (trade_date 倒序) 计算评分和信号
 
         Args:
-            symbol: 交易对，如 'BTC/USDT' 或 'ETH/USDT'
+            asset_type: 'BTC' 或 'ETH'
+            etf_records: crypto_etf_daily_summary 行
 
         Returns:
             ETF数据字典，包含评分和详细信息
         """
-        session = None
-        try:
-            # 从symbol提取资产类型 (BTC/USDT -> BTC, ETH/USDT -> ETH)
-            asset_type = symbol.split('/')[0].upper()
-
-            # 只处理BTC和ETH
-            if asset_type not in ['BTC', 'ETH']:
-                return None
-
-            session = self.db_service.get_session()
-
-            # 获取最近7天的ETF汇总数据
-            sql = text("""
-                SELECT
-                    trade_date,
-                    total_net_inflow,
-                    total_gross_inflow,
-                    total_gross_outflow,
-                    total_aum,
-                    etf_count,
-                    inflow_count,
-                    outflow_count,
-                    top_inflow_ticker,
-                    top_inflow_amount
-                FROM crypto_etf_daily_summary
-                WHERE asset_type = :asset_type
-                ORDER BY trade_date DESC
-                LIMIT 7
-            """)
-
-            results = session.execute(sql, {"asset_type": asset_type}).fetchall()
-
-            if not results or len(results) == 0:
-                return None
-
-            # 将结果转换为字典列表
-            etf_records = []
-            for row in results:
-                record = dict(row._mapping) if hasattr(row, '_mapping') else dict(row)
-                etf_records.append(record)
-
-            # 计算ETF评分和信号
-            latest = etf_records[0]
-            latest_inflow = float(latest['total_net_inflow']) if latest.get('total_net_inflow') else 0
-
-            # 计算3日平均流入
-            recent_3 = etf_records[:min(3, len(etf_records))]
-            avg_3day_inflow = sum(float(r['total_net_inflow'] or 0) for r in recent_3) / len(recent_3)
-
-            # 计算7日总流入
-            weekly_total = sum(float(r['total_net_inflow'] or 0) for r in etf_records)
-
-            # 计算ETF评分 (0-100)
-            etf_score = self._calculate_etf_score(latest_inflow, avg_3day_inflow, weekly_total)
-
-            # 确定信号
-            if avg_3day_inflow > 100000000:  # 1亿美元
-                signal = 'STRONG_BUY'
-                confidence = 0.9
-            elif avg_3day_inflow > 50000000:  # 5千万美元
-                signal = 'BUY'
-                confidence = 0.75
-            elif avg_3day_inflow < -100000000:
-                signal = 'STRONG_SELL'
-                confidence = 0.9
-            elif avg_3day_inflow < -50000000:
-                signal = 'SELL'
-                confidence = 0.75
-            else:
-                signal = 'NEUTRAL'
-                confidence = 0.5
-
-            return {
-                'score': etf_score,
-                'signal': signal,
-                'confidence': confidence,
-                'details': {
-                    'asset_type': asset_type,
-                    'latest_date': str(latest['trade_date']),
-                    'total_net_inflow': latest_inflow,
-                    'avg_3day_inflow': avg_3day_inflow,
-                    'weekly_total_inflow': weekly_total,
-                    'total_aum': float(latest['total_aum']) if latest.get('total_aum') else 0,
-                    'etf_count': latest['etf_count'] if latest.get('etf_count') else 0,
-                    'inflow_count': latest['inflow_count'] if latest.get('inflow_count') else 0,
-                    'outflow_count': latest['outflow_count'] if latest.get('outflow_count') else 0,
-                    'top_inflow_ticker': latest.get('top_inflow_ticker'),
-                    'top_inflow_amount': float(latest['top_inflow_amount']) if latest.get('top_inflow_amount') else 0
-                }
+        # 计算ETF评分和信号
+        latest = etf_records[0]
+        latest_inflow = float(latest['total_net_inflow']) if latest.get('total_net_inflow') else 0
+
+        # 计算3日平均流入
+        recent_3 = etf_records[:min(3, len(etf_records))]
+        avg_3day_inflow = sum(float(r['total_net_inflow'] or 0) for r in recent_3) / len(recent_3)
+
+        # 计算7日总流入
+        weekly_total = sum(float(r['total_net_inflow'] or 0) for r in etf_records)
+
+        # 计算ETF评分 (0-100)
+        etf_score = self._calculate_etf_score(latest_inflow, avg_3day_inflow, weekly_total)
+
+        # 确定信号
+        if avg_3day_inflow > 100000000:  # 1亿美元
+            signal = 'STRONG_BUY'
+            confidence = 0.9
+        elif avg_3day_inflow > 50000000:  # 5千万美元
+            signal = 'BUY'
+            confidence = 0.75
+        elif avg_3day_inflow < -100000000:
+            signal = 'STRONG_SELL'
+            confidence = 0.9
+        elif avg_3day_inflow < -50000000:
+            signal = 'SELL'
+            confidence = 0.75
+        else:
+            signal = 'NEUTRAL'
+            confidence = 0.5
+
+        return {
+            'score': etf_score,
+            'signal': signal,
+            'confidence': confidence,
+            'details': {
+                'asset_type': asset_type,
+                'latest_date': str(latest['trade_date']),
+                'total_net_inflow': latest_inflow,
+                'avg_3day_inflow': avg_3day_inflow,
+                'weekly_total_inflow': weekly_total,
+                'total_aum': float(latest['total_aum']) if latest.get('total_aum') else 0,
+                'etf_count': latest['etf_count'] if latest.get('etf_count') else 0,
+                'inflow_count': latest['inflow_count'] if latest.get('inflow_count') else 0,
+                'outflow_count': latest['outflow_count'] if latest.get('outflow_count') else 0,
+                'top_inflow_ticker': latest.get('top_inflow_ticker'),
+                'top_inflow_amount': float(latest['top_inflow_amount']) if latest.get('top_inflow_amount') else 0
             }
-
-        except Exception as e:
-            logger.warning(f"读取{symbol} ETF缓存失败: {e}")
-            return None
-        finally:
-            if session:
-                session.close()
+        }
 
     def _calculate_etf_score(self, latest_inflow: float, avg_3day: float, weekly_total: float) -> float:
         """
@@ -1448,16 +1486,19 @@ class CacheUpdateService:
             if session:
                 session.close()
 
-    def _upsert_recommendation(self, symbol: str, analysis: dict):
-        """插入或更新投资建议"""
-        import json
+    def _upsert_recommendations(self, analyses: List[dict]) -> int:
+        """
+        批量插入或更新投资建议 (一次 executemany), 返回写入条数
+
+        VALUES (...) 里只能是占位符, PyMySQL 才会把 executemany 合并成一条多行 INSERT;
+        写入 NOW() 会退化为逐行执行, 所以 updated_at 作为参数传入 (整批同一时间)
+        """
+        if not analyses:
+            return 0
         session = None
         try:
             session = self.db_service.get_session()
 
-            scores = analysis['score']
-            data_sources = analysis['data_sources']
-
             sql = text("""
                 INSERT INTO investment_recommendations_cache (
                     symbol, total_score, technical_score, news_score, funding_score,
@@ -1472,7 +1513,7 @@ class CacheUpdateService:
                     :current_price, :entry_price, :stop_loss, :take_profit,
                     :risk_level, :risk_factors, :reasons,
                     :has_technical, :has_news, :has_funding, :has_hyperliquid, :has_ethereum,
-                    :data_completeness, NOW()
+                    :data_completeness, :updated_at
                 )
                 ON DUPLICATE KEY UPDATE
                     total_score = VALUES(total_score),
@@ -1496,36 +1537,13 @@ class CacheUpdateService:
                     has_hyperliquid = VALUES(has_hyperliquid),
                     has_ethereum = VALUES(has_ethereum),
                     data_completeness = VALUES(data_completeness),
-                    updated_at = NOW()
+                    updated_at = VALUES(updated_at)
             """)
 
-            params = {
-                'symbol': symbol,
-                'total_score': scores['total'],
-                'technical_score': scores['technical'],
-                'news_score': scores['news'],
-                'funding_score': scores['funding'],
-                'hyperliquid_score': scores['hyperliquid'],
-                'ethereum_score': scores['ethereum'],
-                'signal': analysis['signal'],
-                'confidence': analysis['confidence'],
-                'current_price': analysis['price']['current'],
-                'entry_price': analysis['price']['entry'],
-                'stop_loss': analysis['price']['stop_loss'],
-                'take_profit': analysis['price']['take_profit'],
-                'risk_level': analysis['risk']['level'],
-                'risk_factors': json.dumps(analysis['risk']['factors'], ensure_ascii=False),
-                'reasons': json.dumps(analysis['reasons'], ensure_ascii=False),
-                'has_technical': data_sources.get('technical', False),
-                'has_news': data_sources.get('news', False),
-                'has_funding': data_sources.get('funding', False),
-                'has_hyperliquid': data_sources.get('hyperliquid', False),
-                'has_ethereum': data_sources.get('ethereum', False),
-                'data_completeness': sum(1 for v in data_sources.values() if v) / len(data_sources) * 100
-            }
-
-            session.execute(sql, params)
+            updated_at = datetime.now()
+            session.execute(sql, [{**self._recommendation_params(a), 'updated_at': updated_at} for a in analyses])
             session.commit()
+            return len(analyses)
 
         except Exception as e:
             if session:
@@ -1533,6 +1551,39 @@ class CacheUpdateService:
             logger.error(f"写入投资建议失败: {e}")
             import traceback
             traceback.print_exc()
+            return 0
         finally:
             if session:
                 session.close()
+
+    @staticmethod
+    def _recommendation_params(analysis: dict) -> dict:
+        """analyze() 结果 → investment_recommendations_cache 行参数"""
+        import json
+
+        scores = analysis['score']
+        data_sources = analysis['data_sources']
+        return {
+            'symbol': analysis['symbol'],
+            'total_score': scores['total'],
+            'technical_score': scores['technical'],
+            'news_score': scores['news'],
+            'funding_score': scores['funding'],
+            'hyperliquid_score': scores['hyperliquid'],
+            'ethereum_score': scores['ethereum'],
+            'signal': analysis['signal'],
+            'confidence': analysis['confidence'],
+            'current_price': analysis['price']['current'],
+            'entry_price': analysis['price']['entry'],
+            'stop_loss': analysis['price']['stop_loss'],
+            'take_profit': analysis['price']['take_profit'],
+            'risk_level': analysis['risk']['level'],
+            'risk_factors': json.dumps(analysis['risk']['factors'], ensure_ascii=False),
+            'reasons': json.dumps(analysis['reasons'], ensure_ascii=False),
+            'has_technical': data_sources.get('technical', False),
+            'has_news': data_sources.get('news', False),
+            'has_funding': data_sources.get('funding', False),
+            'has_hyperliquid': data_sources.get('hyperliquid', False),
+            'has_ethereum': data_sources.get('ethereum', False),
+            'data_completeness': sum(1 for v in data_sources.values() if v) / len(data_sources) * 100
+        }
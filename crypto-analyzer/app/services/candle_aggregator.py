@@ -0,0 +1,159 @@
+"""
+5m 收盘 K 线 → 15m / 1h / 4h / 1d 流式合成
+
+WS 采集只订阅 5m, 高周期在本进程内随 5m 收盘累加, 最后一根 5m 到达即输出整根高周期 K 线,
+与 5m 同批落盘 (KlineRow, save_klines 格式). 口径同 kline_storage.aggregate:
+开=首根开, 收=末根收, 高低取极值, 量/额/笔数求和; 与币安同周期 K 线逐字段一致, 各周期天然互相一致.
+
+- 缺 5m (断线漏根 / 启动时只收到后半段且库里也不全) 的周期不输出, 由 kline_storage 每小时从库里重算补齐 (WS 进程回填 5m 后也会立即重算)
+- 启动时 prime() 用库里当前未收盘周期的 5m 补上前半段, 与启动后 WS 收到的后半段拼接
+- 与交易所 K 线的核对放在 fast_collector_service, 每 RECONCILE_INTERVAL_S 一次 (见 SmartFuturesCollector.reconcile_klines)
+"""
+from __future__ import annotations
+
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from app.collectors.smart_futures_collector import KlineRow
+from app.services.kline_store import EXCHANGE, timeframe_to_ms
+
+
+BASE_TIMEFRAME = '5m'
+DERIVED_TIMEFRAMES: Tuple[str, ...] = ('15m', '1h', '4h', '1d')
+BASE_MS = timeframe_to_ms(BASE_TIMEFRAME)
+
+RECONCILE_INTERVAL_S = 6 * 3600
+RECONCILE_BARS = {'15m': 24, '1h': 12, '4h': 4, '1d': 2}   # 每次核对最近 N 根已收盘 K 线
+
+# 累加状态: [bucket, first_open, last_open, open, high, low, close, vol, qvol, trades, tbb, tbq, gap]
+# 周期收盘 = 无缺口且首根/末根分别是桶内第一根/最后一根 5m
+_BUCKET, _FIRST, _LAST, _O, _H, _L, _C, _V, _Q, _N, _TBB, _TBQ, _GAP = range(13)
+
+
+def _start(bucket: int, r: Sequence) -> list:
+    """r: (symbol, open_time, o, h, l, c, v, qv, n, tbb, tbq)"""
+    t = int(r[1])
+    return [bucket, t, t, float(r[2]), float(r[3]), float(r[4]), float(r[5]),
+            float(r[6] or 0), float(r[7] or 0), int(r[8] or 0), float(r[9] or 0), float(r[10] or 0), False]
+
+
+def _add(st: list, r: Sequence) -> None:
+    t = int(r[1])
+    if t != st[_LAST] + BASE_MS:
+        st[_GAP] = True
+    st[_LAST] = t
+    st[_H] = max(st[_H], float(r[3]))
+    st[_L] = min(st[_L], float(r[4]))
+    st[_C] = float(r[5])
+    st[_V] += float(r[6] or 0)
+    st[_Q] += float(r[7] or 0)
+    st[_N] += int(r[8] or 0)
+    st[_TBB] += float(r[9] or 0)
+    st[_TBQ] += float(r[10] or 0)
+
+
+def _merge(head: list, tail: list) -> list:
+    """同一周期前后两段 (head 在前) 拼成一段"""
+    out = list(head)
+    out[_GAP] = head[_GAP] or tail[_GAP] or tail[_FIRST] != head[_LAST] + BASE_MS
+    out[_LAST] = tail[_LAST]
+    out[_H] = max(head[_H], tail[_H])
+    out[_L] = min(head[_L], tail[_L])
+    out[_C] = tail[_C]
+    for i in (_V, _Q, _N, _TBB, _TBQ):
+        out[i] = head[i] + tail[i]
+    return out
+
+
+def _row(symbol: str, timeframe: str, period: int, st: list) -> KlineRow:
+    bucket = st[_BUCKET]
+    return KlineRow(
+        symbol, EXCHANGE, timeframe, bucket, bucket + period - 1, datetime.utcfromtimestamp(bucket / 1000),
+        st[_O], st[_H], st[_L], st[_C], st[_V], st[_Q], st[_N], st[_TBB], st[_TBQ],
+    )
+
+
+class CandleAggregator:
+    """按 (symbol, 周期) 累加当前未收盘的高周期 K 线; 只在 WS event loop 线程内调用"""
+
+    def __init__(self, timeframes: Iterable[str] = DERIVED_TIMEFRAMES):
+        self.periods: Dict[str, int] = {tf: timeframe_to_ms(tf) for tf in timeframes}
+        self._state: Dict[Tuple[str, str], list] = {}
+        self._closed: Dict[Tuple[str, str], int] = {}   # 已收盘 (输出或放弃) 的最新周期, 更早的 5m 直接忽略
+        self.stats = {'fed': 0, 'emitted': 0, 'incomplete': 0}
+
+    def _step(self, state: Dict[Tuple[str, str], list], tf: str, r: Sequence,
+              out: Optional[List[KlineRow]]) -> None:
+        period = self.periods[tf]
+        key = (r[0], tf)
+        t = int(r[1])
+        bucket = t // period * period
+        if out is not None and bucket <= self._closed.get(key, -1):
+            return
+        st = state.get(key)
+        if st is not None and st[_BUCKET] == bucket:
+            if t <= st[_LAST]:
+                return                  # 重复 / 乱序的 5m 不重复累加
+            _add(st, r)
+        else:
+            if st is not None and out is not None:
+                if bucket < st[_BUCKET]:
+                    return                      # 比进行中周期还早的乱序 5m
+                self.stats['incomplete'] += 1   # 上一周期没等到最后一根
+            st = state[key] = _start(bucket, r)
+        if st[_LAST] == bucket + period - BASE_MS:
+            del state[key]
+            if out is None:
+                return
+            self._closed[key] = bucket
+            if st[_GAP] or st[_FIRST] != bucket:
+                self.stats['incomplete'] += 1   # 缺根, 交给 kline_storage 从库里重算
+            else:
+                out.append(_row(r[0], tf, period, st))
+
+    def feed(self, row: KlineRow) -> List[KlineRow]:
+        """喂入一根收盘 5m, 返回因此收盘的高周期 K 线"""
+        if row.timeframe != BASE_TIMEFRAME:
+            return []
+        self.stats['fed'] += 1
+        r = (row.symbol, row.open_time, row.open_price, row.high_price, row.low_price, row.close_price,
+             row.volume, row.quote_volume, row.number_of_trades,
+             row.taker_buy_base_volume, row.taker_buy_quote_volume)
+        out: List[KlineRow] = []
+        for tf in self.periods:
+            self._step(self._state, tf, r, out)
+        self.stats['emitted'] += len(out)
+        return out
+
+    def prime(self, rows: Iterable[Sequence]) -> int:
+        """
+        用库里的 5m (kline_storage.fetch_source 行格式, 按 symbol, open_time 排序) 补上各周期前半段,
+        接在启动后 WS 已累加的部分之前; 与 WS 重叠的 5m 以 WS 为准.
+
+        Returns:
+            补上前半段的周期数
+        """
+        head: Dict[Tuple[str, str], list] = {}
+        for r in rows:
+            for tf in self.periods:
+                live = self._state.get((r[0], tf))
+                if live is None or int(r[1]) < live[_FIRST]:
+                    self._step(head, tf, r, None)
+        primed = 0
+        for key, h in head.items():
+            live = self._state.get(key)
+            if live is None:
+                self._state[key] = h
+            elif live[_BUCKET] == h[_BUCKET]:
+                self._state[key] = _merge(h, live)
+            else:
+                continue
+            primed += 1
+        return primed
+
+    def prime_since(self, now_ms: int) -> int:
+        """prime 需要从库里读的起点: 最长周期当前桶的开始"""
+        return now_ms // max(self.periods.values()) * max(self.periods.values())
+
+    def pending(self) -> int:
+        return len(self._state)
@@ -4,16 +4,16 @@
 定时任务（由 scheduler.py 注册）：
   - refresh_market_snapshot:   每 1 分钟
   - refresh_market_movers:     每 5 分钟
-  - refresh_candidate_pool:    每 6 分钟 (底层行情/K线叙事)
+  - refresh_feature_store:     每 15 分钟 (K 线收盘后 20s, 按币种 K 线特征)
+  - refresh_candidate_pool:    每 6 分钟 (底层行情/K线叙事, 特征读 feature_store)
   - refresh_explore_prepared_only: 每 15 分钟 (探索/战术共用 universe, 只读此包)
   - refresh_position_stats:    每 30 分钟
-  - sync_settings_cache:       写时触发（由 system_settings 修改时调用）
+  - sync_settings_cache:       写时触发（由 system_settings 修改时调用; 读配置已改走 settings_store）
 
 所有刷新任务都使用简短、表亲和的 SQL，避免 kline_data 亿级 JOIN。
 """
 from __future__ import annotations
 
-import json
 import time
 from datetime import datetime, timedelta, timezone
 from typing import Any, Dict, List, Optional, Tuple
@@ -23,8 +23,10 @@ import pymysql.cursors
 from loguru import logger
 
 from app.services.securities_filter import is_security
+from app.services.settings_store import get_setting_value, get_settings_store
 from app.utils.config_loader import get_db_config
 from app.utils.futures_symbol import futures_symbol_rating_canonical
+from app.utils import indicator_engine
 from app.utils.explore_sql import POSITION_STATS_AGG_SQL, POSITION_STATS_ALL_SQL
 
 DATA_CACHE_DB = "data_cache"
@@ -279,29 +281,13 @@ def refresh_market_movers() -> dict:
 def _calc_rsi(closes: List[float], period: int = 14) -> Optional[float]:
     if not closes or len(closes) < period + 1:
         return None
-    gains, losses = [], []
-    for i in range(1, len(closes)):
-        diff = closes[i] - closes[i - 1]
-        gains.append(max(diff, 0))
-        losses.append(max(-diff, 0))
-    avg_gain = sum(gains[:period]) / period
-    avg_loss = sum(losses[:period]) / period
-    for i in range(period, len(gains)):
-        avg_gain = (avg_gain * (period - 1) + gains[i]) / period
-        avg_loss = (avg_loss * (period - 1) + losses[i]) / period
-    if avg_loss == 0:
-        return 100.0
-    return 100 - 100 / (1 + avg_gain / avg_loss)
+    return indicator_engine.last_value(indicator_engine.rsi(closes, period, method='wilder'))
 
 
 def _calc_ema(values: List[float], period: int) -> Optional[float]:
     if not values or len(values) < period:
         return None
-    alpha = 2.0 / (period + 1)
-    ema = sum(values[:period]) / period
-    for v in values[period:]:
-        ema = alpha * v + (1 - alpha) * ema
-    return ema
+    return indicator_engine.last_value(indicator_engine.ema(values, period, seed='sma'))
 
 
 # ============================================================
@@ -439,13 +425,55 @@ ON DUPLICATE KEY UPDATE
 """
 
 
+_CANDIDATE_SQL = (
+    "SELECT symbol, current_price, change_24h, quote_volume_24h "
+    "FROM `{main_db}`.price_stats_24h "
+    "WHERE symbol LIKE '%%/USDT' AND quote_volume_24h >= 1000000 "
+    "ORDER BY quote_volume_24h DESC"
+)
+
+
+def refresh_feature_store() -> dict:
+    """
+    15m / 1h / 1d 收盘后刷新候选币种的 K 线特征 (feature_store)。
+    只有最后一根已收盘 K 线前进了的 (symbol, 周期) 会重算; 候选池 6min 刷新直接复用。
+    """
+    t0 = time.time()
+    stat = {"status": "ok", "elapsed_ms": 0, "symbols": 0}
+    try:
+        from app.services.feature_store import get_stats, refresh_symbol_features
+
+        _ensure_main_db()
+        conn = _get_conn()
+        with conn.cursor() as cur:
+            cur.execute(_CANDIDATE_SQL.format(main_db=MAIN_DB))
+            symbols = [r["symbol"] for r in cur.fetchall() if not _is_excluded(r["symbol"])]
+        computed = get_stats()["computed"]
+        refresh_symbol_features(conn, symbols)
+        stat["symbols"] = len(symbols)
+        stat["computed"] = get_stats()["computed"] - computed
+        stat["elapsed_ms"] = int((time.time() - t0) * 1000)
+        logger.debug(
+            f"[cache] symbol_features refreshed in {stat['elapsed_ms']}ms "
+            f"({len(symbols)} symbols, {stat['computed']} recomputed)"
+        )
+    except Exception as e:
+        stat["status"] = f"error: {e}"
+        logger.error(f"[cache] refresh_feature_store failed: {e}")
+    finally:
+        try:
+            conn.close()
+        except Exception:
+            pass
+    return stat
+
+
 def refresh_candidate_pool() -> dict:
     """
     一次性刷新所有候选交易对的数据:
       - 24h 行情 (从 price_stats_24h)
       - 资金费率 (从 funding_rate_data)
-      - 技术指标 (1h RSI, EMA)
-      - K 线 JSON + 叙事 (从 kline_data)
+      - 技术指标 (1h RSI, EMA) + K 线 JSON + 叙事 (从 feature_store, 每根 K 线收盘只算一次)
 
     使用 UPSERT 就地更新, 刷新过程中表始终有上一版数据可供探索读取;
     本轮结束后才删除已下架 symbol (避免先 DELETE 导致空窗)。
@@ -456,18 +484,10 @@ def refresh_candidate_pool() -> dict:
         _ensure_main_db()
         conn = _get_conn()
         with conn.cursor() as cur:
-            main_db = MAIN_DB
             refreshed_symbols: List[str] = []
 
             # 1) 获取所有候选 symbol (有成交量的 /USDT 交易对)
-            cur.execute(
-                f"SELECT symbol, current_price, change_24h, "
-                f"       quote_volume_24h "
-                f"FROM `{MAIN_DB}`.price_stats_24h "
-                f"WHERE symbol LIKE '%%/USDT' "
-                f"  AND quote_volume_24h >= 1000000 "
-                f"ORDER BY quote_volume_24h DESC"
-            )
+            cur.execute(_CANDIDATE_SQL.format(main_db=MAIN_DB))
             candidates = cur.fetchall()
 
             # 3) 一次性获取所有资金费率
@@ -480,73 +500,40 @@ def refresh_candidate_pool() -> dict:
             for r in cur.fetchall():
                 funding_map[r["symbol"]] = r.get("funding_rate")
 
-            upserted = 0
-            for c in candidates:
-                sym = c["symbol"]
-                if _is_excluded(sym):
-                    continue
-
-                # 获取 K 线数据
-                kline_1h = _fetch_klines(cur, main_db, sym, "1h", 24)
-                kline_15m = _fetch_klines(cur, main_db, sym, "15m", 16)
-                kline_1d = _fetch_klines(cur, main_db, sym, "1d", 7)
+            # 4) K 线特征 (RSI / EMA / 叙事 / 7d 高低) 读特征库: 只有收盘前进的 (symbol, 周期) 才重算
+            from app.services.feature_store import range_position, refresh_symbol_features
 
-                # 技术指标
-                closes_1h = [float(r["close_price"]) for r in kline_1h if r.get("close_price")]
-                rsi_14 = _calc_rsi(closes_1h, 14) if len(closes_1h) >= 15 else None
-                ema_9 = _calc_ema(closes_1h, 9) if len(closes_1h) >= 9 else None
-                ema_21 = _calc_ema(closes_1h, 21) if len(closes_1h) >= 21 else None
+            candidates = [c for c in candidates if not _is_excluded(c["symbol"])]
+            features = refresh_symbol_features(conn, [c["symbol"] for c in candidates])
 
-                # 距 7d 高/低距离
-                above_low = below_high = None
+            params = []
+            for c in candidates:
+                sym = c["symbol"]
+                feats = features.get(sym) or {}
+                f_1h = feats.get("1h") or {}
                 sym_price = float(c["current_price"]) if c.get("current_price") else None
-                if sym_price and kline_1d:
-                    try:
-                        highs = [float(r["high_price"]) for r in kline_1d if r.get("high_price")]
-                        lows = [float(r["low_price"]) for r in kline_1d if r.get("low_price")]
-                        if highs and lows:
-                            h7 = max(highs)
-                            l7 = min(lows)
-                            if l7 > 0:
-                                above_low = round((sym_price - l7) / l7 * 100, 2)
-                            if h7 > 0:
-                                below_high = round((sym_price - h7) / h7 * 100, 2)
-                    except Exception:
-                        pass
-
-                # 格式化 K 线到 JSON
-                kline_1h_json = json.dumps(
-                    [{"ot": r["open_time"], "o": float(r["open_price"]),
-                      "h": float(r["high_price"]), "l": float(r["low_price"]),
-                      "c": float(r["close_price"]), "v": float(r.get("volume") or 0)}
-                     for r in kline_1h] if kline_1h else [],
-                    default=str,
-                )
-                # 叙事文本 (前 4 root)
-                narr_1h = _make_kline_narrative(kline_1h, "1h") if kline_1h else ""
-                narr_15m = _make_kline_narrative(kline_15m, "15m") if kline_15m else ""
-                narr_1d = _make_kline_narrative(kline_1d, "1d") if kline_1d else ""
+                above_low, below_high = range_position(feats.get("1d"), sym_price)
 
                 # 资金费率 (按 symbol 匹配，注意 /USDT 格式)
                 fr = funding_map.get(sym) or funding_map.get(sym.replace("/", ""))
 
-                cur.execute(
-                    _CANDIDATE_POOL_UPSERT_SQL,
-                    (
-                        sym, "binance_futures",
-                        c.get("current_price"), c.get("change_24h"), c.get("quote_volume_24h"),
-                        fr, rsi_14, ema_9, ema_21,
-                        kline_1h_json, None, None,
-                        narr_1h, narr_15m, narr_1d,
-                        above_low, below_high,
-                    ),
-                )
+                params.append((
+                    sym, "binance_futures",
+                    c.get("current_price"), c.get("change_24h"), c.get("quote_volume_24h"),
+                    fr, f_1h.get("rsi_14"), f_1h.get("ema_9"), f_1h.get("ema_21"),
+                    f_1h.get("klines_json") or "[]", None, None,
+                    f_1h.get("narrative") or "",
+                    (feats.get("15m") or {}).get("narrative") or "",
+                    (feats.get("1d") or {}).get("narrative") or "",
+                    above_low, below_high,
+                ))
                 refreshed_symbols.append(sym)
-                upserted += 1
 
-                # 每 200 个 symbol 提交一次
-                if upserted % 200 == 0:
-                    conn.commit()
+            # 每 200 个 symbol 提交一次
+            for i in range(0, len(params), 200):
+                cur.executemany(_CANDIDATE_POOL_UPSERT_SQL, params[i:i + 200])
+                conn.commit()
+            upserted = len(params)
 
             # 2) 移除本轮未出现的 symbol (已下架/不再满足成交量), 不先删全表
             if refreshed_symbols:
@@ -1075,60 +1062,17 @@ def invalidate_position_stats_mem_cache(source: str = None, account_id: int = 2)
 
 
 # ============================================================
-# 本地设置缓存 (避免频繁查 MySQL)
+# 设置读取 (settings_store 进程内快照, 版本号变更才重载)
 # ============================================================
-_settings_cache_local: Dict[str, Dict] = {}
-_SETTINGS_CACHE_TTL = 60  # 60 秒
-
 def get_setting(key: str, default: str = "") -> str:
     """
-    带本地内存缓存的 setting 读取。
-    优先读 data_cache.settings_cache, 兜底读 system_settings。
+    读单个 setting (原始字符串)。
+    走 settings_store 快照, 不再逐 key 查 data_cache.settings_cache / system_settings。
     """
-    now = time.time()
-    cached = _settings_cache_local.get(key)
-    if cached and now - cached["time"] < _SETTINGS_CACHE_TTL:
-        return cached["value"]
-
-    try:
-        conn = _get_conn()
-        with conn.cursor() as cur:
-            # 先读缓存表
-            try:
-                cur.execute(
-                    "SELECT setting_value FROM data_cache.settings_cache WHERE setting_key=%s",
-                    (key,),
-                )
-                row = cur.fetchone()
-                if row:
-                    value = str(row["setting_value"])
-                    _settings_cache_local[key] = {"value": value, "time": now}
-                    return value
-            except Exception:
-                pass
-
-            # 兜底读主库
-            _ensure_main_db()
-            cur.execute(
-                f"SELECT setting_value FROM `{MAIN_DB}`.system_settings WHERE setting_key=%s LIMIT 1",
-                (key,),
-            )
-            row = cur.fetchone()
-            value = str(row["setting_value"]) if row else default
-            _settings_cache_local[key] = {"value": value, "time": now}
-            return value
-    except Exception:
-        return _settings_cache_local.get(key, {}).get("value", default)
-    finally:
-        try:
-            conn.close()
-        except Exception:
-            pass
+    value = get_setting_value(key)
+    return default if value is None else value
 
 
 def invalidate_setting_cache(key: str = None):
-    """清除本地缓存."""
-    if key:
-        _settings_cache_local.pop(key, None)
-    else:
-        _settings_cache_local.clear()
+    """作废本进程配置快照 (key 参数保留兼容, 快照整表重载)."""
+    get_settings_store().invalidate()
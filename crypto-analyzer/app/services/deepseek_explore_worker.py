@@ -61,6 +61,7 @@ from app.services.explore_worker_common import (
     would_instant_tp_for_explore,
 )
 from app.utils.position_time import utc_now_naive
+from app.services.feature_store import apply_features, get_symbol_features, latest_bar_time
 from app.services.explore_universe_utils import (
     TOP_MOVER,
     TOP_FUNDING,
@@ -573,171 +574,27 @@ def _build_universe_fallback(conn, level3_set: set = set()) -> dict:
 
 
 # ============================================================
-# 技术指标 + 多周期 K 线增强
+# 多周期 K 线特征 (feature_store) + 新鲜度
 # ============================================================
-def _ema(values: List[float], period: int) -> Optional[float]:
-    if not values or len(values) < period:
-        return None
-    alpha = 2.0 / (period + 1)
-    ema = sum(values[:period]) / period
-    for v in values[period:]:
-        ema = alpha * v + (1 - alpha) * ema
-    return ema
-
-
-def _rsi(closes: List[float], period: int = 14) -> Optional[float]:
-    if not closes or len(closes) < period + 1:
-        return None
-    gains, losses = [], []
-    for i in range(1, len(closes)):
-        diff = closes[i] - closes[i - 1]
-        gains.append(max(diff, 0))
-        losses.append(max(-diff, 0))
-    avg_gain = sum(gains[:period]) / period
-    avg_loss = sum(losses[:period]) / period
-    for i in range(period, len(gains)):
-        avg_gain = (avg_gain * (period - 1) + gains[i]) / period
-        avg_loss = (avg_loss * (period - 1) + losses[i]) / period
-    if avg_loss == 0:
-        return 100.0
-    rs = avg_gain / avg_loss
-    return 100 - 100 / (1 + rs)
-
-
-def _fetch_klines(cur, symbol: str, timeframe: str, limit: int) -> List[Dict]:
-    cur.execute(
-        "SELECT open_time, open_price, high_price, low_price, close_price, volume "
-        "FROM kline_data "
-        "WHERE symbol=%s AND timeframe=%s AND exchange='binance_futures' "
-        "ORDER BY open_time DESC LIMIT %s",
-        (symbol, timeframe, limit),
-    )
-    rows = list(reversed(cur.fetchall()))
-    return rows
-
-
-def _format_kline_narrative(k_rows: List[Dict], timeframe_label: str, max_lines: int = 4) -> str:
-    if not k_rows:
-        return f"[{timeframe_label}] 无数据"
-
-    lines = []
-    prices = []
-    total_vol = 0.0
-    up_count = 0
-    down_count = 0
-
-    for r in k_rows:
-        try:
-            t = datetime.utcfromtimestamp(float(r['open_time']) / 1000)
-            o = float(r['open_price'])
-            h = float(r['high_price'])
-            l = float(r['low_price'])
-            c = float(r['close_price'])
-            v = float(r.get('volume') or 0)
-            pct = (c - o) / o * 100 if o > 0 else 0
-            prices.append(c)
-            total_vol += v
-            if pct >= 0.1:
-                up_count += 1
-            elif pct <= -0.1:
-                down_count += 1
-
-            if len(lines) < max_lines:
-                t_str = t.strftime('%H:%M') if timeframe_label in ('15m', '1h') else t.strftime('%m-%d')
-                conv = '↑' if pct >= 0.1 else ('↓' if pct <= -0.1 else '→')
-                lines.append(
-                    f"  {t_str}: O={o:.6g} H={h:.6g} L={l:.6g} C={c:.6g} "
-                    f"({pct:+.2f}%){conv} Vol={v:.4g}"
-                )
-        except Exception:
-            continue
-
-    n = len(prices)
-    pattern_desc = "数据不足"
-    if n >= 3:
-        trend = "上升" if prices[-1] > prices[0] else "下降"
-        change_overall = (prices[-1] - prices[0]) / prices[0] * 100 if prices[0] > 0 else 0
-        if up_count > down_count * 1.5 and change_overall > 1:
-            pattern_desc = f"偏多 ({up_count}阳/{down_count}阴, 整体{change_overall:+.1f}%)"
-        elif down_count > up_count * 1.5 and change_overall < -1:
-            pattern_desc = f"偏空 ({up_count}阳/{down_count}阴, 整体{change_overall:+.1f}%)"
-        elif change_overall > 3:
-            pattern_desc = f"强势{trend} ({change_overall:+.1f}%)"
-        elif change_overall < -3:
-            pattern_desc = f"强势{trend} ({change_overall:+.1f}%)"
-        else:
-            pattern_desc = f"震荡 ({trend}趋势, {change_overall:+.1f}%)"
-
-    if k_rows and len(k_rows) >= 2:
-        try:
-            mid = len(k_rows) // 2
-            vol_first = sum(float(r.get('volume') or 0) for r in k_rows[:mid])
-            vol_last = sum(float(r.get('volume') or 0) for r in k_rows[mid:])
-            if vol_last > vol_first * 1.5 and vol_first > 0:
-                pattern_desc += ", 成交量放大"
-            elif vol_last < vol_first * 0.5 and vol_first > 0:
-                pattern_desc += ", 成交量萎缩"
-        except Exception:
-            pass
-
-    header = f"[{timeframe_label} · 最近 {len(k_rows)} 根] (总成交量 {total_vol:.4g})"
-    body = '\n'.join(lines[:max_lines])
-    if len(lines) > max_lines:
-        body += f"\n  ... 还有 {len(lines) - max_lines} 根 (略)"
-    return f"{header}\n{body}\n形态: {pattern_desc}"
-
-
-def _enrich_symbol(cur, sym_data: dict) -> None:
-    symbol = sym_data['symbol']
-
+def _enrich_symbol(sym_data: dict, features: Optional[Dict[str, Dict]]) -> None:
     if sym_data.get('kline_narrative', {}).get('1d'):
         return
-
-    k_1d = _fetch_klines(cur, symbol, '1d', 7)
-    k_1h = _fetch_klines(cur, symbol, '1h', 12)
-    k_15m = _fetch_klines(cur, symbol, '15m', 16)
-
-    sym_data['kline_narrative'] = {
-        '1d': _format_kline_narrative(k_1d, '1d', 4),
-        '1h': _format_kline_narrative(k_1h, '1h', 4),
-        '15m': _format_kline_narrative(k_15m, '15m', 4),
-    }
-
-    closes_1h = [float(r['close_price']) for r in k_1h]
-    closes_15m = [float(r['close_price']) for r in k_15m]
-
-    rsi_1h = _rsi(closes_1h, 14) if len(closes_1h) >= 15 else None
-    ema9_15m = _ema(closes_15m, 9) if len(closes_15m) >= 9 else None
-
-    above_7d_low_pct = below_7d_high_pct = None
-    if k_1d:
-        try:
-            highs_7d = [float(r['high_price']) for r in k_1d]
-            lows_7d = [float(r['low_price']) for r in k_1d]
-            high_7d = max(highs_7d)
-            low_7d = min(lows_7d)
-            cur_price = sym_data.get('current_price')
-            if cur_price and low_7d > 0:
-                above_7d_low_pct = round((cur_price - low_7d) / low_7d * 100, 2)
-            if cur_price and high_7d > 0:
-                below_7d_high_pct = round((cur_price - high_7d) / high_7d * 100, 2)
-        except Exception:
-            pass
-
-    sym_data['tech'] = {
-        'rsi_14_1h': round(rsi_1h, 1) if rsi_1h is not None else None,
-        'ema9_15m': round(ema9_15m, 6) if ema9_15m is not None else None,
-        'above_7d_low_pct': above_7d_low_pct,
-        'below_7d_high_pct': below_7d_high_pct,
-    }
+    apply_features(sym_data, features)
 
 
 def _enrich_universe(conn, universe: dict) -> None:
     stale_syms = []
+    need = [sym for sym, sym_data in universe.items() if not sym_data.get('kline_narrative', {}).get('1d')]
+    try:
+        features = get_symbol_features(conn, need)
+    except Exception as e:
+        logger.warning(f"[DeepSeek探索] 读取 K 线特征失败: {e}")
+        features = {}
     with conn.cursor() as cur:
         for sym, sym_data in universe.items():
             try:
-                _enrich_symbol(cur, sym_data)
+                sym_features = features.get(sym)
+                _enrich_symbol(sym_data, sym_features)
 
                 k_1h_narr = sym_data.get('kline_narrative', {}).get('1h', '')
                 k_1d_narr = sym_data.get('kline_narrative', {}).get('1d', '')
@@ -745,27 +602,17 @@ def _enrich_universe(conn, universe: dict) -> None:
                     stale_syms.append((sym, 'missing_1h_or_1d_kline'))
                     continue
 
-                cur.execute(
-                    "SELECT MAX(open_time) AS m FROM kline_data "
-                    "WHERE symbol=%s AND timeframe='1h' AND exchange='binance_futures'",
-                    (sym,)
-                )
-                row = cur.fetchone()
-                if row and row.get('m'):
-                    latest_1h = datetime.utcfromtimestamp(int(row['m']) / 1000)
+                latest_ms = latest_bar_time(cur, sym, '1h', sym_features)
+                if latest_ms:
+                    latest_1h = datetime.utcfromtimestamp(latest_ms / 1000)
                     age_h = (datetime.now() - latest_1h).total_seconds() / 3600
                     if age_h > 4.0:
                         stale_syms.append((sym, f'1h_kline_stale_{age_h:.1f}h'))
                         continue
 
-                cur.execute(
-                    "SELECT MAX(open_time) AS m FROM kline_data "
-                    "WHERE symbol=%s AND timeframe='1d' AND exchange='binance_futures'",
-                    (sym,)
-                )
-                row = cur.fetchone()
-                if row and row.get('m'):
-                    latest_1d = datetime.utcfromtimestamp(int(row['m']) / 1000)
+                latest_ms = latest_bar_time(cur, sym, '1d', sym_features)
+                if latest_ms:
+                    latest_1d = datetime.utcfromtimestamp(latest_ms / 1000)
                     age_d = (datetime.now() - latest_1d).total_seconds() / 86400
                     if age_d > 2.0:
                         stale_syms.append((sym, f'1d_kline_stale_{age_d:.1f}d'))
@@ -35,6 +35,7 @@ from app.utils.futures_symbol import (
     futures_symbol_rating_canonical,
 )
 from app.utils.position_time import utc_now_naive
+from app.services.feature_store import FEATURE_TIMEFRAMES, get_symbol_features, range_position
 
 from app.services.ai_big4_prompt import (
     big4_conflict_risk_note,
@@ -266,109 +267,9 @@ def _batched(items: List[Any], size: int) -> List[List[Any]]:
     return [items[i:i + size] for i in range(0, len(items), size)]
 
 
-# ============================================================
-# 技术指标 (复用小工具)
-# ============================================================
-def _ema(values: List[float], period: int) -> Optional[float]:
-    if not values or len(values) < period:
-        return None
-    alpha = 2.0 / (period + 1)
-    ema = sum(values[:period]) / period
-    for v in values[period:]:
-        ema = alpha * v + (1 - alpha) * ema
-    return ema
-
-
-def _rsi(closes: List[float], period: int = 14) -> Optional[float]:
-    if not closes or len(closes) < period + 1:
-        return None
-    gains, losses = [], []
-    for i in range(1, len(closes)):
-        diff = closes[i] - closes[i - 1]
-        gains.append(max(diff, 0))
-        losses.append(max(-diff, 0))
-    avg_gain = sum(gains[:period]) / period
-    avg_loss = sum(losses[:period]) / period
-    for i in range(period, len(gains)):
-        avg_gain = (avg_gain * (period - 1) + gains[i]) / period
-        avg_loss = (avg_loss * (period - 1) + losses[i]) / period
-    if avg_loss == 0:
-        return 100.0
-    rs = avg_gain / avg_loss
-    return 100 - 100 / (1 + rs)
-
-
-def _fetch_klines(cur, symbol: str, timeframe: str, limit: int) -> List[Dict]:
-    cur.execute(
-        "SELECT open_time, open_price, high_price, low_price, close_price, volume "
-        "FROM kline_data "
-        "WHERE symbol=%s AND timeframe=%s AND exchange='binance_futures' "
-        "ORDER BY open_time DESC LIMIT %s",
-        (symbol, timeframe, limit),
-    )
-    rows = list(reversed(cur.fetchall()))
-    return rows
-
-
-def _format_kline_narrative(k_rows: List[Dict], timeframe_label: str, max_lines: int = 4) -> str:
-    """将 K 线数据转为自然语言描述."""
-    if not k_rows:
-        return f"[{timeframe_label}] 无数据"
-
-    lines = []
-    prices = []
-    total_vol = 0.0
-    up_count = 0
-    down_count = 0
-
-    for r in k_rows:
-        try:
-            t = datetime.utcfromtimestamp(float(r['open_time']) / 1000)
-            o = float(r['open_price'])
-            h = float(r['high_price'])
-            l = float(r['low_price'])
-            c = float(r['close_price'])
-            v = float(r.get('volume') or 0)
-            pct = (c - o) / o * 100 if o > 0 else 0
-            prices.append(c)
-            total_vol += v
-            if pct >= 0.1:
-                up_count += 1
-            elif pct <= -0.1:
-                down_count += 1
-            if len(lines) < max_lines:
-                t_str = t.strftime('%H:%M') if timeframe_label in ('15m', '1h') else t.strftime('%m-%d')
-                conv = '\u2191' if pct >= 0.1 else ('\u2193' if pct <= -0.1 else '\u2192')
-                lines.append(
-                    f"  {t_str}: O={o:.6g} H={h:.6g} L={l:.6g} C={c:.6g} "
-                    f"({pct:+.2f}%){conv} Vol={v:.4g}"
-                )
-        except Exception:
-            continue
-
-    n = len(prices)
-    pattern_desc = "数据不足"
-    if n >= 3:
-        change_overall = (prices[-1] - prices[0]) / prices[0] * 100 if prices[0] > 0 else 0
-        if up_count > down_count * 1.5 and change_overall > 1:
-            pattern_desc = f"偏多 ({up_count}阳/{down_count}阴, 整体{change_overall:+.1f}%)"
-        elif down_count > up_count * 1.5 and change_overall < -1:
-            pattern_desc = f"偏空 ({up_count}阳/{down_count}阴, 整体{change_overall:+.1f}%)"
-        elif change_overall > 3:
-            trend = "上升" if prices[-1] > prices[0] else "下降"
-            pattern_desc = f"强势{trend} ({change_overall:+.1f}%)"
-        elif change_overall < -3:
-            trend = "上升" if prices[-1] > prices[0] else "下降"
-            pattern_desc = f"强势{trend} ({change_overall:+.1f}%)"
-        else:
-            trend = "上升" if prices[-1] > prices[0] else "下降"
-            pattern_desc = f"震荡 ({trend}趋势, {change_overall:+.1f}%)"
-
-    header = f"[{timeframe_label} · 最近 {len(k_rows)} 根] (总成交量 {total_vol:.4g})"
-    body = '\n'.join(lines[:max_lines])
-    if len(lines) > max_lines:
-        body += f"\n  ... 还有 {len(lines) - max_lines} 根 (略)"
-    return f"{header}\n{body}\n形态: {pattern_desc}"
+def _prefetch_symbol_features(conn, symbols: List[str]) -> Dict[str, Dict[str, Dict]]:
+    """多个 symbol 的 K 线特征一次批量读取 → {symbol: {timeframe: 特征}} (供 _build_symbol_data)"""
+    return get_symbol_features(conn, symbols)
 
 
 # ============================================================
@@ -399,10 +300,17 @@ def _symbol_data_from_cache(symbol: str) -> Optional[Dict]:
     }
 
 
-def _build_symbol_data(conn, symbol: str, *, allow_kline_fallback: bool = False) -> Optional[Dict]:
+def _build_symbol_data(
+    conn,
+    symbol: str,
+    *,
+    allow_kline_fallback: bool = False,
+    features: Optional[Dict[str, Dict]] = None,
+) -> Optional[Dict]:
     """获取单个 symbol 的完整数据: K 线叙事 + 技术指标 + 当前价.
 
-    默认只读 candidate_pool。allow_kline_fallback=True 才扫 kline（手动调试用）。
+    默认只读 candidate_pool。allow_kline_fallback=True 才读特征库（手动调试用; 缺失时按收盘补算）。
+    features: _prefetch_symbol_features 批量预取的 {timeframe: 特征}, 缺省时单币读取。
     """
     cached_data = _symbol_data_from_cache(symbol)
     if cached_data is not None:
@@ -410,45 +318,22 @@ def _build_symbol_data(conn, symbol: str, *, allow_kline_fallback: bool = False)
     if not allow_kline_fallback:
         return None
 
-    from app.services.data_cache_service import _make_kline_narrative
-
-    with conn.cursor() as cur:
-        k_1d = _fetch_klines(cur, symbol, '1d', 7)
-        k_1h = _fetch_klines(cur, symbol, '1h', 24)
-        k_15m = _fetch_klines(cur, symbol, '15m', 16)
-
-        if not k_1d or not k_1h or not k_15m:
-            return None
-
-        kline_narrative = {
-            '1d': _make_kline_narrative(k_1d, '1d'),
-            '1h': _make_kline_narrative(k_1h, '1h'),
-            '15m': _make_kline_narrative(k_15m, '15m'),
-        }
-
-        closes_1h = [float(r['close_price']) for r in k_1h]
-        rsi_14_1h = _rsi(closes_1h, 14) if len(closes_1h) >= 15 else None
+    if features is None:
+        features = get_symbol_features(conn, [symbol]).get(symbol) or {}
+    if not all(features.get(tf) for tf in FEATURE_TIMEFRAMES):
+        return None
 
-        above_7d_low = below_7d_high = None
-        try:
-            highs_7d = [float(r['high_price']) for r in k_1d]
-            lows_7d = [float(r['low_price']) for r in k_1d]
-            high_7d = max(highs_7d)
-            low_7d = min(lows_7d)
-            cur_price = _get_current_price(conn, symbol)
-            if cur_price and low_7d > 0:
-                above_7d_low = round((cur_price - low_7d) / low_7d * 100, 2)
-            if cur_price and high_7d > 0:
-                below_7d_high = round((cur_price - high_7d) / high_7d * 100, 2)
-        except Exception:
-            pass
+    kline_narrative = {tf: features[tf]['narrative'] for tf in ('1d', '1h', '15m')}
+    rsi_14_1h = features['1h'].get('rsi_14')
+    current_price = _get_current_price(conn, symbol)
+    above_7d_low, below_7d_high = range_position(features['1d'], current_price)
 
+    with conn.cursor() as cur:
         cur.execute(
             "SELECT current_price, change_24h, quote_volume_24h FROM price_stats_24h WHERE symbol=%s",
             (symbol,),
         )
         stats = cur.fetchone() or {}
-        current_price = _get_current_price(conn, symbol)
 
         cur.execute(
             "SELECT funding_rate FROM funding_rate_data "
@@ -15,6 +15,8 @@ from __future__ import annotations
 from dataclasses import asdict, dataclass
 from typing import Any, Dict, List, Optional, Sequence, Tuple
 
+from app.utils import indicator_engine
+
 PULLBACK_LONG_PLAYBOOKS = frozenset({"A1", "B4", "C3"})
 PULLBACK_SHORT_PLAYBOOKS = frozenset({"A2"})
 EXHAUSTION_SHORT_PLAYBOOKS = frozenset({"B3", "C4"})
@@ -78,25 +80,18 @@ def _vols(rows: List[Dict[str, Any]]) -> List[float]:
 def _ema(closes: List[float], period: int) -> Optional[float]:
     if len(closes) < period:
         return None
-    k = 2.0 / (period + 1)
-    ema = sum(closes[:period]) / period
-    for c in closes[period:]:
-        ema = c * k + ema * (1 - k)
-    return ema
+    return indicator_engine.last_value(indicator_engine.ema(closes, period, seed='sma'))
 
 
 def _atr(rows: List[Dict[str, Any]], period: int = 14) -> Optional[float]:
     if len(rows) < period + 1:
         return None
-    trs = []
-    for i in range(1, len(rows)):
-        h = _f(rows[i].get("high_price"))
-        l = _f(rows[i].get("low_price"))
-        pc = _f(rows[i - 1].get("close_price"))
-        trs.append(max(h - l, abs(h - pc), abs(l - pc)))
-    if len(trs) < period:
-        return None
-    return sum(trs[-period:]) / period
+    return indicator_engine.last_value(indicator_engine.atr(
+        [_f(r.get("high_price")) for r in rows],
+        [_f(r.get("low_price")) for r in rows],
+        [_f(r.get("close_price")) for r in rows],
+        period,
+    ))
 
 
 def _clamp(v: float, lo: float, hi: float) -> float:
@@ -106,26 +101,7 @@ def _clamp(v: float, lo: float, hi: float) -> float:
 def _rsi(closes: List[float], period: int = 14) -> Optional[float]:
     if len(closes) < period + 1:
         return None
-    gains = 0.0
-    losses = 0.0
-    for i in range(1, period + 1):
-        delta = closes[i] - closes[i - 1]
-        if delta >= 0:
-            gains += delta
-        else:
-            losses -= delta
-    avg_gain = gains / period
-    avg_loss = losses / period
-    for i in range(period + 1, len(closes)):
-        delta = closes[i] - closes[i - 1]
-        gain = delta if delta > 0 else 0.0
-        loss = -delta if delta < 0 else 0.0
-        avg_gain = (avg_gain * (period - 1) + gain) / period
-        avg_loss = (avg_loss * (period - 1) + loss) / period
-    if avg_loss <= 1e-12:
-        return 100.0
-    rs = avg_gain / avg_loss
-    return 100.0 - (100.0 / (1.0 + rs))
+    return indicator_engine.last_value(indicator_engine.rsi(closes, period, method='wilder'))
 
 
 @dataclass
@@ -0,0 +1,353 @@
+"""
+统一出场规则引擎 (PositionSLTPMonitor / SmartExitOptimizer 共用)
+
+两套监控原先各写一份止盈止损判断, 又各自用冷却表 (_cooldown) 规避对方已经在平的仓,
+同一持仓仍会被两边同时下平仓单. 现在:
+
+- 价格类规则 (浮盈 / 峰值 / 硬 SL/TP / 移动止盈档位 / 保本 / 早期止损 / AI trail-tp)
+  集中在本模块: evaluate_price_rules 对一轮 tick 的全部持仓做一次 numpy 向量化计算,
+  check_hard_trigger 是同口径的单持仓版本 (SmartExitOptimizer 的 tick 路径)
+- 平仓只走一条路径: CloseIntent → ExitEngine.claim → 各进程自己的平仓执行器.
+  claim 是 futures_positions 上的一条条件 UPDATE (close_claim_owner / close_claim_at),
+  两个进程同时判定平仓时只有一个拿得到; 平仓失败时 claim 到期 (CLAIM_TTL_S) 前不重试,
+  取代原来的冷却表. 两列由 scripts/ensure_db_runtime_guards.py 加上, 运行时只做探测
+
+两个监控分属 main / smart_trader 两个进程, 规则与平仓去重在这里统一,
+监控循环本身仍各自运行 (依赖各自进程内的价格源与平仓引擎).
+"""
+from __future__ import annotations
+
+import os
+import socket
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, Optional, Sequence, Tuple
+
+import numpy as np
+from loguru import logger
+
+
+# ── 旧规则 (非 AI 来源) 的动态出场档位, 与 strategy_live/whale/bigmid MID 同 ──
+TRAIL_TP_TIERS = [
+    (0.10, 0.03),  # peak ≥ 10% → 回落 3% 平
+    (0.05, 0.02),  # peak ≥ 5%  → 回落 2% 平
+    (0.03, 0.01),  # peak ≥ 3%  → 回落 1% 平
+]
+EARLY_SL_PCT             = 0.03   # 浮亏 ≥ 3% 早期止损
+# peak ≥ 1.5% 启用保本守护（2026-04-24 从 3% 降低；补 peak 1-3% 的盲区）
+BREAKEVEN_AFTER_PEAK_PCT = 0.015
+BREAKEVEN_SL_PCT         = -0.005 # 保本线 -0.5%
+# 入场保护期：开仓 N 分钟内 early-sl/breakeven 不触发（硬 SL 兜底）
+# 2026-04-24：数据显示 38% early-sl 在 5m 内扎中（入场瞬间均值回归误杀）
+ENTRY_GRACE_MIN          = 45
+
+# AI 轻量移动止盈：峰值价格收益 ≥3% 后，从峰值回撤 ≥1% 平仓
+AI_TRAIL_TP_TIERS = (
+    (0.10, 0.03, 0.06),   # peak price >=10%, allow 3% pullback, keep >=6%
+    (0.05, 0.02, 0.03),   # peak price >=5%, allow 2% pullback, keep >=3%
+    (0.03, 0.012, 0.018), # peak price >=3%, allow 1.2% pullback, keep >=1.8%
+)
+AI_TRAIL_TP_ROI_ACTIVATE = 0.12
+AI_TRAIL_TP_ROI_PULLBACK = 0.04
+AI_TRAIL_TP_MIN_PRICE_PEAK_FOR_ROI = 0.025
+
+# evaluate_price_rules 输出编码
+HIT_NONE, HIT_STOP_LOSS, HIT_TAKE_PROFIT = 0, 1, 2
+LEGACY_NONE, LEGACY_TRAIL_TP, LEGACY_BREAKEVEN, LEGACY_EARLY_SL = 0, 1, 2, 3
+HIT_REASONS = {HIT_STOP_LOSS: "stop_loss", HIT_TAKE_PROFIT: "take_profit"}
+
+CLAIM_TTL_S = 60          # 平仓 claim 有效期: 执行方失败/崩溃后其他监控最多等这么久接手
+CLAIM_PROBE_RETRY_S = 600  # claim 列缺失时隔多久重新探测 (迁移后无需重启)
+
+_CLAIM_PROBE_SQL = "SELECT close_claim_owner, close_claim_at FROM futures_positions LIMIT 0"
+
+_CLAIM_SQL = """
+    UPDATE futures_positions
+    SET close_claim_owner = %s,
+        close_claim_at    = NOW()
+    WHERE id = %s
+      AND status = 'open'
+      AND (close_claim_at IS NULL OR close_claim_at < NOW() - INTERVAL %s SECOND)
+"""
+
+
+def dynamic_trail_pullback(peak_pct: float) -> float:
+    for threshold, pullback in TRAIL_TP_TIERS:
+        if peak_pct >= threshold:
+            return pullback
+    return float('inf')
+
+
+def check_hard_trigger(
+    side: str,
+    price: float,
+    sl: Optional[float],
+    tp: Optional[float],
+) -> Optional[Tuple[str, float]]:
+    """单持仓硬 SL/TP: 命中返回 (reason, 触发价), SL 优先"""
+    side = (side or "").upper()
+    if side == "LONG":
+        if sl is not None and price <= sl:
+            return ("stop_loss", sl)
+        if tp is not None and price >= tp:
+            return ("take_profit", tp)
+    elif side == "SHORT":
+        if sl is not None and price >= sl:
+            return ("stop_loss", sl)
+        if tp is not None and price <= tp:
+            return ("take_profit", tp)
+    return None
+
+
+def check_ai_trail_tp(pnl_pct: float, peak_pct: float, leverage: int = 1) -> Optional[str]:
+    """AI strategies trail by either price move or leverage-adjusted ROI."""
+    lev = max(int(leverage or 1), 1)
+    pullback_pct = peak_pct - pnl_pct
+    peak_roi = peak_pct * lev
+    pullback_roi = pullback_pct * lev
+    price_trail = False
+    tier_min_keep = None
+    for activate_pct, pullback_trigger, min_keep_pct in AI_TRAIL_TP_TIERS:
+        if peak_pct >= activate_pct:
+            tier_min_keep = min_keep_pct
+            price_trail = (
+                pullback_pct >= pullback_trigger
+                and pnl_pct >= min_keep_pct
+            )
+            break
+    roi_trail = (
+        peak_pct >= AI_TRAIL_TP_MIN_PRICE_PEAK_FOR_ROI
+        and peak_roi >= AI_TRAIL_TP_ROI_ACTIVATE
+        and pullback_roi >= AI_TRAIL_TP_ROI_PULLBACK
+        and tier_min_keep is not None
+        and pnl_pct >= tier_min_keep
+    )
+    if price_trail or roi_trail:
+        return (
+            f"AI trail-tp(peak_price={peak_pct * 100:.2f}%, "
+            f"drawdown_price={pullback_pct * 100:.2f}%, "
+            f"peak_roi={peak_roi * 100:.2f}%, "
+            f"drawdown_roi={pullback_roi * 100:.2f}%, "
+            f"min_keep_price={(tier_min_keep or 0) * 100:.2f}%, ai-trail-tp)"
+        )
+    return None
+
+
+def _as_float_array(values: Iterable[Optional[float]]) -> np.ndarray:
+    """None → NaN (NaN 参与比较恒为 False, 即该档不生效)"""
+    return np.array([np.nan if v is None else float(v) for v in values], dtype=np.float64)
+
+
+def evaluate_price_rules(
+    sides: Sequence[str],
+    entry: Sequence[float],
+    price: Sequence[float],
+    sl: Sequence[Optional[float]],
+    tp: Sequence[Optional[float]],
+    prev_peak: Sequence[float],
+    leverage: Optional[Sequence[float]] = None,
+    in_grace: Optional[Sequence[bool]] = None,
+) -> Dict[str, np.ndarray]:
+    """
+    一轮 tick 全部持仓的价格类规则 (一次向量化计算, 与逐持仓标量函数同口径)
+
+    Args:
+        sides: 'LONG' / 'SHORT'
+        entry / price: 入场价 / 当前价 (entry 需 > 0)
+        sl / tp: 止损 / 止盈价, None 表示未设置
+        prev_peak: 已知峰值价格收益率 (小数)
+        leverage: 杠杆 (AI trail-tp 的 ROI 口径), 默认 1
+        in_grace: 是否处于入场保护期 (保本 / 早期止损不触发)
+
+    Returns:
+        pnl:        价格收益率 (小数)
+        peak:       max(prev_peak, pnl)
+        hit:        HIT_NONE / HIT_STOP_LOSS / HIT_TAKE_PROFIT (SL 优先)
+        hit_price:  命中档位的触发价 (未命中为 NaN)
+        legacy:     旧规则 LEGACY_* (移动止盈 > 保本 > 早期止损)
+        ai_trail:   AI trail-tp 是否触发 (与 check_ai_trail_tp 非 None 等价)
+    """
+    n = len(sides)
+    is_long = np.array([(s or "").upper() == "LONG" for s in sides], dtype=bool)
+    is_short = np.array([(s or "").upper() == "SHORT" for s in sides], dtype=bool)
+    entry_a = np.asarray(entry, dtype=np.float64)
+    price_a = np.asarray(price, dtype=np.float64)
+    sl_a = _as_float_array(sl)
+    tp_a = _as_float_array(tp)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        pnl = np.where(is_long, price_a - entry_a, entry_a - price_a) / entry_a
+    peak = np.maximum(np.asarray(prev_peak, dtype=np.float64), pnl)
+
+    sl_hit = (is_long & (price_a <= sl_a)) | (is_short & (price_a >= sl_a))
+    tp_hit = (is_long & (price_a >= tp_a)) | (is_short & (price_a <= tp_a))
+    hit = np.where(sl_hit, HIT_STOP_LOSS, np.where(tp_hit, HIT_TAKE_PROFIT, HIT_NONE)).astype(np.int8)
+    hit_price = np.where(sl_hit, sl_a, np.where(tp_hit, tp_a, np.nan))
+
+    # 旧规则: 峰值档位决定允许回撤
+    drawdown = peak - pnl
+    pullback = np.full(n, np.inf)
+    for threshold, pb in reversed(TRAIL_TP_TIERS):
+        pullback = np.where(peak >= threshold, pb, pullback)
+    grace = np.zeros(n, dtype=bool) if in_grace is None else np.asarray(in_grace, dtype=bool)
+    trail = drawdown >= pullback
+    breakeven = ~grace & (peak >= BREAKEVEN_AFTER_PEAK_PCT) & (pnl <= BREAKEVEN_SL_PCT)
+    early = ~grace & (pnl <= -EARLY_SL_PCT)
+    legacy = np.select(
+        [trail, breakeven, early],
+        [LEGACY_TRAIL_TP, LEGACY_BREAKEVEN, LEGACY_EARLY_SL],
+        LEGACY_NONE,
+    ).astype(np.int8)
+
+    # AI trail-tp: 命中的最高档决定回撤阈值与最低保留收益
+    lev = np.ones(n) if leverage is None else np.maximum(
+        np.nan_to_num(np.asarray(leverage, dtype=np.float64), nan=1.0).astype(np.int64), 1,
+    )
+    tier_pull = np.full(n, np.nan)
+    tier_keep = np.full(n, np.nan)
+    for activate, pb, keep in reversed(AI_TRAIL_TP_TIERS):
+        active = peak >= activate
+        tier_pull = np.where(active, pb, tier_pull)
+        tier_keep = np.where(active, keep, tier_keep)
+    price_trail = (drawdown >= tier_pull) & (pnl >= tier_keep)
+    roi_trail = (
+        (peak >= AI_TRAIL_TP_MIN_PRICE_PEAK_FOR_ROI)
+        & (peak * lev >= AI_TRAIL_TP_ROI_ACTIVATE)
+        & (drawdown * lev >= AI_TRAIL_TP_ROI_PULLBACK)
+        & (pnl >= tier_keep)
+    )
+
+    return {
+        'pnl': pnl,
+        'peak': peak,
+        'hit': hit,
+        'hit_price': hit_price,
+        'legacy': legacy,
+        'ai_trail': price_trail | roi_trail,
+    }
+
+
+@dataclass
+class CloseIntent:
+    """一次平仓决定 (由规则产生, 经 ExitEngine.claim 去重后交给执行器)"""
+    position_id: int
+    symbol: str
+    side: str
+    reason: str
+    price: Optional[float] = None
+    peak_pct: Optional[float] = None          # 平仓前需落库的峰值价格收益率 (小数)
+    created_at: float = field(default_factory=time.time)
+
+
+def claim_columns_present(cursor) -> bool:
+    """close_claim_owner / close_claim_at 两列是否已迁移 (LIMIT 0, 不读数据)"""
+    try:
+        cursor.execute(_CLAIM_PROBE_SQL)
+        cursor.fetchall()
+        return True
+    except Exception as e:
+        code = getattr(e, 'errno', None) or (e.args[0] if e.args else None)
+        if code == 1054:  # Unknown column
+            return False
+        raise
+
+
+class ExitEngine:
+    """
+    平仓去重: 跨进程 DB claim + 进程内待决表
+
+    claim 成功的一方负责平仓; 其他监控在 claim 有效期内直接跳过该持仓.
+    claim 查询本身出错时按成功处理 (fail open): 平仓引擎对已平仓的持仓返回 already_closed,
+    重复平仓的代价远小于该平不平. claim 列未迁移时只做进程内去重, 每 CLAIM_PROBE_RETRY_S 重新探测一次.
+    """
+
+    def __init__(self, get_connection: Callable, component: str, ttl_s: float = CLAIM_TTL_S):
+        """
+        Args:
+            get_connection: 返回 DB 连接的函数 (pymysql / mysql.connector 均可)
+            component: 执行方名字, 与主机名/进程号一起写入 close_claim_owner
+        """
+        self._get_connection = get_connection
+        self.owner = f"{component}@{socket.gethostname()}:{os.getpid()}"[:64]
+        self.ttl_s = float(ttl_s)
+        self._pending: Dict[int, float] = {}      # position_id → 本进程跳过截止 (monotonic)
+        self._lock = threading.Lock()
+        self._columns_ready = False
+        self._next_probe = 0.0                    # 列缺失时下次探测时间 (monotonic)
+        self.stats = {'claimed': 0, 'lost': 0, 'skipped': 0, 'errors': 0, 'unclaimed': 0}
+
+    def is_pending(self, position_id: int) -> bool:
+        with self._lock:
+            until = self._pending.get(position_id)
+            if until is None:
+                return False
+            if until <= time.monotonic():
+                del self._pending[position_id]
+                return False
+            return True
+
+    def prune(self, alive_ids: Iterable[int]) -> None:
+        """丢弃已不在持仓列表里的待决记录"""
+        alive = set(alive_ids)
+        with self._lock:
+            self._pending = {k: v for k, v in self._pending.items() if k in alive}
+
+    def claim(self, intent: CloseIntent) -> bool:
+        """
+        抢占平仓权. True = 由调用方执行平仓; False = 其他监控已在平 / 本进程刚平过 (TTL 内).
+        无论成败本进程都在 TTL 内不再重复提交同一持仓 (失败重试间隔即原 60s 冷却).
+        """
+        pid = int(intent.position_id)
+        if self.is_pending(pid):
+            self.stats['skipped'] += 1
+            return False
+        with self._lock:
+            self._pending[pid] = time.monotonic() + self.ttl_s
+        if not self._columns_ready and time.monotonic() < self._next_probe:
+            self.stats['unclaimed'] += 1
+            return True
+
+        try:
+            won = self._claim_db(pid)
+        except Exception as e:
+            self.stats['errors'] += 1
+            logger.debug(f"[ExitEngine] claim 失败, 直接执行 pid={pid}: {e}")
+            return True
+        if won is None:
+            return True
+        if won:
+            self.stats['claimed'] += 1
+        else:
+            self.stats['lost'] += 1
+            logger.info(
+                f"[ExitEngine] pid={pid} {intent.symbol} 已由其他监控平仓中, 跳过 ({intent.reason})"
+            )
+        return won
+
+    def _claim_db(self, position_id: int) -> Optional[bool]:
+        """条件 UPDATE 抢 claim; claim 列未迁移返回 None"""
+        conn = self._get_connection()
+        cursor = None
+        try:
+            cursor = conn.cursor()
+            if not self._columns_ready:
+                if not claim_columns_present(cursor):
+                    self._next_probe = time.monotonic() + CLAIM_PROBE_RETRY_S
+                    self.stats['unclaimed'] += 1
+                    logger.warning(
+                        "[ExitEngine] futures_positions 缺少 close_claim_* 列, 仅做进程内去重; "
+                        "请运行 scripts/ensure_db_runtime_guards.py"
+                    )
+                    return None
+                self._columns_ready = True
+            cursor.execute(_CLAIM_SQL, (self.owner, position_id, int(self.ttl_s)))
+            won = cursor.rowcount == 1
+            conn.commit()
+            return won
+        finally:
+            if cursor is not None:
+                try: cursor.close()
+                except Exception: pass
+            try: conn.close()
+            except Exception: pass
@@ -14,7 +14,7 @@ MIN_QUOTE_VOLUME = 10_000_000  # 1000 万 USDT 24h 成交额下限
 TOP_MOVER = 12                  # 24h 涨幅 / 跌幅 各取 top 12
 TOP_FUNDING = 10                # 资金费率 极正 / 极负 各取 top 10
 
-# ── data_cache 层: 带本地内存缓存的 setting 读取 ──
+# ── settings_store 进程内快照: setting 读取 ──
 from app.services.data_cache_service import get_setting as _cached_get_setting
 
 _DATA_CACHE_SETTINGS = True
@@ -22,7 +22,7 @@ _DATA_CACHE_SETTINGS = True
 
 def _read_setting(cur, key: str, default: str) -> str:
     """
-    尝试从 data_cache.settings_cache 读取 (带 60s 本地缓存),
+    读 settings_store 进程内快照 (版本号变更才重载),
     失败时回退到 system_settings 直接查询.
     """
     if _DATA_CACHE_SETTINGS:
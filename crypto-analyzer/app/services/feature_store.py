@@ -0,0 +1,338 @@
+"""
+AI 提示词按币种特征库 (symbol, timeframe, 最后一根已收盘 K 线)
+
+候选池 / DeepSeek 预测 / 探索原先各自逐币 `ORDER BY open_time DESC LIMIT n` 取 K 线,
+再各算一遍 RSI / EMA / K 线叙事. 这里每个 (symbol, timeframe) 只在 K 线收盘时算一次:
+
+- 生产者 refresh_symbol_features(): 每周期一次批量读 K 线 (load_klines_bulk, 进程内缓存优先),
+  只保留已收盘的根; 最后一根收盘时间没前进的 (symbol, timeframe) 直接沿用已存特征,
+  其余重算并 executemany 落 data_cache.symbol_features (每 (symbol, timeframe) 一行)
+- 读取方 get_symbol_features(): 进程内已是当前收盘的直接返回, 其余一条 SQL 读表,
+  表里缺失 / 落后的再交给生产者补算; 100 币种组装提示词只需毫秒级
+
+叙事口径与 data_cache_service._make_kline_narrative 一致 (候选池 narrative_* 列同源).
+"""
+from __future__ import annotations
+
+import json
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pymysql.cursors
+from loguru import logger
+
+from app.services.data_cache_service import DATA_CACHE_DB, _calc_ema, _calc_rsi, _make_kline_narrative
+from app.services.kline_store import arrays_to_rows, load_klines_bulk, timeframe_to_ms
+
+# 周期 → 窗口根数 (取各提示词用到的最大值: 候选池 / 预测 1h 24 根, 15m 16 根, 1d 7 根)
+FEATURE_WINDOWS: Dict[str, int] = {'1d': 7, '1h': 24, '15m': 16}
+FEATURE_TIMEFRAMES: Tuple[str, ...] = tuple(FEATURE_WINDOWS)
+
+_TABLE = f"`{DATA_CACHE_DB}`.symbol_features"
+
+_COLUMNS = ('symbol', 'timeframe', 'bar_open_time', 'bars', 'close_price', 'high_price', 'low_price',
+            'rsi_14', 'ema_9', 'ema_21', 'narrative', 'klines_json')
+
+_UPSERT_SQL = f"""
+INSERT INTO {_TABLE} ({', '.join(_COLUMNS)})
+VALUES ({', '.join(['%s'] * len(_COLUMNS))})
+ON DUPLICATE KEY UPDATE
+  bar_open_time = VALUES(bar_open_time), bars = VALUES(bars),
+  close_price = VALUES(close_price), high_price = VALUES(high_price), low_price = VALUES(low_price),
+  rsi_14 = VALUES(rsi_14), ema_9 = VALUES(ema_9), ema_21 = VALUES(ema_21),
+  narrative = VALUES(narrative), klines_json = VALUES(klines_json)
+"""
+
+_SCHEMA_READY = False
+
+# (symbol, timeframe) → 特征; 本进程最近一次读表 / 计算的结果
+_memo: Dict[Tuple[str, str], Dict] = {}
+_memo_lock = threading.Lock()
+# (symbol, timeframe) → 已补算过的收盘 open_time; 补算后仍缺 / 落后的, 同一根内不再查表重算
+_attempted: Dict[Tuple[str, str], int] = {}
+_stats = {'memo_hits': 0, 'table_reads': 0, 'computed': 0, 'reused': 0, 'attempt_skips': 0}
+
+
+def ensure_feature_schema(conn) -> None:
+    """CREATE IF NOT EXISTS — 幂等。"""
+    global _SCHEMA_READY
+    if _SCHEMA_READY:
+        return
+    with conn.cursor() as cur:
+        cur.execute(
+            f"""
+            CREATE TABLE IF NOT EXISTS {_TABLE} (
+              symbol VARCHAR(32) NOT NULL,
+              timeframe VARCHAR(8) NOT NULL,
+              bar_open_time BIGINT NOT NULL,
+              bars INT NOT NULL DEFAULT 0,
+              close_price DOUBLE DEFAULT NULL,
+              high_price DOUBLE DEFAULT NULL,
+              low_price DOUBLE DEFAULT NULL,
+              rsi_14 DOUBLE DEFAULT NULL,
+              ema_9 DOUBLE DEFAULT NULL,
+              ema_21 DOUBLE DEFAULT NULL,
+              narrative TEXT,
+              klines_json MEDIUMTEXT,
+              updated_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+              PRIMARY KEY (symbol, timeframe)
+            ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+            """
+        )
+    try:
+        conn.commit()
+    except Exception:
+        pass
+    _SCHEMA_READY = True
+
+
+def last_closed_open_time(timeframe: str, now_ms: Optional[int] = None) -> int:
+    """当前时刻最后一根已收盘 K 线的 open_time"""
+    step = timeframe_to_ms(timeframe)
+    now_ms = int(time.time() * 1000) if now_ms is None else now_ms
+    return now_ms // step * step - step
+
+
+# ── 计算 ──────────────────────────────────────────────
+
+def compute_features(symbol: str, timeframe: str, rows: List[Dict]) -> Optional[Dict]:
+    """已收盘 K 线 (升序, kline_data 行格式) → 特征行; 无数据返回 None"""
+    if not rows:
+        return None
+    closes = [float(r['close_price']) for r in rows]
+    return {
+        'symbol': symbol,
+        'timeframe': timeframe,
+        'bar_open_time': int(rows[-1]['open_time']),
+        'bars': len(rows),
+        'close_price': closes[-1],
+        'high_price': max(float(r['high_price']) for r in rows),
+        'low_price': min(float(r['low_price']) for r in rows),
+        'rsi_14': _calc_rsi(closes, 14),
+        'ema_9': _calc_ema(closes, 9),
+        'ema_21': _calc_ema(closes, 21),
+        'narrative': _make_kline_narrative(rows, timeframe),
+        'klines_json': json.dumps(
+            [{"ot": r["open_time"], "o": float(r["open_price"]), "h": float(r["high_price"]),
+              "l": float(r["low_price"]), "c": float(r["close_price"]), "v": float(r.get("volume") or 0)}
+             for r in rows],
+            default=str,
+        ),
+    }
+
+
+def closed_rows(rows: List[Dict], timeframe: str, now_ms: Optional[int] = None) -> List[Dict]:
+    """去掉未收盘的尾根, 截取特征窗口"""
+    cutoff = last_closed_open_time(timeframe, now_ms)
+    kept = [r for r in rows if int(r['open_time']) <= cutoff]
+    return kept[-FEATURE_WINDOWS.get(timeframe, len(kept)):]
+
+
+def _closed_arrays(arrays: Dict[str, np.ndarray], timeframe: str, cutoff: int) -> Dict[str, np.ndarray]:
+    keep = arrays['open_time'] <= cutoff
+    limit = FEATURE_WINDOWS[timeframe]
+    return {k: v[keep][-limit:] for k, v in arrays.items()}
+
+
+# ── 存取 ──────────────────────────────────────────────
+
+def _read_table(conn, symbols: List[str], timeframes: Iterable[str]) -> Dict[Tuple[str, str], Dict]:
+    if not symbols:
+        return {}
+    ensure_feature_schema(conn)
+    tfs = list(timeframes)
+    with conn.cursor(pymysql.cursors.DictCursor) as cur:
+        cur.execute(
+            f"SELECT {', '.join(_COLUMNS)} FROM {_TABLE} "
+            f"WHERE symbol IN ({','.join(['%s'] * len(symbols))}) "
+            f"AND timeframe IN ({','.join(['%s'] * len(tfs))})",
+            (*symbols, *tfs),
+        )
+        rows = cur.fetchall()
+    _stats['table_reads'] += 1
+    return {(r['symbol'], r['timeframe']): dict(r) for r in rows}
+
+
+def _write_table(conn, feats: List[Dict]) -> None:
+    if not feats:
+        return
+    ensure_feature_schema(conn)
+    with conn.cursor() as cur:
+        cur.executemany(_UPSERT_SQL, [tuple(f[c] for c in _COLUMNS) for f in feats])
+    try:
+        conn.commit()
+    except Exception:
+        pass
+
+
+def _remember(feats: Iterable[Dict]) -> None:
+    with _memo_lock:
+        for f in feats:
+            _memo[(f['symbol'], f['timeframe'])] = f
+
+
+def _group(found: Dict[Tuple[str, str], Dict]) -> Dict[str, Dict[str, Dict]]:
+    out: Dict[str, Dict[str, Dict]] = {}
+    for (sym, tf), f in found.items():
+        out.setdefault(sym, {})[tf] = f
+    return out
+
+
+# ── 生产者 / 读取方 ────────────────────────────────────
+
+def refresh_symbol_features(conn, symbols: Iterable[str],
+                            timeframes: Iterable[str] = FEATURE_TIMEFRAMES,
+                            now_ms: Optional[int] = None) -> Dict[str, Dict[str, Dict]]:
+    """
+    生产者: 批量读 K 线, 只重算最后一根已收盘 K 线前进了的 (symbol, timeframe) 并落表
+
+    Args:
+        conn: 主库 pymysql 连接 (kline_data 所在库)
+
+    Returns:
+        {symbol: {timeframe: 特征}}; 没有已收盘 K 线的 (symbol, timeframe) 不出现
+    """
+    syms = list(dict.fromkeys(symbols))
+    tfs = list(timeframes)
+    if not syms:
+        return {}
+    stored = _read_table(conn, syms, tfs)
+    found: Dict[Tuple[str, str], Dict] = {}
+    fresh: List[Dict] = []
+    for tf in tfs:
+        cutoff = last_closed_open_time(tf, now_ms)
+        # 多取一根: 库里最后一根可能尚未收盘
+        bulk = load_klines_bulk(conn, syms, tf, FEATURE_WINDOWS[tf] + 1)
+        for sym, arrays in bulk.items():
+            arrays = _closed_arrays(arrays, tf, cutoff)
+            if not len(arrays['open_time']):
+                continue
+            prev = stored.get((sym, tf))
+            if prev and int(prev['bar_open_time']) == int(arrays['open_time'][-1]):
+                found[(sym, tf)] = prev
+                continue
+            feat = compute_features(sym, tf, arrays_to_rows(arrays))
+            found[(sym, tf)] = feat
+            fresh.append(feat)
+    _write_table(conn, fresh)
+    _stats['computed'] += len(fresh)
+    _stats['reused'] += len(found) - len(fresh)
+    _remember(found.values())
+    return _group(found)
+
+
+def get_symbol_features(conn, symbols: Iterable[str],
+                        timeframes: Iterable[str] = FEATURE_TIMEFRAMES, *,
+                        compute_missing: bool = True,
+                        now_ms: Optional[int] = None) -> Dict[str, Dict[str, Dict]]:
+    """
+    读取方: 进程内 → data_cache.symbol_features → (compute_missing) 生产者补算
+
+    已是当前收盘的特征不查库; 断采币种补算后仍落后, 照常返回 (调用方按 bar_open_time 判新鲜度),
+    并记下本根已尝试过, 下一根收盘前的调用不再为它查表 / 重算.
+
+    Returns:
+        {symbol: {timeframe: 特征}}
+    """
+    syms = list(dict.fromkeys(symbols))
+    tfs = list(timeframes)
+    current = {tf: last_closed_open_time(tf, now_ms) for tf in tfs}
+    found: Dict[Tuple[str, str], Dict] = {}
+
+    def _lagging(s: str, tf: str) -> bool:
+        return (s, tf) not in found or int(found[(s, tf)]['bar_open_time']) < current[tf]
+
+    def _missing() -> List[str]:
+        return [s for s in syms if any(
+            _lagging(s, tf) and attempted.get((s, tf)) != current[tf] for tf in tfs
+        )]
+
+    with _memo_lock:
+        attempted = dict(_attempted)
+        for s in syms:
+            for tf in tfs:
+                f = _memo.get((s, tf))
+                if f is not None:
+                    found[(s, tf)] = f
+    need = _missing()
+    skipped = sum(1 for s in syms if s not in need and any(_lagging(s, tf) for tf in tfs))
+    _stats['memo_hits'] += len(syms) - len(need) - skipped
+    _stats['attempt_skips'] += skipped
+    if need:
+        from_table = _read_table(conn, need, tfs)
+        _remember(from_table.values())
+        found.update(from_table)
+        need = _missing()
+    if need and compute_missing:
+        try:
+            for sym, by_tf in refresh_symbol_features(conn, need, tfs, now_ms).items():
+                for tf, f in by_tf.items():
+                    found[(sym, tf)] = f
+        except Exception as e:
+            logger.warning(f"[特征库] 补算 {len(need)} 个币种失败, 使用已有特征: {e}")
+        else:
+            # 补算失败 (连库等) 下次照常重试; 补算成功仍落后的是断采 / 无 K 线, 等下一根收盘
+            with _memo_lock:
+                for s in need:
+                    for tf in tfs:
+                        if _lagging(s, tf):
+                            _attempted[(s, tf)] = current[tf]
+    return _group(found)
+
+
+def get_stats() -> Dict:
+    with _memo_lock:
+        size = len(_memo)
+    return {**_stats, 'memo': size}
+
+
+# ── 提示词字段 ────────────────────────────────────────
+
+def range_position(feat_1d: Optional[Dict], price: Optional[float]) -> Tuple[Optional[float], Optional[float]]:
+    """当前价距 1d 窗口 (7 根) 低点 / 高点的百分比 → (above_7d_low_pct, below_7d_high_pct)"""
+    if not feat_1d or not price:
+        return None, None
+    low, high = feat_1d.get('low_price'), feat_1d.get('high_price')
+    above = round((price - low) / low * 100, 2) if low and low > 0 else None
+    below = round((price - high) / high * 100, 2) if high and high > 0 else None
+    return above, below
+
+
+def apply_features(sym_data: dict, feats: Optional[Dict[str, Dict]]) -> None:
+    """探索 universe 单币: 用特征填 kline_narrative + tech (字段同候选池口径)"""
+    feats = feats or {}
+    f_1h, f_15m = feats.get('1h') or {}, feats.get('15m') or {}
+    sym_data['kline_narrative'] = {
+        tf: (feats.get(tf) or {}).get('narrative') or f"[{tf}] 无数据" for tf in ('1d', '1h', '15m')
+    }
+    above, below = range_position(feats.get('1d'), sym_data.get('current_price'))
+    sym_data['tech'] = {
+        'rsi_14_1h': round(f_1h['rsi_14'], 1) if f_1h.get('rsi_14') is not None else None,
+        'ema9_15m': round(f_15m['ema_9'], 6) if f_15m.get('ema_9') is not None else None,
+        'above_7d_low_pct': above,
+        'below_7d_high_pct': below,
+    }
+
+
+def latest_bar_time_ms(feats: Optional[Dict[str, Dict]], timeframe: str) -> Optional[int]:
+    """最后一根已收盘 K 线的收盘时刻 (= 下一根 open_time); 无特征返回 None"""
+    f = (feats or {}).get(timeframe)
+    if not f:
+        return None
+    return int(f['bar_open_time']) + timeframe_to_ms(timeframe)
+
+
+def latest_bar_time(cur, symbol: str, timeframe: str, feats: Optional[Dict[str, Dict]]) -> Optional[int]:
+    """探索 stale 判定: 有特征用 latest_bar_time_ms, 否则回落 kline_data 的 MAX(open_time)"""
+    latest = latest_bar_time_ms(feats, timeframe)
+    if latest:
+        return latest
+    cur.execute(
+        "SELECT MAX(open_time) AS m FROM kline_data "
+        "WHERE symbol=%s AND timeframe=%s AND exchange='binance_futures'",
+        (symbol, timeframe)
+    )
+    row = cur.fetchone()
+    return int(row['m']) if row and row.get('m') else None
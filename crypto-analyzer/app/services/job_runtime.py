@@ -0,0 +1,265 @@
+"""
+调度任务运行时
+
+schedule 只负责"什么时候触发", 触发后统一交给 JobRuntime 执行:
+- 异步任务跑在一个常驻事件循环上 (不再每次 asyncio.run 新建循环 / aiohttp 会话 / 连接)
+- 同步任务进有界线程池 (SYNC_WORKERS), 慢任务不会无限堆线程; 排队时间计入指标
+- 每个任务自带重叠策略: skip = 上一轮未结束则丢弃本次触发; coalesce = 合并为结束后补跑一次
+- jitter_s: 触发后随机延迟 [0, jitter_s) 秒再排队, 错开同一分钟触发的任务
+- 每个任务记录运行次数 / 失败 / 跳过 / 合并 / 超时 / 耗时 / 排队延迟, 见 format_metrics
+
+异步任务内部的阻塞调用请用 asyncio.to_thread (走循环的默认线程池 LOOP_IO_WORKERS, 与同步任务池分开).
+超时只能取消 await, 取消不了已经在跑的 to_thread 线程: 任务在这些线程结束前保持 active, 后续触发照常跳过 / 合并,
+不会再起一份同样的阻塞调用把默认线程池占满.
+"""
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import inspect
+import random
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Set
+
+from loguru import logger
+
+SYNC_WORKERS = 8
+LOOP_IO_WORKERS = 4
+OVERLAP_POLICIES = ('skip', 'coalesce')
+
+# 当前在跑的异步任务 (任务协程的上下文里设置; to_thread 在该上下文里向默认线程池提交)
+_CURRENT_JOB: contextvars.ContextVar[Optional['Job']] = contextvars.ContextVar('job_runtime_job', default=None)
+
+
+@dataclass
+class JobMetrics:
+    runs: int = 0
+    failures: int = 0
+    timeouts: int = 0
+    skipped: int = 0                    # 上一轮未结束, 丢弃的触发
+    coalesced: int = 0                  # 上一轮未结束, 并入一次补跑的触发
+    total_runtime_ms: float = 0.0
+    last_runtime_ms: float = 0.0
+    max_runtime_ms: float = 0.0
+    last_queue_ms: float = 0.0          # 入队 (jitter 之后) → 开始执行
+    max_queue_ms: float = 0.0
+    last_finished: Optional[datetime] = None
+    last_error: Optional[str] = None
+
+    @property
+    def avg_runtime_ms(self) -> float:
+        return self.total_runtime_ms / self.runs if self.runs else 0.0
+
+
+@dataclass
+class Job:
+    name: str
+    fn: Callable[[], Any]
+    is_async: bool
+    overlap: str = 'skip'
+    jitter_s: float = 0.0
+    timeout_s: Optional[float] = None
+    metrics: JobMetrics = field(default_factory=JobMetrics)
+    active: bool = False                # 已触发且未结束 (含 jitter 等待 / 排队 / 运行)
+    running: bool = False
+    pending: bool = False               # coalesce: 结束后补跑一次
+    threads: Set[Future] = field(default_factory=set)   # 本任务提交到默认线程池、尚未结束的调用
+
+
+class _JobTrackingExecutor(ThreadPoolExecutor):
+    """事件循环的默认线程池: 记下每个异步任务经 to_thread / run_in_executor(None) 提交的调用"""
+
+    def submit(self, fn, /, *args, **kwargs):
+        future = super().submit(fn, *args, **kwargs)
+        job = _CURRENT_JOB.get()
+        if job is not None:
+            job.threads.add(future)
+            future.add_done_callback(job.threads.discard)
+        return future
+
+
+class JobRuntime:
+    """常驻事件循环 + 有界同步线程池; 线程安全, trigger 可在任意线程调用"""
+
+    def __init__(self, sync_workers: int = SYNC_WORKERS, loop_io_workers: int = LOOP_IO_WORKERS):
+        self._jobs: Dict[str, Job] = {}
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=sync_workers, thread_name_prefix='job-sync')
+        self._loop = asyncio.new_event_loop()
+        self._loop.set_default_executor(
+            _JobTrackingExecutor(max_workers=loop_io_workers, thread_name_prefix='job-io')
+        )
+        self._thread = threading.Thread(target=self._loop.run_forever, daemon=True, name='JobRuntimeLoop')
+        self._thread.start()
+        self.sync_workers = sync_workers
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        return self._loop
+
+    def register(self, name: str, fn: Callable[[], Any], overlap: str = 'skip',
+                 jitter_s: float = 0.0, timeout_s: Optional[float] = None) -> Callable[[], bool]:
+        """
+        注册任务, 返回无参触发函数 (直接交给 schedule.every(...).do)
+
+        Args:
+            fn: 无参可调用; 协程函数 (或返回协程) 跑在事件循环上, 否则进同步线程池
+            overlap: skip / coalesce
+            jitter_s: 触发后随机延迟上限
+            timeout_s: 仅异步任务生效 (同步任务无法安全中断)
+        """
+        if overlap not in OVERLAP_POLICIES:
+            raise ValueError(f"未知的重叠策略: {overlap}")
+        with self._lock:
+            if name in self._jobs:
+                raise ValueError(f"重复的任务: {name}")
+            self._jobs[name] = Job(name, fn, inspect.iscoroutinefunction(fn), overlap, jitter_s, timeout_s)
+        return lambda: self.trigger(name)
+
+    def run_once(self, name: str, fn: Callable[[], Any], delay_s: float = 0.0, **policy) -> bool:
+        """注册并触发一次 (启动补跑 / 初始化这类一次性任务; 不占线程等待 delay)"""
+        if name not in self._jobs:
+            self.register(name, fn, **policy)
+        return self.trigger(name, delay_s)
+
+    def trigger(self, name: str, delay_s: float = 0.0) -> bool:
+        """触发一次; 按重叠策略被丢弃 / 合并时返回 False"""
+        job = self._jobs[name]
+        with self._lock:
+            if job.active:
+                if job.overlap == 'coalesce':
+                    job.pending = True
+                    job.metrics.coalesced += 1
+                else:
+                    job.metrics.skipped += 1
+                    logger.info(f"[job_runtime] {name} 上一轮仍在运行，跳过本轮")
+                return False
+            job.active = True
+        delay = delay_s + (random.uniform(0, job.jitter_s) if job.jitter_s else 0.0)
+        self._loop.call_soon_threadsafe(self._loop.call_later, delay, self._dispatch, job)
+        return True
+
+    def _dispatch(self, job: Job) -> None:
+        """事件循环线程内调用"""
+        self._loop.create_task(self._execute(job, time.monotonic()))
+
+    async def _execute(self, job: Job, queued_at: float) -> None:
+        started = [queued_at]
+        error = None
+        timed_out = False
+        exc = None
+        try:
+            if job.is_async:
+                started[0] = time.monotonic()
+                job.running = True
+                _CURRENT_JOB.set(job)           # 只作用于本任务协程的上下文
+                coro = job.fn()
+                await (asyncio.wait_for(coro, job.timeout_s) if job.timeout_s else coro)
+            else:
+                def call():
+                    started[0] = time.monotonic()
+                    job.running = True
+                    result = job.fn()
+                    if inspect.isawaitable(result):          # 同步包装返回了协程: 放回循环执行
+                        return asyncio.run_coroutine_threadsafe(result, self._loop).result()
+                    return result
+
+                await self._loop.run_in_executor(self._pool, call)
+        except asyncio.TimeoutError:
+            timed_out = True
+            error = f"超时 (>{job.timeout_s}s)"
+        except asyncio.CancelledError as e:
+            # 任务内部抛出的取消 (如 aiohttp 请求被取消) 按失败计; 循环本身在取消本协程时继续上抛
+            exc = e
+            error = "CancelledError: 任务被取消"
+            cancelling = getattr(asyncio.current_task(), 'cancelling', None)    # 3.11+
+            if cancelling is not None and cancelling():
+                raise
+        except Exception as e:
+            exc = e
+            error = f"{e.__class__.__name__}: {e}"
+        finally:
+            finished = time.monotonic()
+            self._finish(job, started[0] - queued_at, finished - started[0], error, timed_out, exc)
+
+    def _finish(self, job: Job, queue_s: float, runtime_s: float, error: Optional[str], timed_out: bool,
+                exc: Optional[BaseException] = None) -> None:
+        m = job.metrics
+        m.runs += 1
+        m.last_queue_ms = queue_s * 1000
+        m.max_queue_ms = max(m.max_queue_ms, m.last_queue_ms)
+        m.last_runtime_ms = runtime_s * 1000
+        m.max_runtime_ms = max(m.max_runtime_ms, m.last_runtime_ms)
+        m.total_runtime_ms += m.last_runtime_ms
+        m.last_finished = datetime.now()
+        if error:
+            m.failures += 1
+            m.timeouts += int(timed_out)
+            m.last_error = error
+            logger.opt(exception=exc).error(f"[job_runtime] {job.name} 失败: {error}")
+        else:
+            m.last_error = None
+        leftover = [f for f in list(job.threads) if not f.done()]
+        if leftover:
+            # 超时 / 取消后线程还在跑: 等它们结束再放行, 期间的触发照常跳过 / 合并
+            logger.warning(f"[job_runtime] {job.name} 已结束但仍有 {len(leftover)} 个线程在运行, 等其返回后再放行")
+            self._loop.create_task(self._release_after(job, leftover))
+            return
+        self._release(job)
+
+    async def _release_after(self, job: Job, leftover: List[Future]) -> None:
+        await asyncio.wait([asyncio.wrap_future(f) for f in leftover])
+        self._release(job)
+
+    def _release(self, job: Job) -> None:
+        with self._lock:
+            job.running = False
+            rerun = job.pending
+            job.pending = False
+            job.active = rerun
+        if rerun:
+            self._dispatch(job)
+
+    def metrics(self) -> Dict[str, Dict[str, Any]]:
+        """可序列化的各任务指标"""
+        out = {}
+        for job in list(self._jobs.values()):
+            m = job.metrics
+            out[job.name] = {
+                'kind': 'async' if job.is_async else 'sync',
+                'overlap': job.overlap,
+                'running': job.running,
+                'runs': m.runs,
+                'failures': m.failures,
+                'timeouts': m.timeouts,
+                'skipped': m.skipped,
+                'coalesced': m.coalesced,
+                'avg_runtime_ms': round(m.avg_runtime_ms, 1),
+                'last_runtime_ms': round(m.last_runtime_ms, 1),
+                'max_runtime_ms': round(m.max_runtime_ms, 1),
+                'last_queue_ms': round(m.last_queue_ms, 1),
+                'max_queue_ms': round(m.max_queue_ms, 1),
+                'last_finished': m.last_finished,
+                'last_error': m.last_error,
+            }
+        return out
+
+    def format_metrics(self) -> List[str]:
+        """状态表: 每任务一行 (耗时 / 排队单位秒)"""
+        lines = [f"{'任务':28s} {'类型':5s} {'运行':>5s} {'失败':>4s} {'跳过':>4s} {'合并':>4s} "
+                 f"{'平均耗时':>8s} {'最大耗时':>8s} {'最大排队':>8s}"]
+        for name, m in sorted(self.metrics().items()):
+            lines.append(
+                f"{name:30s} {m['kind']:6s} {m['runs']:6d} {m['failures']:5d} {m['skipped']:5d} {m['coalesced']:5d} "
+                f"{m['avg_runtime_ms'] / 1000:9.2f}s {m['max_runtime_ms'] / 1000:9.2f}s {m['max_queue_ms'] / 1000:9.2f}s"
+                + (" *运行中" if m['running'] else "")
+            )
+        return lines
+
+    def shutdown(self, wait: bool = False) -> None:
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._pool.shutdown(wait=wait)
@@ -0,0 +1,399 @@
+"""
+kline_data 分层存储: 按月分区 + 冷数据归档 + 5m 汇总出 1h/4h/1d
+
+kline_data 是全库最大的表, 读写几乎都只碰最近几天的 K 线.
+
+- 分区: RANGE(open_time) 按 UTC 自然月 (p202610 ... pmax), 每天预建未来 PARTITION_MONTHS_AHEAD 个月;
+  存量表迁移见 scripts/partition_kline_data.py, 未迁移的库上分区维护自动跳过, 归档 / 汇总照常
+- 热窗口: hot_days 内的 5m/15m 留在主表, 更早的按 ARCHIVE_CHUNK_MS 分段搬进 kline_data_archive
+  (ROW_FORMAT=COMPRESSED); 搬空的旧分区直接 DROP. 未配置的周期 (1h/4h/1d) 一直留在主表
+- 汇总: 15m/1h 由 5m、4h/1d 由 1h 重算 (开=首根开, 收=末根收, 高低取极值, 量/额/笔数求和),
+  等价于全部由 5m 汇总; 只写源 K 线齐全的周期, 与币安同周期 K 线逐字段一致, 重跑幂等.
+  WS 采集已随 5m 收盘流式合成这些周期 (candle_aggregator), 这里补断线漏掉的周期
+- 24h 统计等近期查询都带 open_time 下界, 分区裁剪后只扫最近 1-2 个分区
+
+调度: app/scheduler.py 每小时 run_rollups, 每天 run_maintenance.
+"""
+from __future__ import annotations
+
+import time
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import pymysql
+from loguru import logger
+
+from app.collectors.smart_futures_collector import KLINE_UPSERT_SQL, KlineRow
+from app.services.kline_store import EXCHANGE, feed_klines, timeframe_to_ms
+
+
+TABLE = 'kline_data'
+ARCHIVE_TABLE = 'kline_data_archive'
+DEFAULT_HOT_DAYS = {'5m': 60, '15m': 120}
+ROLLUP_SOURCE = {'15m': '5m', '1h': '5m', '4h': '1h', '1d': '1h'}
+ROLLUP_LOOKBACK = {'15m': 8, '1h': 3, '4h': 2, '1d': 2}   # 每轮重算最近 N 个已收盘周期
+ARCHIVE_CHUNK_MS = 6 * 3600 * 1000               # 归档单个事务覆盖的时间段
+PARTITION_MONTHS_AHEAD = 2
+MAINTENANCE_READ_TIMEOUT_S = 600
+
+_COPY_COLUMNS = (
+    "symbol, exchange, timeframe, open_time, close_time, timestamp, "
+    "open_price, high_price, low_price, close_price, volume, quote_volume, "
+    "number_of_trades, taker_buy_base_volume, taker_buy_quote_volume"
+)
+
+_ARCHIVE_DDL = f"""
+    CREATE TABLE IF NOT EXISTS {ARCHIVE_TABLE} (
+        symbol VARCHAR(20) NOT NULL,
+        exchange VARCHAR(20) NOT NULL,
+        timeframe VARCHAR(10) NOT NULL,
+        open_time BIGINT NOT NULL,
+        close_time BIGINT DEFAULT NULL,
+        timestamp DATETIME NOT NULL,
+        open_price DECIMAL(18,8) NOT NULL,
+        high_price DECIMAL(18,8) NOT NULL,
+        low_price DECIMAL(18,8) NOT NULL,
+        close_price DECIMAL(18,8) NOT NULL,
+        volume DECIMAL(20,8) DEFAULT NULL,
+        quote_volume DECIMAL(24,2) DEFAULT NULL,
+        number_of_trades INT DEFAULT NULL,
+        taker_buy_base_volume DECIMAL(20,8) DEFAULT NULL,
+        taker_buy_quote_volume DECIMAL(24,2) DEFAULT NULL,
+        PRIMARY KEY (timeframe, symbol, exchange, open_time),
+        KEY idx_tf_time (timeframe, open_time)
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+      ROW_FORMAT=COMPRESSED KEY_BLOCK_SIZE=8
+      COMMENT='kline_data 冷数据 (超出热窗口的 5m/15m)'
+"""
+
+_SOURCE_SQL = (
+    "SELECT symbol, open_time, open_price, high_price, low_price, close_price, volume, "
+    "quote_volume, number_of_trades, taker_buy_base_volume, taker_buy_quote_volume "
+    f"FROM {TABLE} WHERE timeframe = %s AND exchange = %s AND open_time >= %s AND open_time < %s "
+    "ORDER BY symbol, open_time"
+)
+
+_SCHEMA_READY = False
+
+
+# ── 分区边界 ─────────────────────────────────────────────
+
+def month_start_ms(year: int, month: int) -> int:
+    """UTC 自然月月初 (ms)"""
+    return int(datetime(year, month, 1, tzinfo=timezone.utc).timestamp() * 1000)
+
+
+def _next_month(year: int, month: int) -> Tuple[int, int]:
+    return (year + 1, 1) if month == 12 else (year, month + 1)
+
+
+def partition_name(year: int, month: int) -> str:
+    return f"p{year:04d}{month:02d}"
+
+
+def month_partitions(first_ms: int, until_ms: int) -> List[Tuple[str, int]]:
+    """
+    覆盖 [first_ms 所在月, until_ms 所在月] 的分区列表
+
+    Returns:
+        [(pYYYYMM, 上界 = 下月月初 ms), ...]
+    """
+    d = datetime.fromtimestamp(first_ms / 1000, tz=timezone.utc)
+    y, m = d.year, d.month
+    out = []
+    while True:
+        ny, nm = _next_month(y, m)
+        bound = month_start_ms(ny, nm)
+        out.append((partition_name(y, m), bound))
+        if bound > until_ms:
+            return out
+        y, m = ny, nm
+
+
+def months_ahead_ms(now_ms: int, months: int) -> int:
+    """now 所在月之后第 months 个月的月初"""
+    d = datetime.fromtimestamp(now_ms / 1000, tz=timezone.utc)
+    y, m = d.year, d.month
+    for _ in range(months):
+        y, m = _next_month(y, m)
+    return month_start_ms(y, m)
+
+
+def partition_clause(first_ms: int, now_ms: int, months_ahead: int = PARTITION_MONTHS_AHEAD) -> str:
+    """建表用 PARTITION BY 子句 (迁移脚本用)"""
+    parts = [
+        f"PARTITION {name} VALUES LESS THAN ({bound})"
+        for name, bound in month_partitions(first_ms, months_ahead_ms(now_ms, months_ahead))
+    ]
+    parts.append("PARTITION pmax VALUES LESS THAN MAXVALUE")
+    return "PARTITION BY RANGE (open_time) (\n    " + ",\n    ".join(parts) + "\n)"
+
+
+def missing_partitions(existing: Dict[str, Optional[int]], now_ms: int,
+                       months_ahead: int = PARTITION_MONTHS_AHEAD) -> List[Tuple[str, int]]:
+    """
+    需从 pmax 拆出的新月分区
+
+    Args:
+        existing: {分区名: 上界 ms}, pmax 为 None
+    """
+    bounds = [b for b in existing.values() if b is not None]
+    if not bounds:
+        return []
+    top = max(bounds)
+    target = months_ahead_ms(now_ms, months_ahead)
+    if top > target:
+        return []
+    return month_partitions(top, target)
+
+
+# ── 汇总 ─────────────────────────────────────────────────
+
+def fetch_source(cur, timeframe: str, start_ms: int, end_ms: int) -> list:
+    """[start_ms, end_ms) 内的源 K 线, aggregate / CandleAggregator.prime 的输入格式"""
+    cur.execute(_SOURCE_SQL, (timeframe, EXCHANGE, start_ms, end_ms))
+    return cur.fetchall()
+
+
+def aggregate(rows: Iterable[Sequence], source_tf: str, target_tf: str) -> List[KlineRow]:
+    """
+    源周期 K 线 → 目标周期 K 线, 只输出源 K 线齐全的周期
+
+    Args:
+        rows: _SOURCE_SQL 的行 (symbol, open_time, o, h, l, c, v, qv, n, tbb, tbq), 按 symbol, open_time 排序
+    """
+    step = timeframe_to_ms(source_tf)
+    period = timeframe_to_ms(target_tf)
+    need = period // step
+    out: List[KlineRow] = []
+    key = None
+    bars: list = []
+
+    def _flush():
+        if len(bars) != need:
+            return
+        symbol, bucket = key
+        out.append(KlineRow(
+            symbol, EXCHANGE, target_tf, bucket, bucket + period - 1,
+            datetime.utcfromtimestamp(bucket / 1000),
+            float(bars[0][2]), max(float(b[3]) for b in bars), min(float(b[4]) for b in bars),
+            float(bars[-1][5]),
+            sum(float(b[6] or 0) for b in bars), sum(float(b[7] or 0) for b in bars),
+            sum(int(b[8] or 0) for b in bars),
+            sum(float(b[9] or 0) for b in bars), sum(float(b[10] or 0) for b in bars),
+        ))
+
+    for r in rows:
+        k = (r[0], int(r[1]) // period * period)
+        if k != key:
+            _flush()
+            key, bars = k, []
+        if bars and int(bars[-1][1]) == int(r[1]):
+            bars[-1] = r            # 同一 open_time 重复行取后一条
+        else:
+            bars.append(r)
+    if key is not None:
+        _flush()
+    return out
+
+
+# ── 存储管理 ─────────────────────────────────────────────
+
+class KlineStorageManager:
+    """kline_data 分区维护 / 冷数据归档 / 周期汇总"""
+
+    def __init__(self, db_config: dict, storage_config: Optional[dict] = None):
+        """
+        Args:
+            db_config: MySQL 配置 (config.yaml database.mysql)
+            storage_config: config.yaml 的 kline_storage 段
+        """
+        cfg = storage_config or {}
+        self.db_config = db_config
+        self.hot_days: Dict[str, int] = {**DEFAULT_HOT_DAYS, **(cfg.get('hot_days') or {})}
+        self.rollup_timeframes: List[str] = [
+            tf for tf in (cfg.get('rollup_timeframes') or list(ROLLUP_SOURCE)) if tf in ROLLUP_SOURCE
+        ]
+        self.months_ahead = int(cfg.get('partition_months_ahead', PARTITION_MONTHS_AHEAD))
+
+    def _connect(self, read_timeout: int = 60):
+        cfg = self.db_config
+        return pymysql.connect(
+            host=cfg.get('host', 'localhost'),
+            port=int(cfg.get('port', 3306)),
+            user=cfg.get('user', 'root'),
+            password=cfg.get('password', ''),
+            database=cfg.get('database', 'binance-data'),
+            charset='utf8mb4',
+            autocommit=False,
+            read_timeout=read_timeout,
+            write_timeout=read_timeout,
+        )
+
+    # ── 汇总 ──
+
+    def rollup(self, cur, timeframe: str, now_ms: Optional[int] = None, lookback_ms: int = 0) -> List[KlineRow]:
+        """重算 timeframe 最近 ROLLUP_LOOKBACK 个 (lookback_ms 更长时按其覆盖) 已收盘周期, 返回写入的 K 线"""
+        now_ms = now_ms if now_ms is not None else int(time.time() * 1000)
+        period = timeframe_to_ms(timeframe)
+        end = now_ms // period * period
+        start = end - max(ROLLUP_LOOKBACK[timeframe], -(-lookback_ms // period)) * period
+        source_tf = ROLLUP_SOURCE[timeframe]
+        rows = aggregate(fetch_source(cur, source_tf, start, end), source_tf, timeframe)
+        if rows:
+            cur.executemany(KLINE_UPSERT_SQL, rows)
+        return rows
+
+    def run_rollups(self, timeframes: Optional[Iterable[str]] = None, lookback_ms: int = 0) -> Dict[str, int]:
+        """
+        调度入口: 依次汇总 15m / 1h → 4h / 1d (后者读前者刚写的 1h).
+        WS 采集进程回填 5m 后也调用 (timeframes=合成周期, lookback_ms=回填覆盖的时长)
+        """
+        t0 = time.time()
+        counts: Dict[str, int] = {}
+        tfs = [tf for tf in (timeframes or self.rollup_timeframes) if tf in ROLLUP_SOURCE]
+        conn = self._connect()
+        try:
+            with conn.cursor() as cur:
+                for tf in sorted(tfs, key=timeframe_to_ms):
+                    rows = self.rollup(cur, tf, lookback_ms=lookback_ms)
+                    conn.commit()
+                    feed_klines(rows)
+                    counts[tf] = len(rows)
+        finally:
+            conn.close()
+        logger.info(f"[K线汇总] {counts}, {time.time() - t0:.1f}s")
+        return counts
+
+    # ── 分区 ──
+
+    @staticmethod
+    def partitions(cur) -> Dict[str, Optional[int]]:
+        """{分区名: 上界 ms}; 未分区返回空"""
+        cur.execute(
+            "SELECT PARTITION_NAME, PARTITION_DESCRIPTION FROM information_schema.PARTITIONS "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND PARTITION_NAME IS NOT NULL",
+            (TABLE,),
+        )
+        return {
+            name: None if desc in (None, 'MAXVALUE') else int(desc)
+            for name, desc in cur.fetchall()
+        }
+
+    def ensure_partitions(self, cur, now_ms: Optional[int] = None) -> List[str]:
+        """从 pmax 拆出未来月分区 (pmax 为空, 只改元数据)"""
+        existing = self.partitions(cur)
+        if 'pmax' not in existing:
+            if not existing:
+                logger.info(f"[K线存储] {TABLE} 未分区, 跳过分区维护 (迁移: scripts/partition_kline_data.py)")
+            return []
+        now_ms = now_ms if now_ms is not None else int(time.time() * 1000)
+        new = missing_partitions(existing, now_ms, self.months_ahead)
+        if new:
+            parts = ", ".join(f"PARTITION {n} VALUES LESS THAN ({b})" for n, b in new)
+            cur.execute(
+                f"ALTER TABLE {TABLE} REORGANIZE PARTITION pmax INTO "
+                f"({parts}, PARTITION pmax VALUES LESS THAN MAXVALUE)"
+            )
+            logger.info(f"[K线存储] 新建分区 {[n for n, _ in new]}")
+        return [n for n, _ in new]
+
+    def drop_empty_partitions(self, cur, now_ms: Optional[int] = None) -> List[str]:
+        """删除整体早于所有热窗口且已搬空的旧分区"""
+        existing = self.partitions(cur)
+        if not existing:
+            return []
+        now_ms = now_ms if now_ms is not None else int(time.time() * 1000)
+        horizon = now_ms - max(self.hot_days.values()) * 86400_000
+        dropped = []
+        for name, bound in sorted(existing.items(), key=lambda kv: kv[1] or float('inf')):
+            if bound is None or bound > horizon:
+                break
+            cur.execute(f"SELECT 1 FROM {TABLE} PARTITION ({name}) LIMIT 1")
+            if cur.fetchone():
+                continue
+            cur.execute(f"ALTER TABLE {TABLE} DROP PARTITION {name}")
+            dropped.append(name)
+        if dropped:
+            logger.info(f"[K线存储] 删除已搬空的分区 {dropped}")
+        return dropped
+
+    # ── 归档 ──
+
+    @staticmethod
+    def ensure_schema(cur) -> None:
+        global _SCHEMA_READY
+        if _SCHEMA_READY:
+            return
+        cur.execute(_ARCHIVE_DDL)
+        _SCHEMA_READY = True
+
+    def archive(self, conn, cur, timeframe: str, now_ms: Optional[int] = None) -> int:
+        """把 timeframe 早于热窗口的 K 线分段搬进归档表, 每段一个事务"""
+        now_ms = now_ms if now_ms is not None else int(time.time() * 1000)
+        cutoff = (now_ms - self.hot_days[timeframe] * 86400_000) // 86400_000 * 86400_000
+        cur.execute(
+            f"SELECT open_time FROM {TABLE} WHERE timeframe = %s AND open_time < %s "
+            "ORDER BY open_time LIMIT 1",
+            (timeframe, cutoff),
+        )
+        row = cur.fetchone()
+        if not row:
+            return 0
+        moved = 0
+        start = int(row[0]) // ARCHIVE_CHUNK_MS * ARCHIVE_CHUNK_MS
+        while start < cutoff:
+            end = min(start + ARCHIVE_CHUNK_MS, cutoff)
+            cur.execute(
+                f"INSERT INTO {ARCHIVE_TABLE} ({_COPY_COLUMNS}) "
+                f"SELECT {_COPY_COLUMNS} FROM {TABLE} "
+                "WHERE timeframe = %s AND open_time >= %s AND open_time < %s "
+                "ON DUPLICATE KEY UPDATE close_price = VALUES(close_price)",
+                (timeframe, start, end),
+            )
+            cur.execute(
+                f"DELETE FROM {TABLE} WHERE timeframe = %s AND open_time >= %s AND open_time < %s",
+                (timeframe, start, end),
+            )
+            moved += cur.rowcount
+            conn.commit()
+            start = end
+        return moved
+
+    def run_maintenance(self) -> Dict[str, object]:
+        """调度入口: 建归档表 → 预建分区 → 归档冷数据 → 删空分区 (跨进程互斥)"""
+        t0 = time.time()
+        result: Dict[str, object] = {}
+        conn = self._connect(read_timeout=MAINTENANCE_READ_TIMEOUT_S)
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT GET_LOCK('kline_storage_maintenance', 0)")
+                if not (cur.fetchone() or [0])[0]:
+                    logger.info("[K线存储] 上一轮维护仍在运行, 跳过")
+                    return result
+                try:
+                    self.ensure_schema(cur)
+                    result['created'] = self.ensure_partitions(cur)
+                    for tf in self.hot_days:
+                        result[f'archived_{tf}'] = self.archive(conn, cur, tf)
+                    result['dropped'] = self.drop_empty_partitions(cur)
+                    conn.commit()
+                finally:
+                    cur.execute("SELECT RELEASE_LOCK('kline_storage_maintenance')")
+        finally:
+            conn.close()
+        logger.info(f"[K线存储] 维护完成 {result}, {time.time() - t0:.1f}s")
+        return result
+
+
+def history_tables(cur, timeframe: str, since_ms: int) -> List[str]:
+    """读 since_ms 起的历史 K 线需要查的表 (早于热窗口的部分在归档表)"""
+    try:
+        cur.execute(
+            f"SELECT 1 FROM {ARCHIVE_TABLE} WHERE timeframe = %s AND open_time >= %s LIMIT 1",
+            (timeframe, since_ms),
+        )
+        archived = cur.fetchone() is not None
+    except pymysql.err.ProgrammingError:
+        archived = False            # 归档表尚未建
+    return [TABLE, ARCHIVE_TABLE] if archived else [TABLE]
@@ -23,6 +23,8 @@ from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Tuple
 import json
 from app.database.connection_pool import get_global_pool
+from app.services.kline_store import get_kline_store
+from app.utils import indicator_engine
 
 logger = logging.getLogger(__name__)
 
@@ -613,70 +615,15 @@ class MarketRegimeDetector:
         """计算ADX (简化版)"""
         if len(closes) < period + 1:
             return 25  # 默认中性值
-
-        # 计算真实波幅和方向移动
-        tr_list = []
-        plus_dm_list = []
-        minus_dm_list = []
-
-        for i in range(1, len(closes)):
-            high = highs[i]
-            low = lows[i]
-            prev_close = closes[i-1]
-            prev_high = highs[i-1]
-            prev_low = lows[i-1]
-
-            # 真实波幅
-            tr = max(high - low, abs(high - prev_close), abs(low - prev_close))
-            tr_list.append(tr)
-
-            # 方向移动
-            plus_dm = max(0, high - prev_high) if high - prev_high > prev_low - low else 0
-            minus_dm = max(0, prev_low - low) if prev_low - low > high - prev_high else 0
-            plus_dm_list.append(plus_dm)
-            minus_dm_list.append(minus_dm)
-
-        if len(tr_list) < period:
-            return 25
-
-        # 平滑计算
-        atr = sum(tr_list[-period:]) / period
-        plus_di = (sum(plus_dm_list[-period:]) / period) / atr * 100 if atr > 0 else 0
-        minus_di = (sum(minus_dm_list[-period:]) / period) / atr * 100 if atr > 0 else 0
-
-        # DX
-        di_sum = plus_di + minus_di
-        dx = abs(plus_di - minus_di) / di_sum * 100 if di_sum > 0 else 0
-
-        return dx
+        dx = indicator_engine.last_value(indicator_engine.adx(highs, lows, closes, period)['adx'])
+        return 25 if dx is None else dx
 
     def _calculate_rsi(self, closes: List[float], period: int = 14) -> float:
-        """计算RSI"""
+        """计算RSI (最近 period 根涨跌幅的简单均值)"""
         if len(closes) < period + 1:
             return 50
-
-        gains = []
-        losses = []
-
-        for i in range(1, len(closes)):
-            change = closes[i] - closes[i-1]
-            if change > 0:
-                gains.append(change)
-                losses.append(0)
-            else:
-                gains.append(0)
-                losses.append(abs(change))
-
-        avg_gain = sum(gains[-period:]) / period
-        avg_loss = sum(losses[-period:]) / period
-
-        if avg_loss == 0:
-            return 100
-
-        rs = avg_gain / avg_loss
-        rsi = 100 - (100 / (1 + rs))
-
-        return rsi
+        rsi = indicator_engine.last_value(indicator_engine.rsi(closes, period, method='sma'))
+        return 50 if rsi is None else rsi
 
     def _calculate_atr(self, highs: List[float], lows: List[float],
                        closes: List[float], period: int = 14) -> float:
@@ -745,7 +692,15 @@ class MarketRegimeDetector:
         return count
 
     def _get_kline_data(self, symbol: str, timeframe: str) -> List[Dict]:
-        """从数据库获取K线数据"""
+        """获取K线数据: 优先进程内 K 线缓存, 未覆盖时查数据库"""
+        store = get_kline_store()
+        if store is not None:
+            rows = store.get_rows(symbol, timeframe, 100)
+            if rows is not None:
+                for r in rows:
+                    r['timestamp'] = datetime.utcfromtimestamp(r['open_time'] / 1000)
+                return rows
+
         try:
             with self.db_pool.get_connection() as connection:
                 cursor = connection.cursor(pymysql.cursors.DictCursor)
@@ -11,6 +11,7 @@ from typing import Any, Dict, List, Optional, Tuple
 
 from loguru import logger
 
+from app.services.kline_store import arrays_to_rows, get_kline_store, load_klines_bulk
 from app.services.securities_filter import is_security
 from app.utils.futures_symbol import futures_symbol_clean, futures_symbol_rating_canonical
 
@@ -84,7 +85,16 @@ def load_config_yaml_symbols() -> List[str]:
     return out
 
 
+# evaluate_symbol_multiperiod 读取的周期 → 根数
+SCAN_KLINES: Dict[str, int] = {"1h": 168, "15m": 672}
+
+
 def _fetch_klines(cur, symbol: str, timeframe: str, limit: int) -> List[Dict]:
+    store = get_kline_store()
+    if store is not None:
+        rows = store.get_rows(symbol, timeframe, limit)
+        if rows is not None:
+            return rows
     cur.execute(
         """
         SELECT open_time, open_price, high_price, low_price, close_price, volume
@@ -675,15 +685,24 @@ def evaluate_symbol_multiperiod(
     global_trend: Optional[Dict[str, Any]] = None,
     big4: Optional[Dict[str, Any]] = None,
     global_regime: Optional[Dict[str, Any]] = None,
+    klines: Optional[Dict[str, List[Dict]]] = None,
+    playbook_row: Optional[Dict[str, Any]] = None,
 ) -> Dict[str, Any]:
+    """
+    klines: scan_universe 批量预取的 {timeframe: rows}, 缺省时逐币种读取
+    playbook_row: 同一批 K 线已算好的 classify_playbook 结果 (回放引擎多策略共用), 缺省时现算
+    """
     profile_l = profile.strip().lower()
     side = "LONG" if profile_l == "long" else "SHORT"
     out: Dict[str, Any] = {"symbol": symbol, "side": side, "passed": False, "reason": None, "score": 0.0, "ref_price": None}
 
     from app.services.brain_playbook import classify_playbook
 
-    rows_1h = _fetch_klines(cur, symbol, "1h", 168)
-    rows_15m = _fetch_klines(cur, symbol, "15m", 672)
+    if klines is not None:
+        rows_1h, rows_15m = klines.get("1h") or [], klines.get("15m") or []
+    else:
+        rows_1h = _fetch_klines(cur, symbol, "1h", SCAN_KLINES["1h"])
+        rows_15m = _fetch_klines(cur, symbol, "15m", SCAN_KLINES["15m"])
     if len(rows_1h) < 60:
         out["reason"] = "insufficient_1h"
         return out
@@ -706,7 +725,7 @@ def evaluate_symbol_multiperiod(
     global_bias = (global_trend or {}).get("bias") or "FLAT"
     future_4h = _future_4h_direction(c15, h15, l15, v15)
 
-    pb = classify_playbook(rows_1h, rows_15m, big4=big4 or {})
+    pb = playbook_row if playbook_row is not None else classify_playbook(rows_1h, rows_15m, big4=big4 or {})
     playbook = str(pb.get("playbook") or "D1")
     pb_side = str(pb.get("side") or "FLAT").upper()
     signals = set(pb.get("signals") or [])
@@ -911,6 +930,19 @@ def evaluate_symbol_multiperiod(
     return out
 
 
+def _prefetch_scan_klines(conn, symbols: List[str]) -> Optional[Dict[str, Dict[str, List[Dict]]]]:
+    """全池 1h / 15m K 线各一次批量读取 → {symbol: {timeframe: rows}}; 失败返回 None (逐币种读取)"""
+    try:
+        by_tf = {tf: load_klines_bulk(conn, symbols, tf, limit) for tf, limit in SCAN_KLINES.items()}
+    except Exception as e:
+        logger.warning(f"[breakout scanner] bulk kline prefetch failed, fallback per symbol: {e}")
+        return None
+    return {
+        symbol: {tf: arrays_to_rows(by_tf[tf][symbol]) if symbol in by_tf[tf] else [] for tf in SCAN_KLINES}
+        for symbol in symbols
+    }
+
+
 def scan_universe(
     conn,
     profile: str,
@@ -921,6 +953,7 @@ def scan_universe(
     universe_size = len(symbols)
     results: List[Dict[str, Any]] = []
     profile_l = profile.strip().lower()
+    prefetched = _prefetch_scan_klines(conn, symbols)
 
     with conn.cursor() as cur:
         global_trend = evaluate_global_trend_dimensions(cur)
@@ -942,6 +975,7 @@ def scan_universe(
                     global_trend=global_trend,
                     big4=big4,
                     global_regime=global_regime,
+                    klines=prefetched.get(symbol) if prefetched is not None else None,
                 )
                 if ev["passed"]:
                     results.append({
@@ -0,0 +1,462 @@
+"""
+合约已平仓盈亏汇总 (小时 / 日两级物化表)
+
+复盘接口不再每次扫描 futures_positions 做聚合:
+  - futures_pnl_rollup_hourly: (account, 小时, source, symbol, side, 持仓时长档) 一行
+  - futures_pnl_rollup_daily:  同维度按日, 由小时表汇总
+平仓路径调用 refresh_position_rollup() 重算该持仓所在小时 (幂等, 重复调用无副作用);
+scheduler 启动时及每 10 分钟调用 refresh_recent(): 未回填的账户整体回填, 并重算最近几个小时桶,
+兜住没有挂钩的平仓路径. 也可用 scripts/backfill_pnl_rollup.py 手动重建. 查询接口只读汇总表.
+
+滚动窗口 (最近 N 小时) = 整点之后的小时桶 + 窗口起点到下一个整点之间的原始持仓, 结果与直接扫描一致.
+"""
+from __future__ import annotations
+
+import threading
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from loguru import logger
+
+# 持仓时长分档 (分钟, 左闭右开; 最后一档无上限)
+HOLDING_BUCKETS: List[Tuple[int, int, str]] = [
+    (0, 15, '0-15分钟'),
+    (15, 30, '15-30分钟'),
+    (30, 60, '30-60分钟'),
+    (60, 120, '1-2小时'),
+    (120, 240, '2-4小时'),
+    (240, 480, '4-8小时'),
+    (480, 1440, '8-24小时'),
+    (1440, 99999, '24小时以上'),
+]
+
+DIMENSIONS = ('source', 'symbol', 'position_side', 'hold_bucket')
+
+_HOLD_MINUTES = "GREATEST(COALESCE(TIMESTAMPDIFF(MINUTE, open_time, close_time), 0), 0)"
+_HOLD_BUCKET_SQL = "CASE " + " ".join(
+    f"WHEN {_HOLD_MINUTES} < {hi} THEN {i}" for i, (_, hi, _) in enumerate(HOLDING_BUCKETS[:-1])
+) + f" ELSE {len(HOLDING_BUCKETS) - 1} END"
+
+# 原始持仓 → 维度表达式
+_RAW_DIM_SQL = {
+    'source': "COALESCE(source, '')",
+    'symbol': "symbol",
+    'position_side': "position_side",
+    'hold_bucket': _HOLD_BUCKET_SQL,
+}
+
+# 度量: 原始持仓上的聚合 / 汇总表上的再聚合 (列名一致)
+_RAW_MEASURES = """
+    COUNT(*) AS trades,
+    SUM(CASE WHEN realized_pnl > 0 THEN 1 ELSE 0 END) AS wins,
+    SUM(CASE WHEN realized_pnl < 0 THEN 1 ELSE 0 END) AS losses,
+    SUM(CASE WHEN realized_pnl = 0 THEN 1 ELSE 0 END) AS zero_pnl,
+    SUM(CASE WHEN realized_pnl IS NULL THEN 1 ELSE 0 END) AS null_pnl,
+    COALESCE(SUM(realized_pnl), 0) AS pnl_sum,
+    COALESCE(SUM(CASE WHEN realized_pnl > 0 THEN realized_pnl END), 0) AS profit_sum,
+    COALESCE(SUM(CASE WHEN realized_pnl < 0 THEN realized_pnl END), 0) AS loss_sum,
+    MAX(realized_pnl) AS max_pnl,
+    MIN(realized_pnl) AS min_pnl,
+    COALESCE(SUM(margin), 0) AS margin_sum,
+    COALESCE(SUM(unrealized_pnl_pct), 0) AS pct_sum,
+    COUNT(unrealized_pnl_pct) AS pct_n,
+    COALESCE(SUM(TIMESTAMPDIFF(MINUTE, open_time, close_time)), 0) AS hold_sum,
+    COUNT(TIMESTAMPDIFF(MINUTE, open_time, close_time)) AS hold_n
+"""
+
+_SUM_MEASURES = ('trades', 'wins', 'losses', 'zero_pnl', 'null_pnl', 'pnl_sum', 'profit_sum',
+                 'loss_sum', 'margin_sum', 'pct_sum', 'pct_n', 'hold_sum', 'hold_n')
+_INT_MEASURES = {'trades', 'wins', 'losses', 'zero_pnl', 'null_pnl', 'pct_n', 'hold_sum', 'hold_n'}
+MEASURES = _SUM_MEASURES + ('max_pnl', 'min_pnl')
+
+_ROLLUP_MEASURES = ", ".join(
+    [f"SUM({m}) AS {m}" for m in _SUM_MEASURES] + ["MAX(max_pnl) AS max_pnl", "MIN(min_pnl) AS min_pnl"]
+)
+
+_MEASURE_COLUMNS = """
+    trades INT NOT NULL DEFAULT 0,
+    wins INT NOT NULL DEFAULT 0,
+    losses INT NOT NULL DEFAULT 0,
+    zero_pnl INT NOT NULL DEFAULT 0,
+    null_pnl INT NOT NULL DEFAULT 0,
+    pnl_sum DECIMAL(24,4) NOT NULL DEFAULT 0,
+    profit_sum DECIMAL(24,4) NOT NULL DEFAULT 0,
+    loss_sum DECIMAL(24,4) NOT NULL DEFAULT 0,
+    margin_sum DECIMAL(24,4) NOT NULL DEFAULT 0,
+    pct_sum DECIMAL(24,4) NOT NULL DEFAULT 0,
+    pct_n INT NOT NULL DEFAULT 0,
+    hold_sum BIGINT NOT NULL DEFAULT 0,
+    hold_n INT NOT NULL DEFAULT 0,
+    max_pnl DECIMAL(20,2) DEFAULT NULL,
+    min_pnl DECIMAL(20,2) DEFAULT NULL,
+    updated_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+"""
+
+_COLUMNS = "account_id, {bucket}, source, symbol, position_side, hold_bucket, " + ", ".join(MEASURES)
+
+_SCHEMA_READY = False
+_BACKFILLED: set = set()
+_SWEPT = False  # 本进程 refresh_recent 是否已全量检查过未回填账户
+# 回填互斥: 进程内线程锁 + 跨进程 MySQL 命名锁
+_BACKFILL_LOCK = threading.Lock()
+_BACKFILL_LOCK_NAME = 'futures_pnl_rollup_backfill'
+
+
+def ensure_rollup_schema(cursor) -> None:
+    """CREATE IF NOT EXISTS — 幂等。"""
+    global _SCHEMA_READY
+    if _SCHEMA_READY:
+        return
+    for table, bucket_col in (
+        ('futures_pnl_rollup_hourly', 'bucket_start DATETIME NOT NULL'),
+        ('futures_pnl_rollup_daily', 'bucket_date DATE NOT NULL'),
+    ):
+        bucket_name = bucket_col.split()[0]
+        cursor.execute(
+            f"""
+            CREATE TABLE IF NOT EXISTS {table} (
+              account_id INT NOT NULL,
+              {bucket_col},
+              source VARCHAR(50) NOT NULL DEFAULT '',
+              symbol VARCHAR(20) NOT NULL,
+              position_side VARCHAR(10) NOT NULL,
+              hold_bucket TINYINT NOT NULL,
+              {_MEASURE_COLUMNS},
+              PRIMARY KEY (account_id, {bucket_name}, source, symbol, position_side, hold_bucket)
+            ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+            """
+        )
+    cursor.execute(
+        """
+        CREATE TABLE IF NOT EXISTS futures_pnl_rollup_state (
+          account_id INT NOT NULL,
+          backfilled_at DATETIME NOT NULL,
+          PRIMARY KEY (account_id)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+        """
+    )
+    _SCHEMA_READY = True
+
+
+def hour_floor(ts: datetime) -> datetime:
+    return ts.replace(minute=0, second=0, microsecond=0)
+
+
+def hour_ceil(ts: datetime) -> datetime:
+    floor = hour_floor(ts)
+    return floor if floor == ts else floor + timedelta(hours=1)
+
+
+def _refresh_hour(cursor, account_id: int, hour_start: datetime) -> None:
+    hour_start = hour_floor(hour_start)
+    dims = ", ".join(_RAW_DIM_SQL[d] for d in DIMENSIONS)
+    cursor.execute(
+        "DELETE FROM futures_pnl_rollup_hourly WHERE account_id = %s AND bucket_start = %s",
+        (account_id, hour_start),
+    )
+    cursor.execute(
+        f"""
+        INSERT INTO futures_pnl_rollup_hourly ({_COLUMNS.format(bucket='bucket_start')})
+        SELECT account_id, %s, {dims}, {_RAW_MEASURES}
+        FROM futures_positions
+        WHERE account_id = %s AND status = 'closed' AND close_time >= %s AND close_time < %s
+        GROUP BY account_id, {dims}
+        """,
+        (hour_start, account_id, hour_start, hour_start + timedelta(hours=1)),
+    )
+    _refresh_day(cursor, account_id, hour_start.date())
+
+
+def _refresh_day(cursor, account_id: int, day: date) -> None:
+    day_start = datetime.combine(day, datetime.min.time())
+    dims = ", ".join(DIMENSIONS)
+    cursor.execute(
+        "DELETE FROM futures_pnl_rollup_daily WHERE account_id = %s AND bucket_date = %s",
+        (account_id, day),
+    )
+    cursor.execute(
+        f"""
+        INSERT INTO futures_pnl_rollup_daily ({_COLUMNS.format(bucket='bucket_date')})
+        SELECT account_id, %s, {dims}, {_ROLLUP_MEASURES}
+        FROM futures_pnl_rollup_hourly
+        WHERE account_id = %s AND bucket_start >= %s AND bucket_start < %s
+        GROUP BY account_id, {dims}
+        """,
+        (day, account_id, day_start, day_start + timedelta(days=1)),
+    )
+
+
+def refresh_position_rollup(conn, position_id: int, previous_close_time: Optional[datetime] = None) -> None:
+    """
+    平仓后重算该持仓所在小时 / 日的汇总 (失败只告警, 不影响平仓)
+
+    Args:
+        previous_close_time: 平仓时间被改写时传入旧值, 旧小时一并重算
+    """
+    for attempt in range(2):
+        cursor = conn.cursor()
+        try:
+            ensure_rollup_schema(cursor)
+            cursor.execute(
+                "SELECT account_id, close_time, status FROM futures_positions WHERE id = %s",
+                (position_id,),
+            )
+            row = cursor.fetchone()
+            if not row:
+                return
+            account_id, close_time, status = row.values() if isinstance(row, dict) else row
+            hours = {hour_floor(t) for t in (close_time, previous_close_time) if t}
+            if str(status).lower() != 'closed' and previous_close_time is None:
+                return
+            for h in sorted(hours):
+                _refresh_hour(cursor, account_id, h)
+            conn.commit()
+            return
+        except Exception as e:
+            try:
+                conn.rollback()
+            except Exception:
+                pass
+            if attempt == 0 and '1213' in str(e):  # Deadlock, 重试一次
+                continue
+            logger.warning(f"[pnl_rollup] 持仓 {position_id} 汇总重算失败 (可用 backfill 修复): {e}")
+            return
+        finally:
+            cursor.close()
+
+
+def backfill_account(cursor, account_id: int) -> int:
+    """重建某账户全部汇总 (单个事务, 失败回滚), 返回小时桶行数"""
+    ensure_rollup_schema(cursor)
+    conn = cursor.connection
+    dims = ", ".join(_RAW_DIM_SQL[d] for d in DIMENSIONS)
+    hour_expr = "TIMESTAMP(DATE(close_time), MAKETIME(HOUR(close_time), 0, 0))"
+    conn.begin()
+    try:
+        cursor.execute("DELETE FROM futures_pnl_rollup_hourly WHERE account_id = %s", (account_id,))
+        cursor.execute(
+            f"""
+            INSERT INTO futures_pnl_rollup_hourly ({_COLUMNS.format(bucket='bucket_start')})
+            SELECT account_id, {hour_expr}, {dims}, {_RAW_MEASURES}
+            FROM futures_positions
+            WHERE account_id = %s AND status = 'closed' AND close_time IS NOT NULL
+            GROUP BY account_id, {hour_expr}, {dims}
+            """,
+            (account_id,),
+        )
+        hourly_rows = cursor.rowcount
+        cursor.execute("DELETE FROM futures_pnl_rollup_daily WHERE account_id = %s", (account_id,))
+        cursor.execute(
+            f"""
+            INSERT INTO futures_pnl_rollup_daily ({_COLUMNS.format(bucket='bucket_date')})
+            SELECT account_id, DATE(bucket_start), {", ".join(DIMENSIONS)}, {_ROLLUP_MEASURES}
+            FROM futures_pnl_rollup_hourly
+            WHERE account_id = %s
+            GROUP BY account_id, DATE(bucket_start), {", ".join(DIMENSIONS)}
+            """,
+            (account_id,),
+        )
+        cursor.execute(
+            """
+            INSERT INTO futures_pnl_rollup_state (account_id, backfilled_at) VALUES (%s, NOW())
+            ON DUPLICATE KEY UPDATE backfilled_at = VALUES(backfilled_at)
+            """,
+            (account_id,),
+        )
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    _BACKFILLED.add(account_id)
+    return hourly_rows
+
+
+def _is_backfilled(cursor, account_id: int) -> bool:
+    if account_id in _BACKFILLED:
+        return True
+    cursor.execute("SELECT 1 AS ok FROM futures_pnl_rollup_state WHERE account_id = %s", (account_id,))
+    if cursor.fetchone():
+        _BACKFILLED.add(account_id)
+        return True
+    return False
+
+
+def ensure_backfilled(cursor, account_id: int) -> bool:
+    """
+    账户未回填过则整体回填一次 (之后由平仓路径 + refresh_recent 增量维护)
+
+    只在 scheduler / 脚本中调用, 不放在查询接口里. 进程内线程锁 + MySQL 命名锁保证同一时刻只有一个回填;
+    拿不到锁 (其它进程正在回填) 直接返回 False, 下一轮再看.
+
+    Returns:
+        本次是否执行了回填
+    """
+    ensure_rollup_schema(cursor)
+    if _is_backfilled(cursor, account_id):
+        return False
+    with _BACKFILL_LOCK:
+        cursor.execute("SELECT GET_LOCK(%s, 0) AS got", (_BACKFILL_LOCK_NAME,))
+        row = cursor.fetchone()
+        if not (row['got'] if isinstance(row, dict) else row[0]):
+            logger.info(f"[pnl_rollup] 账户 {account_id} 回填被其它进程占用, 跳过本轮")
+            return False
+        try:
+            if _is_backfilled(cursor, account_id):
+                return False
+            logger.info(f"[pnl_rollup] 账户 {account_id} 首次回填盈亏汇总...")
+            rows = backfill_account(cursor, account_id)
+            logger.info(f"[pnl_rollup] 账户 {account_id} 回填完成: {rows} 个小时桶")
+            return True
+        finally:
+            cursor.execute("SELECT RELEASE_LOCK(%s)", (_BACKFILL_LOCK_NAME,))
+            cursor.fetchall()
+
+
+def refresh_recent(conn, hours: int = 3, now: Optional[datetime] = None) -> Dict[str, int]:
+    """
+    定时兜底: 最近 hours 小时内有平仓的账户重算这些小时桶 (覆盖未调用 refresh_position_rollup 的平仓路径),
+    首次运行时顺带回填所有未回填的账户
+
+    Returns:
+        {'backfilled': 回填账户数, 'accounts': 重算账户数, 'hours': 重算小时桶数}
+    """
+    global _SWEPT
+    now = now or datetime.now()
+    since = hour_floor(now - timedelta(hours=hours))
+    hour_starts = [since + timedelta(hours=i) for i in range(hours + 1)]
+    stats = {'backfilled': 0, 'accounts': 0, 'hours': 0}
+    cursor = conn.cursor()
+    try:
+        ensure_rollup_schema(cursor)
+        if not _SWEPT:
+            cursor.execute("SELECT DISTINCT account_id FROM futures_positions WHERE status = 'closed'")
+        else:
+            cursor.execute(
+                "SELECT DISTINCT account_id FROM futures_positions WHERE status = 'closed' AND close_time >= %s",
+                (since,),
+            )
+        accounts = [r['account_id'] if isinstance(r, dict) else r[0] for r in cursor.fetchall()]
+        for account_id in accounts:
+            if ensure_backfilled(cursor, account_id):
+                stats['backfilled'] += 1
+                continue
+            if account_id not in _BACKFILLED:
+                continue
+            conn.begin()
+            try:
+                for h in hour_starts:
+                    _refresh_hour(cursor, account_id, h)
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            stats['accounts'] += 1
+            stats['hours'] += len(hour_starts)
+        _SWEPT = True
+    finally:
+        cursor.close()
+    return stats
+
+
+def _row_values(row, keys: Sequence[str]) -> Dict:
+    if isinstance(row, dict):
+        return row
+    return dict(zip(keys, row))
+
+
+def merge_rows(rows: Iterable[Dict], dims: Sequence[str]) -> List[Dict]:
+    """按 dims 合并度量 (求和 / 最大最小值), 数值转为 int / float"""
+    merged: Dict[tuple, Dict] = {}
+    for row in rows:
+        key = tuple(row[d] for d in dims)
+        acc = merged.get(key)
+        if acc is None:
+            acc = {d: row[d] for d in dims}
+            for m in _SUM_MEASURES:
+                acc[m] = 0
+            acc['max_pnl'] = acc['min_pnl'] = None
+            merged[key] = acc
+        for m in _SUM_MEASURES:
+            v = row.get(m) or 0
+            acc[m] += int(v) if m in _INT_MEASURES else float(v)
+        for m, pick in (('max_pnl', max), ('min_pnl', min)):
+            v = row.get(m)
+            if v is not None:
+                v = float(v)
+                acc[m] = v if acc[m] is None else pick(acc[m], v)
+    return list(merged.values())
+
+
+def query_window(
+    cursor,
+    account_id: int,
+    since: datetime,
+    dims: Sequence[str] = (),
+    source: Optional[str] = None,
+) -> List[Dict]:
+    """
+    close_time >= since 的已平仓汇总, 按 dims 分组
+
+    整点之后读小时表, since 到下一个整点之间直接聚合原始持仓 (走 idx_fp_account_status_close_pnl)
+    """
+    boundary = hour_ceil(since)
+    src_filter, src_args = ("AND source = %s", (source,)) if source else ("", ())
+
+    group = f"GROUP BY {', '.join(dims)}" if dims else ""
+    select_dims = "".join(f"{d}, " for d in dims)
+    cursor.execute(
+        f"""
+        SELECT {select_dims}{_ROLLUP_MEASURES}
+        FROM futures_pnl_rollup_hourly
+        WHERE account_id = %s AND bucket_start >= %s {src_filter}
+        {group}
+        """,
+        (account_id, boundary) + src_args,
+    )
+    rows = [_row_values(r, list(dims) + list(MEASURES)) for r in cursor.fetchall()]
+
+    if boundary > since:
+        raw_dims = [_RAW_DIM_SQL[d] for d in dims]
+        raw_src = ("AND COALESCE(source, '') = %s", (source,)) if source else ("", ())
+        cursor.execute(
+            f"""
+            SELECT {"".join(f"{e} AS {d}, " for e, d in zip(raw_dims, dims))}{_RAW_MEASURES}
+            FROM futures_positions
+            WHERE account_id = %s AND status = 'closed' AND close_time >= %s AND close_time < %s {raw_src[0]}
+            {f"GROUP BY {', '.join(raw_dims)}" if dims else ""}
+            """,
+            (account_id, since, boundary) + raw_src[1],
+        )
+        rows += [_row_values(r, list(dims) + list(MEASURES)) for r in cursor.fetchall()]
+
+    # 无分组时两段各返回一行 (空窗口时 trades=0)
+    return [r for r in merge_rows(rows, dims) if r['trades'] > 0 or not dims]
+
+
+def query_days(
+    cursor,
+    account_id: int,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    dims: Sequence[str] = ('bucket_date',),
+) -> List[Dict]:
+    """日表汇总 [date_from, date_to] (None 表示不限), 按 dims 分组"""
+    where, args = ["account_id = %s"], [account_id]
+    if date_from is not None:
+        where.append("bucket_date >= %s")
+        args.append(date_from)
+    if date_to is not None:
+        where.append("bucket_date <= %s")
+        args.append(date_to)
+    group = f"GROUP BY {', '.join(dims)}" if dims else ""
+    cursor.execute(
+        f"""
+        SELECT {"".join(f"{d}, " for d in dims)}{_ROLLUP_MEASURES}
+        FROM futures_pnl_rollup_daily
+        WHERE {' AND '.join(where)}
+        {group}
+        """,
+        args,
+    )
+    rows = [_row_values(r, list(dims) + list(MEASURES)) for r in cursor.fetchall()]
+    return [r for r in merge_rows(rows, dims) if r['trades'] > 0 or not dims]
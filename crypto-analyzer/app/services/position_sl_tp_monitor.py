@@ -7,6 +7,8 @@
 - 周期扫描 futures_positions 中所有 status='open' 的持仓
 - 用进程内 DataHub 实时价与 DB 里存的 stop_loss_price / take_profit_price 比较
 - 命中 SL/TP 后直接调用模拟盘平仓引擎，避免 main 进程 HTTP 反打自己
+- 价格类规则由 exit_rules.evaluate_price_rules 对整轮持仓一次向量化计算（每币种取一次价）；
+  平仓统一走 _emit_close → ExitEngine.claim，与 SmartExitOptimizer 跨进程去重
 """
 
 from __future__ import annotations
@@ -21,6 +23,18 @@ from typing import Any, Dict, List, Optional
 import pymysql
 from loguru import logger
 from app.utils.position_time import utc_now_naive
+from app.services.exit_rules import (
+    ENTRY_GRACE_MIN,
+    HIT_REASONS,
+    LEGACY_BREAKEVEN,
+    LEGACY_EARLY_SL,
+    LEGACY_TRAIL_TP,
+    CloseIntent,
+    ExitEngine,
+    check_ai_trail_tp as _check_ai_trail_tp,
+    check_hard_trigger,
+    evaluate_price_rules,
+)
 
 
 def _db_cfg() -> Dict[str, Any]:
@@ -39,36 +53,12 @@ def _db_cfg() -> Dict[str, Any]:
     }
 
 
-# 动态出场规则（与 strategy_live/whale/bigmid MID 同）
-# monitor 扫描频率高（默认 1s）可以更及时抓到小币快速穿越
-TRAIL_TP_TIERS = [
-    (0.10, 0.03),  # peak ≥ 10% → 回落 3% 平
-    (0.05, 0.02),  # peak ≥ 5%  → 回落 2% 平
-    (0.03, 0.01),  # peak ≥ 3%  → 回落 1% 平
-]
-EARLY_SL_PCT             = 0.03   # 浮亏 ≥ 3% 早期止损
-# peak ≥ 1.5% 启用保本守护（2026-04-24 从 3% 降低；补 peak 1-3% 的盲区）
-BREAKEVEN_AFTER_PEAK_PCT = 0.015
-BREAKEVEN_SL_PCT         = -0.005 # 保本线 -0.5%
-# 入场保护期：开仓 N 分钟内 early-sl/breakeven 不触发（硬 SL 兜底）
-# 2026-04-24：数据显示 38% early-sl 在 5m 内扎中（入场瞬间均值回归误杀）
-ENTRY_GRACE_MIN          = 45
-
 # AI 探索/预测/战术：硬 SL/TP + 轻量 ai-trail-tp；不走 early-sl / breakeven
 _AI_HARD_SLTP_ONLY_SOURCES = frozenset({
     'gemini_explore', 'gemini_predict',
     'deepseek_explore', 'deepseek_predict',
     'brain_swing',
 })
-# AI 轻量移动止盈：峰值价格收益 ≥3% 后，从峰值回撤 ≥1% 平仓
-_AI_TRAIL_TP_TIERS = (
-    (0.10, 0.03, 0.06),   # peak price >=10%, allow 3% pullback, keep >=6%
-    (0.05, 0.02, 0.03),   # peak price >=5%, allow 2% pullback, keep >=3%
-    (0.03, 0.012, 0.018), # peak price >=3%, allow 1.2% pullback, keep >=1.8%
-)
-_AI_TRAIL_TP_ROI_ACTIVATE = 0.12
-_AI_TRAIL_TP_ROI_PULLBACK = 0.04
-_AI_TRAIL_TP_MIN_PRICE_PEAK_FOR_ROI = 0.025
 _AI_SOFT_SL_GRACE_MIN = 15
 _AI_SOFT_SL_NO_FOLLOW_PEAK_PCT = 0.006
 _AI_SOFT_SL_NO_FOLLOW_LOSS_PCT = -0.012
@@ -138,47 +128,6 @@ def _is_deepseek_soft_sl_source(src: str) -> bool:
     return (src or "").strip().lower() in _DEEPSEEK_SOFT_SL_SOURCES
 
 
-def _dynamic_trail_pullback(peak_pct: float) -> float:
-    for threshold, pullback in TRAIL_TP_TIERS:
-        if peak_pct >= threshold:
-            return pullback
-    return float('inf')
-
-
-def _check_ai_trail_tp(pnl_pct: float, peak_pct: float, leverage: int = 1) -> Optional[str]:
-    """AI strategies trail by either price move or leverage-adjusted ROI."""
-    lev = max(int(leverage or 1), 1)
-    pullback_pct = peak_pct - pnl_pct
-    peak_roi = peak_pct * lev
-    pullback_roi = pullback_pct * lev
-    price_trail = False
-    tier_min_keep = None
-    for activate_pct, pullback_trigger, min_keep_pct in _AI_TRAIL_TP_TIERS:
-        if peak_pct >= activate_pct:
-            tier_min_keep = min_keep_pct
-            price_trail = (
-                pullback_pct >= pullback_trigger
-                and pnl_pct >= min_keep_pct
-            )
-            break
-    roi_trail = (
-        peak_pct >= _AI_TRAIL_TP_MIN_PRICE_PEAK_FOR_ROI
-        and peak_roi >= _AI_TRAIL_TP_ROI_ACTIVATE
-        and pullback_roi >= _AI_TRAIL_TP_ROI_PULLBACK
-        and tier_min_keep is not None
-        and pnl_pct >= tier_min_keep
-    )
-    if price_trail or roi_trail:
-        return (
-            f"AI trail-tp(peak_price={peak_pct * 100:.2f}%, "
-            f"drawdown_price={pullback_pct * 100:.2f}%, "
-            f"peak_roi={peak_roi * 100:.2f}%, "
-            f"drawdown_roi={pullback_roi * 100:.2f}%, "
-            f"min_keep_price={(tier_min_keep or 0) * 100:.2f}%, ai-trail-tp)"
-        )
-    return None
-
-
 def _check_ai_soft_stop(
     pnl_pct: float,
     peak_pct: float,
@@ -274,8 +223,11 @@ class PositionSLTPMonitor:
         self.api_base = api_base.rstrip("/")
         self._task: Optional[asyncio.Task] = None
         self._stop = False
-        self._cooldown: Dict[int, float] = {}
-        self._cooldown_seconds = 10.0
+        # 平仓去重交给出场规则引擎的跨进程 claim；这里只留到期复查「继续持有」后的短暂跳过
+        self.exit_engine = ExitEngine(lambda: pymysql.connect(**_db_cfg()), "sl_tp_monitor")
+        self._hold_until: Dict[int, float] = {}
+        self._hold_seconds = 10.0
+        self._peak_dirty: Dict[int, float] = {}
         # peak_pnl_pct 内存映射：进程重启会丢，但一般持仓 <= 24h 影响可控
         self._peak_pnl_map: Dict[int, float] = {}
         self._trend_exit_cache: Dict[int, tuple[float, Optional[str]]] = {}
@@ -330,177 +282,216 @@ class PositionSLTPMonitor:
         except Exception:
             market_bias = "FLAT"
 
-        # 清理已不在 open 列表的 peak 记录
+        # 清理已不在 open 列表的 peak / 缓存 / 待决平仓记录
         alive_pids = {int(p["id"]) for p in positions}
         self._peak_pnl_map = {k: v for k, v in self._peak_pnl_map.items() if k in alive_pids}
         self._trend_exit_cache = {k: v for k, v in self._trend_exit_cache.items() if k in alive_pids}
+        self._hold_until = {k: v for k, v in self._hold_until.items() if k in alive_pids}
+        self.exit_engine.prune(alive_pids)
 
         now = time.time()
+        positions = [
+            p for p in positions
+            if self._hold_until.get(int(p["id"]), 0) <= now
+            and not self.exit_engine.is_pending(int(p["id"]))
+        ]
+        # 同币种多持仓只取一次价
+        prices = self._get_live_prices(ws, {p["symbol"] for p in positions})
+
+        rule_rows = []
         for pos in positions:
-            pid = int(pos["id"])
-            if self._cooldown.get(pid, 0) > now:
-                continue
-
-            symbol = pos["symbol"]
-            side = pos["position_side"]
-            entry_price = float(pos.get("entry_price") or 0)
-            sl = pos.get("stop_loss_price")
-            tp = pos.get("take_profit_price")
-            src = pos.get('source') or ''
-
-            if sl is None and tp is None:
-                # 无 SL/TP 的中线旧仓：仅计划到期 + 爆仓（不走 ai-trail-tp）
-                if _is_midline_source(src):
-                    price = self._get_live_price(ws, symbol)
-                    if price is None or price <= 0:
-                        continue
-                    liq = pos.get("liquidation_price")
-                    reason_mid: Optional[str] = None
-                    pct = pos.get("planned_close_time")
-                    if pct is not None:
-                        if isinstance(pct, _dt.datetime):
-                            if pct.tzinfo is not None:
-                                pct = pct.replace(tzinfo=None)
-                            if utc_now_naive() >= pct:
-                                reason_mid = "planned_close_time_expired"
-                    if not reason_mid and liq is not None and float(liq) > 0:
-                        liq_f = float(liq)
-                        if side.upper() == "LONG" and price <= liq_f:
-                            reason_mid = "liquidation"
-                        elif side.upper() == "SHORT" and price >= liq_f:
-                            reason_mid = "liquidation"
-                    if reason_mid:
-                        logger.warning(
-                            f"[SL/TP Monitor] 中线平仓 pid={pid} {symbol} {side} "
-                            f"reason={reason_mid} price={price:.6f}"
-                        )
-                        self._cooldown[pid] = now + self._cooldown_seconds
-                        self._do_close(pid, symbol, side, reason_mid, price, now)
+            if self._handle_expiry(pos, prices.get(pos["symbol"]), market_bias, now):
                 continue
-            if entry_price <= 0:
+            price = prices.get(pos["symbol"])
+            if price is None or price <= 0:
                 continue
+            rule_rows.append((pos, price))
 
-            # 计划持仓到期（AI 探索/预测等为 2h）— 与 SmartExitOptimizer 互补；
-            # 本服务随 FastAPI 常驻，避免仅 smart_trader 在跑时才到期平仓。
-            pct = pos.get("planned_close_time")
-            if pct is not None:
-                if isinstance(pct, _dt.datetime):
-                    if pct.tzinfo is not None:
-                        pct = pct.replace(tzinfo=None)
-                    if utc_now_naive() >= pct:
-                        price = self._get_live_price(ws, symbol) or entry_price
-                        planned_src = pos.get("source") or ""
-                        try:
-                            from app.services.brain_config import is_brain_source as _is_brain_planned_src
-                            is_brain_planned = _is_brain_planned_src(planned_src)
-                        except Exception:
-                            is_brain_planned = planned_src.startswith("brain_")
-                        if is_brain_planned:
-                            trig = self._check_trigger(side, price, sl, tp)
-                            if trig:
-                                close_reason, price = trig
-                                logger.warning(
-                                    f"[SL/TP Monitor] BRAIN planned到期前先触发硬SL/TP "
-                                    f"pid={pid} {symbol} {side} reason={close_reason}"
-                                )
-                                self._cooldown[pid] = now + self._cooldown_seconds
-                                self._peak_pnl_map.pop(pid, None)
-                                self._do_close(pid, symbol, side, close_reason, price, now)
-                                continue
-                            recheck_reason = self._brain_planned_close_recheck(pos, price)
-                            if recheck_reason is None:
-                                self._cooldown[pid] = now + self._cooldown_seconds
-                                continue
-                            close_reason = recheck_reason
-                        elif _is_midline_source(planned_src):
-                            if side.upper() == "LONG":
-                                pnl_now = (price - entry_price) / entry_price if entry_price else 0.0
-                            else:
-                                pnl_now = (entry_price - price) / entry_price if entry_price else 0.0
-                            db_peak = 0.0
-                            try:
-                                raw_peak = pos.get("max_profit_pct")
-                                if raw_peak is not None:
-                                    db_peak = max(0.0, float(raw_peak) / 100.0)
-                            except (TypeError, ValueError):
-                                db_peak = 0.0
-                            peak_now = max(self._peak_pnl_map.get(pid, 0.0), db_peak, pnl_now)
-                            from app.services.midline_hold_exit import (
-                                MIDLINE_HOLD_EXTEND_HOURS,
-                                midline_expiry_should_extend,
-                            )
-                            if midline_expiry_should_extend(
-                                pnl_now, peak_now, side=side, market_bias=market_bias,
-                            ):
-                                self._extend_brain_planned_close(
-                                    pid,
-                                    int(MIDLINE_HOLD_EXTEND_HOURS * 60),
-                                    f"midline_extend pnl={pnl_now * 100:.2f}% peak={peak_now * 100:.2f}%",
-                                )
-                                self._cooldown[pid] = now + self._cooldown_seconds
-                                continue
-                            close_reason = "planned_close_time_expired"
-                        else:
-                            close_reason = "planned_close_time_expired"
-                        logger.warning(
-                            f"[SL/TP Monitor] 计划平仓到期 pid={pid} {symbol} {side} "
-                            f"planned={pct.strftime('%Y-%m-%d %H:%M:%S')}"
-                        )
-                        self._cooldown[pid] = now + self._cooldown_seconds
-                        self._peak_pnl_map.pop(pid, None)
-                        self._do_close(
-                            pid, symbol, side,
-                            close_reason,
-                            price, now,
-                        )
-                        continue
+        if rule_rows:
+            self._evaluate_rules(rule_rows, disable_rules, market_bias, now)
+        self._flush_peaks()
 
-            price = self._get_live_price(ws, symbol)
-            if price is None or price <= 0:
-                continue
+    def _handle_expiry(
+        self,
+        pos: Dict[str, Any],
+        price: Optional[float],
+        market_bias: str,
+        now: float,
+    ) -> bool:
+        """无 SL/TP 中线旧仓 / 计划持仓到期。返回 True 表示本轮该持仓已处理完（不再走价格规则）。"""
+        pid = int(pos["id"])
+        symbol = pos["symbol"]
+        side = pos["position_side"]
+        entry_price = float(pos.get("entry_price") or 0)
+        sl = pos.get("stop_loss_price")
+        tp = pos.get("take_profit_price")
+        src = pos.get('source') or ''
+
+        if sl is None and tp is None:
+            # 无 SL/TP 的中线旧仓：仅计划到期 + 爆仓（不走 ai-trail-tp）
+            if _is_midline_source(src):
+                if price is None or price <= 0:
+                    return True
+                liq = pos.get("liquidation_price")
+                reason_mid: Optional[str] = None
+                pct = pos.get("planned_close_time")
+                if pct is not None:
+                    if isinstance(pct, _dt.datetime):
+                        if pct.tzinfo is not None:
+                            pct = pct.replace(tzinfo=None)
+                        if utc_now_naive() >= pct:
+                            reason_mid = "planned_close_time_expired"
+                if not reason_mid and liq is not None and float(liq) > 0:
+                    liq_f = float(liq)
+                    if side.upper() == "LONG" and price <= liq_f:
+                        reason_mid = "liquidation"
+                    elif side.upper() == "SHORT" and price >= liq_f:
+                        reason_mid = "liquidation"
+                if reason_mid:
+                    logger.warning(
+                        f"[SL/TP Monitor] 中线平仓 pid={pid} {symbol} {side} "
+                        f"reason={reason_mid} price={price:.6f}"
+                    )
+                    self._emit_close(CloseIntent(pid, symbol, side, reason_mid, price))
+            return True
+        if entry_price <= 0:
+            return True
 
-            # 计算浮盈浮亏百分比（价格维度）
+        # 计划持仓到期（AI 探索/预测等为 2h）— 与 SmartExitOptimizer 互补；
+        # 本服务随 FastAPI 常驻，避免仅 smart_trader 在跑时才到期平仓。
+        pct = pos.get("planned_close_time")
+        if pct is None or not isinstance(pct, _dt.datetime):
+            return False
+        if pct.tzinfo is not None:
+            pct = pct.replace(tzinfo=None)
+        if utc_now_naive() < pct:
+            return False
+
+        price = price or entry_price
+        planned_src = pos.get("source") or ""
+        try:
+            from app.services.brain_config import is_brain_source as _is_brain_planned_src
+            is_brain_planned = _is_brain_planned_src(planned_src)
+        except Exception:
+            is_brain_planned = planned_src.startswith("brain_")
+        if is_brain_planned:
+            trig = self._check_trigger(side, price, sl, tp)
+            if trig:
+                close_reason, price = trig
+                logger.warning(
+                    f"[SL/TP Monitor] BRAIN planned到期前先触发硬SL/TP "
+                    f"pid={pid} {symbol} {side} reason={close_reason}"
+                )
+                self._emit_close(CloseIntent(pid, symbol, side, close_reason, price))
+                return True
+            recheck_reason = self._brain_planned_close_recheck(pos, price)
+            if recheck_reason is None:
+                self._hold_until[pid] = now + self._hold_seconds
+                return True
+            close_reason = recheck_reason
+        elif _is_midline_source(planned_src):
             if side.upper() == "LONG":
-                pnl_pct = (price - entry_price) / entry_price
+                pnl_now = (price - entry_price) / entry_price if entry_price else 0.0
             else:
-                pnl_pct = (entry_price - price) / entry_price
+                pnl_now = (entry_price - price) / entry_price if entry_price else 0.0
+            db_peak = self._db_peak(pos)
+            peak_now = max(self._peak_pnl_map.get(pid, 0.0), db_peak, pnl_now)
+            from app.services.midline_hold_exit import (
+                MIDLINE_HOLD_EXTEND_HOURS,
+                midline_expiry_should_extend,
+            )
+            if midline_expiry_should_extend(
+                pnl_now, peak_now, side=side, market_bias=market_bias,
+            ):
+                self._extend_brain_planned_close(
+                    pid,
+                    int(MIDLINE_HOLD_EXTEND_HOURS * 60),
+                    f"midline_extend pnl={pnl_now * 100:.2f}% peak={peak_now * 100:.2f}%",
+                )
+                self._hold_until[pid] = now + self._hold_seconds
+                return True
+            close_reason = "planned_close_time_expired"
+        else:
+            close_reason = "planned_close_time_expired"
+        logger.warning(
+            f"[SL/TP Monitor] 计划平仓到期 pid={pid} {symbol} {side} "
+            f"planned={pct.strftime('%Y-%m-%d %H:%M:%S')}"
+        )
+        self._emit_close(CloseIntent(pid, symbol, side, close_reason, price))
+        return True
 
-            # 更新 peak：内存 ∪ DB.max_profit_pct（重启后从库恢复，避免 trail/soft 丢峰）
-            db_peak = 0.0
-            try:
-                raw_peak = pos.get("max_profit_pct")
-                if raw_peak is not None:
-                    db_peak = max(0.0, float(raw_peak) / 100.0)
-            except (TypeError, ValueError):
-                db_peak = 0.0
-            prev_peak = max(self._peak_pnl_map.get(pid, 0.0), db_peak)
-            new_peak = max(prev_peak, pnl_pct)
+    @staticmethod
+    def _db_peak(pos: Dict[str, Any]) -> float:
+        """DB.max_profit_pct（价格%）→ 小数峰值；重启后从库恢复，避免 trail/soft 丢峰"""
+        try:
+            raw_peak = pos.get("max_profit_pct")
+            if raw_peak is not None:
+                return max(0.0, float(raw_peak) / 100.0)
+        except (TypeError, ValueError):
+            pass
+        return 0.0
+
+    @staticmethod
+    def _position_age_s(pos: Dict[str, Any]) -> Optional[float]:
+        open_time = pos.get("open_time")
+        if open_time and isinstance(open_time, _dt.datetime):
+            return (utc_now_naive() - open_time).total_seconds()
+        return None
+
+    def _evaluate_rules(
+        self,
+        rows: List[tuple],
+        disable_rules: bool,
+        market_bias: str,
+        now: float,
+    ) -> None:
+        """价格类规则一次向量化算完，再按来源逐持仓走各自的规则链"""
+        ages = [self._position_age_s(pos) for pos, _ in rows]
+        batch = evaluate_price_rules(
+            [pos["position_side"] for pos, _ in rows],
+            [float(pos["entry_price"]) for pos, _ in rows],
+            [price for _, price in rows],
+            [pos.get("stop_loss_price") for pos, _ in rows],
+            [pos.get("take_profit_price") for pos, _ in rows],
+            [
+                max(self._peak_pnl_map.get(int(pos["id"]), 0.0), self._db_peak(pos))
+                for pos, _ in rows
+            ],
+            leverage=[pos.get("leverage") or 1 for pos, _ in rows],
+            in_grace=[age is not None and age < ENTRY_GRACE_MIN * 60 for age in ages],
+        )
+
+        for i, (pos, price) in enumerate(rows):
+            pid = int(pos["id"])
+            symbol = pos["symbol"]
+            side = pos["position_side"]
+            entry_price = float(pos["entry_price"])
+            sl = pos.get("stop_loss_price")
+            tp = pos.get("take_profit_price")
+            src = pos.get('source') or ''
+            pnl_pct = float(batch["pnl"][i])
+            new_peak = float(batch["peak"][i])
+            hit = int(batch["hit"][i])
+            hard = (HIT_REASONS[hit], float(batch["hit_price"][i])) if hit else None
+
+            # 峰值：内存 ∪ DB.max_profit_pct
             if new_peak != self._peak_pnl_map.get(pid, 0.0):
                 self._peak_pnl_map[pid] = new_peak
-                # BRAIN：峰值抬高即落库，防 main 重启丢峰
+                # BRAIN：峰值抬高即落库（本轮末批量写），防 main 重启丢峰
                 try:
                     from app.services.brain_config import is_brain_source as _brain_peak_src
                     if _brain_peak_src(src) or _is_midline_source(src):
-                        self._sync_peak_to_db(pid, new_peak * 100)
+                        self._peak_dirty[pid] = new_peak
                 except Exception:
                     if (src or "").startswith("brain_") or _is_midline_source(src):
-                        self._sync_peak_to_db(pid, new_peak * 100)
-
-            reason: Optional[str] = None
-            trigger_price = price
+                        self._peak_dirty[pid] = new_peak
 
             # ────────────────────────────────────────────────────────────────
             # AI / 中线：硬 SL/TP；探索/预测另有 trend/soft；中线亦启用 ai-trail-tp
             # ────────────────────────────────────────────────────────────────
-            src = pos.get('source') or ''
             if _is_ai_hard_sltp_source(src):
-                in_tp_grace = False
-                age_s = 0.0
-                open_time = pos.get("open_time")
-                if open_time:
-                    if isinstance(open_time, _dt.datetime):
-                        age_s = (utc_now_naive() - open_time).total_seconds()
-                        in_tp_grace = age_s < _AI_TP_GRACE_MIN * 60
+                age_s = ages[i] or 0.0
+                in_tp_grace = ages[i] is not None and age_s < _AI_TP_GRACE_MIN * 60
 
                 # BRAIN 美元熔断：先于硬 SL，避免 2.5% 地板打满必亏 >100U（1000×5）
                 try:
@@ -528,31 +519,23 @@ class PositionSLTPMonitor:
                             pid, symbol, side, u_pnl, now, playbook=playbook,
                         )
                         if adv_br:
-                            self._sync_peak_to_db(pid, new_peak * 100)
                             logger.info(
                                 f"[BRAIN 5m_adverse] pid={pid} {symbol} {side} "
                                 f"reason={adv_br} price={price:.6f}"
                             )
-                            self._cooldown[pid] = now + self._cooldown_seconds
-                            self._peak_pnl_map.pop(pid, None)
-                            self._trend_exit_cache.pop(pid, None)
-                            self._do_close(pid, symbol, side, adv_br, price, now)
+                            self._emit_close(CloseIntent(pid, symbol, side, adv_br, price, new_peak))
                             continue
                     usd_br = check_brain_max_loss_usd(u_pnl)
                     if usd_br:
-                        self._sync_peak_to_db(pid, new_peak * 100)
                         logger.info(
                             f"[BRAIN max_loss] pid={pid} {symbol} {side} "
                             f"reason={usd_br} price={price:.6f} pnl_pct={pnl_pct * 100:.2f}%"
                         )
-                        self._cooldown[pid] = now + self._cooldown_seconds
-                        self._peak_pnl_map.pop(pid, None)
-                        self._do_close(pid, symbol, side, usd_br, price, now)
+                        self._emit_close(CloseIntent(pid, symbol, side, usd_br, price, new_peak))
                         continue
 
-                trig = self._check_trigger(side, price, sl, tp)
-                if trig:
-                    reason, trigger_price = trig
+                if hard:
+                    reason, trigger_price = hard
                     if reason == "take_profit" and in_tp_grace:
                         logger.info(
                             f"[AI硬SL/TP] pid={pid} {symbol} TP 保护期内跳过 "
@@ -564,9 +547,7 @@ class PositionSLTPMonitor:
                         f"[AI硬SL/TP] pid={pid} {symbol} {side} source={src} "
                         f"reason={reason} price={price:.6f} SL={sl} TP={tp}"
                     )
-                    self._cooldown[pid] = now + self._cooldown_seconds
-                    self._peak_pnl_map.pop(pid, None)
-                    self._do_close(pid, symbol, side, reason, trigger_price, now)
+                    self._emit_close(CloseIntent(pid, symbol, side, reason, trigger_price))
                     continue
 
                 # BRAIN：硬 SL/TP 之后 → 新版锁利 / 无跟进早砍（不做旧 ai-trail/soft/trend）
@@ -619,26 +600,19 @@ class PositionSLTPMonitor:
                         }
                     trail_br = check_brain_trail_lock(pnl_pct, new_peak, **act_kw)
                     if trail_br:
-                        self._sync_peak_to_db(pid, new_peak * 100)
                         logger.info(
                             f"[BRAIN trail] pid={pid} {symbol} {side} "
                             f"reason={trail_br} price={price:.6f}"
                         )
-                        self._cooldown[pid] = now + self._cooldown_seconds
-                        self._peak_pnl_map.pop(pid, None)
-                        self._do_close(pid, symbol, side, trail_br, price, now)
+                        self._emit_close(CloseIntent(pid, symbol, side, trail_br, price, new_peak))
                         continue
                     soft_br = check_brain_soft_no_follow(pnl_pct, new_peak, age_s)
                     if soft_br:
-                        self._sync_peak_to_db(pid, new_peak * 100)
                         logger.info(
                             f"[BRAIN soft] pid={pid} {symbol} {side} "
                             f"reason={soft_br} price={price:.6f}"
                         )
-                        self._cooldown[pid] = now + self._cooldown_seconds
-                        self._peak_pnl_map.pop(pid, None)
-                        self._do_close(pid, symbol, side, soft_br, price, now)
-                        continue
+                        self._emit_close(CloseIntent(pid, symbol, side, soft_br, price, new_peak))
                     continue
 
                 if not _is_midline_source(src):
@@ -651,15 +625,11 @@ class PositionSLTPMonitor:
                         now,
                     )
                     if trend_sl:
-                        self._sync_peak_to_db(pid, new_peak * 100)
                         logger.info(
                             f"[AI trend-sl] pid={pid} {symbol} {side} source={src} "
                             f"reason={trend_sl} price={price:.6f} peak={new_peak * 100:.2f}%"
                         )
-                        self._cooldown[pid] = now + self._cooldown_seconds
-                        self._peak_pnl_map.pop(pid, None)
-                        self._trend_exit_cache.pop(pid, None)
-                        self._do_close(pid, symbol, side, trend_sl, price, now)
+                        self._emit_close(CloseIntent(pid, symbol, side, trend_sl, price, new_peak))
                         continue
 
                     soft_sl = _check_ai_soft_stop(
@@ -670,14 +640,11 @@ class PositionSLTPMonitor:
                         source=src,
                     )
                     if soft_sl:
-                        self._sync_peak_to_db(pid, new_peak * 100)
                         logger.info(
                             f"[AI soft-sl] pid={pid} {symbol} {side} source={src} "
                             f"reason={soft_sl} price={price:.6f} peak={new_peak * 100:.2f}%"
                         )
-                        self._cooldown[pid] = now + self._cooldown_seconds
-                        self._peak_pnl_map.pop(pid, None)
-                        self._do_close(pid, symbol, side, soft_sl, price, now)
+                        self._emit_close(CloseIntent(pid, symbol, side, soft_sl, price, new_peak))
                         continue
 
                 # ai-trail-tp：探索/预测；中线改走更早的 midline_hold_exit
@@ -709,60 +676,50 @@ class PositionSLTPMonitor:
                         market_bias=market_bias,
                     )
                     if trail_mid:
-                        self._sync_peak_to_db(pid, new_peak * 100)
                         logger.info(
                             f"[midline hold-exit] pid={pid} {symbol} {side} "
                             f"reason={trail_mid} price={price:.6f} peak={new_peak * 100:.2f}%"
                         )
-                        self._cooldown[pid] = now + self._cooldown_seconds
-                        self._peak_pnl_map.pop(pid, None)
-                        self._do_close(pid, symbol, side, trail_mid, price, now)
+                        self._emit_close(CloseIntent(pid, symbol, side, trail_mid, price, new_peak))
                     continue
-                trail_ai = _check_ai_trail_tp(
-                    pnl_pct,
-                    new_peak,
-                    int(pos.get("leverage") or 1),
-                )
-                if trail_ai:
-                    self._sync_peak_to_db(pid, new_peak * 100)
-                    logger.info(
-                        f"[AI trail-tp] pid={pid} {symbol} {side} source={src} "
-                        f"reason={trail_ai} price={price:.6f} peak={new_peak * 100:.2f}%"
+                # 向量化结果只做门控，原因文案仍由标量函数生成
+                if batch["ai_trail"][i]:
+                    trail_ai = _check_ai_trail_tp(
+                        pnl_pct,
+                        new_peak,
+                        int(pos.get("leverage") or 1),
                     )
-                    self._cooldown[pid] = now + self._cooldown_seconds
-                    self._peak_pnl_map.pop(pid, None)
-                    self._do_close(pid, symbol, side, trail_ai, price, now)
+                    if trail_ai:
+                        logger.info(
+                            f"[AI trail-tp] pid={pid} {symbol} {side} source={src} "
+                            f"reason={trail_ai} price={price:.6f} peak={new_peak * 100:.2f}%"
+                        )
+                        self._emit_close(CloseIntent(pid, symbol, side, trail_ai, price, new_peak))
                 continue
 
-            # 1. 新规则（受 disable_sl_tp_hold 控制）
+            reason: Optional[str] = None
+            trigger_price = price
+            peak_sync: Optional[float] = None
+
+            # 1. 新规则（受 disable_sl_tp_hold 控制；入场保护期内 early-sl/breakeven 不触发）
             if not disable_rules:
-                # 入场保护期：开仓 ENTRY_GRACE_MIN 分钟内 early-sl/breakeven 不触发
-                open_time = pos.get("open_time")
-                in_grace = False
-                if open_time:
-                    if isinstance(open_time, _dt.datetime):
-                        age_s = (utc_now_naive() - open_time).total_seconds()
-                        in_grace = age_s < ENTRY_GRACE_MIN * 60
-
-                pullback_thresh = _dynamic_trail_pullback(new_peak)
-                if (new_peak - pnl_pct) >= pullback_thresh:
+                legacy = int(batch["legacy"][i])
+                if legacy == LEGACY_TRAIL_TP:
                     current_drawdown = (new_peak - pnl_pct) * 100
                     reason = (
                         f"移动止盈(峰值价格收益{new_peak*100:.2f}% "
                         f"回撤{current_drawdown:.2f}%, trail-tp)"
                     )
                     # 同步 peak 到 DB，方便复盘分析
-                    self._sync_peak_to_db(pid, new_peak * 100)
-                elif not in_grace and new_peak >= BREAKEVEN_AFTER_PEAK_PCT and pnl_pct <= BREAKEVEN_SL_PCT:
+                    peak_sync = new_peak
+                elif legacy == LEGACY_BREAKEVEN:
                     reason = "breakeven-sl"
-                elif not in_grace and pnl_pct <= -EARLY_SL_PCT:
+                elif legacy == LEGACY_EARLY_SL:
                     reason = "early-sl"
 
             # 2. 原硬 SL/TP（兜底，永远生效）
-            if not reason:
-                trig = self._check_trigger(side, price, sl, tp)
-                if trig:
-                    reason, trigger_price = trig
+            if not reason and hard:
+                reason, trigger_price = hard
 
             if not reason:
                 continue
@@ -772,9 +729,21 @@ class PositionSLTPMonitor:
                 f"reason={reason} price={price:.6f} pnl={pnl_pct*100:+.2f}% "
                 f"peak={new_peak*100:+.2f}% SL={sl} TP={tp}"
             )
-            self._cooldown[pid] = now + self._cooldown_seconds
-            self._peak_pnl_map.pop(pid, None)
-            self._do_close(pid, symbol, side, reason, trigger_price, now)
+            self._emit_close(CloseIntent(pid, symbol, side, reason, trigger_price, peak_sync))
+
+    def _emit_close(self, intent: CloseIntent) -> bool:
+        """所有平仓决定的唯一出口：峰值落库 → 跨进程 claim → 平仓引擎。返回是否已执行平仓。"""
+        pid = intent.position_id
+        self._peak_pnl_map.pop(pid, None)
+        self._trend_exit_cache.pop(pid, None)
+        pending_peak = self._peak_dirty.pop(pid, None)
+        peak = intent.peak_pct if intent.peak_pct is not None else pending_peak
+        if peak is not None:
+            self._sync_peak_to_db(pid, peak * 100)
+        if not self.exit_engine.claim(intent):
+            return False
+        self._do_close(intent)
+        return True
 
     def _check_brain_5m_adverse_exit(
         self,
@@ -982,20 +951,26 @@ class PositionSLTPMonitor:
         return val
 
     def _sync_peak_to_db(self, pid: int, peak_pct: float) -> None:
-        """将峰值价格收益率同步到 futures_positions.max_profit_pct（DB 字段为价格%）。
+        """将峰值价格收益率同步到 futures_positions.max_profit_pct（DB 字段为价格%）。"""
+        self._sync_peaks([(pid, peak_pct)])
+
+    def _sync_peaks(self, items: List[tuple]) -> None:
+        """批量同步峰值 [(pid, 价格%)]：一条连接一次 executemany。
 
         仅在 peak_pct > 当前 DB 记录时更新，避免旧值覆盖新值。
         使用独立短连接，异常不抛出。
         """
+        if not items:
+            return
         try:
             conn = pymysql.connect(**_db_cfg())
             try:
                 with conn.cursor() as c:
-                    c.execute(
+                    c.executemany(
                         "UPDATE futures_positions "
                         "SET max_profit_pct = GREATEST(COALESCE(max_profit_pct, 0), %s) "
                         "WHERE id=%s AND status='open'",
-                        (peak_pct, pid),
+                        [(peak_pct, pid) for pid, peak_pct in items],
                     )
                     conn.commit()
             finally:
@@ -1003,9 +978,20 @@ class PositionSLTPMonitor:
         except Exception:
             pass  # 峰值同步非关键路径，静默失败
 
-    def _do_close(self, pid: int, symbol: str, side: str, reason: str,
-                  trigger_price: float, now: float) -> None:
-        """直接调用模拟盘平仓引擎，避免后台监控 HTTP 反打 FastAPI 自己。"""
+    def _flush_peaks(self) -> None:
+        """本轮抬高的 BRAIN/中线峰值一次落库"""
+        if not self._peak_dirty:
+            return
+        batch, self._peak_dirty = self._peak_dirty, {}
+        self._sync_peaks([(pid, peak * 100) for pid, peak in batch.items()])
+
+    def _do_close(self, intent: CloseIntent) -> None:
+        """直接调用模拟盘平仓引擎，避免后台监控 HTTP 反打 FastAPI 自己。
+
+        失败不另设冷却：claim 在 CLAIM_TTL_S 内有效，到期前本进程与其他监控都不会重复提交。
+        """
+        pid, symbol, side = intent.position_id, intent.symbol, intent.side
+        trigger_price = intent.price
         try:
             from decimal import Decimal
             from app.api.futures_api import _get_engine
@@ -1013,16 +999,14 @@ class PositionSLTPMonitor:
             data = _get_engine().close_position(
                 position_id=pid,
                 close_quantity=None,
-                reason=reason,
+                reason=intent.reason,
                 close_price=Decimal(str(trigger_price)) if trigger_price else None,
             )
         except Exception as e:
             logger.exception(f"[SL/TP Monitor] 平仓调用异常 pid={pid}: {e}")
-            self._cooldown[pid] = now + max(self._cooldown_seconds, 60.0)
             return
 
         if not data.get("success"):
-            self._cooldown[pid] = now + max(self._cooldown_seconds, 60.0)
             logger.error(
                 f"[SL/TP Monitor] 平仓失败 pid={pid}: "
                 f"{data.get('message') or data.get('error') or data}"
@@ -1144,6 +1128,15 @@ class PositionSLTPMonitor:
             out.append(r)
         return out
 
+    def _get_live_prices(self, ws, symbols) -> Dict[str, float]:
+        """每个币种取一次价（取价顺序同 _get_live_price），取不到的币种不在结果里"""
+        out: Dict[str, float] = {}
+        for symbol in symbols:
+            price = self._get_live_price(ws, symbol)
+            if price is not None and price > 0:
+                out[symbol] = price
+        return out
+
     def _get_live_price(self, ws, symbol: str) -> Optional[float]:
         # 1. 首选 DataHub 进程内缓存 / WS / 受限 REST，避免 HTTP 反打 FastAPI 自己。
         try:
@@ -1209,18 +1202,7 @@ class PositionSLTPMonitor:
         sl: Optional[float],
         tp: Optional[float],
     ) -> Optional[tuple]:
-        side = (side or "").upper()
-        if side == "LONG":
-            if sl is not None and price <= sl:
-                return ("stop_loss", sl)
-            if tp is not None and price >= tp:
-                return ("take_profit", tp)
-        elif side == "SHORT":
-            if sl is not None and price >= sl:
-                return ("stop_loss", sl)
-            if tp is not None and price <= tp:
-                return ("take_profit", tp)
-        return None
+        return check_hard_trigger(side, price, sl, tp)
 
 
 _monitor_instance: Optional[PositionSLTPMonitor] = None
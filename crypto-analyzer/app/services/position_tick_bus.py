@@ -0,0 +1,279 @@
+"""
+持仓监控价格事件总线 (SmartExitOptimizer 用)
+
+原先每个持仓一个监控任务, 每轮 (1-10s) 查一次 futures_positions 并 UPDATE 一次最高盈利,
+50+ 持仓时每秒上百条 SQL. 改为事件驱动:
+
+- PositionTable: 监控中持仓的内存表, 只在开始监控 (开仓) / 停止监控 (平仓) 时增删;
+  外部改动 (手动平仓 / 调整止盈止损 / 延期) 由每 RESYNC_INTERVAL_S 一条批量 SELECT 对账
+- PriceTickBus: 挂在 BinanceWSPriceService 价格回调上, 按 symbol 唤醒该币种的持仓任务,
+  同一持仓未处理的多个 tick 合并为最新一个, 慢检查不会积压
+- MaxProfitWriter: 最高盈利先记内存表, 每 FLUSH_INTERVAL_S 一次 executemany 批量落库
+
+数据库负载从 O(持仓数 × 秒) 降为 O(开平仓事件) + 常数频率的批量对账/写入.
+"""
+import asyncio
+import time
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+from loguru import logger
+
+
+RESYNC_INTERVAL_S = 5       # 内存持仓表与 DB 对账间隔 (一条 SQL 覆盖全部监控持仓)
+FLUSH_INTERVAL_S = 2        # 最高盈利批量落库间隔
+TICK_FRESH_S = 2.0          # tick 价格在此时间内视为实时, 否则监控任务回落 DataHub 取价
+
+# futures_positions → 监控所需字段 (与 SmartExitOptimizer._get_position 同口径)
+POSITION_COLUMNS = """
+    id, symbol, position_side as direction, status,
+    avg_entry_price, quantity as position_size,
+    entry_signal_time, open_time, planned_close_time,
+    close_extended, extended_close_time,
+    max_profit_pct, max_profit_price, max_profit_time,
+    stop_loss_price, take_profit_price, leverage,
+    margin, entry_price, max_hold_minutes, timeout_at, created_at,
+    source
+"""
+
+_MAX_PROFIT_UPDATE_SQL = """
+    UPDATE futures_positions
+    SET
+        max_profit_pct   = %s,
+        max_profit_price = %s,
+        max_profit_time  = NOW()
+    WHERE id = %s
+      AND status = 'open'
+      AND (max_profit_pct IS NULL OR max_profit_pct < %s)
+"""
+
+
+def _close_quietly(cursor, conn) -> None:
+    if cursor:
+        try: cursor.close()
+        except Exception: pass
+    if conn:
+        try: conn.close()
+        except Exception: pass
+
+
+class PositionTable:
+    """监控中持仓的内存表 (position_id → 持仓字典)"""
+
+    def __init__(self, get_connection: Callable):
+        """
+        Args:
+            get_connection: 返回 mysql.connector 连接的函数 (SmartExitOptimizer._get_pool_connection)
+        """
+        self._get_connection = get_connection
+        self._rows: Dict[int, Dict] = {}
+        self._synced_at = time.monotonic()
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def get(self, position_id: int) -> Optional[Dict]:
+        return self._rows.get(position_id)
+
+    def put(self, position: Dict) -> None:
+        self._rows[position['id']] = position
+
+    def remove(self, position_id: int) -> None:
+        self._rows.pop(position_id, None)
+
+    def record_max_profit(self, position_id: int, profit_pct: float, price: float) -> bool:
+        """内存中刷新最高盈利; 创新高返回 True (需要落库)"""
+        row = self._rows.get(position_id)
+        if row is None or row.get('status') != 'open':
+            return False
+        current = row.get('max_profit_pct')
+        if current is not None and float(current) >= profit_pct:
+            return False
+        row['max_profit_pct'] = profit_pct
+        row['max_profit_price'] = price
+        return True
+
+    def fetch(self, position_ids: List[int]) -> Dict[int, Dict]:
+        """一条 SQL 读取多个持仓"""
+        if not position_ids:
+            return {}
+        conn = cursor = None
+        try:
+            conn = self._get_connection()
+            cursor = conn.cursor(dictionary=True)
+            cursor.execute(
+                f"SELECT {POSITION_COLUMNS} FROM futures_positions "
+                f"WHERE id IN ({','.join(['%s'] * len(position_ids))})",
+                tuple(position_ids),
+            )
+            return {row['id']: row for row in cursor.fetchall()}
+        finally:
+            _close_quietly(cursor, conn)
+
+    def resync(self, force: bool = False) -> int:
+        """
+        到期则与 DB 对账: 覆盖外部改动的字段, DB 已删除的持仓标记为 missing.
+        未落库的最高盈利以内存为准. 返回对账的持仓数.
+        """
+        now = time.monotonic()
+        if not self._rows or (not force and now - self._synced_at < RESYNC_INTERVAL_S):
+            return 0
+        self._synced_at = now
+        ids = list(self._rows)
+        fresh = self.fetch(ids)
+        for pid in ids:
+            row = self._rows.get(pid)
+            if row is None:          # 对账期间已停止监控
+                continue
+            db_row = fresh.get(pid)
+            if db_row is None:
+                row['status'] = 'missing'
+                continue
+            mem_max = row.get('max_profit_pct')
+            db_max = db_row.get('max_profit_pct')
+            if mem_max is not None and (db_max is None or float(db_max) < float(mem_max)):
+                db_row['max_profit_pct'] = mem_max
+                db_row['max_profit_price'] = row.get('max_profit_price')
+            row.clear()
+            row.update(db_row)
+        return len(ids)
+
+
+class MaxProfitWriter:
+    """最高盈利批量落库 (条件 UPDATE 保证只升不降, 已平仓不写)"""
+
+    def __init__(self, get_connection: Callable):
+        self._get_connection = get_connection
+        self._pending: Dict[int, Tuple[float, float]] = {}
+        self._flushed_at = time.monotonic()
+
+    def record(self, position_id: int, profit_pct: float, price: float) -> None:
+        prev = self._pending.get(position_id)
+        if prev is None or profit_pct > prev[0]:
+            self._pending[position_id] = (profit_pct, price)
+
+    def discard(self, position_id: int) -> None:
+        self._pending.pop(position_id, None)
+
+    def flush(self, force: bool = False) -> int:
+        """到期则一次 executemany 写入全部待写记录, 返回写入条数"""
+        now = time.monotonic()
+        if not self._pending or (not force and now - self._flushed_at < FLUSH_INTERVAL_S):
+            return 0
+        self._flushed_at = now
+        batch, self._pending = self._pending, {}
+        params = [(pct, price, pid, pct) for pid, (pct, price) in batch.items()]
+        conn = cursor = None
+        try:
+            conn = self._get_connection()
+            cursor = conn.cursor()
+            # 短锁等待超时(2s)：平仓时行锁被占用则快速失败，不阻塞监控
+            cursor.execute("SET innodb_lock_wait_timeout = 2")
+            cursor.executemany(_MAX_PROFIT_UPDATE_SQL, params)
+            conn.commit()
+        except Exception as e:
+            if conn:
+                try: conn.rollback()
+                except Exception: pass
+            # 失败的记录放回, 下次合并重试
+            for pid, (pct, price) in batch.items():
+                self.record(pid, pct, price)
+            logger.debug(f"[TickBus] 最高盈利批量写入跳过 {len(params)} 条: {e}")
+            return 0
+        finally:
+            _close_quietly(cursor, conn)
+        return len(params)
+
+
+class PriceTickBus:
+    """WS 价格 tick → 按 symbol 唤醒持仓监控任务"""
+
+    def __init__(self, price_service=None):
+        self.price_service = price_service
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._events: Dict[int, asyncio.Event] = {}          # position_id → 唤醒事件
+        self._symbol_ids: Dict[str, Set[int]] = {}            # symbol → position_ids
+        self._position_symbol: Dict[int, str] = {}
+        self._latest: Dict[str, Tuple[float, float]] = {}     # symbol → (price, monotonic)
+        self.stats = {'ticks': 0, 'wakeups': 0, 'timeouts': 0}
+
+    def attach(self) -> None:
+        """挂到价格服务回调 (需在事件循环内调用, 幂等)"""
+        if self._loop is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        if self.price_service is not None:
+            self.price_service.add_callback(self.on_price)
+
+    def detach(self) -> None:
+        if self._loop is not None and self.price_service is not None:
+            self.price_service.remove_callback(self.on_price)
+        self._loop = None
+
+    async def register(self, position_id: int, symbol: str) -> None:
+        """持仓开始监控: 建立唤醒事件, 币种未订阅时补订阅"""
+        self.attach()
+        self._events.setdefault(position_id, asyncio.Event())
+        self._position_symbol[position_id] = symbol
+        self._symbol_ids.setdefault(symbol, set()).add(position_id)
+        svc = self.price_service
+        if svc is not None and symbol not in getattr(svc, 'subscribed_symbols', ()):
+            try:
+                await svc.subscribe([symbol])
+            except Exception as e:
+                logger.debug(f"[TickBus] 订阅 {symbol} 失败, 该持仓按轮询取价: {e}")
+
+    def unregister(self, position_id: int) -> None:
+        symbol = self._position_symbol.pop(position_id, None)
+        if symbol is not None:
+            ids = self._symbol_ids.get(symbol)
+            if ids is not None:
+                ids.discard(position_id)
+                if not ids:
+                    del self._symbol_ids[symbol]
+        event = self._events.pop(position_id, None)
+        if event is not None:
+            event.set()   # 唤醒仍在等待的任务, 让其发现已停止监控
+
+    def on_price(self, symbol: str, price: float) -> None:
+        """BinanceWSPriceService 回调 (可能来自其他线程)"""
+        loop = self._loop
+        if loop is None:
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            self._dispatch(symbol, price)
+        else:
+            loop.call_soon_threadsafe(self._dispatch, symbol, price)
+
+    def _dispatch(self, symbol: str, price: float) -> None:
+        self._latest[symbol] = (price, time.monotonic())
+        self.stats['ticks'] += 1
+        for pid in self._symbol_ids.get(symbol, ()):
+            event = self._events.get(pid)
+            if event is not None and not event.is_set():
+                event.set()
+                self.stats['wakeups'] += 1
+
+    def latest_price(self, symbol: str, max_age: float = TICK_FRESH_S) -> Optional[float]:
+        item = self._latest.get(symbol)
+        if item is None or time.monotonic() - item[1] > max_age:
+            return None
+        return item[0]
+
+    async def wait(self, position_id: int, timeout: float) -> bool:
+        """等待该持仓币种的下一个 tick; 超时返回 False (调用方回落轮询取价)"""
+        event = self._events.get(position_id)
+        if event is None:
+            await asyncio.sleep(timeout)
+            return False
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            self.stats['timeouts'] += 1
+            return False
+        finally:
+            event.clear()
@@ -0,0 +1,342 @@
+"""
+滚动 24h 价格统计 (price_stats_24h)
+
+CacheUpdateService.update_price_stats_cache 每分钟用一条多表 UPDATE 扫全市场 24h 的 5m K 线
+(3 个 GROUP BY 子查询), 还要 GET_LOCK 防止和 WS 落盘 kline_data 叠锁.
+本模块在 WS 采集进程内为每个币种维护一个 24h 滚动窗口, 5m K 线收盘时 O(1) 推进:
+
+- 288 格环形缓冲 (按 open_time 取模定位), 存每根的 high / low / close / volume / quote_volume
+- 最高 / 最低: 单调队列, 队头即窗口极值
+- 成交量 / 成交额: 滚动和, 移出窗口的 K 线减掉
+- 24h 前价格: 最近一根移出窗口的 K 线收盘价 (即 24h 前那一刻的收盘)
+
+WSKlineCollector 落盘后调用 on_klines() 推进, 本轮变动的币种一次 executemany 写回 price_stats_24h,
+并记 stream_open_time; 该列新鲜时 CacheUpdateService 不再跑整表 UPDATE (见 is_stream_live).
+"""
+from __future__ import annotations
+
+import threading
+import time
+from collections import defaultdict, deque
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import pymysql
+from loguru import logger
+
+from app.services.kline_store import EXCHANGE, timeframe_to_ms
+
+
+TIMEFRAME = '5m'
+BAR_MS = timeframe_to_ms(TIMEFRAME)
+WINDOW_BARS = 288                   # 24h / 5m
+WINDOW_MS = WINDOW_BARS * BAR_MS
+AGO_MAX_MS = 30 * 3600 * 1000       # 24h 前价格最多回看 30h (同原 SQL)
+FRESH_BARS = 3                      # stream_open_time 落后不超过 N 根视为仍在维护
+_RESYNC_EVERY = 1000                # 滚动和每推进 N 次按窗口重算一次, 消除浮点累计误差
+
+_STREAM_COLUMN = (
+    "ALTER TABLE price_stats_24h ADD COLUMN stream_open_time BIGINT DEFAULT NULL "
+    "COMMENT '滚动聚合最后一根5m K线 open_time (ms)'"
+)
+
+_UPSERT_SQL = """
+    INSERT INTO price_stats_24h (
+        symbol, current_price, price_24h_ago, change_24h, change_24h_abs,
+        high_24h, low_24h, volume_24h, quote_volume_24h,
+        price_range_24h, price_range_pct, trend, stream_open_time, updated_at
+    ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, NOW())
+    ON DUPLICATE KEY UPDATE
+        current_price    = VALUES(current_price),
+        price_24h_ago    = COALESCE(VALUES(price_24h_ago), price_24h_ago),
+        change_24h       = COALESCE(VALUES(change_24h), change_24h),
+        change_24h_abs   = COALESCE(VALUES(change_24h_abs), change_24h_abs),
+        high_24h         = VALUES(high_24h),
+        low_24h          = VALUES(low_24h),
+        volume_24h       = VALUES(volume_24h),
+        quote_volume_24h = VALUES(quote_volume_24h),
+        price_range_24h  = VALUES(price_range_24h),
+        price_range_pct  = VALUES(price_range_pct),
+        trend            = VALUES(trend),
+        stream_open_time = VALUES(stream_open_time),
+        updated_at       = NOW()
+"""
+
+_ROW_SQL = (
+    "SELECT symbol, open_time, high_price, low_price, close_price, volume, quote_volume "
+    "FROM kline_data WHERE timeframe = %s AND exchange = %s"
+)
+
+
+def trend_of(change_pct: Optional[float]) -> str:
+    """涨跌幅 → trend (与 price_stats_24h 原口径一致)"""
+    if change_pct is None:
+        return 'sideways'
+    if change_pct > 5:
+        return 'strong_up'
+    if change_pct > 1:
+        return 'up'
+    if change_pct < -5:
+        return 'strong_down'
+    if change_pct < -1:
+        return 'down'
+    return 'sideways'
+
+
+def _row_values(row: dict) -> Tuple[int, float, float, float, float, float]:
+    return (int(row['open_time']), float(row['high_price']), float(row['low_price']),
+            float(row['close_price']), float(row['volume'] or 0), float(row['quote_volume'] or 0))
+
+
+class RollingWindow:
+    """单币种 24h 滚动窗口 (5m K 线, 需按 open_time 递增推进)"""
+    __slots__ = ('slot_time', 'slot_close', 'slot_vol', 'slot_qvol',
+                 'max_q', 'min_q', 'vol', 'qvol', 'open_time', 'close',
+                 'ago_time', 'ago_close', 'updates')
+
+    def __init__(self):
+        self.slot_time: List[int] = [0] * WINDOW_BARS        # 0 = 空格
+        self.slot_close: List[float] = [0.0] * WINDOW_BARS
+        self.slot_vol: List[float] = [0.0] * WINDOW_BARS
+        self.slot_qvol: List[float] = [0.0] * WINDOW_BARS
+        self.max_q: deque = deque()      # (open_time, high), high 单调递减
+        self.min_q: deque = deque()      # (open_time, low), low 单调递增
+        self.vol = 0.0
+        self.qvol = 0.0
+        self.open_time = 0
+        self.close = 0.0
+        self.ago_time = 0
+        self.ago_close = 0.0
+        self.updates = 0
+
+    def _evict(self, idx: int) -> None:
+        t = self.slot_time[idx]
+        if not t:
+            return
+        self.vol -= self.slot_vol[idx]
+        self.qvol -= self.slot_qvol[idx]
+        if t > self.ago_time:
+            self.ago_time, self.ago_close = t, self.slot_close[idx]
+        self.slot_time[idx] = 0
+
+    def update(self, open_time: int, high: float, low: float, close: float,
+               volume: float, quote_volume: float) -> bool:
+        """推进一根收盘 K 线; 不晚于当前最后一根的直接忽略 (返回 False)"""
+        if open_time <= self.open_time:
+            return False
+        # 跳过的格子 (缺口) 与本根所在格子上的旧 K 线都已移出窗口
+        if self.open_time:
+            skipped = min((open_time - self.open_time) // BAR_MS, WINDOW_BARS)
+            for k in range(1, skipped + 1):
+                self._evict(((self.open_time // BAR_MS) + k) % WINDOW_BARS)
+        idx = (open_time // BAR_MS) % WINDOW_BARS
+        self._evict(idx)
+
+        self.slot_time[idx] = open_time
+        self.slot_close[idx] = close
+        self.slot_vol[idx] = volume
+        self.slot_qvol[idx] = quote_volume
+        self.vol += volume
+        self.qvol += quote_volume
+        self.open_time = open_time
+        self.close = close
+
+        floor = open_time - WINDOW_MS
+        while self.max_q and self.max_q[-1][1] <= high:
+            self.max_q.pop()
+        self.max_q.append((open_time, high))
+        while self.max_q[0][0] <= floor:
+            self.max_q.popleft()
+        while self.min_q and self.min_q[-1][1] >= low:
+            self.min_q.pop()
+        self.min_q.append((open_time, low))
+        while self.min_q[0][0] <= floor:
+            self.min_q.popleft()
+
+        self.updates += 1
+        if self.updates % _RESYNC_EVERY == 0:
+            self.vol = sum(v for t, v in zip(self.slot_time, self.slot_vol) if t)
+            self.qvol = sum(v for t, v in zip(self.slot_time, self.slot_qvol) if t)
+        return True
+
+    def row(self, symbol: str) -> Optional[tuple]:
+        """price_stats_24h 一行 (顺序同 _UPSERT_SQL), 尚无 K 线返回 None"""
+        if not self.open_time:
+            return None
+        high, low, cur = self.max_q[0][1], self.min_q[0][1], self.close
+        ago = change = change_abs = None
+        if self.ago_time and self.open_time - self.ago_time <= AGO_MAX_MS and self.ago_close > 0:
+            ago = self.ago_close
+            change_abs = cur - ago
+            change = change_abs / ago * 100
+        price_range = high - low
+        range_pct = price_range / cur * 100 if cur > 0 else 0.0
+        return (symbol, cur, ago, change, change_abs, high, low, max(self.vol, 0.0),
+                max(self.qvol, 0.0), price_range, range_pct, trend_of(change), self.open_time)
+
+
+def ensure_stream_column(cursor) -> None:
+    """旧库补 stream_open_time 列 (幂等)"""
+    try:
+        cursor.execute(_STREAM_COLUMN)
+    except pymysql.err.OperationalError as e:
+        if e.args[0] != 1060:  # Duplicate column name
+            raise
+
+
+def is_stream_live(stream_open_time: Optional[int], now_ms: Optional[int] = None) -> bool:
+    """price_stats_24h 是否仍由滚动聚合维护 (最后一根 K 线落后不超过 FRESH_BARS 根)"""
+    if not stream_open_time:
+        return False
+    now_ms = now_ms if now_ms is not None else int(time.time() * 1000)
+    return now_ms - int(stream_open_time) <= FRESH_BARS * BAR_MS
+
+
+class PriceStatsAggregator:
+    """按币种维护 RollingWindow, 5m 收盘即推进并批量写回 price_stats_24h"""
+
+    def __init__(self, db_config: dict):
+        self.db_config = db_config
+        self._windows: Dict[str, RollingWindow] = {}
+        self._lock = threading.Lock()
+        self._stats = {
+            'hydrated': 0,
+            'warmed_up': 0,
+            'gap_fills': 0,
+            'updates': 0,
+            'rows_written': 0,
+            'last_write_ms': 0.0,
+        }
+
+    def _connect(self):
+        return pymysql.connect(**self.db_config, charset='utf8mb4',
+                               cursorclass=pymysql.cursors.DictCursor, autocommit=True)
+
+    def hydrate(self) -> int:
+        """启动时一条 SQL 载入近 30h 的 5m K 线 (含 24h 前价格), 并整表写回一次"""
+        since = int(time.time() * 1000) - AGO_MAX_MS - BAR_MS
+        with self._lock:
+            conn = self._connect()
+            try:
+                with conn.cursor() as cur:
+                    ensure_stream_column(cur)
+                    cur.execute(_ROW_SQL + " AND open_time > %s ORDER BY open_time ASC",
+                                (TIMEFRAME, EXCHANGE, since))
+                    windows: Dict[str, RollingWindow] = defaultdict(RollingWindow)
+                    for row in cur.fetchall():
+                        windows[row['symbol']].update(*_row_values(row))
+                    self._windows.update(windows)
+                    self._stats['hydrated'] += len(windows)
+                    self._persist(cur, list(windows))
+            finally:
+                conn.close()
+        logger.info(f"[24h统计] 滚动窗口载入 {len(self._windows)} 个币种")
+        return len(self._windows)
+
+    def on_klines(self, klines: List[Dict]) -> int:
+        """
+        推进已落盘的收盘 K 线 (SmartFuturesCollector.save_klines 格式, 只取 5m) 并写回.
+        在落盘之后调用, 缺口 / 新币种从 kline_data 补.
+
+        Returns:
+            写入 price_stats_24h 的行数
+        """
+        groups: Dict[str, List[Dict]] = defaultdict(list)
+        for k in klines:
+            if k.get('timeframe') == TIMEFRAME:
+                groups[k['symbol']].append(k)
+        if not groups:
+            return 0
+
+        with self._lock:
+            conn = self._connect()
+            try:
+                with conn.cursor() as cur:
+                    touched = []
+                    for symbol, items in groups.items():
+                        items.sort(key=lambda k: k['open_time'])
+                        window = self._windows.get(symbol)
+                        if window is None:
+                            window = self._warm_up(cur, symbol)
+                        elif items[0]['open_time'] > window.open_time + BAR_MS:
+                            self._fill_gap(cur, symbol, window, items[0]['open_time'])
+                        for k in items:
+                            if window.update(int(k['open_time']), float(k['high_price']),
+                                             float(k['low_price']), float(k['close_price']),
+                                             float(k['volume'] or 0), float(k.get('quote_volume') or 0)):
+                                self._stats['updates'] += 1
+                        touched.append(symbol)
+                    return self._persist(cur, touched)
+            finally:
+                conn.close()
+
+    def _fetch_rows(self, cur, symbol: str, after_ms: int, before_ms: Optional[int] = None) -> List[Dict]:
+        sql = _ROW_SQL + " AND symbol = %s AND open_time > %s"
+        params: list = [TIMEFRAME, EXCHANGE, symbol, after_ms]
+        if before_ms is not None:
+            sql += " AND open_time < %s"
+            params.append(before_ms)
+        cur.execute(sql + " ORDER BY open_time ASC", params)
+        return cur.fetchall()
+
+    def _warm_up(self, cur, symbol: str) -> RollingWindow:
+        """新币种: 用近 30h 的 K 线 (已含本次落盘的) 建窗口"""
+        window = RollingWindow()
+        for row in self._fetch_rows(cur, symbol, int(time.time() * 1000) - AGO_MAX_MS - BAR_MS):
+            window.update(*_row_values(row))
+        self._windows[symbol] = window
+        self._stats['warmed_up'] += 1
+        return window
+
+    def _fill_gap(self, cur, symbol: str, window: RollingWindow, until_ms: int) -> None:
+        """WS 断线漏掉的 K 线从 kline_data 补回 (REST 回填会写进去); 只需窗口内的部分"""
+        after = max(window.open_time, until_ms - WINDOW_MS - BAR_MS)
+        for row in self._fetch_rows(cur, symbol, after, before_ms=until_ms):
+            window.update(*_row_values(row))
+        self._stats['gap_fills'] += 1
+
+    def _persist(self, cur, symbols: Iterable[str]) -> int:
+        rows = []
+        for symbol in symbols:
+            window = self._windows.get(symbol)
+            row = window.row(symbol) if window is not None else None
+            if row is not None:
+                rows.append(row)
+        if not rows:
+            return 0
+        t0 = time.perf_counter()
+        cur.executemany(_UPSERT_SQL, rows)
+        self._stats['rows_written'] += len(rows)
+        self._stats['last_write_ms'] = round((time.perf_counter() - t0) * 1000, 1)
+        return len(rows)
+
+    def get(self, symbol: str) -> Optional[tuple]:
+        """内存中的最新统计行 (顺序同 price_stats_24h 写入列), 未跟踪返回 None"""
+        with self._lock:
+            window = self._windows.get(symbol)
+            return window.row(symbol) if window is not None else None
+
+    def get_stats(self) -> Dict:
+        return {**self._stats, 'tracked': len(self._windows)}
+
+
+_aggregator: Optional[PriceStatsAggregator] = None
+_aggregator_lock = threading.Lock()
+
+
+def get_price_stats_aggregator() -> Optional[PriceStatsAggregator]:
+    """本进程的 24h 统计聚合器, 未初始化返回 None"""
+    return _aggregator
+
+
+def init_price_stats_aggregator(db_config: dict) -> PriceStatsAggregator:
+    """初始化 (幂等) 并从 kline_data 载入窗口"""
+    global _aggregator
+    with _aggregator_lock:
+        if _aggregator is None:
+            aggregator = PriceStatsAggregator(db_config)
+            try:
+                aggregator.hydrate()
+            except Exception as e:
+                logger.warning(f"[24h统计] 窗口载入失败, 各币种收盘时单独预热: {e}")
+            _aggregator = aggregator
+    return _aggregator
@@ -0,0 +1,778 @@
+"""
+历史回放 / 回测引擎: 把 kline_data 按 K 线逐根喂给线上决策函数
+
+线上的 SmartDecisionBrain.analyze / brain_playbook.classify_playbook /
+midline_swing_scanner.evaluate_symbol_multiperiod 都只对「现在」的库做判断, 调权重后只能上线观察.
+本模块注入回放时钟和历史数据源, 在历史上逐步重放同一套代码:
+
+- ReplayClock: 回放时钟 (毫秒), 每步推进到一个扫描周期的收盘时刻
+- HistoricalKlineSource: 按时钟截断的历史 K 线 (只露出已收盘的 K 线), 接口与 KlineStore 读取部分一致,
+  通过 install_kline_store 注入后, 扫描器的 _fetch_klines 直接读到「当时」的数据
+- ReplayCursor: 只回答「kline_data 最近 N 根」查询的游标 (Big4 闸门 / 日线体制走游标读 K 线),
+  其他 SQL 直接报错, 防止回放时偷读当前库
+- 成交模拟: 信号在下一根执行周期 K 线开盘价成交, 按 K 线高低点检查硬 SL/TP
+  (exit_rules.check_hard_trigger, 同根同时触及按 SL 计, 跳空越过按开盘价), 未触发则在
+  planned_close_time 到期平仓; 同一策略同一币种持仓期间 (含冷却) 不再开新仓
+
+并行: 大盘上下文 (全局趋势 / Big4 闸门 / 日线体制) 只依赖几个大币, 先按时间分块并行算好;
+再把币种切片交给 spawn 进程池, 每个工作进程自己批量读取分片的历史 K 线, 按币种逐个重放
+(币种之间互不依赖, 行格式缓存用完即释放, 内存只随分片大小增长).
+
+与线上的差异 (回放无法还原的部分):
+- SmartDecisionBrain: V2 评分不参与 (历史评分未落库), Big4TrendDetector 结果不传 (Big4 过滤不生效);
+  信号黑名单用回放开始时的快照
+- Playbook: 分向胜率闸门不参与 (依赖实时成交统计), 限价挂单按下一根开盘价市价成交
+- 只模拟硬 SL/TP 与到期平仓, 不含 SmartExit 分批/移动止盈与账户级持仓上限
+"""
+from __future__ import annotations
+
+import math
+import multiprocessing
+import os
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pymysql
+from loguru import logger
+
+from app.services.exit_rules import check_hard_trigger
+from app.services.kline_store import EXCHANGE, arrays_to_rows, timeframe_to_ms
+from app.services.kline_storage import history_tables
+from app.services.signal_blacklist_checker import SignalBlacklistChecker
+from app.utils.futures_symbol import futures_symbol_rating_canonical, futures_symbol_rating_variants
+
+
+STRATEGIES = ('brain', 'playbook', 'midline_long', 'midline_short')
+
+# 各周期预热根数: 取各决策函数最大读取量并留余量
+# (brain 1d 50 / 1h 100 / 15m 96; midline 1d 120 / 1h 168 / 15m 672; 日线体制 1d 120)
+WARMUP_BARS: Dict[str, int] = {'1d': 128, '1h': 176, '15m': 680}
+SCAN_BARS: Dict[str, int] = {'1d': 50, '1h': 168, '15m': 672}
+
+DEFAULT_STEP_TF = '15m'
+DEFAULT_EXEC_TF = '15m'
+DEFAULT_FEE_PCT = 0.05            # 单边手续费 (百分点)
+DEFAULT_WORKERS = max(1, (os.cpu_count() or 2) - 1)
+SHARDS_PER_WORKER = 3             # 分片数 = workers × 此值, 均衡各币种耗时差异
+LOAD_CHUNK_SYMBOLS = 50
+
+_HISTORY_SQL = (
+    "SELECT symbol, open_time, open_price, high_price, low_price, close_price, volume"
+    " FROM {table}"
+    " WHERE timeframe = %s AND exchange = %s AND open_time >= %s AND open_time < %s"
+    " AND symbol IN ({placeholders})"
+    " ORDER BY open_time"
+)
+
+
+class ReplayQueryError(RuntimeError):
+    """回放中出现游标无法回答的 SQL (说明该路径会读到当前库)"""
+
+
+@dataclass
+class ExitParams:
+    """单策略出场参数 (百分点 / 小时 / 分钟)"""
+    sl_pct: float
+    tp_pct: float
+    hold_hours: float
+    cooldown_minutes: float = 0.0
+
+
+@dataclass
+class ReplayTrade:
+    strategy: str
+    symbol: str
+    side: str
+    signal_ms: int
+    entry_ms: int
+    entry_price: float
+    exit_ms: int
+    exit_price: float
+    exit_reason: str
+    pnl_pct: float
+    tag: str = ''
+    score: float = 0.0
+
+    @property
+    def hold_minutes(self) -> float:
+        return (self.exit_ms - self.entry_ms) / 60000.0
+
+    def to_row(self) -> Dict[str, Any]:
+        row = asdict(self)
+        for key in ('signal_ms', 'entry_ms', 'exit_ms'):
+            row[key.replace('_ms', '_time')] = ms_to_datetime(row.pop(key)).isoformat(sep=' ')
+        row['hold_minutes'] = round(self.hold_minutes, 1)
+        return row
+
+
+def ms_to_datetime(ms: int) -> datetime:
+    """毫秒 → naive UTC datetime (与 utc_now_naive 口径一致)"""
+    return datetime.utcfromtimestamp(ms / 1000)
+
+
+def datetime_to_ms(dt: datetime) -> int:
+    """naive 视为 UTC"""
+    return int((dt - datetime(1970, 1, 1)).total_seconds() * 1000) if dt.tzinfo is None \
+        else int(dt.timestamp() * 1000)
+
+
+# ── 时钟 / 数据源 ─────────────────────────────────────────
+
+class ReplayClock:
+    """回放时钟: now_ms 之前收盘的 K 线才可见"""
+
+    def __init__(self, now_ms: int = 0):
+        self.now_ms = int(now_ms)
+
+    def set(self, now_ms: int) -> None:
+        self.now_ms = int(now_ms)
+
+    def now(self) -> datetime:
+        return ms_to_datetime(self.now_ms)
+
+
+class HistoricalKlineSource:
+    """
+    按回放时钟截断的历史 K 线 (升序列式数组), get_arrays / get_rows 与 KlineStore 同签名.
+
+    与 KlineStore 不同: 历史不足 limit 根时返回已有部分 (不返回 None), 调用方不会回落 SQL.
+    行格式列表按 (symbol, timeframe) 懒构建并缓存, 切片共享同一批 dict, 调用方不得修改.
+    """
+
+    def __init__(self, clock: ReplayClock):
+        self.clock = clock
+        self._arrays: Dict[Tuple[str, str], Dict[str, np.ndarray]] = {}
+        self._close_times: Dict[Tuple[str, str], np.ndarray] = {}
+        self._rows: Dict[Tuple[str, str], List[Dict]] = {}
+
+    def add(self, symbol: str, timeframe: str, arrays: Dict[str, np.ndarray]) -> None:
+        key = (symbol, timeframe)
+        self._arrays[key] = arrays
+        self._close_times[key] = arrays['open_time'] + timeframe_to_ms(timeframe)
+        self._rows.pop(key, None)
+
+    def export(self, symbols: Optional[Iterable[str]] = None) -> Dict[Tuple[str, str], Dict[str, np.ndarray]]:
+        """列式数组 (跨进程下发用)"""
+        wanted = set(symbols) if symbols is not None else None
+        return {k: v for k, v in self._arrays.items() if wanted is None or k[0] in wanted}
+
+    def symbols(self, timeframe: str) -> List[str]:
+        return sorted(s for (s, tf) in self._arrays if tf == timeframe)
+
+    def release(self, symbol: str) -> None:
+        """丢弃该币种的行格式缓存 (逐币种重放时用完即放)"""
+        for key in [k for k in self._rows if k[0] == symbol]:
+            del self._rows[key]
+
+    def _visible(self, key: Tuple[str, str]) -> int:
+        """当前时钟下已收盘的根数"""
+        close_times = self._close_times.get(key)
+        if close_times is None:
+            return 0
+        return int(np.searchsorted(close_times, self.clock.now_ms, side='right'))
+
+    def bars(self, symbol: str, timeframe: str) -> Optional[Dict[str, np.ndarray]]:
+        """完整数组 (含时钟之后的 K 线), 只供成交模拟使用"""
+        return self._arrays.get((symbol, timeframe))
+
+    def get_arrays(self, symbol: str, timeframe: str, limit: int,
+                   since_ms: Optional[int] = None) -> Dict[str, np.ndarray]:
+        key = (symbol, timeframe)
+        arrays = self._arrays.get(key)
+        if arrays is None:
+            return {k: np.empty(0) for k in ('open_time', 'open', 'high', 'low', 'close', 'volume')}
+        end = self._visible(key)
+        start = max(0, end - int(limit))
+        out = {k: v[start:end] for k, v in arrays.items()}
+        if since_ms is not None:
+            keep = out['open_time'] >= since_ms
+            out = {k: v[keep] for k, v in out.items()}
+        return out
+
+    def get_rows(self, symbol: str, timeframe: str, limit: int,
+                 since_ms: Optional[int] = None) -> List[Dict]:
+        key = (symbol, timeframe)
+        arrays = self._arrays.get(key)
+        if arrays is None:
+            return []
+        rows = self._rows.get(key)
+        if rows is None:
+            rows = self._rows[key] = arrays_to_rows(arrays)
+        end = self._visible(key)
+        out = rows[max(0, end - int(limit)):end]
+        if since_ms is not None:
+            out = [r for r in out if r['open_time'] >= since_ms]
+        return out
+
+
+class ReplayCursor:
+    """
+    只回答「kline_data 最近 N 根」查询的游标
+    (SELECT ... FROM kline_data WHERE symbol=%s AND timeframe=%s ... ORDER BY open_time DESC LIMIT %s)
+    """
+
+    def __init__(self, source: HistoricalKlineSource):
+        self.source = source
+        self._rows: List[Dict] = []
+
+    def execute(self, sql: str, params=()) -> int:
+        flat = ' '.join(sql.split())
+        if 'FROM kline_data' not in flat or 'ORDER BY open_time DESC LIMIT' not in flat or len(params) != 3:
+            raise ReplayQueryError(f"回放游标不支持的查询: {flat[:120]}")
+        symbol, timeframe, limit = params
+        rows = self.source.get_rows(futures_symbol_rating_canonical(symbol), timeframe, int(limit))
+        self._rows = rows[::-1]
+        return len(self._rows)
+
+    def fetchall(self) -> List[Dict]:
+        return list(self._rows)
+
+    def fetchone(self) -> Optional[Dict]:
+        return self._rows[0] if self._rows else None
+
+    def close(self) -> None:
+        self._rows = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class FrozenBlacklistChecker(SignalBlacklistChecker):
+    """信号黑名单快照 (回放期间不读库、不过期)"""
+
+    def __init__(self, rows: List[Dict]):
+        self.db_config = None
+        self.cache_minutes = 0
+        self.blacklist_cache = list(rows or [])
+        self.cache_updated_at = None
+
+    def _check_cache_expiry(self):
+        return
+
+
+def load_history(conn, source: HistoricalKlineSource, symbols: Iterable[str],
+                 ranges: Dict[str, Tuple[int, int]]) -> Dict[str, int]:
+    """
+    批量读取历史 K 线写入 source: 每个周期每 LOAD_CHUNK_SYMBOLS 个币种一条 SQL.
+    区间早于热窗口时同样的 SQL 再查一遍归档表 (见 kline_storage).
+
+    Args:
+        symbols: 规范格式 (BASE/USDT); 库里 BTCUSDT / BTC/USDT 等写法一并读取并合并
+        ranges: {timeframe: (since_ms, until_ms)}
+
+    Returns:
+        {timeframe: 读到的行数}
+    """
+    canon = list(dict.fromkeys(futures_symbol_rating_canonical(s) for s in symbols))
+    counts: Dict[str, int] = {}
+    with conn.cursor(pymysql.cursors.Cursor) as cur:
+        for timeframe, (since_ms, until_ms) in ranges.items():
+            grouped: Dict[str, list] = {}
+            tables = history_tables(cur, timeframe, int(since_ms))
+            for i in range(0, len(canon), LOAD_CHUNK_SYMBOLS):
+                variants = list(dict.fromkeys(
+                    v for s in canon[i:i + LOAD_CHUNK_SYMBOLS] for v in futures_symbol_rating_variants(s)
+                ))
+                placeholders = ','.join(['%s'] * len(variants))
+                for table in tables:
+                    cur.execute(
+                        _HISTORY_SQL.format(table=table, placeholders=placeholders),
+                        [timeframe, EXCHANGE, int(since_ms), int(until_ms), *variants],
+                    )
+                    for symbol, *rest in cur.fetchall():
+                        grouped.setdefault(futures_symbol_rating_canonical(symbol), []).append(rest)
+            counts[timeframe] = sum(len(v) for v in grouped.values())
+            for symbol, rows in grouped.items():
+                source.add(symbol, timeframe, _history_arrays(rows))
+    return counts
+
+
+def _history_arrays(rows: list) -> Dict[str, np.ndarray]:
+    """(open_time, o, h, l, c, v) 行 → 列式数组; 同一 open_time 多种写法重复时保留最后一条"""
+    times = np.array([int(r[0]) for r in rows], dtype=np.int64)
+    ohlcv = np.array(
+        [(float(o), float(h), float(l), float(c), float(v or 0)) for _, o, h, l, c, v in rows],
+        dtype=np.float64,
+    ).reshape(-1, 5)
+    order = np.argsort(times, kind='stable')
+    times, ohlcv = times[order], ohlcv[order]
+    keep = np.ones(len(times), dtype=bool)
+    keep[:-1] = times[1:] != times[:-1]
+    times, ohlcv = times[keep], ohlcv[keep]
+    return {
+        'open_time': times,
+        'open': ohlcv[:, 0],
+        'high': ohlcv[:, 1],
+        'low': ohlcv[:, 2],
+        'close': ohlcv[:, 3],
+        'volume': ohlcv[:, 4],
+    }
+
+
+# ── 成交模拟 ─────────────────────────────────────────────
+
+def simulate_exit(bars: Dict[str, np.ndarray], entry_idx: int, side: str, entry_price: float,
+                  sl_pct: float, tp_pct: float, expire_ms: int,
+                  bar_ms: int) -> Tuple[str, float, int]:
+    """
+    从 entry_idx (成交 K 线) 起找第一根触及 SL/TP 的 K 线, 返回 (原因, 成交价, 平仓时刻 ms).
+
+    规则与线上硬 SL/TP 一致 (check_hard_trigger, SL 优先): 开盘价已越过触发价按开盘价成交,
+    否则先看不利极值再看有利极值 (同根同时触及按 SL 计). 到期前未触发 → planned_close_time
+    到期时刻的开盘价平仓; 历史数据在到期前结束 → end_of_data 按最后收盘价平仓.
+    """
+    long_side = side == 'LONG'
+    sl = entry_price * (1 - sl_pct / 100) if long_side else entry_price * (1 + sl_pct / 100)
+    tp = entry_price * (1 + tp_pct / 100) if long_side else entry_price * (1 - tp_pct / 100)
+    times = bars['open_time']
+    end_idx = int(np.searchsorted(times, expire_ms, side='left'))
+    lows, highs = bars['low'][entry_idx:end_idx], bars['high'][entry_idx:end_idx]
+    adverse, favorable = (lows, highs) if long_side else (highs, lows)
+    hit = (lows <= sl) | (highs >= tp) if long_side else (highs >= sl) | (lows <= tp)
+    if hit.any():
+        k = int(hit.argmax())
+        idx = entry_idx + k
+        bar_open = float(bars['open'][idx])
+        trig = check_hard_trigger(side, bar_open, sl, tp)
+        if trig:
+            return trig[0], bar_open, int(times[idx])
+        trig = (check_hard_trigger(side, float(adverse[k]), sl, tp)
+                or check_hard_trigger(side, float(favorable[k]), sl, tp))
+        return trig[0], float(trig[1]), int(times[idx]) + bar_ms
+    if end_idx < len(times):
+        return 'planned_close_time_expired', float(bars['open'][end_idx]), int(times[end_idx])
+    last = len(times) - 1
+    return 'end_of_data', float(bars['close'][last]), int(times[last]) + bar_ms
+
+
+def trade_pnl_pct(side: str, entry_price: float, exit_price: float, fee_pct: float) -> float:
+    """价格收益 (百分点, 不含杠杆) 扣双边手续费"""
+    move = (exit_price - entry_price) / entry_price * 100
+    return (move if side == 'LONG' else -move) - 2 * fee_pct
+
+
+# ── 大盘上下文 ───────────────────────────────────────────
+
+def market_symbols() -> List[str]:
+    """大盘上下文依赖的币种 (midline 全局趋势大币 ∪ Big4)"""
+    from app.services.brain_config import BIG4_SYMBOLS
+    from app.services.midline_swing_scanner import MIDLINE_BIG_SYMBOLS
+    return list(dict.fromkeys(
+        futures_symbol_rating_canonical(s) for s in (*MIDLINE_BIG_SYMBOLS, *BIG4_SYMBOLS)
+    ))
+
+
+def market_context(cur) -> Dict[str, Any]:
+    """与 scan_universe 同口径的全局趋势 / Big4 闸门 / 日线体制, 只保留决策用字段"""
+    from app.services.midline_swing_scanner import evaluate_global_trend_dimensions
+
+    global_trend = evaluate_global_trend_dimensions(cur)
+    try:
+        from app.services.brain_market_analyzer import evaluate_big4_gate
+        from app.services.brain_market_regime import evaluate_global_daily_regime
+        big4 = evaluate_big4_gate(cur)
+        global_regime = evaluate_global_daily_regime(cur)
+    except ReplayQueryError:
+        raise
+    except Exception as e:
+        logger.debug(f"[replay] 大盘上下文回落本地趋势: {e}")
+        big4 = {"big4_ok": True, "bias": global_trend.get("bias") or "FLAT"}
+        global_regime = {"global_regime": "GLOBAL_UNKNOWN", "reason": "fallback_global_trend"}
+    return {
+        'global_trend': {'bias': global_trend.get('bias'), 'votes': global_trend.get('votes')},
+        'big4': {k: v for k, v in big4.items() if k != 'per_coin'},
+        'global_regime': {k: global_regime.get(k) for k in ('global_regime', 'reason')},
+    }
+
+
+def _context_chunk(arrays: Dict[Tuple[str, str], Dict[str, np.ndarray]],
+                   steps: List[int]) -> Dict[int, Dict[str, Any]]:
+    """工作进程: 一段时间步的大盘上下文"""
+    from app.services.kline_store import install_kline_store
+
+    _quiet_worker_logs()
+    clock = ReplayClock()
+    source = HistoricalKlineSource(clock)
+    for (symbol, timeframe), arr in arrays.items():
+        source.add(symbol, timeframe, arr)
+    install_kline_store(source)
+    cur = ReplayCursor(source)
+    out = {}
+    for step in steps:
+        clock.set(step)
+        out[step] = market_context(cur)
+    return out
+
+
+# ── 策略 ─────────────────────────────────────────────────
+
+def default_exit_params(strategies: Iterable[str]) -> Dict[str, ExitParams]:
+    """线上各策略的出场参数 (brain 读 system_settings, 读取失败时 loader 自带默认值)"""
+    out: Dict[str, ExitParams] = {}
+    for name in strategies:
+        if name == 'brain':
+            from app.services.system_settings_loader import get_max_hold_hours, get_sl_tp_decimal
+            sl, tp = get_sl_tp_decimal()
+            out[name] = ExitParams(sl * 100, tp * 100, get_max_hold_hours())
+        elif name == 'playbook':
+            from app.services.brain_config import (
+                BRAIN_HOLD_HOURS, BRAIN_SL_PCT, BRAIN_SYMBOL_OPEN_COOLDOWN_MINUTES, BRAIN_TP_PCT,
+            )
+            out[name] = ExitParams(BRAIN_SL_PCT, BRAIN_TP_PCT, BRAIN_HOLD_HOURS,
+                                   BRAIN_SYMBOL_OPEN_COOLDOWN_MINUTES)
+        elif name in ('midline_long', 'midline_short'):
+            from app.services.midline_swing_config import MIDLINE_HOLD_HOURS, MIDLINE_SL_PCT, MIDLINE_TP_PCT
+            out[name] = ExitParams(MIDLINE_SL_PCT, MIDLINE_TP_PCT, MIDLINE_HOLD_HOURS)
+        else:
+            raise ValueError(f"未知策略: {name}")
+    return out
+
+
+def _brain_rows(rows: List[Dict]) -> List[Dict]:
+    """kline_data 列名 → SmartDecisionBrain.analyze 的 K 线格式"""
+    return [
+        {'open': r['open_price'], 'high': r['high_price'], 'low': r['low_price'],
+         'close': r['close_price'], 'volume': r['volume']}
+        for r in rows
+    ]
+
+
+def _build_brain(state: dict, blacklist_rows: List[Dict], symbols: List[str]):
+    """不连库的 SmartDecisionBrain: 下发主进程的扫描状态, 回放币种视为在扫描池内"""
+    from smart_trader_service import SmartDecisionBrain
+
+    brain = SmartDecisionBrain.__new__(SmartDecisionBrain)
+    brain.db_config = None
+    brain.connection = None
+    brain.score_v2_service = None
+    brain.blacklist_checker = FrozenBlacklistChecker(blacklist_rows)
+    brain.apply_scan_state(state)
+    brain.whitelist = list(dict.fromkeys([*state.get('whitelist', []), *symbols]))
+    return brain
+
+
+def _playbook_decision(pb: Dict[str, Any], ctx: Dict[str, Any],
+                       rows_15m: List[Dict]) -> Optional[Tuple[str, str, float]]:
+    """与 brain_strategy_orchestrator 开仓闸门同口径 (不含胜率闸门); 过门返回 (side, tag, score)"""
+    from app.services.brain_config import (
+        BRAIN_MIN_EDGE_SCORE, BRAIN_MIN_EDGE_SCORE_SHORT, BRAIN_REQUIRE_CONFIRMED_PREFIXES,
+        PLAYBOOK_MIN_EDGE_SCORE, TRADEABLE_PLAYBOOKS,
+    )
+    from app.services.brain_market_regime import brain_open_regime_decision
+    from app.services.entry_timing import compute_pullback_entry
+
+    side = (pb.get('side') or 'FLAT').upper()
+    playbook = str(pb.get('playbook') or 'D1')
+    if playbook not in TRADEABLE_PLAYBOOKS or side not in ('LONG', 'SHORT'):
+        return None
+    price = pb.get('ref_price')
+    if not price or float(price) <= 0:
+        return None
+    regime = brain_open_regime_decision(
+        big4=ctx.get('big4') or {}, playbook_row=pb, side=side, playbook=playbook,
+        global_regime=ctx.get('global_regime'),
+    )
+    if regime.margin_multiplier <= 0:
+        return None
+    default_min_edge = BRAIN_MIN_EDGE_SCORE_SHORT if side == 'SHORT' else BRAIN_MIN_EDGE_SCORE
+    edge = float(pb.get('edge_score') or 0)
+    if edge < float(PLAYBOOK_MIN_EDGE_SCORE.get(playbook, default_min_edge)):
+        return None
+    if not pb.get('confirmed') and playbook.startswith(BRAIN_REQUIRE_CONFIRMED_PREFIXES):
+        return None
+    timing = compute_pullback_entry(side, playbook, rows_15m, playbook_row=pb, ref_price=float(price))
+    if not timing.ready:
+        return None
+    return side, f"{playbook}:{regime.regime}", edge * 100
+
+
+class _ShardReplayer:
+    """工作进程内逐币种重放一个分片"""
+
+    def __init__(self, job: dict):
+        from app.services.kline_store import install_kline_store
+
+        self.job = job
+        self.strategies: List[str] = list(job['strategies'])
+        self.exit_params: Dict[str, ExitParams] = job['exit_params']
+        self.contexts: Dict[int, Dict[str, Any]] = job.get('contexts') or {}
+        self.exec_tf: str = job['exec_tf']
+        self.exec_ms = timeframe_to_ms(self.exec_tf)
+        self.fee_pct: float = job['fee_pct']
+        self.clock = ReplayClock()
+        self.source = HistoricalKlineSource(self.clock)
+        install_kline_store(self.source)
+        self.cursor = ReplayCursor(self.source)
+        self.brain = None
+        if 'brain' in self.strategies:
+            self.brain = _build_brain(job['brain_state'], job.get('blacklist_rows') or [], job['symbols'])
+        self.trades: List[ReplayTrade] = []
+        self.evaluations = 0
+
+    def load(self, conn) -> Dict[str, int]:
+        start_ms, end_ms = self.job['start_ms'], self.job['end_ms']
+        max_hold_ms = int(max(p.hold_hours for p in self.exit_params.values()) * 3600 * 1000)
+        ranges = {
+            tf: (start_ms - bars * timeframe_to_ms(tf), end_ms)
+            for tf, bars in WARMUP_BARS.items()
+        }
+        since, until = ranges.get(self.exec_tf, (start_ms, end_ms))
+        ranges[self.exec_tf] = (min(since, start_ms), end_ms + max_hold_ms + self.exec_ms)
+        return load_history(conn, self.source, self.job['symbols'], ranges)
+
+    def _open(self, strategy: str, symbol: str, side: str, step: int,
+              tag: str, score: float) -> Optional[ReplayTrade]:
+        bars = self.source.bars(symbol, self.exec_tf)
+        if bars is None or not len(bars['open_time']):
+            return None
+        idx = int(np.searchsorted(bars['open_time'], step, side='left'))
+        if idx >= len(bars['open_time']) or bars['open_time'][idx] - step >= self.exec_ms:
+            return None  # 信号后没有紧接的执行 K 线 (断采), 视为未成交
+        params = self.exit_params[strategy]
+        entry_ms = int(bars['open_time'][idx])
+        entry_price = float(bars['open'][idx])
+        expire_ms = entry_ms + int(params.hold_hours * 3600 * 1000)
+        reason, exit_price, exit_ms = simulate_exit(
+            bars, idx, side, entry_price, params.sl_pct, params.tp_pct, expire_ms, self.exec_ms,
+        )
+        trade = ReplayTrade(
+            strategy=strategy, symbol=symbol, side=side, signal_ms=step,
+            entry_ms=entry_ms, entry_price=entry_price, exit_ms=exit_ms, exit_price=exit_price,
+            exit_reason=reason, pnl_pct=round(trade_pnl_pct(side, entry_price, exit_price, self.fee_pct), 4),
+            tag=tag, score=round(float(score or 0), 2),
+        )
+        self.trades.append(trade)
+        return trade
+
+    def replay_symbol(self, symbol: str, steps: List[int]) -> None:
+        from app.services.brain_playbook import classify_playbook
+        from app.services.midline_swing_scanner import evaluate_symbol_multiperiod
+
+        busy_until = {name: 0 for name in self.strategies}
+        for step in steps:
+            free = [name for name in self.strategies if busy_until[name] <= step]
+            if not free:
+                continue
+            self.clock.set(step)
+            ctx = self.contexts.get(step) or {}
+            rows_1h = self.source.get_rows(symbol, '1h', SCAN_BARS['1h'])
+            rows_15m = self.source.get_rows(symbol, '15m', SCAN_BARS['15m'])
+            if not rows_1h or not rows_15m:
+                continue
+            self.evaluations += 1
+            pb = None
+            if any(name != 'brain' for name in free):
+                pb = classify_playbook(rows_1h, rows_15m, big4=ctx.get('big4') or {})
+
+            for name in free:
+                signal = None
+                if name == 'brain':
+                    res = self.brain.analyze(symbol, big4_result=None, klines={
+                        '1d': _brain_rows(self.source.get_rows(symbol, '1d', SCAN_BARS['1d'])),
+                        '1h': _brain_rows(rows_1h[-100:]),
+                        '15m': _brain_rows(rows_15m[-96:]),
+                    })
+                    if res:
+                        signal = (res['side'], res.get('signal_type') or '', res.get('score') or 0)
+                elif name == 'playbook':
+                    signal = _playbook_decision(pb, ctx, rows_15m)
+                else:
+                    ev = evaluate_symbol_multiperiod(
+                        self.cursor, symbol, name.split('_', 1)[1],
+                        global_trend=ctx.get('global_trend'), big4=ctx.get('big4'),
+                        global_regime=ctx.get('global_regime'),
+                        klines={'1h': rows_1h, '15m': rows_15m}, playbook_row=pb,
+                    )
+                    if ev.get('passed'):
+                        setup = ((ev.get('signal_detail') or {}).get('setup')) or ''
+                        signal = (ev['side'], setup, ev.get('score') or 0)
+                if not signal:
+                    continue
+                trade = self._open(name, symbol, signal[0], step, signal[1], signal[2])
+                if trade is not None:
+                    cooldown_ms = int(self.exit_params[name].cooldown_minutes * 60000)
+                    busy_until[name] = max(trade.exit_ms, trade.entry_ms + cooldown_ms)
+        self.source.release(symbol)
+
+
+def _quiet_worker_logs(level: str = 'ERROR') -> None:
+    """工作进程只输出 level 以上日志 (逐根重放时各扫描器的拒绝日志量极大, 也不写线上日志文件)"""
+    logger.remove()
+    logger.add(sys.stderr, level=level)
+
+
+def _replay_shard(job: dict) -> dict:
+    """工作进程: 读取分片历史并逐币种重放"""
+    t0 = time.perf_counter()
+    replayer = _ShardReplayer(job)  # 导入 smart_trader_service 会重置日志 sink, 之后再收敛
+    _quiet_worker_logs(job.get('log_level', 'ERROR'))
+    conn = pymysql.connect(**job['db_config'], charset='utf8mb4',
+                           cursorclass=pymysql.cursors.DictCursor)
+    try:
+        rows_loaded = replayer.load(conn)
+    finally:
+        conn.close()
+    load_ms = (time.perf_counter() - t0) * 1000
+    steps = job['steps']
+    for symbol in job['symbols']:
+        try:
+            replayer.replay_symbol(symbol, steps)
+        except ReplayQueryError:
+            raise
+        except Exception as e:
+            logger.error(f"[replay] {symbol} 回放失败: {e}")
+    return {
+        'shard': job['shard'],
+        'pid': os.getpid(),
+        'symbols': len(job['symbols']),
+        'rows_loaded': rows_loaded,
+        'evaluations': replayer.evaluations,
+        'trades': [asdict(t) for t in replayer.trades],
+        'load_ms': round(load_ms, 1),
+        'elapsed_ms': round((time.perf_counter() - t0) * 1000, 1),
+    }
+
+
+# ── 汇总 ─────────────────────────────────────────────────
+
+def summarize_trades(trades: List[ReplayTrade]) -> Dict[str, Dict[str, Any]]:
+    """按策略汇总: 笔数 / 胜率 / 平均与累计收益 / 盈亏比 / 最大回撤 (按平仓时间累计百分点)"""
+    out: Dict[str, Dict[str, Any]] = {}
+    by_strategy: Dict[str, List[ReplayTrade]] = {}
+    for t in trades:
+        by_strategy.setdefault(t.strategy, []).append(t)
+    for name, items in sorted(by_strategy.items()):
+        items = sorted(items, key=lambda t: t.exit_ms)
+        pnl = np.array([t.pnl_pct for t in items], dtype=np.float64)
+        equity = np.cumsum(pnl)
+        drawdown = np.maximum.accumulate(np.concatenate(([0.0], equity)))[1:] - equity
+        gains, losses = pnl[pnl > 0].sum(), -pnl[pnl < 0].sum()
+        out[name] = {
+            'trades': len(items),
+            'win_rate': round(float((pnl > 0).mean()) * 100, 1),
+            'avg_pnl_pct': round(float(pnl.mean()), 3),
+            'total_pnl_pct': round(float(pnl.sum()), 2),
+            'profit_factor': round(float(gains / losses), 2) if losses > 0 else None,
+            'max_drawdown_pct': round(float(drawdown.max()), 2),
+            'avg_hold_minutes': round(float(np.mean([t.hold_minutes for t in items])), 1),
+            'long': sum(1 for t in items if t.side == 'LONG'),
+            'short': sum(1 for t in items if t.side == 'SHORT'),
+            'exits': dict(Counter(t.exit_reason for t in items)),
+        }
+    return out
+
+
+# ── 入口 ─────────────────────────────────────────────────
+
+def replay_steps(start_ms: int, end_ms: int, step_tf: str) -> List[int]:
+    """[start, end) 内每个扫描周期的收盘时刻"""
+    step_ms = timeframe_to_ms(step_tf)
+    first = -(-int(start_ms) // step_ms) * step_ms
+    return list(range(first, int(end_ms), step_ms))
+
+
+def _split(items: List, n: int) -> List[List]:
+    if not items:
+        return []
+    size = math.ceil(len(items) / max(1, min(n, len(items))))
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+def run_replay(
+    db_config: dict,
+    symbols: List[str],
+    start: datetime,
+    end: datetime,
+    *,
+    strategies: Iterable[str] = STRATEGIES,
+    step_tf: str = DEFAULT_STEP_TF,
+    exec_tf: str = DEFAULT_EXEC_TF,
+    workers: int = DEFAULT_WORKERS,
+    fee_pct: float = DEFAULT_FEE_PCT,
+    exit_params: Optional[Dict[str, ExitParams]] = None,
+    brain_state: Optional[dict] = None,
+    blacklist_rows: Optional[List[Dict]] = None,
+    state_hook: Optional[Callable[[dict], None]] = None,
+) -> Dict[str, Any]:
+    """
+    并行回放 [start, end) (naive UTC), 返回 {'trades', 'summary', 'stats'}
+
+    Args:
+        strategies: STRATEGIES 子集
+        step_tf: 扫描步长 (每根该周期 K 线收盘重放一次)
+        exec_tf: 成交 / SL-TP 检查用的 K 线周期
+        exit_params: 覆盖各策略出场参数, 缺省取线上配置 (default_exit_params)
+        brain_state / blacklist_rows: SmartDecisionBrain 扫描状态与信号黑名单快照,
+            缺省时在主进程按线上配置初始化一次 SmartDecisionBrain 取得
+        state_hook: 下发前修改 brain_state (如替换 scoring_weights 验证新权重)
+    """
+    strategies = [s for s in STRATEGIES if s in set(strategies)]
+    if not strategies:
+        raise ValueError("至少选择一个策略")
+    symbols = list(dict.fromkeys(futures_symbol_rating_canonical(s) for s in symbols))
+    start_ms, end_ms = datetime_to_ms(start), datetime_to_ms(end)
+    steps = replay_steps(start_ms, end_ms, step_tf)
+    params = default_exit_params(strategies)
+    params.update({k: v for k, v in (exit_params or {}).items() if k in params})
+    stats: Dict[str, Any] = {'symbols': len(symbols), 'steps': len(steps), 'workers': workers}
+    t0 = time.perf_counter()
+
+    if 'brain' in strategies and brain_state is None:
+        from smart_trader_service import SmartDecisionBrain
+        live = SmartDecisionBrain(db_config)
+        brain_state = live.scan_state()
+        if blacklist_rows is None:
+            blacklist_rows = list(live.blacklist_checker.blacklist_cache)
+    if brain_state is not None and state_hook is not None:
+        state_hook(brain_state)
+
+    ctx = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=max(1, int(workers)), mp_context=ctx) as pool:
+        contexts: Dict[int, Dict[str, Any]] = {}
+        if any(s != 'brain' for s in strategies):
+            t_ctx = time.perf_counter()
+            market = HistoricalKlineSource(ReplayClock())
+            conn = pymysql.connect(**db_config, charset='utf8mb4',
+                                   cursorclass=pymysql.cursors.DictCursor)
+            try:
+                load_history(conn, market, market_symbols(), {
+                    tf: (start_ms - bars * timeframe_to_ms(tf), end_ms) for tf, bars in WARMUP_BARS.items()
+                })
+            finally:
+                conn.close()
+            arrays = market.export()
+            for part in pool.map(_context_chunk, [arrays] * workers, _split(steps, workers)):
+                contexts.update(part)
+            stats['context_ms'] = round((time.perf_counter() - t_ctx) * 1000, 1)
+
+        base_job = {
+            'db_config': db_config, 'strategies': strategies, 'exit_params': params,
+            'exec_tf': exec_tf, 'fee_pct': fee_pct, 'start_ms': start_ms, 'end_ms': end_ms,
+            'steps': steps, 'contexts': contexts, 'brain_state': brain_state,
+            'blacklist_rows': blacklist_rows,
+        }
+        shards = _split(symbols, max(1, int(workers)) * SHARDS_PER_WORKER)
+        futures = [pool.submit(_replay_shard, {**base_job, 'shard': i, 'symbols': shard})
+                   for i, shard in enumerate(shards)]
+        results = [f.result() for f in futures]
+
+    trades = sorted(
+        (ReplayTrade(**t) for r in results for t in r['trades']),
+        key=lambda t: (t.entry_ms, t.symbol, t.strategy),
+    )
+    stats.update({
+        'total_ms': round((time.perf_counter() - t0) * 1000, 1),
+        'evaluations': sum(r['evaluations'] for r in results),
+        'shards': [{k: v for k, v in r.items() if k != 'trades'} for r in results],
+        'exit_params': {k: asdict(v) for k, v in params.items()},
+    })
+    return {'trades': trades, 'summary': summarize_trades(trades), 'stats': stats}
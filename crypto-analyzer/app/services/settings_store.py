@@ -0,0 +1,214 @@
+"""
+系统配置统一缓存 (进程内快照 + 版本号)
+
+system_settings 的任何写入 (接口 / 脚本 / 手工 SQL) 经触发器把 settings_version 单行版本号 +1.
+各进程读配置只读内存快照, 距上次核对超过 VERSION_CHECK_INTERVAL_S 时顺带查一次版本号 (主键单行),
+版本变了才整表重载. live_trading_enabled 等开关跨进程 1 秒内生效, 开仓闸门不再逐项查库.
+
+- 本进程写入后调用 notify_settings_changed(): 版本号 +1 并立即作废本进程快照 (下一次读取即是新值)
+- 触发器装不上 (缺 TRIGGER 权限) 时另加 FALLBACK_TTL_S 定时整表重载, 与旧 60s TTL 一致;
+  经 notify_settings_changed() 的写入仍然秒级生效
+- 库不可用时沿用上一份快照; 连接带短超时, 一个线程在核对/重载时其它线程直接读当前快照, 不排队等库
+
+system_settings_loader / data_cache_service.get_setting / trading_gates 都从这里读.
+"""
+from __future__ import annotations
+
+import threading
+import time
+from typing import Dict, Mapping, Optional
+
+import pymysql
+from loguru import logger
+
+from app.utils.config_loader import get_db_config
+
+VERSION_CHECK_INTERVAL_S = 0.5
+FALLBACK_TTL_S = 60
+ERROR_BACKOFF_S = 5                 # 库不可用时的重试间隔 (期间直接用旧快照, 不阻塞读取)
+CONNECT_TIMEOUT_S = 3               # 核对在读取路径上, 库卡住时最多拖住正在刷新的那一个线程这么久
+READ_TIMEOUT_S = 5
+
+_TRIGGERS = {
+    'trg_system_settings_version_ins': 'INSERT',
+    'trg_system_settings_version_upd': 'UPDATE',
+    'trg_system_settings_version_del': 'DELETE',
+}
+_BUMP_SQL = "UPDATE settings_version SET version = version + 1 WHERE id = 1"
+
+
+def ensure_settings_version(cursor) -> bool:
+    """
+    建 settings_version 表与 system_settings 上的三个触发器 (幂等).
+
+    Returns:
+        触发器是否齐全 (False: 只能靠 notify_settings_changed + 定时重载)
+    """
+    cursor.execute(
+        """
+        CREATE TABLE IF NOT EXISTS settings_version (
+          id TINYINT NOT NULL,
+          version BIGINT NOT NULL DEFAULT 0,
+          updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+          PRIMARY KEY (id)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+        """
+    )
+    cursor.execute("INSERT IGNORE INTO settings_version (id, version) VALUES (1, 0)")
+    cursor.execute(
+        """
+        SELECT TRIGGER_NAME FROM information_schema.TRIGGERS
+        WHERE TRIGGER_SCHEMA = DATABASE() AND EVENT_OBJECT_TABLE = 'system_settings'
+        """
+    )
+    existing = {r['TRIGGER_NAME'] if isinstance(r, dict) else r[0] for r in cursor.fetchall()}
+    try:
+        for name, event in _TRIGGERS.items():
+            if name not in existing:
+                cursor.execute(
+                    f"CREATE TRIGGER {name} AFTER {event} ON system_settings FOR EACH ROW {_BUMP_SQL}"
+                )
+    except Exception as e:
+        logger.warning(f"[settings_store] system_settings 触发器创建失败, 退化为 {FALLBACK_TTL_S}s 定时重载: {e}")
+        return False
+    return True
+
+
+class SettingsStore:
+    """system_settings 进程内快照; 线程安全, 读取路径无 SQL (版本核对除外)"""
+
+    def __init__(self, db_config: Optional[dict] = None,
+                 check_interval_s: float = VERSION_CHECK_INTERVAL_S):
+        self.db_config = db_config
+        self.check_interval_s = check_interval_s
+        self._lock = threading.Lock()  # 保护连接与刷新; 读取方只做非阻塞尝试
+        self._conn = None
+        self._values: Dict[str, str] = {}
+        self._version: Optional[int] = None
+        self._tracked = False           # 触发器齐全: 版本号覆盖所有写入
+        self._schema_ready = False
+        self._loaded = False            # 至少成功加载过一次 (之前的读取需要等首次加载)
+        self._next_check = 0.0
+        self._loaded_at = 0.0
+        self.stats = {'checks': 0, 'reloads': 0, 'errors': 0}
+
+    def _cursor(self):
+        if self._conn is None:
+            cfg = dict(self.db_config or get_db_config())
+            # 通用库配置的超时是给业务查询的, 这里收紧到读取路径能接受的上限
+            for key, limit in (('connect_timeout', CONNECT_TIMEOUT_S), ('read_timeout', READ_TIMEOUT_S),
+                               ('write_timeout', READ_TIMEOUT_S)):
+                cfg[key] = min(cfg.get(key) or limit, limit)
+            # autocommit: 长连接每次查询都看到最新提交 (REPEATABLE READ 下否则一直是旧快照)
+            self._conn = pymysql.connect(**cfg, charset='utf8mb4', autocommit=True)
+        else:
+            self._conn.ping(reconnect=True)
+        return self._conn.cursor()
+
+    def _close(self) -> None:
+        try:
+            if self._conn is not None:
+                self._conn.close()
+        except Exception:
+            pass
+        self._conn = None
+
+    def _refresh(self) -> None:
+        """调用方持有 _lock"""
+        now = time.monotonic()
+        if now < self._next_check:
+            return
+        self._next_check = now + self.check_interval_s
+        self.stats['checks'] += 1
+        try:
+            with self._cursor() as cur:
+                if not self._schema_ready:
+                    self._tracked = ensure_settings_version(cur)
+                    self._schema_ready = True
+                cur.execute("SELECT version FROM settings_version WHERE id = 1")
+                row = cur.fetchone()
+                version = int(row[0]) if row else 0
+                if version == self._version and (self._tracked or now - self._loaded_at < FALLBACK_TTL_S):
+                    return
+                # 先读版本再读表: 两次查询之间的写入会让下一次核对再重载一次, 不会漏
+                cur.execute("SELECT setting_key, setting_value FROM system_settings")
+                self._values = {k: '' if v is None else str(v) for k, v in cur.fetchall()}
+            self._version = version
+            self._loaded_at = now
+            self._loaded = True
+            self.stats['reloads'] += 1
+        except Exception as e:
+            self.stats['errors'] += 1
+            self._next_check = now + ERROR_BACKOFF_S
+            logger.warning(f"[settings_store] 读取 system_settings 失败, 沿用上一份快照: {e}")
+            self._close()
+
+    def snapshot(self) -> Mapping[str, str]:
+        """
+        当前全部配置 (原始字符串). 重载时整体替换, 返回的 dict 不会被原地修改, 调用方也不要改
+
+        其它线程正在核对/重载时不等待, 直接返回当前快照 (首次加载完成前除外)
+        """
+        if self._lock.acquire(blocking=not self._loaded):
+            try:
+                self._refresh()
+            finally:
+                self._lock.release()
+        return self._values
+
+    def get(self, key: str, default: Optional[str] = None) -> Optional[str]:
+        return self.snapshot().get(key, default)
+
+    def invalidate(self) -> None:
+        """下一次读取强制核对版本并整表重载"""
+        with self._lock:
+            self._version = None
+            self._next_check = 0.0
+
+    def bump(self, cursor=None) -> None:
+        """
+        版本号 +1 并作废本进程快照. 传入 cursor 时在调用方事务内执行 (随写入一起提交).
+        触发器已覆盖所有写入, 这里保证无触发器时本进程之外也能秒级感知.
+        """
+        try:
+            if cursor is not None:
+                cursor.execute(_BUMP_SQL)
+            else:
+                with self._lock:
+                    with self._cursor() as cur:
+                        if not self._schema_ready:
+                            self._tracked = ensure_settings_version(cur)
+                            self._schema_ready = True
+                        cur.execute(_BUMP_SQL)
+        except Exception as e:
+            logger.warning(f"[settings_store] settings_version 更新失败: {e}")
+            with self._lock:
+                self._close()
+        self.invalidate()
+
+    def get_stats(self) -> dict:
+        return {**self.stats, 'version': self._version, 'tracked': self._tracked, 'keys': len(self._values)}
+
+
+_global_settings_store: Optional[SettingsStore] = None
+_init_lock = threading.Lock()
+
+
+def get_settings_store() -> SettingsStore:
+    """本进程配置缓存 (首次调用时创建, 连接懒建立)"""
+    global _global_settings_store
+    if _global_settings_store is None:
+        with _init_lock:
+            if _global_settings_store is None:
+                _global_settings_store = SettingsStore()
+    return _global_settings_store
+
+
+def get_setting_value(key: str, default: Optional[str] = None) -> Optional[str]:
+    """单个配置项原始字符串"""
+    return get_settings_store().get(key, default)
+
+
+def notify_settings_changed(cursor=None) -> None:
+    """写 system_settings 之后调用 (或传入写入所用 cursor, 在提交前调用)"""
+    get_settings_store().bump(cursor)
@@ -0,0 +1,332 @@
+"""
+跨进程共享价格表 (mmap + 每槽 seqlock)
+
+BinanceDataHub 只在 main.py 进程里; smart_trader / scheduler / fast_collector 之前每次
+get_price_sync 都经 HubHttpProxy 走一次 localhost HTTP (3-5s 超时, API 进程忙时一起变慢).
+现在 hub 把 ticker / premiumIndex / WS 价格写进一个内存映射文件, 其他进程只读映射后直接查:
+
+    header (64B) | symbol 索引 (capacity × 32B, 只追加) | 槽位 (capacity × 64B)
+
+- symbol 索引只追加: 写入方先写名字再把 count +1, 读方发现 count 变大时增量读名字
+- 每个槽位一个 seqlock 序号: 写前 +1 (奇数 = 写入中), 写完再 +1; 读方前后两次序号相同且为偶数才算读到完整的一组
+- 每类价格带自己的时间戳 (time.time()), 过期判断与 hub 内缓存同口径
+- 只有 hub 进程写; 写入方重启时沿用同一文件 (布局不符才原子替换), 读方按 inode 变化重新映射
+
+一次查价在读方是一次 struct.unpack_from (~1µs), 不依赖 API 进程是否空闲.
+"""
+from __future__ import annotations
+
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from loguru import logger
+
+MAGIC = b"CAPXTBL1"
+VERSION = 1
+DEFAULT_CAPACITY = 2048
+NAME_BYTES = 32
+HEADER_BYTES = 64
+
+# header: magic, version, capacity, count, writer_pid, heartbeat(time.time())
+_HEADER = struct.Struct("<8sIIII8xd24x")
+# 槽位: seq, ticker, ticker_ts, mark, mark_ts, funding_rate, ws, ws_ts
+_SLOT = struct.Struct("<Q7d")
+SLOT_BYTES = _SLOT.size
+_SEQ = struct.Struct("<Q")
+
+_SLOT_DTYPE = np.dtype([
+    ("seq", "<u8"),
+    ("ticker", "<f8"), ("ticker_ts", "<f8"),
+    ("mark", "<f8"), ("mark_ts", "<f8"),
+    ("funding", "<f8"),
+    ("ws", "<f8"), ("ws_ts", "<f8"),
+])
+assert _SLOT_DTYPE.itemsize == SLOT_BYTES and _HEADER.size == HEADER_BYTES
+
+# 价格种类 -> (价格字段, 时间戳字段) 在 _SLOT 解包结果中的下标
+_FIELDS = {"ticker": (1, 2), "mark": (3, 4), "ws": (6, 7)}
+
+_REATTACH_CHECK_S = 5.0
+
+
+def default_table_path() -> str:
+    """SHARED_PRICE_TABLE_PATH 优先; 否则 /dev/shm (没有则系统临时目录)"""
+    path = os.environ.get("SHARED_PRICE_TABLE_PATH")
+    if path:
+        return path
+    base = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+    return os.path.join(base, "crypto_analyzer_price_table")
+
+
+def _file_size(capacity: int) -> int:
+    return HEADER_BYTES + capacity * (NAME_BYTES + SLOT_BYTES)
+
+
+class SharedPriceTable:
+    """共享价格表. writer 由 hub 进程打开 (open_writer), 其他进程 attach 只读"""
+
+    def __init__(self, path: str, mm: mmap.mmap, capacity: int, writable: bool, inode: int):
+        self.path = path
+        self.capacity = capacity
+        self.writable = writable
+        self._mm = mm
+        self._inode = inode
+        self._names_off = HEADER_BYTES
+        self._slots_off = HEADER_BYTES + capacity * NAME_BYTES
+        self._index: Dict[str, int] = {}
+        self._known = 0
+        self._lock = threading.Lock()
+        self._last_reattach_check = time.monotonic()
+        self._slots = (
+            np.ndarray((capacity,), dtype=_SLOT_DTYPE, buffer=mm, offset=self._slots_off)
+            if writable else None
+        )
+        self._refresh_index()
+
+    # ── 打开 / 挂载 ─────────────────────────────────────────
+
+    @classmethod
+    def open_writer(cls, path: Optional[str] = None, capacity: int = DEFAULT_CAPACITY) -> "SharedPriceTable":
+        """hub 进程调用: 布局一致的已有文件原样沿用 (symbol 槽位不变), 否则新建后原子替换"""
+        path = path or default_table_path()
+        size = _file_size(capacity)
+        if not cls._valid_file(path, capacity):
+            tmp = f"{path}.{os.getpid()}.tmp"
+            with open(tmp, "wb") as f:
+                f.truncate(size)
+                f.write(_HEADER.pack(MAGIC, VERSION, capacity, 0, os.getpid(), time.time()))
+            os.replace(tmp, path)
+        fd = os.open(path, os.O_RDWR)
+        try:
+            mm = mmap.mmap(fd, size, access=mmap.ACCESS_WRITE)
+            inode = os.fstat(fd).st_ino
+        finally:
+            os.close(fd)
+        table = cls(path, mm, capacity, writable=True, inode=inode)
+        table._write_header()
+        return table
+
+    @classmethod
+    def attach(cls, path: Optional[str] = None) -> Optional["SharedPriceTable"]:
+        """只读挂载; 文件不存在 / 布局不认识返回 None"""
+        path = path or default_table_path()
+        try:
+            fd = os.open(path, os.O_RDONLY)
+        except OSError:
+            return None
+        try:
+            st = os.fstat(fd)
+            if st.st_size < HEADER_BYTES:
+                return None
+            mm = mmap.mmap(fd, st.st_size, access=mmap.ACCESS_READ)
+        finally:
+            os.close(fd)
+        magic, version, capacity, _, _, _ = _HEADER.unpack_from(mm, 0)
+        if magic != MAGIC or version != VERSION or st.st_size < _file_size(capacity):
+            mm.close()
+            return None
+        return cls(path, mm, capacity, writable=False, inode=st.st_ino)
+
+    @staticmethod
+    def _valid_file(path: str, capacity: int) -> bool:
+        try:
+            with open(path, "rb") as f:
+                head = f.read(HEADER_BYTES)
+            size = os.path.getsize(path)
+        except OSError:
+            return False
+        if len(head) < HEADER_BYTES:
+            return False
+        magic, version, cap, _, _, _ = _HEADER.unpack(head)
+        return magic == MAGIC and version == VERSION and cap == capacity and size == _file_size(capacity)
+
+    def close(self) -> None:
+        self._slots = None
+        try:
+            self._mm.close()
+        except Exception:
+            pass
+
+    # ── header / 索引 ───────────────────────────────────────
+
+    def _header(self) -> Tuple:
+        return _HEADER.unpack_from(self._mm, 0)
+
+    def _write_header(self) -> None:
+        _HEADER.pack_into(self._mm, 0, MAGIC, VERSION, self.capacity, self._known, os.getpid(), time.time())
+
+    def heartbeat(self) -> None:
+        self._write_header()
+
+    def writer_age(self) -> Optional[float]:
+        """距写入方最后一次心跳的秒数"""
+        hb = self._header()[5]
+        return time.time() - hb if hb > 0 else None
+
+    def _refresh_index(self) -> None:
+        count = min(self._header()[3], self.capacity)
+        for i in range(self._known, count):
+            off = self._names_off + i * NAME_BYTES
+            name = bytes(self._mm[off:off + NAME_BYTES]).rstrip(b"\0").decode("ascii", "ignore")
+            if name:
+                self._index[name] = i
+        self._known = max(self._known, count)
+
+    def _slot(self, symbol: str) -> Optional[int]:
+        """写入方: symbol 槽位, 没有则追加 (满了返回 None)"""
+        i = self._index.get(symbol)
+        if i is not None:
+            return i
+        if self._known >= self.capacity:
+            return None
+        raw = symbol.encode("ascii", "ignore")[:NAME_BYTES]
+        i = self._known
+        off = self._names_off + i * NAME_BYTES
+        self._mm[off:off + NAME_BYTES] = raw.ljust(NAME_BYTES, b"\0")
+        self._index[symbol] = i
+        self._known = i + 1
+        self._write_header()   # 名字写完再发布 count
+        return i
+
+    def symbols(self) -> List[str]:
+        if not self.writable:
+            self._refresh_index()
+        return list(self._index)
+
+    # ── 写入 (hub 进程) ─────────────────────────────────────
+
+    def write_many(
+        self,
+        kind: str,
+        symbols: Sequence[str],
+        prices: Sequence[float],
+        ts,
+        funding: Optional[Iterable[Optional[float]]] = None,
+    ) -> int:
+        """
+        批量写一类价格 (kind: ticker / mark / ws). ts 为标量或与 symbols 等长的 time.time() 时间.
+        funding 仅 kind='mark' 时有意义 (None 写 NaN). 返回写入条数.
+        """
+        if not self.writable or kind not in _FIELDS:
+            return 0
+        price_f, ts_f = _SLOT_DTYPE.names[_FIELDS[kind][0]], _SLOT_DTYPE.names[_FIELDS[kind][1]]
+        prices = np.asarray(prices, dtype=np.float64)
+        ts_arr = np.broadcast_to(np.asarray(ts, dtype=np.float64), prices.shape)
+        fr = None
+        if funding is not None:
+            fr = np.array([np.nan if v is None else float(v) for v in funding], dtype=np.float64)
+        with self._lock:
+            slots = [self._slot(s) if s else None for s in symbols]
+            keep = np.array([i is not None for i in slots], dtype=bool)
+            if not keep.any():
+                return 0
+            idx = np.array([i for i in slots if i is not None], dtype=np.intp)
+            view = self._slots
+            view["seq"][idx] += 1               # 奇数: 写入中
+            view[price_f][idx] = prices[keep]
+            view[ts_f][idx] = ts_arr[keep]
+            if fr is not None:
+                view["funding"][idx] = fr[keep]
+            view["seq"][idx] += 1               # 偶数: 写完
+            return int(keep.sum())
+
+    def write(self, kind: str, symbol: str, price: float, ts: Optional[float] = None,
+              funding: Optional[float] = None) -> None:
+        self.write_many(kind, [symbol], [price], time.time() if ts is None else ts,
+                        funding=[funding] if kind == "mark" else None)
+
+    # ── 读取 (任意进程) ─────────────────────────────────────
+
+    def _maybe_reattached(self) -> bool:
+        """写入方原子替换了文件时返回 True (调用方应重新 attach)"""
+        now = time.monotonic()
+        if now - self._last_reattach_check < _REATTACH_CHECK_S:
+            return False
+        self._last_reattach_check = now
+        try:
+            return os.stat(self.path).st_ino != self._inode
+        except OSError:
+            return False
+
+    def read(self, symbol: str) -> Optional[Tuple[float, ...]]:
+        """(ticker, ticker_ts, mark, mark_ts, funding, ws, ws_ts); 没有该币种返回 None"""
+        i = self._index.get(symbol)
+        if i is None:
+            self._refresh_index()
+            i = self._index.get(symbol)
+            if i is None:
+                return None
+        off = self._slots_off + i * SLOT_BYTES
+        mm = self._mm
+        for _ in range(100):
+            rec = _SLOT.unpack_from(mm, off)
+            if rec[0] & 1 == 0 and _SEQ.unpack_from(mm, off)[0] == rec[0]:
+                return rec[1:]
+        return None   # 写入方在同一槽位上连续写入, 放弃本次读 (调用方回落)
+
+    def price(self, symbol: str, max_age_seconds: float, kinds: Sequence[str] = ("ws", "ticker")) -> Optional[float]:
+        """按 kinds 顺序取第一个未过期且 > 0 的价格"""
+        rec = self.read(symbol)
+        if rec is None:
+            return None
+        now = time.time()
+        for kind in kinds:
+            pi, ti = _FIELDS[kind]
+            p, ts = rec[pi - 1], rec[ti - 1]
+            if p > 0 and now - ts <= max_age_seconds:
+                return p
+        return None
+
+    def funding_rate(self, symbol: str) -> Optional[float]:
+        rec = self.read(symbol)
+        if rec is None or rec[4] != rec[4] or rec[3] <= 0:
+            return None
+        return rec[4]
+
+    def price_map(self, kind: str) -> Dict[str, float]:
+        """某类价格的全表快照 (symbol -> price, 只含有值的)"""
+        pi, _ = _FIELDS[kind]
+        out: Dict[str, float] = {}
+        for sym in self.symbols():
+            rec = self.read(sym)
+            if rec is not None and rec[pi - 1] > 0:
+                out[sym] = rec[pi - 1]
+        return out
+
+
+class SharedPriceReader:
+    """
+    读方封装: 懒挂载, 文件不存在时每 RETRY_S 秒重试一次, 写入方替换文件后自动重新挂载
+    """
+
+    RETRY_S = 10.0
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self._table: Optional[SharedPriceTable] = None
+        self._next_try = 0.0
+        self._lock = threading.Lock()
+
+    def table(self) -> Optional[SharedPriceTable]:
+        t = self._table
+        if t is not None and not t._maybe_reattached():
+            return t
+        with self._lock:
+            if self._table is not None and self._table is t:
+                self._table.close()
+                self._table = None
+            if self._table is None and time.monotonic() >= self._next_try:
+                try:
+                    self._table = SharedPriceTable.attach(self.path)
+                except Exception as e:
+                    logger.debug(f"[SharedPrice] 挂载失败: {e}")
+                    self._table = None
+                if self._table is None:
+                    self._next_try = time.monotonic() + self.RETRY_S
+            return self._table
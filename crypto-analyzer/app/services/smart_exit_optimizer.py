@@ -3,6 +3,7 @@
 基于实时价格监控的智能平仓策略（独立持仓，全部平仓）
 """
 import asyncio
+import time
 from datetime import datetime, timedelta
 from typing import Dict, Optional, List, Tuple
 from decimal import Decimal
@@ -19,6 +20,13 @@ from app.utils.position_time import utc_now_naive
 from app.services.midline_swing_config import is_midline_source
 from app.services.brain_config import is_brain_source
 from app.services.watchlist_config import is_watchlist_source
+from app.services.position_tick_bus import (
+    POSITION_COLUMNS,
+    MaxProfitWriter,
+    PositionTable,
+    PriceTickBus,
+)
+from app.services.exit_rules import CloseIntent, ExitEngine, check_hard_trigger
 
 
 def _is_smart_exit_excluded_source(source: str) -> bool:
@@ -59,6 +67,14 @@ class SmartExitOptimizer:
         # 监控状态
         self.monitoring_tasks: Dict[str, asyncio.Task] = {}  # position_id -> task
 
+        # 事件驱动监控: 持仓内存表 + WS 价格 tick 扇出 + 最高盈利批量落库
+        self.position_table = PositionTable(self._get_pool_connection)
+        self.tick_bus = PriceTickBus(price_service)
+        self.max_profit_writer = MaxProfitWriter(self._get_pool_connection)
+        self._housekeeping_task: Optional[asyncio.Task] = None
+        # 平仓去重: 与 PositionSLTPMonitor 共用出场规则引擎的跨进程 claim
+        self.exit_engine = ExitEngine(self._get_pool_connection, "smart_exit")
+
         # 智能平仓计划
         self.exit_plans: Dict[int, Dict] = {}  # position_id -> exit_plan
 
@@ -128,6 +144,12 @@ class SmartExitOptimizer:
             )
             return
 
+        # 开仓事件: 持仓进入内存表, 之后监控循环不再逐轮读库
+        if position:
+            self.position_table.put(position)
+            await self.tick_bus.register(position_id, position['symbol'])
+        self._ensure_housekeeping()
+
         # 创建独立监控任务
         task = asyncio.create_task(self._monitor_position(position_id))
         self.monitoring_tasks[position_id] = task
@@ -163,11 +185,52 @@ class SmartExitOptimizer:
             if position_id in self.price_samples:
                 del self.price_samples[position_id]
 
+            self._release_position(position_id)
+
             logger.info(f"⏹️ 停止监控持仓 {position_id}")
 
+    def _release_position(self, position_id: int):
+        """平仓事件: 移出内存表与 tick 订阅"""
+        self.position_table.remove(position_id)
+        self.tick_bus.unregister(position_id)
+        self.max_profit_writer.discard(position_id)
+
+    def _ensure_housekeeping(self):
+        """启动 (或重启已退出的) 对账/批量写入任务"""
+        if self._housekeeping_task is None or self._housekeeping_task.done():
+            self._housekeeping_task = asyncio.create_task(self._housekeeping_loop())
+
+    async def _housekeeping_loop(self):
+        """
+        每秒一次: 最高盈利到期批量落库; 内存持仓表到期与 DB 对账 (外部平仓/改止盈止损).
+        无监控持仓时退出, 下次开始监控再启动.
+        """
+        last_report = time.monotonic()
+        while self.monitoring_tasks or len(self.position_table):
+            await asyncio.sleep(1)
+            try:
+                self.max_profit_writer.flush()
+                self.position_table.resync()
+            except Exception as e:
+                logger.warning(f"[SmartExit] 持仓表对账/批量写入失败: {e}")
+            if time.monotonic() - last_report >= 600:
+                last_report = time.monotonic()
+                logger.info(
+                    f"[SmartExit] 事件驱动监控: {len(self.position_table)} 个持仓 | "
+                    f"tick {self.tick_bus.stats['ticks']} 唤醒 {self.tick_bus.stats['wakeups']} "
+                    f"超时回落 {self.tick_bus.stats['timeouts']}"
+                )
+        try:
+            self.max_profit_writer.flush(force=True)
+        except Exception as e:
+            logger.warning(f"[SmartExit] 最高盈利落库失败: {e}")
+
     async def _monitor_position(self, position_id: int):
         """
-        持仓监控主循环（实时价格监控）
+        持仓监控主循环（事件驱动）
+
+        持仓信息取自内存表 (开始监控时读库一次, 之后由批量对账同步);
+        WS 价格 tick 到达即做一次平仓检查, 无 tick 时按持仓时长 1-10s 回落 DataHub 取价.
 
         Args:
             position_id: 持仓ID
@@ -175,7 +238,7 @@ class SmartExitOptimizer:
         try:
             while True:
                 # 获取持仓信息
-                position = await self._get_position(position_id)
+                position = self.position_table.get(position_id)
 
                 if not position:
                     logger.info(f"持仓 {position_id} 不存在，停止监控")
@@ -201,11 +264,17 @@ class SmartExitOptimizer:
                 if position.get('planned_close_time') and utc_now_naive() >= position['planned_close_time']:
                     close_price = await self._resolve_expiry_close_price(position)
                     logger.warning(f"[到期平仓] 持仓{position_id} {position['symbol']} 持有到期，强制平仓 @ {close_price}")
-                    await self._execute_close(position_id, close_price, f"计划平仓时间到期强制平仓")
-                    break
+                    if await self._execute_close(position_id, close_price, f"计划平仓时间到期强制平仓"):
+                        break
+                    await self.tick_bus.wait(position_id, timeout=2)
+                    continue
 
-                # 获取实时价格
-                current_price = await self._get_realtime_price(position['symbol'])
+                # 获取实时价格 (刚到达的 WS tick 优先, 否则走 DataHub)
+                tick_price = self.tick_bus.latest_price(position['symbol'])
+                if tick_price is not None:
+                    current_price = Decimal(str(tick_price))
+                else:
+                    current_price = await self._get_realtime_price(position['symbol'])
 
                 # 如果无法获取价格，跳过本次检查
                 if current_price is None:
@@ -239,8 +308,10 @@ class SmartExitOptimizer:
                         f"🚨 触发兜底平仓: 持仓{position_id} {position['symbol']} "
                         f"{position['direction']} | {reason}"
                     )
-                    await self._execute_close(position_id, current_price, reason)
-                    break
+                    if await self._execute_close(position_id, current_price, reason):
+                        break
+                    await self.tick_bus.wait(position_id, timeout=2)
+                    continue
 
                 # === K线强度衰减 / 智能平仓窗口 (需 smart_exit_enabled) ===
                 if self._is_smart_exit_enabled():
@@ -254,8 +325,10 @@ class SmartExitOptimizer:
                             logger.info(
                                 f"📊 K线强度衰减触发平仓: 持仓{position_id} {position['symbol']} | {reason}"
                             )
-                            await self._execute_close(position_id, current_price, reason)
-                            break
+                            if await self._execute_close(position_id, current_price, reason):
+                                break
+                            await self.tick_bus.wait(position_id, timeout=2)
+                            continue
 
                     exit_completed = await self._smart_exit(
                         position_id, position, current_price, profit_info
@@ -267,8 +340,8 @@ class SmartExitOptimizer:
                     logger.info(f"✅ 智能平仓完成: 持仓{position_id}")
                     break
 
-                # 🔥 L1: 监控频率随持仓时间递减
-                # 持仓越久，仓位越稳定，监控频率可以降低，减少CPU和DB开销
+                # 🔥 L1: 无 tick 时的轮询间隔随持仓时间递减
+                # 持仓越久，仓位越稳定，兜底轮询可以降低，减少CPU和DataHub开销
                 try:
                     _open_time = position.get('open_time')
                     if _open_time:
@@ -293,7 +366,8 @@ class SmartExitOptimizer:
                 else:                        # > 4h: 极低频（趋势已明确）
                     _sleep_sec = 10
 
-                await asyncio.sleep(_sleep_sec)
+                # 等待下一个价格 tick (超时即按原节奏兜底检查一次)
+                await self.tick_bus.wait(position_id, timeout=_sleep_sec)
 
         except asyncio.CancelledError:
             logger.info(f"监控任务被取消: 持仓 {position_id}")
@@ -302,9 +376,13 @@ class SmartExitOptimizer:
         finally:
             # 任务自然结束或异常结束时，从 monitoring_tasks 中移除自己
             # 避免健康检查因 db_count != monitoring_count 误触发重启
-            if position_id in self.monitoring_tasks:
-                del self.monitoring_tasks[position_id]
-                logger.debug(f"监控任务自清理: 持仓 {position_id}")
+            # (已被新任务接管的持仓不动, 避免把新任务的内存表/订阅一起清掉)
+            owner = self.monitoring_tasks.get(position_id)
+            if owner is None or owner is asyncio.current_task():
+                if owner is not None:
+                    del self.monitoring_tasks[position_id]
+                    logger.debug(f"监控任务自清理: 持仓 {position_id}")
+                self._release_position(position_id)
             # 清理该持仓的亏损计时记录，防止内存泄漏
             keys_to_delete = [k for k in self._loss_onset_times if k.startswith(f"{position_id}:")]
             for k in keys_to_delete:
@@ -326,19 +404,10 @@ class SmartExitOptimizer:
             conn = self._get_pool_connection()
             cursor = conn.cursor(dictionary=True)
 
-            cursor.execute("""
-                SELECT
-                    id, symbol, position_side as direction, status,
-                    avg_entry_price, quantity as position_size,
-                    entry_signal_time, open_time, planned_close_time,
-                    close_extended, extended_close_time,
-                    max_profit_pct, max_profit_price, max_profit_time,
-                    stop_loss_price, take_profit_price, leverage,
-                    margin, entry_price, max_hold_minutes, timeout_at, created_at,
-                    source
-                FROM futures_positions
-                WHERE id = %s
-            """, (position_id,))
+            cursor.execute(
+                f"SELECT {POSITION_COLUMNS} FROM futures_positions WHERE id = %s",
+                (position_id,),
+            )
 
             return cursor.fetchone()
 
@@ -501,53 +570,15 @@ class SmartExitOptimizer:
 
     async def _update_max_profit(self, position_id: int, profit_info: Dict):
         """
-        更新最高盈利记录（原子操作，避免一键平仓时锁等待超时）
+        更新最高盈利记录: 先写内存表 (移动止盈立即可见), 创新高时交给批量写入器落库
+        (条件 UPDATE 只升不降、仅 open 仓位, 一键平仓时不会锁等待)
         """
-        conn = None
-        cursor = None
-        try:
-            conn = self._get_pool_connection()
-            cursor = conn.cursor()
-
-            # 短锁等待超时(2s)：平仓时行锁被占用则快速失败，不阻塞监控循环
-            cursor.execute("SET innodb_lock_wait_timeout = 2")
-
-            # 原子条件更新：仅在盈利更高且仓位仍开放时写入，无需先 SELECT
-            cursor.execute("""
-                UPDATE futures_positions
-                SET
-                    max_profit_pct   = %s,
-                    max_profit_price = %s,
-                    max_profit_time  = NOW()
-                WHERE id = %s
-                  AND status = 'open'
-                  AND (max_profit_pct IS NULL OR max_profit_pct < %s)
-            """, (
-                profit_info['profit_pct'],
-                profit_info['current_price'],
-                position_id,
-                profit_info['profit_pct']
-            ))
-            conn.commit()
-
-        except Exception as e:
-            if conn:
-                try:
-                    conn.rollback()
-                except Exception:
-                    pass
-            logger.debug(f"更新最高盈利跳过: 持仓{position_id} - {e}")
-        finally:
-            if cursor:
-                try:
-                    cursor.close()
-                except Exception:
-                    pass
-            if conn:
-                try:
-                    conn.close()
-                except Exception:
-                    pass
+        if self.position_table.record_max_profit(
+            position_id, profit_info['profit_pct'], profit_info['current_price']
+        ):
+            self.max_profit_writer.record(
+                position_id, profit_info['profit_pct'], profit_info['current_price']
+            )
 
     async def _check_exit_conditions(
         self,
@@ -578,35 +609,30 @@ class SmartExitOptimizer:
 
         # ========== 优先级最高：止损止盈检查（任何时候都检查） ==========
 
-        # 检查止损价格（须相对入场价方向正确）
-        stop_loss_price = position.get('stop_loss_price')
-        entry_for_sl = position.get('entry_price')
-        if stop_loss_price and float(stop_loss_price) > 0 and entry_for_sl:
-            stop_loss_price = Decimal(str(stop_loss_price))
-            entry_price = Decimal(str(entry_for_sl))
-            direction = position['direction']
-
-            if direction == 'LONG':
-                if stop_loss_price < entry_price and current_price <= stop_loss_price:
-                    return True, f"止损(价格{current_price:.8f} <= 止损价{stop_loss_price:.8f}, 价格变化{profit_pct:.2f}%, ROI {roi_pct:.2f}%)"
-            else:  # SHORT
-                if stop_loss_price > entry_price and current_price >= stop_loss_price:
-                    return True, f"止损(价格{current_price:.8f} >= 止损价{stop_loss_price:.8f}, 价格变化{profit_pct:.2f}%, ROI {roi_pct:.2f}%)"
-
-        # 检查止盈价格（须相对入场价方向正确，避免限价转市价遗留的失真 TP）
-        take_profit_price = position.get('take_profit_price')
-        entry_price_val = position.get('entry_price')
-        if take_profit_price and float(take_profit_price) > 0 and entry_price_val:
-            take_profit_price = Decimal(str(take_profit_price))
-            entry_price = Decimal(str(entry_price_val))
-            direction = position['direction']
-
+        # 止损止盈须相对入场价方向正确（避免限价转市价遗留的失真 SL/TP），判定与 SL/TP 监控同口径
+        direction = position['direction']
+        entry_val = position.get('entry_price')
+        sl_val = position.get('stop_loss_price')
+        tp_val = position.get('take_profit_price')
+        if entry_val:
+            entry_f = float(entry_val)
+            sl_f = float(sl_val) if sl_val and float(sl_val) > 0 else None
+            tp_f = float(tp_val) if tp_val and float(tp_val) > 0 else None
             if direction == 'LONG':
-                if take_profit_price > entry_price and current_price >= take_profit_price:
-                    return True, f"止盈(价格{current_price:.8f} >= 止盈价{take_profit_price:.8f}, 价格变化{profit_pct:.2f}%, ROI {roi_pct:.2f}%)"
-            else:  # SHORT
-                if take_profit_price < entry_price and current_price <= take_profit_price:
-                    return True, f"止盈(价格{current_price:.8f} <= 止盈价{take_profit_price:.8f}, 价格变化{profit_pct:.2f}%, ROI {roi_pct:.2f}%)"
+                sl_f = sl_f if sl_f is not None and sl_f < entry_f else None
+                tp_f = tp_f if tp_f is not None and tp_f > entry_f else None
+            else:
+                sl_f = sl_f if sl_f is not None and sl_f > entry_f else None
+                tp_f = tp_f if tp_f is not None and tp_f < entry_f else None
+            trig = check_hard_trigger(direction, float(current_price), sl_f, tp_f)
+            if trig:
+                kind, trig_price = trig
+                trig_price = Decimal(str(trig_price))
+                if kind == "stop_loss":
+                    op = '<=' if direction == 'LONG' else '>='
+                    return True, f"止损(价格{current_price:.8f} {op} 止损价{trig_price:.8f}, 价格变化{profit_pct:.2f}%, ROI {roi_pct:.2f}%)"
+                op = '>=' if direction == 'LONG' else '<='
+                return True, f"止盈(价格{current_price:.8f} {op} 止盈价{trig_price:.8f}, 价格变化{profit_pct:.2f}%, ROI {roi_pct:.2f}%)"
 
         if not self._is_smart_exit_enabled():
             return False, ""
@@ -714,8 +740,7 @@ class SmartExitOptimizer:
             )
             # 获取当前价格，拿不到就用 mark_price 或 entry_price 兜底
             cp = await self._resolve_expiry_close_price(position)
-            await self._execute_close(position_id, cp, "超时强制平仓")
-            return True
+            return await self._execute_close(position_id, cp, "超时强制平仓")
 
         # 如果还未到监控时间，直接返回
         if now < monitoring_start_time:
@@ -786,8 +811,9 @@ class SmartExitOptimizer:
         )
 
         if should_exit:
-            # 一次性平仓100%
-            await self._execute_close(position_id, current_price, reason)
+            # 一次性平仓100% (claim 落败 / 平仓失败时保留计划, 下一轮重试)
+            if not await self._execute_close(position_id, current_price, reason):
+                return False
             exit_plan['closed'] = True
 
             logger.info(
@@ -897,7 +923,7 @@ class SmartExitOptimizer:
 
         return False, ""
 
-    async def _execute_close(self, position_id: int, current_price: Decimal, reason: str):
+    async def _execute_close(self, position_id: int, current_price: Decimal, reason: str) -> bool:
         """
         执行平仓操作
 
@@ -905,6 +931,10 @@ class SmartExitOptimizer:
             position_id: 持仓ID
             current_price: 当前价格
             reason: 平仓原因
+
+        Returns:
+            是否已平仓 (持仓已不存在也算); claim 落败 / 平仓失败返回 False, 调用方继续监控,
+            待对方平完后由持仓状态退出, 或 claim 过期后重试
         """
         # 🔥 M3: close_reason_code枚举，用于后续分析各退出策略效果
         CLOSE_REASON_CODE = {
@@ -937,7 +967,14 @@ class SmartExitOptimizer:
 
             if not position:
                 logger.error(f"持仓 {position_id} 不存在，无法平仓")
-                return
+                return True
+
+            # 统一出口: SL/TP 监控已在平同一持仓 (claim 有效期内) 则不重复下单
+            intent = CloseIntent(
+                position_id, position['symbol'], position['direction'], reason, float(current_price),
+            )
+            if not self.exit_engine.claim(intent):
+                return False
 
             logger.info(
                 f"🔴 执行平仓: 持仓{position_id} {position['symbol']} "
@@ -987,11 +1024,13 @@ class SmartExitOptimizer:
 
                 # 停止监控
                 await self.stop_monitoring_position(position_id)
-            else:
-                logger.error(f"平仓失败: 持仓{position_id} | {close_result.get('error')}")
+                return True
+            logger.error(f"平仓失败: 持仓{position_id} | {close_result.get('error')}")
+            return False
 
         except Exception as e:
             logger.error(f"执行平仓异常: {e}")
+            return False
 
     async def _close_live_positions_on_exchange(
         self,
@@ -1173,11 +1212,12 @@ class SmartExitOptimizer:
 
             # 先获取持仓的 entry_price 以计算闭仓时刻的 profit_pct
             cursor.execute(
-                "SELECT entry_price, position_side FROM futures_positions WHERE id=%s",
+                "SELECT entry_price, position_side, close_time FROM futures_positions WHERE id=%s",
                 (position_id,)
             )
             pos_row = cursor.fetchone()
             profit_pct_at_close = 0.0
+            previous_close_time = pos_row[2] if pos_row else None
             if pos_row:
                 ep = float(pos_row[0] or 0)
                 if ep > 0:
@@ -1216,6 +1256,10 @@ class SmartExitOptimizer:
 
             conn.commit()
 
+            # 平仓时间 / 盈亏被覆盖, 复盘汇总按新旧小时重算
+            from app.services.pnl_rollup import refresh_position_rollup
+            refresh_position_rollup(conn, position_id, previous_close_time)
+
         except Exception as e:
             logger.error(f"更新持仓状态失败: {e}")
         finally:
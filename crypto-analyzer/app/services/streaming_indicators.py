@@ -0,0 +1,527 @@
+"""
+增量 (流式) 技术指标
+
+CacheUpdateService 每 5 分钟用最近 200 根 K 线把全部指标整段重算一遍, 而期间只收盘了一根.
+本模块为每个 (symbol, timeframe) 保存一份指标状态, K 线收盘时 O(1) 推进一根:
+
+- EMA / MACD: 首根收盘价起步, 之后递推 (pandas ewm(adjust=False))
+- RSI / ATR: 最近 period 个涨跌幅 / 真实波幅的滚动均值
+- 布林带 / MA / 成交量均线: 定长窗口 + 滚动和 / 平方和
+- KDJ: 最近 9 根最高/最低 + K/D 递推
+
+WSKlineCollector 落盘后调用 on_klines() 推进, 结果连同状态快照写回 technical_indicators_cache
+(stream_state / stream_open_time 两列); 重启时 resume() 从快照续算, 只回放快照之后落盘的 K 线.
+跟踪中的 (symbol, timeframe) 由本模块负责, CacheUpdateService 跳过 (见 is_stream_fresh).
+
+口径同 TechnicalIndicators.analyze() 手动分支 / indicator_engine.compute_technical_batch:
+ema(seed='first') / rsi('sma') / macd(seed='first') / atr('sma') / bollinger / kdj(seed=None),
+同一段 K 线流式推进的结果与 analyze() 一致, 校验见 scripts/validate_streaming_indicators.py.
+"""
+from __future__ import annotations
+
+import json
+import threading
+import time
+from collections import defaultdict, deque
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import pymysql
+from loguru import logger
+
+from app.analyzers.technical_indicators import TechnicalIndicators
+from app.services.kline_store import EXCHANGE, timeframe_to_ms
+from app.services.technical_indicators_cache import (
+    build_technical_cache_row,
+    ensure_stream_columns,
+    upsert_stream_rows,
+)
+
+
+STREAM_TIMEFRAMES: Tuple[str, ...] = ('5m', '15m')   # 与 WS 采集周期一致
+WARMUP_BARS = 200           # 无快照 / 快照过旧时用最近 N 根重建 (同 CacheUpdateService 的 limit)
+MIN_BARS = 50               # 与 analyze() 相同, 不足则不写缓存
+FRESH_BARS = 3              # stream_open_time 落后不超过 N 根视为仍在跟踪
+SNAPSHOT_VERSION = 2
+_RESYNC_EVERY = 1000        # 滚动和每推进 N 次按窗口重算一次, 消除浮点累计误差
+
+
+def _dump(obj) -> dict:
+    out = {}
+    for name in obj.__slots__:
+        v = getattr(obj, name)
+        if isinstance(v, deque):
+            v = list(v)
+        elif hasattr(v, '__slots__'):
+            v = _dump(v)
+        out[name] = v
+    return out
+
+
+def _load(obj, data: dict) -> None:
+    for name in obj.__slots__:
+        cur = getattr(obj, name)
+        if isinstance(cur, deque):
+            setattr(obj, name, deque(data[name], maxlen=cur.maxlen))
+        elif hasattr(cur, '__slots__'):
+            _load(cur, data[name])
+        else:
+            setattr(obj, name, data[name])
+
+
+class _Smoother:
+    """y += alpha * (x - y), 首个值起步 (pandas ewm(adjust=False))"""
+    __slots__ = ('alpha', 'value')
+
+    def __init__(self, alpha: float):
+        self.alpha = alpha
+        self.value: Optional[float] = None
+
+    def update(self, x: float) -> float:
+        if self.value is None:
+            self.value = x
+        else:
+            self.value += self.alpha * (x - self.value)
+        return self.value
+
+
+def _ema(period: int) -> _Smoother:
+    return _Smoother(2.0 / (period + 1))
+
+
+class _Window:
+    """定长窗口 + 滚动和 / 平方和 (以 shift 为原点, 减少大数相消的精度损失)"""
+    __slots__ = ('values', 'shift', 's', 'ss', 'pushes')
+
+    def __init__(self, period: int):
+        self.values: deque = deque(maxlen=period)
+        self.shift: Optional[float] = None
+        self.s = 0.0
+        self.ss = 0.0
+        self.pushes = 0
+
+    @property
+    def full(self) -> bool:
+        return len(self.values) == self.values.maxlen
+
+    def push(self, x: float) -> None:
+        if self.shift is None:
+            self.shift = x
+        if self.full:
+            old = self.values[0] - self.shift
+            self.s -= old
+            self.ss -= old * old
+        self.values.append(x)
+        d = x - self.shift
+        self.s += d
+        self.ss += d * d
+        self.pushes += 1
+        if self.pushes % _RESYNC_EVERY == 0:
+            self._resync()
+
+    def _resync(self) -> None:
+        n = len(self.values)
+        self.shift = sum(self.values) / n
+        self.s = sum(v - self.shift for v in self.values)
+        self.ss = sum((v - self.shift) ** 2 for v in self.values)
+
+    def mean(self) -> Optional[float]:
+        if not self.full:
+            return None
+        return self.shift + self.s / len(self.values)
+
+    def std(self) -> Optional[float]:
+        """样本标准差 (ddof=1, 同 pandas rolling.std)"""
+        n = len(self.values)
+        if not self.full or n < 2:
+            return None
+        var = (self.ss - self.s * self.s / n) / (n - 1)
+        return max(var, 0.0) ** 0.5
+
+
+class IndicatorState:
+    """单个 (symbol, timeframe) 的全部指标状态, 参数取自 TechnicalIndicators"""
+    __slots__ = (
+        'open_time', 'bars', 'close', 'volume', 'vol_change', 'bb_std',
+        'ema_short', 'ema_long', 'ema10', 'ema5', 'ma10', 'ma5',
+        'macd_fast', 'macd_slow', 'macd_dea', 'macd', 'macd_signal', 'prev_macd', 'prev_macd_signal',
+        'rsi_gain', 'rsi_loss', 'atr', 'bb',
+        'kdj_high', 'kdj_low', 'kdj_k', 'kdj_d',
+        'vol_ma5', 'vol_ma20',
+    )
+
+    KDJ_PERIOD = 9
+    KDJ_SIGNAL = 3
+    ATR_PERIOD = 14
+
+    def __init__(self, analyzer: TechnicalIndicators):
+        a = analyzer
+        self.open_time = 0
+        self.bars = 0
+        self.close: Optional[float] = None
+        self.volume: Optional[float] = None
+        self.vol_change: Optional[float] = None
+        self.ema_short = _ema(a.ema_short)
+        self.ema_long = _ema(a.ema_long)
+        self.ema10 = _ema(a.ema_ma_period)
+        self.ema5 = _ema(a.ema5_period)
+        self.ma10 = _Window(a.ma_period)
+        self.ma5 = _Window(a.ma5_period)
+        self.macd_fast = _ema(a.macd_fast)
+        self.macd_slow = _ema(a.macd_slow)
+        self.macd_dea = _ema(a.macd_signal)
+        self.macd: Optional[float] = None
+        self.macd_signal: Optional[float] = None
+        self.prev_macd: Optional[float] = None
+        self.prev_macd_signal: Optional[float] = None
+        self.rsi_gain = _Window(a.rsi_period)
+        self.rsi_loss = _Window(a.rsi_period)
+        self.atr = _Window(self.ATR_PERIOD)
+        self.bb = _Window(a.bb_period)
+        self.bb_std = float(a.bb_std)
+        self.kdj_high: deque = deque(maxlen=self.KDJ_PERIOD)
+        self.kdj_low: deque = deque(maxlen=self.KDJ_PERIOD)
+        self.kdj_k: Optional[float] = None
+        self.kdj_d: Optional[float] = None
+        self.vol_ma5 = _Window(5)
+        self.vol_ma20 = _Window(20)
+
+    @staticmethod
+    def params(analyzer: TechnicalIndicators) -> list:
+        """参数指纹, 配置变了快照作废"""
+        a = analyzer
+        return [a.ema_short, a.ema_long, a.ema_ma_period, a.ema5_period, a.ma_period, a.ma5_period,
+                a.macd_fast, a.macd_slow, a.macd_signal, a.rsi_period, a.bb_period, float(a.bb_std)]
+
+    def update(self, open_time: int, high: float, low: float, close: float, volume: float) -> bool:
+        """推进一根已收盘 K 线; 重复或更早的 K 线忽略, 返回是否推进"""
+        if open_time <= self.open_time:
+            return False
+        prev_close = self.close
+        self.open_time = open_time
+        self.bars += 1
+
+        # 均线
+        for ema in (self.ema_short, self.ema_long, self.ema10, self.ema5):
+            ema.update(close)
+        self.ma10.push(close)
+        self.ma5.push(close)
+        self.bb.push(close)
+
+        # MACD: 快慢线都从首根起步, DIF 从首根起进入 DEA
+        self.prev_macd, self.prev_macd_signal = self.macd, self.macd_signal
+        self.macd = self.macd_fast.update(close) - self.macd_slow.update(close)
+        self.macd_signal = self.macd_dea.update(self.macd)
+
+        # RSI / ATR (首根无前收: 涨跌幅按 0 计入, TR 取 high-low; 同 analyze() 的 pandas 行为)
+        if prev_close is not None:
+            delta = close - prev_close
+            self.rsi_gain.push(max(delta, 0.0))
+            self.rsi_loss.push(max(-delta, 0.0))
+            tr = max(high - low, abs(high - prev_close), abs(low - prev_close))
+        else:
+            self.rsi_gain.push(0.0)
+            self.rsi_loss.push(0.0)
+            tr = high - low
+        self.atr.push(tr)
+
+        # KDJ: 窗口最高=最低时 RSV 无定义, K 保持上一期
+        self.kdj_high.append(high)
+        self.kdj_low.append(low)
+        if len(self.kdj_high) == self.KDJ_PERIOD:
+            hh, ll = max(self.kdj_high), min(self.kdj_low)
+            alpha = 1.0 / self.KDJ_SIGNAL
+            if hh > ll:
+                rsv = (close - ll) / (hh - ll) * 100.0
+                self.kdj_k = rsv if self.kdj_k is None else self.kdj_k + alpha * (rsv - self.kdj_k)
+            if self.kdj_k is not None:
+                self.kdj_d = self.kdj_k if self.kdj_d is None else self.kdj_d + alpha * (self.kdj_k - self.kdj_d)
+
+        # 成交量
+        self.vol_ma5.push(volume)
+        self.vol_ma20.push(volume)
+        if self.volume is not None:
+            self.vol_change = (volume / self.volume - 1.0) * 100.0 if self.volume else float('nan')
+        self.close, self.volume = close, volume
+        return True
+
+    def rsi(self) -> Optional[float]:
+        """avg_loss 为 0 时返回 100 (同 indicator_engine.rsi)"""
+        gain, loss = self.rsi_gain.mean(), self.rsi_loss.mean()
+        if gain is None or loss is None:
+            return None
+        if loss <= 0:
+            return 100.0
+        return 100.0 - 100.0 / (1.0 + gain / loss)
+
+    def latest(self) -> Optional[Dict[str, float]]:
+        """当前各指标值 (列名同 indicator_engine.compute_technical_batch); 未预热完成返回 None"""
+        if self.bars < MIN_BARS or self.prev_macd_signal is None:
+            return None
+        mid, std = self.bb.mean(), self.bb.std()
+        values = {
+            'close': self.close,
+            'volume': self.volume,
+            'rsi': self.rsi(),
+            'macd': self.macd,
+            'macd_signal': self.macd_signal,
+            'macd_histogram': self.macd - self.macd_signal,
+            'bb_upper': None if std is None else mid + std * self.bb_std,
+            'bb_middle': mid,
+            'bb_lower': None if std is None else mid - std * self.bb_std,
+            'ema_short': self.ema_short.value,
+            'ema_long': self.ema_long.value,
+            'ma10': self.ma10.mean(),
+            'ema10': self.ema10.value,
+            'ma5': self.ma5.mean(),
+            'ema5': self.ema5.value,
+            'kdj_k': self.kdj_k,
+            'kdj_d': self.kdj_d,
+            'kdj_j': None if self.kdj_k is None else 3.0 * self.kdj_k - 2.0 * self.kdj_d,
+            'atr': self.atr.mean(),
+            'vol_ma5': self.vol_ma5.mean(),
+            'vol_ma20': self.vol_ma20.mean(),
+            'vol_change': self.vol_change,
+        }
+        if any(v is None for k, v in values.items() if k != 'vol_change'):
+            return None
+        if values['vol_change'] is None:
+            values['vol_change'] = float('nan')
+        return values
+
+    def previous(self) -> Dict[str, float]:
+        return {'macd': self.prev_macd, 'macd_signal': self.prev_macd_signal}
+
+    def to_snapshot(self, analyzer: TechnicalIndicators) -> dict:
+        return {'v': SNAPSHOT_VERSION, 'params': self.params(analyzer), 'state': _dump(self)}
+
+    @classmethod
+    def from_snapshot(cls, analyzer: TechnicalIndicators, snapshot: dict) -> Optional['IndicatorState']:
+        """从快照恢复; 版本或参数不符返回 None (调用方重建)"""
+        if snapshot.get('v') != SNAPSHOT_VERSION or snapshot.get('params') != cls.params(analyzer):
+            return None
+        state = cls(analyzer)
+        _load(state, snapshot['state'])
+        return state
+
+
+def _row_values(row: dict) -> Tuple[int, float, float, float, float]:
+    return (int(row['open_time']), float(row['high_price']), float(row['low_price']),
+            float(row['close_price']), float(row['volume']))
+
+
+class StreamingIndicatorService:
+    """按 (symbol, timeframe) 维护 IndicatorState, 收盘即推进并写回 technical_indicators_cache"""
+
+    def __init__(self, db_config: dict, timeframes: Iterable[str] = STREAM_TIMEFRAMES,
+                 config: Optional[dict] = None):
+        self.db_config = db_config
+        self.timeframes = tuple(timeframes)
+        self.analyzer = TechnicalIndicators(config)
+        self._states: Dict[Tuple[str, str], IndicatorState] = {}
+        self._lock = threading.Lock()
+        self._stats = {
+            'restored': 0,
+            'warmed_up': 0,
+            'gap_fills': 0,
+            'updates': 0,
+            'rows_written': 0,
+            'last_write_ms': 0.0,
+        }
+
+    def _connect(self):
+        return pymysql.connect(**self.db_config, charset='utf8mb4',
+                               cursorclass=pymysql.cursors.DictCursor, autocommit=True)
+
+    def _new_state(self) -> IndicatorState:
+        return IndicatorState(self.analyzer)
+
+    # ── 启动恢复 ─────────────────────────────────────────
+
+    def resume(self) -> int:
+        """
+        从 technical_indicators_cache 的快照恢复状态, 并回放快照之后已落盘的 K 线 (每周期 1 条 SQL).
+        无快照的币种在其第一根收盘 K 线到来时单独预热.
+
+        Returns:
+            恢复的 (symbol, timeframe) 数量
+        """
+        restored = 0
+        conn = self._connect()
+        try:
+            with conn.cursor() as cur:
+                ensure_stream_columns(cur)
+                now_ms = int(time.time() * 1000)
+                for tf in self.timeframes:
+                    floor_ms = now_ms - WARMUP_BARS * timeframe_to_ms(tf)
+                    cur.execute(
+                        "SELECT symbol, stream_state FROM technical_indicators_cache "
+                        "WHERE timeframe = %s AND stream_state IS NOT NULL AND stream_open_time >= %s",
+                        (tf, floor_ms),
+                    )
+                    states = {}
+                    for row in cur.fetchall():
+                        try:
+                            state = IndicatorState.from_snapshot(self.analyzer, json.loads(row['stream_state']))
+                        except (ValueError, KeyError, TypeError) as e:
+                            logger.debug(f"[流式指标] {row['symbol']} {tf} 快照无法解析, 重建: {e}")
+                            state = None
+                        if state is not None:
+                            states[row['symbol']] = state
+                    if not states:
+                        continue
+
+                    since = min(s.open_time for s in states.values())
+                    cur.execute(
+                        "SELECT symbol, open_time, high_price, low_price, close_price, volume "
+                        "FROM kline_data WHERE timeframe = %s AND exchange = %s AND open_time > %s "
+                        "ORDER BY open_time ASC",
+                        (tf, EXCHANGE, since),
+                    )
+                    for row in cur.fetchall():
+                        state = states.get(row['symbol'])
+                        if state is not None:
+                            state.update(*_row_values(row))
+
+                    with self._lock:
+                        for symbol, state in states.items():
+                            self._states[(symbol, tf)] = state
+                    restored += len(states)
+                    self._persist(cur, [(s, tf) for s in states])
+        finally:
+            conn.close()
+        self._stats['restored'] += restored
+        logger.info(f"[流式指标] 从快照恢复 {restored} 个 (symbol, timeframe), 周期 {self.timeframes}")
+        return restored
+
+    # ── 收盘推进 ─────────────────────────────────────────
+
+    def on_klines(self, klines: List[Dict]) -> int:
+        """
+        推进已落盘的收盘 K 线 (SmartFuturesCollector.save_klines 格式) 并写回缓存.
+        在落盘之后调用, 缺口 / 预热直接从 kline_data 补.
+
+        Returns:
+            写入 technical_indicators_cache 的行数
+        """
+        groups: Dict[Tuple[str, str], List[Dict]] = defaultdict(list)
+        for k in klines:
+            if k.get('timeframe') in self.timeframes:
+                groups[(k['symbol'], k['timeframe'])].append(k)
+        if not groups:
+            return 0
+
+        with self._lock:
+            conn = self._connect()
+            try:
+                with conn.cursor() as cur:
+                    touched = []
+                    for key, items in groups.items():
+                        items.sort(key=lambda k: k['open_time'])
+                        state = self._states.get(key)
+                        if state is None:
+                            state = self._warm_up(cur, *key)
+                        elif items[0]['open_time'] > state.open_time + timeframe_to_ms(key[1]):
+                            state = self._fill_gap(cur, state, key, items[0]['open_time'])
+                        if state is None:
+                            continue
+                        for k in items:
+                            if state.update(int(k['open_time']), float(k['high_price']), float(k['low_price']),
+                                            float(k['close_price']), float(k['volume'])):
+                                self._stats['updates'] += 1
+                        touched.append(key)
+                    return self._persist(cur, touched)
+            finally:
+                conn.close()
+
+    def _fetch_rows(self, cur, symbol: str, timeframe: str, after_ms: int = 0,
+                    before_ms: Optional[int] = None) -> List[Dict]:
+        """after_ms 之后 (不含) 的 K 线, 升序, 最多 WARMUP_BARS 根 (取最近的)"""
+        sql = ("SELECT open_time, high_price, low_price, close_price, volume FROM kline_data "
+               "WHERE symbol = %s AND timeframe = %s AND exchange = %s AND open_time > %s")
+        params: list = [symbol, timeframe, EXCHANGE, after_ms]
+        if before_ms is not None:
+            sql += " AND open_time < %s"
+            params.append(before_ms)
+        sql += " ORDER BY open_time DESC LIMIT %s"
+        params.append(WARMUP_BARS)
+        cur.execute(sql, params)
+        return list(reversed(cur.fetchall()))
+
+    def _warm_up(self, cur, symbol: str, timeframe: str) -> Optional[IndicatorState]:
+        """用最近 WARMUP_BARS 根 (已含本次落盘的 K 线) 重建状态"""
+        rows = self._fetch_rows(cur, symbol, timeframe)
+        if not rows:
+            return None
+        state = self._new_state()
+        for row in rows:
+            state.update(*_row_values(row))
+        self._states[(symbol, timeframe)] = state
+        self._stats['warmed_up'] += 1
+        return state
+
+    def _fill_gap(self, cur, state: IndicatorState, key: Tuple[str, str], until_ms: int) -> Optional[IndicatorState]:
+        """WS 断线漏掉的 K 线从 kline_data 补回 (REST 回填会写进去); 缺口超过预热长度直接重建"""
+        symbol, timeframe = key
+        if until_ms - state.open_time > WARMUP_BARS * timeframe_to_ms(timeframe):
+            return self._warm_up(cur, symbol, timeframe)
+        rows = self._fetch_rows(cur, symbol, timeframe, after_ms=state.open_time, before_ms=until_ms)
+        for row in rows:
+            state.update(*_row_values(row))
+        self._stats['gap_fills'] += 1
+        return state
+
+    def _persist(self, cur, keys: List[Tuple[str, str]]) -> int:
+        rows = []
+        for symbol, timeframe in keys:
+            state = self._states.get((symbol, timeframe))
+            latest = state.latest() if state is not None else None
+            if latest is None:
+                continue
+            indicators = self.analyzer.summarize_latest(
+                latest, state.previous(), datetime.utcfromtimestamp(state.open_time / 1000)
+            )
+            row = build_technical_cache_row(symbol, timeframe, indicators, data_points=state.bars)
+            row['stream_state'] = json.dumps(state.to_snapshot(self.analyzer), separators=(',', ':'))
+            row['stream_open_time'] = state.open_time
+            rows.append(row)
+        t0 = time.perf_counter()
+        written = upsert_stream_rows(cur, rows)
+        self._stats['rows_written'] += written
+        self._stats['last_write_ms'] = round((time.perf_counter() - t0) * 1000, 1)
+        return written
+
+    def get_stats(self) -> Dict:
+        return {**self._stats, 'tracked': len(self._states), 'timeframes': list(self.timeframes)}
+
+
+def is_stream_fresh(timeframe: str, stream_open_time: Optional[int], now_ms: Optional[int] = None) -> bool:
+    """该行是否仍由流式指标在跟踪 (最后一根 K 线落后不超过 FRESH_BARS 根)"""
+    if not stream_open_time:
+        return False
+    now_ms = now_ms if now_ms is not None else int(time.time() * 1000)
+    return now_ms - int(stream_open_time) <= FRESH_BARS * timeframe_to_ms(timeframe)
+
+
+_service: Optional[StreamingIndicatorService] = None
+_service_lock = threading.Lock()
+
+
+def get_streaming_indicators() -> Optional[StreamingIndicatorService]:
+    """本进程的流式指标服务, 未初始化返回 None"""
+    return _service
+
+
+def init_streaming_indicators(db_config: dict, timeframes: Iterable[str] = STREAM_TIMEFRAMES,
+                              config: Optional[dict] = None) -> StreamingIndicatorService:
+    """初始化 (幂等) 并从快照恢复"""
+    global _service
+    with _service_lock:
+        if _service is None:
+            service = StreamingIndicatorService(db_config, timeframes, config)
+            try:
+                service.resume()
+            except Exception as e:
+                logger.warning(f"[流式指标] 快照恢复失败, 各币种收盘时重新预热: {e}")
+            _service = service
+    return _service
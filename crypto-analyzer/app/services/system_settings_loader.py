@@ -1,77 +1,37 @@
 """
 系统配置加载器
-从 data_cache.settings_cache 读取系统配置（本地 60s TTL），兜底直接查 system_settings 表。
+读 settings_store 的进程内快照 (版本号变更才重载, 见 app/services/settings_store.py),
+'true'/'false' 转成 bool, 其余保持字符串.
 """
-from app.utils.config_loader import get_db_config
-import pymysql
-import time
 from loguru import logger
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Mapping, Optional
+
+from app.services.settings_store import get_settings_store
 
 _local_cache: Dict[str, Any] = {}
-_local_cache_time: float = 0
-_LOCAL_TTL = 60
+_local_source: Optional[Mapping[str, str]] = None
 
 
 def _reload_cache():
-    """从 data_cache.settings_cache 加载，失败则查主库 system_settings。"""
-    global _local_cache, _local_cache_time
-    now = time.time()
-    if now - _local_cache_time < _LOCAL_TTL and _local_cache:
+    """settings_store 快照换了才重新转换 (快照整体替换, 按对象判断即可)。"""
+    global _local_cache, _local_source
+    values = get_settings_store().snapshot()
+    if values is _local_source:
         return _local_cache
 
-    cfg = get_db_config()
-
-    # 1) 优先 data_cache
-    try:
-        cache_cfg = {**cfg, "database": "data_cache"}
-        conn = pymysql.connect(**cache_cfg, charset='utf8mb4',
-                                cursorclass=pymysql.cursors.DictCursor)
-        with conn.cursor() as cur:
-            cur.execute("SELECT setting_key, setting_value FROM settings_cache")
-            rows = cur.fetchall()
-        conn.close()
-        if rows:
-            result = {}
-            for r in rows:
-                key = r['setting_key']
-                val = r['setting_value']
-                if val.lower() in ('true', 'false'):
-                    result[key] = val.lower() == 'true'
-                else:
-                    result[key] = val
-            _local_cache = result
-            _local_cache_time = now
-            return result
-    except Exception as e:
-        logger.warning(f"[settings_loader] data_cache 不可用: {e}")
-
-    # 2) 兜底: 直接查主库 system_settings
-    try:
-        conn = pymysql.connect(**cfg, charset='utf8mb4',
-                                cursorclass=pymysql.cursors.DictCursor)
-        with conn.cursor() as cur:
-            cur.execute("SELECT setting_key, setting_value FROM system_settings")
-            rows = cur.fetchall()
-        conn.close()
-        result = {}
-        for r in rows:
-            key = r['setting_key']
-            val = r['setting_value']
-            if val.lower() in ('true', 'false'):
-                result[key] = val.lower() == 'true'
-            else:
-                result[key] = val
-        _local_cache = result
-        _local_cache_time = now
-        return result
-    except Exception as e:
-        logger.warning(f"[settings_loader] system_settings 读取失败: {e}，返回空配置")
-        return {}
+    result = {}
+    for key, val in values.items():
+        if val.lower() in ('true', 'false'):
+            result[key] = val.lower() == 'true'
+        else:
+            result[key] = val
+    _local_cache = result
+    _local_source = values
+    return result
 
 
 def get_system_settings() -> Dict[str, Any]:
-    """获取全部系统配置（本地 60s TTL 缓存）。"""
+    """获取全部系统配置（进程内快照，配置变更 1 秒内生效）。"""
     return _reload_cache()
 
 
@@ -180,10 +140,8 @@ def get_max_positions() -> int:
 
 
 def invalidate_loader_cache() -> None:
-    """写入 system_settings 后清除本地 TTL 缓存。"""
-    global _local_cache, _local_cache_time
-    _local_cache = {}
-    _local_cache_time = 0
+    """写入 system_settings 后作废本进程快照（跨进程见 settings_store.notify_settings_changed）。"""
+    get_settings_store().invalidate()
 
 
 def get_strategy_open_params() -> dict:
@@ -0,0 +1,194 @@
+"""
+technical_indicators_cache 行构造 / 写入
+
+CacheUpdateService (定时整段重算) 与 StreamingIndicatorService (K 线收盘增量推进)
+共用同一套评分、信号和字段映射, 保证两条路径写出的行口径一致.
+"""
+import math
+from typing import Dict, Iterable, List
+
+import pymysql
+
+
+def calculate_technical_score(indicators: dict) -> float:
+    """计算技术指标综合评分 (0-100)"""
+    score = 50.0  # 基础分
+
+    # RSI评分
+    rsi = indicators.get('rsi', {})
+    rsi_value = rsi.get('value', 50)
+    if rsi_value < 30:
+        score += 15  # 超卖，看涨
+    elif rsi_value > 70:
+        score -= 15  # 超买，看跌
+    elif 40 <= rsi_value <= 60:
+        score += 5  # 中性区域
+
+    # MACD评分
+    macd = indicators.get('macd', {})
+    if macd.get('bullish_cross'):
+        score += 15
+    elif macd.get('bearish_cross'):
+        score -= 15
+
+    # EMA趋势评分（包含放量倍数）
+    ema = indicators.get('ema', {})
+    volume_multiple = ema.get('volume_multiple', 1.0)
+
+    if ema.get('trend') == 'up':
+        score += 10
+        # 如果上涨趋势且放量，额外加分
+        if volume_multiple >= 2.0:
+            score += 10  # 放量2倍以上
+        elif volume_multiple >= 1.5:
+            score += 5   # 放量1.5倍以上
+    elif ema.get('trend') == 'down':
+        score -= 10
+        # 如果下跌趋势且放量，额外减分
+        if volume_multiple >= 2.0:
+            score -= 10  # 放量2倍以上
+        elif volume_multiple >= 1.5:
+            score -= 5   # 放量1.5倍以上
+
+    # 成交量评分
+    volume = indicators.get('volume', {})
+    if volume.get('above_average'):
+        score += 10
+
+    return max(0, min(100, score))
+
+
+def technical_signal_for(technical_score: float, rsi_value: float) -> str:
+    """
+    由评分生成技术信号
+    重要：如果RSI超买，不应该给出买入信号；如果RSI超卖，不应该给出卖出信号
+    """
+    if rsi_value > 70:
+        # RSI超买：强制信号为SELL或HOLD，不能是BUY
+        if technical_score >= 50:
+            return 'HOLD'  # 即使其他指标好，超买时也不买入
+        if technical_score >= 25:
+            return 'SELL'
+        return 'STRONG_SELL'
+    if rsi_value < 30:
+        # RSI超卖：强制信号为BUY或HOLD，不能是SELL
+        if technical_score >= 50:
+            return 'STRONG_BUY'  # 超卖时，其他指标好就是强烈买入
+        if technical_score >= 40:
+            return 'BUY'
+        return 'HOLD'  # 即使其他指标不好，超卖时也不卖出
+    # RSI正常范围：按评分正常判断
+    if technical_score >= 75:
+        return 'STRONG_BUY'
+    if technical_score >= 60:
+        return 'BUY'
+    if technical_score >= 40:
+        return 'HOLD'
+    if technical_score >= 25:
+        return 'SELL'
+    return 'STRONG_SELL'
+
+
+def build_technical_cache_row(symbol: str, timeframe: str, indicators: dict, data_points: int) -> Dict:
+    """由 TechnicalIndicators.analyze() 格式的指标字典生成 technical_indicators_cache 一行"""
+    rsi = indicators.get('rsi', {})
+    macd = indicators.get('macd', {})
+    bollinger = indicators.get('bollinger', {})
+    ema = indicators.get('ema', {})
+    kdj = indicators.get('kdj', {})
+    volume = indicators.get('volume', {})
+
+    technical_score = calculate_technical_score(indicators)
+    technical_signal = technical_signal_for(technical_score, rsi.get('value', 50))
+
+    # 获取24小时成交量（对于短周期，使用最近24小时的数据）
+    volume_24h = volume.get('volume_24h', 0)
+    volume_avg = volume.get('average_volume', 0)
+
+    return dict(
+        symbol=symbol,
+        timeframe=timeframe,
+        rsi_value=rsi.get('value'),
+        rsi_signal=rsi.get('signal'),
+        macd_value=macd.get('value'),
+        macd_signal_line=macd.get('signal'),
+        macd_histogram=macd.get('histogram'),
+        macd_trend='bullish_cross' if macd.get('bullish_cross') else ('bearish_cross' if macd.get('bearish_cross') else 'neutral'),
+        bb_upper=bollinger.get('upper'),
+        bb_middle=bollinger.get('middle'),
+        bb_lower=bollinger.get('lower'),
+        bb_position=bollinger.get('position', 'middle'),
+        bb_width=bollinger.get('width'),
+        ema_short=ema.get('short'),
+        ema_long=ema.get('long'),
+        ema_trend=ema.get('trend', 'neutral'),
+        kdj_k=kdj.get('k'),
+        kdj_d=kdj.get('d'),
+        kdj_j=kdj.get('j'),
+        kdj_signal=kdj.get('signal'),
+        volume_24h=volume_24h,
+        volume_avg=volume_avg,
+        volume_ratio=(volume_24h / volume_avg) if volume_avg > 0 else 1,
+        volume_signal='high' if volume.get('above_average') else 'normal',
+        technical_score=technical_score,
+        technical_signal=technical_signal,
+        data_points=data_points,
+    )
+
+
+def sanitize_row(row: Dict) -> Dict:
+    """将 nan/inf 替换为 None，防止写入 DECIMAL 字段报错"""
+    for k, v in row.items():
+        if isinstance(v, float) and (math.isnan(v) or math.isinf(v)):
+            row[k] = None
+    return row
+
+
+# ── 流式指标状态列 ──────────────────────────────────────────
+
+_STREAM_COLUMNS = (
+    "ALTER TABLE technical_indicators_cache ADD COLUMN stream_state MEDIUMTEXT NULL "
+    "COMMENT '增量指标状态快照 (JSON)'",
+    "ALTER TABLE technical_indicators_cache ADD COLUMN stream_open_time BIGINT NULL "
+    "COMMENT '增量指标最后一根K线 open_time (ms)'",
+)
+
+_ROW_COLUMNS = (
+    'symbol', 'timeframe', 'rsi_value', 'rsi_signal',
+    'macd_value', 'macd_signal_line', 'macd_histogram', 'macd_trend',
+    'bb_upper', 'bb_middle', 'bb_lower', 'bb_position', 'bb_width',
+    'ema_short', 'ema_long', 'ema_trend',
+    'kdj_k', 'kdj_d', 'kdj_j', 'kdj_signal',
+    'volume_24h', 'volume_avg', 'volume_ratio', 'volume_signal',
+    'technical_score', 'technical_signal', 'data_points',
+    'stream_state', 'stream_open_time',
+)
+
+_STREAM_UPSERT_SQL = (
+    f"INSERT INTO technical_indicators_cache ({', '.join(_ROW_COLUMNS)}, updated_at) "
+    f"VALUES ({', '.join(['%s'] * len(_ROW_COLUMNS))}, NOW()) "
+    "ON DUPLICATE KEY UPDATE "
+    + ", ".join(f"{c} = VALUES({c})" for c in _ROW_COLUMNS[2:])
+    + ", updated_at = NOW()"
+)
+
+
+def ensure_stream_columns(cursor) -> None:
+    """旧库补 stream_state / stream_open_time 两列 (幂等)"""
+    for sql in _STREAM_COLUMNS:
+        try:
+            cursor.execute(sql)
+        except pymysql.err.OperationalError as e:
+            if e.args[0] != 1060:  # Duplicate column name
+                raise
+
+
+def upsert_stream_rows(cursor, rows: Iterable[Dict]) -> int:
+    """批量写入带状态快照的指标行 (一次 executemany)"""
+    params: List[tuple] = [
+        tuple(sanitize_row(row).get(c) for c in _ROW_COLUMNS) for row in rows
+    ]
+    if not params:
+        return 0
+    cursor.executemany(_STREAM_UPSERT_SQL, params)
+    return len(params)
@@ -13,6 +13,7 @@ from typing import Optional, Set, Tuple
 import pymysql
 from loguru import logger
 
+from app.services.settings_store import get_setting_value
 from app.utils.config_loader import get_db_config
 from app.utils.futures_symbol import (
     futures_symbol_clean,
@@ -58,24 +59,14 @@ def _coerce_bool(value, default: bool) -> bool:
 
 
 def _bool_setting(key: str, default: bool = True, cursor=None) -> bool:
-    if cursor is not None:
-        try:
-            cursor.execute(
-                "SELECT setting_value FROM system_settings WHERE setting_key=%s LIMIT 1",
-                (key,),
-            )
-            row = cursor.fetchone()
-            if row:
-                val = row.get('setting_value') if isinstance(row, dict) else row[0]
-                return _coerce_bool(val, default)
-            return default
-        except Exception as e:
-            logger.warning(f"[trading_gates] direct setting read failed {key}: {e}")
-
+    """
+    读 settings_store 进程内快照 (版本号变更才重载, 开关跨进程 1 秒内生效), 开仓路径不再逐项查库.
+    cursor 参数保留兼容调用方, 不再使用.
+    """
     try:
-        from app.services.system_settings_loader import get_setting
-        val = get_setting(key)
-    except Exception:
+        val = get_setting_value(key)
+    except Exception as e:
+        logger.warning(f"[trading_gates] setting read failed {key}: {e}")
         val = None
     return _coerce_bool(val, default)
 
@@ -134,10 +125,9 @@ def _direction_side(side: str) -> str:
 
 def get_paper_direction_flags(cursor=None) -> Tuple[bool, bool]:
     """system_settings.allow_long / allow_short（用户手动方向总开关）。"""
-    cur = _as_cursor(cursor)
     return (
-        _bool_setting("allow_long", True, cur),
-        _bool_setting("allow_short", True, cur),
+        _bool_setting("allow_long", True),
+        _bool_setting("allow_short", True),
     )
 
 
@@ -13,6 +13,7 @@ import pymysql
 
 from app.utils.futures_symbol import futures_symbol_rating_canonical
 from app.utils.position_time import utc_now_naive
+from app.services.pnl_rollup import refresh_position_rollup
 
 def get_quantity_precision(symbol: str) -> int:
     """
@@ -1716,6 +1717,9 @@ class FuturesTradingEngine:
             connection.commit()
             cursor.close()
 
+            # 复盘盈亏汇总: 重算该持仓所在小时 (失败只告警)
+            refresh_position_rollup(connection, position_id)
+
             # 根据交易对确定数量显示精度
             qty_precision = get_quantity_precision(symbol)
             logger.info(
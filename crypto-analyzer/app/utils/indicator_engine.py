@@ -0,0 +1,365 @@
+"""
+向量化技术指标引擎 (NumPy)
+
+输入为 (币种 × K线) 的二维数组 (一维数组视为单行), 一次调用算完所有币种.
+K 线数不等的币种左侧补 NaN 对齐, 每行从自己的第一个有效值开始计算.
+递推类指标 (EMA/RSI/KDJ) 按 K 线逐列推进, 每步对所有币种做一次向量运算
+(行数少时改为逐行 Python 浮点递推, 避免单币种调用被每步的 numpy 开销拖慢);
+滑窗类指标 (MA/BB/ATR/ADX) 直接用 sliding_window_view.
+
+各指标的口径与仓库内已有实现逐一对齐 (见 scripts/validate_indicator_engine.py):
+- ema(seed='first')  ↔ pandas ewm(span, adjust=False)      (TechnicalIndicators)
+- ema(seed='sma')    ↔ utils.indicators.calculate_ema / 各模块 _ema (SMA 起点)
+- rsi(method='wilder') ↔ utils.indicators.calculate_rsi / _calc_rsi / _rsi (Wilder 平滑)
+- rsi(method='sma')  ↔ TechnicalIndicators.calculate_rsi 手动分支 / 行情检测 _calculate_rsi
+- kdj(seed=None)     ↔ TechnicalIndicators.calculate_kdj;  kdj(seed=50) ↔ utils.indicators.calculate_kdj
+- atr                ↔ TechnicalIndicators.calculate_atr 手动分支 / entry_timing._atr
+- adx                ↔ MarketRegimeDetector._calculate_adx / scan_all 内联 ADX (简化版, 未平滑的 DX)
+"""
+
+from typing import Dict, Optional, Union
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+ArrayLike = Union[np.ndarray, list]
+
+
+def _as_2d(x: ArrayLike) -> np.ndarray:
+    arr = np.asarray(x, dtype=np.float64)
+    if arr.ndim == 1:
+        arr = arr[np.newaxis, :]
+    return arr
+
+
+def _first_valid(x: np.ndarray) -> np.ndarray:
+    """每行第一个非 NaN 的列号; 全 NaN 行返回列数"""
+    valid = ~np.isnan(x)
+    idx = valid.argmax(axis=1)
+    idx[~valid.any(axis=1)] = x.shape[1]
+    return idx
+
+
+def _mask_before(x: np.ndarray, first: np.ndarray) -> np.ndarray:
+    """把每行 first 之前的位置置为 NaN (原地)"""
+    cols = np.arange(x.shape[1])
+    x[cols[np.newaxis, :] < first[:, np.newaxis]] = np.nan
+    return x
+
+
+def _rolling(x: np.ndarray, window: int, func) -> np.ndarray:
+    """滑窗聚合, 窗口内含 NaN 结果即为 NaN (同 pandas rolling 默认 min_periods)"""
+    m, n = x.shape
+    out = np.full((m, n), np.nan)
+    if n >= window:
+        out[:, window - 1:] = func(sliding_window_view(x, window, axis=1), axis=-1)
+    return out
+
+
+# 行数不超过该值时逐行用 Python 浮点递推: 单币种 (1-D) 调用只有几百个点,
+# 按列推进每步一次 numpy 调用的固定开销反而是大头
+_ROW_LOOP_MAX = 32
+
+
+def _ewm(x: np.ndarray, alpha: float, init: Union[str, float] = 'first',
+         period: Optional[int] = None) -> np.ndarray:
+    """
+    递推平滑 y_t = y_{t-1} + alpha * (x_t - y_{t-1})
+
+    Args:
+        init: 'first' → 以每行第一个有效值起步 (pandas adjust=False)
+              'sma'   → 以前 period 个有效值的均值起步 (SMA seed / Wilder)
+              数值   → 以该常数为上一期值, 在第一个有效值处开始递推 (KDJ 50 起点)
+        period: init='sma' 时的种子窗口
+    """
+    m, n = x.shape
+    first = _first_valid(x)
+    init_at = first + period - 1 if init == 'sma' else first
+    started = np.nonzero(init_at < n)[0]
+    seed = np.full(m, np.nan)
+    if init == 'sma':
+        # 只取起点处的一个窗口均值 (窗口内含 NaN 则为 NaN, 同 _rolling)
+        window = init_at[started, np.newaxis] - period + 1 + np.arange(period)
+        seed[started] = x[started[:, np.newaxis], window].mean(axis=1)
+    elif init == 'first':
+        seed[started] = x[started, init_at[started]]
+    else:
+        seed[started] = float(init) + alpha * (x[started, init_at[started]] - float(init))
+
+    if m <= _ROW_LOOP_MAX:
+        return _ewm_rows(x, alpha, init_at, seed)
+
+    out = np.full((m, n), np.nan)
+    prev = np.full(m, np.nan)
+    for t in range(n):
+        xt = x[:, t]
+        cur = prev + alpha * (xt - prev)
+        # 中途 NaN 沿用上一期值 (pandas ignore_na=False 下输出保持不变)
+        cur = np.where(np.isnan(xt), prev, cur)
+        starting = init_at == t
+        if starting.any():
+            cur[starting] = seed[starting]
+        out[:, t] = cur
+        prev = cur
+    return out
+
+
+def _ewm_rows(x: np.ndarray, alpha: float, init_at: np.ndarray, seed: np.ndarray) -> np.ndarray:
+    """_ewm 的逐行版本 (口径相同), 少量行时使用"""
+    m, n = x.shape
+    out = np.full((m, n), np.nan)
+    for i in range(m):
+        start = int(init_at[i])
+        if start >= n:
+            continue
+        values = x[i, start + 1:].tolist()
+        prev = float(seed[i])
+        res = [prev]
+        for v in values:
+            if v == v:                          # NaN 沿用上一期值
+                prev += alpha * (v - prev)
+            res.append(prev)
+        out[i, start:] = res
+    return out
+
+
+# ── 均线 ──────────────────────────────────────────────────
+
+def sma(x: ArrayLike, period: int) -> np.ndarray:
+    """简单移动平均"""
+    return _rolling(_as_2d(x), period, np.mean)
+
+
+def ema(x: ArrayLike, period: int, seed: str = 'first') -> np.ndarray:
+    """
+    指数移动平均
+
+    Args:
+        seed: 'first' → pandas ewm(span=period, adjust=False);
+              'sma'   → 前 period 根 SMA 起步 (仓库内纯 Python _ema 口径)
+    """
+    return _ewm(_as_2d(x), 2.0 / (period + 1), init=seed, period=period)
+
+
+# ── 震荡类 ────────────────────────────────────────────────
+
+def rsi(close: ArrayLike, period: int = 14, method: str = 'wilder') -> np.ndarray:
+    """
+    RSI
+
+    Args:
+        method: 'wilder' → 首 period 个涨跌幅均值起步, 之后 Wilder 平滑;
+                'sma'    → 最近 period 个涨跌幅的简单均值 (pandas rolling 口径,
+                           首根 K 线的涨跌幅按 0 计入, 同 delta.where(...) 行为)
+        avg_loss 为 0 时返回 100
+    """
+    c = _as_2d(close)
+    first = _first_valid(c)
+    delta = np.full_like(c, np.nan)
+    delta[:, 1:] = c[:, 1:] - c[:, :-1]
+    gains = np.where(np.isnan(delta), np.nan, np.maximum(delta, 0.0))
+    losses = np.where(np.isnan(delta), np.nan, np.maximum(-delta, 0.0))
+
+    if method == 'wilder':
+        avg_gain = _ewm(gains, 1.0 / period, init='sma', period=period)
+        avg_loss = _ewm(losses, 1.0 / period, init='sma', period=period)
+    elif method == 'sma':
+        rows = np.nonzero(first < c.shape[1])[0]
+        gains[rows, first[rows]] = 0.0
+        losses[rows, first[rows]] = 0.0
+        avg_gain = _rolling(gains, period, np.mean)
+        avg_loss = _rolling(losses, period, np.mean)
+    else:
+        raise ValueError(f"未知 RSI 口径: {method}")
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        out = 100.0 - 100.0 / (1.0 + avg_gain / avg_loss)
+    out = np.where((avg_loss == 0) & ~np.isnan(avg_gain), 100.0, out)
+    return out
+
+
+def macd(close: ArrayLike, fast: int = 12, slow: int = 26, signal: int = 9,
+         seed: str = 'first') -> Dict[str, np.ndarray]:
+    """MACD (DIF / DEA / 柱), seed 含义同 ema()"""
+    c = _as_2d(close)
+    dif = ema(c, fast, seed) - ema(c, slow, seed)
+    dea = _ewm(dif, 2.0 / (signal + 1), init=seed, period=signal)
+    return {'macd': dif, 'signal': dea, 'histogram': dif - dea}
+
+
+def kdj(high: ArrayLike, low: ArrayLike, close: ArrayLike, period: int = 9,
+        signal: int = 3, seed: Optional[float] = None) -> Dict[str, np.ndarray]:
+    """
+    KDJ
+
+    Args:
+        seed: None → K/D 以首个有效 RSV 起步 (pandas ewm(com=signal-1, adjust=False));
+              50   → K/D 以 50 为上一期值, 最高=最低时 RSV 取 50 (utils.indicators 口径)
+    """
+    h, l, c = _as_2d(high), _as_2d(low), _as_2d(close)
+    hhv = _rolling(h, period, np.max)
+    llv = _rolling(l, period, np.min)
+    rng = hhv - llv
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rsv = (c - llv) / rng * 100.0
+    if seed is not None:
+        rsv = np.where(rng == 0, 50.0, rsv)
+    alpha = 1.0 / signal
+    init = 'first' if seed is None else seed
+    k = _ewm(rsv, alpha, init=init)
+    d = _ewm(k, alpha, init=init)
+    return {'k': k, 'd': d, 'j': 3.0 * k - 2.0 * d}
+
+
+# ── 波动 / 趋势强度 ──────────────────────────────────────
+
+def bollinger(close: ArrayLike, period: int = 20, num_std: float = 2.0) -> Dict[str, np.ndarray]:
+    """布林带 (样本标准差 ddof=1, 同 pandas rolling.std)"""
+    c = _as_2d(close)
+    mid = _rolling(c, period, np.mean)
+    std = _rolling(c, period, lambda w, axis: np.std(w, axis=axis, ddof=1))
+    return {'upper': mid + std * num_std, 'middle': mid, 'lower': mid - std * num_std}
+
+
+def true_range(high: ArrayLike, low: ArrayLike, close: ArrayLike) -> np.ndarray:
+    """真实波幅; 每行首根 K 线无前收, 取 high-low (同 pandas concat(...).max 跳过 NaN)"""
+    h, l, c = _as_2d(high), _as_2d(low), _as_2d(close)
+    prev_close = np.full_like(c, np.nan)
+    prev_close[:, 1:] = c[:, :-1]
+    return np.fmax(h - l, np.fmax(np.abs(h - prev_close), np.abs(l - prev_close)))
+
+
+def atr(high: ArrayLike, low: ArrayLike, close: ArrayLike, period: int = 14,
+        method: str = 'sma') -> np.ndarray:
+    """ATR; method='sma' 为滑窗均值, 'wilder' 为 Wilder 平滑"""
+    tr = true_range(high, low, close)
+    if method == 'sma':
+        return _rolling(tr, period, np.mean)
+    if method == 'wilder':
+        return _ewm(tr, 1.0 / period, init='sma', period=period)
+    raise ValueError(f"未知 ATR 口径: {method}")
+
+
+def adx(high: ArrayLike, low: ArrayLike, close: ArrayLike, period: int = 14) -> Dict[str, np.ndarray]:
+    """
+    简化版 ADX: 最近 period 根 TR/+DM/-DM 的简单均值 → +DI/-DI → DX (不做二次平滑)
+    与 MarketRegimeDetector._calculate_adx / scan_all 内联 ADX 口径一致.
+    ATR 为 0 时 DI 记 0, DI 之和为 0 时 DX 记 0.
+
+    Returns:
+        {'adx', 'plus_di', 'minus_di'}
+    """
+    h, l, c = _as_2d(high), _as_2d(low), _as_2d(close)
+    first = _first_valid(c)
+    tr = _mask_before(true_range(h, l, c), first + 1)
+
+    up = np.full_like(h, np.nan)
+    down = np.full_like(h, np.nan)
+    up[:, 1:] = h[:, 1:] - h[:, :-1]
+    down[:, 1:] = l[:, :-1] - l[:, 1:]
+    plus_dm = np.where(up > down, np.maximum(up, 0.0), 0.0)
+    minus_dm = np.where(down > up, np.maximum(down, 0.0), 0.0)
+    nan_mask = np.isnan(up) | np.isnan(down)
+    plus_dm[nan_mask] = np.nan
+    minus_dm[nan_mask] = np.nan
+
+    atr_s = _rolling(tr, period, np.mean)
+    pdm_s = _rolling(plus_dm, period, np.mean)
+    mdm_s = _rolling(minus_dm, period, np.mean)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        plus_di = np.where(atr_s > 0, pdm_s / atr_s * 100.0, 0.0)
+        minus_di = np.where(atr_s > 0, mdm_s / atr_s * 100.0, 0.0)
+        di_sum = plus_di + minus_di
+        dx = np.where(di_sum > 0, np.abs(plus_di - minus_di) / di_sum * 100.0, 0.0)
+    undefined = np.isnan(atr_s)
+    for arr in (plus_di, minus_di, dx):
+        arr[undefined] = np.nan
+    return {'adx': dx, 'plus_di': plus_di, 'minus_di': minus_di}
+
+
+# ── 工具 ──────────────────────────────────────────────────
+
+def last_valid(x: np.ndarray) -> np.ndarray:
+    """每行最后一列的值 (一维, 长度 = 行数)"""
+    return _as_2d(x)[:, -1]
+
+
+def last_value(x: np.ndarray) -> Optional[float]:
+    """单行序列的最新值, NaN 返回 None (供单币种调用方使用)"""
+    v = float(_as_2d(x)[0, -1]) if np.size(x) else float('nan')
+    return None if np.isnan(v) else v
+
+
+def stack_series(series: list, length: Optional[int] = None) -> np.ndarray:
+    """把多条长度不等的序列 (升序) 右对齐堆成二维数组, 左侧补 NaN"""
+    if length is None:
+        length = max((len(s) for s in series), default=0)
+    out = np.full((len(series), length), np.nan)
+    for i, s in enumerate(series):
+        s = np.asarray(s, dtype=np.float64)[-length:]
+        if len(s):
+            out[i, length - len(s):] = s
+    return out
+
+
+def compute_technical_batch(ohlcv: Dict[str, np.ndarray], config: Optional[dict] = None) -> Dict[str, np.ndarray]:
+    """
+    TechnicalIndicators.analyze() 手动分支 (未安装 pandas_ta) 的批量版本,
+    一次算出所有币种的完整指标序列.
+
+    Args:
+        ohlcv: {'open','high','low','close','volume'} → (币种 × K线) 数组, 左侧 NaN 对齐
+        config: 同 TechnicalIndicators(config) 的 indicators 配置
+
+    Returns:
+        列名同 TechnicalIndicators.analyze() 写入 df 的各列
+    """
+    cfg = config or {}
+    rsi_period = cfg.get('rsi', {}).get('period', 14)
+    macd_fast = cfg.get('macd', {}).get('fast', 12)
+    macd_slow = cfg.get('macd', {}).get('slow', 26)
+    macd_signal = cfg.get('macd', {}).get('signal', 9)
+    bb_period = cfg.get('bollinger', {}).get('period', 20)
+    bb_std = cfg.get('bollinger', {}).get('std', 2)
+    ema_short = cfg.get('ema', {}).get('short', 9)
+    ema_long = cfg.get('ema', {}).get('long', 26)
+    ma_period = cfg.get('ma', {}).get('period', 10)
+    ema_ma_period = cfg.get('ema_ma', {}).get('period', 10)
+    ma5_period = cfg.get('ma5', {}).get('period', 5)
+    ema5_period = cfg.get('ema5', {}).get('period', 5)
+
+    h, l, c, v = (_as_2d(ohlcv[k]) for k in ('high', 'low', 'close', 'volume'))
+    m = macd(c, macd_fast, macd_slow, macd_signal)
+    bb = bollinger(c, bb_period, bb_std)
+    kd = kdj(h, l, c)
+
+    prev_v = np.full_like(v, np.nan)
+    prev_v[:, 1:] = v[:, :-1]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        vol_change = (v / prev_v - 1.0) * 100.0
+
+    return {
+        'close': c,
+        'volume': v,
+        'rsi': rsi(c, rsi_period, method='sma'),
+        'macd': m['macd'],
+        'macd_signal': m['signal'],
+        'macd_histogram': m['histogram'],
+        'bb_upper': bb['upper'],
+        'bb_middle': bb['middle'],
+        'bb_lower': bb['lower'],
+        'ema_short': ema(c, ema_short),
+        'ema_long': ema(c, ema_long),
+        'ma10': sma(c, ma_period),
+        'ema10': ema(c, ema_ma_period),
+        'ma5': sma(c, ma5_period),
+        'ema5': ema(c, ema5_period),
+        'kdj_k': kd['k'],
+        'kdj_d': kd['d'],
+        'kdj_j': kd['j'],
+        'atr': atr(h, l, c, 14),
+        'vol_ma5': sma(v, 5),
+        'vol_ma20': sma(v, 20),
+        'vol_change': vol_change,
+    }
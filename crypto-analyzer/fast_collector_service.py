@@ -14,6 +14,10 @@
 优势: 节省93.5%的无效采集，减少API压力和数据库写入
 
 注意：实时价格由 WebSocket 服务提供，不在此采集
+
+2026-10: ws_kline_collector 由 5m 本地合成 15m/1h/4h/1d 后 (.env WS_KLINE_DERIVE, 默认开启),
+本服务不再按整点 REST 采长周期, 改为每 RECONCILE_INTERVAL_S 拉最近几根与库里核对,
+缺失或不一致的以交易所为准写回 (SmartFuturesCollector.reconcile_klines)
 """
 
 import os
@@ -29,6 +33,7 @@ _project_root = Path(__file__).parent
 sys.path.insert(0, str(_project_root))
 
 from app.collectors.smart_futures_collector import SmartFuturesCollector
+from app.services.candle_aggregator import RECONCILE_BARS, RECONCILE_INTERVAL_S
 from app.utils.binance_rate_guard import rate_guard
 
 
@@ -67,6 +72,11 @@ class SmartCollectorService:
 
         # 2026-06-12: WS 覆盖 5m/15m; REST 长周期兜底。30min 轮询即可，实际采 1h 仍由整点门槛控制
         self.interval = 1800  # 30 分钟
+        # WS 本地合成高周期时只做低频核对
+        self.reconcile_only = _env.get('WS_KLINE_DERIVE', '1') == '1'
+        if self.reconcile_only:
+            self.interval = RECONCILE_INTERVAL_S
+            logger.info(f"高周期由 WS 5m 本地合成, 本服务每 {self.interval // 3600} 小时核对 {RECONCILE_BARS}")
 
         logger.info("🧠 智能数据采集服务初始化完成 (仅 U 本位, 不采集币本位)")
         logger.info(f"检查间隔: {self.interval}秒 (30分钟轮询, 1h/4h/1d 按整点触发)")
@@ -88,8 +98,11 @@ class SmartCollectorService:
                 cycle_count += 1
                 logger.info(f"\n【第 {cycle_count} 次采集】")
 
-                # 执行采集
-                await self.collector.run_collection_cycle()
+                # 执行采集; 合成模式下首轮仍按原策略拉长周期历史, 之后只核对
+                if self.reconcile_only and cycle_count > 1:
+                    await self.collector.reconcile_klines(self.collector.get_trading_symbols(), RECONCILE_BARS)
+                else:
+                    await self.collector.run_collection_cycle()
 
                 if rate_guard.is_banned():
                     wait_s = rate_guard.seconds_until_unban() + 60
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""重建复盘盈亏汇总表 (futures_pnl_rollup_hourly / _daily).
+
+幂等: 按账户整体删除后从 futures_positions 重新聚合. 平仓路径会增量维护,
+一般只在首次部署、手工修过历史持仓或汇总重算告警后运行.
+
+  python scripts/backfill_pnl_rollup.py               # 所有有已平仓持仓的账户
+  python scripts/backfill_pnl_rollup.py --account 2   # 指定账户
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import pymysql
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from app.services import pnl_rollup  # noqa: E402
+from app.utils.config_loader import get_db_config  # noqa: E402
+
+
+def _connect():
+    cfg = dict(get_db_config())
+    cfg.setdefault("charset", "utf8mb4")
+    cfg["cursorclass"] = pymysql.cursors.DictCursor
+    cfg["autocommit"] = False
+    return pymysql.connect(**cfg)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="重建复盘盈亏汇总表")
+    parser.add_argument("--account", type=int, action="append", help="账户ID (可重复), 默认全部")
+    args = parser.parse_args()
+
+    conn = _connect()
+    try:
+        with conn.cursor() as cur:
+            pnl_rollup.ensure_rollup_schema(cur)
+            accounts = args.account
+            if not accounts:
+                cur.execute(
+                    "SELECT DISTINCT account_id FROM futures_positions WHERE status = 'closed'"
+                )
+                accounts = [r["account_id"] for r in cur.fetchall()]
+            for account_id in accounts:
+                t0 = time.time()
+                rows = pnl_rollup.backfill_account(cur, account_id)
+                print(f"account {account_id}: {rows} 个小时桶, {time.time() - t0:.1f}s")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
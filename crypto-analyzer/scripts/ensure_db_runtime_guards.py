@@ -3,8 +3,10 @@
 """Install runtime DB guards used by app/scheduler/API workloads.
 
 This script is intentionally idempotent. It adds indexes that keep hot
-futures_positions risk/stat queries from scanning the whole table, and prints
-currently blocking MySQL sessions for deployment diagnostics.
+futures_positions risk/stat queries from scanning the whole table, adds the
+close-claim columns used by the exit rule engine (app/services/exit_rules.py
+only probes for them at runtime), and prints currently blocking MySQL sessions
+for deployment diagnostics.
 """
 
 from __future__ import annotations
@@ -53,6 +55,22 @@ INDEXES = {
 }
 
 
+COLUMNS = {
+    "futures_positions": [
+        (
+            "close_claim_owner",
+            "ALTER TABLE futures_positions ADD COLUMN close_claim_owner VARCHAR(64) DEFAULT NULL "
+            "COMMENT '平仓执行方 (出场规则引擎 claim)'",
+        ),
+        (
+            "close_claim_at",
+            "ALTER TABLE futures_positions ADD COLUMN close_claim_at DATETIME DEFAULT NULL "
+            "COMMENT '平仓 claim 时间, 超过 TTL 视为失效'",
+        ),
+    ],
+}
+
+
 def _connect():
     cfg = dict(get_db_config())
     cfg.setdefault("charset", "utf8mb4")
@@ -86,6 +104,31 @@ def ensure_indexes(cur) -> None:
             cur.execute(ddl)
 
 
+def _column_exists(cur, table: str, column: str) -> bool:
+    cur.execute(
+        """
+        SELECT 1
+        FROM information_schema.columns
+        WHERE table_schema = DATABASE()
+          AND table_name = %s
+          AND column_name = %s
+        LIMIT 1
+        """,
+        (table, column),
+    )
+    return cur.fetchone() is not None
+
+
+def ensure_columns(cur) -> None:
+    for table, specs in COLUMNS.items():
+        for column, ddl in specs:
+            if _column_exists(cur, table, column):
+                print(f"OK existing column {table}.{column}")
+                continue
+            print(f"ADD column {table}.{column}")
+            cur.execute(ddl)
+
+
 def ensure_coin_scores_disabled(cur) -> None:
     """下线 coin_scores：DROP EVENT + 存储过程（扫 kline_data 拖垮 API，业务已不用）."""
     cur.execute(
@@ -157,6 +200,7 @@ def main() -> None:
     try:
         with conn.cursor() as cur:
             ensure_indexes(cur)
+            ensure_columns(cur)
             ensure_coin_scores_disabled(cur)
             print_blocking_sessions(cur)
     finally:
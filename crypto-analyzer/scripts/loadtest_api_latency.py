@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Dashboard 并发压测: 多个客户端循环请求热点读接口, 输出各接口 p50/p95/p99 延迟.
+
+/health 不查库, 用来观察 event loop 是否被阻塞 (同步 pymysql 在 async 端点里会把它一起拖慢).
+改造前后各跑一次并保存结果, 再对比:
+
+    python scripts/loadtest_api_latency.py --clients 20 --duration 60 --save before.json
+    python scripts/loadtest_api_latency.py --clients 20 --duration 60 --save after.json
+    python scripts/loadtest_api_latency.py --compare before.json after.json
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import random
+import time
+from collections import defaultdict
+from typing import Dict, List
+
+DEFAULT_BASE = "http://localhost:9020"
+
+# 仪表盘轮询的热点读接口 (futures-signals 自带 TTL 缓存, 过期那一次才查库)
+ENDPOINTS = (
+    "/health",
+    "/api/realtime-prices",
+    "/api/technical-indicators?timeframe=1h",
+    "/api/technical-indicators?symbol=BTC/USDT&timeframe=1h",
+    "/api/signals/scores?limit=100",
+    "/api/futures-signals",
+)
+
+
+def _pct(sorted_ms: List[float], p: float) -> float:
+    if not sorted_ms:
+        return float('nan')
+    k = min(len(sorted_ms) - 1, max(0, int(round(p / 100.0 * (len(sorted_ms) - 1)))))
+    return sorted_ms[k]
+
+
+def summarize(samples: Dict[str, List[float]], errors: Dict[str, int]) -> Dict[str, Dict]:
+    out = {}
+    for path in sorted(set(samples) | set(errors)):
+        ms = sorted(samples.get(path, []))
+        out[path] = {
+            'n': len(ms),
+            'errors': errors.get(path, 0),
+            'p50': round(_pct(ms, 50), 1),
+            'p95': round(_pct(ms, 95), 1),
+            'p99': round(_pct(ms, 99), 1),
+            'max': round(ms[-1], 1) if ms else float('nan'),
+        }
+    return out
+
+
+async def _client(session, base: str, deadline: float, think_s: float,
+                  samples: Dict[str, List[float]], errors: Dict[str, int]) -> None:
+    import aiohttp
+
+    paths = list(ENDPOINTS)
+    while time.monotonic() < deadline:
+        random.shuffle(paths)
+        for path in paths:
+            if time.monotonic() >= deadline:
+                return
+            t0 = time.perf_counter()
+            try:
+                async with session.get(base + path) as resp:
+                    await resp.read()
+                    ok = resp.status < 500
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                ok = False
+            if ok:
+                samples[path].append((time.perf_counter() - t0) * 1000)
+            else:
+                errors[path] += 1
+            if think_s:
+                await asyncio.sleep(random.uniform(0, think_s))
+
+
+async def run(base: str, clients: int, duration: float, think_s: float, timeout_s: float) -> Dict[str, Dict]:
+    import aiohttp
+
+    samples: Dict[str, List[float]] = defaultdict(list)
+    errors: Dict[str, int] = defaultdict(int)
+    connector = aiohttp.TCPConnector(limit=clients)
+    timeout = aiohttp.ClientTimeout(total=timeout_s)
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+        deadline = time.monotonic() + duration
+        await asyncio.gather(*(
+            _client(session, base, deadline, think_s, samples, errors) for _ in range(clients)
+        ))
+    return summarize(samples, errors)
+
+
+def print_table(result: Dict[str, Dict], title: str) -> None:
+    print(f"\n{title}")
+    print(f"  {'endpoint':<58} {'n':>6} {'err':>5} {'p50':>8} {'p95':>8} {'p99':>8} {'max':>8}  (ms)")
+    for path, r in result.items():
+        print(f"  {path:<58} {r['n']:>6} {r['errors']:>5} {r['p50']:>8} {r['p95']:>8} {r['p99']:>8} {r['max']:>8}")
+
+
+def print_compare(before: Dict[str, Dict], after: Dict[str, Dict]) -> None:
+    print(f"\n  {'endpoint':<58} {'p99 before':>11} {'p99 after':>10} {'change':>8}")
+    for path in sorted(set(before) | set(after)):
+        b = before.get(path, {}).get('p99')
+        a = after.get(path, {}).get('p99')
+        change = f"{(a - b) / b * 100:+.0f}%" if b and a is not None and b == b and a == a else "-"
+        print(f"  {path:<58} {b!s:>11} {a!s:>10} {change:>8}")
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument('--base', default=DEFAULT_BASE)
+    ap.add_argument('--clients', type=int, default=20, help='并发仪表盘客户端数')
+    ap.add_argument('--duration', type=float, default=60.0, help='压测时长 (秒)')
+    ap.add_argument('--think', type=float, default=0.2, help='每个请求后随机停顿上限 (秒)')
+    ap.add_argument('--timeout', type=float, default=30.0, help='单请求超时 (秒)')
+    ap.add_argument('--save', help='结果写入 JSON 文件')
+    ap.add_argument('--compare', nargs=2, metavar=('BEFORE', 'AFTER'), help='对比两次保存的结果')
+    args = ap.parse_args()
+
+    if args.compare:
+        with open(args.compare[0]) as f:
+            before = json.load(f)
+        with open(args.compare[1]) as f:
+            after = json.load(f)
+        print_compare(before['endpoints'], after['endpoints'])
+        return
+
+    print(f"压测 {args.base}: {args.clients} 客户端 x {args.duration:.0f}s")
+    result = asyncio.run(run(args.base, args.clients, args.duration, args.think, args.timeout))
+    print_table(result, f"{args.clients} clients, {args.duration:.0f}s")
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump({
+                'base': args.base, 'clients': args.clients, 'duration': args.duration,
+                'at': time.strftime('%Y-%m-%d %H:%M:%S'), 'endpoints': result,
+            }, f, indent=2)
+        print(f"\n结果已保存: {args.save}")
+
+
+if __name__ == '__main__':
+    main()
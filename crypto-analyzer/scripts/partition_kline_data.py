@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""把存量 kline_data 迁成按月 RANGE(open_time) 分区表 (一次性).
+
+MySQL 分区表的每个唯一键都必须包含分区列, 所以新表:
+  PRIMARY KEY (id, open_time), UNIQUE idx_unique_kline (symbol, exchange, timeframe, open_time)
+open_time 与 timestamp 一一对应, save_klines 的 ON DUPLICATE KEY 语义不变
+(同一根 K 线曾以不同 timestamp 写法重复入库的, 迁移时只保留 id 最小的一条).
+
+步骤: 建 kline_data_new (同结构 + 分区) → 按 id 分批 INSERT IGNORE → 追平 → 原子 RENAME
+→ 把换名期间写进旧表的行和最近一天的更新补进新表. 旧表保留为 kline_data_old, 核对后手工 DROP.
+
+  python scripts/partition_kline_data.py            # 只打印计划
+  python scripts/partition_kline_data.py --apply    # 执行
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import pymysql
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from app.services.kline_storage import TABLE, KlineStorageManager, partition_clause  # noqa: E402
+from app.utils.config_loader import get_db_config  # noqa: E402
+
+NEW_TABLE = f"{TABLE}_new"
+OLD_TABLE = f"{TABLE}_old"
+COPY_BATCH = 200_000
+RESYNC_MS = 86400_000
+
+
+def _connect():
+    cfg = dict(get_db_config())
+    cfg.setdefault("charset", "utf8mb4")
+    cfg["autocommit"] = True
+    cfg["read_timeout"] = cfg["write_timeout"] = 3600
+    return pymysql.connect(**cfg)
+
+
+def _copy_range(cur, src: str, lo: int, hi: int) -> int:
+    cur.execute(f"INSERT IGNORE INTO {NEW_TABLE} SELECT * FROM {src} WHERE id > %s AND id <= %s", (lo, hi))
+    return cur.rowcount
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="kline_data 按月分区迁移")
+    parser.add_argument("--apply", action="store_true", help="执行迁移 (默认只打印计划)")
+    args = parser.parse_args()
+
+    conn = _connect()
+    try:
+        with conn.cursor() as cur:
+            if KlineStorageManager.partitions(cur):
+                print(f"{TABLE} 已分区, 无需迁移")
+                return
+            cur.execute(f"SELECT MIN(open_time), MIN(id), MAX(id) FROM {TABLE}")
+            first_ms, min_id, max_id = cur.fetchone()
+            if first_ms is None:
+                print(f"{TABLE} 为空")
+                return
+            clause = partition_clause(int(first_ms), int(time.time() * 1000))
+            print(f"{TABLE}: id {min_id}..{max_id}, 最早 open_time {first_ms}")
+            print(clause)
+            if not args.apply:
+                print("\n(未执行, 加 --apply 迁移)")
+                return
+
+            cur.execute(f"DROP TABLE IF EXISTS {NEW_TABLE}")
+            cur.execute(f"CREATE TABLE {NEW_TABLE} LIKE {TABLE}")
+            cur.execute(
+                f"ALTER TABLE {NEW_TABLE} DROP PRIMARY KEY, ADD PRIMARY KEY (id, open_time), "
+                "DROP INDEX idx_unique_kline, "
+                "ADD UNIQUE KEY idx_unique_kline (symbol, exchange, timeframe, open_time)"
+            )
+            cur.execute(f"ALTER TABLE {NEW_TABLE} {clause}")
+
+            copied, last = 0, min_id - 1
+            t0 = time.time()
+            while last < max_id:
+                hi = min(last + COPY_BATCH, max_id)
+                copied += _copy_range(cur, TABLE, last, hi)
+                last = hi
+                print(f"  拷贝至 id {last}/{max_id}, {copied} 行, {time.time() - t0:.0f}s", flush=True)
+
+            # 追平拷贝期间的新写入, 再原子换名
+            cur.execute(f"SELECT MAX(id) FROM {TABLE}")
+            tail = cur.fetchone()[0]
+            copied += _copy_range(cur, TABLE, last, tail)
+            cur.execute(f"RENAME TABLE {TABLE} TO {OLD_TABLE}, {NEW_TABLE} TO {TABLE}")
+            cur.execute(f"SELECT MAX(id) FROM {OLD_TABLE}")
+            final = cur.fetchone()[0]
+            copied += _copy_range(cur, OLD_TABLE, tail, final)
+
+            # 拷贝后旧表上被 ON DUPLICATE KEY 改过的近期 K 线以旧表为准再同步一次
+            cur.execute(f"SELECT MAX(open_time) FROM {OLD_TABLE}")
+            recent = int(cur.fetchone()[0]) - RESYNC_MS
+            cur.execute(
+                f"INSERT INTO {TABLE} SELECT * FROM {OLD_TABLE} WHERE open_time >= %s "
+                "ON DUPLICATE KEY UPDATE open_price = VALUES(open_price), high_price = VALUES(high_price), "
+                "low_price = VALUES(low_price), close_price = VALUES(close_price), volume = VALUES(volume), "
+                "quote_volume = VALUES(quote_volume), number_of_trades = VALUES(number_of_trades), "
+                "taker_buy_base_volume = VALUES(taker_buy_base_volume), "
+                "taker_buy_quote_volume = VALUES(taker_buy_quote_volume)",
+                (recent,),
+            )
+            print(f"完成: {copied} 行, {time.time() - t0:.0f}s; 旧表 {OLD_TABLE} 核对后手工 DROP")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+历史回放回测: 用线上决策代码 (SmartDecisionBrain / Playbook / midline) 重放 kline_data.
+
+    # 默认 config.yaml 全部币种, 四个策略, 15m 步长
+    python scripts/run_replay_backtest.py --start 2026-06-01 --end 2026-09-01 --workers 16
+
+    # 验证新评分权重 (JSON: {"position_low": {"long": 15, "short": 0}, ...}, 与库里权重合并)
+    python scripts/run_replay_backtest.py --start 2026-06-01 --end 2026-09-01 \\
+        --strategies brain --weights new_weights.json --out trades_new.csv --save new.json
+
+    # 覆盖出场参数: 策略=止损%,止盈%,持仓小时
+    python scripts/run_replay_backtest.py --start 2026-08-01 --end 2026-09-01 \\
+        --strategies playbook --exit playbook=3,6,4
+
+时间按 UTC 解释. 回放与线上的差异见 app/services/replay_engine.py 模块说明.
+"""
+from __future__ import annotations
+
+import argparse
+import csv
+import json
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+
+def _parse_time(s: str) -> datetime:
+    for fmt in ('%Y-%m-%d %H:%M', '%Y-%m-%d'):
+        try:
+            return datetime.strptime(s, fmt)
+        except ValueError:
+            continue
+    raise argparse.ArgumentTypeError(f"时间格式应为 YYYY-MM-DD[ HH:MM]: {s}")
+
+
+def _parse_exit(items):
+    from app.services.replay_engine import ExitParams
+
+    out = {}
+    for item in items or []:
+        name, _, spec = item.partition('=')
+        sl, tp, hours = (float(x) for x in spec.split(','))
+        out[name.strip()] = ExitParams(sl, tp, hours)
+    return out
+
+
+def print_summary(summary: dict, stats: dict) -> None:
+    print(f"\n{stats['symbols']} 币种 x {stats['steps']} 步, {stats['evaluations']} 次评估, "
+          f"{stats['workers']} workers, 用时 {stats['total_ms'] / 1000:.1f}s")
+    print(f"  {'strategy':<14} {'trades':>6} {'win%':>6} {'avg%':>7} {'total%':>8} {'PF':>5} {'maxDD%':>7} "
+          f"{'hold(m)':>8}  exits")
+    for name, s in summary.items():
+        pf = '-' if s['profit_factor'] is None else s['profit_factor']
+        print(f"  {name:<14} {s['trades']:>6} {s['win_rate']:>6} {s['avg_pnl_pct']:>7} {s['total_pnl_pct']:>8} "
+              f"{pf!s:>5} {s['max_drawdown_pct']:>7} {s['avg_hold_minutes']:>8}  {s['exits']}")
+
+
+def main() -> None:
+    from app.services.replay_engine import (
+        DEFAULT_EXEC_TF, DEFAULT_FEE_PCT, DEFAULT_STEP_TF, DEFAULT_WORKERS, STRATEGIES, run_replay,
+    )
+
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument('--start', type=_parse_time, required=True)
+    ap.add_argument('--end', type=_parse_time, required=True)
+    ap.add_argument('--symbols', help='逗号分隔, 缺省取 config.yaml')
+    ap.add_argument('--limit', type=int, help='只取前 N 个币种 (快速试跑)')
+    ap.add_argument('--strategies', default=','.join(STRATEGIES), help=f"可选: {','.join(STRATEGIES)}")
+    ap.add_argument('--step', default=DEFAULT_STEP_TF, help='扫描步长周期')
+    ap.add_argument('--exec-tf', default=DEFAULT_EXEC_TF, help='成交 / SL-TP 检查周期')
+    ap.add_argument('--workers', type=int, default=DEFAULT_WORKERS)
+    ap.add_argument('--fee', type=float, default=DEFAULT_FEE_PCT, help='单边手续费 (百分点)')
+    ap.add_argument('--weights', help='SmartDecisionBrain 评分权重覆盖 (JSON 文件)')
+    ap.add_argument('--threshold', type=float, help='SmartDecisionBrain 开仓阈值覆盖')
+    ap.add_argument('--exit', action='append', metavar='STRATEGY=SL,TP,HOURS', help='覆盖出场参数, 可重复')
+    ap.add_argument('--out', help='逐笔成交写入 CSV')
+    ap.add_argument('--save', help='汇总写入 JSON')
+    args = ap.parse_args()
+
+    from app.utils.config_loader import get_db_config
+
+    if args.symbols:
+        symbols = [s.strip() for s in args.symbols.split(',') if s.strip()]
+    else:
+        from app.services.midline_swing_scanner import load_config_yaml_symbols
+        symbols = load_config_yaml_symbols()
+    if args.limit:
+        symbols = symbols[:args.limit]
+
+    weights = None
+    if args.weights:
+        with open(args.weights, encoding='utf-8') as f:
+            weights = json.load(f)
+
+    def state_hook(state: dict) -> None:
+        if weights:
+            state['scoring_weights'] = {**state.get('scoring_weights', {}), **weights}
+        if args.threshold is not None:
+            state['threshold'] = args.threshold
+
+    print(f"回放 {args.start:%Y-%m-%d %H:%M} ~ {args.end:%Y-%m-%d %H:%M} UTC, {len(symbols)} 币种, "
+          f"策略 {args.strategies}, 步长 {args.step}")
+    result = run_replay(
+        get_db_config(), symbols, args.start, args.end,
+        strategies=[s.strip() for s in args.strategies.split(',') if s.strip()],
+        step_tf=args.step, exec_tf=args.exec_tf, workers=args.workers, fee_pct=args.fee,
+        exit_params=_parse_exit(args.exit), state_hook=state_hook,
+    )
+    print_summary(result['summary'], result['stats'])
+
+    if args.out:
+        rows = [t.to_row() for t in result['trades']]
+        with open(args.out, 'w', newline='', encoding='utf-8') as f:
+            if rows:
+                writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+                writer.writeheader()
+                writer.writerows(rows)
+        print(f"\n逐笔成交已保存: {args.out} ({len(rows)} 笔)")
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump({
+                'args': {k: (str(v) if isinstance(v, datetime) else v) for k, v in vars(args).items()},
+                'at': time.strftime('%Y-%m-%d %H:%M:%S'),
+                'summary': result['summary'],
+                'stats': result['stats'],
+            }, f, ensure_ascii=False, indent=2, default=str)
+        print(f"汇总已保存: {args.save}")
+
+
+if __name__ == '__main__':
+    main()
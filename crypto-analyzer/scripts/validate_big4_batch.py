@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+"""Big4 趋势检测离线校验: 批量读取 K 线 / 15M 矩阵计数与逐币种口径一致 / 紧急干预 / 5m 分段缓存 (脚本化连接, 不连库)."""
+from __future__ import annotations
+
+import random
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+HOUR_MS = 3600_000
+M15_MS = 900_000
+SYMBOLS = ['BTC/USDT', 'ETH/USDT', 'BNB/USDT', 'SOL/USDT']
+
+
+def _ok(msg: str) -> None:
+    print(f"  OK  {msg}")
+
+
+def _fail(msg: str) -> None:
+    print(f"  FAIL {msg}")
+    raise SystemExit(1)
+
+
+def _walk(end_open: int, period: int, n: int, seed: int, price: float = 100.0, drift: float = 0.0) -> list:
+    """(open_time, o, h, l, c, v) 升序, 最后一根 open_time = end_open"""
+    rng = random.Random(seed)
+    out = []
+    for i in range(n):
+        o = price
+        c = o * (1 + drift + rng.gauss(0, 0.004))
+        out.append([end_open - (n - 1 - i) * period, o, max(o, c) * 1.001, min(o, c) * 0.999, c, 10.0])
+        price = c
+    return out
+
+
+class _Cursor:
+    """kline_data 查询按 load_klines_bulk 的参数返回; 其它 SELECT 返回空, 写入记录下来"""
+
+    def __init__(self, db):
+        self.db = db
+        self._rows = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, args=None):
+        flat = " ".join(sql.split())
+        self._rows = []
+        if "FROM kline_data" in flat:
+            self.db.kline_queries += 1
+            tf, _, since, *rest = args
+            symbols, limit = (rest[:-1], rest[-1]) if "ROW_NUMBER" in flat else (rest, None)
+            for s in symbols:
+                rows = [r for r in self.db.bars[tf].get(s, []) if r[0] >= since]
+                self._rows += [(s, *r) for r in (rows[-limit:] if limit else rows)]
+        elif flat.startswith("INSERT"):
+            self.db.writes.append(flat.split("(")[0].strip())
+
+    def fetchall(self):
+        return self._rows
+
+    def fetchone(self):
+        return self._rows[0] if self._rows else None
+
+    def close(self):
+        pass
+
+
+class _Conn:
+    def __init__(self, db):
+        self.db = db
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def cursor(self, *args):
+        return _Cursor(self.db)
+
+    def commit(self):
+        pass
+
+
+class _DB:
+    def __init__(self, bars):
+        self.bars = bars
+        self.kline_queries = 0
+        self.writes = []
+
+    def get_connection(self):
+        return _Conn(self)
+
+
+def _detector(db):
+    from app.services import big4_trend_detector as b4
+
+    b4.get_global_pool = lambda *a, **k: db
+    return b4.Big4TrendDetector()
+
+
+def _reference_v3(detector, desc_rows):
+    """改造前口径: DESC 行, 索引0最新"""
+    first_open = float(desc_rows[15][1])
+    last_close = float(desc_rows[0][4])
+    change = (last_close - first_open) / first_open * 100
+    bearish = sum(1 for k in desc_rows if float(k[4]) < float(k[1]))
+    return bearish, change
+
+
+def test_matrix_matches_per_symbol() -> None:
+    print("[1] 15M 4×16 矩阵计数 == 逐币种口径 (信号 / 强度 / 原因逐字段)")
+    db = _DB({})
+    det = _detector(db)
+    checked = 0
+    for seed in range(300):
+        drift = (seed % 7 - 3) * 0.002
+        bars = {s: _walk(0, M15_MS, 16, seed * 4 + i, drift=drift) for i, s in enumerate(SYMBOLS)}
+        if seed % 50 == 0:
+            bars['BNB/USDT'] = bars['BNB/USDT'][-10:]          # 数据不足
+        arrays = {s: {'open_time': np.array([r[0] for r in b]), 'open': np.array([r[1] for r in b]),
+                      'close': np.array([r[4] for r in b])} for s, b in bars.items()}
+        got = det._analyze_big4(arrays)
+        for s in SYMBOLS:
+            rows = bars[s]
+            if len(rows) < 16:
+                if got[s]['reason'] != '15M数据不足':
+                    _fail(f"{s} 数据不足应为中性: {got[s]}")
+                continue
+            want = det._analyze_symbol_v2(s, *_reference_v3(det, rows[::-1]))
+            if got[s] != want:
+                _fail(f"seed={seed} {s}: {got[s]} != {want}")
+            checked += 1
+    _ok(f"{checked} 个币种样本逐字段一致 (含强多/多/中性/空/强空, BTC 放宽阈值)")
+
+
+def _scenario(now_dt: datetime, plunge: bool = False):
+    """SOL 最新 1H 长下影线 + 72H 持续下跌 (深V); plunge: ETH 4H 内跌 6% 后反弹; 其余平稳"""
+    now_ms = int(now_dt.timestamp() * 1000)
+    h_open = now_ms // HOUR_MS * HOUR_MS
+    m15_last = now_ms // M15_MS * M15_MS - M15_MS
+    h1 = {s: _walk(h_open, HOUR_MS, 80, 10 + i) for i, s in enumerate(SYMBOLS)}
+    sol = _walk(h_open, HOUR_MS, 80, 99, drift=-0.001)
+    peak = max(r[2] for r in sol[-72:])
+    o = sol[-1][1]
+    sol[-1] = [h_open, o, o * 1.002, min(o * 0.97, peak * 0.92), o * 1.001, 10.0]   # 下影 3%, 距 72H 高点 -8% 以上
+    h1['SOL/USDT'] = sol
+    if plunge:
+        eth = h1['ETH/USDT']
+        p = eth[-4][1]
+        eth[-3] = [eth[-3][0], p, p, p * 0.94, p * 0.945, 10.0]          # 4H 窗口内 -6%
+        eth[-2] = [eth[-2][0], p * 0.945, p * 0.96, p * 0.944, p * 0.958, 10.0]
+        eth[-1] = [eth[-1][0], p * 0.958, p * 0.965, p * 0.955, p * 0.962, 10.0]
+    m15 = {s: _walk(m15_last, M15_MS, 20, 50 + i, drift=0.002) for i, s in enumerate(SYMBOLS)}
+    return {'15m': m15, '1h': h1}, now_ms
+
+
+def test_emergency_from_arrays() -> None:
+    print("[2] 紧急干预由批量 1H 数组判断: 深V / 4H 剧烈下跌, 只有写入走库")
+    from app.services import big4_trend_detector as b4
+
+    # 当前小时第 20 分钟: 最新 1H 开盘 20 分钟内 (深V 时效), 且在 load_klines_bulk 的查询下界内
+    now_dt = datetime.fromtimestamp(int(time.time()) // 3600 * 3600 + 20 * 60)
+
+    class _Now(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return now_dt
+
+    def run(plunge):
+        bars, _ = _scenario(now_dt, plunge)
+        db = _DB(bars)
+        det = _detector(db)
+        b4.datetime = _Now
+        try:
+            with db.get_connection() as conn:
+                loaded = det._load_bars(conn)
+                queries = db.kline_queries
+                em = det._detect_emergency_reversal(conn, loaded['1h'])
+        finally:
+            b4.datetime = datetime
+        if queries != 2 or db.kline_queries != 2:
+            _fail(f"K 线应只查 2 次 (15m / 1h 各一条): {db.kline_queries}")
+        if {s: len(v['open_time']) for s, v in loaded['1h'].items()} != {s: b4.BIG4_1H_BARS for s in SYMBOLS}:
+            _fail("1H 应各取 BIG4_1H_BARS 根")
+        return em, db.writes
+
+    em, writes = run(False)
+    if em['bounce_symbols'] != ['SOL/USDT'] or not em['bounce_opportunity'] or not em['block_short'] \
+            or em['block_long']:
+        _fail(f"{em}")
+    if writes != ['INSERT INTO bounce_window', 'INSERT INTO emergency_intervention']:
+        _fail(f"{writes}")
+
+    # 4H 窗口 -6% 同时满足触底 (跌幅) 与触顶 (低点起涨幅) 阈值 → 冲突自动解除 (与改造前一致)
+    em, writes = run(True)
+    if em['block_long'] or em['block_short'] or not (em['bottom_detected'] and em['top_detected']):
+        _fail(f"{em}")
+    _ok("2 条 K 线查询 (改造前每次 12+ 条); SOL 深V 开反弹窗口并禁止做空; ETH 4H 剧烈震荡触底+触顶冲突解除")
+
+
+def test_memo() -> None:
+    print("[3] 5m 分段缓存: 段内重复调用不重算, 每次仍写 big4_trend_history; K 线未到时短暂缓存")
+    from app.services import big4_trend_detector as b4
+
+    clock = {'t': 0.0}
+
+    class _Time:
+        @staticmethod
+        def time():
+            return clock['t']
+
+    b4.time = _Time
+    try:
+        epoch0 = int(time.time() * 1000) // b4.MEMO_EPOCH_MS * b4.MEMO_EPOCH_MS
+        clock['t'] = (epoch0 + 10_000) / 1000
+        bars, _ = _scenario(datetime.fromtimestamp(clock['t']))
+        db = _DB(bars)
+        det, other = _detector(db), _detector(db)
+        b4._memo.update(epoch=None, result=None)
+
+        r1 = det.detect_market_trend()
+        q1 = db.kline_queries
+        clock['t'] += 200
+        r2 = other.detect_market_trend()                 # 另一个实例, 同一段
+        if db.kline_queries != q1 or r2 is r1 or r2['overall_signal'] != r1['overall_signal']:
+            _fail(f"段内应命中缓存 (查询 {q1} → {db.kline_queries})")
+        r2['details'].clear()
+        if not det.detect_market_trend()['details']:
+            _fail("返回的应是副本")
+        if db.writes.count('INSERT INTO big4_trend_history') != 3:
+            _fail(f"每次调用都应写历史: {db.writes}")
+        clock['t'] += 100                                 # 进入下一段
+        det.detect_market_trend()
+        if db.kline_queries != 2 * q1:
+            _fail("新的一段应重算")
+
+        # 本段最近一根 15M 还没落库
+        for s in SYMBOLS:
+            bars['15m'][s] = bars['15m'][s][:-1]
+        clock['t'] += b4.MEMO_EPOCH_MS / 1000
+        det.detect_market_trend()
+        q = db.kline_queries
+        clock['t'] += 10
+        det.detect_market_trend()
+        if db.kline_queries != q:
+            _fail("K 线未到时 MEMO_LATE_RETRY_S 内仍用缓存")
+        clock['t'] += b4.MEMO_LATE_RETRY_S
+        det.detect_market_trend()
+        if db.kline_queries != q + 2:
+            _fail("超过 MEMO_LATE_RETRY_S 应重算")
+    finally:
+        b4.time = time
+    _ok("同段两个实例共用 1 次计算, 返回副本; 跨段 / K 线迟到超过 30s 重算")
+
+
+def main() -> None:
+    import logging
+
+    from loguru import logger
+
+    logger.remove()
+    logging.disable(logging.CRITICAL)
+    test_matrix_matches_per_symbol()
+    test_emergency_from_arrays()
+    test_memo()
+    print("\n全部通过")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""scan_all 并行分片离线校验: 分片结果 ↔ 串行扫描 / scan_state → apply_scan_state 往返 / 分片超时回落串行 (不连库).
+
+analyze() 换成只依赖扫描状态 + 预取 K 线的确定性打分; 进程池仍是真实的 spawn 池,
+工作进程的初始化函数换成本脚本里的 _init_stub_worker (不建 SmartDecisionBrain 的 DB 服务).
+"""
+from __future__ import annotations
+
+import os
+import pickle
+import random
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+N_SYMBOLS = 40
+PARALLEL_CFG = {'enabled': True, 'workers': 3, 'min_symbols_per_shard': 5}
+
+
+def _ok(msg: str) -> None:
+    print(f"  OK  {msg}")
+
+
+def _fail(msg: str) -> None:
+    print(f"  FAIL {msg}")
+    raise SystemExit(1)
+
+
+def _stub_brain_class():
+    from smart_trader_service import SmartDecisionBrain
+
+    class _StubBrain(SmartDecisionBrain):
+        """跳过 __init__ 的 DB 服务; analyze 只读 scan_state 覆盖的字段"""
+
+        def __init__(self, db_config: dict = None):
+            self.db_config = db_config or {}
+            self.whitelist = []
+            self.blacklist = []
+            self.signal_blacklist = {}
+            self.scoring_weights = {}
+            self.threshold = 55
+            self.max_threshold = 150
+            self.signal_confirmation_enabled = False
+            self.big4_filter_enabled = True
+            self.market_adx = 25.0
+            self.parallel_scan_config = {}
+            self.slow_symbols = {}
+
+        def prefetch_scan_klines(self, symbols) -> dict:
+            out = {}
+            for symbol in symbols:
+                rng = random.Random(symbol)
+                entry = {}
+                for tf, limit in self.SCAN_KLINES:
+                    price, rows = 100.0, []
+                    for _ in range(limit):
+                        o, price = price, price * (1 + rng.gauss(0, 0.01))
+                        rows.append({'open': o, 'high': max(o, price), 'low': min(o, price),
+                                     'close': price, 'volume': rng.uniform(0, 1e4)})
+                    entry[tf] = rows
+                if symbol in self.slow_symbols:
+                    entry['slow_s'] = self.slow_symbols[symbol]
+                out[symbol] = entry
+            return out
+
+        def analyze(self, symbol: str, big4_result: dict = None, klines: dict = None):
+            klines = klines or {}
+            time.sleep(klines.get('slow_s', 0))
+            if symbol not in self.whitelist or symbol in self.blacklist:
+                return None
+            score = 0.0
+            for tf, _ in self.SCAN_KLINES:
+                rows = klines.get(tf) or []
+                if rows:
+                    move = (rows[-1]['close'] / rows[0]['open'] - 1) * 100
+                    score += abs(move) * self.scoring_weights.get(tf, 1.0)
+            score *= self.market_adx / 25.0
+            side = 'LONG' if klines['1h'][-1]['close'] >= klines['1h'][0]['open'] else 'SHORT'
+            if self.big4_filter_enabled and big4_result and big4_result.get('overall_signal') == 'BEARISH' \
+                    and side == 'LONG':
+                return None
+            if f"{symbol}_{side}" in self.signal_blacklist:
+                return None
+            if not self.threshold <= score < self.max_threshold:
+                return None
+            return {'symbol': symbol, 'side': side, 'score': round(score, 6),
+                    'confirmed': self.signal_confirmation_enabled}
+
+    return _StubBrain
+
+
+def _init_stub_worker(db_config: dict) -> None:
+    """替代 brain_parallel_scan._init_worker (spawn 子进程里按 __mp_main__ 导入本脚本)"""
+    from app.services import brain_parallel_scan as bps
+    bps._worker_brain = _stub_brain_class()(db_config)
+
+
+def _make_brain(symbols):
+    brain = _stub_brain_class()({'host': 'unused'})
+    brain.whitelist = list(symbols)
+    brain.blacklist = symbols[3:6]
+    brain.signal_blacklist = {f"{s}_SHORT": 'test' for s in symbols[10:14]}
+    brain.scoring_weights = {'1d': 0.5, '1h': 3.0, '15m': 6.0}
+    brain.threshold = 8
+    brain.max_threshold = 60
+    brain.signal_confirmation_enabled = True
+    brain.big4_filter_enabled = False
+    brain.market_adx = 31.0
+    return brain
+
+
+def test_state_round_trip() -> None:
+    print("[1] scan_state → pickle (spawn 下发) → apply_scan_state 往返")
+    symbols = [f"C{i:02d}/USDT" for i in range(N_SYMBOLS)]
+    src = _make_brain(symbols)
+    dst = _stub_brain_class()()
+    state = src.scan_state()
+    dst.apply_scan_state(pickle.loads(pickle.dumps(state)))
+    if dst.scan_state() != state:
+        _fail(f"往返后状态不一致:\n      got  {dst.scan_state()}\n      want {state}")
+    src.whitelist.append('NEW/USDT')
+    src.scoring_weights['1h'] = 0.0
+    if 'NEW/USDT' in state['whitelist'] or state['scoring_weights']['1h'] != 3.0:
+        _fail("scan_state 应是快照, 不随主进程后续修改变化")
+    klines = src.prefetch_scan_klines(symbols)
+    diff = [s for s in symbols if _make_brain(symbols).analyze(s, None, klines[s]) != dst.analyze(s, None, klines[s])]
+    if diff:
+        _fail(f"应用状态后 analyze 结果不同: {diff[:5]}")
+    _ok(f"{len(state)} 个字段往返一致, analyze 结果相同")
+
+
+def _scan(brain, big4_result, parallel: bool):
+    brain.parallel_scan_config = PARALLEL_CFG if parallel else {}
+    return brain._scan_symbols(big4_result), dict(brain.last_scan_stats)
+
+
+def test_parallel_matches_serial(brain, symbols) -> None:
+    print(f"[2] spawn 进程池分片扫描 ↔ 串行扫描 ({N_SYMBOLS} 币, "
+          f"{PARALLEL_CFG['workers']} workers, 每片至少 {PARALLEL_CFG['min_symbols_per_shard']} 币)")
+    for big4 in (None, {'overall_signal': 'BEARISH', 'signal_strength': 70}):
+        brain.big4_filter_enabled = big4 is not None
+        serial, serial_stats = _scan(brain, big4, parallel=False)
+        parallel, stats = _scan(brain, big4, parallel=True)
+        if serial_stats['mode'] != 'serial' or stats['mode'] != 'parallel':
+            _fail(f"模式错误: {serial_stats['mode']} / {stats['mode']}")
+        if parallel != serial:
+            _fail(f"big4={big4} 并行结果与串行不同:\n      got  {parallel}\n      want {serial}")
+        if not serial:
+            _fail("串行扫描无机会, 用例没有覆盖合并")
+        shards = stats['shards']
+        if len(shards) != PARALLEL_CFG['workers'] or sum(s['symbols'] for s in shards) != len(symbols):
+            _fail(f"分片统计不对: {shards}")
+        if sum(s['opportunities'] for s in shards) != len(parallel) or any(s['pid'] == os.getpid() for s in shards):
+            _fail(f"分片机会数 / 进程号不对: {shards}")
+    _ok(f"两种 Big4 状态下结果与顺序一致 (最后一轮 {len(parallel)} 个机会, {len(shards)} 片)")
+
+
+def test_shard_timeout_fallback(brain, symbols) -> None:
+    from app.services import brain_parallel_scan as bps
+
+    timeout_s = 0.5
+    print(f"[3] 分片超时 (SHARD_TIMEOUT_S={timeout_s}s) → 关闭进程池, 本轮回落串行, 下轮重建")
+    brain.big4_filter_enabled = False
+    want, _ = _scan(brain, None, parallel=False)
+    scanner = brain._parallel_scanner
+    old_timeout = bps.SHARD_TIMEOUT_S
+    bps.SHARD_TIMEOUT_S = timeout_s
+    brain.slow_symbols = {symbols[-1]: 1.5}
+    try:
+        t0 = time.perf_counter()
+        got, stats = _scan(brain, None, parallel=True)
+        elapsed = time.perf_counter() - t0
+    finally:
+        bps.SHARD_TIMEOUT_S = old_timeout
+        brain.slow_symbols = {}
+    if stats['mode'] != 'serial' or got != want:
+        _fail(f"超时后应回落串行并得到相同结果: mode={stats['mode']}")
+    if scanner._pool is not None:
+        _fail("超时后进程池应已关闭")
+    if elapsed < timeout_s:
+        _fail(f"耗时 {elapsed:.2f}s, 未等到超时")
+
+    got, stats = _scan(brain, None, parallel=True)
+    if stats['mode'] != 'parallel' or got != want or scanner._pool is None:
+        _fail("下一轮应重建进程池并恢复并行")
+    _ok(f"超时回落串行 ({elapsed:.1f}s), 结果一致; 下一轮重建进程池")
+
+
+def main() -> None:
+    from loguru import logger
+    from app.services import brain_parallel_scan as bps
+
+    _stub_brain_class()                       # smart_trader_service 导入时会加日志 handler
+    logger.remove()
+    bps._init_worker = _init_stub_worker      # spawn 池按名字引用, 子进程里导入本脚本
+    test_state_round_trip()
+    symbols = [f"C{i:02d}/USDT" for i in range(N_SYMBOLS)]
+    brain = _make_brain(symbols)
+    try:
+        test_parallel_matches_serial(brain, symbols)
+        test_shard_timeout_fallback(brain, symbols)
+    finally:
+        if getattr(brain, '_parallel_scanner', None) is not None:
+            brain._parallel_scanner.shutdown()
+    print("\n全部通过")
+
+
+if __name__ == "__main__":
+    main()
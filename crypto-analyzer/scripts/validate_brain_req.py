@@ -430,11 +430,11 @@ def test_scheduler_brain() -> None:
             _ok("scheduler 15s")
     else:
         _ok("scheduler 15s")
-    if "run_explore_round" not in src or "DeepSeekExplore" not in src:
+    if "run_explore_round" not in src or "'deepseek_explore'" not in src:
         _fail("scheduler 对照期应保留 DeepSeek 探索调度")
     else:
         _ok("scheduler DeepSeek explore (对照期)")
-    if "run_predict_round" not in src:
+    if "run_predict_round" not in src or "'deepseek_predict'" not in src:
         _fail("scheduler 对照期应保留 DeepSeek 预测调度")
     else:
         _ok("scheduler DeepSeek predict (对照期)")
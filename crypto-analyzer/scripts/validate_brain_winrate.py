@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""brain_winrate 向量化 / 增量评估离线校验: 与逐根 Python 口径逐币一致, 增量 == 全量重算 (不连库)."""
+from __future__ import annotations
+
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+import numpy as np  # noqa: E402
+
+HOUR_MS = 3600 * 1000
+
+
+def _ok(msg: str) -> None:
+    print(f"  OK  {msg}")
+
+
+def _fail(msg: str) -> None:
+    print(f"  FAIL {msg}")
+    raise SystemExit(1)
+
+
+def _closes(n: int, seed: int) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    # 分段漂移, 保证 LONG / SHORT / FLAT 都有
+    drift = np.repeat(rng.normal(0, 0.004, n // 48 + 1), 48)[:n]
+    return np.round(100 * np.exp(np.cumsum(drift + rng.normal(0, 0.006, n))), 6)
+
+
+def _scalar(symbol: str, closes: list) -> dict:
+    """改造前的逐根 Python 口径"""
+    from app.services.brain_config import BARS_1H_WEEK, WINRATE_FORWARD_HOURS, WINRATE_LOOKBACK_DAYS
+    from app.services.brain_winrate import _direction_at, _forward_win
+
+    fwd = WINRATE_FORWARD_HOURS
+    if len(closes) < BARS_1H_WEEK + fwd + 10:
+        return {"n": 0, "wins": 0, "n_long": 0, "wins_long": 0, "n_short": 0, "wins_short": 0}
+    start = max(BARS_1H_WEEK, len(closes) - WINRATE_LOOKBACK_DAYS * 24 - fwd)
+    out = {"n": 0, "wins": 0, "n_long": 0, "wins_long": 0, "n_short": 0, "wins_short": 0}
+    for idx in range(start, len(closes) - fwd, fwd):
+        side = _direction_at(closes, idx, BARS_1H_WEEK)
+        if side == "FLAT":
+            continue
+        ok = _forward_win(closes, idx, side, fwd)
+        if ok is None:
+            continue
+        key = "long" if side == "LONG" else "short"
+        out["n"] += 1
+        out[f"n_{key}"] += 1
+        out["wins"] += int(ok)
+        out[f"wins_{key}"] += int(ok)
+    return out
+
+
+def _counts(r: dict) -> dict:
+    return {k: r[k] for k in ("n", "wins", "n_long", "wins_long", "n_short", "wins_short")}
+
+
+class _SeriesEvaluator:
+    """WinrateEvaluator + 内存 K 线源 (替换 _fetch_bulk)"""
+
+    def __new__(cls, series: dict):
+        from app.services.brain_winrate import WinrateEvaluator
+
+        class _Ev(WinrateEvaluator):
+            upto = 0
+
+            def _fetch_bulk(self, conn, symbols, limit, since_ms=None):
+                out = {}
+                for sym in symbols:
+                    t, c = series[sym]
+                    m = t < self.upto
+                    if since_ms is not None:
+                        m &= t >= since_ms
+                    t, c = t[m][-limit:], c[m][-limit:]
+                    if len(t):
+                        out[sym] = (t, c.copy())
+                return out
+
+        return _Ev()
+
+
+def test_vectorized_matches_scalar() -> None:
+    print("[1] 向量化结果与逐根 Python 口径一致")
+    from app.services.brain_winrate import _need_bars, _stack_right, aggregate_winrate, rolling_outcomes
+
+    need = _need_bars()
+    lengths = [need, need, need - 50, 181, 182, 200, 0, need]
+    series = [_closes(n, seed) for seed, n in enumerate(lengths)]
+    stacked = _stack_right(series, need)
+    side, win = rolling_outcomes(stacked, 0, need)
+    for i, closes in enumerate(series):
+        pad = need - len(closes)
+        got = aggregate_winrate(f"S{i}", side[i, pad:], win[i, pad:])
+        want = _scalar(f"S{i}", closes.tolist())
+        if _counts(got) != want:
+            _fail(f"len={len(closes)}: 向量化 {_counts(got)} != 逐根 {want}")
+    _ok(f"{len(series)} 个序列 (含不足 / 左侧填充), 样本计数逐项相同")
+
+
+def test_incremental_equals_full() -> None:
+    print("[2] 逐小时增量 == 全量重算")
+    from app.services.brain_config import BARS_1H_WEEK
+    from app.services.brain_winrate import _need_bars
+
+    need = _need_bars()
+    t0 = 1_760_000_000_000 // HOUR_MS * HOUR_MS
+    total = need + 60
+    series = {}
+    for i in range(12):
+        n = total - (i % 3) * 200          # 部分币种历史较短
+        t = t0 + np.arange(total - n, total, dtype=np.int64) * HOUR_MS
+        series[f"C{i}/USDT"] = (t, _closes(n, 100 + i))
+    symbols = list(series)
+
+    ev = _SeriesEvaluator(series)
+    ev.upto = t0 + need * HOUR_MS
+    ev.refresh(None, symbols, force=True)
+    for h in range(need + 1, total + 1):
+        ev.upto = t0 + h * HOUR_MS
+        if h == need + 30:                 # 上一根收盘价被修正
+            t, c = series["C0/USDT"]
+            c[np.searchsorted(t, ev.upto) - 2] *= 1.05
+        ev.refresh(None, symbols, force=True)
+    evaluated_incr = ev.stats["bars_evaluated"]
+
+    full = _SeriesEvaluator(series)
+    full.upto = ev.upto
+    full.refresh(None, symbols, force=True)
+    for sym in symbols:
+        if ev.results[sym] != full.results[sym]:
+            _fail(f"{sym}: 增量 {ev.results[sym]} != 全量 {full.results[sym]}")
+        # 前 BARS_1H_WEEK 根窗口不全, 不参与采样; 增量保留的是裁剪前算出的值
+        w = slice(BARS_1H_WEEK, None)
+        if not (np.array_equal(ev._side[sym][w], full._side[sym][w])
+                and np.array_equal(ev._win[sym][w], full._win[sym][w])):
+            _fail(f"{sym}: 逐根结果不一致")
+        t, c = series[sym]
+        if _counts(ev.results[sym]) != _scalar(sym, c[t < ev.upto][-need:].tolist()):
+            _fail(f"{sym}: 与逐根口径不一致")
+    per_hour = (evaluated_incr - full.stats["bars_evaluated"]) / (total - need)
+    _ok(f"{total - need} 次刷新 (含一次收盘价修正), 每次平均重算 {per_hour:.1f} 根/池 (全量 {full.stats['bars_evaluated']})")
+
+
+def bench() -> None:
+    print("[3] 80 币种池耗时")
+    from app.services.brain_winrate import _need_bars, _stack_right, aggregate_winrate, rolling_outcomes
+
+    need = _need_bars()
+    series = [_closes(need, 500 + i) for i in range(80)]
+    t = time.perf_counter()
+    for i, c in enumerate(series):
+        _scalar(f"S{i}", c.tolist())
+    scalar_ms = (time.perf_counter() - t) * 1000
+    t = time.perf_counter()
+    side, win = rolling_outcomes(_stack_right(series, need), 0, need)
+    for i in range(len(series)):
+        aggregate_winrate(f"S{i}", side[i], win[i])
+    vec_ms = (time.perf_counter() - t) * 1000
+
+    t0 = 1_760_000_000_000 // HOUR_MS * HOUR_MS
+    times = t0 + np.arange(need + 1, dtype=np.int64) * HOUR_MS
+    symbols = [f"S{i}/USDT" for i in range(80)]
+    ev = _SeriesEvaluator({s: (times, np.append(c, c[-1] * 1.001)) for s, c in zip(symbols, series)})
+    ev.upto = t0 + need * HOUR_MS
+    ev.refresh(None, symbols, force=True)
+    ev.upto += HOUR_MS
+    t = time.perf_counter()
+    ev.refresh(None, symbols, force=True)
+    incr_ms = (time.perf_counter() - t) * 1000
+    _ok(f"逐根 Python {scalar_ms:.1f}ms / 全量向量化 {vec_ms:.1f}ms / 单根增量 {incr_ms:.1f}ms (不含读库)")
+
+
+def main() -> None:
+    from loguru import logger
+
+    logger.remove()                        # 不连库, 跳过 brain_symbol_winrate 写入告警
+    test_vectorized_matches_scalar()
+    test_incremental_equals_full()
+    bench()
+    print("\n全部通过")
+
+
+if __name__ == "__main__":
+    main()
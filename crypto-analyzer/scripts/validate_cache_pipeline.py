@@ -0,0 +1,361 @@
+#!/usr/bin/env python3
+"""缓存刷新 DAG 离线校验: 依赖顺序与并行 / 非法图 / 上游失败 / 投资建议用内存结果 + 缺失批量兜底 / 批量评分口径 (不连库)."""
+from __future__ import annotations
+
+import asyncio
+import sys
+import threading
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+SYMBOLS = ['BTC/USDT', 'ETH/USDT', 'SOL/USDT']
+
+
+def _ok(msg: str) -> None:
+    print(f"  OK  {msg}")
+
+
+def _fail(msg: str) -> None:
+    print(f"  FAIL {msg}")
+    raise SystemExit(1)
+
+
+def test_dag_order() -> None:
+    print("[1] 无依赖阶段并行, 下游等全部上游完成后拿到其输出")
+    from app.services.cache_pipeline import CachePipeline, Stage, format_timings, timings_dict
+
+    active, peak, lock = [0], [0], threading.Lock()
+
+    def leaf(name, delay):
+        def run():
+            with lock:
+                active[0] += 1
+                peak[0] = max(peak[0], active[0])
+            time.sleep(delay)
+            with lock:
+                active[0] -= 1
+            return name
+        return run
+
+    pipeline = CachePipeline([
+        Stage('sink', lambda **kw: dict(kw), ('a', 'b', 'c')),
+        Stage('a', leaf('a', 0.2)),
+        Stage('b', leaf('b', 0.2)),
+        Stage('c', leaf('c', 0.2)),
+    ])
+    if pipeline.order[-1] != 'sink':
+        _fail(f"拓扑序: {pipeline.order}")
+    t0 = time.perf_counter()
+    results = pipeline.run()
+    wall = time.perf_counter() - t0
+    if results['sink'].output != {'a': 'a', 'b': 'b', 'c': 'c'}:
+        _fail(f"{results['sink']}")
+    if peak[0] != 3 or wall > 0.5:
+        _fail(f"三个叶子应并行 (峰值 {peak[0]}, {wall:.2f}s)")
+    if results['sink'].start_ms < max(results[n].start_ms + results[n].elapsed_ms for n in 'abc') - 1:
+        _fail("sink 早于上游完成就开始了")
+    stats = timings_dict(results)
+    if set(stats) != {'a', 'b', 'c', 'sink'} or stats['sink']['inputs'] != ['a', 'b', 'c']:
+        _fail(f"{stats}")
+    if '总' not in format_timings(results):
+        _fail("format_timings")
+    _ok(f"3 个 0.2s 阶段墙钟 {wall:.2f}s; 下游拿到全部上游输出; 每阶段有耗时")
+
+
+def test_invalid_and_failed() -> None:
+    print("[2] 成环 / 未知输入 / 重复阶段报错; 上游失败时下游照跑, 输入为 None")
+    from app.services.cache_pipeline import CachePipeline, Stage
+
+    for stages, word in (
+        ([Stage('a', lambda **kw: 1, ('b',)), Stage('b', lambda **kw: 1, ('a',))], '成环'),
+        ([Stage('a', lambda **kw: 1, ('x',))], '不存在'),
+        ([Stage('a', lambda: 1), Stage('a', lambda: 2)], '重复'),
+    ):
+        try:
+            CachePipeline(stages)
+        except ValueError as e:
+            if word not in str(e):
+                _fail(f"{e}")
+        else:
+            _fail(f"应报错: {word}")
+
+    def boom():
+        raise RuntimeError("db down")
+
+    results = CachePipeline([
+        Stage('bad', boom), Stage('good', lambda: 7),
+        Stage('sink', lambda bad, good: (bad, good), ('bad', 'good')),
+    ]).run()
+    if results['bad'].status != 'failed' or 'db down' not in results['bad'].error:
+        _fail(f"{results['bad']}")
+    if results['sink'].status != 'ok' or results['sink'].output != (None, 7):
+        _fail(f"{results['sink']}")
+    _ok("非法图在构造时拒绝; 失败阶段不拖垮下游")
+
+
+class _Row:
+    def __init__(self, d):
+        self._mapping = d
+
+
+class _Session:
+    def __init__(self, db):
+        self.db = db
+
+    def execute(self, sql, params=None):
+        flat = " ".join(str(sql).split())
+        if flat.startswith("INSERT"):
+            self.db.upserts.append(params)
+            self.db.upsert_sql.append(sql)
+            return None
+        self.db.queries.append(flat)
+        table = flat.split(' FROM ')[1].split()[0]
+        keys = (params or {}).get('symbols', [])
+        rows = [_Row(r) for r in self.db.tables.get(table, []) if r['symbol'] in keys]
+        return type('R', (), {'fetchall': lambda _self: rows})()
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class _DBService:
+    def __init__(self, tables):
+        self.tables = tables
+        self.queries = []
+        self.upserts = []
+        self.upsert_sql = []
+
+    def get_session(self):
+        return _Session(self)
+
+
+def _service(db):
+    from app.analyzers.enhanced_investment_analyzer import EnhancedInvestmentAnalyzer
+    from app.services.cache_update_service import CacheUpdateService
+
+    analyzer = EnhancedInvestmentAnalyzer({})
+    analyzer.frames = []
+    batch = analyzer.analyze_many
+    analyzer.analyze_many = lambda frame: analyzer.frames.append(frame) or batch(frame)
+    svc = CacheUpdateService.__new__(CacheUpdateService)
+    svc.config = {'symbols': SYMBOLS}
+    svc.db_service = db
+    svc.investment_analyzer = analyzer
+    svc.last_timings = {}
+    return svc
+
+
+def test_recommendations_in_memory() -> None:
+    print("[3] 投资建议: 上游内存结果直接用, 缺失币种每表一条 IN 查询兜底, 一次批量写回")
+    from app.services import cache_update_service as cus
+
+    tf = cus.RECOMMENDATION_TECH_TIMEFRAME
+    db = _DBService({
+        'price_stats_24h': [{'symbol': s, 'current_price': p, 'change_24h': 1, 'volume_24h': 2}
+                            for s, p in (('BTC/USDT', 60000), ('ETH/USDT', 3000), ('SOL/USDT', 150))],
+        # SOL 由 WS 流式维护, 技术指标阶段没有产出
+        'technical_indicators_cache': [{'symbol': 'SOL/USDT', 'timeframe': tf, 'rsi_value': 30,
+                                        'macd_trend': 'bullish_cross', 'ema_trend': 'up', 'volume_signal': 'high'}],
+        'hyperliquid_symbol_aggregation': [{'symbol': c, 'period': '24h', 'net_flow': 2e6, 'long_trades': 9,
+                                            'short_trades': 1, 'hyperliquid_score': 70} for c in ('BTC', 'ETH', 'SOL')],
+    })
+    svc = _service(db)
+    technical = {(s, t): {'symbol': s, 'timeframe': t, 'rsi_value': float('nan') if s == 'ETH/USDT' else 55,
+                          'macd_value': 1.5, 'macd_trend': 'neutral', 'ema_trend': 'down'}
+                 for s in SYMBOLS[:2] for t in ('5m', tf)}
+    svc._refresh_price_stats = lambda symbols: None
+    svc._refresh_technical_indicators = lambda symbols: technical
+    svc._refresh_news_sentiment = lambda symbols: {c: {'symbol': c, 'sentiment_index': 20, 'total_news': 3,
+                                                       'news_score': 61} for c in ('BTC', 'ETH', 'SOL')}
+    svc._refresh_funding_rate_stats = lambda symbols: {s: {'symbol': s, 'current_rate': 0.0001,
+                                                           'trend': 'bullish', 'funding_score': 55} for s in SYMBOLS}
+    svc._refresh_etf = lambda symbols: {'BTC': {'score': 80, 'confidence': 0.9}}
+
+    results = asyncio.run(svc.run_pipeline(SYMBOLS, cus.ANALYSIS_STAGES))
+    if any(r.status != 'ok' for r in results.values()) or results['recommendations'].output != 3:
+        _fail(f"{svc.last_timings}")
+    tables = sorted(q.split(' FROM ')[1].split()[0] for q in db.queries)
+    if tables != ['hyperliquid_symbol_aggregation', 'price_stats_24h', 'technical_indicators_cache']:
+        _fail(f"应只批量读价格 / 缺失的技术指标 / 本轮未跑的 Hyperliquid: {db.queries}")
+    if not all(' IN (' in q for q in db.queries):
+        _fail(f"兜底应为 IN 批量查询: {db.queries}")
+
+    frame = svc.investment_analyzer.frames[0]
+    if list(frame.index) != SYMBOLS:
+        _fail(f"{frame.index}")
+    if frame.at['BTC/USDT', 'rsi_value'] != 55 or frame.at['BTC/USDT', 'current_price'] != 60000:
+        _fail(f"BTC 应用内存中的 {tf} 行")
+    if frame.at['ETH/USDT', 'rsi_value'] != 50:
+        _fail("NaN 应按缺省值处理 (与写表后再读一致)")
+    if not frame.at['SOL/USDT', 'macd_bullish_cross'] or not frame.at['SOL/USDT', 'volume_above_average']:
+        _fail("SOL 应来自缓存表")
+    if frame.at['BTC/USDT', 'sentiment_index'] != 20 or frame.at['BTC/USDT', 'funding_rate'] != 0.0001:
+        _fail(f"{frame.loc['BTC/USDT']}")
+    if frame.at['BTC/USDT', 'net_flow'] != 2e6 or frame.at['BTC/USDT', 'etf'] != {'score': 80, 'confidence': 0.9} \
+            or frame.at['ETH/USDT', 'etf'] is not None:
+        _fail(f"{frame.loc['BTC/USDT']}")
+    if len(db.upserts) != 1 or [p['symbol'] for p in db.upserts[0]] != SYMBOLS:
+        _fail(f"应一次批量写回: {db.upserts}")
+    # PyMySQL 只有 VALUES (...) 全是占位符时才把 executemany 合并为多行 INSERT
+    from pymysql.cursors import RE_INSERT_VALUES
+    from sqlalchemy.dialects.mysql import pymysql as mysql_pymysql
+
+    compiled = str(db.upsert_sql[0].compile(dialect=mysql_pymysql.dialect()))
+    if not RE_INSERT_VALUES.match(compiled):
+        _fail("写回语句无法被 PyMySQL 合并为多行 INSERT (VALUES 中含非占位符)")
+    if len({p['updated_at'] for p in db.upserts[0]}) != 1:
+        _fail("整批 updated_at 应相同")
+    if set(svc.last_timings) != set(cus.ANALYSIS_STAGES):
+        _fail(f"{svc.last_timings}")
+    _ok("3 个币种 3 条批量查询 + 1 条多行 INSERT 写回 (改造前每币种 6~8 条查询 + 1 条写入)")
+
+
+def _random_tables(n: int, seed: int):
+    """n 个币种的随机缓存行, 覆盖各评分阈值与缺失维度"""
+    import random
+
+    rng = random.Random(seed)
+    symbols = ['BTC/USDT', 'ETH/USDT'] + [f"C{i}/USDT" for i in range(n - 2)]
+    prices, technical, news, funding, hyperliquid = {}, {}, {}, {}, {}
+    for s in symbols:
+        coin = s.split('/')[0]
+        prices[s] = {'symbol': s, 'current_price': rng.choice([0, 0.05, 3.2, 1500, 60000])}
+        if rng.random() < 0.85:
+            technical[s] = {
+                'symbol': s, 'rsi_value': rng.choice([None, float('nan'), 25, 35, 50, 65, 75]),
+                'macd_histogram': rng.choice([None, -1.2, 0, 0.8]),
+                'macd_trend': rng.choice(['bullish_cross', 'bearish_cross', 'neutral']),
+                'ema_trend': rng.choice(['up', 'down', 'neutral', None]),
+                'volume_signal': rng.choice(['high', 'normal']),
+            }
+        if rng.random() < 0.85:
+            news[coin] = {'symbol': coin, 'sentiment_index': rng.uniform(-100, 100), 'total_news': rng.randint(0, 8),
+                          'major_events_count': rng.randint(0, 2)}
+        if rng.random() < 0.85:
+            funding[s] = {'symbol': s, 'current_rate': rng.choice(
+                [0.002, 0.0007, 0.0003, 0.00005, 0, -0.0003, -0.0007, -0.002])}
+        if rng.random() < 0.85:
+            hyperliquid[coin] = {'symbol': coin, 'net_flow': rng.uniform(-2e6, 2e6), 'long_trades': rng.randint(0, 12),
+                                 'short_trades': rng.randint(0, 12), 'avg_pnl': rng.uniform(-20000, 20000),
+                                 'active_wallets': rng.randint(0, 9)}
+    etf = {a: {'score': rng.uniform(10, 90), 'confidence': rng.choice([0.5, 0.75, 0.9]),
+               'details': {'asset_type': a, 'total_net_inflow': rng.uniform(-3e8, 3e8), 'avg_3day_inflow': 1e8,
+                           'etf_count': 11, 'top_inflow_ticker': 'IBIT', 'top_inflow_amount': 2e7}}
+           for a in ('BTC', 'ETH')}
+    return symbols, prices, technical, news, funding, hyperliquid, etf
+
+
+def test_analyze_many_parity() -> None:
+    print("[4] analyze_many 与逐币种 analyze() 结果逐字段一致; 400 币种整轮亚秒")
+    from app.analyzers.enhanced_investment_analyzer import EnhancedInvestmentAnalyzer
+    from app.services.cache_update_service import CacheUpdateService as C
+
+    analyzer = EnhancedInvestmentAnalyzer({})
+    checked = 0
+    for seed in range(5):
+        symbols, prices, technical, news, funding, hyperliquid, etf = _random_tables(300, seed)
+        frame = C._recommendation_frame(symbols, prices, technical, news, funding, hyperliquid, etf)
+        got = analyzer.analyze_many(frame)
+        for s in symbols:
+            coin = s.split('/')[0]
+            price = C._price_view(prices[s])['current_price']
+            if price == 0:
+                if s in got:
+                    _fail(f"{s} 无价格应跳过")
+                continue
+            want = analyzer.analyze(
+                symbol=s,
+                technical_data=C._technical_view(technical.get(s), price),
+                news_data=C._news_view(news.get(coin)),
+                funding_data=C._funding_view(funding.get(s)),
+                hyperliquid_data=C._hyperliquid_view(hyperliquid.get(coin)),
+                ethereum_data=None,
+                etf_data=etf.get(coin),
+                current_price=price,
+            )
+            want.pop('timestamp'), got[s].pop('timestamp')
+            if got[s] != want:
+                _fail(f"seed={seed} {s}:\n{got[s]}\n!=\n{want}")
+            checked += 1
+    signals = {r['signal'] for r in got.values()}
+    if len(signals) < 4:
+        _fail(f"样本应覆盖多种信号: {signals}")
+
+    symbols, prices, technical, news, funding, hyperliquid, etf = _random_tables(400, 99)
+    db = _DBService({
+        'price_stats_24h': list(prices.values()),
+        'technical_indicators_cache': list(technical.values()),
+        'news_sentiment_aggregation': list(news.values()),
+        'funding_rate_stats': list(funding.values()),
+        'hyperliquid_symbol_aggregation': list(hyperliquid.values()),
+    })
+    svc = _service(db)
+    svc._refresh_etf = lambda symbols: etf
+    t0 = time.perf_counter()
+    written = svc._refresh_recommendations(symbols)
+    elapsed = time.perf_counter() - t0
+    if len(db.queries) != 5 or len(db.upserts) != 1 or written != len(db.upserts[0]):
+        _fail(f"查询 {len(db.queries)} 条, 写入 {len(db.upserts)} 次")
+    if elapsed > 1.0:
+        _fail(f"400 币种耗时 {elapsed:.2f}s")
+    _ok(f"{checked} 个币种逐字段一致 (信号 {sorted(signals)}); 400 币种 {elapsed * 1000:.0f}ms, 5 条查询 + 1 次写入")
+
+
+def test_refresh_etf() -> None:
+    print("[5] ETF 阶段: 真实 _refresh_etf 一条查询读 BTC/ETH 最近 7 天并评分")
+    from datetime import date, timedelta
+
+    rows = [{'asset_type': asset, 'trade_date': date(2026, 1, 10) - timedelta(days=i),
+             'total_net_inflow': inflow, 'total_gross_inflow': abs(inflow), 'total_gross_outflow': 0,
+             'total_aum': 1e11, 'etf_count': 11, 'inflow_count': 6, 'outflow_count': 5,
+             'top_inflow_ticker': 'IBIT', 'top_inflow_amount': 1e8}
+            for asset, inflow in (('BTC', 2e8), ('ETH', -8e7)) for i in range(7)]
+
+    class EtfSession:
+        def __init__(self):
+            self.calls = []
+
+        def execute(self, sql, params=None):
+            self.calls.append(params)
+            assets = set(params['assets'])
+            hit = [_Row(r) for r in rows if r['asset_type'] in assets]
+            return type('R', (), {'fetchall': lambda _self: hit})()
+
+        def close(self):
+            pass
+
+    session = EtfSession()
+    svc = _service(type('DB', (), {'get_session': lambda _self: session})())
+    etf = svc._refresh_etf(['BTC/USDT', 'ETH/USDT', 'SOL/USDT'])
+    if len(session.calls) != 1 or sorted(session.calls[0]['assets']) != ['BTC', 'ETH']:
+        _fail(f"查询参数: {session.calls}")
+    if set(etf) != {'BTC', 'ETH'} or etf['BTC']['signal'] != 'STRONG_BUY' or etf['ETH']['signal'] != 'SELL':
+        _fail(f"ETF 结果: { {k: v.get('signal') for k, v in etf.items()} }")
+    if svc._refresh_etf(['SOL/USDT']) != {} or len(session.calls) != 1:
+        _fail("无 ETF 资产时不应查库")
+    _ok(f"1 条查询, BTC {etf['BTC']['signal']} ({etf['BTC']['score']:.0f}), ETH {etf['ETH']['signal']}")
+
+
+def main() -> None:
+    from loguru import logger
+
+    logger.remove()
+    test_dag_order()
+    test_invalid_and_failed()
+    test_recommendations_in_memory()
+    test_analyze_many_parity()
+    test_refresh_etf()
+    print("\n全部通过")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""5m → 15m/1h/4h/1d 流式合成离线校验: 与 kline_storage 汇总逐字段一致 / 缺根 / 重复 / 启动预载 / 交易所核对."""
+from __future__ import annotations
+
+import asyncio
+import random
+import sys
+from decimal import Decimal
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+HOUR_MS = 3600_000
+BAR_MS = 300_000
+DAY0 = 1767225600000                            # 2026-01-01 UTC
+
+
+def _ok(msg: str) -> None:
+    print(f"  OK  {msg}")
+
+
+def _fail(msg: str) -> None:
+    print(f"  FAIL {msg}")
+    raise SystemExit(1)
+
+
+def _bars(symbol: str, start: int, n: int, seed: int) -> list:
+    """fetch_source 行格式的随机 5m K 线"""
+    rng = random.Random(seed)
+    out, price = [], 100.0
+    for i in range(n):
+        o = price
+        c = o * (1 + rng.gauss(0, 0.003))
+        h, l = max(o, c) * (1 + rng.random() * 0.002), min(o, c) * (1 - rng.random() * 0.002)
+        v = rng.uniform(10, 1000)
+        out.append((symbol, start + i * BAR_MS, o, h, l, c, v, v * c, rng.randint(10, 500), v / 2, v * c / 2))
+        price = c
+    return out
+
+
+def _row(r):
+    from datetime import datetime
+
+    from app.collectors.smart_futures_collector import KlineRow
+    return KlineRow(r[0], "binance_futures", "5m", r[1], r[1] + BAR_MS - 1, datetime.utcfromtimestamp(r[1] / 1000),
+                    *r[2:])
+
+
+def _same(a, b) -> bool:
+    return len(a) == len(b) and all(
+        abs(x - y) <= 1e-9 * max(abs(x), 1) if isinstance(x, float) else x == y
+        for p, q in zip(a, b) for x, y in zip(p, q))
+
+
+def _stream(agg, rows) -> list:
+    """按 WS 推送顺序 (open_time 优先, 各币种交错) 喂入"""
+    out = []
+    for r in sorted(rows, key=lambda r: (r[1], r[0])):
+        out += agg.feed(_row(r))
+    return out
+
+
+def _key(r):
+    return (r.timeframe, r.symbol, r.open_time)
+
+
+def test_stream_matches_rollup() -> None:
+    print("[1] 流式合成 == kline_storage.aggregate (逐字段)")
+    from app.services.candle_aggregator import CandleAggregator
+    from app.services.kline_storage import aggregate
+
+    rows = []
+    for s, seed in (("BTC/USDT", 1), ("ETH/USDT", 2), ("SOL/USDT", 3)):
+        rows += _bars(s, DAY0, 288 * 2, seed)
+    agg = CandleAggregator()
+    got = sorted(_stream(agg, rows), key=_key)
+    rows.sort(key=lambda r: (r[0], r[1]))
+    want = sorted([b for tf in ("15m", "1h", "4h", "1d") for b in aggregate(rows, "5m", tf)], key=_key)
+    if len(got) != 3 * 2 * (96 + 24 + 6 + 1) or not _same(got, want):
+        _fail(f"{len(got)} 根, 与汇总不一致")
+    if agg.pending() or agg.stats["incomplete"]:
+        _fail(f"整天喂完不应有残留: {agg.pending()} {agg.stats}")
+    _ok(f"{len(got)} 根高周期 K 线与库里汇总逐字段一致, 周期收盘即输出")
+
+
+def test_gap_and_duplicates() -> None:
+    print("[2] 缺根的周期不输出, 重复 / 乱序的 5m 不重复累加")
+    from app.services.candle_aggregator import CandleAggregator
+    from app.services.kline_storage import aggregate
+
+    rows = _bars("BTC/USDT", DAY0, 288, 4)
+    missing = DAY0 + 5 * HOUR_MS + 20 * 60_000      # 05:20
+    gap = [r for r in rows if r[1] != missing]
+    agg = CandleAggregator()
+    got = _stream(agg, gap + gap[:30])              # 重复推送前 30 根 (重连后重放)
+    tfs = {tf: [b.open_time for b in got if b.timeframe == tf] for tf in ("15m", "1h", "4h", "1d")}
+    if missing // 900_000 * 900_000 in tfs["15m"] or DAY0 + 5 * HOUR_MS in tfs["1h"] \
+            or DAY0 + 4 * HOUR_MS in tfs["4h"] or tfs["1d"]:
+        _fail("含缺口的周期不应输出")
+    if (len(tfs["15m"]), len(tfs["1h"]), len(tfs["4h"])) != (95, 23, 5):
+        _fail(f"{ {tf: len(v) for tf, v in tfs.items()} }")
+    if agg.stats["incomplete"] != 4:
+        _fail(f"{agg.stats}")
+    want = sorted(aggregate(gap, "5m", "1h"), key=_key)
+    if not _same(sorted((b for b in got if b.timeframe == "1h"), key=_key), want):
+        _fail("重复推送后 1h 与汇总不一致")
+    _ok("缺 1 根 5m → 15m/1h/4h/1d 各少 1 根, 重放的 5m 被忽略")
+
+
+def test_prime() -> None:
+    print("[3] 启动预载: 库里的前半段 + WS 后半段拼成整根")
+    from app.services.candle_aggregator import CandleAggregator
+    from app.services.kline_storage import aggregate
+
+    rows = _bars("BTC/USDT", DAY0, 288, 5)
+    start = 100                                     # 08:20 启动, WS 从第 100 根开始推
+    agg = CandleAggregator()
+    early = _stream(agg, rows[start:start + 1])     # hydration 期间 WS 已收到 1 根
+    if early:
+        _fail("只有后半段时不应输出")
+    if agg.prime_since(DAY0 + start * BAR_MS + 60_000) != DAY0:
+        _fail("预载起点应为当天 UTC 0 点")
+    # 库里有到第 100 根 (与 WS 重叠 1 根), 以 WS 为准
+    primed = agg.prime(rows[:start + 1])
+    if primed != 4:
+        _fail(f"15m/1h/4h/1d 各补 1 个进行中周期: {primed}")
+    got = sorted(early + _stream(agg, rows[start + 1:]), key=_key)
+    want = sorted([b for tf in ("15m", "1h", "4h", "1d") for b in aggregate(rows, "5m", tf)
+                   if b.open_time + {"15m": 900_000, "1h": HOUR_MS, "4h": 4 * HOUR_MS, "1d": 24 * HOUR_MS}[tf]
+                   > DAY0 + (start + 1) * BAR_MS], key=_key)
+    if not _same(got, want):
+        _fail(f"{len(got)} vs {len(want)}")
+
+    agg = CandleAggregator(("1h",))
+    _stream(agg, rows[start:start + 3])
+    agg.prime(rows[:start - 2])                     # 库里缺 2 根 → 拼接后有缺口
+    if any(b.open_time == DAY0 + 8 * HOUR_MS for b in _stream(agg, rows[start + 3:start + 20])):
+        _fail("库里前半段不连续时不应输出")
+    _ok("跨启动的 15m/1h/4h/1d 与整段汇总一致, 前后段不连续时不输出")
+
+
+def test_ws_collector() -> None:
+    print("[4] WS 采集: 只订阅 5m, 合成 K 线与 5m 同批进 buffer, 增量指标周期不变")
+    from app.services.binance_ws_kline_collector import WSKlineCollector
+
+    c = WSKlineCollector({}, ["BTCUSDT", "ETHUSDT"], ["5m"], derived=["15m", "1h", "4h", "1d"])
+    if {s for _, _, streams in c._build_shards() for s in streams} != {"btcusdt@kline_5m", "ethusdt@kline_5m"}:
+        _fail(f"{c._build_shards()}")
+    for r in _bars("BTC/USDT", DAY0, 12, 6):
+        c._on_kline_closed(_row(r))
+    tfs = [r.timeframe for r in c.buffer]
+    if tfs.count("5m") != 12 or tfs.count("15m") != 4 or tfs.count("1h") != 1 or c._stats["total_closed"] != 12:
+        _fail(f"{tfs}")
+    legacy = WSKlineCollector({}, ["BTCUSDT"], ["5m", "15m"])
+    if legacy.aggregator is not None or legacy.timeframes != ["5m", "15m"]:
+        _fail("未开合成时行为不变")
+    _ok("12 根 5m → 4 根 15m + 1 根 1h 同进 buffer; 未开合成时不变")
+
+
+def test_reconcile() -> None:
+    print("[5] 交易所核对: 缺失 / 不一致的以交易所为准写回, DECIMAL 舍入不算不一致")
+    from app.collectors.smart_futures_collector import SmartFuturesCollector
+
+    def k(sym, t, close, vol="12.5"):
+        return {"symbol": sym, "timeframe": "1h", "open_time": t, "close_time": t + HOUR_MS - 1,
+                "open_price": Decimal("1.00001234"), "high_price": Decimal("2"), "low_price": Decimal("0.5"),
+                "close_price": Decimal(close), "volume": Decimal(vol), "quote_volume": Decimal("20"),
+                "number_of_trades": 7, "taker_buy_base_volume": Decimal("1"), "taker_buy_quote_volume": Decimal("1")}
+
+    exchange = [k("BTC/USDT", DAY0, "1.5"), k("BTC/USDT", DAY0 + HOUR_MS, "1.6"), k("ETH/USDT", DAY0, "1.7")]
+    stored = {
+        ("BTC/USDT", DAY0): {**k("BTC/USDT", DAY0, "1.5"), "volume": 12.5 + 3e-9},    # 浮点累加误差
+        ("ETH/USDT", DAY0): k("ETH/USDT", DAY0, "1.70001"),                             # 不一致
+    }
+    c = SmartFuturesCollector.__new__(SmartFuturesCollector)
+    saved, calls = [], []
+
+    async def collect_batch(symbols, interval, limit):
+        calls.append((interval, limit))
+        return exchange if interval == "1h" else []
+
+    c.collect_batch = collect_batch
+    c._load_recent_klines = lambda interval, since: stored
+    c.save_klines = lambda rows: saved.extend(rows) or len(rows)
+    stats = asyncio.run(c.reconcile_klines(["BTCUSDT", "ETHUSDT"], {"1h": 12, "4h": 4}))
+    if calls != [("1h", 13), ("4h", 5)]:
+        _fail(f"{calls}")
+    if stats != {"1h": {"checked": 3, "missing": 1, "mismatched": 1}}:
+        _fail(f"{stats}")
+    if sorted((r["symbol"], r["open_time"]) for r in saved) != [("BTC/USDT", DAY0 + HOUR_MS), ("ETH/USDT", DAY0)]:
+        _fail(f"{saved}")
+    _ok("多拉 1 根 (未收盘的丢弃), 1 根缺失 + 1 根不一致写回, 8 位小数内误差忽略")
+
+
+def test_rollup_lookback() -> None:
+    print("[6] 回填后重算: lookback_ms 覆盖回填区间, 15m 由 5m 汇总")
+    from app.services.kline_storage import ROLLUP_LOOKBACK, KlineStorageManager
+
+    class _Cur:
+        args = []
+
+        def execute(self, sql, args=None):
+            _Cur.args.append(args)
+
+        def fetchall(self):
+            return []
+
+    now = DAY0 + 20 * HOUR_MS + 60_000
+    mgr = KlineStorageManager({})
+    mgr.rollup(_Cur(), "15m", now)
+    mgr.rollup(_Cur(), "15m", now, lookback_ms=200 * BAR_MS)
+    mgr.rollup(_Cur(), "1d", now, lookback_ms=200 * BAR_MS)
+    (a, b, c) = _Cur.args
+    if a[0] != "5m" or a[3] - a[2] != ROLLUP_LOOKBACK["15m"] * 900_000:
+        _fail(f"{a}")
+    if b[3] - b[2] < 200 * BAR_MS or c[:1] != ("1h",) or c[3] - c[2] != ROLLUP_LOOKBACK["1d"] * 24 * HOUR_MS:
+        _fail(f"{b} {c}")
+    _ok("默认窗口不变, 回填 200 根 5m 后 15m 重算覆盖整段")
+
+
+def main() -> None:
+    from loguru import logger
+
+    logger.remove()
+    test_stream_matches_rollup()
+    test_gap_and_duplicates()
+    test_prime()
+    test_ws_collector()
+    test_reconcile()
+    test_rollup_lookback()
+    print("\n全部通过")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+"""统一出场规则离线校验: 向量化规则 ↔ 逐持仓标量口径 / claim 抢占与落败 / TTL 到期接手 / 出错 fail open / claim 列缺失探测与重试 (不连库)."""
+from __future__ import annotations
+
+import random
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+N_CASES = 20_000
+
+
+def _ok(msg: str) -> None:
+    print(f"  OK  {msg}")
+
+
+def _fail(msg: str) -> None:
+    print(f"  FAIL {msg}")
+    raise SystemExit(1)
+
+
+def _scalar_legacy(er, pnl: float, peak: float, in_grace: bool) -> int:
+    """原 PositionSLTPMonitor 逐持仓旧规则: 移动止盈 > 保本 > 早期止损"""
+    if (peak - pnl) >= er.dynamic_trail_pullback(peak):
+        return er.LEGACY_TRAIL_TP
+    if not in_grace and peak >= er.BREAKEVEN_AFTER_PEAK_PCT and pnl <= er.BREAKEVEN_SL_PCT:
+        return er.LEGACY_BREAKEVEN
+    if not in_grace and pnl <= -er.EARLY_SL_PCT:
+        return er.LEGACY_EARLY_SL
+    return er.LEGACY_NONE
+
+
+def _random_cases(n: int, seed: int):
+    rng = random.Random(seed)
+    cases = []
+    for _ in range(n):
+        entry = rng.choice([0.05, 1.3, 250.0, 60000.0])
+        move = rng.choice([rng.uniform(-0.15, 0.15), rng.choice([-0.03, -0.005, 0.0, 0.015, 0.03, 0.05, 0.10])])
+        price = entry * (1 + move)
+        side = rng.choice(['LONG', 'SHORT', 'long', 'short'])
+        sl = rng.choice([None, entry * (1 + rng.uniform(-0.1, 0.1)), price])
+        tp = rng.choice([None, entry * (1 + rng.uniform(-0.1, 0.1)), price])
+        prev_peak = rng.choice([0.0, rng.uniform(-0.05, 0.15), 0.03, 0.05, 0.10])
+        leverage = rng.choice([1, 3, 5, 10, 20, 2.7])
+        cases.append((side, entry, price, sl, tp, prev_peak, leverage, rng.random() < 0.3))
+    return cases
+
+
+def test_vector_vs_scalar() -> None:
+    print(f"[1] evaluate_price_rules ↔ 标量口径 ({N_CASES} 组随机持仓: SHORT / None SL/TP / 杠杆 / 保护期)")
+    from app.services import exit_rules as er
+
+    cases = _random_cases(N_CASES, 7)
+    sides, entry, price, sl, tp, prev_peak, leverage, grace = map(list, zip(*cases))
+    out = er.evaluate_price_rules(sides, entry, price, sl, tp, prev_peak, leverage=leverage, in_grace=grace)
+
+    counts = {'hit': 0, 'legacy': 0, 'ai_trail': 0}
+    for i, (side, e, p, s, t, pp, lev, g) in enumerate(cases):
+        pnl = (p - e) / e if side.upper() == 'LONG' else (e - p) / e
+        peak = max(pp, pnl)
+        if out['pnl'][i] != pnl or out['peak'][i] != peak:
+            _fail(f"#{i} pnl/peak {out['pnl'][i]}/{out['peak'][i]} ≠ {pnl}/{peak}")
+
+        trig = er.check_hard_trigger(side, p, s, t)
+        hit = {None: er.HIT_NONE, 'stop_loss': er.HIT_STOP_LOSS, 'take_profit': er.HIT_TAKE_PROFIT}[trig and trig[0]]
+        if out['hit'][i] != hit or (trig and out['hit_price'][i] != trig[1]):
+            _fail(f"#{i} {side} price={p} sl={s} tp={t}: 硬触发 {out['hit'][i]} ≠ {trig}")
+
+        legacy = _scalar_legacy(er, pnl, peak, g)
+        if out['legacy'][i] != legacy:
+            _fail(f"#{i} pnl={pnl:.4f} peak={peak:.4f} grace={g}: 旧规则 {out['legacy'][i]} ≠ {legacy}")
+
+        ai = er.check_ai_trail_tp(pnl, peak, int(lev)) is not None
+        if bool(out['ai_trail'][i]) != ai:
+            _fail(f"#{i} pnl={pnl:.4f} peak={peak:.4f} lev={lev}: AI trail {out['ai_trail'][i]} ≠ {ai}")
+        counts['hit'] += hit != er.HIT_NONE
+        counts['legacy'] += legacy != er.LEGACY_NONE
+        counts['ai_trail'] += ai
+
+    blank = er.evaluate_price_rules(['LONG'], [100.0], [90.0], [None], [None], [0.0])
+    if blank['hit'][0] != er.HIT_NONE or blank['legacy'][0] != er.LEGACY_EARLY_SL:
+        _fail(f"无 SL/TP / 默认杠杆与保护期: {blank}")
+    _ok(f"0 处不一致 (硬触发 {counts['hit']} / 旧规则 {counts['legacy']} / AI trail {counts['ai_trail']} 例)")
+
+
+class _Clock:
+    """exit_rules 的 time 替身 (monotonic 可拨动) 与假库的 NOW()"""
+    t = 1000.0
+
+    @classmethod
+    def monotonic(cls):
+        return cls.t
+
+    @classmethod
+    def time(cls):
+        return cls.t
+
+
+class _ClaimDB:
+    """futures_positions 的 claim 两列; 条件 UPDATE 按 _CLAIM_SQL 的语义模拟"""
+
+    def __init__(self, open_ids, columns=True):
+        self.rows = {pid: {'status': 'open', 'owner': None, 'claim_at': None} for pid in open_ids}
+        self.columns = columns
+        self.down = False
+        self.probes = self.updates = self.connects = 0
+
+    def connect(self):
+        self.connects += 1
+        if self.down:
+            raise ConnectionError("server gone")
+        return _ClaimConn(self)
+
+
+class _ClaimCursor:
+    def __init__(self, db):
+        self.db = db
+        self.rowcount = 0
+
+    def execute(self, sql, params=None):
+        import pymysql
+
+        flat = " ".join(sql.split())
+        if flat.startswith("SELECT close_claim_owner"):
+            self.db.probes += 1
+            if not self.db.columns:
+                raise pymysql.err.OperationalError(1054, "Unknown column 'close_claim_owner' in 'field list'")
+            return
+        if flat.startswith("UPDATE futures_positions SET close_claim_owner"):
+            self.db.updates += 1
+            owner, pid, ttl = params
+            row = self.db.rows.get(pid)
+            now = _Clock.t
+            if row and row['status'] == 'open' and (row['claim_at'] is None or row['claim_at'] < now - ttl):
+                row['owner'], row['claim_at'] = owner, now
+                self.rowcount = 1
+            else:
+                self.rowcount = 0
+            return
+        raise AssertionError(f"未预期的 SQL: {flat[:60]}")
+
+    def fetchall(self):
+        return []
+
+    def close(self):
+        pass
+
+
+class _ClaimConn:
+    def __init__(self, db):
+        self.db = db
+
+    def cursor(self):
+        return _ClaimCursor(self.db)
+
+    def commit(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def _engines(db, ttl_s=60):
+    from app.services import exit_rules as er
+
+    er.time = _Clock
+    return (er.ExitEngine(db.connect, 'sltp_monitor', ttl_s=ttl_s),
+            er.ExitEngine(db.connect, 'smart_exit', ttl_s=ttl_s))
+
+
+def _intent(pid, reason='stop_loss'):
+    from app.services.exit_rules import CloseIntent
+
+    return CloseIntent(position_id=pid, symbol='BTC/USDT', side='LONG', reason=reason, price=60000.0)
+
+
+def test_claim_won_lost() -> None:
+    print("[2] 两个监控同时判定平仓: 只有一个拿到 claim; 本进程 TTL 内不重复提交")
+    db = _ClaimDB([1, 2])
+    a, b = _engines(db)
+    if not a.claim(_intent(1)) or b.claim(_intent(1, 'take_profit')):
+        _fail(f"应 a 赢 b 输: {a.stats} / {b.stats}")
+    if db.rows[1]['owner'] != a.owner or a.stats['claimed'] != 1 or b.stats['lost'] != 1:
+        _fail(f"claim 归属 {db.rows[1]['owner']}, {a.stats} / {b.stats}")
+    updates = db.updates
+    if a.claim(_intent(1)) or db.updates != updates or a.stats['skipped'] != 1:
+        _fail(f"本进程 TTL 内应直接跳过不查库: {a.stats}")
+    if not b.claim(_intent(2)):
+        _fail("另一持仓不受影响")
+    db.rows[1]['status'] = 'closed'
+    _Clock.t += 61
+    if b.claim(_intent(1)):
+        _fail("已平仓的持仓不应再被 claim")
+    _ok(f"a 抢到 pid=1, b 落败并记 lost; a 重复提交不查库; 已平仓持仓 UPDATE 0 行 (owner={a.owner})")
+
+
+def test_ttl_expiry() -> None:
+    print("[3] 执行方平仓失败 / 崩溃: claim 到 TTL 后由其他监控接手")
+    db = _ClaimDB([7])
+    a, b = _engines(db, ttl_s=60)
+    a.claim(_intent(7))
+    _Clock.t += 30
+    if b.claim(_intent(7)):
+        _fail("TTL 内不应接手")
+    _Clock.t += 31                               # a 的 claim 已过期, 但 b 落败后自己也要等满 TTL
+    if b.claim(_intent(7)) or b.stats['skipped'] != 1:
+        _fail(f"b 落败后 TTL 内应只做进程内跳过: {b.stats}")
+    _Clock.t += 30
+    if not b.claim(_intent(7)) or db.rows[7]['owner'] != b.owner:
+        _fail(f"TTL 到期后应由 b 接手: {db.rows[7]}")
+    a.prune([])
+    if a._pending:
+        _fail("prune 应丢弃不在持仓列表里的待决记录")
+    _ok("30s 时 b 落败, 落败后满 TTL (91s) 由 b 接手; prune 清理待决表")
+
+
+def test_fail_open() -> None:
+    print("[4] claim 查询出错按成功处理 (fail open), 不因库抖动漏平")
+    db = _ClaimDB([3])
+    a, _ = _engines(db)
+    db.down = True
+    if not a.claim(_intent(3)) or a.stats['errors'] != 1:
+        _fail(f"库不可用时应放行: {a.stats}")
+    if a.claim(_intent(3)):
+        _fail("放行后本进程 TTL 内不应重复提交")
+    _ok(f"连接失败放行 1 次并计 errors, 之后 TTL 内跳过 ({a.stats})")
+
+
+def test_missing_columns() -> None:
+    print("[5] claim 列未迁移: 只做进程内去重, CLAIM_PROBE_RETRY_S 后重新探测")
+    from app.services import exit_rules as er
+
+    db = _ClaimDB([1, 2, 3], columns=False)
+    a, _ = _engines(db)
+    if not a.claim(_intent(1)) or db.probes != 1 or db.updates != 0 or a.stats['unclaimed'] != 1:
+        _fail(f"列缺失时应探测一次后放行: probes={db.probes} updates={db.updates} {a.stats}")
+    connects = db.connects
+    if not a.claim(_intent(2)) or db.connects != connects:
+        _fail("重试间隔内不应再连库探测")
+    if a.claim(_intent(1)):
+        _fail("列缺失时仍应做进程内去重")
+
+    db.columns = True                            # 迁移完成, 不重启进程
+    _Clock.t += er.CLAIM_PROBE_RETRY_S
+    if not a.claim(_intent(3)) or db.probes != 2 or db.updates != 1 or db.rows[3]['owner'] != a.owner:
+        _fail(f"到期后应重新探测并走 claim: probes={db.probes} updates={db.updates}")
+    a.claim(_intent(2))
+    if db.probes != 2:
+        _fail("列就绪后不再探测")
+
+    class _BrokenProbe(_ClaimDB):
+        def connect(self):
+            conn = super().connect()
+            conn.cursor = lambda: type('C', (), {
+                'execute': lambda *_: (_ for _ in ()).throw(RuntimeError("lock wait timeout")),
+                'close': lambda _self: None})()
+            return conn
+
+    broken = _BrokenProbe([9], columns=False)
+    c, _ = _engines(broken)
+    if not c.claim(_intent(9)) or c.stats['errors'] != 1 or c._next_probe:
+        _fail(f"探测本身出错 (非 1054) 应放行且下次继续探测: {c.stats}")
+    _ok(f"缺列 1 次探测后进程内去重, {er.CLAIM_PROBE_RETRY_S}s 后自动启用 claim; 探测出错 fail open")
+
+
+def main() -> None:
+    from loguru import logger
+
+    logger.remove()
+    test_vector_vs_scalar()
+    test_claim_won_lost()
+    test_ttl_expiry()
+    test_fail_open()
+    test_missing_columns()
+    print("\n全部通过")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,313 @@
+#!/usr/bin/env python3
+"""按币种 K 线特征库离线校验: 计算口径 / 未收盘根剔除 / 只重算收盘前进的 (symbol, 周期) / 进程内命中 / 断采币种每根只补算一次 / 100 币种组装耗时 (不连库)."""
+from __future__ import annotations
+
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+N_SYMBOLS = 100
+# 15m 收盘后 20s (同时是 1h / 1d 收盘点之后)
+NOW_MS = 1_767_225_600_000 + 20_000
+
+
+def _ok(msg: str) -> None:
+    print(f"  OK  {msg}")
+
+
+def _fail(msg: str) -> None:
+    print(f"  FAIL {msg}")
+    raise SystemExit(1)
+
+
+class FakeKlines:
+    """install_kline_store 注入的 K 线源: 每币每周期一段随机游走, 含一根未收盘的尾根"""
+
+    def __init__(self, symbols, now_ms: int):
+        from app.services.kline_store import timeframe_to_ms
+
+        rng = np.random.default_rng(7)
+        self.series = {}
+        for sym in symbols:
+            for tf in ('1d', '1h', '15m'):
+                step = timeframe_to_ms(tf)
+                times = now_ms // step * step - step * np.arange(59, -1, -1, dtype=np.int64)
+                close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, len(times))))
+                open_ = np.r_[close[0], close[:-1]]
+                self.series[(sym, tf)] = {
+                    'open_time': times, 'open': open_, 'close': close,
+                    'high': np.maximum(open_, close) * 1.002, 'low': np.minimum(open_, close) * 0.998,
+                    'volume': rng.uniform(1e3, 1e5, len(times)),
+                }
+        self.reads = 0
+
+    def advance(self, symbols, tf: str, step_ms: int) -> None:
+        """这些币种在 tf 上收出新的一根 (原尾根收盘, 再开一根未收盘的)"""
+        for sym in symbols:
+            s = self.series[(sym, tf)]
+            for k in s:
+                last = s[k][-1] + step_ms if k == 'open_time' else s[k][-1]
+                s[k] = np.r_[s[k][1:], last]
+
+    def get_arrays(self, symbol, timeframe, limit, since_ms=None):
+        self.reads += 1
+        s = self.series.get((symbol, timeframe))
+        if s is None:
+            return None
+        return {k: v[-limit:].copy() for k, v in s.items()}
+
+
+class FakeCursor:
+    def __init__(self, db):
+        self.db = db
+        self._rows = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params=()):
+        if sql.lstrip().startswith('CREATE'):
+            return
+        if 'FROM `data_cache`.symbol_features' in sql:
+            self.db.selects += 1
+            n_sym = sql.split('symbol IN (')[1].split(')')[0].count('%s')
+            syms, tfs = set(params[:n_sym]), set(params[n_sym:])
+            self._rows = [dict(r) for (s, tf), r in self.db.table.items() if s in syms and tf in tfs]
+            return
+        if 'FROM kline_data' in sql:           # K 线源里没有的币种回落 SQL; 库里也没有
+            self.db.selects += 1
+            self._rows = []
+            return
+        raise AssertionError(f"未预期的 SQL: {sql[:80]}")
+
+    def executemany(self, sql, rows):
+        from app.services.feature_store import _COLUMNS
+
+        self.db.writes += len(rows)
+        for row in rows:
+            r = dict(zip(_COLUMNS, row))
+            self.db.table[(r['symbol'], r['timeframe'])] = r
+
+    def fetchall(self):
+        return self._rows
+
+
+class FakeConn:
+    def __init__(self):
+        self.table = {}
+        self.selects = 0
+        self.writes = 0
+
+    def cursor(self, cursorclass=None):
+        return FakeCursor(self)
+
+    def commit(self):
+        pass
+
+
+def _setup():
+    import app.services.feature_store as fs
+    from app.services.kline_store import install_kline_store
+
+    symbols = [f"S{i:03d}/USDT" for i in range(N_SYMBOLS)]
+    klines = FakeKlines(symbols, NOW_MS)
+    install_kline_store(klines)
+    fs._memo.clear()
+    fs._attempted.clear()
+    return fs, symbols, klines, FakeConn()
+
+
+def test_compute() -> None:
+    print("[1] 特征口径与候选池一致, 未收盘尾根不计入")
+    from app.services.data_cache_service import _calc_ema, _calc_rsi, _make_kline_narrative
+    from app.services.kline_store import arrays_to_rows
+
+    fs, symbols, klines, _ = _setup()
+    for tf, window in fs.FEATURE_WINDOWS.items():
+        rows = arrays_to_rows(klines.get_arrays(symbols[0], tf, window + 1))
+        kept = fs.closed_rows(rows, tf, NOW_MS)
+        if len(kept) != window or kept[-1]['open_time'] != rows[-2]['open_time']:
+            _fail(f"{tf}: 保留 {len(kept)} 根, 尾根 {kept[-1]['open_time']}")
+        feat = fs.compute_features(symbols[0], tf, kept)
+        closes = [r['close_price'] for r in kept]
+        if feat['narrative'] != _make_kline_narrative(kept, tf):
+            _fail(f"{tf} 叙事不一致")
+        if feat['rsi_14'] != _calc_rsi(closes, 14) or feat['ema_9'] != _calc_ema(closes, 9):
+            _fail(f"{tf} 指标不一致")
+        if feat['bar_open_time'] != fs.last_closed_open_time(tf, NOW_MS):
+            _fail(f"{tf} bar_open_time {feat['bar_open_time']}")
+    _ok("1d/1h/15m 叙事 + RSI/EMA 与 _make_kline_narrative/_calc_* 逐字一致; 尾根剔除")
+
+
+def test_producer() -> None:
+    print("[2] 生产者只重算最后一根收盘前进的 (symbol, 周期)")
+    fs, symbols, klines, conn = _setup()
+    step_15m = 15 * 60_000
+
+    t0 = time.perf_counter()
+    out = fs.refresh_symbol_features(conn, symbols, now_ms=NOW_MS)
+    cold_ms = (time.perf_counter() - t0) * 1000
+    if conn.writes != N_SYMBOLS * 3 or len(out) != N_SYMBOLS:
+        _fail(f"冷启动写入 {conn.writes}, 返回 {len(out)}")
+
+    fs.refresh_symbol_features(conn, symbols, now_ms=NOW_MS + 60_000)
+    if conn.writes != N_SYMBOLS * 3:
+        _fail(f"无新收盘仍写入 {conn.writes - N_SYMBOLS * 3}")
+
+    # 下一根 15m 收盘: 10 个币种已落库新 K 线, 其余断采 (库里最后一根仍是上一根)
+    moved, lagging = symbols[:10], symbols[10:]
+    klines.advance(moved, '15m', step_15m)
+    for sym in lagging:                        # 断采: 原未收盘尾根没有落库, 库里最后一根仍是上一根
+        s = klines.series[(sym, '15m')]
+        for k in s:
+            s[k] = s[k][:-1]
+    t0 = time.perf_counter()
+    out = fs.refresh_symbol_features(conn, symbols, now_ms=NOW_MS + step_15m)
+    warm_ms = (time.perf_counter() - t0) * 1000
+    written = conn.writes - N_SYMBOLS * 3
+    new_15m = fs.last_closed_open_time('15m', NOW_MS + step_15m)
+    if written != len(moved):
+        _fail(f"15m 收盘后写入 {written}, 期望 {len(moved)}")
+    if out[moved[0]]['15m']['bar_open_time'] != new_15m:
+        _fail("新收盘未反映到特征")
+    if out[lagging[0]]['15m']['bar_open_time'] != fs.last_closed_open_time('15m', NOW_MS):
+        _fail("断采币种特征被改动")
+    if out[moved[0]]['1h']['bar_open_time'] != fs.last_closed_open_time('1h', NOW_MS):
+        _fail("1h 未收盘却被改动")
+    _ok(f"冷启动 {N_SYMBOLS}×3 行 {cold_ms:.0f}ms; 无收盘 0 行; "
+        f"15m 收盘只重算 {written} 行 (1h/1d 沿用) {warm_ms:.0f}ms")
+
+
+def test_reader() -> None:
+    print("[3] 读取方: 进程内命中不查库; 新进程一条 SQL 读表, 不重算")
+    fs, symbols, klines, conn = _setup()
+    fs.refresh_symbol_features(conn, symbols, now_ms=NOW_MS)
+    selects, reads = conn.selects, klines.reads
+
+    got = fs.get_symbol_features(conn, symbols, now_ms=NOW_MS)
+    if conn.selects != selects or klines.reads != reads or len(got) != N_SYMBOLS:
+        _fail(f"进程内命中仍查库: SQL {conn.selects - selects}, K 线 {klines.reads - reads}")
+
+    fs._memo.clear()                           # 模拟另一个进程
+    fs._attempted.clear()
+    got = fs.get_symbol_features(conn, symbols, now_ms=NOW_MS)
+    if conn.selects != selects + 1 or klines.reads != reads or conn.writes != N_SYMBOLS * 3:
+        _fail(f"冷进程: SQL {conn.selects - selects}, K 线 {klines.reads - reads}, 写入 {conn.writes}")
+
+    fresh = fs.get_symbol_features(FakeConn(), ['NEW/USDT'], compute_missing=False, now_ms=NOW_MS)
+    if fresh:
+        _fail("compute_missing=False 仍补算")
+    _ok("命中 0 SQL / 冷进程 1 SQL 0 重算 / compute_missing=False 不补算")
+
+
+def test_attempted_once_per_bar() -> None:
+    print("[4] 断采 / 无 K 线的币种: 同一根收盘内只查表补算一次, 下一根收盘再试; 补算失败不记")
+    fs, symbols, klines, conn = _setup()
+    step_15m = 15 * 60_000
+    fs.refresh_symbol_features(conn, symbols, now_ms=NOW_MS)
+    moved, lagging = symbols[:10], symbols[10:20]
+    klines.advance(symbols[:10] + symbols[20:], '15m', step_15m)
+    for sym in lagging:                        # 断采: 库里最后一根仍是上一根
+        s = klines.series[(sym, '15m')]
+        for k in s:
+            s[k] = s[k][:-1]
+    wanted = symbols + ['NEW/USDT']            # NEW/USDT 没有任何 K 线
+    now2 = NOW_MS + step_15m
+
+    def _counts():
+        return conn.selects, klines.reads
+
+    fs.get_symbol_features(conn, wanted, compute_missing=False, now_ms=now2)
+    before = _counts()
+    fs.get_symbol_features(conn, wanted, now_ms=now2)
+    if _counts() == before:
+        _fail("compute_missing=False 不应记为已补算")
+
+    before, skips = _counts(), fs.get_stats()['attempt_skips']
+    for _ in range(3):
+        got = fs.get_symbol_features(conn, wanted, now_ms=now2)
+        got_ro = fs.get_symbol_features(conn, wanted, compute_missing=False, now_ms=now2)
+    if _counts() != before:
+        _fail(f"同一根内重复补算: SQL {conn.selects - before[0]}, K 线 {klines.reads - before[1]}")
+    if fs.get_stats()['attempt_skips'] - skips != 6 * (len(lagging) + 1):
+        _fail(f"attempt_skips {fs.get_stats()['attempt_skips'] - skips}")
+    if got != got_ro or 'NEW/USDT' in got or len(got) != N_SYMBOLS:
+        _fail("跳过补算时应照常返回已有特征")
+    if got[lagging[0]]['15m']['bar_open_time'] != fs.last_closed_open_time('15m', NOW_MS) \
+            or got[moved[0]]['15m']['bar_open_time'] != fs.last_closed_open_time('15m', now2):
+        _fail("断采币种应返回落后的特征, 其余为当前收盘")
+
+    now3 = now2 + step_15m
+    klines.advance(symbols, '15m', step_15m)
+    before = _counts()
+    fs.get_symbol_features(conn, wanted, now_ms=now3)
+    if conn.selects == before[0] or klines.reads == before[1]:
+        _fail("下一根收盘应重新查表补算")
+
+    now4 = now3 + step_15m
+    refresh, calls = fs.refresh_symbol_features, []
+
+    def _down(*args, **kwargs):
+        calls.append(args)
+        raise RuntimeError("db down")
+    fs.refresh_symbol_features = _down
+    try:
+        fs.get_symbol_features(conn, wanted, now_ms=now4)
+        fs.get_symbol_features(conn, wanted, now_ms=now4)
+    finally:
+        fs.refresh_symbol_features = refresh
+    if len(calls) != 2:
+        _fail(f"补算失败后同一根内应重试, 实际补算 {len(calls)} 次")
+    _ok(f"{len(lagging)} 个断采 + 1 个无 K 线: 首次补算后同一根 6 次调用 0 SQL; 下一根重试; 失败不记")
+
+
+def test_prompt_assembly() -> None:
+    print(f"[5] {N_SYMBOLS} 币种组装探索字段")
+    from app.services.explore_worker_impl import _enrich_symbol
+
+    fs, symbols, klines, conn = _setup()
+    fs.refresh_symbol_features(conn, symbols, now_ms=NOW_MS)
+    universe = {s: {'symbol': s, 'current_price': 100.0, 'kline_narrative': {}} for s in symbols}
+
+    t0 = time.perf_counter()
+    features = fs.get_symbol_features(conn, symbols, now_ms=NOW_MS)
+    for sym, sym_data in universe.items():
+        _enrich_symbol(None, sym_data, features.get(sym))
+    elapsed = (time.perf_counter() - t0) * 1000
+
+    sample = universe[symbols[0]]
+    f_1d = features[symbols[0]]['1d']
+    above, below = fs.range_position(f_1d, 100.0)
+    if sample['kline_narrative']['1h'] != features[symbols[0]]['1h']['narrative']:
+        _fail("叙事未取自特征库")
+    if sample['tech']['above_7d_low_pct'] != above or sample['tech']['below_7d_high_pct'] != below:
+        _fail(f"7d 高低: {sample['tech']}")
+    if sample['tech']['rsi_14_1h'] is None or sample['tech']['ema9_15m'] is None:
+        _fail(f"指标缺失: {sample['tech']}")
+    if elapsed > 50:
+        _fail(f"组装耗时 {elapsed:.1f}ms")
+    _ok(f"{elapsed:.1f}ms, 0 条 K 线 SQL (rsi_14_1h={sample['tech']['rsi_14_1h']})")
+
+
+def main() -> None:
+    from loguru import logger
+
+    logger.remove()
+    test_compute()
+    test_producer()
+    test_reader()
+    test_attempted_once_per_bar()
+    test_prompt_assembly()
+    print("\n全部通过")
+
+
+if __name__ == "__main__":
+    main()
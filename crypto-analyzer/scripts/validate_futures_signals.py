@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+"""合约信号快照离线校验: 每表一条 SQL (ROW_NUMBER) ↔ 改造前逐币种查询 / 3×TTL 过期兜底重算 (不连 MySQL).
+
+两种查法跑在同一个内存 SQLite 上 (方言差异在 _Cursor 里翻译), _analyze_futures_signal
+换成记录入参, 逐币种比较喂给它的行.
+"""
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import io
+import random
+import re
+import sqlite3
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+N_SYMBOLS = 30
+
+_SCHEMA = """
+CREATE TABLE technical_indicators_cache (symbol TEXT, timeframe TEXT, rsi REAL, macd REAL, updated_at TEXT);
+CREATE TABLE funding_rate_stats (symbol TEXT, current_rate REAL, current_rate_pct REAL, trend TEXT,
+                                 market_sentiment TEXT, updated_at TEXT);
+CREATE TABLE futures_long_short_ratio (symbol TEXT, long_account REAL, short_account REAL,
+                                       long_short_ratio REAL, timestamp TEXT);
+CREATE TABLE futures_open_interest (symbol TEXT, open_interest REAL, timestamp TEXT);
+CREATE TABLE price_stats_24h (symbol TEXT, current_price REAL, change_24h REAL, updated_at TEXT);
+"""
+
+
+def _ok(msg: str) -> None:
+    print(f"  OK  {msg}")
+
+
+def _fail(msg: str) -> None:
+    print(f"  FAIL {msg}")
+    raise SystemExit(1)
+
+
+class _Cursor:
+    """DictCursor 接口; MySQL 写法翻成 SQLite (NOW() - INTERVAL n DAY / %s)"""
+
+    def __init__(self, conn):
+        self._cur = conn.cursor()
+
+    def execute(self, sql, params=()):
+        sql = re.sub(r"NOW\(\) - INTERVAL (\d+) DAY", r"datetime('now', '-\1 day')", sql)
+        self._cur.execute(sql.replace('%s', '?'), params)
+
+    def fetchall(self):
+        cols = [d[0] for d in self._cur.description]
+        return [dict(zip(cols, row)) for row in self._cur.fetchall()]
+
+    def fetchone(self):
+        rows = self.fetchall()
+        return rows[0] if rows else None
+
+    def close(self):
+        self._cur.close()
+
+
+class _Conn:
+    def __init__(self, db):
+        self.db = db
+
+    def cursor(self):
+        return _Cursor(self.db)
+
+
+def _ts(rng, lo_h: float, hi_h: float) -> str:
+    """UTC 时间戳 (与 SQLite datetime('now') 同口径), 距今 lo_h~hi_h 小时, 精确到秒"""
+    at = datetime.utcnow() - timedelta(hours=rng.uniform(lo_h, hi_h))
+    return at.strftime('%Y-%m-%d %H:%M:%S')
+
+
+def _build_db(seed: int) -> sqlite3.Connection:
+    """随机数据: 缺周期 / 缺表 / 两种 symbol 写法 / 3 天外的旧行 / 只有旧行的币种"""
+    rng = random.Random(seed)
+    db = sqlite3.connect(':memory:')
+    db.executescript(_SCHEMA)
+    symbols = [f"C{i:02d}/USDT" for i in range(N_SYMBOLS)]
+    for i, symbol in enumerate(symbols):
+        for tf in ('5m', '15m', '1h'):
+            if tf == '1h' and i == N_SYMBOLS - 1:
+                continue                                  # 没有 1h 的币种不出信号
+            if tf != '1h' and rng.random() < 0.2:
+                continue
+            db.execute("INSERT INTO technical_indicators_cache VALUES (?,?,?,?,?)",
+                       (symbol, tf, rng.uniform(10, 90), rng.gauss(0, 1), _ts(rng, 0, 1)))
+        if rng.random() < 0.8:
+            db.execute("INSERT INTO funding_rate_stats VALUES (?,?,?,?,?,?)",
+                       (symbol, rng.gauss(0, 1e-4), rng.gauss(0, 1e-2), 'up', 'neutral', _ts(rng, 0, 1)))
+        if rng.random() < 0.9:
+            db.execute("INSERT INTO price_stats_24h VALUES (?,?,?,?)",
+                       (symbol, rng.uniform(1, 1e4), rng.gauss(0, 5), _ts(rng, 0, 1)))
+        aliases = (symbol, symbol.replace('/', ''))
+        only_stale = i in (3, 4)
+        for _ in range(0 if only_stale else rng.randint(0, 8)):
+            db.execute("INSERT INTO futures_long_short_ratio VALUES (?,?,?,?,?)",
+                       (rng.choice(aliases), rng.random(), rng.random(), rng.uniform(0.5, 2), _ts(rng, 0, 70)))
+        for _ in range(0 if only_stale else rng.randint(0, 8)):
+            db.execute("INSERT INTO futures_open_interest VALUES (?,?,?)",
+                       (rng.choice(aliases), rng.uniform(1e3, 1e6), _ts(rng, 0, 70)))
+        for _ in range(rng.randint(1, 4)):                # 3 天外的旧行
+            db.execute("INSERT INTO futures_long_short_ratio VALUES (?,?,?,?,?)",
+                       (rng.choice(aliases), rng.random(), rng.random(), rng.uniform(0.5, 2), _ts(rng, 74, 240)))
+            db.execute("INSERT INTO futures_open_interest VALUES (?,?,?)",
+                       (rng.choice(aliases), rng.uniform(1e3, 1e6), _ts(rng, 74, 240)))
+    return db
+
+
+def _per_symbol_inputs(conn) -> dict:
+    """改造前 _load_futures_signals 的逐币种查询 (约 7 条 / 币种), 返回 {symbol: 入参}"""
+    cursor = conn.cursor()
+    cursor.execute("SELECT DISTINCT symbol FROM technical_indicators_cache WHERE timeframe = '1h'")
+    symbols = [row['symbol'] for row in cursor.fetchall()]
+    out = {}
+    for symbol in symbols:
+        tech = {}
+        for timeframe in ('5m', '15m', '1h'):
+            cursor.execute("""SELECT * FROM technical_indicators_cache
+                WHERE symbol = %s AND timeframe = %s ORDER BY updated_at DESC LIMIT 1""", (symbol, timeframe))
+            tech[timeframe] = cursor.fetchone()
+        cursor.execute("""SELECT current_rate, current_rate_pct, trend, market_sentiment FROM funding_rate_stats
+            WHERE symbol = %s ORDER BY updated_at DESC LIMIT 1""", (symbol,))
+        funding = cursor.fetchone()
+        symbol_no_slash = symbol.replace('/', '')
+        cursor.execute("""SELECT long_account, short_account, long_short_ratio, timestamp
+            FROM futures_long_short_ratio WHERE symbol IN (%s, %s)
+            ORDER BY timestamp DESC LIMIT 1""", (symbol, symbol_no_slash))
+        ls_data = cursor.fetchone()
+        cursor.execute("""SELECT open_interest, timestamp FROM futures_open_interest WHERE symbol IN (%s, %s)
+            ORDER BY timestamp DESC LIMIT 2""", (symbol, symbol_no_slash))
+        oi_records = cursor.fetchall()
+        cursor.execute("""SELECT current_price, change_24h, updated_at FROM price_stats_24h
+            WHERE symbol = %s ORDER BY updated_at DESC LIMIT 1""", (symbol,))
+        out[symbol] = {
+            'tech_data': tech['1h'], 'tech_data_5m': tech['5m'], 'tech_data_15m': tech['15m'],
+            'tech_data_1h': tech['1h'], 'funding_data': funding, 'ls_data': ls_data,
+            'oi_records': oi_records, 'price_data': cursor.fetchone(),
+        }
+    cursor.close()
+    return out
+
+
+def _strip_symbol(value):
+    """新查询多选了 symbol 列 (按币种拼装用), 两边比较时都去掉"""
+    if isinstance(value, dict):
+        return {k: v for k, v in value.items() if k != 'symbol'}
+    if isinstance(value, list):
+        return [_strip_symbol(v) for v in value]
+    return value
+
+
+def _recording_analyzer(seen: dict):
+    def analyze(symbol: str, **kwargs):
+        seen[symbol] = {k: _strip_symbol(v) for k, v in kwargs.items()}
+        return {'symbol': symbol, 'signal_score': random.Random(symbol).uniform(-100, 100)}
+    return analyze
+
+
+def test_snapshot_matches_per_symbol(main) -> None:
+    print(f"[1] 每表一条 SQL (ROW_NUMBER, 近 {main._FUTURES_SIGNALS_LOOKBACK_DAYS} 天) ↔ 逐币种查询 "
+          f"({N_SYMBOLS} 币, 两种 symbol 写法)")
+    for seed in range(5):
+        db = _build_db(seed)
+        seen = {}
+        main._analyze_futures_signal = _recording_analyzer(seen)
+        signals = main._load_futures_signals(_Conn(db))
+        if [s['symbol'] for s in signals] != sorted(seen):
+            _fail("返回的信号与分析过的币种不符")
+
+        full = _per_symbol_inputs(_Conn(db))
+        if sorted(full) != sorted(seen):
+            _fail(f"seed={seed} 币种集合不同: {sorted(set(full) ^ set(seen))}")
+        stale_only = [s for s in full if seen[s]['ls_data'] is None and full[s]['ls_data'] is not None]
+        if not {'C03/USDT', 'C04/USDT'} <= set(stale_only):
+            _fail(f"seed={seed} 只有 3 天外数据的币种不应取到多空比: {stale_only}")
+
+        db.execute("DELETE FROM futures_long_short_ratio WHERE timestamp < datetime('now', ?)",
+                   (f"-{main._FUTURES_SIGNALS_LOOKBACK_DAYS} day",))
+        db.execute("DELETE FROM futures_open_interest WHERE timestamp < datetime('now', ?)",
+                   (f"-{main._FUTURES_SIGNALS_LOOKBACK_DAYS} day",))
+        want = {s: {k: _strip_symbol(v) for k, v in inputs.items()}
+                for s, inputs in _per_symbol_inputs(_Conn(db)).items()}
+        for symbol in want:
+            if seen[symbol] != want[symbol]:
+                diff = [k for k in want[symbol] if seen[symbol][k] != want[symbol][k]]
+                _fail(f"seed={seed} {symbol} 入参不同 {diff}:\n      got  {[seen[symbol][k] for k in diff]}"
+                      f"\n      want {[want[symbol][k] for k in diff]}")
+    _ok("5 组随机数据逐币种入参一致 (旧查询限定同一回看窗口); 只有窗口外数据的币种不取旧行")
+
+
+class _Pool:
+    """get_async_api_pool() 替身: run(fn) 直接在当前线程用 SQLite 连接执行"""
+
+    def __init__(self, db):
+        self.db = db
+        self.runs = 0
+        self.error = None
+
+    async def run(self, fn, *args, **kwargs):
+        self.runs += 1
+        if self.error:
+            raise self.error
+        return fn(_Conn(self.db), *args, **kwargs)
+
+
+def test_stale_cache_fallback(main) -> None:
+    ttl = main.TECHNICAL_SIGNALS_CACHE_TTL
+    print(f"[2] /api/futures-signals 只读缓存; 无快照 / 超过 3×TTL ({3 * ttl}s) 才当场重算")
+    from fastapi import HTTPException
+    from app.database import connection_pool
+
+    pool = _Pool(_build_db(7))
+    connection_pool.get_async_api_pool = lambda: pool
+    main._analyze_futures_signal = _recording_analyzer({})
+    main._futures_signals_cache = main._futures_signals_cache_time = None
+
+    first = asyncio.run(main.get_futures_signals())
+    scores = [abs(s['signal_score']) for s in first['data']]
+    if pool.runs != 1 or main._futures_signals_cache is not first or first['total'] != len(first['data']):
+        _fail(f"冷启动应重算一次并写缓存 (runs={pool.runs})")
+    if scores != sorted(scores, reverse=True):
+        _fail("快照应按 |signal_score| 降序")
+
+    for age in (0, ttl + 1, 3 * ttl - 5):
+        main._futures_signals_cache_time = datetime.now() - timedelta(seconds=age)
+        if asyncio.run(main.get_futures_signals()) is not first or pool.runs != 1:
+            _fail(f"缓存 {age}s (< 3×TTL) 应直接返回快照, 不查库")
+
+    main._futures_signals_cache_time = datetime.now() - timedelta(seconds=3 * ttl + 1)
+    second = asyncio.run(main.get_futures_signals())
+    if pool.runs != 2 or second is first or main._futures_signals_cache is not second:
+        _fail("超过 3×TTL 应当场重算并替换缓存")
+    if (datetime.now() - main._futures_signals_cache_time).total_seconds() > 5:
+        _fail("重算后缓存时间应刷新")
+
+    stale_time = datetime.now() - timedelta(seconds=3 * ttl + 1)
+    main._futures_signals_cache_time = stale_time
+    pool.error = RuntimeError("pool down")
+    try:
+        with contextlib.redirect_stderr(io.StringIO()):   # 端点会 print_exc
+            asyncio.run(main.get_futures_signals())
+        _fail("过期且重算失败应返回 500")
+    except HTTPException as e:
+        if e.status_code != 500:
+            _fail(f"status={e.status_code}")
+    if main._futures_signals_cache is not second or main._futures_signals_cache_time != stale_time:
+        _fail("重算失败不应改动缓存")
+
+    pool.error = None
+    asyncio.run(main._refresh_futures_signals())         # 后台刷新任务每 TTL 调一次
+    if pool.runs != 4 or (datetime.now() - main._futures_signals_cache_time).total_seconds() > 5:
+        _fail("后台刷新应重算并刷新缓存时间")
+    _ok("冷启动重算; <3×TTL 命中 (含 >TTL); 过期重算; 重算失败 500 且保留旧快照; 后台刷新续期")
+
+
+def main() -> None:
+    from loguru import logger
+
+    with contextlib.redirect_stderr(io.StringIO()):     # 导入时注册路由 / 连库失败的日志
+        from app import main as app_main
+    logger.remove()
+    test_snapshot_matches_per_symbol(app_main)
+    test_stale_cache_fallback(app_main)
+    print("\n全部通过")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+"""Hyperliquid 钱包并发监控离线校验: 本地模拟 info 接口 (延迟 + 权重限额 429 + 分页), 增量游标 / 成交分页 / 自适应限速 / 批量入库 / 吞吐."""
+from __future__ import annotations
+
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from aiohttp import web  # noqa: E402
+
+LATENCY_S = 0.15
+NOW_MS = int(time.time() * 1000)
+HOUR_MS = 3600 * 1000
+
+
+def _ok(msg: str) -> None:
+    print(f"  OK  {msg}")
+
+
+def _fail(msg: str) -> None:
+    print(f"  FAIL {msg}")
+    raise SystemExit(1)
+
+
+def _fills(address: str) -> list:
+    """每个地址 3 天内每 6 小时一笔成交"""
+    seed = int(address[-4:], 16)
+    return [
+        {"coin": "BTC" if k % 2 else "ETH", "side": "B" if (seed + k) % 3 else "A",
+         "px": str(60000 + k), "sz": "1.5", "time": NOW_MS - k * 6 * HOUR_MS - seed, "closedPnl": "12.5",
+         "tid": seed * 100 + k}
+        for k in range(12)
+    ]
+
+
+class _MockInfo:
+    """info 接口模拟: 按权重计的令牌桶, 超额返回 429 + Retry-After; userFillsByTime 按时间升序分页"""
+
+    def __init__(self, weight_per_minute: float):
+        from app.collectors.hyperliquid_collector import INFO_WEIGHT
+
+        self.weights = INFO_WEIGHT
+        self.rate = weight_per_minute / 60.0
+        self.capacity = self.rate * 2
+        self.tokens = self.capacity
+        self.last = time.monotonic()
+        self.requests = self.throttled = 0
+        self.start_times = {}
+        self.fill_pages = {}
+
+    async def handle(self, request):
+        body = await request.json()
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.last) * self.rate)
+        self.last = now
+        self.requests += 1
+        weight = self.weights.get(body["type"], 20)
+        if self.tokens < weight:
+            self.throttled += 1
+            return web.json_response({"error": "rate limited"}, status=429, headers={"Retry-After": "1"})
+        self.tokens -= weight
+        await asyncio.sleep(LATENCY_S)
+        user = body["user"]
+        if body["type"] == "clearinghouseState":
+            return web.json_response({
+                "marginSummary": {"accountValue": "100000"},
+                "assetPositions": [{"position": {"coin": "BTC", "szi": "0.5", "entryPx": "60000",
+                                                 "unrealizedPnl": "10", "marginUsed": "3000"}}],
+            })
+        if body["type"] == "userFillsByTime":
+            from app.collectors import hyperliquid_collector as hc
+
+            self.start_times.setdefault(user, body["startTime"])
+            self.fill_pages[user] = self.fill_pages.get(user, 0) + 1
+            fills = sorted((f for f in _fills(user) if f["time"] >= body["startTime"]), key=lambda f: f["time"])
+            return web.json_response(fills[:hc.FILLS_PAGE_SIZE])
+        if body["type"] == "userFills":
+            return web.json_response(_fills(user))
+        return web.json_response({}, status=400)
+
+
+async def _serve(mock: _MockInfo):
+    app = web.Application()
+    app.router.add_post("/info", mock.handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://127.0.0.1:{port}/info"
+
+
+def _collector(url: str, concurrency: int, weight_per_minute: float):
+    from app.collectors.hyperliquid_collector import HyperliquidCollector
+
+    c = HyperliquidCollector({"monitoring": {"concurrency": concurrency, "weight_per_minute": weight_per_minute}})
+    c.api_url = url
+    return c
+
+
+def _addresses(n: int) -> list:
+    return [f"0x{i:040x}" for i in range(1, n + 1)]
+
+
+async def _test_cursor_and_results() -> None:
+    print("[1] 增量游标: 有游标只拉游标之后的成交, 结果与单地址监控一致")
+    mock = _MockInfo(60000)
+    runner, url = await _serve(mock)
+    try:
+        c = _collector(url, 4, 60000)
+        addrs = _addresses(6)
+        cursor = _fills(addrs[0])[2]["time"]          # 已见到第 3 新的成交
+        res = await c.monitor_addresses_concurrent(addrs, hours=48, cursors={addrs[0]: cursor})
+        if mock.start_times[addrs[0]] != cursor + 1:
+            _fail(f"有游标时 startTime 应为游标+1: {mock.start_times[addrs[0]]}")
+        if len(res[addrs[0]]["recent_trades"]) != 2:
+            _fail(f"游标之后应只有 2 笔: {len(res[addrs[0]]['recent_trades'])}")
+        if mock.start_times[addrs[1]] > NOW_MS - 47 * HOUR_MS:
+            _fail("无游标时应从回溯窗口起拉")
+        for a in addrs:
+            if res[a]["fill_cursor_ms"] != max(f["time"] for f in _fills(a)):
+                _fail(f"{a}: 游标应前移到最新成交")
+        single = await c.monitor_address(addrs[1], hours=48)
+        got = res[addrs[1]]
+        if ([t["time_ms"] for t in got["recent_trades"]] != [t["time_ms"] for t in single["recent_trades"]]
+                or got["positions"] != single["positions"]
+                or got["statistics"] != single["statistics"]):
+            _fail("并发结果应与 monitor_address 一致")
+        _ok("startTime = 游标+1 / 回溯窗口 / 游标前移 / 与单地址口径一致")
+    finally:
+        await runner.cleanup()
+
+
+async def _test_fill_paging() -> None:
+    print("[2] 成交分页: 满页续拉不丢成交; 达到页数上限时游标只前移到已拉到的部分")
+    from app.collectors import hyperliquid_collector as hc
+
+    page_size, max_pages = hc.FILLS_PAGE_SIZE, hc.FILLS_MAX_PAGES
+    mock = _MockInfo(60000)
+    runner, url = await _serve(mock)
+    try:
+        hc.FILLS_PAGE_SIZE = 5
+        c = _collector(url, 4, 60000)
+        addr = _addresses(1)[0]
+        fills = _fills(addr)
+        res = await c.monitor_addresses_concurrent([addr], hours=72)
+        if len(res[addr]["recent_trades"]) != len(fills) or mock.fill_pages[addr] != 3:
+            _fail(f"应分 3 页拉全 {len(fills)} 笔: {len(res[addr]['recent_trades'])} 笔, {mock.fill_pages[addr]} 页")
+        if res[addr]["fill_cursor_ms"] != max(f["time"] for f in fills):
+            _fail("拉全后游标应前移到最新成交")
+
+        hc.FILLS_MAX_PAGES = 2
+        seen, cursor, rounds = set(), None, 0
+        while cursor != max(f["time"] for f in fills) and rounds < 5:
+            r = (await c.monitor_addresses_concurrent([addr], hours=72, cursors={addr: cursor}))[addr]
+            seen.update(t["time_ms"] for t in r["recent_trades"])
+            cursor, rounds = r["fill_cursor_ms"], rounds + 1
+        if seen != {f["time"] for f in fills} or rounds != 2:
+            _fail(f"页数上限下 {rounds} 轮共拿到 {len(seen)}/{len(fills)} 笔")
+        _ok(f"{len(fills)} 笔按每页 5 笔分 3 页拉全; 每轮限 2 页时 {rounds} 轮拉全, 无遗漏")
+    finally:
+        hc.FILLS_PAGE_SIZE, hc.FILLS_MAX_PAGES = page_size, max_pages
+        await runner.cleanup()
+
+
+async def _test_adaptive_limit() -> None:
+    print("[3] 客户端限速高于服务端实际额度时, 429 降速后全部完成; 降下的速率留到下一轮")
+    mock = _MockInfo(3000)
+    runner, url = await _serve(mock)
+    try:
+        c = _collector(url, 16, 12000)
+        addrs = _addresses(60)
+        res = await c.monitor_addresses_concurrent(addrs, hours=48)
+        errors = [a for a, r in res.items() if r.get("error")]
+        if len(res) != len(addrs) or errors:
+            _fail(f"应全部成功: {len(res)} 个结果, {len(errors)} 个失败")
+        if c.monitor_stats["throttled"] == 0 or c.monitor_stats["final_rate_per_min"] >= 12000:
+            _fail(f"应触发降速: {c.monitor_stats}")
+        limiter, first_round = c._monitor_limiter, dict(c.monitor_stats)
+        await c.monitor_addresses_concurrent(addrs[:10], hours=48)
+        if c._monitor_limiter is not limiter or c.monitor_stats["throttled"] >= first_round["throttled"]:
+            _fail(f"第二轮应沿用限速器且 429 更少: {first_round} → {c.monitor_stats}")
+        _ok(f"{len(addrs)} 个地址全部完成, 服务端 429 {mock.throttled} 次, "
+            f"限速 12000 → {first_round['final_rate_per_min']} 权重/分钟; "
+            f"下一轮沿用, 429 {c.monitor_stats['throttled']} 次")
+    finally:
+        await runner.cleanup()
+
+
+async def _bench() -> None:
+    print(f"[4] 吞吐 (模拟延迟 {LATENCY_S * 1000:.0f}ms)")
+    from loguru import logger
+
+    mock = _MockInfo(10 ** 7)
+    runner, url = await _serve(mock)
+    try:
+        c = _collector(url, 8, 10 ** 7)
+        addrs = _addresses(20)
+        t = time.perf_counter()
+        for a in addrs:
+            await c.monitor_address(a, hours=48)
+        serial = len(addrs) / (time.perf_counter() - t) * 60
+        # 原调度: 采集器每地址 sleep(1) + 入库循环每地址 sleep(2)
+        serial_with_sleep = 60 / (60 / serial + 3)
+
+        logger.remove()
+        addrs = _addresses(400)
+        await c.monitor_addresses_concurrent(addrs, hours=48)
+        conc = c.monitor_stats["wallets_per_min"]
+        _ok(f"串行 {serial:.0f} 个/分钟 (含原 3s 间隔 {serial_with_sleep:.0f}), 并发 8 路 {conc:.0f} 个/分钟 "
+            f"(不限速); 线上 1200 权重/分钟 ÷ 22 权重/地址 ≈ 54 个/分钟为上限")
+    finally:
+        await runner.cleanup()
+
+
+class _RecordingCursor:
+    def __init__(self):
+        self.calls = []
+        self.rowcount = 0
+        self._rows = []
+
+    def execute(self, sql, args=None):
+        self.calls.append((" ".join(sql.split())[:40], args))
+        if "SELECT id, address FROM hyperliquid_traders" in sql:
+            self._rows = [{"id": i + 1, "address": a} for i, a in enumerate(args)]
+        else:
+            self._rows = []
+
+    def executemany(self, sql, rows):
+        self.calls.append((" ".join(sql.split())[:40], list(rows)))
+        self.rowcount = len(rows)
+
+    def fetchall(self):
+        return self._rows
+
+
+class _RecordingConn:
+    commits = 0
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        pass
+
+
+async def _test_batch_persist() -> None:
+    print("[5] 批量入库: 每类一次 executemany, 一次提交")
+    from app.database.hyperliquid_db import HyperliquidDB
+
+    mock = _MockInfo(10 ** 7)
+    runner, url = await _serve(mock)
+    try:
+        res = await _collector(url, 8, 10 ** 7).monitor_addresses_concurrent(_addresses(30), hours=48)
+    finally:
+        await runner.cleanup()
+
+    db = HyperliquidDB.__new__(HyperliquidDB)
+    db.cursor, db.conn = _RecordingCursor(), _RecordingConn()
+    HyperliquidDB._MONITOR_COLUMNS_READY = True
+    trades, positions = db.save_monitor_results(res)
+    many = [(sql, rows) for sql, rows in db.cursor.calls if isinstance(rows, list) and rows and isinstance(rows[0], tuple)]
+    want_trades = sum(len(r["recent_trades"]) for r in res.values())
+    if [len(rows) for _, rows in many] != [want_trades, 30, 30] or db.conn.commits != 1:
+        _fail(f"executemany 批次 {[(s, len(r)) for s, r in many]}, 提交 {db.conn.commits} 次")
+    if (trades, positions) != (want_trades, 30):
+        _fail(f"返回计数 {(trades, positions)}")
+    cursor_col = [row[2] for row in many[2][1]]
+    if cursor_col != [res[a]["fill_cursor_ms"] for a in res]:
+        _fail("检查时间批次应带上成交游标")
+    _ok(f"{want_trades} 笔交易 / 30 条持仓 / 30 条检查时间, 共 {len(db.cursor.calls)} 次语句, 1 次提交 "
+        f"(原逐条: 约 {want_trades * 3 + 30 * 3 + 30 * 2} 次语句 + {want_trades + 30 * 2} 次提交)")
+
+
+def main() -> None:
+    from loguru import logger
+
+    logger.remove()
+    logger.add(sys.stderr, level="WARNING")
+    asyncio.run(_test_cursor_and_results())
+    asyncio.run(_test_fill_paging())
+    logger.remove()
+    asyncio.run(_test_adaptive_limit())
+    asyncio.run(_bench())
+    asyncio.run(_test_batch_persist())
+    print("\n全部通过")
+
+
+if __name__ == "__main__":
+    main()
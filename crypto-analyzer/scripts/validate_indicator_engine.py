@@ -0,0 +1,323 @@
+#!/usr/bin/env python3
+"""向量化指标引擎 (app/utils/indicator_engine.py) 与各模块原实现的等价性校验."""
+from __future__ import annotations
+
+import math
+import random
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+TOL = 1e-8
+
+
+def _ok(msg: str) -> None:
+    print(f"  OK  {msg}")
+
+
+def _fail(msg: str) -> None:
+    print(f"  FAIL {msg}")
+    raise SystemExit(1)
+
+
+def _close(a, b, tol: float = TOL) -> bool:
+    if a is None or b is None:
+        return a is None and b is None
+    a, b = float(a), float(b)
+    if math.isnan(a) or math.isnan(b):
+        return math.isnan(a) and math.isnan(b)
+    return abs(a - b) <= tol * max(1.0, abs(a), abs(b))
+
+
+def _assert_series(name: str, got, want) -> None:
+    """got 为引擎输出的整行 (含前导 NaN), want 为参考实现的尾部对齐序列"""
+    got = list(got)[-len(want):] if len(want) else []
+    for i, (g, w) in enumerate(zip(got, want)):
+        if not _close(g, w):
+            _fail(f"{name}[{i}] engine={g} legacy={w}")
+
+
+def _random_walk(n: int, seed: int, start: float = 100.0):
+    rng = random.Random(seed)
+    o, h, l, c, v = [], [], [], [], []
+    price = start
+    for _ in range(n):
+        op = price
+        price = max(0.01, price * (1 + rng.gauss(0, 0.01)))
+        hi = max(op, price) * (1 + abs(rng.gauss(0, 0.003)))
+        lo = min(op, price) * (1 - abs(rng.gauss(0, 0.003)))
+        o.append(op)
+        h.append(hi)
+        l.append(lo)
+        c.append(price)
+        v.append(rng.uniform(100, 1000))
+    return {'open': o, 'high': h, 'low': l, 'close': c, 'volume': v}
+
+
+# ── 被替换前的纯 Python 实现 (原样保留, 作为参考口径) ─────────────
+
+def legacy_ema_sma_seed(values, period):
+    """data_cache_service._calc_ema / deepseek_predictor._ema / entry_timing._ema"""
+    if not values or len(values) < period:
+        return None
+    alpha = 2.0 / (period + 1)
+    ema = sum(values[:period]) / period
+    for v in values[period:]:
+        ema = alpha * v + (1 - alpha) * ema
+    return ema
+
+
+def legacy_rsi_wilder(closes, period=14):
+    """data_cache_service._calc_rsi / deepseek_predictor._rsi / entry_timing._rsi"""
+    if not closes or len(closes) < period + 1:
+        return None
+    gains, losses = [], []
+    for i in range(1, len(closes)):
+        diff = closes[i] - closes[i - 1]
+        gains.append(max(diff, 0))
+        losses.append(max(-diff, 0))
+    avg_gain = sum(gains[:period]) / period
+    avg_loss = sum(losses[:period]) / period
+    for i in range(period, len(gains)):
+        avg_gain = (avg_gain * (period - 1) + gains[i]) / period
+        avg_loss = (avg_loss * (period - 1) + losses[i]) / period
+    if avg_loss == 0:
+        return 100.0
+    return 100 - 100 / (1 + avg_gain / avg_loss)
+
+
+def legacy_atr_tail(highs, lows, closes, period=14):
+    """entry_timing._atr"""
+    if len(closes) < period + 1:
+        return None
+    trs = []
+    for i in range(1, len(closes)):
+        h, l, pc = highs[i], lows[i], closes[i - 1]
+        trs.append(max(h - l, abs(h - pc), abs(l - pc)))
+    return sum(trs[-period:]) / period
+
+
+def legacy_adx(highs, lows, closes, period=14):
+    """MarketRegimeDetector._calculate_adx / scan_all 内联 ADX"""
+    if len(closes) < period + 1:
+        return 25
+    tr_list, plus_dm_list, minus_dm_list = [], [], []
+    for i in range(1, len(closes)):
+        tr_list.append(max(highs[i] - lows[i], abs(highs[i] - closes[i - 1]), abs(lows[i] - closes[i - 1])))
+        up, down = highs[i] - highs[i - 1], lows[i - 1] - lows[i]
+        plus_dm_list.append(max(0, up) if up > down else 0)
+        minus_dm_list.append(max(0, down) if down > up else 0)
+    atr = sum(tr_list[-period:]) / period
+    plus_di = (sum(plus_dm_list[-period:]) / period) / atr * 100 if atr > 0 else 0
+    minus_di = (sum(minus_dm_list[-period:]) / period) / atr * 100 if atr > 0 else 0
+    di_sum = plus_di + minus_di
+    return abs(plus_di - minus_di) / di_sum * 100 if di_sum > 0 else 0
+
+
+def legacy_rsi_sma(closes, period=14):
+    """MarketRegimeDetector._calculate_rsi"""
+    if len(closes) < period + 1:
+        return 50
+    gains, losses = [], []
+    for i in range(1, len(closes)):
+        change = closes[i] - closes[i - 1]
+        gains.append(change if change > 0 else 0)
+        losses.append(0 if change > 0 else abs(change))
+    avg_gain = sum(gains[-period:]) / period
+    avg_loss = sum(losses[-period:]) / period
+    if avg_loss == 0:
+        return 100
+    return 100 - (100 / (1 + avg_gain / avg_loss))
+
+
+# ── 校验 ────────────────────────────────────────────────
+
+def test_imports() -> None:
+    print("[1] imports")
+    from app.utils import indicator_engine as engine
+    for name in ('sma', 'ema', 'rsi', 'macd', 'kdj', 'bollinger', 'atr', 'adx',
+                 'stack_series', 'compute_technical_batch'):
+        assert hasattr(engine, name), name
+    _ok("indicator_engine exports")
+
+
+def test_utils_indicators() -> None:
+    print("[2] app.utils.indicators 全序列")
+    from app.utils import indicator_engine as engine
+    from app.utils import indicators as ref
+
+    for seed in range(5):
+        d = _random_walk(300, seed)
+        c = d['close']
+        for p in (5, 9, 20, 26):
+            _assert_series(f"ema{p}", engine.ema(c, p, seed='sma')[0], ref.calculate_ema(c, p))
+            _assert_series(f"ma{p}", engine.sma(c, p)[0], ref.calculate_ma(c, p))
+        _assert_series("rsi", engine.rsi(c, 14)[0], ref.calculate_rsi(c, 14))
+
+        m = engine.macd(c, seed='sma')
+        want = ref.calculate_macd(c)
+        for key in ('macd', 'signal', 'histogram'):
+            _assert_series(f"macd.{key}", m[key][0], want[key])
+
+        rows = [{'high_price': h, 'low_price': l, 'close_price': x}
+                for h, l, x in zip(d['high'], d['low'], c)]
+        k = engine.kdj(d['high'], d['low'], c, seed=50)
+        want = ref.calculate_kdj(rows)
+        for key in ('k', 'd', 'j'):
+            _assert_series(f"kdj.{key}", k[key][0], want[key])
+    _ok("ema / ma / rsi / macd / kdj(50 起点) 一致")
+
+
+def test_module_helpers() -> None:
+    print("[3] 各模块单值 helper (与替换前实现对比)")
+    from app.services import data_cache_service, entry_timing, feature_store
+    from app.services.market_regime_detector import MarketRegimeDetector
+
+    detector = MarketRegimeDetector.__new__(MarketRegimeDetector)
+    for seed in range(10):
+        n = random.Random(seed).randint(10, 200)
+        d = _random_walk(n, seed)
+        h, l, c = d['high'], d['low'], d['close']
+        rows = [{'high_price': a, 'low_price': b, 'close_price': x} for a, b, x in zip(h, l, c)]
+        bars = [{'open_time': i * 60_000, 'open_price': o, **r} for i, (o, r) in enumerate(zip(d['open'], rows))]
+        for p in (5, 20, 50):
+            want = legacy_ema_sma_seed(c, p)
+            for fn in (data_cache_service._calc_ema, entry_timing._ema):
+                if not _close(fn(c, p), want):
+                    _fail(f"{fn.__module__}.{fn.__name__}({p}) n={n}")
+        want = legacy_rsi_wilder(c, 14)
+        for fn in (data_cache_service._calc_rsi, entry_timing._rsi):
+            if not _close(fn(c, 14), want):
+                _fail(f"{fn.__module__}.{fn.__name__} n={n}")
+        # AI prompt 侧 (探索 / 预测) 的 RSI / EMA 来自特征库
+        feat = feature_store.compute_features('X/USDT', '1h', bars)
+        for key, want in (('rsi_14', legacy_rsi_wilder(c, 14)), ('ema_9', legacy_ema_sma_seed(c, 9)),
+                          ('ema_21', legacy_ema_sma_seed(c, 21))):
+            if not _close(feat[key], want):
+                _fail(f"feature_store.{key} n={n}")
+        if not _close(entry_timing._atr(rows, 14), legacy_atr_tail(h, l, c, 14)):
+            _fail(f"entry_timing._atr n={n}")
+        if not _close(detector._calculate_adx(h, l, c, 14), legacy_adx(h, l, c, 14)):
+            _fail(f"_calculate_adx n={n}")
+        if not _close(detector._calculate_rsi(c, 14), legacy_rsi_sma(c, 14)):
+            _fail(f"_calculate_rsi n={n}")
+
+    flat = [1.0] * 30
+    if detector._calculate_adx(flat, flat, flat) != 0 or legacy_adx(flat, flat, flat) != 0:
+        _fail("flat ADX")
+    if detector._calculate_rsi(flat) != 100:
+        _fail("flat RSI")
+    _ok("_calc_rsi/_calc_ema/feature_store/_ema/_rsi/_atr/_calculate_adx/_calculate_rsi 一致 (含短序列/横盘)")
+
+
+def test_pandas_fallback() -> None:
+    print("[4] TechnicalIndicators 手动分支 (pandas)")
+    import pandas as pd
+    import app.analyzers.technical_indicators as ti
+    from app.utils import indicator_engine as engine
+
+    saved, ti.ta = ti.ta, None
+    try:
+        calc = ti.TechnicalIndicators()
+        for seed in range(5):
+            d = _random_walk(250, seed)
+            df = pd.DataFrame(d)
+            _assert_series("rsi", engine.rsi(d['close'], 14, method='sma')[0], calc.calculate_rsi(df).tolist())
+            m, s, hist = calc.calculate_macd(df)
+            em = engine.macd(d['close'])
+            _assert_series("macd", em['macd'][0], m.tolist())
+            _assert_series("macd_signal", em['signal'][0], s.tolist())
+            _assert_series("macd_hist", em['histogram'][0], hist.tolist())
+            up, mid, lo = calc.calculate_bollinger_bands(df)
+            bb = engine.bollinger(d['close'], 20, 2)
+            _assert_series("bb_upper", bb['upper'][0], up.tolist())
+            _assert_series("bb_middle", bb['middle'][0], mid.tolist())
+            _assert_series("bb_lower", bb['lower'][0], lo.tolist())
+            _assert_series("ema9", engine.ema(d['close'], 9)[0], calc.calculate_ema(df, 9).tolist())
+            _assert_series("ma10", engine.sma(d['close'], 10)[0], calc.calculate_ma(df, 10).tolist())
+            k, dd, j = calc.calculate_kdj(df)
+            kd = engine.kdj(d['high'], d['low'], d['close'])
+            _assert_series("kdj_k", kd['k'][0], k.tolist())
+            _assert_series("kdj_d", kd['d'][0], dd.tolist())
+            _assert_series("kdj_j", kd['j'][0], j.tolist())
+            _assert_series("atr", engine.atr(d['high'], d['low'], d['close'], 14)[0], calc.calculate_atr(df).tolist())
+    finally:
+        ti.ta = saved
+    _ok("rsi / macd / bollinger / ema / ma / kdj / atr 全序列一致")
+
+
+def _compare_results(a, b, path: str = "") -> None:
+    if isinstance(a, dict):
+        if set(a) != set(b):
+            _fail(f"{path} keys {sorted(a)} != {sorted(b)}")
+        for key in a:
+            _compare_results(a[key], b[key], f"{path}.{key}")
+    elif isinstance(a, (bool,)) or a is None or isinstance(a, str):
+        if a != b:
+            _fail(f"{path}: batch={a} single={b}")
+    else:
+        if not _close(a, b, 1e-7):
+            _fail(f"{path}: batch={a} single={b}")
+
+
+def test_analyze_many() -> None:
+    print("[5] analyze_many ↔ analyze (含长度不等的批次)")
+    import pandas as pd
+    import app.analyzers.technical_indicators as ti
+
+    saved, ti.ta = ti.ta, None
+    try:
+        calc = ti.TechnicalIndicators()
+        series = {}
+        for i, n in enumerate((200, 120, 60, 50, 49, 10)):
+            d = _random_walk(n, 100 + i, start=random.Random(i).uniform(0.01, 50000))
+            d['timestamp'] = list(range(n))
+            series[f"S{i}/USDT"] = d
+        batch = calc.analyze_many(series)
+        if set(batch) != {"S0/USDT", "S1/USDT", "S2/USDT", "S3/USDT"}:
+            _fail(f"eligible symbols {sorted(batch)}")
+        for symbol, res in batch.items():
+            single = calc.analyze(pd.DataFrame(series[symbol]))
+            _compare_results(res, single, symbol)
+    finally:
+        ti.ta = saved
+    _ok(f"{len(batch)} symbols match, <50 bars skipped")
+
+
+def test_timing() -> None:
+    print("[6] timing 250 symbols × 200 bars")
+    import pandas as pd
+    import app.analyzers.technical_indicators as ti
+
+    saved, ti.ta = ti.ta, None
+    try:
+        calc = ti.TechnicalIndicators()
+        series = {f"S{i}/USDT": _random_walk(200, i) for i in range(250)}
+        t0 = time.perf_counter()
+        for d in series.values():
+            calc.analyze(pd.DataFrame(d))
+        t_single = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        calc.analyze_many(series)
+        t_batch = time.perf_counter() - t0
+    finally:
+        ti.ta = saved
+    _ok(f"analyze ×250: {t_single * 1000:.0f}ms  analyze_many: {t_batch * 1000:.0f}ms "
+        f"({t_single / max(t_batch, 1e-9):.1f}x)")
+
+
+def main() -> None:
+    test_imports()
+    test_utils_indicators()
+    test_module_helpers()
+    test_pandas_fallback()
+    test_analyze_many()
+    test_timing()
+    print("\nALL PASSED")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+"""调度任务运行时离线校验: 重叠策略 skip / coalesce / 有界线程池与排队延迟 / 常驻事件循环 / 超时 (不重复起阻塞线程) / 取消 / 失败计数 / jitter / 状态表."""
+from __future__ import annotations
+
+import asyncio
+import sys
+import threading
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+
+def _ok(msg: str) -> None:
+    print(f"  OK  {msg}")
+
+
+def _fail(msg: str) -> None:
+    print(f"  FAIL {msg}")
+    raise SystemExit(1)
+
+
+def _wait_idle(runtime, names, timeout: float = 5.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if not any(runtime._jobs[n].active for n in names):
+            return
+        time.sleep(0.01)
+    _fail(f"任务未在 {timeout}s 内结束: {names}")
+
+
+def test_overlap() -> None:
+    print("[1] skip 丢弃重叠触发, coalesce 合并为一次补跑")
+    from app.services.job_runtime import JobRuntime
+
+    rt = JobRuntime(sync_workers=4)
+    calls = {'skip': 0, 'coalesce': 0}
+
+    def slow(key):
+        def run():
+            calls[key] += 1
+            time.sleep(0.2)
+        return run
+
+    fire_skip = rt.register('skip', slow('skip'))
+    fire_coalesce = rt.register('coalesce', slow('coalesce'), overlap='coalesce')
+    for _ in range(5):
+        fire_skip()
+        fire_coalesce()
+        time.sleep(0.01)
+    _wait_idle(rt, ['skip', 'coalesce'])
+    m = rt.metrics()
+    if calls['skip'] != 1 or m['skip']['skipped'] != 4:
+        _fail(f"skip: 执行 {calls['skip']} 次, 跳过 {m['skip']['skipped']}")
+    if calls['coalesce'] != 2 or m['coalesce']['coalesced'] != 4:
+        _fail(f"coalesce: 执行 {calls['coalesce']} 次, 合并 {m['coalesce']['coalesced']}")
+    try:
+        rt.register('skip', slow('skip'))
+        _fail("重复注册未报错")
+    except ValueError:
+        pass
+    try:
+        rt.register('bad', slow('skip'), overlap='queue')
+        _fail("未知策略未报错")
+    except ValueError:
+        pass
+    rt.shutdown()
+    _ok("skip 5 次触发执行 1 次; coalesce 5 次触发执行 2 次; 重复名 / 未知策略报 ValueError")
+
+
+def test_bounded_pool() -> None:
+    print("[2] 同步任务并发不超过线程池上限, 排队时间计入指标")
+    from app.services.job_runtime import JobRuntime
+
+    rt = JobRuntime(sync_workers=2)
+    active, peak, lock = [0], [0], threading.Lock()
+
+    def work():
+        with lock:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        time.sleep(0.15)
+        with lock:
+            active[0] -= 1
+
+    names = [f'sync{i}' for i in range(6)]
+    for n in names:
+        rt.register(n, work)()
+    _wait_idle(rt, names)
+    m = rt.metrics()
+    max_queue = max(m[n]['max_queue_ms'] for n in names)
+    if peak[0] != 2:
+        _fail(f"峰值并发 {peak[0]}")
+    if max_queue < 250:
+        _fail(f"最大排队 {max_queue:.0f}ms")
+    rt.shutdown()
+    _ok(f"6 个任务峰值并发 {peak[0]}, 最大排队 {max_queue:.0f}ms")
+
+
+def test_shared_loop() -> None:
+    print("[3] 异步任务复用同一事件循环; 同步包装返回的协程也回到该循环")
+    from app.services.job_runtime import JobRuntime
+
+    rt = JobRuntime()
+    seen = []
+
+    async def collect():
+        await asyncio.sleep(0.01)
+        seen.append((id(asyncio.get_running_loop()), threading.current_thread().name))
+
+    fire = rt.register('collect', collect)
+    for _ in range(3):
+        fire()
+        _wait_idle(rt, ['collect'])
+    rt.register('wrapped', lambda: collect())()
+    _wait_idle(rt, ['wrapped'])
+    m = rt.metrics()
+    if len(seen) != 4 or len(set(seen)) != 1 or seen[0] != (id(rt.loop), 'JobRuntimeLoop'):
+        _fail(f"循环 / 线程不一致: {seen}")
+    if m['collect']['kind'] != 'async' or m['wrapped']['kind'] != 'sync':
+        _fail(f"类型识别错误: {m['collect']['kind']} / {m['wrapped']['kind']}")
+    rt.shutdown()
+    _ok("4 次执行都在 JobRuntimeLoop 的同一循环上")
+
+
+def test_timeout_and_failure() -> None:
+    print("[4] 异步超时与异常计入失败, 不影响下次触发")
+    from app.services.job_runtime import JobRuntime
+
+    rt = JobRuntime()
+
+    async def hang():
+        await asyncio.sleep(5)
+
+    def boom():
+        raise RuntimeError("db down")
+
+    fire_hang = rt.register('hang', hang, timeout_s=0.1)
+    fire_boom = rt.register('boom', boom)
+    fire_hang()
+    fire_boom()
+    _wait_idle(rt, ['hang', 'boom'])
+    fire_boom()
+    _wait_idle(rt, ['boom'])
+    m = rt.metrics()
+    if m['hang']['timeouts'] != 1 or m['hang']['failures'] != 1 or m['hang']['max_runtime_ms'] > 1000:
+        _fail(f"超时统计: {m['hang']}")
+    if m['boom']['runs'] != 2 or m['boom']['failures'] != 2 or 'db down' not in (m['boom']['last_error'] or ''):
+        _fail(f"失败统计: {m['boom']}")
+    rt.shutdown()
+    _ok(f"超时 {m['hang']['last_runtime_ms']:.0f}ms 后中断; 异常两次都计入 ({m['boom']['last_error']})")
+
+
+def test_timeout_keeps_thread_slot() -> None:
+    print("[5] 超时后 to_thread 线程仍在跑: 任务保持 active, 不再起第二份阻塞调用")
+    from app.services.job_runtime import JobRuntime
+
+    rt = JobRuntime(loop_io_workers=4)
+    active, peak, lock = [0], [0], threading.Lock()
+
+    def blocking():
+        with lock:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        time.sleep(1.5)
+        with lock:
+            active[0] -= 1
+
+    async def refresh():
+        await asyncio.to_thread(blocking)
+
+    fire = rt.register('refresh', refresh, timeout_s=0.3)
+    accepted = 0
+    for _ in range(6):
+        accepted += fire()
+        time.sleep(0.15)
+    m = rt.metrics()['refresh']
+    if peak[0] != 1 or accepted != 1:
+        _fail(f"阻塞线程并发 {peak[0]}, 接受触发 {accepted}")
+    if m['timeouts'] != 1 or not m['running'] or m['skipped'] != 5:
+        _fail(f"超时后应计 1 次超时且保持运行中: {m}")
+
+    # 默认线程池没被占满: 其它异步任务的 to_thread 不排队
+    t0 = time.monotonic()
+    rt.register('other', lambda: asyncio.to_thread(time.sleep, 0))()
+    _wait_idle(rt, ['other'])
+    other_ms = (time.monotonic() - t0) * 1000
+    _wait_idle(rt, ['refresh'])
+    if not fire():
+        _fail("线程返回后应可再次触发")
+    _wait_idle(rt, ['refresh'])
+    rt.shutdown()
+    _ok(f"6 次触发只起 1 个阻塞线程, 5 次跳过; 其它任务 to_thread {other_ms:.0f}ms; 线程返回后恢复触发")
+
+
+def test_cancelled() -> None:
+    print("[6] 任务内部抛 CancelledError: 计为失败并放行, 不卡在运行中")
+    from app.services.job_runtime import JobRuntime
+
+    rt = JobRuntime()
+    calls = [0]
+
+    async def cancelled():
+        calls[0] += 1
+        raise asyncio.CancelledError()
+
+    fire = rt.register('cancelled', cancelled)
+    fire()
+    _wait_idle(rt, ['cancelled'])
+    if not fire():
+        _fail("取消后下一次触发被跳过")
+    _wait_idle(rt, ['cancelled'])
+    m = rt.metrics()['cancelled']
+    if calls[0] != 2 or m['failures'] != 2 or m['skipped'] or m['running']:
+        _fail(f"取消统计: 执行 {calls[0]} 次, {m}")
+    rt.shutdown()
+    _ok(f"两次取消都计入失败 ({m['last_error']}), 未被跳过")
+
+
+def test_jitter_and_delay() -> None:
+    print("[7] jitter / delay_s 推迟执行且不占线程池")
+    from app.services.job_runtime import JobRuntime
+
+    rt = JobRuntime(sync_workers=1)
+    started = {}
+
+    def mark(name):
+        return lambda: started.setdefault(name, time.monotonic())
+
+    t0 = time.monotonic()
+    rt.register('jittered', mark('jittered'), jitter_s=0.3)()
+    rt.run_once('delayed', mark('delayed'), delay_s=0.2)
+    rt.register('now', mark('now'))()
+    _wait_idle(rt, ['jittered', 'delayed', 'now'])
+    if started['now'] - t0 > 0.1:
+        _fail(f"延迟任务占住了唯一的工作线程: now +{started['now'] - t0:.2f}s")
+    if started['delayed'] - t0 < 0.2 or started['jittered'] - t0 > 0.4:
+        _fail(f"delayed +{started['delayed'] - t0:.2f}s / jittered +{started['jittered'] - t0:.2f}s")
+    rt.shutdown()
+    _ok(f"now +{(started['now'] - t0) * 1000:.0f}ms, jittered +{(started['jittered'] - t0) * 1000:.0f}ms, "
+        f"delayed +{(started['delayed'] - t0) * 1000:.0f}ms")
+
+
+def test_format_metrics() -> None:
+    print("[8] 状态表每任务一行")
+    from app.services.job_runtime import JobRuntime
+
+    rt = JobRuntime()
+    rt.register('a', lambda: None)()
+    rt.register('b', lambda: None)
+    _wait_idle(rt, ['a'])
+    lines = rt.format_metrics()
+    if len(lines) != 3 or not lines[1].startswith('a ') or not lines[2].startswith('b '):
+        _fail("\n".join(lines))
+    rt.shutdown()
+    for line in lines:
+        print(f"      {line}")
+    _ok("表头 + 2 行")
+
+
+def main() -> None:
+    from loguru import logger
+
+    logger.remove()
+    test_overlap()
+    test_bounded_pool()
+    test_shared_loop()
+    test_timeout_and_failure()
+    test_timeout_keeps_thread_slot()
+    test_cancelled()
+    test_jitter_and_delay()
+    test_format_metrics()
+    print("\n全部通过")
+
+
+if __name__ == "__main__":
+    main()
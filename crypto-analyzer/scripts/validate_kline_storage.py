@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+"""kline_data 分层存储离线校验: 周期汇总 / 月分区边界 / 分区维护 / 分段归档 (脚本化游标, 不连库)."""
+from __future__ import annotations
+
+import random
+import sys
+from datetime import datetime
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+DAY_MS = 86400_000
+HOUR_MS = 3600_000
+BAR_MS = 300_000
+
+
+def _ok(msg: str) -> None:
+    print(f"  OK  {msg}")
+
+
+def _fail(msg: str) -> None:
+    print(f"  FAIL {msg}")
+    raise SystemExit(1)
+
+
+def _bars(symbol: str, start: int, n: int, seed: int) -> list:
+    """_SOURCE_SQL 行格式的随机 5m K 线"""
+    rng = random.Random(seed)
+    out, price = [], 100.0
+    for i in range(n):
+        o = price
+        c = o * (1 + rng.gauss(0, 0.003))
+        h, l = max(o, c) * (1 + rng.random() * 0.002), min(o, c) * (1 - rng.random() * 0.002)
+        v = rng.uniform(10, 1000)
+        out.append((symbol, start + i * BAR_MS, o, h, l, c, v, v * c, rng.randint(10, 500), v / 2, v * c / 2))
+        price = c
+    return out
+
+
+def test_aggregate() -> None:
+    print("[1] 5m → 1h / 4h / 1d 汇总: 逐字段口径, 缺根的周期不写, 1h 级联 == 直接由 5m")
+    from app.services.kline_storage import aggregate
+
+    day0 = 1767225600000                       # 2026-01-01 UTC
+    rows = []
+    for s, seed in (("BTC/USDT", 1), ("ETH/USDT", 2)):
+        rows += _bars(s, day0, 288 * 2, seed)
+    gap = [r for r in rows if not (r[0] == "ETH/USDT" and r[1] == day0 + 3 * HOUR_MS + 2 * BAR_MS)]
+    rows.sort(key=lambda r: (r[0], r[1]))
+    gap.sort(key=lambda r: (r[0], r[1]))
+
+    h1 = aggregate(gap, '5m', '1h')
+    if len(h1) != 2 * 48 - 1:
+        _fail(f"缺 1 根 5m 的小时应跳过: {len(h1)}")
+    first = [r for r in rows if r[0] == "BTC/USDT"][:12]
+    b = h1[0]
+    want = ("BTC/USDT", "binance_futures", "1h", day0, day0 + HOUR_MS - 1, datetime(2026, 1, 1),
+            first[0][2], max(r[3] for r in first), min(r[4] for r in first), first[-1][5],
+            sum(r[6] for r in first), sum(r[7] for r in first), sum(r[8] for r in first),
+            sum(r[9] for r in first), sum(r[10] for r in first))
+    if any(abs(x - y) > 1e-9 if isinstance(x, float) else x != y for x, y in zip(b, want)):
+        _fail(f"1h 字段: {tuple(b)} != {want}")
+
+    h1_full = aggregate(rows, '5m', '1h')
+    h1_rows = sorted(((r.symbol, r.open_time, r.open_price, r.high_price, r.low_price, r.close_price, r.volume,
+                       r.quote_volume, r.number_of_trades, r.taker_buy_base_volume, r.taker_buy_quote_volume)
+                      for r in h1_full), key=lambda r: (r[0], r[1]))
+    for tf in ('4h', '1d'):
+        direct, cascade = aggregate(rows, '5m', tf), aggregate(h1_rows, '1h', tf)
+        if len(direct) != len(cascade) or any(
+                abs(x - y) > 1e-6 if isinstance(x, float) else x != y
+                for a, c in zip(direct, cascade) for x, y in zip(a, c)):
+            _fail(f"{tf}: 1h 级联与直接汇总不一致")
+    if len(aggregate(rows, '5m', '1d')) != 4:
+        _fail("2 币种 × 2 天应有 4 根 1d")
+    _ok(f"{len(h1)} 根 1h (缺根小时跳过), 4h / 1d 级联与直接汇总一致")
+
+
+def test_partition_bounds() -> None:
+    print("[2] 月分区边界")
+    from app.services.kline_storage import missing_partitions, month_partitions, month_start_ms, partition_clause
+
+    nov = month_start_ms(2025, 11)
+    parts = month_partitions(nov + 5 * DAY_MS, month_start_ms(2026, 2) + DAY_MS)
+    want = [("p202511", month_start_ms(2025, 12)), ("p202512", month_start_ms(2026, 1)),
+            ("p202601", month_start_ms(2026, 2)), ("p202602", month_start_ms(2026, 3))]
+    if parts != want:
+        _fail(f"{parts}")
+    now = month_start_ms(2026, 1) + 10 * DAY_MS
+    clause = partition_clause(nov + 5 * DAY_MS, now, months_ahead=2)
+    if "PARTITION p202603 VALUES LESS THAN" not in clause or "p202604" in clause \
+            or not clause.rstrip().endswith("PARTITION pmax VALUES LESS THAN MAXVALUE\n)"):
+        _fail(clause)
+    existing = {"p202511": want[0][1], "p202512": want[1][1], "pmax": None}
+    new = missing_partitions(existing, now, months_ahead=2)
+    if [n for n, _ in new] != ["p202601", "p202602", "p202603"]:
+        _fail(f"{new}")
+    if missing_partitions(existing, month_start_ms(2025, 11), months_ahead=1):
+        _fail("已覆盖时不应新建")
+    _ok("跨年月界 / 建表子句预建 2 个月 / 从 pmax 拆出缺少的月")
+
+
+class _ScriptCursor:
+    """按 SQL 片段返回预置结果, 记录执行过的语句"""
+
+    def __init__(self, answers: dict):
+        self.answers = answers
+        self.sql = []
+        self._rows = []
+        self.rowcount = 0
+
+    def execute(self, sql, args=None):
+        flat = " ".join(sql.split())
+        self.sql.append((flat, args))
+        self._rows = []
+        for frag, ans in self.answers.items():
+            if frag in flat:
+                self._rows = ans(flat, args) if callable(ans) else ans
+                break
+        self.rowcount = 10
+
+    def fetchall(self):
+        return self._rows
+
+    def fetchone(self):
+        return self._rows[0] if self._rows else None
+
+
+class _Conn:
+    commits = 0
+
+    def commit(self):
+        self.commits += 1
+
+
+def test_maintenance() -> None:
+    print("[3] 分区维护 / 分段归档 / 删空分区")
+    from app.services.kline_storage import (ARCHIVE_CHUNK_MS, KlineStorageManager, month_start_ms)
+
+    mgr = KlineStorageManager({}, {"hot_days": {"5m": 30}})
+    if mgr.hot_days != {"5m": 30, "15m": 120}:
+        _fail(f"hot_days 应与默认合并: {mgr.hot_days}")
+    now = month_start_ms(2026, 5) + 3 * DAY_MS + 5 * HOUR_MS
+
+    cur = _ScriptCursor({"information_schema.PARTITIONS": []})
+    if mgr.ensure_partitions(cur, now) or any("ALTER" in s for s, _ in cur.sql):
+        _fail("未分区的表不应 ALTER")
+
+    parts = [("p202601", str(month_start_ms(2026, 2))), ("p202602", str(month_start_ms(2026, 3))),
+             ("p202603", str(month_start_ms(2026, 4))), ("p202604", str(month_start_ms(2026, 5))),
+             ("p202605", str(month_start_ms(2026, 6))), ("pmax", "MAXVALUE")]
+    cur = _ScriptCursor({"information_schema.PARTITIONS": parts})
+    if mgr.ensure_partitions(cur, now) != ["p202606", "p202607"]:
+        _fail(f"应预建 6、7 月: {cur.sql[-1]}")
+    if not cur.sql[-1][0].startswith("ALTER TABLE kline_data REORGANIZE PARTITION pmax INTO (PARTITION p202606"):
+        _fail(cur.sql[-1][0])
+
+    first = month_start_ms(2026, 1) + 7 * HOUR_MS + 123
+    cur = _ScriptCursor({"ORDER BY open_time LIMIT 1": [(first,)]})
+    conn = _Conn()
+    mgr.archive(conn, cur, "5m", now)
+    cutoff = (now - 30 * DAY_MS) // DAY_MS * DAY_MS
+    ins = [a for s, a in cur.sql if s.startswith("INSERT INTO kline_data_archive")]
+    dels = [a for s, a in cur.sql if s.startswith("DELETE FROM kline_data")]
+    if ins != dels or ins[0][1] != first // ARCHIVE_CHUNK_MS * ARCHIVE_CHUNK_MS or ins[-1][2] != cutoff:
+        _fail(f"归档区间 {ins[:1]} ... {ins[-1:]}, cutoff={cutoff}")
+    if any(a[2] != b[1] for a, b in zip(ins, ins[1:])) or conn.commits != len(ins):
+        _fail("分段应首尾相接, 每段一次提交")
+    _ok(f"未分区跳过 / 预建 2 个月 / 归档 {len(ins)} 段首尾相接至热窗口 (30 天前 UTC 日界)")
+
+    non_empty = {"p202603"}
+    cur = _ScriptCursor({
+        "information_schema.PARTITIONS": parts,
+        "PARTITION (": lambda sql, args: [(1,)] if any(f"({p})" in sql for p in non_empty) else [],
+    })
+    dropped = mgr.drop_empty_partitions(cur, now)
+    # 最长热窗口 120 天 → 只看上界早于 2026-01-04 的分区
+    if dropped:
+        _fail(f"热窗口内不应删: {dropped}")
+    later = month_start_ms(2026, 9)
+    cur = _ScriptCursor({
+        "information_schema.PARTITIONS": parts,
+        "PARTITION (": lambda sql, args: [(1,)] if any(f"({p})" in sql for p in non_empty) else [],
+    })
+    dropped = mgr.drop_empty_partitions(cur, later)
+    if dropped != ["p202601", "p202602", "p202604"]:
+        _fail(f"应只删热窗口外且已空的分区: {dropped}")
+    _ok("热窗口内不删, 窗口外只删已搬空的分区")
+
+
+def test_rollup_window() -> None:
+    print("[4] 汇总窗口: 只重算最近 N 个已收盘周期, 直接写 KlineRow")
+    from app.collectors.smart_futures_collector import KLINE_UPSERT_SQL, KlineRow
+    from app.services.kline_storage import KlineStorageManager
+
+    day0 = 1767225600000
+    now = day0 + 5 * HOUR_MS + 3 * 60_000
+    bars = _bars("BTC/USDT", day0, 12 * 6, 3)
+
+    class _Cur(_ScriptCursor):
+        written = []
+
+        def executemany(self, sql, rows):
+            self.sql.append((" ".join(sql.split())[:30], None))
+            _Cur.written = (sql, rows)
+
+    cur = _Cur({"FROM kline_data WHERE timeframe": lambda sql, a: [r for r in bars if a[2] <= r[1] < a[3]]})
+    rows = KlineStorageManager({}).rollup(cur, "1h", now)
+    src = cur.sql[0][1]
+    if src[:2] != ("5m", "binance_futures") or (src[2], src[3]) != (day0 + 2 * HOUR_MS, day0 + 5 * HOUR_MS):
+        _fail(f"源区间 {src}")
+    if [r.open_time for r in rows] != [day0 + k * HOUR_MS for k in (2, 3, 4)]:
+        _fail(f"{[r.open_time for r in rows]}")
+    if _Cur.written[0] is not KLINE_UPSERT_SQL or not all(isinstance(r, KlineRow) for r in _Cur.written[1]):
+        _fail("应用 KLINE_UPSERT_SQL 写 KlineRow")
+    _ok("1h: 最近 3 个已收盘小时, 进行中的小时不写")
+
+
+def main() -> None:
+    from loguru import logger
+
+    logger.remove()
+    test_aggregate()
+    test_partition_bounds()
+    test_maintenance()
+    test_rollup_window()
+    print("\n全部通过")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""load_klines_bulk (多币种一条窗口查询) 校验 + 与逐币种 LIMIT 查询的基准对比; --db 连库运行."""
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from decimal import Decimal
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+# (timeframe, limit): 覆盖 brain / midline / deepseek / explore 的读取口径
+CASES = (('1d', 50), ('1h', 100), ('15m', 96), ('1h', 168), ('15m', 672), ('1d', 7), ('1h', 12))
+
+
+def _ok(msg: str) -> None:
+    print(f"  OK  {msg}")
+
+
+def _fail(msg: str) -> None:
+    print(f"  FAIL {msg}")
+    raise SystemExit(1)
+
+
+def test_row_conversion() -> None:
+    print("[1] SQL 行 ↔ 列式数组 ↔ kline_data 行格式 / analyze() 短列名")
+    from app.services.kline_store import OHLCV_KEYS, _rows_to_arrays, arrays_to_rows
+
+    raw = [
+        (1_700_000_000_000 + i * 3_600_000, Decimal('1.5') + i, Decimal('2') + i,
+         Decimal('1') + i, Decimal('1.75') + i, None if i == 2 else Decimal('10'))
+        for i in range(5)
+    ]
+    arrays = _rows_to_arrays(raw)
+    if arrays['open_time'].dtype.kind != 'i' or arrays['close'].dtype.kind != 'f':
+        _fail(f"dtypes {arrays['open_time'].dtype} {arrays['close'].dtype}")
+    rows = arrays_to_rows(arrays)
+    if rows[2]['volume'] != 0.0 or rows[4]['close_price'] != 5.75 or rows[0]['open_time'] != raw[0][0]:
+        _fail(f"rows {rows}")
+    short = arrays_to_rows(arrays, OHLCV_KEYS)
+    if short[4] != {'open_time': raw[4][0], 'open': 5.5, 'high': 6.0, 'low': 5.0, 'close': 5.75, 'volume': 10.0}:
+        _fail(f"short rows {short[4]}")
+    if _rows_to_arrays([])['close'].shape != (0,):
+        _fail("empty rows")
+    _ok(f"{len(rows)} rows, Decimal/None → float64, open_time → int64; OHLCV_KEYS 短列名")
+
+
+def _per_symbol(conn, symbols, timeframe, limit):
+    """改造前的逐币种查询口径"""
+    out = {}
+    with conn.cursor() as cur:
+        for symbol in symbols:
+            cur.execute(
+                "SELECT open_time, close_price FROM kline_data "
+                "WHERE symbol=%s AND timeframe=%s AND exchange='binance_futures' "
+                "ORDER BY open_time DESC LIMIT %s",
+                (symbol, timeframe, limit),
+            )
+            rows = list(reversed(cur.fetchall()))
+            if rows:
+                out[symbol] = rows
+    return out
+
+
+def test_db(n_symbols: int, repeat: int) -> None:
+    print(f"[2] DB 对比 + 基准 ({n_symbols} 币种, 每项 {repeat} 次取最快)")
+    import pymysql
+    from app.services import kline_store
+    from app.utils.config_loader import get_db_config
+
+    conn = pymysql.connect(**get_db_config(), charset='utf8mb4')
+    try:
+        with conn.cursor() as cur:
+            cur.execute(
+                "SELECT symbol FROM kline_data WHERE timeframe='1h' AND exchange='binance_futures' "
+                "AND open_time >= (UNIX_TIMESTAMP() - 86400) * 1000 GROUP BY symbol ORDER BY symbol LIMIT %s",
+                (n_symbols,),
+            )
+            symbols = [r[0] for r in cur.fetchall()]
+        if not symbols:
+            _fail("no recent 1h klines")
+
+        for tf, limit in CASES:
+            best = {'per_symbol': 1e9, 'window': 1e9, 'range': 1e9}
+            for _ in range(repeat):
+                t0 = time.perf_counter()
+                want = _per_symbol(conn, symbols, tf, limit)
+                best['per_symbol'] = min(best['per_symbol'], time.perf_counter() - t0)
+
+                for mode in ('window', 'range'):
+                    kline_store._window_supported = None if mode == 'window' else False
+                    t0 = time.perf_counter()
+                    got = kline_store.load_klines_bulk(conn, symbols, tf, limit, use_store=False)
+                    best[mode] = min(best[mode], time.perf_counter() - t0)
+
+                    # 近期连续采集的币种应与逐币种结果逐根一致 (长期断采的币种允许被时间下界排除)
+                    for symbol, rows in got.items():
+                        ref = want.get(symbol)
+                        if ref is None or len(rows['open_time']) != len(ref):
+                            _fail(f"{mode} {tf}/{limit} {symbol}: {len(rows['open_time'])} vs "
+                                  f"{len(ref) if ref else 0}")
+                        if rows['open_time'].tolist() != [int(r[0]) for r in ref] \
+                                or rows['close'].tolist() != [float(r[1]) for r in ref]:
+                            _fail(f"{mode} {tf}/{limit} {symbol}: values differ")
+                    missing = set(want) - set(got)
+                    if len(missing) > len(want) // 10:
+                        _fail(f"{mode} {tf}/{limit}: {len(missing)} symbols dropped")
+            kline_store._window_supported = None
+            _ok(
+                f"{tf:>3}×{limit:<4} per-symbol {best['per_symbol'] * 1000:7.1f}ms | "
+                f"window {best['window'] * 1000:7.1f}ms ({best['per_symbol'] / best['window']:.1f}x) | "
+                f"range {best['range'] * 1000:7.1f}ms ({best['per_symbol'] / best['range']:.1f}x)"
+            )
+    finally:
+        conn.close()
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--db", action="store_true", help="compare against kline_data + benchmark")
+    ap.add_argument("--symbols", type=int, default=250)
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+
+    test_row_conversion()
+    if args.db:
+        test_db(args.symbols, args.repeat)
+    print("\nALL PASSED")
+
+
+if __name__ == "__main__":
+    main()
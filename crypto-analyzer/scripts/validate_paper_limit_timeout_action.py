@@ -149,7 +149,7 @@ def test_market_fill_recalc_sl_tp() -> None:
         _fail("futures_trading_engine 缺少市价成交 SL/TP 重算")
     elif "at_market" not in engine_src or "limit_px" not in engine_src:
         _fail("fill_paper_limit_order 未在 at_market 路径重算 SL/TP")
-    elif "take_profit_price > entry_price" not in exit_src:
+    elif "tp_f > entry_f" not in exit_src:
         _fail("smart_exit_optimizer 未校验 LONG 止盈价须高于入场价")
     else:
         _ok("市价转单重算 SL/TP + monitor 方向校验")
@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+"""复盘盈亏汇总离线校验: 滚动窗口 = 整点后小时桶 + 窗口头部原始持仓, 合并后与逐笔聚合一致 / 回填单事务 + 加锁 / 定时兜底重算 (内存游标, 不连库)."""
+from __future__ import annotations
+
+import random
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+
+def _ok(msg: str) -> None:
+    print(f"  OK  {msg}")
+
+
+def _fail(msg: str) -> None:
+    print(f"  FAIL {msg}")
+    raise SystemExit(1)
+
+
+def _positions(n: int, now: datetime) -> list:
+    rng = random.Random(7)
+    out = []
+    for i in range(n):
+        close = now - timedelta(minutes=rng.randint(0, 60 * 24 * 3))
+        pnl = rng.choice([None, 0.0] + [round(rng.gauss(0, 20), 2)] * 8)
+        out.append({
+            "source": rng.choice(["smart_trader", "PREDICTOR", None]),
+            "symbol": rng.choice(["BTC/USDT", "ETH/USDT", "DOGE/USDT"]),
+            "position_side": rng.choice(["LONG", "SHORT"]),
+            "open_time": close - timedelta(minutes=rng.choice([3, 20, 45, 90, 200, 300, 600, 2000])),
+            "close_time": close,
+            "realized_pnl": pnl,
+            "margin": 100.0,
+            "unrealized_pnl_pct": rng.uniform(-5, 5),
+        })
+    return out
+
+
+def _hold_bucket(p: dict) -> int:
+    from app.services.pnl_rollup import HOLDING_BUCKETS
+
+    minutes = max(0, int((p["close_time"] - p["open_time"]).total_seconds() / 60))
+    for i, (lo, hi, _) in enumerate(HOLDING_BUCKETS):
+        if i == len(HOLDING_BUCKETS) - 1 or minutes < hi:
+            return i
+
+
+def _measures(rows: list) -> dict:
+    """_RAW_MEASURES 的 Python 口径"""
+    pnls = [r["realized_pnl"] for r in rows]
+    nn = [p for p in pnls if p is not None]
+    holds = [int((r["close_time"] - r["open_time"]).total_seconds() // 60) for r in rows]
+    return {
+        "trades": len(rows), "wins": sum(p > 0 for p in nn), "losses": sum(p < 0 for p in nn),
+        "zero_pnl": sum(p == 0 for p in nn), "null_pnl": len(pnls) - len(nn),
+        "pnl_sum": sum(nn), "profit_sum": sum(p for p in nn if p > 0), "loss_sum": sum(p for p in nn if p < 0),
+        "max_pnl": max(nn) if nn else None, "min_pnl": min(nn) if nn else None,
+        "margin_sum": sum(r["margin"] for r in rows),
+        "pct_sum": sum(r["unrealized_pnl_pct"] for r in rows), "pct_n": len(rows),
+        "hold_sum": sum(holds), "hold_n": len(holds),
+    }
+
+
+class _MemCursor:
+    """按 SQL 指向的表 (小时表 / 原始持仓) 用内存持仓回答 query_window 的两段查询"""
+
+    def __init__(self, positions: list, dims: tuple):
+        self.positions = positions
+        self.dims = dims
+        self.result = []
+        self.tables = []
+
+    def execute(self, sql, args=()):
+        if "futures_pnl_rollup_hourly" in sql:
+            lo, hi = args[1], datetime.max
+            self.tables.append("hourly")
+        else:
+            lo, hi = args[1], args[2]
+            self.tables.append("raw")
+        src = args[-1] if "source, '') = %s" in sql or "AND source = %s" in sql else None
+        groups = {}
+        for p in self.positions:
+            if not lo <= p["close_time"] < hi:
+                continue
+            row = {"source": p["source"] or "", "symbol": p["symbol"],
+                   "position_side": p["position_side"], "hold_bucket": _hold_bucket(p)}
+            if src is not None and row["source"] != src:
+                continue
+            groups.setdefault(tuple(row[d] for d in self.dims), []).append(p)
+        if not self.dims and not groups:
+            groups[()] = []
+        self.result = [{**dict(zip(self.dims, k)), **_measures(v)} for k, v in groups.items()]
+
+    def fetchall(self):
+        return self.result
+
+
+def test_window_split() -> None:
+    print("[1] 整点小时桶 + 窗口头部原始持仓 == 逐笔聚合")
+    from app.services import pnl_rollup
+
+    now = datetime(2026, 3, 10, 14, 37, 12)
+    positions = _positions(3000, now)
+    for since in (now - timedelta(hours=24), datetime(2026, 3, 9, 9, 0, 0), now - timedelta(minutes=5)):
+        for dims, source in (((), None), (("symbol",), None), (("source",), None), (("hold_bucket",), "PREDICTOR")):
+            cur = _MemCursor(positions, dims)
+            got = pnl_rollup.query_window(cur, 2, since, dims=dims, source=source)
+            sel = [p for p in positions if p["close_time"] >= since and (source is None or p["source"] == source)]
+            want = {}
+            for p in sel:
+                key = tuple({"source": p["source"] or "", "symbol": p["symbol"],
+                             "hold_bucket": _hold_bucket(p)}[d] for d in dims)
+                want.setdefault(key, []).append(p)
+            if not dims:
+                want.setdefault((), [])
+            for row in got:
+                ref = _measures(want.pop(tuple(row[d] for d in dims)))
+                for k, v in ref.items():
+                    if (v is None) != (row[k] is None) or (v is not None and abs(row[k] - v) > 1e-6):
+                        _fail(f"since={since} dims={dims} {k}: {row[k]} != {v}")
+            if want:
+                _fail(f"缺少分组 {list(want)}")
+            expect = ["hourly", "raw"] if pnl_rollup.hour_ceil(since) > since else ["hourly"]
+            if cur.tables != expect:
+                _fail(f"since={since}: 查询 {cur.tables} != {expect}")
+    _ok("3 种窗口起点 × 4 种分组: 计数 / 求和 / 最大最小值逐项一致, 整点起点不查原始表")
+
+
+def test_holding_sql() -> None:
+    print("[2] 持仓时长分档 SQL 与接口分档一致")
+    from app.services.pnl_rollup import HOLDING_BUCKETS, _HOLD_BUCKET_SQL
+
+    for i, (lo, hi, _) in enumerate(HOLDING_BUCKETS[:-1]):
+        if f"< {hi} THEN {i}" not in _HOLD_BUCKET_SQL:
+            _fail(f"缺少分档 {lo}-{hi}")
+    if not _HOLD_BUCKET_SQL.endswith(f"ELSE {len(HOLDING_BUCKETS) - 1} END"):
+        _fail("最后一档应无上限")
+    _ok(f"{len(HOLDING_BUCKETS)} 档")
+
+
+class _LogConn:
+    """记录 SQL 与事务边界; GET_LOCK 结果 / 失败语句可配置"""
+
+    def __init__(self, lock_free=True, fail_on=None, accounts=(2,), backfilled=()):
+        self.log = []
+        self.lock_free = lock_free
+        self.fail_on = fail_on
+        self.accounts = list(accounts)
+        self.backfilled = set(backfilled)
+        self._result = []
+        self.rowcount = 0
+
+    def cursor(self):
+        return self
+
+    @property
+    def connection(self):
+        return self
+
+    def execute(self, sql, args=()):
+        flat = " ".join(sql.split())
+        if flat.startswith("CREATE"):
+            return
+        self.log.append(flat)
+        if self.fail_on and self.fail_on in flat:
+            raise RuntimeError("boom")
+        if "GET_LOCK" in flat:
+            self._result = [{"got": 1 if self.lock_free else 0}]
+        elif "FROM futures_pnl_rollup_state" in flat:
+            self._result = [{"ok": 1}] if args[0] in self.backfilled else []
+        elif "SELECT DISTINCT account_id" in flat:
+            self._result = [{"account_id": a} for a in self.accounts]
+        else:
+            self._result = []
+
+    def fetchone(self):
+        return self._result[0] if self._result else None
+
+    def fetchall(self):
+        return self._result
+
+    def begin(self):
+        self.log.append("BEGIN")
+
+    def commit(self):
+        self.log.append("COMMIT")
+
+    def rollback(self):
+        self.log.append("ROLLBACK")
+
+    def close(self):
+        pass
+
+
+def test_backfill() -> None:
+    print("[3] 回填: 查询接口不写表; 回填单事务 + 命名锁, 失败回滚, 锁被占用跳过")
+    from app.services import pnl_rollup
+
+    pnl_rollup._BACKFILLED.clear()
+    conn = _LogConn()
+    pnl_rollup.query_window(conn, 2, datetime(2026, 3, 10, 14, 0))
+    pnl_rollup.query_days(conn, 2)
+    if any(q.startswith(("DELETE", "INSERT")) or "GET_LOCK" in q for q in conn.log):
+        _fail(f"查询接口写表: {conn.log}")
+
+    conn = _LogConn(lock_free=False)
+    if pnl_rollup.ensure_backfilled(conn, 2) or any(q.startswith("DELETE") for q in conn.log):
+        _fail(f"锁被占用仍回填: {conn.log}")
+
+    conn = _LogConn()
+    if not pnl_rollup.ensure_backfilled(conn, 2):
+        _fail("未回填")
+    tx = conn.log[conn.log.index("BEGIN"):conn.log.index("COMMIT") + 1]
+    writes = [q.split()[0] for q in tx[1:-1]]
+    if writes != ["DELETE", "INSERT", "DELETE", "INSERT", "INSERT"] or "RELEASE_LOCK" not in conn.log[-1]:
+        _fail(f"回填事务: {writes} / 末条 {conn.log[-1]}")
+    if pnl_rollup.ensure_backfilled(conn, 2):
+        _fail("已回填账户重复回填")
+
+    pnl_rollup._BACKFILLED.clear()
+    conn = _LogConn(fail_on="INSERT INTO futures_pnl_rollup_daily")
+    try:
+        pnl_rollup.ensure_backfilled(conn, 2)
+        _fail("回填失败未抛出")
+    except RuntimeError:
+        pass
+    if "ROLLBACK" not in conn.log or "COMMIT" in conn.log or 2 in pnl_rollup._BACKFILLED:
+        _fail(f"失败未回滚: {conn.log}")
+    if "RELEASE_LOCK" not in conn.log[-1]:
+        _fail("失败后未释放锁")
+    _ok("查询 0 写; 回填 BEGIN→5 条写→COMMIT→RELEASE_LOCK; 失败 ROLLBACK 并释放锁; 锁占用跳过")
+
+
+def test_refresh_recent() -> None:
+    print("[4] 定时兜底: 首轮回填所有未回填账户, 之后每账户一个事务重算最近小时桶")
+    from app.services import pnl_rollup
+
+    pnl_rollup._BACKFILLED.clear()
+    pnl_rollup._SWEPT = False
+    now = datetime(2026, 3, 10, 14, 37)
+    conn = _LogConn(accounts=(2, 3), backfilled={2})
+    stats = pnl_rollup.refresh_recent(conn, hours=3, now=now)
+    scan = next(q for q in conn.log if "SELECT DISTINCT" in q)
+    if "close_time >=" in scan or stats != {"backfilled": 1, "accounts": 1, "hours": 4}:
+        _fail(f"首轮: {stats} / {scan}")
+
+    conn = _LogConn(accounts=(2, 3), backfilled={2, 3})
+    stats = pnl_rollup.refresh_recent(conn, hours=3, now=now)
+    scan = next(q for q in conn.log if "SELECT DISTINCT" in q)
+    hourly = [q for q in conn.log if q.startswith("DELETE FROM futures_pnl_rollup_hourly")]
+    if "close_time >=" not in scan or stats != {"backfilled": 0, "accounts": 2, "hours": 8}:
+        _fail(f"后续轮: {stats} / {scan}")
+    if len(hourly) != 8 or conn.log.count("BEGIN") != 2 or conn.log.count("COMMIT") != 2:
+        _fail(f"重算: {len(hourly)} 个小时桶, BEGIN {conn.log.count('BEGIN')}")
+    _ok("首轮全量扫账户并回填 1 个; 后续只扫最近 3h, 2 个账户 × 4 个小时桶, 每账户 1 个事务")
+
+
+def main() -> None:
+    from loguru import logger
+
+    logger.remove()
+    test_window_split()
+    test_holding_sql()
+    test_backfill()
+    test_refresh_recent()
+    print("\n全部通过")
+
+
+if __name__ == "__main__":
+    main()
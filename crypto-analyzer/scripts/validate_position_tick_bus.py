@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""持仓监控事件总线 (app/services/position_tick_bus.py): tick 扇出 / 合并、内存表对账、批量写入次数."""
+from __future__ import annotations
+
+import asyncio
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+
+def _ok(msg: str) -> None:
+    print(f"  OK  {msg}")
+
+
+def _fail(msg: str) -> None:
+    print(f"  FAIL {msg}")
+    raise SystemExit(1)
+
+
+class _CountingConn:
+    """记录 SQL 次数的连接 (只用于统计写入往返, 不连库)"""
+
+    def __init__(self, log: list):
+        self.log = log
+
+    def cursor(self, dictionary=False):
+        return self
+
+    def execute(self, sql, params=None):
+        self.log.append(('execute', sql.split()[0]))
+
+    def executemany(self, sql, params):
+        self.log.append(('executemany', len(params)))
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class _FakePriceService:
+    def __init__(self):
+        self.callbacks = []
+        self.subscribed_symbols = {'BTC/USDT'}
+        self.subscribe_calls = []
+
+    def add_callback(self, cb):
+        self.callbacks.append(cb)
+
+    def remove_callback(self, cb):
+        self.callbacks.remove(cb)
+
+    async def subscribe(self, symbols):
+        self.subscribe_calls.append(list(symbols))
+        self.subscribed_symbols.update(symbols)
+
+    def push(self, symbol, price):
+        for cb in self.callbacks:
+            cb(symbol, price)
+
+
+def test_tick_fanout() -> None:
+    print("[1] tick 按 symbol 唤醒 + 合并 + 超时回落")
+    from app.services.position_tick_bus import PriceTickBus
+
+    async def run():
+        svc = _FakePriceService()
+        bus = PriceTickBus(svc)
+        await bus.register(1, 'BTC/USDT')
+        await bus.register(2, 'BTC/USDT')
+        await bus.register(3, 'ETH/USDT')
+        if svc.subscribe_calls != [['ETH/USDT']]:
+            _fail(f"subscribe calls {svc.subscribe_calls}")
+
+        for p in (100.0, 101.0, 102.0):      # 3 个 tick 合并为一次唤醒
+            svc.push('BTC/USDT', p)
+        if not await bus.wait(1, timeout=0.5) or not await bus.wait(2, timeout=0.5):
+            _fail("BTC waiters not woken")
+        if bus.latest_price('BTC/USDT') != 102.0:
+            _fail(f"latest {bus.latest_price('BTC/USDT')}")
+        if await bus.wait(3, timeout=0.05):
+            _fail("ETH waiter woken by BTC tick")
+        if await bus.wait(1, timeout=0.05):
+            _fail("coalesced ticks woke twice")
+
+        # 其他线程来的 tick 经 call_soon_threadsafe 投递
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, svc.push, 'ETH/USDT', 3000.0)
+        if not await bus.wait(3, timeout=0.5):
+            _fail("cross-thread tick lost")
+
+        bus.unregister(1)
+        svc.push('BTC/USDT', 103.0)
+        if 1 in bus._events or bus.stats['timeouts'] != 2:
+            _fail(f"unregister / stats {bus.stats}")
+        bus.detach()
+        if svc.callbacks:
+            _fail("detach left callback")
+        return bus.stats
+
+    stats = asyncio.run(run())
+    _ok(f"stats={stats}")
+
+
+def test_position_table() -> None:
+    print("[2] 内存表: 最高盈利只升不降, 对账保留未落库的新高")
+    from app.services import position_tick_bus
+    from app.services.position_tick_bus import PositionTable
+
+    db = {
+        7: {'id': 7, 'symbol': 'BTC/USDT', 'status': 'open', 'max_profit_pct': 1.0,
+            'max_profit_price': 100.0, 'stop_loss_price': 90},
+        8: {'id': 8, 'symbol': 'ETH/USDT', 'status': 'open', 'max_profit_pct': None,
+            'max_profit_price': None, 'stop_loss_price': 2000},
+    }
+
+    class _Table(PositionTable):
+        def fetch(self, ids):
+            return {i: dict(db[i]) for i in ids if i in db}
+
+    table = _Table(lambda: None)
+    for row in db.values():
+        table.put(dict(row))
+    if not table.record_max_profit(7, 2.5, 102.5) or table.record_max_profit(7, 2.0, 102.0):
+        _fail("record_max_profit monotonic")
+
+    db[7]['stop_loss_price'] = 95          # 外部改止损
+    db[8]['status'] = 'closed'             # 外部平仓
+    if table.resync() != 0:
+        _fail("resync before interval")
+    if table.resync(force=True) != 2:
+        _fail("forced resync")
+    row7, row8 = table.get(7), table.get(8)
+    if row7['stop_loss_price'] != 95 or row7['max_profit_pct'] != 2.5 or row7['max_profit_price'] != 102.5:
+        _fail(f"row7 {row7}")
+    if row8['status'] != 'closed':
+        _fail(f"row8 {row8}")
+    del db[7]
+    table.resync(force=True)
+    if table.get(7)['status'] != 'missing':
+        _fail("deleted row not marked")
+    _ok(f"resync interval {position_tick_bus.RESYNC_INTERVAL_S}s, external SL/close picked up")
+
+
+def test_write_batching() -> None:
+    print("[3] 50 持仓 × 60 秒 tick: DB 写入往返")
+    from app.services.position_tick_bus import FLUSH_INTERVAL_S, MaxProfitWriter
+
+    log: list = []
+    writer = MaxProfitWriter(lambda: _CountingConn(log))
+    for sec in range(60):
+        for pid in range(50):
+            writer.record(pid, sec * 0.1 + pid * 0.001, 100.0 + sec)
+        writer._flushed_at -= 1.0          # 模拟过去 1 秒
+        writer.flush()
+    writer.flush(force=True)
+    batches = [n for kind, n in log if kind == 'executemany']
+    if len(batches) > 60 // FLUSH_INTERVAL_S + 1 or sum(batches) > 50 * len(batches):
+        _fail(f"batches {len(batches)} rows {sum(batches)}")
+    old_style = 50 * 60
+    _ok(f"{len(batches)} executemany / {sum(batches)} rows (逐持仓逐秒 UPDATE: {old_style} 次往返)")
+
+
+def main() -> None:
+    test_tick_fanout()
+    test_position_table()
+    test_write_batching()
+    print("\nALL PASSED")
+
+
+if __name__ == "__main__":
+    main()
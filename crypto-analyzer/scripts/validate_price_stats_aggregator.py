@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+"""24h 滚动价格统计离线校验: RollingWindow ↔ 按窗口朴素重算 (含缺口 / 重复 / 乱序 K 线) / on_klines 补缺口 / 新币预热 / 批量写回 (不连库)."""
+from __future__ import annotations
+
+import math
+import random
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+N_STEPS = 3000
+
+
+def _ok(msg: str) -> None:
+    print(f"  OK  {msg}")
+
+
+def _fail(msg: str) -> None:
+    print(f"  FAIL {msg}")
+    raise SystemExit(1)
+
+
+def _naive_row(psa, symbol: str, bars: list):
+    """按定义重算: 窗口 = (最后一根 - 24h, 最后一根]; 24h 前价格 = 窗口外最近一根的收盘 (30h 内)"""
+    if not bars:
+        return None
+    last = bars[-1]['open_time']
+    floor = last - psa.WINDOW_MS
+    inside = [b for b in bars if b['open_time'] > floor]
+    before = [b for b in bars if b['open_time'] <= floor]
+    high = max(b['high_price'] for b in inside)
+    low = min(b['low_price'] for b in inside)
+    cur = bars[-1]['close_price']
+    ago = change = change_abs = None
+    if before and last - before[-1]['open_time'] <= psa.AGO_MAX_MS and before[-1]['close_price'] > 0:
+        ago = before[-1]['close_price']
+        change_abs = cur - ago
+        change = change_abs / ago * 100
+    vol = sum(b['volume'] for b in inside)
+    qvol = sum(b['quote_volume'] for b in inside)
+    price_range = high - low
+    range_pct = price_range / cur * 100 if cur > 0 else 0.0
+    return (symbol, cur, ago, change, change_abs, high, low, vol, qvol,
+            price_range, range_pct, psa.trend_of(change), last)
+
+
+def _same_row(got, want) -> bool:
+    if got is None or want is None:
+        return got is want
+    for g, w in zip(got, want):
+        if isinstance(w, float) and isinstance(g, float):
+            if not math.isclose(g, w, rel_tol=1e-9, abs_tol=1e-6):
+                return False
+        elif g != w:
+            return False
+    return len(got) == len(want)
+
+
+def _bar_stream(psa, n: int, seed: int, start_ms: int, symbol: str = 'BTC/USDT', max_gap: int = 400):
+    """收盘 K 线流: 多数连续, 夹杂 2~max_gap 根的缺口, 以及重复 / 早于当前的乱序 K 线"""
+    rng = random.Random(seed)
+    t, price, out = start_ms, 100.0, []
+    for _ in range(n):
+        r = rng.random()
+        if r < 0.03:
+            t += rng.randint(2, max_gap) * psa.BAR_MS        # 缺口 (默认含超过整个窗口的)
+        elif r < 0.06 and out:
+            out.append(dict(rng.choice(out[-50:])))         # 重复 / 乱序
+            continue
+        else:
+            t += psa.BAR_MS
+        price = max(0.01, price * math.exp(rng.gauss(0, 0.01)))
+        high = price * (1 + rng.random() * 0.01)
+        low = price * (1 - rng.random() * 0.01)
+        out.append({'symbol': symbol, 'timeframe': psa.TIMEFRAME, 'open_time': t,
+                    'high_price': high, 'low_price': low, 'close_price': price,
+                    'volume': rng.uniform(0, 1e4), 'quote_volume': rng.uniform(0, 1e6)})
+    return out
+
+
+def test_window_vs_naive() -> None:
+    print(f"[1] RollingWindow ↔ 朴素 24h 重算 ({N_STEPS} 根: 缺口 / 重复 / 乱序, 跨浮点重算周期)")
+    from app.services import price_stats_aggregator as psa
+
+    bars = _bar_stream(psa, N_STEPS, 11, 1_700_000_000_000 // psa.BAR_MS * psa.BAR_MS)
+    window = psa.RollingWindow()
+    accepted, ignored, with_ago = [], 0, 0
+    for b in bars:
+        ok = window.update(b['open_time'], b['high_price'], b['low_price'], b['close_price'],
+                           b['volume'], b['quote_volume'])
+        if ok != (not accepted or b['open_time'] > accepted[-1]['open_time']):
+            _fail(f"open_time={b['open_time']} 接受={ok}")
+        if not ok:
+            ignored += 1
+            continue
+        accepted.append(b)
+        got, want = window.row('BTC/USDT'), _naive_row(psa, 'BTC/USDT', accepted)
+        if not _same_row(got, want):
+            _fail(f"第 {len(accepted)} 根 open_time={b['open_time']}:\n      got  {got}\n      want {want}")
+        with_ago += got[2] is not None
+    if window.updates < psa._RESYNC_EVERY:
+        _fail("未覆盖滚动和重算周期")
+    if psa.RollingWindow().row('X') is not None:
+        _fail("空窗口应返回 None")
+    _ok(f"{len(accepted)} 根逐根一致 ({with_ago} 根带 24h 前价格), 忽略重复/乱序 {ignored} 根")
+
+
+class _KlineDB:
+    """kline_data (5m) + price_stats_24h 写回记录"""
+
+    def __init__(self):
+        self.rows = []
+        self.writes = []
+        self.selects = []
+
+    def add(self, bars):
+        self.rows.extend(bars)
+
+
+class _Cursor:
+    def __init__(self, db):
+        self.db = db
+        self._rows = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params=()):
+        flat = " ".join(sql.split())
+        if flat.startswith("ALTER TABLE"):
+            return
+        if not flat.startswith("SELECT symbol, open_time"):
+            raise AssertionError(f"未预期的 SQL: {flat[:60]}")
+        self.db.selects.append(flat)
+        params = list(params)
+        symbol = params.pop(2) if "AND symbol = %s" in flat else None
+        after = params[2]
+        before = params[3] if "open_time < %s" in flat else None
+        rows = [r for r in self.db.rows
+                if (symbol is None or r['symbol'] == symbol) and r['open_time'] > after
+                and (before is None or r['open_time'] < before)]
+        self._rows = sorted(rows, key=lambda r: r['open_time'])
+
+    def executemany(self, sql, rows):
+        self.db.writes.append(list(rows))
+
+    def fetchall(self):
+        return self._rows
+
+
+class _Conn:
+    def __init__(self, db):
+        self.db = db
+
+    def cursor(self):
+        return _Cursor(self.db)
+
+    def close(self):
+        pass
+
+
+def _dedup(bars):
+    """落盘后的 kline_data: 每根 open_time 一行, 按时间排序"""
+    return sorted({b['open_time']: b for b in bars}.values(), key=lambda b: b['open_time'])
+
+
+def test_on_klines() -> None:
+    print("[2] on_klines: 连续推进 / 断线缺口从 kline_data 补 / 新币种预热 / 每批一次 executemany")
+    from app.services import price_stats_aggregator as psa
+
+    now_bar = int(time.time() * 1000) // psa.BAR_MS * psa.BAR_MS
+    start = now_bar - 355 * psa.BAR_MS                # hydrate / 预热只载入近 30h (360 根)
+    btc = _dedup(_bar_stream(psa, 400, 3, start, 'BTC/USDT', max_gap=6))
+    btc = [b for b in btc if b['open_time'] <= now_bar]
+    eth = [dict(b, symbol='ETH/USDT') for b in _dedup(_bar_stream(psa, 400, 4, start, 'ETH/USDT', max_gap=6))
+           if b['open_time'] <= now_bar]
+
+    db = _KlineDB()
+    agg = psa.PriceStatsAggregator({})
+    agg._connect = lambda: _Conn(db)
+
+    head = [b for b in btc if b['open_time'] <= start + 120 * psa.BAR_MS]
+    db.add(head)
+    agg.hydrate()
+    if not _same_row(agg.get('BTC/USDT'), _naive_row(psa, 'BTC/USDT', head)):
+        _fail("hydrate 后的窗口与朴素重算不一致")
+
+    seen = list(head)
+    rest = [b for b in btc if b['open_time'] > head[-1]['open_time']]
+    batches, i, rng = 0, 0, random.Random(5)
+    while i < len(rest):
+        step = rng.randint(1, 4)
+        batch = rest[i:i + step]
+        i += step
+        db.add(batch)                                 # WS 落盘后才调用 on_klines
+        if rng.random() < 0.1:
+            continue                                  # 断线: 这批没推给聚合器, 之后靠 _fill_gap 补
+        extra = [dict(b) for b in batch[:1]]          # 同批内重复
+        extra.append({**batch[0], 'timeframe': '1h'})  # 非 5m 忽略
+        writes = len(db.writes)
+        agg.on_klines(list(reversed(batch)) + extra)
+        batches += 1
+        if len(db.writes) != writes + 1:
+            _fail("每次 on_klines 应一次 executemany")
+        seen = _dedup(seen + [b for b in rest if b['open_time'] <= batch[-1]['open_time']])
+        want = _naive_row(psa, 'BTC/USDT', seen)
+        if not _same_row(db.writes[-1][0], want) or not _same_row(agg.get('BTC/USDT'), want):
+            _fail(f"第 {batches} 批 open_time={batch[-1]['open_time']}:\n"
+                  f"      got  {db.writes[-1][0]}\n      want {want}")
+
+    db.add(eth)                                       # 新币种: 第一次出现时整段已落盘
+    written = agg.on_klines(eth[-1:])
+    if written != 1 or not _same_row(db.writes[-1][0], _naive_row(psa, 'ETH/USDT', eth)):
+        _fail("新币种预热后应与朴素重算一致")
+    stats = agg.get_stats()
+    if stats['gap_fills'] == 0 or stats['warmed_up'] != 1 or stats['tracked'] != 2:
+        _fail(f"{stats}")
+    if agg.on_klines([{**eth[-1], 'timeframe': '15m'}]) != 0:
+        _fail("无 5m K 线不应写库")
+    _ok(f"{batches} 批逐批一致; 缺口补齐 {stats['gap_fills']} 次, 新币预热 {stats['warmed_up']} 个, "
+        f"重复/乱序/非 5m 均忽略")
+
+
+def test_stream_freshness() -> None:
+    print("[3] stream_open_time 新鲜度判定")
+    from app.services import price_stats_aggregator as psa
+
+    now = 1_700_000_000_000
+    if not psa.is_stream_live(now - psa.FRESH_BARS * psa.BAR_MS, now):
+        _fail("落后 FRESH_BARS 根以内应视为在维护")
+    if psa.is_stream_live(now - psa.FRESH_BARS * psa.BAR_MS - 1, now) or psa.is_stream_live(None, now):
+        _fail("超过 FRESH_BARS 根 / 无值应回退整表 UPDATE")
+    _ok(f"≤{psa.FRESH_BARS} 根在维护, 否则回退")
+
+
+def main() -> None:
+    from loguru import logger
+
+    logger.remove()
+    test_window_vs_naive()
+    test_on_klines()
+    test_stream_freshness()
+    print("\n全部通过")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""回放引擎离线校验: 时钟截断 / 游标 / 成交模拟 / 合成数据端到端重放 (不连库)."""
+from __future__ import annotations
+
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+import numpy as np  # noqa: E402
+
+DAY_MS = 86400000
+
+
+def _ok(msg: str) -> None:
+    print(f"  OK  {msg}")
+
+
+def _fail(msg: str) -> None:
+    print(f"  FAIL {msg}")
+    raise SystemExit(1)
+
+
+def _bars(timeframe: str, since_ms: int, until_ms: int, seed: int, p0: float = 100.0) -> dict:
+    from app.services.kline_store import timeframe_to_ms
+
+    rng = np.random.default_rng(seed)
+    ms = timeframe_to_ms(timeframe)
+    t = np.arange(since_ms // ms * ms, until_ms, ms, dtype=np.int64)
+    c = p0 * np.exp(np.cumsum(rng.normal(0, 0.004 * np.sqrt(ms / 900000), len(t))))
+    o = np.concatenate(([p0], c[:-1]))
+    return {
+        'open_time': t, 'open': o, 'close': c,
+        'high': np.maximum(o, c) * (1 + np.abs(rng.normal(0, 0.002, len(t)))),
+        'low': np.minimum(o, c) * (1 - np.abs(rng.normal(0, 0.002, len(t)))),
+        'volume': rng.lognormal(10, 0.5, len(t)),
+    }
+
+
+def test_clock_cutoff() -> None:
+    print("[1] 数据源只露出时钟之前收盘的 K 线")
+    from app.services.replay_engine import HistoricalKlineSource, ReplayClock
+
+    clock = ReplayClock()
+    src = HistoricalKlineSource(clock)
+    src.add('BTC/USDT', '1h', _bars('1h', 0, 10 * 3600000, 1))
+    clock.set(5 * 3600000)          # 05:00: 04:00 那根刚收盘
+    rows = src.get_rows('BTC/USDT', '1h', 100)
+    if len(rows) != 5 or rows[-1]['open_time'] != 4 * 3600000:
+        _fail(f"05:00 应可见 5 根, 最后一根 04:00, 实际 {len(rows)} 根")
+    clock.set(5 * 3600000 - 1)
+    if len(src.get_rows('BTC/USDT', '1h', 100)) != 4:
+        _fail("04:00 那根未收盘时不应可见")
+    arr = src.get_arrays('BTC/USDT', '1h', 3)
+    if arr['open_time'].tolist() != [1 * 3600000, 2 * 3600000, 3 * 3600000]:
+        _fail(f"get_arrays 截尾错误: {arr['open_time'].tolist()}")
+    if src.get_rows('ETH/USDT', '1h', 10) != []:
+        _fail("未知币种应返回空列表 (不回落 SQL)")
+    _ok("收盘截断 / limit 截尾 / 未知币种")
+
+
+def test_cursor() -> None:
+    print("[2] 回放游标")
+    from app.services.replay_engine import HistoricalKlineSource, ReplayClock, ReplayCursor, ReplayQueryError
+
+    clock = ReplayClock(6 * 3600000)
+    src = HistoricalKlineSource(clock)
+    src.add('BTC/USDT', '1h', _bars('1h', 0, 10 * 3600000, 2))
+    cur = ReplayCursor(src)
+    cur.execute(
+        """
+        SELECT open_time, open_price, high_price, low_price, close_price, volume
+        FROM kline_data
+        WHERE symbol=%s AND timeframe=%s AND exchange='binance_futures'
+        ORDER BY open_time DESC LIMIT %s
+        """,
+        ('BTCUSDT', '1h', 3),
+    )
+    got = [r['open_time'] for r in cur.fetchall()]
+    if got != [5 * 3600000, 4 * 3600000, 3 * 3600000]:
+        _fail(f"DESC 顺序 / 币种写法归一错误: {got}")
+    try:
+        cur.execute("SELECT * FROM futures_positions WHERE status='open'")
+    except ReplayQueryError:
+        pass
+    else:
+        _fail("非 K 线查询应报错")
+    _ok("最近 N 根查询 (BTCUSDT → BTC/USDT) / 其他 SQL 拒绝")
+
+
+def test_simulate_exit() -> None:
+    print("[3] 成交模拟")
+    from app.services.replay_engine import simulate_exit
+
+    def bars(rows):
+        a = np.array(rows, dtype=np.float64)
+        return {'open_time': np.arange(len(rows), dtype=np.int64) * 60000,
+                'open': a[:, 0], 'high': a[:, 1], 'low': a[:, 2], 'close': a[:, 3]}
+
+    # LONG 100, SL 2% = 98, TP 4% = 104
+    b = bars([(100, 101, 99, 100), (100, 105, 97, 101), (101, 102, 100, 101)])
+    if simulate_exit(b, 0, 'LONG', 100, 2, 4, 10 ** 9, 60000) != ('stop_loss', 98.0, 120000):
+        _fail("同根同时触及应按 SL")
+    b = bars([(100, 101, 99, 100), (100, 104.5, 99, 104), (104, 105, 103, 104)])
+    if simulate_exit(b, 0, 'LONG', 100, 2, 4, 10 ** 9, 60000) != ('take_profit', 104.0, 120000):
+        _fail("TP 触发价成交")
+    b = bars([(100, 101, 99, 100), (95, 96, 94, 95)])
+    if simulate_exit(b, 0, 'LONG', 100, 2, 4, 10 ** 9, 60000) != ('stop_loss', 95.0, 60000):
+        _fail("跳空越过 SL 应按开盘价成交")
+    b = bars([(100, 101, 99, 100), (100, 101, 99, 100), (100.5, 101, 99, 100), (100, 101, 99, 100)])
+    if simulate_exit(b, 0, 'SHORT', 100, 2, 4, 120000, 60000) != ('planned_close_time_expired', 100.5, 120000):
+        _fail("到期应按到期时刻开盘价平仓")
+    if simulate_exit(b, 0, 'SHORT', 100, 2, 4, 10 ** 9, 60000) != ('end_of_data', 100.0, 240000):
+        _fail("数据结束应按最后收盘价平仓")
+    _ok("SL 优先 / TP / 跳空 / 到期 / 数据结束")
+
+
+def test_end_to_end() -> None:
+    print("[4] 合成数据端到端重放 (四个策略)")
+    from app.services.kline_store import timeframe_to_ms
+    from app.services.replay_engine import (
+        STRATEGIES, WARMUP_BARS, ExitParams, HistoricalKlineSource, ReplayClock,
+        _context_chunk, _ShardReplayer, _quiet_worker_logs, market_symbols, replay_steps, summarize_trades,
+    )
+
+    start = 1_760_000_000_000 // DAY_MS * DAY_MS
+    end = start + 7 * DAY_MS
+    steps = replay_steps(start, end, '15m')
+    ranges = {tf: (start - n * timeframe_to_ms(tf), end + DAY_MS) for tf, n in WARMUP_BARS.items()}
+
+    market = HistoricalKlineSource(ReplayClock())
+    for i, sym in enumerate(market_symbols()):
+        for tf, (a, b) in ranges.items():
+            market.add(sym, tf, _bars(tf, a, b, 100 + i))
+    contexts = _context_chunk(market.export(), steps)
+    if len(contexts) != len(steps) or not all('big4' in c for c in contexts.values()):
+        _fail("大盘上下文应逐步算出")
+
+    symbols = ['DOGE/USDT', 'ADA/USDT']
+    job = {
+        'shard': 0, 'symbols': symbols, 'strategies': list(STRATEGIES), 'contexts': contexts,
+        'exit_params': {name: ExitParams(3, 5, 6) for name in STRATEGIES},
+        'exec_tf': '15m', 'fee_pct': 0.05, 'start_ms': start, 'end_ms': end, 'steps': steps,
+        'brain_state': {'whitelist': symbols, 'scoring_weights': {}, 'threshold': 55,
+                        'max_threshold': 150, 'signal_confirmation_enabled': False},
+        'blacklist_rows': [],
+    }
+    replayer = _ShardReplayer(job)
+    _quiet_worker_logs()
+    for i, sym in enumerate(symbols):
+        for tf, (a, b) in ranges.items():
+            replayer.source.add(sym, tf, _bars(tf, a, b, 200 + i))
+    t0 = time.perf_counter()
+    for sym in symbols:
+        replayer.replay_symbol(sym, steps)
+    elapsed = time.perf_counter() - t0
+
+    for t in replayer.trades:
+        if not (t.signal_ms <= t.entry_ms < t.exit_ms):
+            _fail(f"成交时间顺序错误: {t}")
+    by_key = {}
+    for t in sorted(replayer.trades, key=lambda t: t.entry_ms):
+        prev = by_key.get((t.strategy, t.symbol))
+        if prev is not None and t.entry_ms < prev.exit_ms:
+            _fail(f"同策略同币种持仓重叠: {prev} / {t}")
+        by_key[(t.strategy, t.symbol)] = t
+    counts = {k: v['trades'] for k, v in summarize_trades(replayer.trades).items()}
+    _ok(f"{replayer.evaluations} 次评估 {elapsed:.1f}s "
+        f"({elapsed * 1000 / max(1, replayer.evaluations):.2f} ms/币种步), {len(replayer.trades)} 笔 {counts}")
+
+
+def main() -> None:
+    test_clock_cutoff()
+    test_cursor()
+    test_simulate_exit()
+    test_end_to_end()
+    print("\n全部通过")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+"""settings_store 离线校验: 版本号核对 / 跨进程写入秒级生效 / 无触发器退化 / 库不可用沿用快照 / 刷新不阻塞读取 / 旧入口兼容 (脚本化连接, 不连库)."""
+from __future__ import annotations
+
+import sys
+import threading
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+
+def _ok(msg: str) -> None:
+    print(f"  OK  {msg}")
+
+
+def _fail(msg: str) -> None:
+    print(f"  FAIL {msg}")
+    raise SystemExit(1)
+
+
+class _DB:
+    """system_settings + settings_version; 触发器语义由 write() 模拟"""
+
+    def __init__(self, rows, trigger_denied=False):
+        self.rows = dict(rows)
+        self.version = 0
+        self.triggers = set()
+        self.trigger_denied = trigger_denied
+        self.down = False
+        self.sql = []
+        self.connect_kwargs = None
+        self.stall = None               # threading.Event: 版本核对卡在这里直到 set()
+        self.stalled = threading.Event()
+
+    def write(self, key, value):
+        """另一个进程 / 手工 SQL 写入"""
+        self.rows[key] = value
+        if len(self.triggers) == 3:
+            self.version += 1
+
+    def count(self, prefix):
+        return sum(1 for s in self.sql if s.startswith(prefix))
+
+
+class _Cursor:
+    def __init__(self, db):
+        self.db = db
+        self._rows = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, args=None):
+        db = self.db
+        if db.down:
+            raise ConnectionError("server gone")
+        flat = " ".join(sql.split())
+        db.sql.append(flat)
+        self._rows = []
+        if "information_schema.TRIGGERS" in flat:
+            self._rows = [(t,) for t in db.triggers]
+        elif flat.startswith("CREATE TRIGGER"):
+            if db.trigger_denied:
+                raise PermissionError("TRIGGER command denied")
+            db.triggers.add(flat.split()[2])
+        elif flat.startswith("SELECT version"):
+            if db.stall is not None:
+                db.stalled.set()
+                db.stall.wait(5)
+            self._rows = [(db.version,)]
+        elif flat.startswith("SELECT setting_key"):
+            self._rows = list(db.rows.items())
+        elif flat.startswith("UPDATE settings_version"):
+            db.version += 1
+
+    def fetchone(self):
+        return self._rows[0] if self._rows else None
+
+    def fetchall(self):
+        return self._rows
+
+
+class _Conn:
+    def __init__(self, db):
+        self.db = db
+
+    def cursor(self):
+        return _Cursor(self.db)
+
+    def ping(self, reconnect=False):
+        if self.db.down:
+            raise ConnectionError("server gone")
+
+    def close(self):
+        pass
+
+
+class _Clock:
+    t = 1000.0
+
+    @classmethod
+    def monotonic(cls):
+        return cls.t
+
+
+def _install(db):
+    """新的进程级 store, 连接指向 db"""
+    from app.services import settings_store as ss
+
+    def connect(**kw):
+        db.connect_kwargs = kw
+        return _Conn(db)
+
+    ss.pymysql.connect = connect
+    ss.time = _Clock
+    ss._global_settings_store = ss.SettingsStore(db_config={})
+    return ss._global_settings_store
+
+
+def test_hot_reads() -> None:
+    print("[1] 读取走内存: 版本号每 VERSION_CHECK_INTERVAL_S 最多核对一次, 版本不变不重载")
+    from app.services import settings_store as ss
+    from app.services.trading_gates import is_live_trading_enabled
+
+    db = _DB({'live_trading_enabled': '1', 'max_positions': '30'})
+    store = _install(db)
+    for _ in range(10_000):
+        if not is_live_trading_enabled():
+            _fail("live_trading_enabled 应为开")
+    if db.count("SELECT version") != 1 or db.count("SELECT setting_key") != 1:
+        _fail(f"一万次闸门读取应只查 1 次版本 + 1 次全表: {db.sql}")
+    if len(db.triggers) != 3 or not store.get_stats()['tracked']:
+        _fail("首次读取应建好三个触发器")
+    _Clock.t += ss.VERSION_CHECK_INTERVAL_S
+    store.get('max_positions')
+    if db.count("SELECT version") != 2 or db.count("SELECT setting_key") != 1:
+        _fail("版本不变只核对, 不重载")
+    _ok("10000 次读取 1 次版本核对; 版本不变不重载全表")
+
+
+def test_cross_process_write() -> None:
+    print("[2] 其它进程写入 (触发器 +1) 在一个核对周期内生效; 本进程 notify 立即生效")
+    from app.services import settings_store as ss
+    from app.services.trading_gates import is_live_trading_enabled
+
+    db = _DB({'live_trading_enabled': '1'})
+    store = _install(db)
+    is_live_trading_enabled()
+    db.write('live_trading_enabled', '0')              # kill switch
+    if not is_live_trading_enabled():
+        _fail("核对周期内应仍是旧快照")
+    _Clock.t += ss.VERSION_CHECK_INTERVAL_S
+    if is_live_trading_enabled():
+        _fail(f"{ss.VERSION_CHECK_INTERVAL_S}s 后应已关闭")
+
+    db.rows['live_trading_enabled'] = '1'              # 本进程写入 (事务里顺带 bump)
+    ss.notify_settings_changed()
+    if not is_live_trading_enabled() or db.version != 2:
+        _fail("notify 后本进程应立即看到新值, 版本号 +1")
+    if store.get_stats()['reloads'] != 3:
+        _fail(f"{store.get_stats()}")
+    _ok(f"kill switch 跨进程 ≤{ss.VERSION_CHECK_INTERVAL_S}s 生效, 无逐闸门 SQL")
+
+
+def test_no_trigger_fallback() -> None:
+    print("[3] 无 TRIGGER 权限: notify 的写入仍秒级生效, 其它写入退化为 FALLBACK_TTL_S 定时重载")
+    from app.services import settings_store as ss
+
+    db = _DB({'allow_long': '1'}, trigger_denied=True)
+    store = _install(db)
+    store.get('allow_long')
+    if store.get_stats()['tracked']:
+        _fail("触发器失败时 tracked 应为 False")
+    db.write('allow_long', '0')                         # 脚本直接写, 无触发器 → 版本号不变
+    _Clock.t += ss.VERSION_CHECK_INTERVAL_S
+    if store.get('allow_long') != '1':
+        _fail("未到 TTL 不应重载")
+    _Clock.t += ss.FALLBACK_TTL_S
+    if store.get('allow_long') != '0':
+        _fail("超过 FALLBACK_TTL_S 应重载")
+
+    other = ss.SettingsStore(db_config={})              # 另一个进程
+    other.get('allow_long')
+    db.rows['allow_long'] = '1'
+    ss.notify_settings_changed()
+    _Clock.t += ss.VERSION_CHECK_INTERVAL_S
+    if other.get('allow_long') != '1':
+        _fail("notify 的版本号应让其它进程在核对周期内重载")
+    _ok("缺触发器不影响读取, 接口写入仍跨进程秒级生效")
+
+
+def test_db_down() -> None:
+    print("[4] 库不可用: 沿用上一份快照, ERROR_BACKOFF_S 内不再重试")
+    from app.services import settings_store as ss
+
+    db = _DB({'max_hold_hours': '6'})
+    store = _install(db)
+    store.get('max_hold_hours')
+    db.down = True
+    n = len(db.sql)
+    _Clock.t += ss.VERSION_CHECK_INTERVAL_S
+    for _ in range(100):
+        if store.get('max_hold_hours') != '6':
+            _fail("应沿用旧快照")
+    if store.get_stats()['errors'] != 1:
+        _fail(f"退避期内只应失败 1 次: {store.get_stats()}")
+    db.down = False
+    db.write('max_hold_hours', '8')
+    _Clock.t += ss.ERROR_BACKOFF_S
+    if store.get('max_hold_hours') != '8' or len(db.sql) == n:
+        _fail("恢复后应重新核对并重载")
+    _ok("断库时 100 次读取只尝试 1 次, 恢复后重载")
+
+
+def test_refresh_does_not_block_readers() -> None:
+    print("[5] 连接带短超时; 一个线程卡在核对时, 其它线程直接读当前快照")
+    from app.services import settings_store as ss
+
+    db = _DB({'live_trading_enabled': '1'})
+    store = _install(db)
+    store.get('live_trading_enabled')
+    kw = db.connect_kwargs
+    if kw.get('connect_timeout') != ss.CONNECT_TIMEOUT_S or kw.get('read_timeout') != ss.READ_TIMEOUT_S:
+        _fail(f"连接参数缺少超时: {kw}")
+
+    db.write('live_trading_enabled', '0')
+    db.stall = threading.Event()
+    _Clock.t += ss.VERSION_CHECK_INTERVAL_S
+    refresher = threading.Thread(target=store.get, args=('live_trading_enabled',))
+    refresher.start()
+    if not db.stalled.wait(2):
+        _fail("刷新线程未进入版本核对")
+    t0 = time.perf_counter()
+    values = [store.get('live_trading_enabled') for _ in range(1000)]
+    elapsed_ms = (time.perf_counter() - t0) * 1000
+    db.stall.set()
+    refresher.join(2)
+    if set(values) != {'1'} or elapsed_ms > 100:
+        _fail(f"刷新期间读取应立即返回旧快照: {set(values)}, {elapsed_ms:.0f}ms")
+    if store.get('live_trading_enabled') != '0':
+        _fail("刷新完成后应读到新值")
+    _ok(f"刷新卡住期间 1000 次读取 {elapsed_ms:.1f}ms 返回旧快照; 完成后读到新值")
+
+
+def test_legacy_entry_points() -> None:
+    print("[6] 旧入口: loader 的 bool 转换 / data_cache.get_setting 默认值 / 闸门忽略 cursor")
+    from app.services import settings_store as ss
+    from app.services.data_cache_service import get_setting, invalidate_setting_cache
+    from app.services.system_settings_loader import get_big4_filter_enabled, get_max_positions, get_system_settings
+    from app.services.trading_gates import get_paper_direction_flags, is_spot_live_enabled
+
+    db = _DB({'big4_filter_enabled': 'false', 'max_positions': '12', 'allow_short': '0', 'spot_live_enabled': 'true'})
+    _install(db)
+    first = get_system_settings()
+    if first['big4_filter_enabled'] is not False or get_big4_filter_enabled() or get_max_positions() != 12:
+        _fail(f"{first}")
+    if get_system_settings() is not first:
+        _fail("快照未变时 loader 不应重复转换")
+    if get_setting('missing_key', 'dflt') != 'dflt' or get_setting('max_positions') != '12':
+        _fail("data_cache.get_setting")
+
+    class _Boom:
+        def execute(self, *a, **k):
+            raise AssertionError("闸门不应再用 cursor 查 system_settings")
+
+    if get_paper_direction_flags(_Boom()) != (True, False) or not is_spot_live_enabled(_Boom()):
+        _fail("方向 / 现货开关")
+    n = db.count("SELECT setting_key")
+    invalidate_setting_cache()
+    get_setting('max_positions')
+    if db.count("SELECT setting_key") != n + 1:
+        _fail("invalidate_setting_cache 应强制重载")
+    ss._global_settings_store = None
+    _ok("返回值与旧实现一致, invalidate_* 仍可用")
+
+
+def main() -> None:
+    from loguru import logger
+
+    logger.remove()
+    test_hot_reads()
+    test_cross_process_write()
+    test_no_trigger_fallback()
+    test_db_down()
+    test_refresh_does_not_block_readers()
+    test_legacy_entry_points()
+    print("\n全部通过")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""共享价格表离线校验: 跨进程 seqlock 无撕裂读 / 索引追加 / 重启沿用 / HubHttpProxy 命中 / 单次读耗时."""
+from __future__ import annotations
+
+import multiprocessing as mp
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+N_SYMBOLS = 300
+
+
+def _ok(msg: str) -> None:
+    print(f"  OK  {msg}")
+
+
+def _fail(msg: str) -> None:
+    print(f"  FAIL {msg}")
+    raise SystemExit(1)
+
+
+def _writer(path: str, seconds: float, ready) -> None:
+    """每轮把全部槽位的 ws / ticker / mark 价格与时间写成同一个值 k, 读方据此判断是否读到半截"""
+    sys.path.insert(0, str(ROOT))
+    from app.services.shared_price_table import SharedPriceTable
+
+    table = SharedPriceTable.open_writer(path)
+    symbols = [f"C{i}USDT" for i in range(N_SYMBOLS)]
+    ready.set()
+    k, deadline = 1.0, time.time() + seconds
+    while time.time() < deadline:
+        vals = [k] * N_SYMBOLS
+        table.write_many("ws", symbols, vals, k)
+        table.write_many("ticker", symbols, vals, k)
+        table.write_many("mark", symbols, vals, k, funding=vals)
+        k += 1.0
+
+
+def test_cross_process(path: str) -> None:
+    print("[1] 写进程持续写入时, 读进程不会读到半截槽位")
+    from app.services.shared_price_table import SharedPriceTable
+
+    ctx = mp.get_context("spawn")
+    ready = ctx.Event()
+    proc = ctx.Process(target=_writer, args=(path, 3.0, ready))
+    proc.start()
+    if not ready.wait(30):
+        _fail("写进程未就绪")
+    table = SharedPriceTable.attach(path)
+    if table is None:
+        _fail("只读挂载失败")
+    reads = torn = misses = 0
+    deadline = time.time() + 2.0
+    while time.time() < deadline:
+        for i in range(0, N_SYMBOLS, 7):
+            rec = table.read(f"C{i}USDT")
+            reads += 1
+            if rec is None:
+                misses += 1
+                continue
+            ticker, ticker_ts, mark, mark_ts, funding, ws, ws_ts = rec
+            if ticker != ticker_ts or mark != mark_ts or mark != funding or ws != ws_ts:
+                torn += 1
+    proc.join()
+    if torn:
+        _fail(f"{torn}/{reads} 次读到不一致的槽位")
+    if len(table.symbols()) != N_SYMBOLS:
+        _fail(f"索引应有 {N_SYMBOLS} 个币种: {len(table.symbols())}")
+    _ok(f"{reads} 次读无撕裂 (放弃重试 {misses} 次), 索引 {len(table.symbols())} 个币种")
+    table.close()
+
+
+def test_reopen_and_proxy(path: str) -> None:
+    print("[2] 写入方重启沿用槽位 / HubHttpProxy 优先读共享表")
+    from app.services.binance_data_hub import HubHttpProxy
+    from app.services.shared_price_table import SharedPriceTable
+
+    writer = SharedPriceTable.open_writer(path)
+    before = dict(writer._index)
+    writer.write("ticker", "NEWUSDT", 1.5)
+    writer.close()
+    writer = SharedPriceTable.open_writer(path)
+    if any(writer._index.get(k) != v for k, v in before.items()) or "NEWUSDT" not in writer._index:
+        _fail("重新打开后槽位应保持不变")
+
+    now = time.time()
+    writer.write("ws", "BTCUSDT", 65000.1, now)
+    writer.write("ticker", "BTCUSDT", 64990.0, now)
+    writer.write("mark", "ETHUSDT", 3000.25, now, funding=0.0001)
+    writer.write("ticker", "ETHUSDT", 3001.0, now - 600)
+    writer.heartbeat()
+
+    # api_base 指向不存在的端口: 只要命中共享表就不会走 HTTP
+    proxy = HubHttpProxy(api_base="http://127.0.0.1:9", shared_table_path=path)
+    checks = [
+        (proxy.get_price_sync("BTC/USDT"), "65000.1"),
+        (proxy.get_trade_price_sync("ETH/USDT"), "3000.25"),
+        (proxy.get_funding_rate_sync("ETH/USDT"), "0.0001"),
+        (proxy.get_price_sync("ETH/USDT", max_age_seconds=60), None),   # ticker 已过期, 不命中
+    ]
+    for got, want in checks:
+        if (str(got) if got is not None else None) != want:
+            _fail(f"代理取值 {got} != {want}")
+    if proxy.get_full_ticker_map().get("BTCUSDT") is None:
+        _fail("ticker 全表快照应来自共享表")
+    _ok("槽位保持 / ws > ticker / mark / 资金费率 / 过期回落")
+
+    t = time.perf_counter()
+    n = 100_000
+    for _ in range(n):
+        proxy._shared.table().price("BTCUSDT", 90, ("ws", "ticker"))
+    per_read = (time.perf_counter() - t) / n * 1e6
+    t = time.perf_counter()
+    for _ in range(n // 10):
+        proxy.get_price_sync("BTC/USDT")
+    per_call = (time.perf_counter() - t) / (n // 10) * 1e6
+    _ok(f"共享表读价 {per_read:.2f} µs / get_price_sync (含 Decimal) {per_call:.2f} µs")
+    writer.close()
+
+
+def main() -> None:
+    from loguru import logger
+
+    logger.remove()
+    with tempfile.TemporaryDirectory() as d:
+        path = os.path.join(d, "price_table")
+        test_cross_process(path)
+        test_reopen_and_proxy(path)
+    print("\n全部通过")
+
+
+if __name__ == "__main__":
+    main()
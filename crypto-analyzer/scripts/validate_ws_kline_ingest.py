@@ -0,0 +1,337 @@
+#!/usr/bin/env python3
+"""WS K线高密度采集离线校验: KlineRow 与原 Decimal 路径逐列一致 / 分片 / 环形 buffer / 本地 WS 回放吞吐 (不连网不连库)."""
+from __future__ import annotations
+
+import asyncio
+import json
+import sys
+import threading
+import time
+from datetime import datetime
+from decimal import Decimal
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+import pymysql  # noqa: E402
+import websockets  # noqa: E402
+
+SYMBOLS = [f"C{i:03d}USDT" for i in range(250)]
+INTERVALS = ['5m', '15m']
+UPDATES_PER_KLINE = 9       # 每根收盘 K 线之前推送的进行中更新
+
+
+def _ok(msg: str) -> None:
+    print(f"  OK  {msg}")
+
+
+def _fail(msg: str) -> None:
+    print(f"  FAIL {msg}")
+    raise SystemExit(1)
+
+
+def _kline_msg(symbol: str, interval: str, n: int, closed: bool) -> str:
+    t = 1767225600000 + n * 300000
+    p = 100 + (hash(symbol) % 1000) / 7 + n * 0.01
+    return json.dumps({
+        "stream": f"{symbol.lower()}@kline_{interval}",
+        "data": {"e": "kline", "E": t + 1, "s": symbol, "k": {
+            "t": t, "T": t + 299999, "s": symbol, "i": interval, "f": 1, "L": 9, "o": f"{p:.4f}",
+            "c": f"{p + 0.5:.4f}", "h": f"{p + 1:.4f}", "l": f"{p - 1:.4f}", "v": "1234.567",
+            "n": 321, "x": closed, "q": "98765.4321", "V": "600.1", "Q": "48000.25", "B": "0",
+        }},
+    }, separators=(',', ':'))
+
+
+def _legacy_row(msg: str) -> tuple:
+    """原路径: WS dict → _to_save_format (Decimal) → save_klines 参数元组"""
+    k = json.loads(msg)['data']['k']
+    d = {
+        'symbol': f"{k['s'][:-4]}/USDT", 'timeframe': k['i'], 'open_time': int(k['t']),
+        'close_time': int(k['T']), 'timestamp': datetime.utcfromtimestamp(int(k['t']) / 1000),
+        'open_price': Decimal(k['o']), 'high_price': Decimal(k['h']), 'low_price': Decimal(k['l']),
+        'close_price': Decimal(k['c']), 'volume': Decimal(k['v']), 'quote_volume': Decimal(k['q']),
+        'number_of_trades': int(k['n']), 'taker_buy_base_volume': Decimal(k['V']),
+        'taker_buy_quote_volume': Decimal(k['Q']),
+    }
+    return (
+        d['symbol'], 'binance_futures', d['timeframe'], d['open_time'], d['close_time'], d['timestamp'],
+        float(d['open_price']), float(d['high_price']), float(d['low_price']), float(d['close_price']),
+        float(d['volume']), float(d['quote_volume']), d['number_of_trades'],
+        float(d['taker_buy_base_volume']), float(d['taker_buy_quote_volume']),
+    )
+
+
+class _MogrifyCursor(pymysql.cursors.Cursor):
+    """真实参数转义 + 拼 SQL, 不发往服务端"""
+
+    def execute(self, query, args=None):
+        self.connection.sent += len(self.mogrify(query, args))
+        self.rowcount = 1
+        return 1
+
+    def executemany(self, query, args):
+        n = 0
+        for a in args:
+            n += self.execute(query, a)
+        self.rowcount = n
+        return n
+
+
+class _FakePool:
+    def __init__(self):
+        self.conn = pymysql.connect(defer_connect=True, charset='utf8mb4')
+        self.conn.server_status = 0
+        self.conn.sent = 0
+
+    def get_connection(self):
+        pool = self
+
+        class _Ctx:
+            def __enter__(self):
+                return pool
+
+            def __exit__(self, *exc):
+                return False
+        return _Ctx()
+
+    def cursor(self):
+        return _MogrifyCursor(self.conn)
+
+    def commit(self):
+        pass
+
+
+def _writer():
+    from app.collectors.smart_futures_collector import SmartFuturesCollector
+
+    w = SmartFuturesCollector.__new__(SmartFuturesCollector)
+    w.db_pool = _FakePool()
+    return w
+
+
+def test_row_format() -> None:
+    print("[1] 收盘消息直接构造 KlineRow, 与原 Decimal 路径参数逐列一致, dict 式读取兼容")
+    from app.collectors.smart_futures_collector import KlineRow
+    from app.services.binance_ws_kline_collector import WSKlineConnection
+
+    rows = []
+    conn = WSKlineConnection('ws://unused', [], rows.append, 'usdt', 't')
+    conn._handle_msg(_kline_msg('BTCUSDT', '5m', 3, False))
+    conn._handle_msg('{"result":null,"id":1}')
+    if rows:
+        _fail("进行中 K 线 / 订阅确认不应回调")
+    for s in SYMBOLS[:50]:
+        msg = _kline_msg(s, '15m', 7, True)
+        conn._handle_msg(msg)
+        if tuple(rows[-1]) != _legacy_row(msg):
+            _fail(f"{s}: {tuple(rows[-1])} != {_legacy_row(msg)}")
+    r = rows[0]
+    if not isinstance(r, KlineRow) or r['symbol'] != 'C000/USDT' or r.get('timeframe') != '15m' \
+            or r.get('quote_volume') != 98765.4321 or r.get('contract_type') is not None or r[3] != r.open_time:
+        _fail(f"dict 式读取错误: {r}")
+    _ok(f"{len(rows)} 行逐列一致, k['x'] / k.get('y') / 下标访问可用")
+
+    w = _writer()
+    w.save_klines(rows)
+    new_sent = w.db_pool.conn.sent
+    w = _writer()
+    w.save_klines([dict(zip(KlineRow._fields, t)) for t in rows])
+    if not new_sent or w.db_pool.conn.sent != new_sent:
+        _fail("save_klines 对 KlineRow 与 dict 生成的 SQL 不一致")
+    _ok("save_klines: KlineRow 直通与 dict 路径生成相同 SQL")
+
+
+def test_shards_and_buffer() -> None:
+    print("[2] 高密度分片 / 环形 buffer")
+    from app.services import binance_ws_kline_collector as m
+
+    c = m.WSKlineCollector({}, SYMBOLS, INTERVALS, dense=True)
+    shards = c._build_shards()
+    streams = [s for _, _, ss in shards for s in ss]
+    if len(streams) != len(SYMBOLS) * len(INTERVALS) or len(set(streams)) != len(streams):
+        _fail("dense 分片应覆盖全部 streams 且不重复")
+    if max(len(ss) for _, _, ss in shards) > m.DENSE_STREAMS_PER_CONN:
+        _fail("单连接 streams 超限")
+    legacy = len(m.WSKlineCollector({}, SYMBOLS, INTERVALS)._build_shards())
+    _ok(f"{len(streams)} streams: dense {len(shards)} 个连接, 默认 {legacy} 个连接")
+
+    rows = []
+    conn = m.WSKlineConnection('ws://unused', [], rows.append, 'usdt', 't')
+    for n in range(m.BUFFER_MAX_SIZE + 7):
+        conn._handle_msg(_kline_msg('BTCUSDT', '5m', n, True))
+    for r in rows:
+        c._on_kline_closed(r)
+    if len(c.buffer) != m.BUFFER_MAX_SIZE or c._stats['dropped'] != 7 or c.buffer[0] is not rows[7]:
+        _fail(f"溢出应丢最旧 7 条: len={len(c.buffer)} dropped={c._stats['dropped']}")
+    _ok(f"容量 {m.BUFFER_MAX_SIZE}, 溢出 7 条丢最旧, 计入 dropped")
+
+
+class _ReplayServer:
+    """本地 WS 回放: 校验 SUBSCRIBE 分帧, 每帧确认后按帧内 streams 回放 (独立线程 + 事件循环)"""
+
+    def __init__(self, klines_per_stream: int):
+        self.frames = []
+        self.sent = 0
+        self.port = None
+        # 回放消息预先生成, 不计入吞吐
+        self.replay = {}
+        for symbol in SYMBOLS:
+            for interval in INTERVALS:
+                msgs = []
+                for n in range(klines_per_stream):
+                    msgs += [_kline_msg(symbol, interval, n, False)] * UPDATES_PER_KLINE
+                    msgs.append(_kline_msg(symbol, interval, n, True))
+                self.replay[f"{symbol.lower()}@kline_{interval}"] = msgs
+        self._ready = threading.Event()
+        self._loop = asyncio.new_event_loop()
+        threading.Thread(target=self._run, daemon=True).start()
+        self._ready.wait()
+
+    def _run(self):
+        asyncio.set_event_loop(self._loop)
+        self._loop.run_until_complete(self._serve())
+
+    async def _serve(self):
+        async with websockets.serve(self._handler, '127.0.0.1', 0, max_queue=None) as server:
+            self.port = server.sockets[0].getsockname()[1]
+            self._ready.set()
+            await asyncio.Future()
+
+    async def _handler(self, ws):
+        try:
+            async for frame in ws:
+                req = json.loads(frame)
+                self.frames.append(len(req['params']))
+                await ws.send(json.dumps({"result": None, "id": req['id']}))
+                for stream in req['params']:
+                    for msg in self.replay[stream]:
+                        await ws.send(msg)
+                    self.sent += len(self.replay[stream])
+        except websockets.ConnectionClosed:
+            pass
+
+
+async def _replay(dense: bool, klines_per_stream: int) -> tuple:
+    from app.services import binance_ws_kline_collector as m
+
+    server = _ReplayServer(klines_per_stream)
+    c = m.WSKlineCollector({}, SYMBOLS, INTERVALS, dense=dense)
+    want = len(SYMBOLS) * len(INTERVALS) * klines_per_stream
+    flushed = []
+    tasks = []
+    t0 = time.perf_counter()
+    for idx, (market, interval, streams) in enumerate(c._build_shards()):
+        conn = m.WSKlineConnection(f"ws://127.0.0.1:{server.port}", streams, c._on_kline_closed, market, f"#{idx}")
+        c.connections.append(conn)
+        tasks.append(asyncio.create_task(conn.run_forever()))
+
+    async def _flush():
+        # 与 _flusher_loop 同样的取数方式, 写库走真实 save_klines + 参数转义
+        w = _writer()
+        while True:
+            await asyncio.sleep(0.05)
+            batch = list(c.buffer)
+            c.buffer.clear()
+            if batch:
+                w.save_klines(batch)
+                flushed.extend(batch)
+    tasks.append(asyncio.create_task(_flush()))
+
+    while len(flushed) < want and time.perf_counter() - t0 < 120:
+        await asyncio.sleep(0.02)
+    elapsed = time.perf_counter() - t0
+    for t in tasks:
+        t.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    if len(flushed) != want or c._stats['dropped']:
+        _fail(f"dense={dense}: 落盘 {len(flushed)}/{want}, dropped={c._stats['dropped']}")
+    return len(c.connections), server, want, elapsed
+
+
+def test_replay() -> None:
+    print(f"[3] 本地 WS 回放吞吐 ({len(SYMBOLS)} symbols × {INTERVALS}, 每根收盘前 {UPDATES_PER_KLINE} 条进行中更新)")
+    from app.services import binance_ws_kline_collector as m
+
+    for dense in (False, True):
+        n_conn, server, want, elapsed = asyncio.run(_replay(dense, 8))
+        if dense and max(server.frames) > m.SUBSCRIBE_PARAMS_PER_FRAME:
+            _fail(f"SUBSCRIBE 帧过大: {max(server.frames)}")
+        if sum(server.frames) != len(SYMBOLS) * len(INTERVALS):
+            _fail("订阅 streams 数不对")
+        _ok(f"{'dense' if dense else '默认 '}: {n_conn:2d} 连接 / {len(server.frames):2d} 个订阅帧, "
+            f"{server.sent} 条消息 → {want} 根收盘 K 线解析并落盘, "
+            f"{server.sent / elapsed:,.0f} 消息/s, {want / elapsed:,.0f} K线/s (含订阅帧间隔与回放端开销)")
+
+
+def test_cpu() -> None:
+    print("[4] 单核耗时 (原 dict+Decimal 路径 vs KlineRow, 落盘含 pymysql 参数转义)")
+    from app.collectors.smart_futures_collector import KlineRow
+    from app.services.binance_ws_kline_collector import WSKlineConnection
+
+    closed = [_kline_msg(s, i, n, True) for s in SYMBOLS for i in INTERVALS for n in range(4)]
+    updates = [_kline_msg(s, '5m', 1, False) for s in SYMBOLS] * 8
+
+    rows = []
+    conn = WSKlineConnection('ws://unused', [], rows.append, 'usdt', 't')
+    t = time.perf_counter()
+    for msg in updates:
+        json.loads(msg)['data']['k']['x']
+    legacy_skip = len(updates) / (time.perf_counter() - t)
+    t = time.perf_counter()
+    for msg in updates:
+        conn._handle_msg(msg)
+    skip = len(updates) / (time.perf_counter() - t)
+    _ok(f"进行中更新丢弃: {legacy_skip:,.0f} → {skip:,.0f} 条/s")
+
+    def _legacy_dict(msg):
+        k = json.loads(msg)['data']['k']
+        return {
+            'symbol': f"{k['s'][:-4]}/USDT", 'contract_type': 'usdt_futures', 'timeframe': k['i'],
+            'open_time': int(k['t']), 'close_time': int(k['T']),
+            'timestamp': datetime.utcfromtimestamp(int(k['t']) / 1000),
+            'open_price': Decimal(k['o']), 'high_price': Decimal(k['h']), 'low_price': Decimal(k['l']),
+            'close_price': Decimal(k['c']), 'volume': Decimal(k['v']), 'quote_volume': Decimal(k['q']),
+            'number_of_trades': int(k['n']), 'taker_buy_base_volume': Decimal(k['V']),
+            'taker_buy_quote_volume': Decimal(k['Q']),
+        }
+
+    t = time.perf_counter()
+    dicts = [_legacy_dict(msg) for msg in closed]
+    legacy_parse = time.perf_counter() - t
+    t = time.perf_counter()
+    for msg in closed:
+        conn._handle_msg(msg)
+    parse = time.perf_counter() - t
+    _ok(f"收盘 K 线解析: {len(closed) / legacy_parse:,.0f} → {len(closed) / parse:,.0f} 根/s")
+
+    w = _writer()
+    t = time.perf_counter()
+    w.save_klines(dicts)
+    legacy_flush = time.perf_counter() - t
+    w = _writer()
+    t = time.perf_counter()
+    w.save_klines(rows)
+    flush = time.perf_counter() - t
+    if not all(isinstance(r, KlineRow) for r in rows):
+        _fail("应全部为 KlineRow")
+    _ok(f"save_klines: {len(dicts) / legacy_flush:,.0f} → {len(rows) / flush:,.0f} 根/s; "
+        f"解析+落盘合计 {len(closed) / (legacy_parse + legacy_flush):,.0f} → "
+        f"{len(closed) / (parse + flush):,.0f} 根/s")
+
+
+def main() -> None:
+    from loguru import logger
+
+    logger.remove()
+    logger.add(sys.stderr, level="ERROR")
+    test_row_format()
+    test_shards_and_buffer()
+    test_replay()
+    test_cpu()
+    print("\n全部通过")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""BinanceWSPriceService 全市场标记价格流离线校验: 价格表 / 本地订阅过滤 / 最高最低价 / 单消息耗时 (不连网)."""
+from __future__ import annotations
+
+import asyncio
+import json
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+import numpy as np  # noqa: E402
+
+
+def _ok(msg: str) -> None:
+    print(f"  OK  {msg}")
+
+
+def _fail(msg: str) -> None:
+    print(f"  FAIL {msg}")
+    raise SystemExit(1)
+
+
+def _arr_message(raw_symbols, prices) -> str:
+    now = int(time.time() * 1000)
+    return json.dumps([
+        {"e": "markPriceUpdate", "E": now, "s": s, "p": f"{p:.8f}", "i": f"{p:.8f}",
+         "P": f"{p:.8f}", "r": "0.00010000", "T": now + 3600000}
+        for s, p in zip(raw_symbols, prices)
+    ])
+
+
+def test_table() -> None:
+    print("[1] 全市场消息写入价格表, 订阅只影响回调与追踪")
+    from app.services.binance_ws_price import BinanceWSPriceService
+
+    svc = BinanceWSPriceService('futures')
+    if not svc.all_market or not svc._build_url().endswith('/!markPrice@arr@1s'):
+        _fail("合约默认应为全市场流")
+    seen = []
+    svc.add_callback(lambda s, p: seen.append((s, p)))
+    asyncio.run(svc.subscribe(['BTC/USDT']))
+
+    raw = ['BTCUSDT', 'ETHUSDT', 'BTCUSD_PERP']
+    asyncio.run(svc._handle_message(_arr_message(raw, [100.0, 10.0, 99.0])))
+    if svc.get_price('ETH/USDT') != 10.0 or svc.get_price('BTCUSD_PERP') != 99.0:
+        _fail("未订阅币种也应有价格")
+    if seen != [('BTC/USDT', 100.0)]:
+        _fail(f"只应回调已订阅币种: {seen}")
+    asyncio.run(svc._handle_message(_arr_message(raw, [100.0, 11.0, 99.0])))
+    if len(seen) != 1:
+        _fail("价格未变化不应回调")
+    asyncio.run(svc._handle_message(_arr_message(raw, [104.0, 11.0, 99.0])))
+    asyncio.run(svc._handle_message(_arr_message(raw, [97.0, 11.0, 99.0])))
+    if (svc.get_max_price('BTC/USDT'), svc.get_min_price('BTC/USDT')) != (104.0, 97.0):
+        _fail("最高/最低价追踪错误")
+    if svc.get_max_price('ETH/USDT') is not None:
+        _fail("未订阅币种不应有追踪")
+    svc.reset_price_tracking('ETH/USDT')
+    if svc.get_max_price('ETH/USDT') != 11.0:
+        _fail("reset_price_tracking 应以当前价开始追踪")
+    svc._update_ts[svc._index['ETH/USDT']] -= 200
+    if svc.get_price('ETH/USDT') is not None or svc.get_price('ETH/USDT', max_age_seconds=300) != 11.0:
+        _fail("过期价格判断错误")
+    asyncio.run(svc.unsubscribe(['BTC/USDT']))
+    asyncio.run(svc._handle_message(_arr_message(raw, [98.0, 11.0, 99.0])))
+    if len(seen) != 3 or svc.get_price('BTC/USDT') != 98.0:
+        _fail("取消订阅后不回调, 但价格继续更新")
+    _ok("价格 / 回调过滤 / 最高最低价 / 过期 / 取消订阅")
+
+    spot = BinanceWSPriceService('spot')
+    asyncio.run(spot.subscribe(['BTC/USDT']))
+    asyncio.run(spot._handle_message(json.dumps({"e": "24hrTicker", "s": "BTCUSDT", "c": "101.5"})))
+    if spot.all_market or spot.get_price('BTC/USDT') != 101.5 or 'btcusdt@ticker' not in spot._build_url():
+        _fail("现货仍为逐币种订阅")
+    _ok("现货逐币种 ticker 流不变")
+
+
+def bench() -> None:
+    print("[2] 300 合约一条消息耗时")
+    from app.services.binance_ws_price import BinanceWSPriceService
+
+    rng = np.random.default_rng(0)
+    raw = [f"C{i}USDT" for i in range(300)]
+    svc = BinanceWSPriceService('futures')
+    asyncio.run(svc.subscribe([f"C{i}/USDT" for i in range(0, 300, 5)]))
+    svc.add_callback(lambda s, p: None)
+    messages = [_arr_message(raw, 100 * np.exp(rng.normal(0, 0.001, 300))) for _ in range(200)]
+
+    async def run():
+        t = time.perf_counter()
+        for m in messages:
+            await svc._handle_message(m)
+        return (time.perf_counter() - t) * 1000 / len(messages)
+
+    per_msg = asyncio.run(run())
+    parse = time.perf_counter()
+    for m in messages:
+        json.loads(m)
+    parse_ms = (time.perf_counter() - parse) * 1000 / len(messages)
+    _ok(f"{per_msg:.2f} ms/消息 (其中 json 解析 {parse_ms:.2f} ms), 60 个币种回调")
+
+
+def main() -> None:
+    test_table()
+    bench()
+    print("\n全部通过")
+
+
+if __name__ == "__main__":
+    main()
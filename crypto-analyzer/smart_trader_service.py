@@ -21,6 +21,7 @@ sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 from app.services.binance_ws_price import get_ws_price_service, BinanceWSPriceService
 from app.utils.futures_symbol import futures_symbol_rating_canonical
 from app.services.smart_exit_optimizer import SmartExitOptimizer
+from app.services.pnl_rollup import refresh_position_rollup
 from app.services.big4_trend_detector import Big4TrendDetector
 from app.services.breakout_signal_booster import BreakoutSignalBooster
 from app.services.signal_blacklist_checker import SignalBlacklistChecker
@@ -28,6 +29,11 @@ from app.services.signal_score_v2_service import SignalScoreV2Service
 from app.services.big4_regime_monitor import Big4RegimeMonitor
 from app.services.midline_swing_config import is_midline_source, midline_source_sql_not_in
 from app.services.brain_config import is_brain_source, brain_source_sql_exclude
+from app.services.kline_store import (
+    OHLCV_KEYS, arrays_to_rows, get_kline_store, init_kline_store, load_klines_bulk,
+)
+from app.services.brain_parallel_scan import ParallelBrainScanner
+from app.utils import indicator_engine
 
 # 加载环境变量
 load_dotenv()
@@ -229,6 +235,9 @@ class SmartDecisionBrain:
                 }
                 logger.info(f"   📊 评分权重: 使用默认权重")
 
+            # 并行分片扫描 (signals.parallel_scan, 默认关闭)
+            self.parallel_scan_config = config.get('signals', {}).get('parallel_scan', {}) or {}
+
             # V2评分过滤服务（协同确认）
             resonance_config = config.get('signals', {}).get('resonance_filter', {})
             self.score_v2_service = SignalScoreV2Service(
@@ -379,6 +388,16 @@ class SmartDecisionBrain:
             return True, "检查失败,放行"
 
     def load_klines(self, symbol: str, timeframe: str, limit: int = 100):
+        # 优先读进程内 K 线缓存 (启动水合 + 增量同步), 未覆盖时回落 SQL
+        store = get_kline_store()
+        if store is not None:
+            arrays = store.get_arrays(
+                symbol, timeframe, limit,
+                since_ms=int((time.time() - 60 * 86400) * 1000),
+            )
+            if arrays is not None:
+                return arrays_to_rows(arrays, OHLCV_KEYS)
+
         conn = self._get_connection()
         cursor = conn.cursor(pymysql.cursors.DictCursor)
 
@@ -405,20 +424,76 @@ class SmartDecisionBrain:
 
         return klines
 
-    def analyze(self, symbol: str, big4_result: dict = None):
+    # analyze() 所需 K 线: (周期, 根数); 15m 96 根 = 24 小时
+    SCAN_KLINES = (('1d', 50), ('1h', 100), ('15m', 96))
+
+    def prefetch_scan_klines(self, symbols) -> dict:
+        """
+        一次性预取 analyze() 所需 K 线 → {symbol: {timeframe: klines}}
+
+        每个周期一次 load_klines_bulk (缓存命中直接取, 其余币种合并为一条窗口查询),
+        替代逐币种 3 次 LIMIT 查询. 某周期批量读取失败时该周期回落逐币种 load_klines.
+        """
+        symbols = list(symbols)
+        since_ms = int((time.time() - 60 * 86400) * 1000)
+        by_tf = {}
+        for tf, limit in self.SCAN_KLINES:
+            try:
+                by_tf[tf] = load_klines_bulk(self._get_connection(), symbols, tf, limit, since_ms=since_ms)
+            except Exception as e:
+                logger.warning(f"{tf} 批量预取K线失败, 回落逐币种读取: {e}")
+
+        out = {}
+        for symbol in symbols:
+            try:
+                entry = {}
+                for tf, limit in self.SCAN_KLINES:
+                    if tf not in by_tf:
+                        entry[tf] = self.load_klines(symbol, tf, limit)
+                        continue
+                    arrays = by_tf[tf].get(symbol)
+                    entry[tf] = arrays_to_rows(arrays, OHLCV_KEYS) if arrays is not None else []
+                out[symbol] = entry
+            except Exception as e:
+                logger.warning(f"{symbol} 预取K线失败: {e}")
+        return out
+
+    def scan_state(self) -> dict:
+        """analyze() 依赖的可变状态 (并行扫描时下发给工作进程)"""
+        return {
+            'whitelist': list(self.whitelist),
+            'blacklist': list(getattr(self, 'blacklist', [])),
+            'signal_blacklist': dict(getattr(self, 'signal_blacklist', {})),
+            'scoring_weights': dict(self.scoring_weights),
+            'threshold': self.threshold,
+            'max_threshold': self.max_threshold,
+            'signal_confirmation_enabled': self.signal_confirmation_enabled,
+            'big4_filter_enabled': getattr(self, 'big4_filter_enabled', True),
+            'market_adx': getattr(self, 'market_adx', 25.0),
+        }
+
+    def apply_scan_state(self, state: dict):
+        for key, value in state.items():
+            setattr(self, key, value)
+
+    def analyze(self, symbol: str, big4_result: dict = None, klines: dict = None):
         """分析并决策 - 支持做多和做空 (主要使用1小时K线)
 
         Args:
             symbol: 交易对
             big4_result: Big4趋势结果 (由SmartTraderService传入)
+            klines: 预取的 {timeframe: klines} (并行扫描时由主进程下发), 为空则自行读取
         """
         if symbol not in self.whitelist:
             return None
 
         try:
-            klines_1d = self.load_klines(symbol, '1d', 50)
-            klines_1h = self.load_klines(symbol, '1h', 100)
-            klines_15m = self.load_klines(symbol, '15m', 96)  # 24小时的15分钟K线
+            if klines:
+                klines_1d, klines_1h, klines_15m = (klines.get(tf) or [] for tf, _ in self.SCAN_KLINES)
+            else:
+                klines_1d = self.load_klines(symbol, '1d', 50)
+                klines_1h = self.load_klines(symbol, '1h', 100)
+                klines_15m = self.load_klines(symbol, '15m', 96)  # 24小时的15分钟K线
 
             if len(klines_1d) < 30 or len(klines_1h) < 72 or len(klines_15m) < 48:  # 至少需要72小时(3天)数据
                 return None
@@ -1007,26 +1082,16 @@ class SmartDecisionBrain:
             _adx_rows = list(reversed(_adx_cur.fetchall()))
             _adx_cur.close()
             if len(_adx_rows) >= 16:
-                _highs  = [float(r[0]) for r in _adx_rows]
-                _lows   = [float(r[1]) for r in _adx_rows]
-                _closes = [float(r[2]) for r in _adx_rows]
-                _tr_list, _plus_dm_list, _minus_dm_list = [], [], []
-                for _i in range(1, len(_closes)):
-                    _tr = max(_highs[_i]-_lows[_i], abs(_highs[_i]-_closes[_i-1]), abs(_lows[_i]-_closes[_i-1]))
-                    _tr_list.append(_tr)
-                    _pdm = max(0, _highs[_i]-_highs[_i-1]) if _highs[_i]-_highs[_i-1] > _lows[_i-1]-_lows[_i] else 0
-                    _mdm = max(0, _lows[_i-1]-_lows[_i]) if _lows[_i-1]-_lows[_i] > _highs[_i]-_highs[_i-1] else 0
-                    _plus_dm_list.append(_pdm)
-                    _minus_dm_list.append(_mdm)
-                _p = 14
-                _atr = sum(_tr_list[-_p:]) / _p
-                if _atr > 0:
-                    _pdi = sum(_plus_dm_list[-_p:]) / _p / _atr * 100
-                    _mdi = sum(_minus_dm_list[-_p:]) / _p / _atr * 100
-                    _ds  = _pdi + _mdi
-                    self.market_adx = abs(_pdi - _mdi) / _ds * 100 if _ds > 0 else 25.0
-                else:
-                    self.market_adx = 25.0
+                _adx = indicator_engine.adx(
+                    [float(r[0]) for r in _adx_rows],
+                    [float(r[1]) for r in _adx_rows],
+                    [float(r[2]) for r in _adx_rows],
+                    14,
+                )
+                _pdi = indicator_engine.last_value(_adx['plus_di']) or 0.0
+                _mdi = indicator_engine.last_value(_adx['minus_di']) or 0.0
+                # ATR 为 0 或 DI 之和为 0 时按中性 25 处理
+                self.market_adx = indicator_engine.last_value(_adx['adx']) if _pdi + _mdi > 0 else 25.0
             else:
                 self.market_adx = 25.0
             _adx_label = "震荡市⚠️(阈值+10)" if self.market_adx < 20 else ("弱趋势" if self.market_adx < 30 else "趋势市")
@@ -1048,12 +1113,7 @@ class SmartDecisionBrain:
 
         logger.info(f"{'='*100}")
 
-        opportunities = []
-
-        for symbol in self.whitelist:
-            result = self.analyze(symbol, big4_result=big4_result)
-            if result:
-                opportunities.append(result)
+        opportunities = self._scan_symbols(big4_result)
 
         # 🧠 从众效应防御：Big4 NEUTRAL + ≥80%同向 + ≥5个信号时，提高阈值
         # 前提条件：仅在 Big4 为 NEUTRAL 时生效
@@ -1126,6 +1186,59 @@ class SmartDecisionBrain:
 
         return opportunities
 
+    def _scan_symbols(self, big4_result: dict = None) -> list:
+        """逐币种 analyze(); 配置了 parallel_scan 时分片交给进程池, 失败回落串行"""
+        t0 = time.time()
+        symbols = list(self.whitelist)
+        cfg = getattr(self, 'parallel_scan_config', {}) or {}
+
+        if cfg.get('enabled') and len(symbols) > 1:
+            try:
+                if getattr(self, '_parallel_scanner', None) is None:
+                    self._parallel_scanner = ParallelBrainScanner(
+                        self.db_config,
+                        workers=cfg.get('workers', 4),
+                        min_per_shard=cfg.get('min_symbols_per_shard', 20),
+                    )
+                klines = self.prefetch_scan_klines(symbols)
+                prefetch_ms = (time.time() - t0) * 1000
+                opportunities = self._parallel_scanner.scan(symbols, self.scan_state(), big4_result, klines)
+                stats = dict(self._parallel_scanner.last_stats, prefetch_ms=round(prefetch_ms, 1),
+                             total_ms=round((time.time() - t0) * 1000, 1))
+                self.last_scan_stats = stats
+                shard_desc = ', '.join(
+                    f"#{s['shard']}:{s['symbols']}币/{s['elapsed_ms']:.0f}ms/{s['opportunities']}个"
+                    for s in stats['shards']
+                )
+                logger.info(
+                    f"[SCAN-PARALLEL] {len(symbols)}币 {len(stats['shards'])}片 "
+                    f"预取{stats['prefetch_ms']:.0f}ms 总{stats['total_ms']:.0f}ms | {shard_desc}"
+                )
+                return opportunities
+            except Exception as e:
+                logger.error(f"[SCAN-PARALLEL] 并行扫描失败, 本轮回落串行: {e}")
+                t0 = time.time()
+
+        try:
+            klines = self.prefetch_scan_klines(symbols)
+        except Exception as e:
+            logger.warning(f"批量预取K线失败, 逐币种读取: {e}")
+            klines = {}
+        opportunities = []
+        for symbol in symbols:
+            result = self.analyze(symbol, big4_result=big4_result, klines=klines.get(symbol))
+            if result:
+                opportunities.append(result)
+        elapsed_ms = round((time.time() - t0) * 1000, 1)
+        self.last_scan_stats = {
+            'mode': 'serial',
+            'workers': 1,
+            'total_ms': elapsed_ms,
+            'shards': [{'shard': 0, 'pid': os.getpid(), 'symbols': len(symbols),
+                        'opportunities': len(opportunities), 'elapsed_ms': elapsed_ms}],
+        }
+        return opportunities
+
     def _validate_signal_direction(self, signal_components: dict, side: str) -> tuple:
         """
         验证信号方向一致性,防止矛盾信号
@@ -1198,6 +1311,11 @@ class SmartTraderService:
         self.scan_interval = 300
 
         self.brain = SmartDecisionBrain(self.db_config)
+        # 进程内 K 线缓存: 启动一次性水合, scan_all / Big4 读内存而非逐币种查库
+        try:
+            init_kline_store(self.db_config, timeframes=('5m', '15m', '1h', '4h', '1d'))
+        except Exception as _ks_e:
+            logger.error(f"K线缓存初始化失败 (扫描回落逐币种 SQL): {_ks_e}")
         self.running = True
         self.event_loop = None  # 事件循环引用，在async_main中设置
         self._pending_entry_count = 0  # 正在后台采样中（尚未写入DB）的任务数
@@ -1830,6 +1948,7 @@ class SmartTraderService:
                 return
 
             logger.info(f"[HEDGE] 发现 {len(hedge_pairs)} 个对冲交易对")
+            hedge_closed_ids = []
 
             # 2. 处理每个对冲交易对
             for pair in hedge_pairs:
@@ -1917,6 +2036,7 @@ class SmartTraderService:
                                     notes = CONCAT(IFNULL(notes, ''), '|hedge_loss_cut')
                                 WHERE id = %s
                             """, (current_price, long_pos['realized_pnl'], long_pos['id']))
+                            hedge_closed_ids.append(long_pos['id'])
 
                             # Calculate values for orders and trades
                             import uuid
@@ -2002,6 +2122,7 @@ class SmartTraderService:
                                     notes = CONCAT(IFNULL(notes, ''), '|hedge_loss_cut')
                                 WHERE id = %s
                             """, (current_price, short_pos['realized_pnl'], short_pos['id']))
+                            hedge_closed_ids.append(short_pos['id'])
 
                             # Calculate values for orders and trades
                             import uuid
@@ -2065,6 +2186,9 @@ class SmartTraderService:
 
             cursor.close()
 
+            for pid in hedge_closed_ids:
+                refresh_position_rollup(conn, pid)
+
         except Exception as e:
             logger.error(f"[ERROR] 检查对冲持仓失败: {e}")
 
@@ -2311,6 +2435,7 @@ class SmartTraderService:
                 """, (symbol, side, self.account_id))
 
             positions = cursor.fetchall()
+            closed_ids = []
 
             for pos in positions:
                 entry_price = float(pos['entry_price'])
@@ -2343,6 +2468,7 @@ class SmartTraderService:
                         notes = CONCAT(IFNULL(notes, ''), '|', %s)
                     WHERE id = %s
                 """, (current_price, realized_pnl, reason, pos['id']))
+                closed_ids.append(pos['id'])
 
                 # Calculate values for orders and trades
                 import uuid
@@ -2408,6 +2534,8 @@ class SmartTraderService:
                 # 由 update_account_stats.py 每5分钟统一计算
 
             cursor.close()
+            for pid in closed_ids:
+                refresh_position_rollup(conn, pid)
             conn.close()
 
             # ========== 同步实盘平仓（仅逆向信号触发，SmartExitOptimizer不走此路径）==========
@@ -2538,6 +2666,7 @@ class SmartTraderService:
                     db_opens = cur.fetchall()
 
                     closed_count = 0
+                    paper_closed_ids = []
                     # 建一个 symbol→exchange_price 映射，用于对账时回填 close_price
                     exchange_price_map = {p['symbol']: float(p.get('mark_price') or p.get('entry_price') or 0)
                                           for p in exchange_positions}
@@ -2608,10 +2737,14 @@ class SmartTraderService:
                                     "WHERE id=%s AND status='open'",
                                     (close_p, live_pnl, row['paper_position_id'])
                                 )
+                                paper_closed_ids.append(row['paper_position_id'])
                             closed_count += 1
 
                     conn.commit()
-                    cur.close(); conn.close()
+                    cur.close()
+                    for pid in paper_closed_ids:
+                        refresh_position_rollup(conn, pid)
+                    conn.close()
 
                     if closed_count > 0:
                         logger.info(f"[对账] 账号[{ak['account_name']}] 关闭 {closed_count} 个交易所已平仓的DB记录")
@@ -7,7 +7,8 @@ WebSocket K线采集服务入口 (独立进程)
 fast_collector_service.py 不删，降频到 1 小时做兜底/校准。
 
 Phase 1: 仅 U本位 5m + 15m, ~500 streams, 2-3 个 WS 连接
-Phase 2 (本服务后续扩展): 加 1h/1d
+Phase 2: 只订阅 5m, 15m/1h/4h/1d 由 5m 本地合成 (candle_aggregator);
+         .env 中 WS_KLINE_DERIVE=0 回到 Phase 1 (15m 走 WS, 1h/4h/1d 由 fast_collector REST 采)
 
 启动:
     python ws_kline_collector_service.py
@@ -25,6 +26,8 @@ sys.path.insert(0, str(_project_root))
 
 from app.collectors.smart_futures_collector import SmartFuturesCollector
 from app.services.binance_ws_kline_collector import WSKlineCollector
+from app.services.candle_aggregator import BASE_TIMEFRAME, DERIVED_TIMEFRAMES
+from app.utils.config_loader import load_config
 from app.utils.pid_lock import acquire_pid_lock
 
 
@@ -77,13 +80,31 @@ async def main_async() -> None:
     logger.info("=" * 60)
     logger.info("WS K线采集服务启动")
     logger.info(f"U本位 symbols: {len(usdt_symbols)}")
-    logger.info(f"周期: {PHASE1_INTERVALS}")
+
+    # 增量技术指标参数与定时缓存任务一致 (config.yaml indicators 段)
+    try:
+        indicator_config = load_config().get('indicators', {})
+    except Exception as e:
+        logger.warning(f"读取 config.yaml indicators 失败, 使用默认参数: {e}")
+        indicator_config = {}
+
+    _env = dotenv_values(_project_root / '.env')
+    # 高密度模式 (每连接数百 streams) 需显式开启: .env 中 WS_KLINE_DENSE=1
+    dense = _env.get('WS_KLINE_DENSE', '0') == '1'
+    # 高周期本地合成 (默认开启), 与 fast_collector_service 读同一开关
+    derive = _env.get('WS_KLINE_DERIVE', '1') == '1'
+    intervals = [BASE_TIMEFRAME] if derive else PHASE1_INTERVALS
+    derived = list(DERIVED_TIMEFRAMES) if derive else []
+    logger.info(f"周期: WS {intervals}, 本地合成 {derived}")
     logger.info("=" * 60)
 
     collector = WSKlineCollector(
         db_config=db_config,
         usdt_symbols=usdt_symbols,
-        intervals=PHASE1_INTERVALS,
+        intervals=intervals,
+        indicator_config=indicator_config,
+        dense=dense,
+        derived=derived,
     )
     await collector.start()
 